@@ -404,14 +404,6 @@ Responde en JSON:
 }"""
         }
         
-        logger.info("🏛️ Council Stage 1: Claude, Gemini, GPT-4o analizando en paralelo...")
-        stage1 = await self.openrouter_service.call_council_parallel(
-            full_prompt,
-            system_prompts,
-            OPENROUTER_MODELS
-        )
-        
-        logger.info("🔍 Council Stage 2: Revisión cruzada anónima...")
         review_template = """Mi análisis fue:
 {my_response}
 
@@ -423,7 +415,16 @@ Evalúa objetivamente:
 2. ¿Hay afirmaciones sin fundamento en alguno?
 3. ¿Qué puntos deberían incluirse en la conclusión final?"""
         
-        stage2 = await self.openrouter_service.run_council_review(stage1, review_template)
+        logger.info("🏛️ Council Stages 1-2: Claude, Gemini, GPT-4o analizando; revisión cruzada conforme responden...")
+        from services.openrouter_service import COUNCIL_QUORUM, COUNCIL_SOFT_DEADLINE_SECONDS
+        stage1, stage2 = await self.openrouter_service.run_council_stages(
+            full_prompt,
+            system_prompts,
+            review_template,
+            models=OPENROUTER_MODELS,
+            quorum=COUNCIL_QUORUM,
+            soft_deadline=COUNCIL_SOFT_DEADLINE_SECONDS
+        )
         
         chairman_prompt = """Eres el Presidente del Consejo de Estrategia de Revisar.ia.
 Has recibido análisis de tres expertos usando diferentes IAs:
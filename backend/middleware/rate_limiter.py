@@ -1,18 +1,108 @@
 """
 Rate Limiter Middleware
 Implements per-empresa rate limiting based on plan tiers
+
+Hot path without database round trips:
+- Each worker keeps an in-process quota bucket per empresa and day, refilled
+  by leases: blocks of requests/tokens reserved atomically in usage_tracking
+  (requests_reserved / tokens_reserved). Reservations never exceed the daily
+  limit, so workers cannot overshoot it together; at most one unused lease
+  per worker and empresa is held back until it is released.
+- Usage is accumulated in memory and written behind in one batched UPDATE
+  every RATE_LIMIT_FLUSH_SECONDS, which also turns reservations into usage.
+- Idle leases are returned after RATE_LIMIT_LEASE_TTL_SECONDS; close()
+  returns every lease on shutdown.
+- Each worker's reservations are also recorded in usage_leases with a
+  heartbeat refreshed by its leases and flushes. A worker that dies
+  without close() stops refreshing it; after RATE_LIMIT_LEASE_EXPIRY_SECONDS
+  the next lease for that empresa drops its rows and recomputes
+  *_reserved from the live ones, so crashed or redeployed workers leak
+  quota for minutes instead of until the end of the day.
+- Plan lookups are cached for RATE_LIMIT_PLAN_TTL_SECONDS.
 """
 
 import os
+import math
+import time
+import uuid
+import socket
+import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple
 import asyncpg
 from fastapi import Request, HTTPException
 
 logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.environ.get('DATABASE_URL', '')
+LEASE_FRACTION = float(os.environ.get('RATE_LIMIT_LEASE_FRACTION', '0.02'))
+LEASE_TTL_SECONDS = float(os.environ.get('RATE_LIMIT_LEASE_TTL_SECONDS', '60'))
+FLUSH_SECONDS = float(os.environ.get('RATE_LIMIT_FLUSH_SECONDS', '2'))
+PLAN_TTL_SECONDS = float(os.environ.get('RATE_LIMIT_PLAN_TTL_SECONDS', '300'))
+# A live worker refreshes its heartbeat at least every LEASE_TTL + FLUSH seconds
+LEASE_EXPIRY_SECONDS = float(os.environ.get(
+    'RATE_LIMIT_LEASE_EXPIRY_SECONDS', str(2 * (LEASE_TTL_SECONDS + FLUSH_SECONDS))
+))
+
+UNLIMITED = {"requests_remaining": 999, "tokens_remaining": 999999, "plan": "unknown"}
+
+# Drops expired (and fully returned) leases and sums the live ones; the
+# SELECT sees the rows as they were before the DELETE, hence the same filter
+RECLAIM_SQL = """
+    WITH expired AS (
+        DELETE FROM usage_leases
+        WHERE empresa_id = $1 AND fecha = $2
+          AND (heartbeat_at < NOW() - make_interval(secs => $3)
+               OR (requests_reserved = 0 AND tokens_reserved = 0))
+        RETURNING 1
+    )
+    SELECT COALESCE(SUM(requests_reserved), 0) AS requests,
+           COALESCE(SUM(tokens_reserved), 0) AS tokens,
+           (SELECT count(*) FROM expired) AS expired
+    FROM usage_leases
+    WHERE empresa_id = $1 AND fecha = $2
+      AND heartbeat_at >= NOW() - make_interval(secs => $3)
+"""
+
+LEASE_SQL = """
+    WITH lease AS (
+        INSERT INTO usage_leases (empresa_id, fecha, worker_id, requests_reserved, tokens_reserved, heartbeat_at)
+        VALUES ($1, $2, $5, $3, $4, NOW())
+        ON CONFLICT (empresa_id, fecha, worker_id) DO UPDATE SET
+            requests_reserved = usage_leases.requests_reserved + EXCLUDED.requests_reserved,
+            tokens_reserved = usage_leases.tokens_reserved + EXCLUDED.tokens_reserved,
+            heartbeat_at = NOW()
+    )
+    UPDATE usage_tracking SET
+        requests_reserved = $6 + $3,
+        tokens_reserved = $7 + $4,
+        updated_at = NOW()
+    WHERE empresa_id = $1 AND fecha = $2
+"""
+
+FLUSH_SQL = """
+    WITH d AS (
+        SELECT * FROM unnest($1::uuid[], $2::date[], $3::int[], $4::bigint[], $5::int[], $6::bigint[])
+            AS d(empresa_id, fecha, requests, tokens, released_requests, released_tokens)
+    ), lease AS (
+        UPDATE usage_leases l SET
+            requests_reserved = GREATEST(0, l.requests_reserved - d.released_requests),
+            tokens_reserved = GREATEST(0, l.tokens_reserved - d.released_tokens),
+            heartbeat_at = NOW()
+        FROM d
+        WHERE l.empresa_id = d.empresa_id AND l.fecha = d.fecha AND l.worker_id = $7
+    )
+    UPDATE usage_tracking u SET
+        requests_today = u.requests_today + d.requests,
+        tokens_today = u.tokens_today + d.tokens,
+        requests_reserved = GREATEST(0, u.requests_reserved - d.released_requests),
+        tokens_reserved = GREATEST(0, u.tokens_reserved - d.released_tokens),
+        updated_at = NOW()
+    FROM d
+    WHERE u.empresa_id = d.empresa_id AND u.fecha = d.fecha
+"""
 
 
 class RateLimitExceeded(Exception):
@@ -35,10 +125,59 @@ async def get_db_connection():
         return None
 
 
+@dataclass
+class QuotaBucket:
+    """Quota leased by this worker for one empresa and day."""
+    empresa_id: str
+    fecha: date
+    plan: str = ""
+    limits: Dict[str, int] = field(default_factory=dict)
+    requests: int = 0
+    tokens: int = 0
+    # Usage not yet written to usage_tracking and reservations to release
+    pending_requests: int = 0
+    pending_tokens: int = 0
+    released_requests: int = 0
+    released_tokens: int = 0
+    # Snapshot of the shared counters at the last lease
+    requests_used: int = 0
+    tokens_used: int = 0
+    requests_available: int = 0
+    tokens_available: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def covers(self, tokens: int) -> bool:
+        return self.requests >= 1 and self.tokens >= max(tokens, 1)
+
+    def take(self, tokens: int):
+        taken_tokens = min(tokens, self.tokens)
+        self.requests -= 1
+        self.tokens -= taken_tokens
+        self.pending_requests += 1
+        self.pending_tokens += tokens
+        self.released_requests += 1
+        self.released_tokens += taken_tokens
+        self.requests_used += 1
+        self.tokens_used += tokens
+        self.last_used = time.monotonic()
+
+    def release(self):
+        """Return the unused lease to the shared pool on the next flush."""
+        self.released_requests += self.requests
+        self.released_tokens += self.tokens
+        self.requests = 0
+        self.tokens = 0
+
+
+def _next_reset() -> datetime:
+    return datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+
 class RateLimiter:
     """Rate limiter with per-plan limits and usage tracking."""
     
-    def __init__(self):
+    def __init__(self, pool=None):
         self.limits = {
             "free": {"requests_per_day": 50, "tokens_per_day": 100_000},
             "starter": {"requests_per_day": 500, "tokens_per_day": 1_000_000},
@@ -48,6 +187,21 @@ class RateLimiter:
         }
         
         self.default_plan = "starter"
+        self._pool = pool
+        self._buckets: Dict[Tuple[str, date], QuotaBucket] = {}
+        self._plans: Dict[str, Tuple[float, str]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stats = {"local": 0, "leases": 0, "flushes": 0, "rejected": 0, "expired_leases": 0}
+    
+    async def _get_pool(self):
+        if self._pool is None and DATABASE_URL:
+            try:
+                from services.database_pg import get_pool
+                self._pool = await get_pool()
+            except Exception as e:
+                logger.error(f"Database connection failed: {e}")
+        return self._pool
     
     async def ensure_table_exists(self) -> bool:
         """Ensure usage_tracking table exists."""
@@ -63,17 +217,37 @@ class RateLimiter:
                     fecha DATE NOT NULL,
                     requests_today INTEGER DEFAULT 0,
                     tokens_today INTEGER DEFAULT 0,
+                    requests_reserved INTEGER NOT NULL DEFAULT 0,
+                    tokens_reserved BIGINT NOT NULL DEFAULT 0,
                     created_at TIMESTAMPTZ DEFAULT NOW(),
                     updated_at TIMESTAMPTZ DEFAULT NOW(),
                     UNIQUE(empresa_id, fecha)
                 )
             """)
             
+            await conn.execute("""
+                ALTER TABLE usage_tracking
+                    ADD COLUMN IF NOT EXISTS requests_reserved INTEGER NOT NULL DEFAULT 0,
+                    ADD COLUMN IF NOT EXISTS tokens_reserved BIGINT NOT NULL DEFAULT 0
+            """)
+            
             await conn.execute("""
                 CREATE INDEX IF NOT EXISTS idx_usage_empresa_fecha 
                 ON usage_tracking(empresa_id, fecha)
             """)
             
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS usage_leases (
+                    empresa_id UUID NOT NULL,
+                    fecha DATE NOT NULL,
+                    worker_id VARCHAR(200) NOT NULL,
+                    requests_reserved INTEGER NOT NULL DEFAULT 0,
+                    tokens_reserved BIGINT NOT NULL DEFAULT 0,
+                    heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (empresa_id, fecha, worker_id)
+                )
+            """)
+            
             return True
         except Exception as e:
             logger.error(f"Failed to create usage_tracking table: {e}")
@@ -81,6 +255,76 @@ class RateLimiter:
         finally:
             await conn.close()
     
+    async def _get_plan(self, conn, empresa_id: str) -> str:
+        cached = self._plans.get(empresa_id)
+        if cached and time.monotonic() - cached[0] < PLAN_TTL_SECONDS:
+            return cached[1]
+        plan = await conn.fetchval("SELECT plan FROM empresas WHERE id = $1", empresa_id)
+        plan = plan or self.default_plan
+        self._plans[empresa_id] = (time.monotonic(), plan)
+        return plan
+    
+    def invalidate_plan(self, empresa_id: str):
+        """Forget the cached plan (call after a plan change)."""
+        self._plans.pop(empresa_id, None)
+    
+    async def _lease(self, pool, bucket: QuotaBucket, tokens_needed: int):
+        """Reserve the next block of quota for this worker in usage_tracking."""
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                plan = await self._get_plan(conn, bucket.empresa_id)
+                limits = self.limits.get(plan, self.limits[self.default_plan])
+                await conn.execute("""
+                    INSERT INTO usage_tracking (empresa_id, fecha, requests_today, tokens_today, updated_at)
+                    VALUES ($1, $2, 0, 0, NOW())
+                    ON CONFLICT (empresa_id, fecha) DO NOTHING
+                """, bucket.empresa_id, bucket.fecha)
+                row = await conn.fetchrow("""
+                    SELECT requests_today, tokens_today
+                    FROM usage_tracking
+                    WHERE empresa_id = $1 AND fecha = $2
+                    FOR UPDATE
+                """, bucket.empresa_id, bucket.fecha)
+                # Reservations of workers that stopped heartbeating are reclaimed here
+                reserved = await conn.fetchrow(RECLAIM_SQL, bucket.empresa_id, bucket.fecha, LEASE_EXPIRY_SECONDS)
+                if reserved["expired"]:
+                    self.stats["expired_leases"] += reserved["expired"]
+                
+                requests_available = limits["requests_per_day"] - row["requests_today"] - reserved["requests"]
+                tokens_available = limits["tokens_per_day"] - row["tokens_today"] - reserved["tokens"]
+                
+                grant_requests = grant_tokens = 0
+                if bucket.requests < 1:
+                    lease_size = max(1, math.ceil(limits["requests_per_day"] * LEASE_FRACTION))
+                    grant_requests = max(0, min(lease_size, requests_available))
+                if bucket.tokens < max(tokens_needed, 1):
+                    lease_size = max(1, math.ceil(limits["tokens_per_day"] * LEASE_FRACTION), tokens_needed - bucket.tokens)
+                    grant_tokens = max(0, min(lease_size, tokens_available))
+                
+                await conn.execute(
+                    LEASE_SQL, bucket.empresa_id, bucket.fecha, grant_requests, grant_tokens,
+                    self.worker_id, reserved["requests"], reserved["tokens"]
+                )
+        
+        self.stats["leases"] += 1
+        bucket.plan = plan
+        bucket.limits = limits
+        bucket.requests += grant_requests
+        bucket.tokens += grant_tokens
+        bucket.requests_used = row["requests_today"] + bucket.pending_requests
+        bucket.tokens_used = row["tokens_today"] + bucket.pending_tokens
+        bucket.requests_available = max(0, requests_available - grant_requests)
+        bucket.tokens_available = max(0, tokens_available - grant_tokens)
+    
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+    
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(FLUSH_SECONDS)
+            await self.flush()
+    
     async def check_and_increment(
         self,
         empresa_id: str,
@@ -88,81 +332,119 @@ class RateLimiter:
     ) -> Dict[str, Any]:
         """
         Check rate limits and increment usage.
-        Raises HTTPException if limit exceeded.
+        Served from this worker's leased quota; the database is only hit
+        when the lease runs out. Raises RateLimitExceeded if limit exceeded.
         """
         if not empresa_id:
-            return {"requests_remaining": 999, "tokens_remaining": 999999, "plan": "unknown"}
+            return dict(UNLIMITED)
         
-        conn = await get_db_connection()
-        if not conn:
-            return {"requests_remaining": 999, "tokens_remaining": 999999, "plan": "unknown"}
+        pool = await self._get_pool()
+        if not pool:
+            return dict(UNLIMITED)
         
-        try:
-            today = datetime.utcnow().date()
-            
-            row = await conn.fetchrow("""
-                SELECT 
-                    e.plan,
-                    COALESCE(u.requests_today, 0) as requests_today,
-                    COALESCE(u.tokens_today, 0) as tokens_today
-                FROM empresas e
-                LEFT JOIN usage_tracking u ON u.empresa_id = e.id AND u.fecha = $2
-                WHERE e.id = $1
-            """, empresa_id, today)
-            
-            if not row:
-                plan = self.default_plan
-                current_requests = 0
-                current_tokens = 0
-            else:
-                plan = row["plan"] or self.default_plan
-                current_requests = row["requests_today"]
-                current_tokens = row["tokens_today"]
-            
-            limits = self.limits.get(plan, self.limits[self.default_plan])
+        today = datetime.utcnow().date()
+        key = (str(empresa_id), today)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = QuotaBucket(empresa_id=str(empresa_id), fecha=today)
+        
+        if bucket.covers(tokens_used):
+            self.stats["local"] += 1
+        else:
+            async with bucket.lock:
+                if not bucket.covers(tokens_used):
+                    try:
+                        await self._lease(pool, bucket, tokens_used)
+                    except Exception as e:
+                        logger.error(f"Rate limit check failed: {e}")
+                        return dict(UNLIMITED)
             
-            if current_requests >= limits["requests_per_day"]:
-                reset_time = (datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) 
-                              + timedelta(days=1))
+            if bucket.requests < 1:
+                self.stats["rejected"] += 1
                 raise RateLimitExceeded(
-                    message=f"Límite diario de {limits['requests_per_day']} requests alcanzado",
-                    reset_at=reset_time,
-                    plan=plan
+                    message=f"Límite diario de {bucket.limits['requests_per_day']} requests alcanzado",
+                    reset_at=_next_reset(),
+                    plan=bucket.plan
                 )
             
-            if current_tokens >= limits["tokens_per_day"]:
-                reset_time = (datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) 
-                              + timedelta(days=1))
+            if bucket.tokens < 1:
+                self.stats["rejected"] += 1
                 raise RateLimitExceeded(
-                    message=f"Límite diario de {limits['tokens_per_day']:,} tokens alcanzado",
-                    reset_at=reset_time,
-                    plan=plan
+                    message=f"Límite diario de {bucket.limits['tokens_per_day']:,} tokens alcanzado",
+                    reset_at=_next_reset(),
+                    plan=bucket.plan
                 )
-            
-            await conn.execute("""
-                INSERT INTO usage_tracking (empresa_id, fecha, requests_today, tokens_today, updated_at)
-                VALUES ($1, $2, 1, $3, NOW())
-                ON CONFLICT (empresa_id, fecha) DO UPDATE
-                SET requests_today = usage_tracking.requests_today + 1,
-                    tokens_today = usage_tracking.tokens_today + $3,
-                    updated_at = NOW()
-            """, empresa_id, today, tokens_used)
-            
-            return {
-                "requests_remaining": limits["requests_per_day"] - current_requests - 1,
-                "tokens_remaining": limits["tokens_per_day"] - current_tokens - tokens_used,
-                "plan": plan,
-                "requests_used": current_requests + 1,
-                "tokens_used": current_tokens + tokens_used
-            }
-            
-        except RateLimitExceeded:
-            raise
+        
+        bucket.take(tokens_used)
+        self._ensure_flusher()
+        
+        return {
+            "requests_remaining": bucket.requests + bucket.requests_available,
+            "tokens_remaining": bucket.tokens + bucket.tokens_available,
+            "plan": bucket.plan,
+            "requests_used": bucket.requests_used,
+            "tokens_used": bucket.tokens_used
+        }
+    
+    async def flush(self, release_all: bool = False) -> int:
+        """
+        Write pending usage to usage_tracking in one batched UPDATE and
+        return idle (or, with release_all, every) leases. Returns rows updated.
+        """
+        now = time.monotonic()
+        today = datetime.utcnow().date()
+        batch: List[Tuple[QuotaBucket, Tuple[int, int, int, int]]] = []
+        
+        for key, bucket in list(self._buckets.items()):
+            if bucket.lock.locked():
+                continue
+            idle = now - bucket.last_used > LEASE_TTL_SECONDS
+            if release_all or idle or bucket.fecha != today:
+                bucket.release()
+                del self._buckets[key]
+            pending = (bucket.pending_requests, bucket.pending_tokens,
+                       bucket.released_requests, bucket.released_tokens)
+            if any(pending):
+                batch.append((bucket, pending))
+                bucket.pending_requests = bucket.pending_tokens = 0
+                bucket.released_requests = bucket.released_tokens = 0
+        
+        if not batch:
+            return 0
+        
+        pool = await self._get_pool()
+        try:
+            await pool.execute(
+                FLUSH_SQL,
+                [b.empresa_id for b, _ in batch],
+                [b.fecha for b, _ in batch],
+                *[[p[i] for _, p in batch] for i in range(4)],
+                self.worker_id
+            )
+            self.stats["flushes"] += 1
+            return len(batch)
         except Exception as e:
-            logger.error(f"Rate limit check failed: {e}")
-            return {"requests_remaining": 999, "tokens_remaining": 999999, "plan": "unknown"}
-        finally:
-            await conn.close()
+            logger.error(f"Usage flush failed, retrying on next flush: {e}")
+            for bucket, (requests, tokens, released_requests, released_tokens) in batch:
+                key = (bucket.empresa_id, bucket.fecha)
+                target = self._buckets.setdefault(key, bucket)
+                target.pending_requests += requests
+                target.pending_tokens += tokens
+                target.released_requests += released_requests
+                target.released_tokens += released_tokens
+            return 0
+    
+    async def close(self):
+        """Stop the background flush and return every lease (worker shutdown)."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._buckets:
+            await self.flush(release_all=True)
     
     async def get_usage_stats(
         self,
@@ -329,11 +329,10 @@ class TenantContextMiddleware(BaseHTTPMiddleware):
         token = auth_header.split(" ")[1]
         
         try:
-            from jose import jwt, JWTError
-            from services.auth_service import get_secret_key
-            SECRET_KEY = get_secret_key()
+            from services.auth_service import decode_request_token
 
-            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+            # Queda en request.state: las dependencias de la ruta no vuelven a decodificarlo
+            payload = decode_request_token(token, request)
             user_id = payload.get("user_id") or payload.get("sub")
             
             if not user_id:
@@ -433,7 +432,27 @@ class TenantContextMiddleware(BaseHTTPMiddleware):
 
     async def _check_session_token(self, token: str, empresa_header: Optional[str]) -> Optional[TenantContext]:
         """Check for valid session in auth_sessions or sesiones_otp tables."""
-        import hashlib
+        # auth_sessions (password sessions), through the cached session validation
+        try:
+            from services.unified_auth_service import auth_service
+            session, user = await auth_service.validate_session(token)
+            if session and user:
+                allowed = []
+                if user.empresa_id:
+                    allowed.append(str(user.empresa_id).lower())
+                if user.company_name:
+                    allowed.append(user.company_name.lower())
+
+                return TenantContext(
+                    user_id=str(user.id),
+                    empresa_id=empresa_header,
+                    allowed_companies=allowed,
+                    is_admin=user.role in ('admin', 'super_admin'),
+                    is_authenticated=True
+                )
+        except Exception as e:
+            logger.debug(f"Auth session check error: {e}")
+
         try:
             from services.otp_auth_service import get_db_connection
             conn = await get_db_connection()
@@ -441,32 +460,6 @@ class TenantContextMiddleware(BaseHTTPMiddleware):
                 return None
 
             try:
-                # Check auth_sessions (password sessions)
-                token_hash = hashlib.sha256(token.encode()).hexdigest()
-                row = await conn.fetchrow('''
-                    SELECT s.user_id, u.role, u.empresa_id, u.company_name
-                    FROM auth_sessions s
-                    JOIN auth_users u ON u.id = s.user_id
-                    WHERE s.token_hash = $1 AND s.is_active = true
-                      AND s.expires_at > NOW() AND u.deleted_at IS NULL AND u.status = 'active'
-                ''', token_hash)
-
-                if row:
-                    is_admin = row['role'] in ('admin', 'super_admin')
-                    allowed = []
-                    if row['empresa_id']:
-                        allowed.append(str(row['empresa_id']).lower())
-                    if row['company_name']:
-                        allowed.append(row['company_name'].lower())
-
-                    return TenantContext(
-                        user_id=str(row['user_id']),
-                        empresa_id=empresa_header,
-                        allowed_companies=allowed,
-                        is_admin=is_admin,
-                        is_authenticated=True
-                    )
-
                 # Check sesiones_otp (OTP sessions)
                 otp_row = await conn.fetchrow('''
                     SELECT s.usuario_id, u.rol, u.empresa
@@ -0,0 +1,70 @@
+-- ============================================================
+-- REVISAR.IA - Migración: Índice de CFDIs
+-- ============================================================
+-- Tabla columnar de CFDIs importados desde XML/ZIP.
+-- Consultable por RFC, UUID, periodo y concepto; alimenta la
+-- verificación 69-B y la conciliación masiva 3-way match.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS cfdi_index (
+    id BIGSERIAL PRIMARY KEY,
+    empresa_id UUID NOT NULL,
+
+    -- Comprobante
+    uuid VARCHAR(36) NOT NULL,
+    version VARCHAR(5) NOT NULL,
+    serie VARCHAR(50),
+    folio VARCHAR(50),
+    fecha TIMESTAMP,
+    periodo CHAR(7),                 -- YYYY-MM
+    subtotal DECIMAL(18, 2),
+    descuento DECIMAL(18, 2),
+    total DECIMAL(18, 2),
+    moneda VARCHAR(10),
+    tipo_cambio DECIMAL(18, 6),
+    tipo_comprobante VARCHAR(2),
+    metodo_pago VARCHAR(5),
+    forma_pago VARCHAR(5),
+    lugar_expedicion VARCHAR(10),
+
+    -- Emisor / Receptor
+    emisor_rfc VARCHAR(13),
+    emisor_nombre TEXT,
+    emisor_regimen VARCHAR(5),
+    receptor_rfc VARCHAR(13),
+    receptor_nombre TEXT,
+    receptor_uso_cfdi VARCHAR(5),
+
+    -- Impuestos
+    total_impuestos_trasladados DECIMAL(18, 2),
+    total_impuestos_retenidos DECIMAL(18, 2),
+    iva_trasladado DECIMAL(18, 2),
+    ieps_trasladado DECIMAL(18, 2),
+    isr_retenido DECIMAL(18, 2),
+    iva_retenido DECIMAL(18, 2),
+
+    -- Timbre Fiscal Digital
+    fecha_timbrado TIMESTAMP,
+    rfc_prov_certif VARCHAR(13),
+    no_certificado_sat VARCHAR(20),
+
+    -- Conceptos
+    conceptos JSONB DEFAULT '[]'::jsonb,
+    conceptos_texto TEXT,
+    claves_prod_serv TEXT[] DEFAULT '{}',
+
+    archivo TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+
+    UNIQUE (empresa_id, uuid)
+);
+
+CREATE INDEX IF NOT EXISTS idx_cfdi_index_uuid ON cfdi_index(uuid);
+CREATE INDEX IF NOT EXISTS idx_cfdi_index_emisor ON cfdi_index(empresa_id, emisor_rfc, fecha);
+CREATE INDEX IF NOT EXISTS idx_cfdi_index_receptor ON cfdi_index(empresa_id, receptor_rfc, fecha);
+CREATE INDEX IF NOT EXISTS idx_cfdi_index_periodo ON cfdi_index(empresa_id, periodo);
+CREATE INDEX IF NOT EXISTS idx_cfdi_index_claves ON cfdi_index USING GIN (claves_prod_serv);
+CREATE INDEX IF NOT EXISTS idx_cfdi_index_conceptos_fts
+    ON cfdi_index USING GIN (to_tsvector('spanish', COALESCE(conceptos_texto, '')));
+
+COMMENT ON TABLE cfdi_index IS 'CFDIs 3.3/4.0 importados por XML/ZIP, indexados por RFC, UUID, periodo y concepto';
@@ -0,0 +1,42 @@
+-- ============================================================
+-- REVISAR.IA - Migración: Conocimiento de agentes en pgvector
+-- ============================================================
+-- Destino de scripts/migrate_chroma_to_pgvector.py: consolida las
+-- colecciones Chroma de los agentes (RagRepository y legacy
+-- ./chroma_db) en una sola tabla, deduplicada por contenido.
+-- La fachada de recuperación la consulta como backend "rag_chunks".
+-- ============================================================
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS rag_chunks (
+    id TEXT PRIMARY KEY,                 -- id del chunk en Chroma
+    agent_id VARCHAR(20) NOT NULL,       -- código corto: A1, A3, A5, LEGAL...
+    content TEXT NOT NULL,
+    content_hash CHAR(40) NOT NULL,      -- sha1 del contenido normalizado
+    document_id TEXT,
+    metadata JSONB DEFAULT '{}',
+    embedding vector(1536),
+    source VARCHAR(50) NOT NULL,         -- chroma / chroma_legacy
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+
+    CONSTRAINT unique_rag_chunk_content UNIQUE (agent_id, content_hash)
+);
+
+CREATE INDEX IF NOT EXISTS idx_rag_chunks_agent ON rag_chunks(agent_id);
+CREATE INDEX IF NOT EXISTS idx_rag_chunks_document ON rag_chunks(document_id);
+CREATE INDEX IF NOT EXISTS idx_rag_chunks_embedding
+    ON rag_chunks USING hnsw (embedding vector_cosine_ops);
+
+-- Avance por colección para reanudar la migración por lotes
+CREATE TABLE IF NOT EXISTS rag_migration_progress (
+    source VARCHAR(50) NOT NULL,
+    collection VARCHAR(255) NOT NULL,
+    next_offset INTEGER NOT NULL DEFAULT 0,
+    migrated INTEGER NOT NULL DEFAULT 0,
+    duplicates INTEGER NOT NULL DEFAULT 0,
+    completed BOOLEAN NOT NULL DEFAULT FALSE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+
+    PRIMARY KEY (source, collection)
+);
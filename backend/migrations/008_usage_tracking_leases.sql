@@ -0,0 +1,11 @@
+-- ============================================================
+-- REVISAR.IA - Migración: Reservas de cuota del rate limiter
+-- ============================================================
+-- middleware/rate_limiter.py reserva bloques de la cuota diaria
+-- por worker (leases) y escribe el uso en lotes; cada flush pasa
+-- lo consumido de *_reserved a *_today.
+-- ============================================================
+
+ALTER TABLE usage_tracking
+    ADD COLUMN IF NOT EXISTS requests_reserved INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS tokens_reserved BIGINT NOT NULL DEFAULT 0;
@@ -0,0 +1,70 @@
+-- ============================================================
+-- REVISAR.IA - Migración: Snapshot de contexto por cliente
+-- ============================================================
+-- services/cliente_contexto_service.py arma el contexto de los
+-- agentes a partir de un snapshot precalculado por cliente. Cada
+-- escritura en las tablas de clientes incrementa `version`; el
+-- snapshot solo es vigente si snapshot_version = version.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS clientes_contexto_snapshot (
+    cliente_id INTEGER PRIMARY KEY,
+    empresa_id UUID,
+    version BIGINT NOT NULL DEFAULT 1,
+    snapshot JSONB,
+    snapshot_version BIGINT,
+    generado_en TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_clientes_contexto_snapshot_empresa
+    ON clientes_contexto_snapshot(empresa_id);
+
+-- Últimas interacciones por agente (lectura del snapshot)
+CREATE INDEX IF NOT EXISTS idx_clientes_interacciones_cliente_agente
+    ON clientes_interacciones(cliente_id, agente_id, created_at DESC);
+
+-- TG_ARGV[0]: columna con el id del cliente en la tabla del trigger
+CREATE OR REPLACE FUNCTION bump_cliente_contexto_version()
+RETURNS TRIGGER AS $$
+DECLARE
+    fila JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        fila := to_jsonb(OLD);
+    ELSE
+        fila := to_jsonb(NEW);
+    END IF;
+    IF fila ->> TG_ARGV[0] IS NOT NULL THEN
+        INSERT INTO clientes_contexto_snapshot (cliente_id, version)
+        VALUES ((fila ->> TG_ARGV[0])::INTEGER, 1)
+        ON CONFLICT (cliente_id) DO UPDATE
+            SET version = clientes_contexto_snapshot.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS clientes_contexto_version ON clientes;
+CREATE TRIGGER clientes_contexto_version
+    AFTER INSERT OR UPDATE OR DELETE ON clientes
+    FOR EACH ROW EXECUTE FUNCTION bump_cliente_contexto_version('id');
+
+DROP TRIGGER IF EXISTS clientes_documentos_contexto_version ON clientes_documentos;
+CREATE TRIGGER clientes_documentos_contexto_version
+    AFTER INSERT OR UPDATE OR DELETE ON clientes_documentos
+    FOR EACH ROW EXECUTE FUNCTION bump_cliente_contexto_version('cliente_id');
+
+DROP TRIGGER IF EXISTS clientes_interacciones_contexto_version ON clientes_interacciones;
+CREATE TRIGGER clientes_interacciones_contexto_version
+    AFTER INSERT OR UPDATE OR DELETE ON clientes_interacciones
+    FOR EACH ROW EXECUTE FUNCTION bump_cliente_contexto_version('cliente_id');
+
+DROP TRIGGER IF EXISTS clientes_historial_contexto_version ON clientes_historial;
+CREATE TRIGGER clientes_historial_contexto_version
+    AFTER INSERT OR UPDATE OR DELETE ON clientes_historial
+    FOR EACH ROW EXECUTE FUNCTION bump_cliente_contexto_version('cliente_id');
+
+DROP TRIGGER IF EXISTS clientes_contexto_contexto_version ON clientes_contexto;
+CREATE TRIGGER clientes_contexto_contexto_version
+    AFTER INSERT OR UPDATE OR DELETE ON clientes_contexto
+    FOR EACH ROW EXECUTE FUNCTION bump_cliente_contexto_version('cliente_id');
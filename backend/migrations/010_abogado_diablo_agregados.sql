@@ -0,0 +1,48 @@
+-- ============================================================
+-- REVISAR.IA - Migración: Agregados persistentes del Abogado del Diablo
+-- ============================================================
+-- services/devils_advocate_store.py guarda el estado que
+-- DevilsAdvocateService tenía solo en memoria:
+-- - Huellas (en curso y cerradas) como JSONB por proyecto; los
+--   eventos se agregan al arreglo correspondiente sin reescribir
+--   el resto de la huella
+-- - Perfiles con contadores incrementales: cerrar una huella es un
+--   solo UPSERT que suma al perfil, sin recorrer el historial
+-- - Contadores globales para las estadísticas del módulo
+-- Los ids de proyecto y de administrador del servicio son texto
+-- libre, por eso las huellas no usan abogado_diablo_huellas (UUID).
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS abogado_diablo_huellas_estado (
+    proyecto_id VARCHAR(100) PRIMARY KEY,
+    empresa_id VARCHAR(100),
+    resultado_final VARCHAR(20) NOT NULL DEFAULT 'en_proceso',
+    datos JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Precarga al iniciar: solo las huellas en curso
+CREATE INDEX IF NOT EXISTS idx_abogado_diablo_huellas_estado_abiertas
+    ON abogado_diablo_huellas_estado(updated_at DESC)
+    WHERE resultado_final = 'en_proceso';
+
+-- total_huellas, huellas_cerradas, huellas_aprobadas, huellas_rechazadas,
+-- preguntas_respondidas, riesgos_documentados, riesgos_criticos
+CREATE TABLE IF NOT EXISTS abogado_diablo_contadores (
+    nombre VARCHAR(50) PRIMARY KEY,
+    valor BIGINT NOT NULL DEFAULT 0
+);
+
+-- El promedio se deriva de la suma para que cada cierre sea un incremento
+ALTER TABLE abogado_diablo_perfiles
+    ADD COLUMN IF NOT EXISTS suma_score_aprobados DOUBLE PRECISION NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS casos_con_score INTEGER NOT NULL DEFAULT 0;
+
+UPDATE abogado_diablo_perfiles
+SET suma_score_aprobados = score_promedio_aprobados * casos_aprobados,
+    casos_con_score = casos_aprobados
+WHERE casos_con_score = 0 AND casos_aprobados > 0 AND score_promedio_aprobados > 0;
+
+COMMENT ON TABLE abogado_diablo_huellas_estado IS 'Huellas de DevilsAdvocateService serializadas (caché write-through)';
+COMMENT ON TABLE abogado_diablo_contadores IS 'Contadores globales incrementales del Abogado del Diablo';
@@ -0,0 +1,41 @@
+-- ============================================================
+-- REVISAR.IA - Migración: Paginación por cursor y búsqueda de proyectos
+-- ============================================================
+-- services/project_service.py:
+-- - list_projects_keyset pagina con WHERE (updated_at, id) < cursor
+--   ORDER BY updated_at DESC, id DESC; con estos índices cada página
+--   es un recorrido acotado del índice, sin OFFSET
+-- - search_projects combina texto completo (tsvector, pesos A/B/C)
+--   con subcadenas ILIKE respaldadas por índices trigram, y ordena
+--   por ts_rank + similarity
+-- La expresión de idx_projects_busqueda_fts debe coincidir con
+-- VECTOR_BUSQUEDA en project_service.py.
+-- ============================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Keyset por empresa y global (admin)
+CREATE INDEX IF NOT EXISTS idx_projects_empresa_keyset
+    ON projects(empresa_id, updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_projects_keyset
+    ON projects(updated_at DESC, id DESC);
+
+-- Texto completo
+CREATE INDEX IF NOT EXISTS idx_projects_busqueda_fts
+    ON projects USING GIN ((
+        setweight(to_tsvector('spanish', COALESCE(nombre, '')), 'A')
+        || setweight(to_tsvector('simple', COALESCE(proveedor_rfc, '')), 'A')
+        || setweight(to_tsvector('spanish', COALESCE(proveedor_nombre, '')), 'B')
+        || setweight(to_tsvector('spanish', COALESCE(descripcion, '')), 'C')
+    ));
+
+-- Subcadenas (ILIKE '%...%') y similitud
+CREATE INDEX IF NOT EXISTS idx_projects_nombre_trgm
+    ON projects USING GIN (nombre gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_projects_proveedor_nombre_trgm
+    ON projects USING GIN (proveedor_nombre gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_projects_proveedor_rfc_trgm
+    ON projects USING GIN (proveedor_rfc gin_trgm_ops);
+
+COMMENT ON INDEX idx_projects_empresa_keyset IS 'Paginación por cursor (updated_at, id) de ProjectService.list_projects_keyset';
+COMMENT ON INDEX idx_projects_busqueda_fts IS 'Texto completo de ProjectService.search_projects';
@@ -0,0 +1,35 @@
+-- ============================================================
+-- REVISAR.IA - Migración: Sincronización incremental de Drive
+-- ============================================================
+-- services/drive_sync_store.py guarda por (agente, carpeta) el token
+-- de changes.list y, por archivo, la revisión y el hash del texto
+-- ingerido. Con esto una corrida solo descarga lo agregado o
+-- modificado desde la anterior y borra del vector store lo eliminado.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS drive_sync_estado (
+    agent_id VARCHAR(50) NOT NULL,
+    folder_id VARCHAR(200) NOT NULL,
+    change_token VARCHAR(200) NOT NULL,
+    -- Carpeta raíz y subcarpetas sincronizadas
+    carpetas TEXT[] NOT NULL DEFAULT '{}',
+    ultima_sync TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (agent_id, folder_id)
+);
+
+CREATE TABLE IF NOT EXISTS drive_sync_archivos (
+    agent_id VARCHAR(50) NOT NULL,
+    folder_id VARCHAR(200) NOT NULL,
+    file_id VARCHAR(200) NOT NULL,
+    nombre TEXT NOT NULL,
+    -- 'md5:<md5Checksum>' para binarios, 'v:<version>' para Google Docs
+    revision VARCHAR(100) NOT NULL,
+    -- sha256 del texto ingerido; NULL si el archivo no tuvo texto útil
+    content_hash VARCHAR(64),
+    chunks INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (agent_id, folder_id, file_id)
+);
+
+COMMENT ON TABLE drive_sync_estado IS 'Token de cambios de Drive por agente y carpeta (DriveSyncService)';
+COMMENT ON TABLE drive_sync_archivos IS 'Revisión y hash de contenido por archivo ingerido (DriveSyncService)';
@@ -0,0 +1,22 @@
+-- ============================================================
+-- REVISAR.IA - Migración: Reservas de cuota por worker con heartbeat
+-- ============================================================
+-- middleware/rate_limiter.py registra aquí lo que cada worker tiene
+-- reservado de usage_tracking.*_reserved. Los leases y flushes del
+-- worker renuevan heartbeat_at; si un worker muere sin devolver su
+-- reserva (deploy, reinicio, caída), el siguiente lease de esa
+-- empresa borra sus filas vencidas y recalcula *_reserved con las
+-- vigentes, en lugar de perder la cuota hasta el fin del día.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS usage_leases (
+    empresa_id UUID NOT NULL,
+    fecha DATE NOT NULL,
+    worker_id VARCHAR(200) NOT NULL,
+    requests_reserved INTEGER NOT NULL DEFAULT 0,
+    tokens_reserved BIGINT NOT NULL DEFAULT 0,
+    heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (empresa_id, fecha, worker_id)
+);
+
+COMMENT ON TABLE usage_leases IS 'Cuota reservada por worker (RateLimiter); las filas sin heartbeat se reclaman';
@@ -19,6 +19,7 @@ from services.empresa_service import empresa_service
 from services.company_service import company_service
 from services.auth_service import get_secret_key, security
 from services.error_handler import handle_route_error
+from services.session_cache import SessionCache, session_cache
 from models.empresa import Empresa, EmpresaUpdate, IndustriaEnum
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -726,14 +727,17 @@ async def reset_demo_data(request: ResetDemoRequest):
                 results["errors"].append({"table": table, "error": str(e)[:100]})
                 logger.warning(f"   ⚠ {table}: {e}")
 
-        # Limpiar usuarios no-admin
+        # Limpiar usuarios no-admin; sus sesiones cacheadas se descartan en todos los workers
         try:
             admin_emails = ['ia@satma.mx', 'admin@revisar-ia.com']
-            await conn.execute('''
-                DELETE FROM auth_users
-                WHERE email NOT IN (SELECT unnest($1::text[]))
-                AND role NOT IN ('super_admin', 'admin')
-            ''', admin_emails)
+            async with conn.transaction():
+                await conn.execute('''
+                    DELETE FROM auth_users
+                    WHERE email NOT IN (SELECT unnest($1::text[]))
+                    AND role NOT IN ('super_admin', 'admin')
+                ''', admin_emails)
+                await SessionCache.broadcast(conn, "all")
+            session_cache.clear()
             results["tables_cleaned"].append({"table": "auth_users (non-admin)", "deleted": "varios"})
         except Exception as e:
             results["errors"].append({"table": "auth_users", "error": str(e)[:100]})
@@ -746,7 +750,7 @@ async def reset_demo_data(request: ResetDemoRequest):
 
         await conn.close()
 
-        logger.warning(f"✅ RESET DEMO DATA completado por {admin_user.email}")
+        logger.warning("✅ RESET DEMO DATA completado")
 
         return {
             "success": True,
@@ -600,3 +600,13 @@ async def get_agents_hierarchy():
     except Exception as e:
         logger.error(f"Error getting agents hierarchy: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/prompt-cache/stats")
+async def get_prompt_cache_stats():
+    """
+    Reutilización de prefijos de prompt: aciertos del memo local y tokens
+    leídos del caché de Anthropic, por agente.
+    """
+    from services.prompt_assembler import prompt_assembler
+    return prompt_assembler.get_stats()
@@ -0,0 +1,107 @@
+"""
+cfdi_routes.py - API Routes para el índice de CFDIs REVISAR.IA
+
+- Importación de ZIPs con miles de XMLs (CFDI 3.3/4.0)
+- Búsqueda por RFC, UUID, periodo y concepto
+- Cruce con la lista 69-B del SAT
+
+Fecha: 2026-10-18
+"""
+
+from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
+from typing import Optional
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+
+from services.cfdi_parser import CFDIParseError
+from services.cfdi_store_service import cfdi_store_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/cfdis", tags=["CFDIs"])
+
+
+@router.post("/importar-zip", response_model=dict)
+async def importar_zip(
+    empresa_id: str = Form(...),
+    archivo: UploadFile = File(...)
+):
+    """
+    Importa un ZIP de XMLs de CFDI al índice de la empresa.
+    El archivo se copia a disco por bloques en un hilo aparte; nunca se
+    carga completo en memoria ni bloquea el event loop.
+    """
+    if not os.environ.get("DATABASE_URL"):
+        raise HTTPException(status_code=503, detail="Base de datos no disponible")
+    if not (archivo.filename or "").lower().endswith(".zip"):
+        raise HTTPException(status_code=400, detail="Se esperaba un archivo .zip")
+
+    ruta = None
+    try:
+        with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as destino:
+            ruta = destino.name
+            await asyncio.to_thread(shutil.copyfileobj, archivo.file, destino, 1024 * 1024)
+
+        resumen = await cfdi_store_service.importar_zip(empresa_id, ruta)
+        return {
+            "success": True,
+            "procesados": resumen["procesados"],
+            "nuevos": resumen["nuevos"],
+            "duplicados": resumen["duplicados"],
+            "total_errores": len(resumen["errores"]),
+            "errores": resumen["errores"][:100]
+        }
+
+    except HTTPException:
+        raise
+    except CFDIParseError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error importando ZIP de CFDIs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if ruta and os.path.exists(ruta):
+            os.unlink(ruta)
+
+
+@router.get("", response_model=dict)
+async def buscar_cfdis(
+    empresa_id: str = Query(...),
+    rfc: Optional[str] = Query(None, description="RFC emisor o receptor"),
+    uuid: Optional[str] = Query(None),
+    periodo: Optional[str] = Query(None, description="YYYY-MM"),
+    concepto: Optional[str] = Query(None, description="Texto del concepto o ClaveProdServ"),
+    limit: int = Query(100, le=1000),
+    offset: int = Query(0)
+):
+    """Busca CFDIs indexados."""
+    try:
+        items = await cfdi_store_service.buscar(
+            empresa_id, rfc=rfc, uuid=uuid, periodo=periodo,
+            concepto=concepto, limit=limit, offset=offset
+        )
+        return {"items": items, "count": len(items)}
+    except Exception as e:
+        logger.error(f"Error buscando CFDIs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/lista-69b", response_model=dict)
+async def cfdis_emisor_69b(
+    empresa_id: str = Query(...),
+    periodo: Optional[str] = Query(None, description="YYYY-MM")
+):
+    """CFDIs indexados cuyo emisor aparece en la lista 69-B del SAT."""
+    try:
+        items = await cfdi_store_service.cfdis_emisor_69b(empresa_id, periodo=periodo)
+        return {
+            "items": items,
+            "total": len(items),
+            "rfcs_afectados": sorted({i["emisor_rfc"] for i in items})
+        }
+    except Exception as e:
+        logger.error(f"Error cruzando CFDIs con lista 69-B: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
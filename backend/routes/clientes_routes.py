@@ -3,36 +3,33 @@ Rutas de API para gestión de Clientes con soporte multi-tenant.
 - Usuarios tenant: solo pueden ver/gestionar clientes de su empresa
 - Administradores: pueden ver/gestionar clientes de cualquier empresa
 """
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional, List
 import os
 import logging
-from jose import jwt, exceptions as jose_exceptions
+from jose import exceptions as jose_exceptions
 
 from models.cliente import (
     Cliente, ClienteCreate, ClienteUpdate, ClienteResponse,
     TipoCliente, EstadoCliente
 )
 from services.cliente_service import cliente_service
-from services.auth_service import get_secret_key
+from services.auth_service import decode_request_token
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/clientes", tags=["clientes"])
 
 security = HTTPBearer(auto_error=False)
-ALGORITHM = "HS256"
 
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Obtener usuario actual del token JWT"""
     if not credentials:
         raise HTTPException(status_code=401, detail="Autenticación requerida")
     try:
-        SECRET_KEY = get_secret_key()
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        return decode_request_token(credentials.credentials, request)
     except jose_exceptions.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expirado")
     except jose_exceptions.JWTError:
@@ -3,7 +3,6 @@ Dashboard API Routes for Revisar.ia System
 Provides endpoints for the Dashboard Ejecutivo
 """
 from fastapi import APIRouter, HTTPException, Depends, Request
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
@@ -15,32 +14,27 @@ from services.dreamhost_email_service import DreamHostEmailService
 from config.agents_config import AGENT_CONFIGURATIONS, PROJECT_STATUSES
 from services.agents import humanizar_reporte, obtener_persona
 from middleware.tenant_context import get_current_empresa_id, get_current_user_id, get_current_tenant
+from services.auth_service import get_token_payload
 
 logger = logging.getLogger(__name__)
 
-security = HTTPBearer(auto_error=False)
-
-async def get_current_user_info(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+async def get_current_user_info(payload: Optional[dict] = Depends(get_token_payload)) -> dict:
     """Get user info from tenant context or JWT"""
     tenant = get_current_tenant()
-    if tenant:
+    if tenant.is_authenticated:
         return {
-            "is_admin": tenant.get("is_admin", False),
-            "allowed_companies": tenant.get("allowed_companies", []),
-            "user_id": tenant.get("user_id"),
-            "empresa_id": tenant.get("empresa_id")
+            "is_admin": tenant.is_admin,
+            "allowed_companies": tenant.allowed_companies,
+            "user_id": tenant.user_id,
+            "empresa_id": tenant.empresa_id
         }
     
     result = {"is_admin": False, "allowed_companies": [], "user_id": None}
     
-    if not credentials:
+    if not payload:
         return result
     
     try:
-        from jose import jwt
-        from services.auth_service import get_secret_key
-        SECRET_KEY = get_secret_key()
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=["HS256"])
         user_id = payload.get("user_id")
         result["user_id"] = user_id
         
@@ -470,24 +470,18 @@ async def record_provider_response(project_id: str, response: ProviderResponse):
 
 
 from fastapi import Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from services.auth_service import get_token_payload
 import os
 import json
 
-security = HTTPBearer(auto_error=False)
-
-async def get_user_auth_info(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+async def get_user_auth_info(payload: Optional[dict] = Depends(get_token_payload)) -> dict:
     """Get user authentication info including allowed companies."""
     result = {"is_admin": False, "allowed_companies": [], "user_id": None, "authenticated": False}
     
-    if not credentials:
+    if not payload:
         return result
     
     try:
-        from jose import jwt
-        from services.auth_service import get_secret_key
-        SECRET_KEY = get_secret_key()
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=["HS256"])
         user_id = payload.get("user_id")
         result["user_id"] = user_id
         result["authenticated"] = True
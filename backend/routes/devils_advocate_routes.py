@@ -219,6 +219,7 @@ async def iniciar_huella(
             detail=f"Industria inválida: {data.industria}. Valores: {[i.value for i in CategoriaIndustria]}"
         )
 
+    await service.cargar_huella(data.proyecto_id)
     huella = service.registrar_huella_proyecto(
         proyecto_id=data.proyecto_id,
         empresa_id=data.empresa_id,
@@ -228,6 +229,7 @@ async def iniciar_huella(
         proveedor_rfc=data.proveedor_rfc,
         admin_id=admin_id
     )
+    await service.sincronizar()
 
     return {
         "mensaje": "Huella iniciada correctamente",
@@ -257,6 +259,7 @@ async def registrar_cambio_semaforo(
             detail=f"Fase inválida: {data.fase}. Valores: F0-F9"
         )
 
+    await service.cargar_huella(data.proyecto_id)
     cambio = service.registrar_cambio_semaforo(
         proyecto_id=data.proyecto_id,
         fase=fase,
@@ -269,6 +272,7 @@ async def registrar_cambio_semaforo(
         justificacion=data.justificacion,
         version_entregable=data.version_entregable
     )
+    await service.sincronizar()
 
     if not cambio:
         raise HTTPException(
@@ -293,11 +297,13 @@ async def cerrar_huella(
     """
     service = get_devils_advocate_service()
 
+    await service.cargar_huella(data.proyecto_id)
     huella = service.cerrar_huella_proyecto(
         proyecto_id=data.proyecto_id,
         resultado=data.resultado,
         notas_cierre=data.notas_cierre
     )
+    await service.sincronizar()
 
     if not huella:
         raise HTTPException(
@@ -331,6 +337,7 @@ async def listar_preguntas_incomodas(
     Combina preguntas base con las aprendidas de casos anteriores.
     """
     service = get_devils_advocate_service()
+    await service.refrescar()
 
     industria_enum = None
     if industria:
@@ -364,6 +371,7 @@ async def registrar_respuesta_pregunta(
     """
     service = get_devils_advocate_service()
 
+    await service.cargar_huella(data.proyecto_id)
     pregunta = service.registrar_respuesta_pregunta(
         proyecto_id=data.proyecto_id,
         categoria=data.categoria,
@@ -372,6 +380,7 @@ async def registrar_respuesta_pregunta(
         evidencia_soporte=data.evidencia_soporte,
         norma_relacionada=data.norma_relacionada
     )
+    await service.sincronizar()
 
     if not pregunta:
         raise HTTPException(
@@ -410,6 +419,7 @@ async def registrar_riesgo_residual(
             detail=f"Nivel inválido: {data.nivel}. Valores: {[n.value for n in NivelRiesgoResidual]}"
         )
 
+    await service.cargar_huella(data.proyecto_id)
     riesgo = service.registrar_riesgo_residual(
         proyecto_id=data.proyecto_id,
         descripcion=data.descripcion,
@@ -419,6 +429,7 @@ async def registrar_riesgo_residual(
         aprobado_por=admin_id,
         monto_exposicion=data.monto_exposicion
     )
+    await service.sincronizar()
 
     if not riesgo:
         raise HTTPException(
@@ -450,6 +461,7 @@ async def obtener_estandar_prueba(
     Este es el 'mínimo' basado en experiencia real.
     """
     service = get_devils_advocate_service()
+    await service.refrescar()
 
     try:
         industria_enum = CategoriaIndustria(industria)
@@ -474,6 +486,7 @@ async def listar_perfiles_riesgo(
     Lista todos los perfiles de riesgo generados.
     """
     service = get_devils_advocate_service()
+    await service.refrescar()
 
     perfiles = []
     for clave, perfil in service._perfiles.items():
@@ -505,6 +518,7 @@ async def listar_lecciones(
     Lista las lecciones aprendidas aplicables a un caso.
     """
     service = get_devils_advocate_service()
+    await service.refrescar()
 
     industria_enum = None
     if industria:
@@ -571,6 +585,7 @@ async def registrar_leccion_manual(
         aplicable_cuando=data.aplicable_cuando,
         admin_id=admin_id
     )
+    await service.sincronizar()
 
     return {
         "mensaje": "Lección registrada",
@@ -594,6 +609,7 @@ async def registrar_incidente_sat(
     """
     service = get_devils_advocate_service()
 
+    await service.cargar_huella(data.proyecto_id)
     incidente = service.registrar_incidente_sat(
         proyecto_id=data.proyecto_id,
         descripcion=data.descripcion,
@@ -603,6 +619,7 @@ async def registrar_incidente_sat(
         resultado=data.resultado,
         admin_id=admin_id
     )
+    await service.sincronizar()
 
     return {
         "mensaje": "Incidente SAT registrado",
@@ -625,6 +642,7 @@ async def obtener_reporte_mejores_practicas(
     Genera un reporte de mejores prácticas basado en el aprendizaje.
     """
     service = get_devils_advocate_service()
+    await service.refrescar()
 
     industria_enum = None
     if industria:
@@ -647,6 +665,7 @@ async def obtener_estadisticas_globales(
     Obtiene estadísticas globales del módulo Abogado del Diablo.
     """
     service = get_devils_advocate_service()
+    await service.refrescar()
     return service.obtener_estadisticas_globales()
 
 
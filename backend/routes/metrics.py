@@ -1,13 +1,51 @@
 """
-Métricas de optimización de costos LLM
+Métricas de optimización de costos LLM y exposición Prometheus.
+
+GET /metrics (fuera de /api) entrega services.metrics_registry en formato de
+texto de Prometheus, combinando todos los workers si METRICS_DIR está
+configurado. Con METRICS_TOKEN exige `Authorization: Bearer <token>`.
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from typing import Dict, Any
+import hmac
 import logging
+import os
 from datetime import datetime
 
+from services.metrics_registry import exposicion, registro
+
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/metrics", tags=["metrics"])
+prometheus_router = APIRouter(tags=["metrics"])
+
+# Mismos eventos que _usage_stats, con etiquetas acotadas y combinables entre workers
+_query_router_total = registro.contador(
+    "revisar_query_router_queries_total", "Consultas clasificadas por el query router", ("tier",)
+)
+_query_router_costo = registro.contador(
+    "revisar_query_router_cost_usd_total", "Costo estimado de las consultas por tier (USD)", ("tier",)
+)
+_embedding_cache_total = registro.contador(
+    "revisar_embedding_cache_requests_total", "Consultas al cache de embeddings", ("resultado",)
+)
+_rag_preloads_total = registro.contador(
+    "revisar_rag_preloads_total", "Precargas RAG en paralelo"
+)
+_semantic_cache_total = registro.contador(
+    "revisar_semantic_cache_requests_total", "Consultas al cache semántico de respuestas", ("source", "resultado")
+)
+
+
+@prometheus_router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics(request: Request) -> PlainTextResponse:
+    """Métricas en formato de texto de Prometheus"""
+    token = os.environ.get("METRICS_TOKEN")
+    if token:
+        recibido = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(recibido.encode(), token.encode()):
+            raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    return PlainTextResponse(exposicion(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 _usage_stats = {
     "query_router": {
@@ -24,6 +62,12 @@ _usage_stats = {
     "rag_parallel": {
         "total_preloads": 0,
         "avg_time_saved_seconds": 6.0
+    },
+    "semantic_cache": {
+        "total_requests": 0,
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "by_source": {}
     }
 }
 
@@ -81,30 +125,52 @@ async def get_llm_costs() -> Dict[str, Any]:
             "total_preloads": _usage_stats["rag_parallel"]["total_preloads"],
             "avg_time_saved_seconds": _usage_stats["rag_parallel"]["avg_time_saved_seconds"]
         },
+        "semantic_cache": _semantic_cache_summary(),
         "timestamp": datetime.utcnow().isoformat()
     }
 
+def _semantic_cache_summary() -> Dict[str, Any]:
+    stats = _usage_stats["semantic_cache"]
+    
+    def hit_rate(bucket):
+        return round(bucket["cache_hits"] / bucket["total_requests"] * 100, 1) if bucket["total_requests"] else 0
+    
+    summary = {
+        "total_requests": stats["total_requests"],
+        "cache_hits": stats["cache_hits"],
+        "cache_misses": stats["cache_misses"],
+        "hit_rate_percent": hit_rate(stats),
+        "by_source": {
+            source: {**bucket, "hit_rate_percent": hit_rate(bucket)}
+            for source, bucket in stats["by_source"].items()
+        }
+    }
+    try:
+        from services.semantic_cache import semantic_answer_cache
+        cache_stats = semantic_answer_cache.get_stats()
+        summary["entries"] = cache_stats["entries"]
+        summary["evictions"] = cache_stats["evictions"]
+        summary["invalidations"] = cache_stats["invalidations"]
+    except ImportError:
+        pass
+    return summary
+
 @router.post("/track-usage")
 async def track_usage(event: Dict[str, Any]) -> Dict[str, str]:
     """Endpoint para que los servicios reporten uso"""
     event_type = event.get("type")
     
     if event_type == "query_router":
-        tier = event.get("tier", "medium")
-        cost = event.get("cost", 0.0)
-        _usage_stats["query_router"]["total_queries"] += 1
-        _usage_stats["query_router"][f"{tier}_tier"]["count"] += 1
-        _usage_stats["query_router"][f"{tier}_tier"]["total_cost"] += cost
+        track_query_router(event.get("tier", "medium"), event.get("cost", 0.0))
         
     elif event_type == "embedding_cache":
-        _usage_stats["embedding_cache"]["total_requests"] += 1
-        if event.get("hit"):
-            _usage_stats["embedding_cache"]["cache_hits"] += 1
-        else:
-            _usage_stats["embedding_cache"]["cache_misses"] += 1
+        track_embedding_cache(bool(event.get("hit")))
             
     elif event_type == "rag_parallel":
-        _usage_stats["rag_parallel"]["total_preloads"] += 1
+        track_rag_preload()
+    
+    elif event_type == "semantic_cache":
+        track_semantic_cache(event.get("source", "rag"), bool(event.get("hit")))
     
     return {"status": "tracked"}
 
@@ -117,6 +183,8 @@ def track_query_router(tier: str, cost: float):
     _usage_stats["query_router"]["total_queries"] += 1
     _usage_stats["query_router"][f"{tier}_tier"]["count"] += 1
     _usage_stats["query_router"][f"{tier}_tier"]["total_cost"] += cost
+    _query_router_total.etiquetas(tier).incrementar()
+    _query_router_costo.etiquetas(tier).incrementar(cost)
 
 def track_embedding_cache(hit: bool):
     """Helper para registrar uso del cache de embeddings"""
@@ -125,7 +193,23 @@ def track_embedding_cache(hit: bool):
         _usage_stats["embedding_cache"]["cache_hits"] += 1
     else:
         _usage_stats["embedding_cache"]["cache_misses"] += 1
+    _embedding_cache_total.etiquetas("hit" if hit else "miss").incrementar()
 
 def track_rag_preload():
     """Helper para registrar uso de precarga RAG"""
     _usage_stats["rag_parallel"]["total_preloads"] += 1
+    _rag_preloads_total.incrementar()
+
+def track_semantic_cache(source: str, hit: bool):
+    """Helper para registrar consultas al cache semántico de respuestas"""
+    stats = _usage_stats["semantic_cache"]
+    bucket = stats["by_source"].setdefault(
+        source, {"total_requests": 0, "cache_hits": 0, "cache_misses": 0}
+    )
+    for target in (stats, bucket):
+        target["total_requests"] += 1
+        if hit:
+            target["cache_hits"] += 1
+        else:
+            target["cache_misses"] += 1
+    _semantic_cache_total.etiquetas(source, "hit" if hit else "miss").incrementar()
@@ -98,9 +98,16 @@ async def list_projects(
     estado: Optional[str] = None,
     fase: Optional[int] = None,
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
-    """Listar proyectos (PostgreSQL). Admin ve TODOS los proyectos."""
+    """
+    Listar proyectos (PostgreSQL). Admin ve TODOS los proyectos.
+
+    Con `cursor` pagina por keyset (más recientes primero): la primera página
+    se pide con `cursor=` vacío y las siguientes con el `next_cursor` de la
+    respuesta. Sin `cursor` se conserva la paginación por `offset`.
+    """
     from services.database_pg import get_project_service
 
     # Check if user is admin
@@ -115,6 +122,24 @@ async def list_projects(
 
     try:
         service = await get_project_service()
+
+        if cursor is not None:
+            page = await service.list_projects_keyset(
+                empresa_id=empresa_id if empresa_id else None,
+                estado=estado,
+                fase=fase,
+                limit=limit,
+                cursor=cursor or None
+            )
+            return {
+                "success": True,
+                "projects": page["projects"],
+                "count": len(page["projects"]),
+                "limit": limit,
+                "next_cursor": page["next_cursor"],
+                "is_admin": is_admin
+            }
+
         # Pass None for admin to see all projects
         projects = await service.list_projects(
             empresa_id=empresa_id if empresa_id else None,
@@ -132,6 +157,8 @@ async def list_projects(
             "offset": offset,
             "is_admin": is_admin
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing projects: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -565,7 +592,7 @@ async def search_projects(
     query: str,
     limit: int = 20
 ):
-    """Buscar proyectos (PostgreSQL)."""
+    """Buscar proyectos (PostgreSQL), ordenados por relevancia."""
     from services.database_pg import get_project_service
     
     empresa_id = get_current_empresa_id() or request.headers.get("X-Empresa-ID")
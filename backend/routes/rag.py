@@ -8,6 +8,7 @@ from typing import List, Dict, Optional
 import logging
 
 from services.rag_service import rag_service, AGENT_COLLECTIONS, AGENT_PCLOUD_LINKS
+from middleware.tenant_context import get_current_empresa_id
 
 logger = logging.getLogger(__name__)
 
@@ -124,7 +125,8 @@ async def query_knowledge_base(request: QueryRequest):
         agent_id=request.agent_id,
         query_text=request.query_text,
         n_results=request.n_results,
-        where_filter=request.where_filter
+        where_filter=request.where_filter,
+        empresa_id=get_current_empresa_id()
     )
     
     return result
@@ -7,33 +7,21 @@ import json
 import logging
 import os
 from datetime import datetime, timezone
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 
 from fastapi import APIRouter, Request, HTTPException, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import StreamingResponse
 from starlette.background import BackgroundTask
-from jose import jwt, exceptions as jose_exceptions
 
 from services.event_stream import event_emitter
+from services.auth_service import get_token_payload
 
 router = APIRouter(prefix="/analysis", tags=["Analysis Stream"])
 logger = logging.getLogger(__name__)
 
-security = HTTPBearer(auto_error=False)
-
-async def verify_stream_auth(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def verify_stream_auth(payload: Optional[dict] = Depends(get_token_payload)):
     """Verify JWT token for stream access - allows unauthenticated access for same-origin requests"""
-    if not credentials:
-        return None
-
-    from services.auth_service import get_secret_key
-    try:
-        SECRET_KEY = get_secret_key()
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=["HS256"])
-        return payload
-    except (jose_exceptions.ExpiredSignatureError, jose_exceptions.JWTError):
-        return None
+    return payload
 
 KEEPALIVE_INTERVAL = 15
 
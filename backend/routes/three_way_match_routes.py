@@ -14,9 +14,17 @@ from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import date, datetime
 from decimal import Decimal
+import asyncio
 import logging
 import os
 
+from services.three_way_match_service import (
+    conciliacion_masiva_service,
+    cargar_estado_cuenta_csv,
+    es_cfdi_generico,
+    matches_a_registros,
+)
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/3way-match", tags=["3-Way Match"])
@@ -70,6 +78,21 @@ class ThreeWayMatchValidate(BaseModel):
     tolerancia_porcentaje: float = 0.01
 
 
+class ConciliacionMasivaRequest(BaseModel):
+    empresa_id: str
+    proyecto_id: Optional[str] = Field(default=None, description="Proyecto por defecto si el contrato no lo indica")
+    cfdis: List[Dict[str, Any]] = Field(default_factory=list)
+    periodo: Optional[str] = Field(default=None, description="YYYY-MM: toma los CFDIs del índice si no se envían")
+    contratos: List[Dict[str, Any]] = Field(default_factory=list)
+    pagos: List[Dict[str, Any]] = Field(default_factory=list)
+    estado_cuenta_csv: Optional[str] = Field(default=None, description="Contenido CSV del estado de cuenta bancario")
+    banco: Optional[str] = None
+    tolerancia_monto: float = Field(default=0.01, description="Tolerancia del match (0.01 = 1%)")
+    tolerancia_bloqueo: float = Field(default=0.10, description="Tolerancia para candidatos con el mismo RFC")
+    ventana_dias: int = Field(default=45, description="Días máximos entre CFDI y pago")
+    guardar: bool = True
+
+
 # =============================================================================
 # ENDPOINTS
 # =============================================================================
@@ -319,6 +342,70 @@ async def crear_match(data: ThreeWayMatchCreate):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/conciliacion-masiva", response_model=dict)
+async def conciliacion_masiva(data: ConciliacionMasivaRequest):
+    """
+    Concilia en lote CFDIs, pagos (o un estado de cuenta CSV) y contratos.
+    Bloquea candidatos por RFC, monto y fecha, resuelve la asignación 1:1
+    y guarda todos los matches en una sola transacción.
+    """
+    try:
+        import pandas as pd
+
+        pagos = pd.DataFrame(data.pagos)
+        if data.estado_cuenta_csv:
+            estado_cuenta = await asyncio.to_thread(
+                cargar_estado_cuenta_csv, data.estado_cuenta_csv, banco=data.banco
+            )
+            pagos = pd.concat(
+                [pagos, estado_cuenta],
+                ignore_index=True
+            )
+
+        cfdis = data.cfdis
+        if not cfdis and data.periodo:
+            from services.cfdi_store_service import cfdi_store_service
+            cfdis = await cfdi_store_service.tabla_conciliacion(data.empresa_id, periodo=data.periodo)
+
+        # Bloqueo y asignación son CPU: fuera del event loop
+        resultado = await asyncio.to_thread(
+            conciliacion_masiva_service.conciliar,
+            cfdis=cfdis,
+            pagos=pagos,
+            contratos=data.contratos,
+            tolerancia_monto=data.tolerancia_monto,
+            tolerancia_bloqueo=data.tolerancia_bloqueo,
+            ventana_dias=data.ventana_dias
+        )
+
+        guardado = None
+        if data.guardar:
+            if not os.environ.get("DATABASE_URL"):
+                raise HTTPException(status_code=503, detail="Base de datos no disponible")
+            guardado = await conciliacion_masiva_service.guardar(
+                resultado["matches"],
+                empresa_id=data.empresa_id,
+                proyecto_id=data.proyecto_id,
+                tolerancia_monto=data.tolerancia_monto
+            )
+
+        return {
+            "success": True,
+            "resumen": resultado["resumen"],
+            "guardado": guardado,
+            "items": matches_a_registros(resultado["matches"]),
+            "pagos_sin_cfdi": len(resultado["pagos_sin_cfdi"])
+        }
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error en conciliación masiva: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{id}", response_model=dict)
 async def obtener_match(id: str):
     """
@@ -438,40 +525,6 @@ async def obtener_matches_proyecto(proyecto_id: str):
 # FUNCIONES AUXILIARES
 # =============================================================================
 
-def es_cfdi_generico(concepto: str) -> bool:
-    """
-    Detecta si un CFDI tiene una descripción genérica.
-    """
-    if not concepto:
-        return True
-
-    concepto_lower = concepto.lower().strip()
-
-    # Patrones genéricos
-    patrones_genericos = [
-        "servicios",
-        "servicio profesional",
-        "servicios profesionales",
-        "honorarios",
-        "pago de servicios",
-        "consultoria",
-        "asesoria",
-        "varios",
-        "por servicios",
-        "pago",
-        "factura",
-        "cobro"
-    ]
-
-    # Si el concepto es muy corto, probablemente es genérico
-    if len(concepto_lower) < 20:
-        for patron in patrones_genericos:
-            if concepto_lower == patron or concepto_lower.startswith(patron + " "):
-                return True
-
-    return False
-
-
 def get_demo_matches():
     """Retorna matches de demostración."""
     return [
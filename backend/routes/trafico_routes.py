@@ -18,10 +18,15 @@ trafico_service = None
 
 
 def init_trafico_service(db=None):
-    """Inicializa el servicio de Tráfico.IA con la base de datos."""
+    """
+    Inicializa el servicio de Tráfico.IA con la base de datos. Se configura
+    la instancia del módulo para que los servicios que modifican proyectos
+    (workflow) notifiquen al mismo scheduler que sirven estas rutas.
+    """
     global trafico_service
-    from services.trafico_ia_service import TraficoIAService
-    trafico_service = TraficoIAService(db=db)
+    from services.trafico_ia_service import trafico_ia_service
+    trafico_ia_service.db = db
+    trafico_service = trafico_ia_service
     logger.info("🚦 Tráfico.IA: Rutas inicializadas")
     return trafico_service
 
@@ -826,6 +826,9 @@ async def reject_user(user_id: str, admin: User = Depends(get_admin_user)):
         if 'UPDATE 0' in result:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
+    # Un usuario bloqueado no debe seguir autenticado por sesiones cacheadas
+    await auth_service.invalidate_user_sessions(user_id)
+
     return APIResponse(
         success=True,
         message="Usuario rechazado"
@@ -919,6 +922,10 @@ async def update_user(
         if 'UPDATE 0' in result:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
+    # Las sesiones cacheadas guardan rol y estado: un usuario degradado o
+    # suspendido no debe conservar sus permisos hasta que expire el caché
+    await auth_service.invalidate_user_sessions(user_id)
+
     return APIResponse(
         success=True,
         message="Usuario actualizado exitosamente"
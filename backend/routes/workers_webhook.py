@@ -149,15 +149,19 @@ async def execute_worker_pipeline(
     x_agent_id: Optional[str] = Header(None)
 ):
     """
-    Ejecuta un pipeline de múltiples tareas en Workers.
+    Ejecuta un pipeline de múltiples tareas en Workers como DAG: los pasos
+    independientes corren en paralelo y el pipeline tarda su ruta crítica.
+    Sin `depende_de`/`entradas` los pasos corren en el orden recibido.
 
     Body:
     {
         "pasos": [
-            {"tarea": "scraping", "parametros": {"url": "..."}},
-            {"tarea": "investigacion", "parametros": {"empresa": "..."}},
-            {"tarea": "materialidad", "parametros": {...}}
-        ]
+            {"id": "web", "tarea": "scraping", "parametros": {"url": "..."}},
+            {"id": "inv", "tarea": "investigacion", "parametros": {"empresa": "..."}},
+            {"tarea": "materialidad", "parametros": {...},
+             "entradas": {"sitio": "web", "investigacion": "inv"}}
+        ],
+        "proyecto_id": "PROJ-123"
     }
     """
     try:
@@ -167,15 +171,11 @@ async def execute_worker_pipeline(
         if not pasos:
             raise HTTPException(status_code=400, detail="Se requieren pasos")
 
-        # Callback URL
-        base_url = str(request.base_url).rstrip("/")
-        callback_url = f"{base_url}/webhooks/worker-callback"
-
-        result = await workers_hub_service.ejecutar_pipeline(
+        result = await workers_hub_service.ejecutar_pipeline_dag(
             pasos=pasos,
             empresa_id=x_empresa_id,
-            agente_id=x_agent_id,
-            callback_url=callback_url
+            proyecto_id=body.get("proyecto_id"),
+            agente_id=x_agent_id
         )
 
         return result
@@ -198,7 +198,8 @@ async def due_diligence_proveedor(
 ):
     """
     Endpoint específico para due diligence de proveedores.
-    Usado por A6_PROVEEDOR.
+    Usado por A6_PROVEEDOR. Investigación, lista 69-B y análisis del
+    documento corren en paralelo; después se genera el reporte.
 
     Body:
     {
@@ -206,26 +207,29 @@ async def due_diligence_proveedor(
         "rfc": "RFC123456ABC",
         "sitio_web": "https://...",
         "monto": 100000,
-        "tipo_servicio": "Consultoría"
+        "tipo_servicio": "Consultoría",
+        "documento_url": "https://..."  // opcional
     }
     """
     try:
         body = await request.json()
 
-        result = await workers_hub_service.investigar_proveedor(
+        result = await workers_hub_service.due_diligence_proveedor(
             empresa=body.get("empresa"),
             rfc=body.get("rfc"),
             sitio_web=body.get("sitio_web"),
             monto=body.get("monto"),
             tipo_servicio=body.get("tipo_servicio"),
+            documento_url=body.get("documento_url"),
             empresa_id=x_empresa_id,
             proyecto_id=body.get("proyecto_id")
         )
 
+        errores = [p["error"] for p in result.get("pasos", {}).values() if p.get("error")]
         return {
-            "success": result.success,
-            "resultado": result.resultado,
-            "error": result.error
+            "success": result.get("success", False),
+            "resultado": result,
+            "error": result.get("error") or (errores[0] if errores else None)
         }
 
     except Exception as e:
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: consultas de contexto de cliente por deliberación.
+
+Reproduce el patrón de lectura del DeliberationOrchestrator (un agente por
+etapa) contra una conexión en memoria que cuenta consultas, y compara:
+- antes: get_contexto_para_agente por etapa leyendo las tablas (5 consultas)
+- después: get_contextos_para_agentes con snapshot (frío, guardado en BD, en LRU)
+
+Ejecutar: python backend/scripts/bench_cliente_contexto.py [--deliberaciones N]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Los servicios avisan al importarse de integraciones sin configurar
+logging.disable(logging.WARNING)
+
+import asyncpg
+
+from services.cliente_contexto_service import ClienteContextoService
+from services.deliberation_orchestrator import STAGE_TO_AGENT
+
+AGENTES = list(STAGE_TO_AGENT.values())
+AHORA = datetime.now(timezone.utc)
+
+
+class ConexionContadora:
+    """Datos fijos de un cliente; solo importa cuántas consultas llegan."""
+
+    def __init__(self, con_snapshots: bool):
+        self.con_snapshots = con_snapshots
+        self.consultas = 0
+        self.snapshot = None
+
+    def acquire(self):
+        conexion = self
+
+        class Adquisicion:
+            async def __aenter__(self):
+                return conexion
+
+            async def __aexit__(self, *_):
+                pass
+
+        return Adquisicion()
+
+    async def fetchrow(self, sql, *args):
+        self.consultas += 1
+        if "clientes_contexto_snapshot" in sql:
+            if not self.con_snapshots:
+                raise asyncpg.exceptions.UndefinedTableError("clientes_contexto_snapshot")
+            if self.snapshot is None:
+                return None
+            return {"version": 1, "snapshot": self.snapshot if args[1] != 1 else None}
+        if "FROM clientes_contexto" in sql:
+            return None
+        return {"id": args[0], "nombre": "Cliente", "empresa_id": "emp1", "created_at": AHORA}
+
+    async def fetch(self, sql, *args):
+        self.consultas += 1
+        if "clientes_interacciones" in sql:
+            return [{"agente_id": a, "tipo": "consulta", "created_at": AHORA} for a in AGENTES]
+        return [{"nombre_archivo": "doc.pdf", "version": 1, "created_at": AHORA}]
+
+    async def fetchval(self, sql, *args):
+        self.consultas += 1
+        return 1
+
+    async def execute(self, sql, cliente_id, snapshot, version, empresa_id):
+        self.consultas += 1
+        self.snapshot = snapshot
+
+
+async def medir(nombre: str, deliberaciones: int, con_snapshots: bool, por_agente: bool, procesos: int = 1):
+    conexion = ConexionContadora(con_snapshots)
+    servicios = []
+    for _ in range(procesos):
+        servicio = ClienteContextoService()
+        servicio._pool = conexion
+        servicios.append(servicio)
+
+    inicio = time.perf_counter()
+    for i in range(deliberaciones):
+        servicio = servicios[i % procesos]
+        if por_agente:
+            for agente in AGENTES:
+                await servicio.get_contexto_para_agente(1, agente)
+        else:
+            await servicio.get_contextos_para_agentes(1, AGENTES)
+    ms = (time.perf_counter() - inicio) * 1000 / deliberaciones
+
+    print(f"{nombre:<48} {conexion.consultas / deliberaciones:>8.2f} {ms:>10.3f}")
+
+
+async def main(deliberaciones: int):
+    print(f"{len(AGENTES)} agentes por deliberación ({', '.join(AGENTES)}), {deliberaciones} deliberaciones\n")
+    print(f"{'Escenario':<48} {'Consultas':>8} {'ms/delib':>10}")
+    print("-" * 68)
+    await medir("antes: consultas por agente (sin snapshot)", deliberaciones, False, True)
+    await medir("lote sin migración 009 (lectura de tablas)", deliberaciones, False, False)
+    await medir("snapshot: primera deliberación (frío)", 1, True, False)
+    await medir("snapshot: un proceso (LRU por versión)", deliberaciones, True, False)
+    await medir("snapshot: 4 procesos (snapshot guardado en BD)", deliberaciones, True, False, procesos=4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--deliberaciones", type=int, default=200)
+    asyncio.run(main(parser.parse_args().deliberaciones))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: throughput (MB/s) de la extracción de entidades.
+
+Genera un corpus sintético de textos fiscales y compara:
+- antes: un re.findall por patrón (19 recorridos del texto, RFCs sobre una
+  copia en mayúsculas), como hacían las funciones extraer_* por separado
+- después: extraer_texto con la alternancia compilada (una pasada)
+- extract_many en el proceso actual y con pool de procesos
+
+Ejecutar: python backend/scripts/bench_extractors.py [--mb 8] [--workers N] [--prosa 3]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.extractors import _PATRONES, extract_many, extraer_texto
+
+FRAGMENTOS = [
+    "De conformidad con el artículo 27 fracción I de la LISR, la deducción procede.",
+    "El contribuyente ABC123456XY9 emitió el CFDI 6F9A2B1C-3D4E-5F60-7A8B-9C0D1E2F3A4B",
+    "por un monto de $1,234,567.89 MXN con fecha 2024-01-15.",
+    "Conforme al Art. 5-A CFF y los artículos 27, 28 y 29 de la Ley del Impuesto Sobre la Renta,",
+    "se pagaron 15,000.00 pesos el 1 de enero de 2024 al proveedor GODE561231GR8.",
+    "El Código Fiscal de la Federación establece la razón de negocios como requisito.",
+    "Sin referencias relevantes en este párrafo de antecedentes del contrato de prestación.",
+]
+
+PROSA = [
+    "La materialidad del servicio se acredita con entregables, minutas y evidencia fotográfica.",
+    "Las partes acuerdan que la prestación se realizará en las instalaciones del cliente.",
+    "El proveedor conservará la documentación soporte durante el plazo que señalen las disposiciones.",
+]
+
+
+def corpus(mb: float, prosa: int = 0, tam_doc: int = 20_000):
+    """Documentos de ~tam_doc caracteres; `prosa` agrega frases sin entidades por cada frase con ellas."""
+    rng = random.Random(43)
+    fragmentos = FRAGMENTOS + PROSA * prosa
+    docs, total = [], 0
+    while total < mb * 1024 * 1024:
+        partes, largo = [], 0
+        while largo < tam_doc:
+            frase = rng.choice(fragmentos)
+            partes.append(frase)
+            largo += len(frase) + 1
+        doc = " ".join(partes)
+        docs.append(doc)
+        total += len(doc.encode("utf-8"))
+    return docs, total
+
+
+def multipase(texto: str):
+    """Un recorrido por patrón, como la implementación anterior."""
+    mayusculas = texto.upper()
+    resultados = {}
+    for tipo, etiqueta, patron, _ in _PATRONES:
+        lista = resultados.setdefault(tipo, [])
+        if tipo == "ley":
+            if re.search(patron, texto):
+                lista.append(etiqueta)
+            continue
+        lista.extend(re.findall(patron, mayusculas if tipo == "rfc" else texto))
+    return resultados
+
+
+def medir(nombre: str, funcion, total_bytes: int, repeticiones: int = 3):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    print(f"{nombre:<44} {mejor * 1000:>10.1f} {total_bytes / mejor / 1e6:>10.2f}")
+
+
+def main(mb: float, workers: int, prosa: int):
+    docs, total = corpus(mb, prosa)
+    print(f"{len(docs)} documentos, {total / 1e6:.1f} MB, {workers} procesos, prosa {prosa}:1\n")
+    print(f"{'Escenario':<44} {'ms':>10} {'MB/s':>10}")
+    print("-" * 66)
+    medir("antes: un findall por patrón", lambda: [multipase(d) for d in docs], total)
+    medir("una pasada: extraer_texto", lambda: [extraer_texto(d) for d in docs], total)
+    medir("extract_many (proceso actual)", lambda: extract_many(docs, max_workers=1), total)
+    medir(f"extract_many (pool de {workers})", lambda: extract_many(docs, max_workers=workers, min_bytes_pool=0), total)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mb", type=float, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--prosa", type=int, default=0, help="frases sin entidades por frase con entidades")
+    argumentos = parser.parse_args()
+    main(argumentos.mb, argumentos.workers, argumentos.prosa)
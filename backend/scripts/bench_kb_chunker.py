@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark: throughput (MB/s) y memoria del chunking de leyes.
+
+Genera una ley sintética (títulos, capítulos, artículos con fracciones y
+menciones a otros artículos) y compara:
+- antes: LegalDocumentChunker sobre el texto completo
+- después: StreamingLegalChunker sobre el texto completo y leyendo bloques
+  de 64 KB generados al vuelo, sin acumular chunks (memoria acotada)
+
+Con --memoria se reporta además el pico de tracemalloc (más lento).
+
+Ejecutar: python backend/scripts/bench_kb_chunker.py [--mb 1 10 50] [--max-actual 10] [--memoria]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.kb_chunkers import LegalDocumentChunker, StreamingLegalChunker
+
+FRASES = [
+    "Los contribuyentes podrán efectuar la deducción de las erogaciones estrictamente indispensables.",
+    "El comprobante fiscal digital deberá reunir los requisitos que señalen las disposiciones.",
+    "La retención se enterará a más tardar el día 17 del mes inmediato posterior.",
+    "Se presumirá la inexistencia de las operaciones cuando el proveedor no acredite la materialidad.",
+    "Para efectos del artículo 27 de esta Ley, se estará a lo dispuesto en la fracción III.",
+    "Las personas morales determinarán el impuesto aplicando la tasa sobre el resultado fiscal.",
+]
+ROMANOS = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X"]
+BLOQUE = 64 * 1024
+
+
+def lineas_ley(semilla: int = 44):
+    """Líneas de una ley sin fin; quien consume decide cuándo parar."""
+    rng = random.Random(semilla)
+    articulo = 0
+    while True:
+        titulo = ROMANOS[(articulo // 400) % len(ROMANOS)]
+        yield f"TÍTULO {titulo}\n"
+        for capitulo in ROMANOS[:4]:
+            yield f"CAPÍTULO {capitulo}\n"
+            for _ in range(100):
+                articulo += 1
+                yield f"Artículo {articulo}.- " + " ".join(rng.choice(FRASES) for _ in range(rng.randint(1, 4))) + "\n"
+                if rng.random() < 0.4:
+                    for romano in ROMANOS[:rng.randint(2, 10)]:
+                        yield f"{romano}. " + " ".join(rng.choice(FRASES) for _ in range(rng.randint(1, 3))) + "\n"
+
+
+def bloques(mb: float):
+    """Bloques de ~64 KB hasta `mb` megabytes de texto UTF-8."""
+    limite = int(mb * 1024 * 1024)
+    total, partes, largo = 0, [], 0
+    for linea in lineas_ley():
+        partes.append(linea)
+        largo += len(linea)
+        if largo >= BLOQUE:
+            bloque = "".join(partes)
+            total += len(bloque.encode("utf-8"))
+            yield bloque
+            partes, largo = [], 0
+            if total >= limite:
+                return
+
+
+def medir(nombre: str, funcion, total_bytes: int, memoria: bool):
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    chunks = funcion()
+    segundos = time.perf_counter() - inicio
+    pico = ""
+    if memoria:
+        pico = f"{tracemalloc.get_traced_memory()[1] / 1e6:>10.1f}"
+        tracemalloc.stop()
+    print(f"{nombre:<40} {chunks:>9} {segundos * 1000:>10.0f} {total_bytes / segundos / 1e6:>8.2f} {pico}")
+
+
+def main(tamanos, max_actual: float, memoria: bool):
+    actual, streaming = LegalDocumentChunker(), StreamingLegalChunker()
+    print(f"{'Escenario':<40} {'Chunks':>9} {'ms':>10} {'MB/s':>8} {'Pico MB' if memoria else ''}")
+    print("-" * (70 + (11 if memoria else 0)))
+    for mb in tamanos:
+        texto = "".join(bloques(mb))
+        total = len(texto.encode("utf-8"))
+        print(f"--- {total / 1e6:.1f} MB")
+        if mb <= max_actual:
+            medir("antes: LegalDocumentChunker", lambda: len(actual.chunk_legal_document(texto, "LEY")), total, memoria)
+        medir("streaming: texto completo", lambda: len(streaming.chunk_legal_document(texto, "LEY")), total, memoria)
+        del texto
+        medir(
+            "streaming: bloques de 64 KB",
+            lambda: sum(1 for _ in streaming.iter_chunks(bloques(mb), "LEY")),
+            total, memoria,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--max-actual", type=float, default=10,
+                        help="tamaño máximo (MB) para medir el chunker anterior, que guarda todo en memoria")
+    parser.add_argument("--memoria", action="store_true", help="pico de memoria con tracemalloc")
+    argumentos = parser.parse_args()
+    main(argumentos.mb, argumentos.max_actual, argumentos.memoria)
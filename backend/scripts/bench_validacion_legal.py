@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: validación legal de un lote de operaciones (p. ej. un año de un cliente).
+
+Compara para N operaciones:
+- antes: validar_operacion una por una (reglas interpretadas por operación)
+- después: validar_operaciones (catálogo compilado en bitsets, una
+  evaluación por firma distinta)
+
+Escenarios: expedientes típicos (pocas combinaciones de evidencias, como
+en la práctica) y peor caso (evidencias aleatorias, casi todas las firmas
+distintas).
+
+Materializar crea ~10 objetos acíclicos por regla y operación; con
+--sin-gc se mide sin las colecciones del GC sobre el heap creciente. El
+GC se desactiva solo aquí: el servicio no toca el estado del proceso.
+
+Ejecutar: python backend/scripts/bench_validacion_legal.py [--operaciones 10000] [--sin-gc]
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.legal_validation_service import (
+    LegalValidationService,
+    OperacionAValidar,
+    TipoEvidencia,
+    TipoServicio,
+)
+
+E = TipoEvidencia
+EXPEDIENTES_TIPICOS = [
+    [E.CONTRATO, E.CFDI, E.ESTADO_CUENTA, E.ENTREGABLE, E.ORDEN_SERVICIO, E.CONSULTA_SAT, E.LISTA_69B],
+    [E.CONTRATO, E.CFDI, E.POLIZA_CONTABLE, E.REPORTE, E.ACTA, E.MEMORANDO_INTERNO],
+    [E.CFDI, E.ESTADO_CUENTA],
+    [E.CONTRATO, E.CFDI],
+    [],
+]
+
+
+def operaciones(n: int, tipicas: bool, semilla: int = 46):
+    rng = random.Random(semilla)
+    tipos = list(TipoEvidencia)
+    for i in range(n):
+        evidencias = rng.choice(EXPEDIENTES_TIPICOS) if tipicas else rng.sample(tipos, rng.randint(0, len(tipos)))
+        yield OperacionAValidar(
+            operacion_id=f"OP-{i}",
+            proveedor_rfc=f"RFC{rng.randint(0, 200):03d}0101AAA",
+            monto=round(rng.uniform(1_000, 2_000_000), 2),
+            tipo_servicio=rng.choice(list(TipoServicio)),
+            evidencias_presentadas=list(evidencias),
+            es_parte_relacionada=rng.random() < 0.1,
+            proveedor_en_69b=rng.random() < 0.02,
+            cfdi_validado=rng.random() < 0.9,
+        )
+
+
+def medir(nombre: str, funcion, n: int, sin_gc: bool = False):
+    gc_activo = gc.isenabled()
+    if sin_gc:
+        gc.disable()
+    try:
+        inicio = time.perf_counter()
+        funcion()
+        segundos = time.perf_counter() - inicio
+    finally:
+        if sin_gc and gc_activo:
+            gc.enable()
+    print(f"{nombre:<44} {segundos * 1000:>10.0f} {n / segundos:>12,.0f}")
+
+
+def main(n: int, sin_gc: bool = False):
+    service = LegalValidationService()
+    print(f"{'Escenario':<44} {'ms':>10} {'ops/s':>12}")
+    print("-" * 68)
+    for tipicas, etiqueta in ((True, "expedientes típicos"), (False, "evidencias aleatorias")):
+        lote = list(operaciones(n, tipicas))
+        argumentos = [asdict(op) for op in lote]
+        print(f"--- {n:,} operaciones, {etiqueta}")
+        medir("antes: validar_operacion x N", lambda: [service.validar_operacion(**a) for a in argumentos], n, sin_gc)
+        medir("después: validar_operaciones", lambda: service.validar_operaciones(lote), n, sin_gc)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--operaciones", type=int, default=10_000)
+    parser.add_argument("--sin-gc", action="store_true", help="Desactiva el GC durante cada medición")
+    argumentos = parser.parse_args()
+    main(argumentos.operaciones, argumentos.sin_gc)
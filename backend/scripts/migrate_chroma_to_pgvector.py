@@ -0,0 +1,233 @@
+"""
+Migrate agent knowledge from Chroma collections into pgvector (rag_chunks).
+
+Sources:
+- repository: RagRepository collections (CHROMA_PERSIST_DIR, prefix satma_prod_)
+- legacy:     RagService collections in ./chroma_db
+
+Chunks are copied in batches with their stored embeddings (re-embedded only
+when missing or of the wrong dimension) and deduplicated by content hash per
+agent. Progress is committed per batch in rag_migration_progress, so an
+interrupted run resumes where it stopped.
+
+Run migrations/007_rag_chunks_pgvector.sql first, then:
+    python scripts/migrate_chroma_to_pgvector.py --source all --batch-size 200
+"""
+
+import os
+import sys
+import json
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.retrieval_facade import content_hash
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.environ.get('DATABASE_URL', '')
+EMBEDDING_DIMENSIONS = 1536
+
+INSERT_BATCH_SQL = """
+    INSERT INTO rag_chunks (id, agent_id, content, content_hash, document_id, metadata, embedding, source)
+    SELECT * FROM unnest(
+        $1::text[], $2::text[], $3::text[], $4::text[], $5::text[], $6::jsonb[], $7::text[]::vector[], $8::text[]
+    )
+    ON CONFLICT DO NOTHING
+    RETURNING id
+"""
+
+SAVE_PROGRESS_SQL = """
+    INSERT INTO rag_migration_progress (source, collection, next_offset, migrated, duplicates, completed, updated_at)
+    VALUES ($1, $2, $3, $4, $5, $6, NOW())
+    ON CONFLICT (source, collection) DO UPDATE SET
+        next_offset = EXCLUDED.next_offset,
+        migrated = EXCLUDED.migrated,
+        duplicates = EXCLUDED.duplicates,
+        completed = EXCLUDED.completed,
+        updated_at = NOW()
+"""
+
+
+def _as_vector(embedding: Any) -> Optional[List[float]]:
+    if embedding is None:
+        return None
+    vector = [float(x) for x in embedding]
+    return vector if len(vector) == EMBEDDING_DIMENSIONS else None
+
+
+def _column(batch: Dict[str, Any], key: str, size: int) -> List[Any]:
+    values = batch.get(key)
+    if values is None:
+        return [None] * size
+    return list(values)
+
+
+async def migrate_collection(
+    conn,
+    collection,
+    source: str,
+    agent_id: str,
+    batch_size: int = 200,
+    embed_batch: Optional[Callable[[List[str]], Awaitable[List[Optional[List[float]]]]]] = None,
+    reset: bool = False,
+) -> Dict[str, Any]:
+    """
+    Copy one Chroma collection into rag_chunks, resuming from the last
+    committed batch. Returns the collection's progress counters.
+    """
+    name = collection.name
+    progress = None if reset else await conn.fetchrow(
+        "SELECT next_offset, migrated, duplicates, completed FROM rag_migration_progress "
+        "WHERE source = $1 AND collection = $2",
+        source, name
+    )
+    offset = progress["next_offset"] if progress else 0
+    migrated = progress["migrated"] if progress else 0
+    duplicates = progress["duplicates"] if progress else 0
+
+    if progress and progress["completed"]:
+        logger.info(f"[{source}] {name}: already migrated ({migrated} chunks), skipping")
+        return {"collection": name, "migrated": migrated, "duplicates": duplicates, "skipped": 0, "resumed": True}
+
+    if offset:
+        logger.info(f"[{source}] {name}: resuming at offset {offset}")
+
+    skipped = 0
+    while True:
+        batch = await asyncio.to_thread(
+            collection.get,
+            offset=offset,
+            limit=batch_size,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        ids = list(batch.get("ids") or [])
+        if not ids:
+            break
+
+        documents = _column(batch, "documents", len(ids))
+        metadatas = _column(batch, "metadatas", len(ids))
+        vectors = [_as_vector(e) for e in _column(batch, "embeddings", len(ids))]
+
+        missing = [i for i, v in enumerate(vectors) if v is None and documents[i]]
+        if missing and embed_batch is not None:
+            embedded = await embed_batch([documents[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = _as_vector(vector)
+
+        rows: Tuple[List[Any], ...] = ([], [], [], [], [], [], [], [])
+        for chunk_id, document, metadata, vector in zip(ids, documents, metadatas, vectors):
+            if not document or vector is None:
+                skipped += 1
+                continue
+            metadata = metadata or {}
+            values = (
+                str(chunk_id),
+                agent_id,
+                document,
+                content_hash(document),
+                str(metadata.get("doc_id") or metadata.get("file_id") or "") or None,
+                json.dumps(metadata, ensure_ascii=False, default=str),
+                "[" + ",".join(map(str, vector)) + "]",
+                source,
+            )
+            for column, value in zip(rows, values):
+                column.append(value)
+
+        async with conn.transaction():
+            inserted = await conn.fetch(INSERT_BATCH_SQL, *rows) if rows[0] else []
+            migrated += len(inserted)
+            duplicates += len(rows[0]) - len(inserted)
+            offset += len(ids)
+            await conn.execute(SAVE_PROGRESS_SQL, source, name, offset, migrated, duplicates, False)
+
+        logger.info(f"[{source}] {name}: offset {offset} - {migrated} migrated, {duplicates} duplicates")
+
+    await conn.execute(SAVE_PROGRESS_SQL, source, name, offset, migrated, duplicates, True)
+    return {"collection": name, "migrated": migrated, "duplicates": duplicates, "skipped": skipped, "resumed": False}
+
+
+def list_source_collections(source: str) -> List[Tuple[Any, str]]:
+    """(collection, short agent id) pairs for a Chroma source."""
+    import chromadb
+    from chromadb.config import Settings
+
+    if source == "repository":
+        from services.rag_repository import PERSIST_DIR
+        prefix = "satma_prod_"
+        client = chromadb.PersistentClient(path=PERSIST_DIR, settings=Settings(anonymized_telemetry=False))
+        names = [getattr(c, "name", c) for c in client.list_collections()]
+        return [(client.get_collection(n), n[len(prefix):]) for n in names if n.startswith(prefix)]
+
+    if source == "legacy":
+        from services.rag_service import AGENT_COLLECTIONS
+        client = chromadb.PersistentClient(path="./chroma_db", settings=Settings(anonymized_telemetry=False))
+        existing = {getattr(c, "name", c) for c in client.list_collections()}
+        return [
+            (client.get_collection(collection_name), agent_id.split("_")[0])
+            for agent_id, collection_name in AGENT_COLLECTIONS.items()
+            if collection_name in existing
+        ]
+
+    raise ValueError(f"Unknown source: {source}")
+
+
+async def migrate_all(sources: List[str], batch_size: int = 200, reset: bool = False) -> bool:
+    if not DATABASE_URL:
+        logger.error("DATABASE_URL not set")
+        return False
+
+    import asyncpg
+    from services.embedding_service import embedding_service
+
+    conn = await asyncpg.connect(DATABASE_URL)
+    start_time = datetime.now()
+    totals = {"migrated": 0, "duplicates": 0, "skipped": 0}
+
+    try:
+        for source in sources:
+            label = "chroma" if source == "repository" else "chroma_legacy"
+            for collection, agent_id in list_source_collections(source):
+                result = await migrate_collection(
+                    conn, collection, label, agent_id,
+                    batch_size=batch_size,
+                    embed_batch=embedding_service.generate_batch_embeddings,
+                    reset=reset
+                )
+                for key in totals:
+                    totals[key] += result[key]
+
+        elapsed = (datetime.now() - start_time).total_seconds()
+        logger.info("\n" + "=" * 50)
+        logger.info("Chroma -> pgvector migration completed!")
+        logger.info(f"Migrated: {totals['migrated']}")
+        logger.info(f"Duplicates (already in rag_chunks): {totals['duplicates']}")
+        logger.info(f"Skipped (no content/embedding): {totals['skipped']}")
+        logger.info(f"Time elapsed: {elapsed:.1f} seconds")
+        logger.info("Set RETRIEVAL_BACKENDS to include rag_chunks to query the migrated data.")
+        logger.info("=" * 50)
+        return True
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}. Re-run to resume from the last committed batch.")
+        return False
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrate Chroma collections into pgvector (rag_chunks)")
+    parser.add_argument("--source", choices=["repository", "legacy", "all"], default="all")
+    parser.add_argument("--batch-size", type=int, default=200, help="Chunks per batch/commit")
+    parser.add_argument("--reset", action="store_true", help="Ignore saved progress and start over")
+
+    args = parser.parse_args()
+    selected = ["repository", "legacy"] if args.source == "all" else [args.source]
+
+    asyncio.run(migrate_all(selected, batch_size=args.batch_size, reset=args.reset))
@@ -0,0 +1,386 @@
+"""
+Proveedores falsos y deterministas para el arnés de rendimiento.
+
+Todos los proveedores externos de Revisar.IA hablan HTTP con httpx, ya sea
+directamente (OpenRouter, Voyage, embeddings_service) o a través de los SDK
+de OpenAI y Anthropic, que usan httpx o httpx2 según la versión. Por eso la
+falsificación vive en un solo punto: un transporte httpx que responde como cada API
+(mismos JSON que la real) con latencia y tokens configurables. Las
+respuestas dependen solo del cuerpo de la petición y de la semilla, así que
+dos corridas con la misma configuración hacen exactamente el mismo trabajo.
+
+- instalar_proveedores_falsos(config): todo cliente httpx/httpx2 creado
+  dentro del bloque usa el transporte falso y los singletons de los proveedores se
+  reinician con llaves falsas; al salir se restaura todo
+- bloquear_red(): cualquier conexión o resolución DNS fuera de loopback
+  falla; Postgres local sigue disponible
+
+Hosts simulados: api.openai.com (chat y embeddings), api.anthropic.com
+(messages), openrouter.ai (chat) y api.voyageai.com (embeddings).
+"""
+
+import asyncio
+import base64
+import hashlib
+import ipaddress
+import json
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+DECISIONES = {
+    "aprobar": "Recomiendo APROBAR el proyecto: los cuatro pilares están acreditados.",
+    "ajustes": "Se deben SOLICITAR AJUSTES antes de continuar.",
+    "rechazar": "Recomiendo RECHAZAR el proyecto por falta de materialidad.",
+}
+
+PARRAFOS = [
+    "La razón de negocios se sustenta en el análisis de mercado y en la necesidad operativa documentada.",
+    "El beneficio económico esperado es medible mediante indicadores de ventas y reducción de costos.",
+    "La materialidad se acredita con contrato, entregables, bitácoras y comunicaciones con el proveedor.",
+    "La trazabilidad cumple NOM-151: los documentos cuentan con sello de tiempo y cadena de custodia.",
+    "No se identifican alertas del proveedor en listas 69-B ni inconsistencias en los CFDI revisados.",
+]
+
+HOSTS_LOCALES = {"localhost", "localhost.localdomain", "ip6-localhost"}
+
+
+@dataclass
+class PerfilLatencia:
+    """Latencia simulada: base + jitter + costo por token de salida (todo en ms)"""
+    base_ms: float = 0.0
+    jitter_ms: float = 0.0
+    ms_por_token: float = 0.0
+    tokens_min: int = 200
+    tokens_max: int = 400
+
+
+@dataclass
+class ConfigProveedoresFalsos:
+    llm: PerfilLatencia = field(default_factory=lambda: PerfilLatencia(base_ms=50, jitter_ms=20, ms_por_token=0.5))
+    embeddings: PerfilLatencia = field(default_factory=lambda: PerfilLatencia(base_ms=15, jitter_ms=5))
+    decision: str = "aprobar"
+    semilla: int = 47
+
+
+@dataclass
+class UsoProveedor:
+    llamadas: int = 0
+    tokens_entrada: int = 0
+    tokens_salida: int = 0
+    segundos_simulados: float = 0.0
+
+
+def _texto_mensajes(cuerpo: Dict[str, Any]) -> str:
+    partes = []
+    system = cuerpo.get("system")
+    if isinstance(system, list):
+        partes.extend(b.get("text", "") for b in system if isinstance(b, dict))
+    elif system:
+        partes.append(str(system))
+    for mensaje in cuerpo.get("messages", []):
+        contenido = mensaje.get("content", "")
+        if isinstance(contenido, list):
+            partes.extend(b.get("text", "") for b in contenido if isinstance(b, dict))
+        else:
+            partes.append(str(contenido))
+    return "\n".join(partes)
+
+
+def _tokens(texto: str) -> int:
+    return max(1, len(texto) // 4)
+
+
+class ProveedoresFalsos:
+    """
+    Imita las APIs de LLM y embeddings. No depende de una versión de httpx:
+    cada transporte (ver _transporte_para) le pasa método, host, ruta y cuerpo.
+    """
+
+    def __init__(self, config: Optional[ConfigProveedoresFalsos] = None):
+        self.config = config or ConfigProveedoresFalsos()
+        self.uso: Dict[str, UsoProveedor] = {}
+        self.no_simuladas: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    # ---------- Contabilidad ----------
+
+    def resumen_uso(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {proveedor: asdict(uso) for proveedor, uso in self.uso.items()}
+
+    def _registrar(self, proveedor: str, entrada: int, salida: int, segundos: float):
+        with self._lock:
+            uso = self.uso.setdefault(proveedor, UsoProveedor())
+            uso.llamadas += 1
+            uso.tokens_entrada += entrada
+            uso.tokens_salida += salida
+            uso.segundos_simulados += segundos
+
+    # ---------- Respuestas ----------
+
+    def _rng(self, crudo: bytes) -> random.Random:
+        digest = hashlib.sha256(crudo + str(self.config.semilla).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _espera(self, perfil: PerfilLatencia, rng: random.Random, tokens_salida: int) -> float:
+        ms = perfil.base_ms + rng.uniform(0, perfil.jitter_ms) + perfil.ms_por_token * tokens_salida
+        return ms / 1000
+
+    def responder(self, metodo: str, host: str, ruta: str, crudo: bytes) -> Tuple[int, Dict[str, Any], float]:
+        """(código HTTP, cuerpo JSON, segundos de latencia simulada)"""
+        try:
+            cuerpo = json.loads(crudo) if crudo else {}
+        except ValueError:
+            cuerpo = {}
+        rng = self._rng(crudo)
+
+        if ruta.endswith("/embeddings") and host in ("api.openai.com", "api.voyageai.com"):
+            return self._embeddings("voyage" if "voyage" in host else "openai_embeddings", cuerpo, rng)
+        if host == "api.anthropic.com" and ruta.endswith("/messages"):
+            return self._chat("anthropic", cuerpo, rng, formato="anthropic")
+        if ruta.endswith("/chat/completions") and host in ("api.openai.com", "openrouter.ai"):
+            return self._chat("openrouter" if host == "openrouter.ai" else "openai", cuerpo, rng, formato="openai")
+
+        with self._lock:
+            clave = f"{metodo} {host}{ruta}"
+            self.no_simuladas[clave] = self.no_simuladas.get(clave, 0) + 1
+        return 404, {"error": {"message": f"Endpoint no simulado: {host}{ruta}"}}, 0.0
+
+    def _contenido(self, rng: random.Random, tokens: int) -> str:
+        texto = [DECISIONES.get(self.config.decision, DECISIONES["aprobar"])]
+        while _tokens(" ".join(texto)) < tokens:
+            texto.append(rng.choice(PARRAFOS))
+        return "\n\n".join(texto)
+
+    def _chat(self, proveedor: str, cuerpo: Dict[str, Any], rng: random.Random, formato: str):
+        perfil = self.config.llm
+        maximo = int(cuerpo.get("max_tokens") or perfil.tokens_max)
+        salida = min(rng.randint(perfil.tokens_min, perfil.tokens_max), maximo)
+        texto = self._contenido(rng, salida)
+        entrada = _tokens(_texto_mensajes(cuerpo))
+        espera = self._espera(perfil, rng, salida)
+        self._registrar(proveedor, entrada, salida, espera)
+        modelo = cuerpo.get("model", "desconocido")
+        ident = f"{rng.getrandbits(48):012x}"
+
+        if formato == "anthropic":
+            return 200, {
+                "id": f"msg_{ident}", "type": "message", "role": "assistant", "model": modelo,
+                "content": [{"type": "text", "text": texto}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": entrada, "output_tokens": salida},
+            }, espera
+        return 200, {
+            "id": f"chatcmpl-{ident}", "object": "chat.completion", "created": 0, "model": modelo,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": texto}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": entrada, "completion_tokens": salida, "total_tokens": entrada + salida},
+        }, espera
+
+    def _embeddings(self, proveedor: str, cuerpo: Dict[str, Any], rng: random.Random):
+        entradas = cuerpo.get("input", [])
+        if isinstance(entradas, str):
+            entradas = [entradas]
+        dimension = int(cuerpo.get("dimensions") or 1536)
+        datos = []
+        for i, texto in enumerate(entradas):
+            vector = self._vector(str(texto), dimension)
+            if cuerpo.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{dimension}f", *vector)).decode()
+            datos.append({"object": "embedding", "index": i, "embedding": vector})
+        entrada = sum(_tokens(str(t)) for t in entradas)
+        espera = self._espera(self.config.embeddings, rng, 0)
+        self._registrar(proveedor, entrada, 0, espera)
+        return 200, {
+            "object": "list", "data": datos, "model": cuerpo.get("model", "desconocido"),
+            "usage": {"prompt_tokens": entrada, "total_tokens": entrada},
+        }, espera
+
+    def _vector(self, texto: str, dimension: int):
+        """Vector unitario determinista por texto: textos iguales, vectores iguales"""
+        rng = random.Random(hashlib.sha256(texto.encode()).digest())
+        vector = [rng.gauss(0, 1) for _ in range(dimension)]
+        norma = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norma for v in vector]
+
+
+# ============================================================
+# INSTALACIÓN
+# ============================================================
+
+def _modulos_httpx():
+    """httpx y, si está instalado, httpx2 (lo usan versiones recientes de los SDK)"""
+    modulos = [httpx]
+    try:
+        import httpx2
+        modulos.append(httpx2)
+    except ImportError:
+        pass
+    return modulos
+
+
+def _transporte_para(modulo, proveedores: ProveedoresFalsos):
+    """Transporte síncrono y asíncrono del módulo httpx dado, respondido por `proveedores`"""
+
+    class TransporteFalso(modulo.BaseTransport, modulo.AsyncBaseTransport):
+
+        def handle_request(self, request):
+            request.read()
+            estado, cuerpo, espera = proveedores.responder(
+                request.method, request.url.host, request.url.path, request.content or b"")
+            if espera:
+                time.sleep(espera)
+            return modulo.Response(estado, json=cuerpo, request=request)
+
+        async def handle_async_request(self, request):
+            await request.aread()
+            estado, cuerpo, espera = proveedores.responder(
+                request.method, request.url.host, request.url.path, request.content or b"")
+            if espera:
+                await asyncio.sleep(espera)
+            return modulo.Response(estado, json=cuerpo, request=request)
+
+    return TransporteFalso()
+
+
+LLAVES_FALSAS = {
+    "OPENAI_API_KEY": "sk-falso-perf",
+    "ANTHROPIC_API_KEY": "sk-ant-falso-perf",
+    "OPENROUTER_API_KEY": "sk-or-falso-perf",
+}
+# Sin estas variables los SDK usan sus hosts por omisión, que son los simulados
+URLS_BASE = ("OPENAI_BASE_URL", "ANTHROPIC_BASE_URL", "AI_INTEGRATIONS_OPENAI_BASE_URL", "AI_INTEGRATIONS_OPENAI_API_KEY")
+
+
+def _reiniciar_singletons(restaurar: list):
+    """Los proveedores cachean su cliente (o su ausencia) al primer uso"""
+
+    def fijar(objeto, atributo, valor):
+        restaurar.append((objeto, atributo, getattr(objeto, atributo)))
+        setattr(objeto, atributo, valor)
+
+    from services import anthropic_provider, openai_provider
+    for modulo, atributo in ((openai_provider, "_openai_client"), (anthropic_provider, "_anthropic_client")):
+        fijar(modulo, atributo, None)
+        fijar(modulo, "_initialized", False)
+    if anthropic_provider.ANTHROPIC_AVAILABLE is False:
+        try:
+            import anthropic
+            fijar(anthropic_provider, "anthropic", anthropic)
+            fijar(anthropic_provider, "ANTHROPIC_AVAILABLE", True)
+        except ImportError:
+            pass
+
+    from services.embedding_service import embedding_service
+    fijar(embedding_service, "_client", None)
+
+    from services.knowledge_base import embeddings_service as kb_embeddings
+    fijar(kb_embeddings.embeddings_service, "openai_key", LLAVES_FALSAS["OPENAI_API_KEY"])
+    fijar(kb_embeddings.embeddings_service, "voyage_key", None)
+
+    from services import openrouter_service
+    instancia = getattr(openrouter_service, "openrouter_service", None)
+    if instancia is not None:
+        fijar(instancia, "api_key", LLAVES_FALSAS["OPENROUTER_API_KEY"])
+        fijar(instancia, "initialized", True)
+
+
+@contextmanager
+def instalar_proveedores_falsos(config: Optional[ConfigProveedoresFalsos] = None):
+    """
+    Dentro del bloque, todo cliente httpx usa el transporte falso (incluidos
+    los que crean los SDK, que sí pasan su propio transporte). Regresa los
+    ProveedoresFalsos para consultar su uso.
+    """
+    proveedores = ProveedoresFalsos(config)
+    originales = []
+    for modulo in _modulos_httpx():
+        transporte = _transporte_para(modulo, proveedores)
+        for clase in (modulo.Client, modulo.AsyncClient):
+            originales.append((clase, clase.__init__))
+
+            def init_falso(self, *args, _init=clase.__init__, _transporte=transporte, **kwargs):
+                kwargs["transport"] = _transporte
+                kwargs.pop("mounts", None)
+                kwargs.pop("proxy", None)
+                _init(self, *args, **kwargs)
+
+            clase.__init__ = init_falso
+
+    entorno = {clave: os.environ.get(clave) for clave in (*LLAVES_FALSAS, *URLS_BASE)}
+    restaurar: list = []
+    os.environ.update(LLAVES_FALSAS)
+    for clave in URLS_BASE:
+        os.environ.pop(clave, None)
+    try:
+        _reiniciar_singletons(restaurar)
+        yield proveedores
+    finally:
+        for clase, init in reversed(originales):
+            clase.__init__ = init
+        for objeto, atributo, valor in reversed(restaurar):
+            setattr(objeto, atributo, valor)
+        for clave, valor in entorno.items():
+            if valor is None:
+                os.environ.pop(clave, None)
+            else:
+                os.environ[clave] = valor
+
+
+# ============================================================
+# SIN RED
+# ============================================================
+
+def es_local(host: Any) -> bool:
+    if host is None:
+        return True
+    host = host.decode() if isinstance(host, bytes) else str(host)
+    if host in HOSTS_LOCALES:
+        return True
+    try:
+        return ipaddress.ip_address(host.split("%", 1)[0]).is_loopback
+    except ValueError:
+        return False
+
+
+class RedBloqueada(ConnectionRefusedError):
+    """Conexión a un host no local durante el arnés de rendimiento"""
+
+
+@contextmanager
+def bloquear_red():
+    """Solo se permiten sockets Unix y loopback (Postgres local, Redis local)"""
+    connect, connect_ex, getaddrinfo = socket.socket.connect, socket.socket.connect_ex, socket.getaddrinfo
+
+    def _verificar(sock, direccion):
+        if sock.family in (socket.AF_INET, socket.AF_INET6) and not es_local(direccion[0]):
+            raise RedBloqueada(f"Red deshabilitada en el arnés: {direccion[0]}")
+
+    def connect_local(sock, direccion):
+        _verificar(sock, direccion)
+        return connect(sock, direccion)
+
+    def connect_ex_local(sock, direccion):
+        _verificar(sock, direccion)
+        return connect_ex(sock, direccion)
+
+    def getaddrinfo_local(host, *args, **kwargs):
+        if not es_local(host):
+            raise socket.gaierror(socket.EAI_NONAME, f"Red deshabilitada en el arnés: {host}")
+        return getaddrinfo(host, *args, **kwargs)
+
+    socket.socket.connect, socket.socket.connect_ex = connect_local, connect_ex_local
+    socket.getaddrinfo = getaddrinfo_local
+    try:
+        yield
+    finally:
+        socket.socket.connect, socket.socket.connect_ex = connect, connect_ex
+        socket.getaddrinfo = getaddrinfo
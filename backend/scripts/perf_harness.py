@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Arnés de rendimiento sin red: latencias p50/p95/p99 y throughput por escenario.
+
+Corre escenarios de punta a punta con proveedores falsos y deterministas
+(scripts/perf_fakes.py: OpenAI, Anthropic, OpenRouter y embeddings con
+latencia y tokens configurables) y con la red bloqueada fuera de loopback:
+- deliberacion: DeliberationOrchestrator.run_agentic_deliberation completa
+- consejo: OpenRouterService.run_full_council (3 etapas)
+- biblioteca: ingesta de un documento con el RAGProcessor de /api/biblioteca
+  (requiere DATABASE_URL a un Postgres local con las migraciones aplicadas;
+  los documentos creados se borran al terminar)
+- defense_file: export a PDF de un Defense File (sintético, o leído de
+  Postgres con --defense-file-id)
+
+El resultado es un JSON pensado para comparar dos corridas:
+    python backend/scripts/perf_harness.py --salida antes.json
+    python backend/scripts/perf_harness.py --salida despues.json --comparar antes.json
+Con --comparar se imprime la tabla de diferencias y el proceso termina con
+código 1 si algún percentil empeora (o el throughput cae) más que --umbral.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.perf_fakes import (
+    ConfigProveedoresFalsos,
+    PerfilLatencia,
+    ProveedoresFalsos,
+    bloquear_red,
+    es_local,
+    instalar_proveedores_falsos,
+)
+from scripts.baseline_metrics import MetricsCollector
+
+VERSION_FORMATO = 1
+# Los documentos de la biblioteca se crean bajo esta empresa y se borran al final
+EMPRESA_ARNES = str(uuid.uuid5(uuid.NAMESPACE_DNS, "perf-harness.revisar.ia"))
+METRICAS_MENOR_ES_MEJOR = ("p50", "p95", "p99")
+
+
+def _log(mensaje: str):
+    print(mensaje, file=sys.stderr, flush=True)
+
+
+# ============================================================
+# ESCENARIOS
+# ============================================================
+
+@dataclass
+class Escenario:
+    """Un flujo de punta a punta; `ejecutar(i)` regresa False si la iteración falló"""
+    nombre: str
+    ejecutar: Callable[[int], Awaitable[bool]]
+    limpiar: Optional[Callable[[], Awaitable[None]]] = None
+
+
+class OmitirEscenario(Exception):
+    """El escenario no puede correr en este entorno (p. ej. sin Postgres local)"""
+
+
+def proyecto_sintetico(i: int) -> Dict[str, Any]:
+    return {
+        "id": f"PERF-{i:05d}",
+        "name": f"Estudio de mercado inmobiliario {i}",
+        "description": "Estudio de mercado para la apertura de una sucursal en Monterrey, "
+                       "con entregables mensuales y métricas de ocupación.",
+        "amount": 1_500_000 + i,
+        "client_name": "Cliente Arnés SA de CV",
+        "service_type": "Consultoría",
+        "empresa_id": EMPRESA_ARNES,
+    }
+
+
+def defense_file_sintetico(i: int) -> Dict[str, Any]:
+    return {
+        "id": f"DF-PERF-{i:05d}",
+        "folio_defensa": f"DEF-2026-{i:05d}",
+        "titulo": "Estudio de mercado inmobiliario",
+        "proyecto_id": f"PERF-{i:05d}",
+        "indice_defendibilidad": 82,
+        "hash_contenido": f"{i:064x}",
+        "secciones": {
+            "contexto": {
+                "razon_negocios_descripcion": "Expansión regional sustentada en análisis de demanda. " * 8,
+                "objetivo_negocio": "Abrir dos sucursales con ocupación superior al 70%.",
+                "pilares_estrategicos": [f"Pilar estratégico {n}" for n in range(6)],
+                "riesgos_de_no_hacer": "Pérdida de participación de mercado frente a competidores. " * 4,
+            },
+            "contractual": {
+                "contrato_id": "CTR-001", "sow_id": "SOW-001", "monto_total": 1_500_000.0,
+                "forma_pago": "Mensual contra entregable",
+                "objeto_servicio": "Estudio de mercado inmobiliario. " * 10,
+                "alcance_detallado": "Levantamiento, análisis y recomendaciones. " * 12,
+                "entregables_pactados": [{"nombre": f"Entregable {n}", "descripcion": "Informe mensual " * 4}
+                                         for n in range(12)],
+            },
+            "ejecucion": {
+                "acta_aceptacion_id": "ACTA-001", "fecha_aceptacion": "2026-06-30",
+                "evidencia_trabajo": [{"nombre": f"Reporte {n}", "tipo": "PDF"} for n in range(20)],
+                "minutas": [{"fecha": f"2026-{1 + n % 12:02d}-15", "asunto": f"Seguimiento {n}",
+                             "acuerdos": ["a", "b", "c"]} for n in range(12)],
+            },
+            "financiero": {
+                "cfdi_uuid": str(uuid.UUID(int=i)), "cfdi_monto": 1_500_000.0,
+                "cfdi_concepto": "Estudio de mercado inmobiliario", "three_way_match_status": "conciliado",
+                "pago_referencia": f"SPEI-{i:08d}", "pago_fecha": "2026-07-05", "pago_monto": 1_500_000.0,
+            },
+            "cierre": {
+                "bee_original": {"descripcion": "Incremento de ventas", "valor_estimado": 3_000_000},
+                "bee_alcanzado": {"descripcion": "Incremento de ventas", "valor_real": 3_400_000},
+                "lecciones_aprendidas": "Documentar minutas desde el arranque. " * 6,
+            },
+        },
+    }
+
+
+def documento_biblioteca(i: int, lineas: int) -> bytes:
+    """Ley sintética única por iteración (el RAGProcessor rechaza duplicados por hash)"""
+    from scripts.bench_kb_chunker import lineas_ley
+    encabezado = f"LEY DEL IMPUESTO SOBRE LA RENTA - copia de prueba {i} {uuid.uuid4()}\n"
+    return (encabezado + "".join(itertools.islice(lineas_ley(semilla=i), lineas))).encode("utf-8")
+
+
+def escenario_deliberacion() -> Escenario:
+    from services.deliberation_orchestrator import DeliberationOrchestrator
+    orquestador = DeliberationOrchestrator()
+
+    async def ejecutar(i: int) -> bool:
+        resultado = await orquestador.run_agentic_deliberation(proyecto_sintetico(i))
+        return bool(resultado.get("success"))
+
+    async def limpiar():
+        # La deliberación deja bitácora, reportes PDF y defense file en disco
+        from services.defense_file_service import DEFENSE_FILES_DIR
+        from services.evidence_portfolio_service import BITACORA_DIR
+        for bitacora in BITACORA_DIR.glob("PERF-*_bitacora.json"):
+            bitacora.unlink(missing_ok=True)
+        for reporte in (BITACORA_DIR.parent / "reports").glob("IDPERF-*.pdf"):
+            reporte.unlink(missing_ok=True)
+        shutil.rmtree(DEFENSE_FILES_DIR / EMPRESA_ARNES, ignore_errors=True)
+        orquestador.deliberations.clear()
+
+    return Escenario("deliberacion", ejecutar, limpiar)
+
+
+def escenario_consejo() -> Escenario:
+    from services.openrouter_service import openrouter_service
+
+    async def ejecutar(i: int) -> bool:
+        resultado = await openrouter_service.run_full_council(
+            f"¿Es deducible el proyecto PERF-{i:05d} conforme al artículo 27 LISR?",
+            context=proyecto_sintetico(i)["description"],
+        )
+        return bool(resultado.get("success", True)) and "error" not in resultado
+
+    return Escenario("consejo", ejecutar)
+
+
+def escenario_defense_file(defense_file_id: Optional[str]) -> Escenario:
+    from services.defense_file_export_service import defense_file_export_service
+
+    async def ejecutar(i: int) -> bool:
+        if defense_file_id:
+            from routes.defense_file_v2_routes import obtener_defense_file
+            datos = await obtener_defense_file(defense_file_id)
+        else:
+            datos = defense_file_sintetico(i)
+        pdf = await defense_file_export_service.generate_defense_file_pdf(datos)
+        return pdf.getbuffer().nbytes > 0
+
+    return Escenario("defense_file", ejecutar)
+
+
+async def escenario_biblioteca(lineas: int) -> Escenario:
+    if not os.environ.get("DATABASE_URL"):
+        raise OmitirEscenario("requiere DATABASE_URL a un Postgres local")
+    from routes import biblioteca_routes
+    from services import user_db
+    if not await user_db.init_db():
+        raise OmitirEscenario("no se pudo conectar a DATABASE_URL")
+    biblioteca_routes.init_biblioteca_services(user_db.async_session_factory)
+
+    async def ejecutar(i: int) -> bool:
+        resultado = await biblioteca_routes.rag_processor.process_document(
+            file_content=documento_biblioteca(i, lineas),
+            filename=f"perf_{i:05d}_LISR.txt",
+            categoria_hint="marco_legal",
+            empresa_id=EMPRESA_ARNES,
+        )
+        return bool(resultado.get("success"))
+
+    async def limpiar():
+        from sqlalchemy import text
+        async with user_db.async_session_factory() as session:
+            await session.execute(text(
+                "DELETE FROM kb_chunk_agente WHERE chunk_id IN (SELECT c.id FROM kb_chunks c "
+                "JOIN kb_documentos d ON d.id = c.documento_id WHERE d.empresa_id = CAST(:e AS uuid))"
+            ), {"e": EMPRESA_ARNES})
+            await session.execute(text(
+                "DELETE FROM kb_chunks WHERE documento_id IN "
+                "(SELECT id FROM kb_documentos WHERE empresa_id = CAST(:e AS uuid))"
+            ), {"e": EMPRESA_ARNES})
+            await session.execute(text("DELETE FROM kb_documentos WHERE empresa_id = CAST(:e AS uuid)"),
+                                  {"e": EMPRESA_ARNES})
+            await session.commit()
+        await user_db.engine.dispose()
+
+    return Escenario("biblioteca", ejecutar, limpiar)
+
+
+ESCENARIOS = ("deliberacion", "consejo", "biblioteca", "defense_file")
+
+
+async def construir_escenario(nombre: str, argumentos) -> Escenario:
+    if nombre == "deliberacion":
+        return escenario_deliberacion()
+    if nombre == "consejo":
+        return escenario_consejo()
+    if nombre == "biblioteca":
+        return await escenario_biblioteca(argumentos.lineas_documento)
+    return escenario_defense_file(argumentos.defense_file_id)
+
+
+# ============================================================
+# MEDICIÓN
+# ============================================================
+
+def _diferencia_uso(antes: Dict[str, Dict], despues: Dict[str, Dict]) -> Dict[str, Dict]:
+    uso = {}
+    for proveedor, valores in despues.items():
+        previo = antes.get(proveedor, {})
+        delta = {k: round(v - previo.get(k, 0), 3) for k, v in valores.items()}
+        if delta.get("llamadas"):
+            uso[proveedor] = delta
+    return uso
+
+
+async def medir(
+    escenario: Escenario,
+    proveedores: ProveedoresFalsos,
+    iteraciones: int,
+    concurrencia: int,
+    calentamiento: int
+) -> Dict[str, Any]:
+    """Corre el escenario `iteraciones` veces con a lo sumo `concurrencia` en vuelo"""
+    for i in range(calentamiento):
+        await escenario.ejecutar(iteraciones + i)
+
+    latencias: List[float] = []
+    errores: List[str] = []
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    async def una(i: int):
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                ok = await escenario.ejecutar(i)
+            except Exception as e:
+                ok = False
+                errores.append(f"{type(e).__name__}: {str(e)[:200]}")
+            else:
+                if not ok:
+                    errores.append("resultado sin éxito")
+            if ok:
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+    uso_antes = proveedores.resumen_uso()
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una(i) for i in range(iteraciones)))
+    segundos = time.perf_counter() - inicio
+
+    return {
+        "iteraciones": iteraciones,
+        "concurrencia": concurrencia,
+        "exitosas": len(latencias),
+        "errores": len(errores),
+        "muestra_errores": sorted(set(errores))[:5],
+        "latencia_ms": MetricsCollector().calculate_percentiles(latencias),
+        "throughput_por_s": round(len(latencias) / segundos, 3) if segundos > 0 else 0.0,
+        "duracion_s": round(segundos, 3),
+        "proveedores": _diferencia_uso(uso_antes, proveedores.resumen_uso()),
+    }
+
+
+def _commit_git() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def config_desde_argumentos(argumentos) -> ConfigProveedoresFalsos:
+    return ConfigProveedoresFalsos(
+        llm=PerfilLatencia(
+            base_ms=argumentos.latencia_llm_ms, jitter_ms=argumentos.jitter_llm_ms,
+            ms_por_token=argumentos.ms_por_token,
+            tokens_min=argumentos.tokens_min, tokens_max=argumentos.tokens_max,
+        ),
+        embeddings=PerfilLatencia(base_ms=argumentos.latencia_embeddings_ms, jitter_ms=argumentos.jitter_embeddings_ms),
+        decision=argumentos.decision,
+        semilla=argumentos.semilla,
+    )
+
+
+async def correr(argumentos) -> Dict[str, Any]:
+    url_db = os.environ.get("DATABASE_URL", "")
+    if url_db and not es_local(urlparse(url_db).hostname):
+        raise SystemExit("DATABASE_URL debe apuntar a un Postgres local (localhost o socket Unix)")
+
+    config = config_desde_argumentos(argumentos)
+    reporte: Dict[str, Any] = {
+        "version": VERSION_FORMATO,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git": _commit_git(),
+        "python": platform.python_version(),
+        "postgres": bool(url_db),
+        "config": {
+            **asdict(config),
+            "iteraciones": argumentos.iteraciones,
+            "concurrencia": argumentos.concurrencia,
+            "calentamiento": argumentos.calentamiento,
+        },
+        "escenarios": {},
+    }
+
+    with bloquear_red(), instalar_proveedores_falsos(config) as proveedores:
+        for nombre in argumentos.escenarios:
+            _log(f"▶ {nombre}...")
+            try:
+                escenario = await construir_escenario(nombre, argumentos)
+            except OmitirEscenario as e:
+                _log(f"  omitido: {e}")
+                reporte["escenarios"][nombre] = {"omitido": str(e)}
+                continue
+            try:
+                resultado = await medir(
+                    escenario, proveedores, argumentos.iteraciones,
+                    argumentos.concurrencia, argumentos.calentamiento,
+                )
+            finally:
+                if escenario.limpiar:
+                    await escenario.limpiar()
+            lat = resultado["latencia_ms"]
+            _log(f"  p50 {lat['p50']} ms | p95 {lat['p95']} ms | p99 {lat['p99']} ms | "
+                 f"{resultado['throughput_por_s']}/s | errores {resultado['errores']}")
+            reporte["escenarios"][nombre] = resultado
+        reporte["no_simuladas"] = dict(proveedores.no_simuladas)
+    return reporte
+
+
+# ============================================================
+# COMPARACIÓN
+# ============================================================
+
+def comparar(base: Dict[str, Any], actual: Dict[str, Any], umbral: float) -> List[Dict[str, Any]]:
+    """
+    Filas (escenario, métrica, base, actual, cambio) para los escenarios
+    presentes en ambas corridas; `regresion` marca lo que empeoró más que `umbral`.
+    """
+    filas = []
+    for nombre, datos in actual.get("escenarios", {}).items():
+        previo = base.get("escenarios", {}).get(nombre)
+        if not previo or "omitido" in previo or "omitido" in datos:
+            continue
+        pares = [(m, previo["latencia_ms"].get(m), datos["latencia_ms"].get(m)) for m in METRICAS_MENOR_ES_MEJOR]
+        pares.append(("throughput_por_s", previo.get("throughput_por_s"), datos.get("throughput_por_s")))
+        for metrica, antes, despues in pares:
+            if not antes or despues is None:
+                continue
+            cambio = (despues - antes) / antes
+            peor = cambio > umbral if metrica in METRICAS_MENOR_ES_MEJOR else cambio < -umbral
+            filas.append({"escenario": nombre, "metrica": metrica, "base": antes, "actual": despues,
+                          "cambio": round(cambio, 4), "regresion": peor})
+    return filas
+
+
+def imprimir_comparacion(filas: List[Dict[str, Any]]):
+    _log(f"{'Escenario':<16} {'Métrica':<18} {'Base':>10} {'Actual':>10} {'Cambio':>9}")
+    _log("-" * 67)
+    for f in filas:
+        marca = "  ⚠️" if f["regresion"] else ""
+        _log(f"{f['escenario']:<16} {f['metrica']:<18} {f['base']:>10.2f} {f['actual']:>10.2f} "
+             f"{f['cambio'] * 100:>+8.1f}%{marca}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--escenarios", nargs="+", choices=ESCENARIOS, default=list(ESCENARIOS))
+    parser.add_argument("--iteraciones", type=int, default=20)
+    parser.add_argument("--concurrencia", type=int, default=1)
+    parser.add_argument("--calentamiento", type=int, default=1, help="iteraciones previas que no se miden")
+    parser.add_argument("--latencia-llm-ms", type=float, default=50)
+    parser.add_argument("--jitter-llm-ms", type=float, default=20)
+    parser.add_argument("--ms-por-token", type=float, default=0.5, help="latencia por token de salida del LLM")
+    parser.add_argument("--tokens-min", type=int, default=200)
+    parser.add_argument("--tokens-max", type=int, default=400)
+    parser.add_argument("--latencia-embeddings-ms", type=float, default=15)
+    parser.add_argument("--jitter-embeddings-ms", type=float, default=5)
+    parser.add_argument("--decision", choices=("aprobar", "ajustes", "rechazar"), default="aprobar",
+                        help="recomendación que devuelven los LLM falsos")
+    parser.add_argument("--semilla", type=int, default=47)
+    parser.add_argument("--lineas-documento", type=int, default=600, help="tamaño del documento de biblioteca")
+    parser.add_argument("--defense-file-id", help="exportar este Defense File de Postgres en lugar de uno sintético")
+    parser.add_argument("--salida", help="archivo JSON (por omisión, stdout)")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    parser.add_argument("--umbral", type=float, default=0.10, help="empeoramiento tolerado (0.10 = 10%%)")
+    argumentos = parser.parse_args(argv)
+
+    # Los servicios avisan al importarse de integraciones sin configurar, y
+    # algunos imprimen progreso: stdout queda solo para el JSON
+    logging.disable(logging.CRITICAL)
+    with contextlib.redirect_stdout(sys.stderr):
+        reporte = asyncio.run(correr(argumentos))
+
+    texto = json.dumps(reporte, ensure_ascii=False, indent=2)
+    if argumentos.salida:
+        with open(argumentos.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+    else:
+        print(texto)
+
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding="utf-8") as archivo:
+            filas = comparar(json.load(archivo), reporte, argumentos.umbral)
+        imprimir_comparacion(filas)
+        if any(f["regresion"] for f in filas):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -64,6 +64,10 @@ if missing_keys:
 # ============================================================
 @contextlib.asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Métricas combinadas entre workers (METRICS_DIR)
+    from services.metrics_registry import iniciar_agregador
+    iniciar_agregador()
+
     # Startup: Initialize PostgreSQL Pool
     try:
         logger.info("🔌 Connecting to PostgreSQL...")
@@ -72,6 +76,14 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"❌ PostgreSQL Connection Failed: {e}")
     
+    # Warm the devil's advocate cache (open huellas, profiles, lessons, counters)
+    try:
+        from services.devils_advocate_service import get_devils_advocate_service
+        if await get_devils_advocate_service().precargar():
+            logger.info("✅ Abogado del Diablo: agregados precargados desde PostgreSQL")
+    except Exception as e:
+        logger.warning(f"Could not preload devil's advocate aggregates: {e}")
+    
     # Initialize pCloud Folder Structure
     try:
         from services.pcloud_service import pcloud_service
@@ -100,6 +112,34 @@ async def lifespan(app: FastAPI):
     
     yield
     
+    # Flush pending usage and return rate limit leases
+    try:
+        from middleware.rate_limiter import rate_limiter
+        await rate_limiter.close()
+    except Exception as e:
+        logger.warning(f"Error flushing rate limiter usage: {e}")
+    
+    # Flush session activity and release the revocation listener
+    try:
+        from services.unified_auth_service import DatabasePool as AuthDatabasePool
+        await AuthDatabasePool.close()
+    except Exception as e:
+        logger.warning(f"Error closing unified auth pool: {e}")
+    
+    # Close the shared Workers Hub HTTP session
+    try:
+        from services.workers_hub_service import workers_hub_service
+        await workers_hub_service.close()
+    except Exception as e:
+        logger.warning(f"Error closing Workers Hub session: {e}")
+    
+    # Write pending devil's advocate aggregates
+    try:
+        from services.devils_advocate_service import get_devils_advocate_service
+        await get_devils_advocate_service().sincronizar()
+    except Exception as e:
+        logger.warning(f"Error flushing devil's advocate aggregates: {e}")
+    
     # Shutdown: Close Pool
     logger.info("🔌 Closing PostgreSQL Connection...")
     await close_pool()
@@ -483,6 +523,13 @@ except ImportError as e:
     logging.warning(f"3-Way Match routes not available: {e}")
     three_way_match_routes = None
 
+try:
+    from routes import cfdi_routes
+    logging.info("✅ CFDI routes loaded successfully")
+except ImportError as e:
+    logging.warning(f"CFDI routes not available: {e}")
+    cfdi_routes = None
+
 try:
     from routes import legal_validation_routes
     logging.info("✅ Legal Validation routes loaded successfully")
@@ -835,6 +882,10 @@ if three_way_match_routes:
     app.include_router(three_way_match_routes.router, tags=["3-Way Match"])
     logging.info("✅ 3-Way Match routes registered at /api/3way-match")
 
+if cfdi_routes:
+    app.include_router(cfdi_routes.router, tags=["CFDIs"])
+    logging.info("✅ CFDI routes registered at /api/cfdis")
+
 if legal_validation_routes:
     app.include_router(legal_validation_routes.router, tags=["Validación Legal"])
     logging.info("✅ Legal Validation routes registered at /api/legal-validation")
@@ -1002,6 +1053,8 @@ async def reset_demo_data_direct(secret_key: str = ""):
 # Include the router in the main app - api_router MUST be included first
 # to ensure /api/projects/folios is matched before dashboard's /projects/{project_id}
 app.include_router(api_router)
+# Prometheus hace scrape de /metrics en la raíz (exento del TenantMiddleware)
+app.include_router(metrics.prometheus_router)
 app.include_router(dashboard.router)
 app.include_router(dashboard.dashboard_router)
 
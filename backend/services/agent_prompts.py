@@ -15,6 +15,8 @@ from enum import Enum
 import json
 import re
 
+from services.prompt_assembler import PromptBlock, prompt_assembler
+
 
 class ResponseFormat(Enum):
     """
@@ -1773,7 +1775,8 @@ def build_full_prompt(
             - analisis_a8: Análisis del A8_REDTEAM
     
     Returns:
-        Optional[str]: El prompt completamente construido, o None si el agente no existe
+        Optional[str]: El prompt completamente construido (AssembledPrompt, con el
+            prefijo estático separado del contexto), o None si el agente no existe
     
     Ejemplo:
         >>> context = {
@@ -1814,17 +1817,23 @@ def build_full_prompt(
     # Construir el prompt contextualizado
     contextualized_prompt = agent_prompt.context_template.format(**merged_vars)
     
-    # Retornar el sistema prompt + contexto
-    full_prompt = f"""{agent_prompt.system}
-
-CONTEXTO DEL ANÁLISIS:
-{contextualized_prompt}
+    # Sistema + formato de salida forman el prefijo fijo del agente (cacheable
+    # por el proveedor); el contexto del análisis va al final
+    return prompt_assembler.assemble(
+        [
+            PromptBlock(agent_prompt.system),
+            PromptBlock(f"""
 
 FORMATO ESPERADO DE SALIDA:
 {agent_prompt.output_format}
-"""
-    
-    return full_prompt
+""", cache_breakpoint=True),
+        ],
+        volatile=f"""
+CONTEXTO DEL ANÁLISIS:
+{contextualized_prompt}
+""",
+        label=agent_id,
+    )
 
 
 def list_available_agents() -> List[str]:
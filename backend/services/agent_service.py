@@ -1,6 +1,8 @@
 import os
 import asyncio
 import re
+import json
+import hashlib
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timezone
 from dotenv import load_dotenv
@@ -31,6 +33,18 @@ except ImportError:
     RateLimitExceeded = Exception
     logger.warning("Rate limiter not available")
 
+# Semantic answer cache for repeated agent questions
+try:
+    from services.semantic_cache import (
+        SEMANTIC_CACHE_ENABLED,
+        semantic_answer_cache,
+        document_ids_from_metadatas,
+    )
+except ImportError:
+    SEMANTIC_CACHE_ENABLED = False
+    semantic_answer_cache = None
+    logger.warning("semantic_cache not available")
+
 # OpenAI client setup (replaces Anthropic)
 try:
     from services.openai_provider import (
@@ -95,6 +109,23 @@ except Exception:
         return answer_text
 # --- FIN: imports nuevos ---
 
+
+def _es_respuesta_cacheable(response: str) -> bool:
+    """
+    Sólo se cachean respuestas reales del modelo: no el JSON de error que
+    regresa chat_completion cuando falla el proveedor ni los textos de
+    modo demo o de error, que se repetirían a toda pregunta parecida.
+    """
+    texto = (response or "").strip()
+    if not texto or texto.startswith(("[Demo Mode]", "[ERROR")):
+        return False
+    if texto.startswith("{"):
+        try:
+            return "error" not in json.loads(texto)
+        except (ValueError, TypeError):
+            return True
+    return True
+
 # Configuración de agentes predefinidos
 AGENT_CONFIGURATIONS = {
     "A1_SPONSOR": {
@@ -804,6 +835,20 @@ class AgentService:
         """Solicitar análisis a un agente específico con reintentos automáticos, RAG y rate limiting"""
         last_error = None
         
+        # Caché semántico: misma empresa, agente y contexto con una pregunta casi idéntica
+        cache_scope = query_embedding = None
+        if SEMANTIC_CACHE_ENABLED and semantic_answer_cache is not None:
+            context_hash = hashlib.sha1(context.encode('utf-8')).hexdigest()[:16]
+            cache_scope = semantic_answer_cache.scope(
+                empresa_id, agent_id, "analyze", context_hash, str(use_drive_knowledge)
+            )
+        if cache_scope is not None:
+            query_embedding = await asyncio.to_thread(semantic_answer_cache.embed, query)
+            cached = semantic_answer_cache.lookup(cache_scope, query_embedding, source="agent_analyze")
+            if cached is not None:
+                logger.info(f"Agent {agent_id}: respuesta servida desde caché semántico")
+                return cached
+        
         # Rate limiting check (estimated tokens)
         estimated_tokens = (len(context) + len(query)) // 4 + 2000  # Rough estimate
         
@@ -834,6 +879,12 @@ class AgentService:
                     from services.answer_guard import enforce_citations_and_confidence
                     response = enforce_citations_and_confidence(response, rag_hits_data, min_conf=0.70)
                 
+                if cache_scope is not None and _es_respuesta_cacheable(response):
+                    cited = (rag_hits_data or {}).get("metadatas") or [[]]
+                    semantic_answer_cache.store(
+                        cache_scope, query_embedding, response, document_ids_from_metadatas(cited[0])
+                    )
+                
                 logger.info(f"Agent {agent_id} analyzed successfully (attempt {attempt + 1})")
                 return response
                 
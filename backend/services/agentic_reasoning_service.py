@@ -15,6 +15,8 @@ except ImportError:
     logger.warning("OpenAI provider not available for AgenticReasoningService")
 
 from config.agents_config import AGENT_CONFIGURATIONS
+from services.metrics_registry import span
+from services.prompt_assembler import PromptBlock, prompt_assembler
 from services.query_router import route_query
 from agents.pmo_integration import validate_pmo_response_sync
 
@@ -46,21 +48,7 @@ COMPLIANCE_PILLARS = {
 }
 
 
-class AgenticReasoningService:
-    def __init__(self):
-        self.client = openai_client
-        self.model = "gpt-4o"
-
-        if OPENAI_AVAILABLE:
-            logger.info("✅ AgenticReasoningService initialized with OpenAI")
-        else:
-            logger.warning("OpenAI not configured - agentic reasoning will be limited")
-    
-    def get_agent_system_prompt(self, agent_id: str, include_rag_context: bool = True) -> str:
-        agent_config = AGENT_CONFIGURATIONS.get(agent_id, {})
-        base_prompt = agent_config.get("system_prompt", "")
-        
-        enhanced_prompt = f"""{base_prompt}
+MARCO_EVALUACION_PROMPT = """
 
 CONTEXTO DE GRUPO FORTEZZA:
 Revisar.ia es una empresa constructora e inmobiliaria líder en Nuevo León, México.
@@ -82,8 +70,29 @@ Incluye siempre:
 - Recomendación clara (APROBAR / SOLICITAR AJUSTES / RECHAZAR)
 - Justificación de tu decisión
 """
-        return enhanced_prompt
+
+
+class AgenticReasoningService:
+    def __init__(self):
+        self.client = openai_client
+        self.model = "gpt-4o"
+
+        if OPENAI_AVAILABLE:
+            logger.info("✅ AgenticReasoningService initialized with OpenAI")
+        else:
+            logger.warning("OpenAI not configured - agentic reasoning will be limited")
+    
+    def get_agent_system_prompt(self, agent_id: str, include_rag_context: bool = True) -> str:
+        agent_config = AGENT_CONFIGURATIONS.get(agent_id, {})
+        base_prompt = agent_config.get("system_prompt", "")
+        
+        # Prompt 100% estático por agente: se memoiza y es un prefijo cacheable
+        return prompt_assembler.assemble(
+            [base_prompt, PromptBlock(MARCO_EVALUACION_PROMPT, cache_breakpoint=True)],
+            label=agent_id
+        )
     
+    @span("agent_call", tipo="analisis")
     def reason_about_project(
         self,
         agent_id: str,
@@ -182,7 +191,8 @@ Evalúa los 4 pilares de cumplimiento SAT y proporciona tu recomendación fundam
                 "adjustments": adjustments,
                 "compliance_pillars": pillars_evaluation,
                 "model_used": self.model,
-                "tokens_used": (response.usage.input_tokens + response.usage.output_tokens) if response.usage else 0,
+                # chat_completion_sync solo regresa el texto; el uso no está disponible aquí
+                "tokens_used": 0,
                 "timestamp": datetime.utcnow().isoformat()
             }
             
@@ -424,6 +434,7 @@ Revisar.ia
 """
         return message
     
+    @span("agent_call", tipo="consolidacion_pmo")
     def generate_pmo_consolidation(
         self,
         project_data: Dict[str, Any],
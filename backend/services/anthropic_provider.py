@@ -1,9 +1,16 @@
 """
 Anthropic Provider - Claude API for document analysis and AI services
+
+system_message accepts a plain string or an AssembledPrompt from
+services.prompt_assembler; the latter is sent as system blocks with
+cache_control breakpoints so Anthropic reuses the static prefix.
 """
 import os
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
+
+from services.metrics_registry import span
+from services.prompt_assembler import AssembledPrompt, prompt_assembler
 
 logger = logging.getLogger(__name__)
 
@@ -45,9 +52,10 @@ def _get_client():
     return _anthropic_client
 
 
+@span("llm_call", proveedor="anthropic")
 def chat_completion_sync(
     messages: List[Dict[str, str]],
-    system_message: Optional[str] = None,
+    system_message: Optional[Union[str, AssembledPrompt]] = None,
     model: str = DEFAULT_MODEL,
     max_tokens: int = 2000,
     temperature: float = 0.7
@@ -73,11 +81,18 @@ def chat_completion_sync(
             "messages": formatted_messages
         }
 
-        if system_message:
+        if isinstance(system_message, AssembledPrompt):
+            system_blocks = system_message.anthropic_system()
+            if system_blocks:
+                kwargs["system"] = system_blocks
+        elif system_message:
             kwargs["system"] = system_message
 
         response = client.messages.create(**kwargs)
 
+        if isinstance(system_message, AssembledPrompt):
+            prompt_assembler.record_usage(system_message, getattr(response, "usage", None))
+
         if response.content and len(response.content) > 0:
             return response.content[0].text
         return ""
@@ -89,7 +104,7 @@ def chat_completion_sync(
 
 async def chat_completion(
     messages: List[Dict[str, str]],
-    system_message: Optional[str] = None,
+    system_message: Optional[Union[str, AssembledPrompt]] = None,
     model: str = DEFAULT_MODEL,
     max_tokens: int = 2000,
     temperature: float = 0.7
@@ -8,6 +8,10 @@ duplicación de código y asegurar consistencia en toda la aplicación.
 USO:
     from services.auth_service import get_secret_key, verify_token, get_current_user
 
+El JWT se decodifica una sola vez por request: el payload (o el error) queda
+en request.state y lo reutilizan el middleware de tenant y las dependencias
+(get_token_payload, get_current_user, ...).
+
 IMPORTANTE:
     - SECRET_KEY DEBE estar configurado en variables de entorno
     - NO usar fallbacks en producción
@@ -18,7 +22,7 @@ import logging
 from functools import lru_cache
 from typing import Optional, Dict, Any
 
-from fastapi import HTTPException, Depends, status
+from fastapi import HTTPException, Depends, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 
@@ -77,12 +81,42 @@ def get_secret_key() -> str:
     return secret
 
 
-def verify_token(token: str) -> Dict[str, Any]:
+def decode_request_token(token: str, request: Optional[Request] = None) -> Dict[str, Any]:
+    """
+    Decodifica un JWT una sola vez por request.
+
+    El resultado (payload o JWTError) se guarda en request.state, de modo que
+    el middleware y las dependencias de la misma request no vuelven a
+    verificar la firma.
+
+    Raises:
+        JWTError: Si el token es inválido o expirado
+    """
+    state = request.state if request is not None else None
+    cached = getattr(state, "jwt_decoded", None) if state is not None else None
+    if cached is not None and cached[0] == token:
+        if isinstance(cached[1], JWTError):
+            raise cached[1]
+        return cached[1]
+
+    try:
+        result = jwt.decode(token, get_secret_key(), algorithms=["HS256"])
+    except JWTError as e:
+        result = e
+    if state is not None:
+        state.jwt_decoded = (token, result)
+    if isinstance(result, JWTError):
+        raise result
+    return result
+
+
+def verify_token(token: str, request: Optional[Request] = None) -> Dict[str, Any]:
     """
     Verifica y decodifica un token JWT.
 
     Args:
         token: El token JWT a verificar
+        request: Request actual, para reutilizar la decodificación
 
     Returns:
         Dict con el payload del token
@@ -91,9 +125,7 @@ def verify_token(token: str) -> Dict[str, Any]:
         HTTPException: Si el token es inválido o expirado
     """
     try:
-        secret = get_secret_key()
-        payload = jwt.decode(token, secret, algorithms=["HS256"])
-        return payload
+        return decode_request_token(token, request)
     except JWTError as e:
         logger.warning(f"JWT verification failed: {str(e)}")
         raise HTTPException(
@@ -103,7 +135,25 @@ def verify_token(token: str) -> Dict[str, Any]:
         )
 
 
+def get_token_payload(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+) -> Optional[Dict[str, Any]]:
+    """
+    Dependency compartida: payload del JWT de la request, o None si no hay
+    token o no es válido. Decodifica una sola vez por request.
+    """
+    if not credentials:
+        return None
+
+    try:
+        return decode_request_token(credentials.credentials, request)
+    except JWTError:
+        return None
+
+
 def get_current_user(
+    request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ) -> Dict[str, Any]:
     """
@@ -130,10 +180,11 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    return verify_token(credentials.credentials)
+    return verify_token(credentials.credentials, request)
 
 
 def get_current_user_optional(
+    request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ) -> Optional[Dict[str, Any]]:
     """
@@ -145,12 +196,13 @@ def get_current_user_optional(
         return None
 
     try:
-        return verify_token(credentials.credentials)
+        return verify_token(credentials.credentials, request)
     except HTTPException:
         return None
 
 
 def get_empresa_id_from_token(
+    request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ) -> Optional[str]:
     """
@@ -160,7 +212,7 @@ def get_empresa_id_from_token(
         return None
 
     try:
-        payload = verify_token(credentials.credentials)
+        payload = verify_token(credentials.credentials, request)
         return payload.get("empresa_id")
     except HTTPException:
         return None
@@ -1,109 +1,318 @@
 """
 Servicio de Cache con Redis.
 Optimiza consultas frecuentes y reduce carga en la base de datos.
+
+- Cliente asíncrono (redis.asyncio): ninguna consulta bloquea el event loop
+- Espacios de nombres por empresa con número de generación: invalidar una
+  empresa es un INCR O(1); las keys de generaciones anteriores expiran por TTL
+- Nivel L1 en proceso (LRU con TTL corto) delante de Redis; guarda el
+  valor ya serializado y decodificado, así ambos niveles devuelven el
+  mismo tipo (str en lugar de datetime, list en lugar de tuple)
+- Coalescencia de misses (single-flight): peticiones concurrentes por la
+  misma key esperan una única ejecución de la función
+- Serialización compacta con orjson (json como respaldo)
+
+Configuración por variables de entorno:
+- REDIS_URL (sin ella solo se usa el nivel L1)
+- CACHE_L1_MAX_ENTRIES (default 1024)
+- CACHE_L1_TTL_SECONDS (default 30)
+- CACHE_GENERATION_TTL_SECONDS (default 2): cada cuánto se relee de Redis la
+  generación de una empresa, es decir, el retraso máximo con que otro proceso
+  ve una invalidación
 """
-import redis
-import json
 import os
-from typing import Optional, Any
-from functools import wraps
+import time
+import asyncio
 import hashlib
+import inspect
+import logging
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    import orjson
+
+    def _dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=str, option=orjson.OPT_SORT_KEYS)
+
+    _loads = orjson.loads
+except ImportError:
+    import json
+
+    def _dumps(value: Any) -> bytes:
+        return json.dumps(value, sort_keys=True, default=str, separators=(",", ":")).encode()
+
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
 
 REDIS_URL = os.getenv("REDIS_URL")
+L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", "1024"))
+L1_TTL_SECONDS = float(os.getenv("CACHE_L1_TTL_SECONDS", "30"))
+GENERATION_TTL_SECONDS = float(os.getenv("CACHE_GENERATION_TTL_SECONDS", "2"))
+
+KEY_PREFIX = "revisar"
+GLOBAL_SCOPE = "global"
+_MISSING = object()
+
+
+class L1Cache:
+    """Cache LRU en proceso con expiración por entrada."""
+
+    def __init__(self, max_entries: int = L1_MAX_ENTRIES, ttl: float = L1_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> int:
+        keys = [k for k in self._entries if k.startswith(prefix)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
 
 class CacheService:
-    """Servicio de cache con Redis para optimizar consultas frecuentes."""
-    
-    def __init__(self):
-        if REDIS_URL:
+    """Servicio de cache con Redis (asíncrono) + L1 en proceso."""
+
+    def __init__(self, redis_url: Optional[str] = REDIS_URL, client: Any = None, l1: Optional[L1Cache] = None):
+        self.redis_url = redis_url
+        self._client = client
+        self.enabled = client is not None or bool(redis_url)
+        self.l1 = l1 if l1 is not None else L1Cache()
+        self._generations: Dict[str, Tuple[float, int]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"l1_hits": 0, "redis_hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+        if not self.enabled:
+            logger.info("⚠️ REDIS_URL no configurada - cache solo en proceso (L1)")
+
+    @property
+    def client(self):
+        """Cliente redis.asyncio (se crea en el primer uso)."""
+        if self._client is None and self.enabled:
             try:
-                self.client = redis.from_url(REDIS_URL, decode_responses=True)
-                self.client.ping()
-                self.enabled = True
-                print("✅ Redis cache conectado")
+                import redis.asyncio as aioredis
+                self._client = aioredis.from_url(self.redis_url, decode_responses=False)
             except Exception as e:
-                self.client = None
                 self.enabled = False
-                print(f"⚠️ Redis no disponible: {e}")
-        else:
-            self.client = None
-            self.enabled = False
-            print("⚠️ REDIS_URL no configurada - cache deshabilitado")
-    
+                logger.warning(f"⚠️ Redis no disponible: {e}")
+        return self._client
+
+    def _error(self, operation: str, error: Exception):
+        self.stats["errors"] += 1
+        logger.warning(f"Cache {operation} error: {error}")
+
+    @staticmethod
+    def _generation_key(scope: str) -> str:
+        return f"{KEY_PREFIX}:gen:{scope}"
+
+    async def _generation(self, scope: str) -> int:
+        """Generación vigente del espacio de nombres (cacheada brevemente en proceso)."""
+        cached = self._generations.get(scope)
+        if cached and time.monotonic() - cached[0] < GENERATION_TTL_SECONDS:
+            return cached[1]
+        generation = cached[1] if cached else 0
+        if self.enabled and self.client is not None:
+            try:
+                raw = await self.client.get(self._generation_key(scope))
+                generation = int(raw) if raw else 0
+            except Exception as e:
+                self._error("generation", e)
+        self._generations[scope] = (time.monotonic(), generation)
+        return generation
+
     def _make_key(self, prefix: str, *args, **kwargs) -> str:
-        """Genera una key única basada en los argumentos."""
-        key_data = json.dumps({"args": args, "kwargs": kwargs}, sort_keys=True, default=str)
-        hash_val = hashlib.md5(key_data.encode()).hexdigest()[:12]
-        return f"revisar:{prefix}:{hash_val}"
-    
-    def get(self, key: str) -> Optional[Any]:
-        """Obtiene un valor del cache."""
-        if not self.enabled:
-            return None
-        try:
-            value = self.client.get(key)
-            return json.loads(value) if value else None
-        except Exception as e:
-            print(f"Cache get error: {e}")
-            return None
-    
-    def set(self, key: str, value: Any, ttl: int = 300) -> bool:
+        """Parte estable de la key: hash de los argumentos."""
+        key_data = _dumps({"args": args, "kwargs": kwargs})
+        hash_val = hashlib.blake2b(key_data, digest_size=10).hexdigest()
+        return f"{prefix}:{hash_val}"
+
+    async def scoped_key(self, prefix: str, empresa_id: Optional[str], *args, **kwargs) -> str:
+        """Key completa dentro del espacio de nombres (empresa + generación)."""
+        scope = str(empresa_id) if empresa_id else GLOBAL_SCOPE
+        generation = await self._generation(scope)
+        return f"{KEY_PREFIX}:{scope}:g{generation}:{self._make_key(prefix, *args, **kwargs)}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Obtiene un valor del cache (L1 y luego Redis)."""
+        value = self.l1.get(key)
+        if value is not _MISSING:
+            self.stats["l1_hits"] += 1
+            return value
+        if self.enabled and self.client is not None:
+            try:
+                raw = await self.client.get(key)
+                if raw is not None:
+                    value = _loads(raw)
+                    self.l1.set(key, value)
+                    self.stats["redis_hits"] += 1
+                    return value
+            except Exception as e:
+                self._error("get", e)
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any, ttl: int = 300) -> bool:
         """Guarda un valor en cache con TTL en segundos (default 5 min)."""
-        if not self.enabled:
-            return False
+        _, stored = await self._store(key, value, ttl)
+        return stored
+
+    async def _store(self, key: str, value: Any, ttl: int) -> Tuple[Any, bool]:
+        """
+        Guarda en L1 y Redis. Devuelve (valor tal como lo leerá un hit,
+        si quedó en Redis); un valor no serializable no se cachea.
+        """
         try:
-            self.client.setex(key, ttl, json.dumps(value, default=str))
-            return True
+            raw = _dumps(value)
+        except (TypeError, ValueError) as e:
+            self._error("set", e)
+            return value, False
+        value = _loads(raw)
+        self.l1.set(key, value, ttl)
+        if not self.enabled or self.client is None:
+            return value, False
+        try:
+            await self.client.set(key, raw, ex=ttl)
+            return value, True
         except Exception as e:
-            print(f"Cache set error: {e}")
-            return False
-    
-    def delete(self, key: str) -> bool:
+            self._error("set", e)
+            return value, False
+
+    async def delete(self, key: str) -> bool:
         """Elimina una key del cache."""
-        if not self.enabled:
+        self.l1.delete(key)
+        if not self.enabled or self.client is None:
             return False
         try:
-            self.client.delete(key)
+            await self.client.delete(key)
             return True
         except Exception as e:
-            print(f"Cache delete error: {e}")
+            self._error("delete", e)
             return False
-    
-    def delete_pattern(self, pattern: str) -> int:
-        """Elimina todas las keys que coincidan con el patrón."""
-        if not self.enabled:
-            return 0
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int = 300) -> Any:
+        """
+        Valor de la key o resultado de loader() si no existe. Las peticiones
+        concurrentes por la misma key comparten una sola ejecución del loader.
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # Se canceló la petición que cargaba el valor, no esta
+                return await self.get_or_load(key, loader, ttl)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
         try:
-            keys = self.client.keys(f"revisar:{pattern}*")
-            if keys:
-                return self.client.delete(*keys)
+            value = await loader()
+            if value is not None:
+                value, _ = await self._store(key, value, ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Evita "Future exception was never retrieved" si nadie más esperaba
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def delete_pattern(self, pattern: str) -> int:
+        """
+        Elimina todas las keys que coincidan con el patrón. Usa SCAN + UNLINK
+        por lotes; para invalidar una empresa usar invalidate_empresa (O(1)).
+        """
+        self.l1.delete_prefix(f"{KEY_PREFIX}:{pattern.split('*', 1)[0]}")
+        if not self.enabled or self.client is None:
             return 0
+        deleted = 0
+        batch = []
+        try:
+            async for key in self.client.scan_iter(match=f"{KEY_PREFIX}:{pattern}*", count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    deleted += await self.client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += await self.client.unlink(*batch)
         except Exception as e:
-            print(f"Cache delete_pattern error: {e}")
-            return 0
-    
-    def invalidate_empresa(self, empresa_id: str) -> int:
-        """Invalida todo el cache de una empresa específica."""
-        return self.delete_pattern(f"*:{empresa_id}:*")
-    
-    def get_stats(self) -> dict:
+            self._error("delete_pattern", e)
+        return deleted
+
+    async def invalidate_empresa(self, empresa_id: str) -> int:
+        """
+        Invalida todo el cache de una empresa incrementando su generación.
+        Devuelve la nueva generación.
+        """
+        scope = str(empresa_id)
+        generation = (self._generations.get(scope) or (0, 0))[1] + 1
+        if self.enabled and self.client is not None:
+            try:
+                generation = int(await self.client.incr(self._generation_key(scope)))
+            except Exception as e:
+                self._error("invalidate_empresa", e)
+        self._generations[scope] = (time.monotonic(), generation)
+        self.l1.delete_prefix(f"{KEY_PREFIX}:{scope}:")
+        return generation
+
+    async def get_stats(self) -> dict:
         """Obtiene estadísticas del cache."""
-        if not self.enabled:
-            return {"enabled": False}
+        stats = {"enabled": self.enabled, "l1_entries": len(self.l1), **self.stats}
+        if not self.enabled or self.client is None:
+            return stats
         try:
-            info = self.client.info("stats")
-            return {
-                "enabled": True,
-                "hits": info.get("keyspace_hits", 0),
-                "misses": info.get("keyspace_misses", 0),
-                "keys": self.client.dbsize()
-            }
+            info = await self.client.info("stats")
+            stats.update({
+                "redis_keyspace_hits": info.get("keyspace_hits", 0),
+                "redis_keyspace_misses": info.get("keyspace_misses", 0),
+                "keys": await self.client.dbsize()
+            })
         except Exception as e:
-            return {"enabled": True, "error": str(e)}
+            stats["error"] = str(e)
+        return stats
 
 
 _cache_service: Optional[CacheService] = None
 
+
 def get_cache() -> CacheService:
     """Obtiene la instancia singleton del servicio de cache."""
     global _cache_service
@@ -112,48 +321,72 @@ def get_cache() -> CacheService:
     return _cache_service
 
 
-def cached(prefix: str, ttl: int = 300):
+def _key_arguments(func: Callable, empresa_arg: str):
+    """
+    Devuelve una función (args, kwargs) -> (empresa_id, argumentos para la key)
+    que omite self/cls y toma la empresa del parámetro indicado.
+    """
+    signature = inspect.signature(func)
+
+    def extract(args, kwargs):
+        try:
+            bound = signature.bind(*args, **kwargs)
+        except TypeError:
+            return None, {"args": args, "kwargs": kwargs}
+        bound.apply_defaults()
+        arguments = {k: v for k, v in bound.arguments.items() if k not in ("self", "cls")}
+        return arguments.get(empresa_arg), arguments
+
+    return extract
+
+
+def cached(prefix: str, ttl: int = 300, empresa_arg: str = "empresa_id"):
     """
     Decorator para cachear resultados de funciones async.
-    
+    La key queda en el espacio de nombres de la empresa recibida en el
+    parámetro `empresa_arg`, de modo que invalidate_empresa la descarta.
+
     Uso:
         @cached("search_results", ttl=600)
         async def search_documents(query: str, empresa_id: str):
             ...
     """
     def decorator(func):
+        extract = _key_arguments(func, empresa_arg)
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
             cache = get_cache()
-            cache_args = args[1:] if args and hasattr(args[0], '__class__') else args
-            key = cache._make_key(prefix, *cache_args, **kwargs)
-            
-            cached_value = cache.get(key)
-            if cached_value is not None:
-                return cached_value
-            
-            result = await func(*args, **kwargs)
-            cache.set(key, result, ttl)
-            return result
+            empresa_id, arguments = extract(args, kwargs)
+            key = await cache.scoped_key(prefix, empresa_id, arguments)
+            return await cache.get_or_load(key, lambda: func(*args, **kwargs), ttl)
         return wrapper
     return decorator
 
 
-def cached_sync(prefix: str, ttl: int = 300):
-    """Decorator para cachear resultados de funciones síncronas."""
+def cached_sync(prefix: str, ttl: int = 300, empresa_arg: str = "empresa_id"):
+    """
+    Decorator para cachear resultados de funciones síncronas.
+    Solo usa el nivel L1 en proceso: el cliente Redis es asíncrono.
+    """
     def decorator(func):
+        extract = _key_arguments(func, empresa_arg)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             cache = get_cache()
-            cache_args = args[1:] if args and hasattr(args[0], '__class__') else args
-            key = cache._make_key(prefix, *cache_args, **kwargs)
-            
-            cached_value = cache.get(key)
-            if cached_value is not None:
+            empresa_id, arguments = extract(args, kwargs)
+            scope = str(empresa_id) if empresa_id else GLOBAL_SCOPE
+            generation = (cache._generations.get(scope) or (0, 0))[1]
+            key = f"{KEY_PREFIX}:{scope}:g{generation}:{cache._make_key(prefix, arguments)}"
+
+            cached_value = cache.l1.get(key)
+            if cached_value is not _MISSING:
                 return cached_value
-            
+
             result = func(*args, **kwargs)
-            cache.set(key, result, ttl)
+            if result is not None:
+                cache.l1.set(key, result, ttl)
             return result
         return wrapper
     return decorator
@@ -0,0 +1,339 @@
+"""
+cfdi_parser.py - Parser streaming de CFDI 3.3/4.0 REVISAR.IA
+
+Extrae emisor, receptor, conceptos, impuestos y Timbre Fiscal Digital
+de XMLs de CFDI usando iterparse (memoria acotada: cada nodo se libera
+al cerrarse) y procesa archivos ZIP con miles de XMLs en un pool de
+procesos, entregando los registros conforme se terminan los lotes.
+
+Los registros son planos (una fila por CFDI, conceptos anidados) para
+alimentar el índice de CFDIs (services/cfdi_store_service.py), la
+verificación 69-B y la conciliación masiva 3-way match.
+
+Los XML y ZIP llegan de usuarios: el XML se parsea con defusedxml (sin
+DTD/entidades externas) y los miembros del ZIP se validan antes de
+extraerlos.
+
+Variables de entorno:
+- CFDI_ZIP_MAX_MIEMBROS: máximo de XMLs por ZIP (default 200000)
+- CFDI_XML_MAX_BYTES: tamaño descomprimido máximo por XML (default 10 MB)
+- CFDI_ZIP_MAX_RATIO: razón de compresión máxima por miembro (default 100)
+
+Fecha: 2026-10-18
+"""
+
+import io
+import logging
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from decimal import Decimal, InvalidOperation
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Union
+from xml.etree.ElementTree import ParseError
+
+from defusedxml import DefusedXmlException
+from defusedxml.ElementTree import iterparse
+
+logger = logging.getLogger(__name__)
+
+VERSIONES_SOPORTADAS = ("3.3", "4.0")
+
+# Clave SAT de impuesto (c_Impuesto)
+IMPUESTO_ISR = "001"
+IMPUESTO_IVA = "002"
+IMPUESTO_IEPS = "003"
+
+# Límites de ZIPs subidos por usuarios (bombas de descompresión)
+CFDI_ZIP_MAX_MIEMBROS = int(os.environ.get("CFDI_ZIP_MAX_MIEMBROS", "200000"))
+CFDI_XML_MAX_BYTES = int(os.environ.get("CFDI_XML_MAX_BYTES", str(10 * 1024 * 1024)))
+CFDI_ZIP_MAX_RATIO = float(os.environ.get("CFDI_ZIP_MAX_RATIO", "100"))
+
+
+class CFDIParseError(ValueError):
+    """El XML no es un CFDI 3.3/4.0 válido."""
+
+
+def _local(tag: str) -> str:
+    """Nombre local de un tag con namespace ('{ns}Comprobante' -> 'Comprobante')."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _decimal(valor: Optional[str]) -> Optional[Decimal]:
+    if valor is None or valor == "":
+        return None
+    try:
+        return Decimal(valor)
+    except InvalidOperation:
+        return None
+
+
+def _sumar(actual: Optional[Decimal], valor: Optional[Decimal]) -> Optional[Decimal]:
+    if valor is None:
+        return actual
+    return valor if actual is None else actual + valor
+
+
+def parsear_cfdi(fuente: Union[str, bytes, BinaryIO], archivo: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Parsea un CFDI en streaming.
+
+    Args:
+        fuente: Ruta, bytes o archivo binario con el XML
+        archivo: Nombre de origen para trazabilidad (p. ej. miembro del ZIP)
+
+    Returns:
+        Dict plano con los datos del comprobante, `conceptos` como lista
+
+    Raises:
+        CFDIParseError: XML mal formado, sin Comprobante o de versión no soportada
+    """
+    if isinstance(fuente, (bytes, bytearray)):
+        fuente = io.BytesIO(fuente)
+
+    registro: Dict[str, Any] = {
+        "uuid": None,
+        "version": None,
+        "serie": None,
+        "folio": None,
+        "fecha": None,
+        "periodo": None,
+        "subtotal": None,
+        "descuento": None,
+        "total": None,
+        "moneda": None,
+        "tipo_cambio": None,
+        "tipo_comprobante": None,
+        "metodo_pago": None,
+        "forma_pago": None,
+        "lugar_expedicion": None,
+        "emisor_rfc": None,
+        "emisor_nombre": None,
+        "emisor_regimen": None,
+        "receptor_rfc": None,
+        "receptor_nombre": None,
+        "receptor_uso_cfdi": None,
+        "total_impuestos_trasladados": None,
+        "total_impuestos_retenidos": None,
+        "iva_trasladado": None,
+        "ieps_trasladado": None,
+        "isr_retenido": None,
+        "iva_retenido": None,
+        "fecha_timbrado": None,
+        "rfc_prov_certif": None,
+        "no_certificado_sat": None,
+        "conceptos": [],
+        "archivo": archivo,
+    }
+
+    pila: List[str] = []
+    try:
+        for evento, elem in iterparse(fuente, events=("start", "end")):
+            nombre = _local(elem.tag)
+            if evento == "end":
+                pila.pop()
+                elem.clear()
+                continue
+
+            ruta = pila[:]
+            pila.append(nombre)
+            attrs = elem.attrib
+
+            if not ruta:
+                if nombre != "Comprobante":
+                    raise CFDIParseError(f"Nodo raíz inesperado: {nombre}")
+                version = attrs.get("Version") or attrs.get("version")
+                if version not in VERSIONES_SOPORTADAS:
+                    raise CFDIParseError(f"Versión de CFDI no soportada: {version}")
+                fecha = attrs.get("Fecha")
+                registro.update({
+                    "version": version,
+                    "serie": attrs.get("Serie"),
+                    "folio": attrs.get("Folio"),
+                    "fecha": fecha,
+                    "periodo": fecha[:7] if fecha else None,
+                    "subtotal": _decimal(attrs.get("SubTotal")),
+                    "descuento": _decimal(attrs.get("Descuento")),
+                    "total": _decimal(attrs.get("Total")),
+                    "moneda": attrs.get("Moneda"),
+                    "tipo_cambio": _decimal(attrs.get("TipoCambio")),
+                    "tipo_comprobante": attrs.get("TipoDeComprobante"),
+                    "metodo_pago": attrs.get("MetodoPago"),
+                    "forma_pago": attrs.get("FormaPago"),
+                    "lugar_expedicion": attrs.get("LugarExpedicion"),
+                })
+            elif ruta == ["Comprobante"]:
+                if nombre == "Emisor":
+                    registro["emisor_rfc"] = (attrs.get("Rfc") or "").upper() or None
+                    registro["emisor_nombre"] = attrs.get("Nombre")
+                    registro["emisor_regimen"] = attrs.get("RegimenFiscal")
+                elif nombre == "Receptor":
+                    registro["receptor_rfc"] = (attrs.get("Rfc") or "").upper() or None
+                    registro["receptor_nombre"] = attrs.get("Nombre")
+                    registro["receptor_uso_cfdi"] = attrs.get("UsoCFDI")
+                elif nombre == "Impuestos":
+                    registro["total_impuestos_trasladados"] = _decimal(attrs.get("TotalImpuestosTrasladados"))
+                    registro["total_impuestos_retenidos"] = _decimal(attrs.get("TotalImpuestosRetenidos"))
+            elif ruta == ["Comprobante", "Conceptos"] and nombre == "Concepto":
+                registro["conceptos"].append({
+                    "clave_prod_serv": attrs.get("ClaveProdServ"),
+                    "cantidad": _decimal(attrs.get("Cantidad")),
+                    "clave_unidad": attrs.get("ClaveUnidad"),
+                    "descripcion": attrs.get("Descripcion"),
+                    "valor_unitario": _decimal(attrs.get("ValorUnitario")),
+                    "importe": _decimal(attrs.get("Importe")),
+                    "descuento": _decimal(attrs.get("Descuento")),
+                })
+            elif ruta == ["Comprobante", "Impuestos", "Traslados"] and nombre == "Traslado":
+                importe = _decimal(attrs.get("Importe"))
+                if attrs.get("Impuesto") == IMPUESTO_IVA:
+                    registro["iva_trasladado"] = _sumar(registro["iva_trasladado"], importe)
+                elif attrs.get("Impuesto") == IMPUESTO_IEPS:
+                    registro["ieps_trasladado"] = _sumar(registro["ieps_trasladado"], importe)
+            elif ruta == ["Comprobante", "Impuestos", "Retenciones"] and nombre == "Retencion":
+                importe = _decimal(attrs.get("Importe"))
+                if attrs.get("Impuesto") == IMPUESTO_ISR:
+                    registro["isr_retenido"] = _sumar(registro["isr_retenido"], importe)
+                elif attrs.get("Impuesto") == IMPUESTO_IVA:
+                    registro["iva_retenido"] = _sumar(registro["iva_retenido"], importe)
+            elif nombre == "TimbreFiscalDigital" and ruta == ["Comprobante", "Complemento"]:
+                registro["uuid"] = (attrs.get("UUID") or "").upper() or None
+                registro["fecha_timbrado"] = attrs.get("FechaTimbrado")
+                registro["rfc_prov_certif"] = attrs.get("RfcProvCertif")
+                registro["no_certificado_sat"] = attrs.get("NoCertificadoSAT")
+    except ParseError as e:
+        raise CFDIParseError(f"XML mal formado: {e}") from e
+    except DefusedXmlException as e:
+        raise CFDIParseError(f"XML rechazado (DTD o entidades no permitidas): {e}") from e
+
+    if registro["version"] is None:
+        raise CFDIParseError("El XML no contiene un nodo Comprobante")
+
+    return registro
+
+
+# =============================================================================
+# ARCHIVOS ZIP
+# =============================================================================
+
+def listar_xmls_zip(ruta_zip: str) -> List[str]:
+    """
+    Nombres de los miembros XML de un ZIP (ignora metadatos de macOS).
+
+    Raises:
+        CFDIParseError: El ZIP excede CFDI_ZIP_MAX_MIEMBROS
+    """
+    with zipfile.ZipFile(ruta_zip) as zf:
+        nombres = [
+            info.filename for info in zf.infolist()
+            if not info.is_dir()
+            and info.filename.lower().endswith(".xml")
+            and not info.filename.startswith("__MACOSX/")
+        ]
+    if len(nombres) > CFDI_ZIP_MAX_MIEMBROS:
+        raise CFDIParseError(
+            f"El ZIP contiene {len(nombres)} XMLs; el máximo es {CFDI_ZIP_MAX_MIEMBROS}"
+        )
+    return nombres
+
+
+def _validar_miembro_zip(info: zipfile.ZipInfo) -> None:
+    """Rechaza un miembro antes de extraerlo si excede el tamaño o la razón de compresión."""
+    if info.file_size > CFDI_XML_MAX_BYTES:
+        raise CFDIParseError(
+            f"XML de {info.file_size} bytes descomprimido; el máximo es {CFDI_XML_MAX_BYTES}"
+        )
+    razon = info.file_size / max(info.compress_size, 1)
+    if razon > CFDI_ZIP_MAX_RATIO:
+        raise CFDIParseError(
+            f"Razón de compresión {razon:.0f}:1 excede el máximo de {CFDI_ZIP_MAX_RATIO:.0f}:1"
+        )
+
+
+def _parsear_lote_zip(ruta_zip: str, nombres: List[str]) -> List[Dict[str, Any]]:
+    """
+    Parsea un lote de miembros del ZIP. Se ejecuta en el proceso worker:
+    cada worker abre el ZIP por su cuenta para no serializar el contenido.
+    """
+    resultados: List[Dict[str, Any]] = []
+    with zipfile.ZipFile(ruta_zip) as zf:
+        for nombre in nombres:
+            try:
+                info = zf.getinfo(nombre)
+                _validar_miembro_zip(info)
+                with zf.open(info) as xml:
+                    resultados.append(parsear_cfdi(xml, archivo=nombre))
+            except Exception as e:
+                resultados.append({"archivo": nombre, "error": str(e)})
+    return resultados
+
+
+def iterar_cfdis_zip(
+    ruta_zip: str,
+    max_workers: Optional[int] = None,
+    tamano_lote: int = 250,
+    lotes_en_vuelo: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Parsea todos los XML de un ZIP y entrega un registro por archivo.
+
+    Los archivos que no son CFDI válidos se entregan como
+    {"archivo": ..., "error": ...} en lugar de interrumpir la importación.
+
+    Args:
+        ruta_zip: Ruta del ZIP en disco
+        max_workers: Procesos del pool (0 = parsear en el proceso actual)
+        tamano_lote: XMLs por tarea enviada al pool
+        lotes_en_vuelo: Máximo de lotes pendientes; acota la memoria cuando
+            el consumidor es más lento que el parseo (default 2 × workers)
+    """
+    nombres = listar_xmls_zip(ruta_zip)
+    lotes = [nombres[i:i + tamano_lote] for i in range(0, len(nombres), tamano_lote)]
+    workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+
+    if workers <= 1 or len(lotes) <= 1:
+        for lote in lotes:
+            yield from _parsear_lote_zip(ruta_zip, lote)
+        return
+
+    limite = lotes_en_vuelo or workers * 2
+    pendientes_por_enviar = iter(lotes)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        en_vuelo = set()
+        for lote in pendientes_por_enviar:
+            en_vuelo.add(pool.submit(_parsear_lote_zip, ruta_zip, lote))
+            if len(en_vuelo) >= limite:
+                break
+        while en_vuelo:
+            terminados, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                yield from futuro.result()
+                siguiente = next(pendientes_por_enviar, None)
+                if siguiente is not None:
+                    en_vuelo.add(pool.submit(_parsear_lote_zip, ruta_zip, siguiente))
+
+
+def registros_a_tabla_conciliacion(registros: List[Dict[str, Any]], solo_ingresos: bool = True):
+    """
+    Convierte registros de CFDI al formato de entrada de
+    ConciliacionMasivaService.conciliar (uuid, rfc_emisor, monto, fecha, ...).
+    """
+    import pandas as pd
+
+    filas = []
+    for r in registros:
+        if r.get("error"):
+            continue
+        if solo_ingresos and r.get("tipo_comprobante") not in (None, "I"):
+            continue
+        conceptos = r.get("conceptos") or []
+        filas.append({
+            "uuid": r.get("uuid"),
+            "folio": r.get("folio"),
+            "rfc_emisor": r.get("emisor_rfc"),
+            "rfc_receptor": r.get("receptor_rfc"),
+            "monto": float(r["total"]) if r.get("total") is not None else None,
+            "fecha": r.get("fecha"),
+            "concepto": "; ".join(c["descripcion"] for c in conceptos if c.get("descripcion")),
+            "documento_id": None,
+        })
+    return pd.DataFrame(filas, columns=["uuid", "folio", "rfc_emisor", "rfc_receptor", "monto", "fecha", "concepto", "documento_id"])
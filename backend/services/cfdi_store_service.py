@@ -0,0 +1,254 @@
+"""
+cfdi_store_service.py - Índice de CFDIs REVISAR.IA
+
+Persiste en la tabla cfdi_index (migrations/006_cfdi_index.sql) los CFDIs
+parseados por services/cfdi_parser.py:
+- Importación de ZIPs completos con COPY por lotes (no un INSERT por CFDI)
+- Consultas por RFC, UUID, periodo y concepto
+- Cruce directo con sat_lista_69b y salida en el formato de la
+  conciliación masiva 3-way match
+
+Fecha: 2026-10-18
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, List, Optional
+
+from services.cfdi_parser import iterar_cfdis_zip, registros_a_tabla_conciliacion
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS_INDICE = [
+    "empresa_id", "uuid", "version", "serie", "folio", "fecha", "periodo",
+    "subtotal", "descuento", "total", "moneda", "tipo_cambio", "tipo_comprobante",
+    "metodo_pago", "forma_pago", "lugar_expedicion",
+    "emisor_rfc", "emisor_nombre", "emisor_regimen",
+    "receptor_rfc", "receptor_nombre", "receptor_uso_cfdi",
+    "total_impuestos_trasladados", "total_impuestos_retenidos",
+    "iva_trasladado", "ieps_trasladado", "isr_retenido", "iva_retenido",
+    "fecha_timbrado", "rfc_prov_certif", "no_certificado_sat",
+    "conceptos", "conceptos_texto", "claves_prod_serv", "archivo",
+]
+
+COLUMNAS_RESPUESTA = [
+    "uuid", "version", "serie", "folio", "fecha", "periodo", "subtotal", "total",
+    "moneda", "tipo_comprobante", "metodo_pago", "emisor_rfc", "emisor_nombre",
+    "receptor_rfc", "receptor_nombre", "iva_trasladado", "isr_retenido",
+    "iva_retenido", "fecha_timbrado", "conceptos_texto", "archivo",
+]
+
+
+def _fecha(valor: Optional[str]) -> Optional[datetime]:
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(valor)
+    except ValueError:
+        return None
+
+
+def registro_a_fila(empresa_id: str, registro: Dict[str, Any]) -> tuple:
+    """Convierte un registro del parser en una tupla en el orden de COLUMNAS_INDICE."""
+    conceptos = registro.get("conceptos") or []
+    valores = dict(registro)
+    valores["empresa_id"] = empresa_id
+    valores["fecha"] = _fecha(registro.get("fecha"))
+    valores["fecha_timbrado"] = _fecha(registro.get("fecha_timbrado"))
+    valores["conceptos"] = json.dumps(conceptos, default=str)
+    valores["conceptos_texto"] = " | ".join(c["descripcion"] for c in conceptos if c.get("descripcion"))
+    valores["claves_prod_serv"] = sorted({c["clave_prod_serv"] for c in conceptos if c.get("clave_prod_serv")})
+    return tuple(valores.get(columna) for columna in COLUMNAS_INDICE)
+
+
+class CFDIStoreService:
+    """Índice columnar de CFDIs por empresa."""
+
+    def __init__(self, tamano_lote_db: int = 1000):
+        self.tamano_lote_db = tamano_lote_db
+
+    async def guardar_lote(self, empresa_id: str, registros: List[Dict[str, Any]]) -> int:
+        """
+        Inserta un lote de CFDIs con COPY a una tabla temporal y un solo
+        INSERT ... ON CONFLICT; los UUIDs ya indexados se ignoran.
+
+        Returns:
+            Número de CFDIs nuevos
+        """
+        filas = [registro_a_fila(empresa_id, r) for r in registros if r.get("uuid") and not r.get("error")]
+        if not filas:
+            return 0
+
+        from services.database_pg import get_connection
+
+        columnas = ", ".join(COLUMNAS_INDICE)
+        async with get_connection() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "CREATE TEMP TABLE tmp_cfdi_index (LIKE cfdi_index INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                await conn.copy_records_to_table("tmp_cfdi_index", records=filas, columns=COLUMNAS_INDICE)
+                return await conn.fetchval(f"""
+                    WITH nuevos AS (
+                        INSERT INTO cfdi_index ({columnas})
+                        SELECT {columnas} FROM tmp_cfdi_index
+                        ON CONFLICT (empresa_id, uuid) DO NOTHING
+                        RETURNING 1
+                    )
+                    SELECT COUNT(*) FROM nuevos
+                """)
+
+    async def importar_zip(
+        self,
+        empresa_id: str,
+        ruta_zip: str,
+        max_workers: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Importa un ZIP de XMLs: parsea en un pool de procesos y guarda por
+        lotes de `tamano_lote_db`. El parseo corre fuera del event loop.
+        """
+        registros = iterar_cfdis_zip(ruta_zip, max_workers=max_workers)
+        loop = asyncio.get_running_loop()
+
+        resumen = {"procesados": 0, "nuevos": 0, "duplicados": 0, "errores": []}
+        while True:
+            lote = await loop.run_in_executor(None, lambda: list(islice(registros, self.tamano_lote_db)))
+            if not lote:
+                break
+            validos = [r for r in lote if not r.get("error")]
+            resumen["errores"].extend(
+                {"archivo": r["archivo"], "error": r["error"]} for r in lote if r.get("error")
+            )
+            sin_uuid = [r for r in validos if not r.get("uuid")]
+            resumen["errores"].extend(
+                {"archivo": r.get("archivo"), "error": "CFDI sin Timbre Fiscal Digital"} for r in sin_uuid
+            )
+            nuevos = await self.guardar_lote(empresa_id, validos)
+            resumen["procesados"] += len(lote)
+            resumen["nuevos"] += nuevos
+            resumen["duplicados"] += len(validos) - len(sin_uuid) - nuevos
+
+        logger.info(
+            f"📦 ZIP de CFDIs importado para {empresa_id}: {resumen['nuevos']} nuevos, "
+            f"{resumen['duplicados']} duplicados, {len(resumen['errores'])} errores"
+        )
+        return resumen
+
+    async def buscar(
+        self,
+        empresa_id: str,
+        rfc: Optional[str] = None,
+        uuid: Optional[str] = None,
+        periodo: Optional[str] = None,
+        concepto: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca CFDIs por RFC (emisor o receptor), UUID, periodo (YYYY-MM) y
+        concepto (texto completo o ClaveProdServ).
+        """
+        from services.database_pg import fetch
+
+        condiciones = ["empresa_id = $1"]
+        params: List[Any] = [empresa_id]
+
+        def agregar(condicion: str, valor: Any):
+            params.append(valor)
+            condiciones.append(condicion.replace("$?", f"${len(params)}"))
+
+        if rfc:
+            agregar("(emisor_rfc = $? OR receptor_rfc = $?)", rfc.strip().upper())
+        if uuid:
+            agregar("uuid = $?", uuid.strip().upper())
+        if periodo:
+            agregar("periodo = $?", periodo)
+        if concepto:
+            agregar(
+                "(to_tsvector('spanish', COALESCE(conceptos_texto, '')) @@ plainto_tsquery('spanish', $?)"
+                " OR $? = ANY(claves_prod_serv))",
+                concepto,
+            )
+
+        params.extend([limit, offset])
+        rows = await fetch(f"""
+            SELECT {", ".join(COLUMNAS_RESPUESTA)}
+            FROM cfdi_index
+            WHERE {" AND ".join(condiciones)}
+            ORDER BY fecha DESC NULLS LAST, uuid
+            LIMIT ${len(params) - 1} OFFSET ${len(params)}
+        """, *params)
+        return [_serializar(row) for row in rows]
+
+    async def cfdis_emisor_69b(self, empresa_id: str, periodo: Optional[str] = None) -> List[Dict[str, Any]]:
+        """CFDIs recibidos de emisores que aparecen en la lista 69-B del SAT."""
+        from services.database_pg import fetch
+
+        params: List[Any] = [empresa_id]
+        filtro_periodo = ""
+        if periodo:
+            params.append(periodo)
+            filtro_periodo = "AND c.periodo = $2"
+
+        rows = await fetch(f"""
+            SELECT c.uuid, c.fecha, c.periodo, c.total, c.emisor_rfc, c.emisor_nombre,
+                   l.situacion, l.nombre_contribuyente
+            FROM cfdi_index c
+            JOIN sat_lista_69b l ON l.rfc = c.emisor_rfc
+            WHERE c.empresa_id = $1 {filtro_periodo}
+            ORDER BY l.situacion, c.fecha DESC
+        """, *params)
+        return [_serializar(row) for row in rows]
+
+    async def tabla_conciliacion(
+        self,
+        empresa_id: str,
+        periodo: Optional[str] = None,
+        rfc_receptor: Optional[str] = None,
+    ):
+        """
+        CFDIs de ingreso del índice en el formato de entrada de
+        ConciliacionMasivaService.conciliar (DataFrame).
+        """
+        from services.database_pg import fetch
+
+        condiciones = ["empresa_id = $1", "tipo_comprobante = 'I'"]
+        params: List[Any] = [empresa_id]
+        if periodo:
+            params.append(periodo)
+            condiciones.append(f"periodo = ${len(params)}")
+        if rfc_receptor:
+            params.append(rfc_receptor.strip().upper())
+            condiciones.append(f"receptor_rfc = ${len(params)}")
+
+        rows = await fetch(f"""
+            SELECT uuid, folio, fecha, total, tipo_comprobante, emisor_rfc, receptor_rfc, conceptos
+            FROM cfdi_index
+            WHERE {" AND ".join(condiciones)}
+        """, *params)
+
+        registros = []
+        for row in rows:
+            registro = dict(row)
+            registro["fecha"] = row["fecha"].isoformat() if row["fecha"] else None
+            registro["conceptos"] = json.loads(row["conceptos"]) if row["conceptos"] else []
+            registros.append(registro)
+        return registros_a_tabla_conciliacion(registros)
+
+
+def _serializar(row) -> Dict[str, Any]:
+    resultado = {}
+    for clave, valor in dict(row).items():
+        if isinstance(valor, datetime):
+            valor = valor.isoformat()
+        elif hasattr(valor, "is_finite"):
+            valor = float(valor)
+        resultado[clave] = valor
+    return resultado
+
+
+cfdi_store_service = CFDIStoreService()
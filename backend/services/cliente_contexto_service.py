@@ -1,12 +1,23 @@
 """
 Servicio de Contexto Evolutivo de Clientes
 Provee contexto sobre clientes a los agentes de IA A1-A7
+
+El contexto se lee de un snapshot precalculado por cliente
+(clientes_contexto_snapshot, migrations/009_clientes_contexto_snapshot.sql).
+Los triggers de clientes, clientes_documentos, clientes_interacciones,
+clientes_historial y clientes_contexto incrementan su versión en cada
+escritura; cada proceso guarda los snapshots en un LRU por versión, así que
+una lectura vigente es una sola consulta que solo compara versiones.
+
+Configuración por variables de entorno:
+- CLIENTE_CONTEXTO_LRU_MAX (default 256): snapshots en memoria
 """
 import os
 import json
 import logging
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 
 import asyncpg
 
@@ -21,6 +32,8 @@ except ImportError:
     logger.warning("OpenAI provider not available for ClienteContextoService")
 
 DATABASE_URL = os.environ.get('DATABASE_URL', '')
+SNAPSHOT_LRU_MAX = int(os.environ.get('CLIENTE_CONTEXTO_LRU_MAX', '256'))
+INTERACCIONES_POR_AGENTE = 10
 
 
 class ClienteContextoService:
@@ -31,6 +44,10 @@ class ClienteContextoService:
 
     def __init__(self):
         self._pool: Optional[asyncpg.Pool] = None
+        # cliente_id -> (versión, snapshot); válido mientras la versión coincida con la BD
+        self._snapshots: "OrderedDict[int, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._snapshots_disponibles = True
+        self.stats = {"lru_hits": 0, "db_hits": 0, "rebuilds": 0}
         self.client = OPENAI_AVAILABLE
         self.model = "gpt-4o"
 
@@ -61,99 +78,276 @@ class ClienteContextoService:
             await self._pool.close()
             self._pool = None
     
-    async def get_contexto_para_agente(
+    # ----------------------------------------
+    # Snapshot materializado por cliente
+    # ----------------------------------------
+
+    async def _leer_tablas(
         self,
+        conn,
         cliente_id: int,
-        agente_id: str
-    ) -> str:
+        agente_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
         """
-        Obtiene el contexto formateado de un cliente para un agente específico.
+        Lee los datos de contexto del cliente. Sin agente_id trae las últimas
+        interacciones de cada agente (para el snapshot compartido).
+        """
+        cliente = await conn.fetchrow(
+            """
+            SELECT id, nombre, rfc, razon_social, direccion, email, telefono,
+                   giro, regimen_fiscal, tipo_persona, actividad_economica,
+                   estado, notas_internas, empresa_id, created_at, updated_at
+            FROM clientes
+            WHERE id = $1
+            """,
+            cliente_id
+        )
         
-        Args:
-            cliente_id: ID del cliente
-            agente_id: ID del agente (A1, A2, A3, etc.)
+        if not cliente:
+            return None
         
-        Returns:
-            Contexto formateado en español con secciones claras
-        """
-        pool = await self._get_pool()
+        documentos = await conn.fetch(
+            """
+            SELECT nombre_archivo, tipo_documento, categoria, subcategoria,
+                   resumen_ia, fecha_documento, fecha_vigencia_fin, version,
+                   es_version_actual, created_at
+            FROM clientes_documentos
+            WHERE cliente_id = $1 AND activo = true
+            ORDER BY created_at DESC
+            LIMIT 20
+            """,
+            cliente_id
+        )
         
-        async with pool.acquire() as conn:
-            cliente = await conn.fetchrow(
-                """
-                SELECT id, nombre, rfc, razon_social, direccion, email, telefono,
-                       giro, regimen_fiscal, tipo_persona, actividad_economica,
-                       estado, notas_internas, created_at, updated_at
-                FROM clientes
-                WHERE id = $1
-                """,
-                cliente_id
-            )
-            
-            if not cliente:
-                return f"[ERROR] Cliente con ID {cliente_id} no encontrado."
-            
-            documentos = await conn.fetch(
+        if agente_id is not None:
+            interacciones = await conn.fetch(
                 """
-                SELECT nombre_archivo, tipo_documento, categoria, subcategoria,
-                       resumen_ia, fecha_documento, fecha_vigencia_fin, version,
-                       es_version_actual, created_at
-                FROM clientes_documentos
-                WHERE cliente_id = $1 AND activo = true
+                SELECT agente_id, agente_nombre, tipo, pregunta_usuario,
+                       respuesta_agente, hallazgos, recomendaciones, alertas,
+                       fue_util, created_at
+                FROM clientes_interacciones
+                WHERE cliente_id = $1 AND agente_id = $2
                 ORDER BY created_at DESC
-                LIMIT 20
+                LIMIT $3
                 """,
-                cliente_id
+                cliente_id, agente_id, INTERACCIONES_POR_AGENTE
             )
-            
+        else:
             interacciones = await conn.fetch(
                 """
                 SELECT agente_id, agente_nombre, tipo, pregunta_usuario,
                        respuesta_agente, hallazgos, recomendaciones, alertas,
                        fue_util, created_at
-                FROM clientes_interacciones
-                WHERE cliente_id = $1 AND agente_id = $2
-                ORDER BY created_at DESC
-                LIMIT 10
+                FROM (
+                    SELECT *, row_number() OVER (
+                        PARTITION BY agente_id ORDER BY created_at DESC
+                    ) AS posicion
+                    FROM clientes_interacciones
+                    WHERE cliente_id = $1
+                ) i
+                WHERE posicion <= $2
+                ORDER BY agente_id, created_at DESC
                 """,
-                cliente_id, agente_id
+                cliente_id, INTERACCIONES_POR_AGENTE
             )
-            
-            historial = await conn.fetch(
+        
+        historial = await conn.fetch(
+            """
+            SELECT tipo_cambio, campo_modificado, valor_anterior, valor_nuevo,
+                   descripcion, origen, agente_id, created_at
+            FROM clientes_historial
+            WHERE cliente_id = $1
+            ORDER BY created_at DESC
+            LIMIT 15
+            """,
+            cliente_id
+        )
+        
+        contexto_evolutivo = await conn.fetchrow(
+            """
+            SELECT resumen_ejecutivo, perfil_fiscal, evolucion_6_meses,
+                   documentos_mas_recientes, documentos_por_vencer,
+                   documentos_faltantes, resumen_interacciones,
+                   agentes_mas_consultados, temas_frecuentes, alertas_activas,
+                   ultima_actualizacion, version
+            FROM clientes_contexto
+            WHERE cliente_id = $1
+            """,
+            cliente_id
+        )
+        
+        return {
+            "cliente": dict(cliente),
+            "documentos": [dict(d) for d in documentos],
+            "interacciones": [dict(i) for i in interacciones],
+            "historial": [dict(h) for h in historial],
+            "contexto_evolutivo": dict(contexto_evolutivo) if contexto_evolutivo else None,
+        }
+    
+    @staticmethod
+    def _snapshot_desde_json(texto: str) -> Dict[str, Any]:
+        """Snapshot guardado en JSONB -> mismas estructuras que _leer_tablas."""
+        snapshot = json.loads(texto)
+        for seccion in ("documentos", "interacciones", "historial"):
+            for fila in snapshot.get(seccion) or []:
+                if isinstance(fila.get("created_at"), str):
+                    fila["created_at"] = datetime.fromisoformat(fila["created_at"])
+        return snapshot
+    
+    def _recordar_snapshot(self, cliente_id: int, version: int, snapshot: Dict[str, Any]):
+        self._snapshots[cliente_id] = (version, snapshot)
+        self._snapshots.move_to_end(cliente_id)
+        while len(self._snapshots) > SNAPSHOT_LRU_MAX:
+            self._snapshots.popitem(last=False)
+    
+    async def _get_snapshot(self, conn, cliente_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Snapshot vigente del cliente. En el caso común es una sola consulta:
+        se compara la versión de clientes_contexto_snapshot con la del LRU y
+        solo se transfiere el snapshot si este proceso no lo tiene.
+        """
+        if not self._snapshots_disponibles:
+            return await self._leer_tablas(conn, cliente_id)
+        
+        local = self._snapshots.get(cliente_id)
+        try:
+            fila = await conn.fetchrow(
                 """
-                SELECT tipo_cambio, campo_modificado, valor_anterior, valor_nuevo,
-                       descripcion, origen, agente_id, created_at
-                FROM clientes_historial
+                SELECT version,
+                       CASE WHEN snapshot_version = version AND version <> $2
+                            THEN snapshot::text END AS snapshot
+                FROM clientes_contexto_snapshot
                 WHERE cliente_id = $1
-                ORDER BY created_at DESC
-                LIMIT 15
                 """,
-                cliente_id
+                cliente_id, local[0] if local else -1
             )
-            
-            contexto_evolutivo = await conn.fetchrow(
+        except asyncpg.exceptions.UndefinedTableError:
+            logger.warning(
+                "clientes_contexto_snapshot no existe (migrations/009_clientes_contexto_snapshot.sql); "
+                "se lee el contexto directamente de las tablas"
+            )
+            self._snapshots_disponibles = False
+            return await self._leer_tablas(conn, cliente_id)
+        
+        if fila is not None and local and local[0] == fila["version"]:
+            self._snapshots.move_to_end(cliente_id)
+            self.stats["lru_hits"] += 1
+            return local[1]
+        if fila is not None and fila["snapshot"]:
+            snapshot = self._snapshot_desde_json(fila["snapshot"])
+            self._recordar_snapshot(cliente_id, fila["version"], snapshot)
+            self.stats["db_hits"] += 1
+            return snapshot
+        
+        # Snapshot inexistente o desactualizado: se reconstruye. La versión se
+        # lee antes que las tablas, así una escritura concurrente deja el
+        # snapshot guardado como desactualizado en vez de ocultarla.
+        if fila is None:
+            version = await conn.fetchval(
                 """
-                SELECT resumen_ejecutivo, perfil_fiscal, evolucion_6_meses,
-                       documentos_mas_recientes, documentos_por_vencer,
-                       documentos_faltantes, resumen_interacciones,
-                       agentes_mas_consultados, temas_frecuentes, alertas_activas,
-                       ultima_actualizacion, version
-                FROM clientes_contexto
-                WHERE cliente_id = $1
+                INSERT INTO clientes_contexto_snapshot (cliente_id, version)
+                VALUES ($1, 1)
+                ON CONFLICT (cliente_id) DO UPDATE SET version = clientes_contexto_snapshot.version
+                RETURNING version
                 """,
                 cliente_id
             )
+        else:
+            version = fila["version"]
         
-        contexto = self._formatear_contexto(
-            cliente=dict(cliente),
-            documentos=[dict(d) for d in documentos],
-            interacciones=[dict(i) for i in interacciones],
-            historial=[dict(h) for h in historial],
-            contexto_evolutivo=dict(contexto_evolutivo) if contexto_evolutivo else None,
+        snapshot = await self._leer_tablas(conn, cliente_id)
+        if snapshot is None:
+            return None
+        await conn.execute(
+            """
+            UPDATE clientes_contexto_snapshot
+            SET snapshot = $2::jsonb, snapshot_version = $3, empresa_id = $4, generado_en = NOW()
+            WHERE cliente_id = $1 AND version = $3
+            """,
+            cliente_id,
+            json.dumps(snapshot, default=str, ensure_ascii=False),
+            version,
+            snapshot["cliente"].get("empresa_id")
+        )
+        self._recordar_snapshot(cliente_id, version, snapshot)
+        self.stats["rebuilds"] += 1
+        return snapshot
+    
+    async def _cargar_snapshot(
+        self,
+        cliente_id: int,
+        empresa_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            snapshot = await self._get_snapshot(conn, cliente_id)
+        if snapshot is None:
+            return None
+        if empresa_id is not None and str(snapshot["cliente"].get("empresa_id")) != str(empresa_id):
+            return None
+        return snapshot
+    
+    def _proyectar(self, snapshot: Dict[str, Any], agente_id: str) -> str:
+        """Contexto de un agente a partir del snapshot compartido."""
+        interacciones = [
+            i for i in snapshot["interacciones"] if i.get("agente_id") == agente_id
+        ][:INTERACCIONES_POR_AGENTE]
+        return self._formatear_contexto(
+            cliente=snapshot["cliente"],
+            documentos=snapshot["documentos"],
+            interacciones=interacciones,
+            historial=snapshot["historial"],
+            contexto_evolutivo=snapshot["contexto_evolutivo"],
             agente_id=agente_id
         )
+    
+    async def get_contexto_para_agente(
+        self,
+        cliente_id: int,
+        agente_id: str,
+        empresa_id: Optional[str] = None
+    ) -> str:
+        """
+        Obtiene el contexto formateado de un cliente para un agente específico.
+        
+        Args:
+            cliente_id: ID del cliente
+            agente_id: ID del agente (A1, A2, A3, etc.)
+            empresa_id: Si se indica, el cliente debe pertenecer a esa empresa
+        
+        Returns:
+            Contexto formateado en español con secciones claras
+        """
+        if not self._snapshots_disponibles:
+            # Sin snapshots solo se leen las interacciones de este agente
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                datos = await self._leer_tablas(conn, cliente_id, agente_id)
+            if datos and (empresa_id is None or str(datos["cliente"].get("empresa_id")) == str(empresa_id)):
+                return self._proyectar(datos, agente_id)
+            return f"[ERROR] Cliente con ID {cliente_id} no encontrado."
+        
+        contextos = await self.get_contextos_para_agentes(cliente_id, [agente_id], empresa_id)
+        return contextos[agente_id]
+    
+    async def get_contextos_para_agentes(
+        self,
+        cliente_id: int,
+        agentes: List[str],
+        empresa_id: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        Contexto del cliente para varios agentes a partir de un único snapshot
+        (una deliberación completa lo lee una sola vez).
         
-        return contexto
+        Returns:
+            {agente_id: contexto formateado}
+        """
+        snapshot = await self._cargar_snapshot(cliente_id, empresa_id)
+        if snapshot is None:
+            error = f"[ERROR] Cliente con ID {cliente_id} no encontrado."
+            return {agente_id: error for agente_id in agentes}
+        return {agente_id: self._proyectar(snapshot, agente_id) for agente_id in agentes}
     
     def _formatear_contexto(
         self,
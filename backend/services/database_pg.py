@@ -9,6 +9,8 @@ import logging
 from typing import Optional
 from contextlib import asynccontextmanager
 
+from services.metrics_registry import span
+
 logger = logging.getLogger(__name__)
 
 _pool: Optional[asyncpg.Pool] = None
@@ -60,24 +62,28 @@ async def get_connection():
         await pool.release(conn)
 
 
+@span("db_query", op="execute")
 async def execute(query: str, *args):
     """Execute a query."""
     pool = await get_pool()
     return await pool.execute(query, *args)
 
 
+@span("db_query", op="fetch")
 async def fetch(query: str, *args):
     """Fetch multiple rows."""
     pool = await get_pool()
     return await pool.fetch(query, *args)
 
 
+@span("db_query", op="fetchrow")
 async def fetchrow(query: str, *args):
     """Fetch single row."""
     pool = await get_pool()
     return await pool.fetchrow(query, *args)
 
 
+@span("db_query", op="fetchval")
 async def fetchval(query: str, *args):
     """Fetch single value."""
     pool = await get_pool()
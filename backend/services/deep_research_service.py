@@ -6,13 +6,13 @@ Usa OpenAI GPT-4o + Web Scraping para máxima efectividad.
 import os
 import re
 import json
+import asyncio
 import logging
 from typing import Dict, Any, List, Optional, Tuple, cast
 from urllib.parse import urljoin, urlparse
 from datetime import datetime
 
-import requests
-from bs4 import BeautifulSoup
+from services.web_crawler import AsyncWebCrawler, DEFAULT_HEADERS
 
 logger = logging.getLogger(__name__)
 
@@ -84,13 +84,8 @@ class DeepResearchService:
             logger.warning("DeepResearchService: Ningún proveedor AI configurado")
 
         self.model = "claude-sonnet-4-20250514" if AI_PROVIDER == "anthropic" else "gpt-4o"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'es-MX,es;q=0.9,en;q=0.8',
-        })
         self.request_timeout = 15
+        self.crawler = AsyncWebCrawler(timeout_segundos=self.request_timeout, headers=DEFAULT_HEADERS)
         
         self.RFC_TABLA_VERIFICADOR = "0123456789ABCDEFGHIJKLMN&OPQRSTUVWXYZ Ñ"
     
@@ -222,7 +217,7 @@ class DeepResearchService:
     async def investigar_sitio_web(self, url: str) -> Dict[str, Any]:
         """
         Realiza scraping web y análisis con IA para extraer datos empresariales.
-        Usa Firecrawl si está configurado, o fallback a requests+bs4.
+        Usa Firecrawl si está configurado, o fallback al crawler asíncrono.
         """
         if not url:
             return {"success": False, "error": "URL no proporcionada"}
@@ -242,7 +237,7 @@ class DeepResearchService:
                 app = FirecrawlApp(api_key=firecrawl_key)
                 
                 logger.info("Usando Firecrawl para scraping...")
-                scrape_result = app.scrape_url(url, params={'formats': ['markdown']})
+                scrape_result = await asyncio.to_thread(app.scrape_url, url, params={'formats': ['markdown']})
                 
                 if scrape_result and 'markdown' in scrape_result:
                     firecrawl_data = scrape_result['markdown']
@@ -266,38 +261,19 @@ class DeepResearchService:
                         "confianza_campos": ai_datos.get("confianza_campos", {})
                     }
         
-        # 3. Fallback a método tradicional (Requests + BS4)
-        logger.info("Usando método tradicional (Requests + BS4)")
+        # 3. Fallback: crawler asíncrono (páginas en paralelo, con caché)
+        logger.info("Usando crawler asíncrono (aiohttp + BS4)")
         pages_to_check = [
             "", "/contacto", "/contact", "/nosotros", "/about", 
             "/about-us", "/quienes-somos", "/aviso-de-privacidad", 
             "/privacy", "/legal", "/terminos"
         ]
         
-        all_content = []
         parsed_url = urlparse(url)
         base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
         
-        for page in pages_to_check:
-            try:
-                page_url = urljoin(base_url, page)
-                response = self.session.get(page_url, timeout=self.request_timeout, allow_redirects=True)
-                
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'lxml')
-                    for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
-                        script.decompose()
-                    
-                    text = soup.get_text(separator=' ', strip=True)
-                    text = re.sub(r'\s+', ' ', text)
-                    if len(text) > 100:
-                        all_content.append({
-                            "url": page_url,
-                            "text": text[:8000],
-                            "title": soup.title.string if soup.title else ""
-                        })
-            except Exception:
-                continue
+        paginas = await self.crawler.obtener_paginas([urljoin(base_url, page) for page in pages_to_check])
+        all_content = [p for p in paginas if p and len(p["text"]) > 100]
         
         if not all_content:
             return {"success": False, "error": "No se pudo acceder al sitio web"}
@@ -22,6 +22,8 @@ from reportlab.platypus import (
 )
 from reportlab.pdfgen import canvas
 
+from services.metrics_registry import span
+
 logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.environ.get('DATABASE_URL', '')
@@ -120,6 +122,7 @@ class DefenseFileExportService:
             fontName='Helvetica'
         ))
     
+    @span("pdf_export", tipo="defense_file")
     def _generate_defense_file_pdf_sync(
         self, 
         defense_file_data: Dict[str, Any]
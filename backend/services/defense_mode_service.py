@@ -20,6 +20,7 @@ import logging
 
 from services.legal_validation_service import (
     LegalValidationService,
+    OperacionAValidar,
     TipoServicio,
     TipoActoAutoridad,
     EvaluacionCompleta,
@@ -411,22 +412,23 @@ class DefenseModeService:
         Evalúa todas las operaciones cuestionadas con el servicio de validación legal.
         Actualiza el expediente con las evaluaciones.
         """
-        for operacion in expediente.operaciones_cuestionadas:
-            # Simular evidencias presentadas (en producción, vendría de la BD)
-            evidencias_presentadas = []
-
-            evaluacion = self.legal_service.validar_operacion(
+        # Un solo lote: las operaciones con la misma firma se evalúan una vez
+        evaluaciones_lote = self.legal_service.validar_operaciones([
+            OperacionAValidar(
                 operacion_id=operacion.operacion_id,
                 proveedor_rfc=operacion.proveedor_rfc,
                 monto=operacion.monto,
                 tipo_servicio=operacion.tipo_servicio,
-                evidencias_presentadas=evidencias_presentadas,
+                # Simular evidencias presentadas (en producción, vendría de la BD)
+                evidencias_presentadas=[],
                 es_parte_relacionada=False,
                 proveedor_en_69b=False,
                 cfdi_validado=True,
                 tiene_opinion_32d=False
             )
-
+            for operacion in expediente.operaciones_cuestionadas
+        ])
+        for operacion, evaluacion in zip(expediente.operaciones_cuestionadas, evaluaciones_lote):
             operacion.evaluacion = evaluacion
 
         # Calcular probabilidad de éxito
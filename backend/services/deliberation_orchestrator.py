@@ -6,13 +6,14 @@ Creates audit trail for SAT Materialidad compliance
 """
 import os
 import re
+import time
 import logging
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any, Tuple
+from collections import OrderedDict
 from enum import Enum
 import json
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 
 from services.dreamhost_email_service import DreamHostEmailService
 from services.rag_service import RAGService
@@ -32,9 +33,16 @@ from config.reglas_tipologia import get_reglas_tipologia
 from validation.validation_service import validar_output_agente, validar_y_corregir
 from services.database import deliberation_state_repository
 from services.cliente_contexto_service import cliente_contexto_service
+from services.effects_queue import EffectsQueue
+from services.retrieval_facade import RetrievalFacade, build_retrieval_facade
 
 logger = logging.getLogger(__name__)
 
+# Contextos RAG pre-cargados por proyecto: viven mientras dura la deliberación
+# (incluidas reanudaciones) y se descartan al completarla
+RAG_CONTEXT_TTL_SECONDS = float(os.environ.get("RAG_CONTEXT_TTL_SECONDS", "3600"))
+RAG_CONTEXT_MAX_PROJECTS = int(os.environ.get("RAG_CONTEXT_MAX_PROJECTS", "128"))
+
 
 def get_cliente_id_from_project(project: Dict) -> Optional[int]:
     """
@@ -96,31 +104,45 @@ STAGE_TO_REPORT_TYPE = {
 }
 
 
-def preload_rag_contexts_parallel(project_data: Dict, rag_service) -> Dict[str, List[Dict]]:
+_retrieval_facades: Dict[int, RetrievalFacade] = {}
+
+
+def get_retrieval_facade(rag_service) -> RetrievalFacade:
+    """Fachada de recuperación (todas las bases vectoriales) asociada a un RAGService"""
+    facade = _retrieval_facades.get(id(rag_service))
+    if facade is None:
+        facade = _retrieval_facades[id(rag_service)] = build_retrieval_facade(rag_service)
+    return facade
+
+
+async def preload_rag_contexts_parallel(project_data: Dict, rag_service) -> Dict[str, List[Dict]]:
     """
-    Pre-carga contextos RAG de TODOS los agentes EN PARALELO usando threads.
-    Reduce latencia de ~2s×4 agentes = 8s a ~2s total.
+    Pre-carga contextos RAG de TODOS los agentes EN PARALELO.
+    Cada agente consulta todas las bases vectoriales configuradas a través de
+    la fachada de recuperación (resultados normalizados y deduplicados).
     """
     agent_ids = ["A1_SPONSOR", "A3_FISCAL", "A5_FINANZAS", "LEGAL"]
     project_description = f"{project_data.get('name', '')} {project_data.get('description', '')}"
+    empresa_id = project_data.get("empresa_id") or project_data.get("tenant_id")
+    facade = get_retrieval_facade(rag_service)
     
-    def fetch_context(agent_id: str) -> Tuple[str, List[Dict]]:
-        """Fetch individual de contexto RAG"""
-        try:
-            results = rag_service.query(
-                agent_id=agent_id,
-                query_text=project_description,
-                n_results=5
-            )
-            docs = results.get("documents", [])
-            logger.info(f"✅ RAG pre-loaded for {agent_id}: {len(docs)} docs")
-            return (agent_id, docs)
-        except Exception as e:
-            logger.warning(f"⚠️ No RAG context for {agent_id}: {e}")
-            return (agent_id, [])
+    # Un solo embedding de la consulta y todas las búsquedas (agente x base) concurrentes
+    try:
+        retrieved = await facade.retrieve_many(
+            project_description,
+            agent_ids,
+            empresa_id=empresa_id,
+            limit=5
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ No RAG context preloaded: {e}")
+        retrieved = {}
     
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        results = list(executor.map(fetch_context, agent_ids))
+    results = {}
+    for agent_id in agent_ids:
+        docs = retrieved.get(agent_id, {}).get("results", [])
+        results[agent_id] = docs
+        logger.info(f"✅ RAG pre-loaded for {agent_id}: {len(docs)} docs")
     
     try:
         from routes.metrics import track_rag_preload
@@ -128,7 +150,7 @@ def preload_rag_contexts_parallel(project_data: Dict, rag_service) -> Dict[str,
     except ImportError:
         pass
     
-    return dict(results)
+    return results
 
 
 class Deliberation:
@@ -189,6 +211,7 @@ class DeliberationOrchestrator:
         self.rag_service = RAGService()
         self.report_generator = ReportGeneratorService()
         self.deliberations: Dict[str, List[Deliberation]] = {}
+        self._rag_contexts: "OrderedDict[str, Tuple[float, Dict[str, List[Dict]]]]" = OrderedDict()
     
     async def _preparar_contexto_agente(self, agent_id: str, project: dict, proveedor: dict = None):
         """Prepara contexto completo para el agente incluyendo normativo y reglas"""
@@ -252,8 +275,48 @@ class DeliberationOrchestrator:
             pass
         return None
     
-    def get_rag_context(self, agent_id: str, project_description: str, n_results: int = 5) -> List[Dict]:
+    def _cached_rag_contexts(self, project_id: Optional[str]) -> Optional[Dict[str, List[Dict]]]:
+        """Contextos RAG pre-cargados del proyecto si siguen vigentes"""
+        entry = self._rag_contexts.get(project_id) if project_id else None
+        if entry is None:
+            return None
+        loaded_at, contexts = entry
+        if time.monotonic() - loaded_at > RAG_CONTEXT_TTL_SECONDS:
+            del self._rag_contexts[project_id]
+            return None
+        self._rag_contexts.move_to_end(project_id)
+        return contexts
+    
+    async def _load_rag_contexts(self, project: Dict) -> Dict[str, List[Dict]]:
+        """
+        Contextos RAG de todos los agentes para el proyecto: se recuperan una
+        sola vez por deliberación y se reutilizan en reanudaciones y en
+        get_rag_context.
+        """
+        project_id = project.get("id")
+        contexts = self._cached_rag_contexts(project_id)
+        if contexts is not None:
+            logger.info(f"♻️ Reusing preloaded RAG contexts for {project_id}")
+            return contexts
+        
+        contexts = await preload_rag_contexts_parallel(project, self.rag_service)
+        if project_id:
+            self._rag_contexts[project_id] = (time.monotonic(), contexts)
+            while len(self._rag_contexts) > RAG_CONTEXT_MAX_PROJECTS:
+                self._rag_contexts.popitem(last=False)
+        return contexts
+    
+    def get_rag_context(
+        self,
+        agent_id: str,
+        project_description: str,
+        n_results: int = 5,
+        project_id: Optional[str] = None
+    ) -> List[Dict]:
         """Query agent's RAG knowledge base for relevant context"""
+        contexts = self._cached_rag_contexts(project_id)
+        if contexts is not None and contexts.get(agent_id):
+            return contexts[agent_id][:n_results]
         try:
             results = self.rag_service.query(
                 agent_id=agent_id,
@@ -345,7 +408,7 @@ SISTEMA REVISAR.IA - DELIBERACIÓN MULTI-AGENTES
         Tipo de servicio: {project.get('service_type', 'Consultoría')}
         """
         
-        rag_context = self.get_rag_context(first_agent_id, project_description)
+        rag_context = self.get_rag_context(first_agent_id, project_description, project_id=project_id)
         
         email_content = {
             "subject": f"[Revisar.IA] Nuevo Proyecto para Validación: {project.get('name', 'Sin nombre')}",
@@ -482,7 +545,7 @@ Sistema Revisar.IA - Revisar.ia
             return {"success": False, "error": f"Agent config not found: {current_agent_id}"}
         
         project_description = f"{project.get('name', '')} {project.get('description', '')}"
-        rag_context = self.get_rag_context(current_agent_id, project_description)
+        rag_context = self.get_rag_context(current_agent_id, project_description, project_id=project_id)
         
         if decision.lower() == "reject" or decision.lower() == "rechazar":
             deliberation = Deliberation(
@@ -697,7 +760,44 @@ Sistema Revisar.IA - Revisar.ia
         Run the FULL agentic deliberation process with LLM reasoning.
         Each agent analyzes, reasons, and passes to the next agent.
         Returns complete audit trail when done.
+        
+        Only context retrieval and LLM reasoning are on the critical path:
+        the client context for the next stage is prefetched while the current
+        agent reasons, and reports, uploads, emails and state persistence go
+        through an ordered effects queue that is flushed before the result
+        is returned.
         """
+        effects = EffectsQueue(name="deliberation")
+        try:
+            result = await self._run_agentic_deliberation(project, effects)
+            if result.get("success"):
+                # Una deliberación fallida conserva sus contextos para la reanudación
+                self._rag_contexts.pop(project.get("id"), None)
+            return result
+        finally:
+            await effects.close()
+            if effects.errors:
+                logger.warning(f"Deliberation side effects with errors: {effects.errors}")
+    
+    async def _fetch_cliente_contextos(self, cliente_id: int, agent_ids: List[str]) -> Dict[str, str]:
+        """
+        Client evolutionary context for every agent of the deliberation,
+        rendered from a single client snapshot ('' where unavailable).
+        """
+        try:
+            contextos = await cliente_contexto_service.get_contextos_para_agentes(
+                cliente_id=cliente_id,
+                agentes=agent_ids
+            )
+            return {
+                agent_id: texto if texto and not texto.startswith("[ERROR]") else ""
+                for agent_id, texto in contextos.items()
+            }
+        except Exception as ctx_err:
+            logger.warning(f"Error obteniendo contexto evolutivo para cliente {cliente_id}: {ctx_err}")
+        return {}
+    
+    async def _run_agentic_deliberation(self, project: Dict, effects: EffectsQueue) -> Dict:
         import uuid
         project_id = project.get("id") or f"PROJ-{uuid.uuid4().hex[:8].upper()}"
         project["id"] = project_id
@@ -728,7 +828,7 @@ Sistema Revisar.IA - Revisar.ia
         # Pre-carga de contextos RAG en paralelo (optimización ~6s ahorro)
         logger.info("🚀 Pre-loading RAG contexts in parallel...")
         preload_start = datetime.now(timezone.utc)
-        preloaded_rag_contexts = preload_rag_contexts_parallel(project, self.rag_service)
+        preloaded_rag_contexts = await self._load_rag_contexts(project)
         preload_elapsed = (datetime.now(timezone.utc) - preload_start).total_seconds()
         logger.info(f"✅ Loaded {len(preloaded_rag_contexts)} RAG contexts in {preload_elapsed:.2f}s (paralelo)")
         
@@ -738,6 +838,15 @@ Sistema Revisar.IA - Revisar.ia
             progress=5
         )
         
+        # Contexto evolutivo del cliente: un solo snapshot para todos los
+        # agentes, cargado mientras arranca la primera etapa
+        cliente_id = get_cliente_id_from_project(project)
+        stage_agents = [a for a in (STAGE_TO_AGENT.get(s) for s in WORKFLOW_ORDER[:-1]) if a]
+        cliente_contextos_task = (
+            asyncio.create_task(self._fetch_cliente_contextos(cliente_id, stage_agents))
+            if cliente_id else None
+        )
+        
         total_stages = len(WORKFLOW_ORDER) - 1
         for stage_idx, stage in enumerate(WORKFLOW_ORDER[:-1]):
             agent_id = STAGE_TO_AGENT.get(stage)
@@ -769,23 +878,13 @@ Sistema Revisar.IA - Revisar.ia
             rag_texts = [doc.get("content", "") for doc in rag_context] if rag_context else []
             logger.debug(f"Using pre-loaded RAG for {agent_id}: {len(rag_context)} docs")
             
-            # Obtener contexto evolutivo del cliente si está disponible
-            cliente_id = get_cliente_id_from_project(project)
-            cliente_contexto_str = ""
-            if cliente_id:
-                try:
-                    cliente_contexto_str = await cliente_contexto_service.get_contexto_para_agente(
-                        cliente_id=cliente_id,
-                        agente_id=agent_id
-                    )
-                    if cliente_contexto_str and not cliente_contexto_str.startswith("[ERROR]"):
-                        # Agregar contexto del cliente al inicio de los textos RAG
-                        rag_texts = [cliente_contexto_str] + rag_texts
-                        logger.info(f"✅ Contexto evolutivo incluido para {agent_id}, cliente {cliente_id}")
-                    else:
-                        logger.debug(f"No hay contexto evolutivo para cliente {cliente_id}")
-                except Exception as ctx_err:
-                    logger.warning(f"Error obteniendo contexto evolutivo para cliente {cliente_id}: {ctx_err}")
+            # Contexto evolutivo del cliente (pre-cargado)
+            if cliente_contextos_task is not None:
+                cliente_contexto_str = (await cliente_contextos_task).get(agent_id)
+                if cliente_contexto_str:
+                    # Agregar contexto del cliente al inicio de los textos RAG
+                    rag_texts = [cliente_contexto_str] + rag_texts
+                    logger.info(f"✅ Contexto evolutivo incluido para {agent_id}, cliente {cliente_id}")
             
             await event_emitter.emit_analyzing(
                 project_id, agent_id,
@@ -809,30 +908,28 @@ Sistema Revisar.IA - Revisar.ia
             decision = reasoning_result.get("decision", "pending")
             analysis = reasoning_result.get("analysis", "Análisis no disponible")
             
-            # Registrar la interacción del agente con el cliente
+            # Registrar la interacción del agente con el cliente (en segundo plano)
             if cliente_id:
-                try:
-                    await cliente_contexto_service.registrar_interaccion(
-                        cliente_id=cliente_id,
-                        agente_id=agent_id,
-                        agente_nombre=agent_config.get("name", agent_id),
-                        tipo="deliberacion",
-                        pregunta_usuario=f"Análisis de proyecto: {project.get('name', 'Sin nombre')} - {project_description}",
-                        respuesta_agente=analysis[:2000] if analysis else "Sin análisis",
-                        hallazgos={
-                            "decision": decision,
-                            "stage": stage.value,
-                            "compliance_pillars": reasoning_result.get("compliance_pillars", {})
-                        },
-                        recomendaciones={
-                            "adjustments": reasoning_result.get("adjustments", [])
-                        },
-                        duracion_ms=reasoning_elapsed_ms,
-                        tokens_usados=reasoning_result.get("tokens_used", 0)
-                    )
-                    logger.info(f"✅ Interacción registrada para cliente {cliente_id}, agente {agent_id}")
-                except Exception as reg_err:
-                    logger.warning(f"Error registrando interacción para cliente {cliente_id}: {reg_err}")
+                effects.submit(
+                    f"registrar_interaccion:{agent_id}",
+                    cliente_contexto_service.registrar_interaccion,
+                    cliente_id=cliente_id,
+                    agente_id=agent_id,
+                    agente_nombre=agent_config.get("name", agent_id),
+                    tipo="deliberacion",
+                    pregunta_usuario=f"Análisis de proyecto: {project.get('name', 'Sin nombre')} - {project_description}",
+                    respuesta_agente=analysis[:2000] if analysis else "Sin análisis",
+                    hallazgos={
+                        "decision": decision,
+                        "stage": stage.value,
+                        "compliance_pillars": reasoning_result.get("compliance_pillars", {})
+                    },
+                    recomendaciones={
+                        "adjustments": reasoning_result.get("adjustments", [])
+                    },
+                    duracion_ms=reasoning_elapsed_ms,
+                    tokens_usados=reasoning_result.get("tokens_used", 0)
+                )
             
             await event_emitter.emit_complete(
                 project_id, agent_id,
@@ -873,210 +970,39 @@ Sistema Revisar.IA - Revisar.ia
             
             defense_file_service.add_deliberation(project_id, deliberation.to_dict())
             
-            stage_results_so_far = {d["stage"]: d for d in all_deliberations}
-            await deliberation_state_repository.save_state(
+            effects.submit(
+                f"save_state:{stage.value}",
+                deliberation_state_repository.save_state,
                 project_id=project_id,
                 empresa_id=empresa_id,
                 current_stage=stage.value,
-                stage_results=stage_results_so_far,
+                stage_results={d["stage"]: d for d in all_deliberations},
                 status="in_progress",
                 project_data=project
             )
             
             findings, recommendations = self._extract_findings_recommendations(analysis)
-            report_type = STAGE_TO_REPORT_TYPE.get(stage, "analisis")
-            version = defense_file_service.get_document_count(project_id, agent_id) + 1
-            
-            decision_label = "APROBADO" if decision == "approve" else "RECHAZADO" if decision == "reject" else "SOLICITUD_AJUSTE" if decision == "request_adjustment" else "PENDIENTE"
             
-            report_path = self.report_generator.generate_agent_report(
+            # Reportes, pCloud, auditoría y emails: fuera de la ruta crítica, en orden
+            effects.submit(
+                f"stage_artifacts:{stage.value}",
+                self._publish_stage_artifacts,
                 project_id=project_id,
+                project=project,
+                stage=stage,
                 agent_id=agent_id,
-                agent_name=reasoning_result.get("agent_name", agent_id),
-                agent_role=agent_config.get("role", "Agente"),
-                report_type=report_type,
-                version=version,
-                project_data=project,
-                analysis=analysis,
-                decision=decision_label,
+                agent_config=agent_config,
+                reasoning_result=reasoning_result,
+                deliberation=deliberation,
                 findings=findings,
                 recommendations=recommendations
             )
             
-            pcloud_link = None
-            full_report_path = None
-            
-            if report_path:
-                ROOT_DIR = Path(__file__).parent.parent
-                full_report_path = str(ROOT_DIR / report_path.lstrip('/'))
-                
-                pcloud_result = evidence_portfolio_service.upload_document(
-                    project_id=project_id,
-                    file_path=full_report_path,
-                    doc_type=report_type,
-                    agent_id=agent_id
-                )
-                
-                if pcloud_result.get("success"):
-                    pcloud_link = pcloud_result.get("download_url") or pcloud_result.get("pcloud_path")
-                    defense_file_service.add_pcloud_document(
-                        project_id=project_id,
-                        agent_id=agent_id,
-                        doc_type=f"reporte_{report_type}",
-                        local_path=full_report_path,
-                        pcloud_path=pcloud_result.get("pcloud_path", ""),
-                        pcloud_link=pcloud_link,
-                        file_id=pcloud_result.get("file_id")
-                    )
-                    logger.info(f"☁️ Uploaded to pCloud: {pcloud_result.get('filename')}")
-                else:
-                    logger.warning(f"pCloud upload failed (offline mode): {pcloud_result.get('error')}")
-                
-                defense_file_service.add_document(
-                    project_id=project_id,
-                    stage=stage.value,
-                    agent_id=agent_id,
-                    doc_type=f"reporte_{report_type}",
-                    file_path=report_path,
-                    version=version,
-                    pcloud_link=pcloud_link
-                )
-                logger.info(f"📄 Generated report for {agent_id}: {report_path}")
-                
-                try:
-                    audit_result = auditor_service.audit_stage_upload(project_id, stage.value, agent_id)
-                    if audit_result.get("audit_passed"):
-                        logger.info(f"✅ [A8_AUDITOR] Document audit passed for {agent_id}")
-                    else:
-                        logger.warning(f"⚠️ [A8_AUDITOR] Document audit incomplete: {audit_result.get('message')}")
-                except Exception as audit_error:
-                    logger.warning(f"[A8_AUDITOR] Audit check failed: {audit_error}")
-            
-            if decision == "request_adjustment":
-                mod_version = defense_file_service.get_document_count(project_id, agent_id) + 1
-                mod_report_path = self.report_generator.generate_agent_report(
-                    project_id=project_id,
-                    agent_id=agent_id,
-                    agent_name=reasoning_result.get("agent_name", agent_id),
-                    agent_role=agent_config.get("role", "Agente"),
-                    report_type="solicitud_modificacion",
-                    version=mod_version,
-                    project_data=project,
-                    analysis=analysis,
-                    decision="SOLICITUD_MODIFICACION",
-                    findings=findings,
-                    recommendations=recommendations
-                )
-                
-                if mod_report_path:
-                    defense_file_service.add_document(
-                        project_id=project_id,
-                        stage=stage.value,
-                        agent_id=agent_id,
-                        doc_type="solicitud_modificacion",
-                        file_path=mod_report_path,
-                        version=mod_version
-                    )
-                    logger.info(f"📝 Generated modification request for {agent_id}: {mod_report_path}")
-                
-                try:
-                    adjustments = auditor_service.extract_adjustments_from_analysis(analysis)
-                    provider_email = project.get("provider_email") or project.get("submitter_email", "")
-                    
-                    if provider_email and adjustments:
-                        email_result = auditor_service.send_adjustment_email(
-                            project_id=project_id,
-                            agent_id=agent_id,
-                            decision=decision,
-                            adjustments=adjustments,
-                            provider_email=provider_email
-                        )
-                        if email_result.get("success"):
-                            logger.info(f"📧 [A8_AUDITOR] Adjustment email sent to provider: {provider_email}")
-                            defense_file_service.add_email(project_id, {
-                                "from_email": "auditoria@revisar-ia.com",
-                                "to_email": provider_email,
-                                "subject": f"Revisar.ia - Ajustes Requeridos Proyecto {project_id}",
-                                "body": f"Ajustes requeridos: {', '.join(adjustments[:3])}...",
-                                "message_id": email_result.get("message_id", ""),
-                                "type": "adjustment_notification"
-                            })
-                        else:
-                            logger.warning(f"[A8_AUDITOR] Failed to send adjustment email: {email_result.get('error')}")
-                except Exception as adj_error:
-                    logger.error(f"[A8_AUDITOR] Error processing adjustment notification: {adj_error}")
-            
-            next_stage = self.get_next_stage(stage)
-            if next_stage and next_stage != WorkflowStage.E5_APROBADO:
-                next_agent_id = STAGE_TO_AGENT.get(next_stage)
-                next_agent = self.get_agent_config(next_agent_id)
-                
-                if next_agent:
-                    await event_emitter.emit_sending(project_id, agent_id, next_agent_id)
-                    
-                    # Run synchronous LLM call in thread to avoid blocking event loop
-                    email_body = await asyncio.to_thread(
-                        agentic_service.generate_inter_agent_message,
-                        from_agent=agent_id,
-                        to_agent=next_agent_id,
-                        project_data=project,
-                        analysis_result=reasoning_result,
-                        stage=stage.value
-                    )
-                    
-                    email_subject = f"[Revisar.IA] Deliberación {project_id}: {project.get('name', '')}"
-                    
-                    try:
-                        attachments = []
-                        if full_report_path and Path(full_report_path).exists():
-                            attachments.append(full_report_path)
-                        
-                        if attachments:
-                            email_result = self.email_service.send_email_with_attachments(
-                                from_agent_id=agent_id,
-                                to_email=next_agent.get("email", ""),
-                                subject=email_subject,
-                                body=email_body,
-                                attachments=attachments
-                            )
-                        else:
-                            email_result = self.email_service.send_email(
-                                from_agent_id=agent_id,
-                                to_email=next_agent.get("email", ""),
-                                subject=email_subject,
-                                body=email_body
-                            )
-                        
-                        deliberation.email_sent = email_result
-                        
-                        if email_result.get("success"):
-                            defense_file_service.add_email(project_id, {
-                                "from_email": agent_config.get("email", ""),
-                                "to_email": next_agent.get("email", ""),
-                                "subject": f"[Revisar.IA] Deliberación {stage.value}",
-                                "body": email_body[:500],
-                                "message_id": email_result.get("message_id", ""),
-                                "attachments": email_result.get("attachments", [])
-                            })
-                            
-                            evidence_portfolio_service.add_to_communication_log(
-                                project_id=project_id,
-                                entry={
-                                    "timestamp": datetime.now(timezone.utc).isoformat(),
-                                    "action": "email_sent",
-                                    "from_agent": agent_id,
-                                    "to_agent": next_agent_id,
-                                    "email_subject": email_subject,
-                                    "attachment_name": Path(full_report_path).name if full_report_path else None,
-                                    "pcloud_link": pcloud_link
-                                }
-                            )
-                            logger.info(f"📧 Email with attachment sent from {agent_id} to {next_agent_id}")
-                            
-                    except Exception as e:
-                        logger.error(f"Error sending inter-agent email: {e}")
-            
             if decision == "reject":
+                for pending_context in context_prefetch.values():
+                    pending_context.cancel()
+                await effects.flush()
+                
                 rejection_version = defense_file_service.get_document_count(project_id, agent_id) + 1
                 rejection_report_path = self.report_generator.generate_agent_report(
                     project_id=project_id,
@@ -1161,6 +1087,9 @@ Sistema Revisar.IA - Revisar.ia
             
             current_stage = stage
         
+        # El cierre del expediente requiere todos los documentos de las etapas
+        await effects.flush()
+        
         consolidated_analysis = "\n\n".join([
             f"**{d['agent_name']} ({d['stage']}):**\n{d['analysis']}"
             for d in all_deliberations
@@ -1301,6 +1230,225 @@ Sistema Revisar.IA - Revisar.ia
         
         return result
     
+    async def _publish_stage_artifacts(
+        self,
+        project_id: str,
+        project: Dict,
+        stage: WorkflowStage,
+        agent_id: str,
+        agent_config: Dict,
+        reasoning_result: Dict,
+        deliberation: Deliberation,
+        findings: List[str],
+        recommendations: List[str]
+    ) -> Dict:
+        """
+        Side effects of a completed stage, run from the effects queue:
+        agent report PDF, pCloud upload, document audit, modification request
+        and adjustment email, and the inter-agent email to the next stage.
+        """
+        decision = reasoning_result.get("decision", "pending")
+        analysis = reasoning_result.get("analysis", "Análisis no disponible")
+        report_type = STAGE_TO_REPORT_TYPE.get(stage, "analisis")
+        version = defense_file_service.get_document_count(project_id, agent_id) + 1
+        
+        decision_label = "APROBADO" if decision == "approve" else "RECHAZADO" if decision == "reject" else "SOLICITUD_AJUSTE" if decision == "request_adjustment" else "PENDIENTE"
+        
+        report_path = await asyncio.to_thread(
+            self.report_generator.generate_agent_report,
+            project_id=project_id,
+            agent_id=agent_id,
+            agent_name=reasoning_result.get("agent_name", agent_id),
+            agent_role=agent_config.get("role", "Agente"),
+            report_type=report_type,
+            version=version,
+            project_data=project,
+            analysis=analysis,
+            decision=decision_label,
+            findings=findings,
+            recommendations=recommendations
+        )
+        
+        pcloud_link = None
+        full_report_path = None
+        
+        if report_path:
+            ROOT_DIR = Path(__file__).parent.parent
+            full_report_path = str(ROOT_DIR / report_path.lstrip('/'))
+            
+            pcloud_result = await asyncio.to_thread(
+                evidence_portfolio_service.upload_document,
+                project_id=project_id,
+                file_path=full_report_path,
+                doc_type=report_type,
+                agent_id=agent_id
+            )
+            
+            if pcloud_result.get("success"):
+                pcloud_link = pcloud_result.get("download_url") or pcloud_result.get("pcloud_path")
+                defense_file_service.add_pcloud_document(
+                    project_id=project_id,
+                    agent_id=agent_id,
+                    doc_type=f"reporte_{report_type}",
+                    local_path=full_report_path,
+                    pcloud_path=pcloud_result.get("pcloud_path", ""),
+                    pcloud_link=pcloud_link,
+                    file_id=pcloud_result.get("file_id")
+                )
+                logger.info(f"☁️ Uploaded to pCloud: {pcloud_result.get('filename')}")
+            else:
+                logger.warning(f"pCloud upload failed (offline mode): {pcloud_result.get('error')}")
+            
+            defense_file_service.add_document(
+                project_id=project_id,
+                stage=stage.value,
+                agent_id=agent_id,
+                doc_type=f"reporte_{report_type}",
+                file_path=report_path,
+                version=version,
+                pcloud_link=pcloud_link
+            )
+            logger.info(f"📄 Generated report for {agent_id}: {report_path}")
+            
+            try:
+                audit_result = auditor_service.audit_stage_upload(project_id, stage.value, agent_id)
+                if audit_result.get("audit_passed"):
+                    logger.info(f"✅ [A8_AUDITOR] Document audit passed for {agent_id}")
+                else:
+                    logger.warning(f"⚠️ [A8_AUDITOR] Document audit incomplete: {audit_result.get('message')}")
+            except Exception as audit_error:
+                logger.warning(f"[A8_AUDITOR] Audit check failed: {audit_error}")
+        
+        if decision == "request_adjustment":
+            mod_version = defense_file_service.get_document_count(project_id, agent_id) + 1
+            mod_report_path = await asyncio.to_thread(
+                self.report_generator.generate_agent_report,
+                project_id=project_id,
+                agent_id=agent_id,
+                agent_name=reasoning_result.get("agent_name", agent_id),
+                agent_role=agent_config.get("role", "Agente"),
+                report_type="solicitud_modificacion",
+                version=mod_version,
+                project_data=project,
+                analysis=analysis,
+                decision="SOLICITUD_MODIFICACION",
+                findings=findings,
+                recommendations=recommendations
+            )
+            
+            if mod_report_path:
+                defense_file_service.add_document(
+                    project_id=project_id,
+                    stage=stage.value,
+                    agent_id=agent_id,
+                    doc_type="solicitud_modificacion",
+                    file_path=mod_report_path,
+                    version=mod_version
+                )
+                logger.info(f"📝 Generated modification request for {agent_id}: {mod_report_path}")
+            
+            try:
+                adjustments = auditor_service.extract_adjustments_from_analysis(analysis)
+                provider_email = project.get("provider_email") or project.get("submitter_email", "")
+                
+                if provider_email and adjustments:
+                    email_result = await asyncio.to_thread(
+                        auditor_service.send_adjustment_email,
+                        project_id=project_id,
+                        agent_id=agent_id,
+                        decision=decision,
+                        adjustments=adjustments,
+                        provider_email=provider_email
+                    )
+                    if email_result.get("success"):
+                        logger.info(f"📧 [A8_AUDITOR] Adjustment email sent to provider: {provider_email}")
+                        defense_file_service.add_email(project_id, {
+                            "from_email": "auditoria@revisar-ia.com",
+                            "to_email": provider_email,
+                            "subject": f"Revisar.ia - Ajustes Requeridos Proyecto {project_id}",
+                            "body": f"Ajustes requeridos: {', '.join(adjustments[:3])}...",
+                            "message_id": email_result.get("message_id", ""),
+                            "type": "adjustment_notification"
+                        })
+                    else:
+                        logger.warning(f"[A8_AUDITOR] Failed to send adjustment email: {email_result.get('error')}")
+            except Exception as adj_error:
+                logger.error(f"[A8_AUDITOR] Error processing adjustment notification: {adj_error}")
+        
+        next_stage = self.get_next_stage(stage)
+        if next_stage and next_stage != WorkflowStage.E5_APROBADO:
+            next_agent_id = STAGE_TO_AGENT.get(next_stage)
+            next_agent = self.get_agent_config(next_agent_id)
+            
+            if next_agent:
+                await event_emitter.emit_sending(project_id, agent_id, next_agent_id)
+                
+                # Run synchronous LLM call in thread to avoid blocking event loop
+                email_body = await asyncio.to_thread(
+                    agentic_service.generate_inter_agent_message,
+                    from_agent=agent_id,
+                    to_agent=next_agent_id,
+                    project_data=project,
+                    analysis_result=reasoning_result,
+                    stage=stage.value
+                )
+                
+                email_subject = f"[Revisar.IA] Deliberación {project_id}: {project.get('name', '')}"
+                
+                try:
+                    attachments = []
+                    if full_report_path and Path(full_report_path).exists():
+                        attachments.append(full_report_path)
+                    
+                    if attachments:
+                        email_result = await asyncio.to_thread(
+                            self.email_service.send_email_with_attachments,
+                            from_agent_id=agent_id,
+                            to_email=next_agent.get("email", ""),
+                            subject=email_subject,
+                            body=email_body,
+                            attachments=attachments
+                        )
+                    else:
+                        email_result = await asyncio.to_thread(
+                            self.email_service.send_email,
+                            from_agent_id=agent_id,
+                            to_email=next_agent.get("email", ""),
+                            subject=email_subject,
+                            body=email_body
+                        )
+                    
+                    deliberation.email_sent = email_result
+                    
+                    if email_result.get("success"):
+                        defense_file_service.add_email(project_id, {
+                            "from_email": agent_config.get("email", ""),
+                            "to_email": next_agent.get("email", ""),
+                            "subject": f"[Revisar.IA] Deliberación {stage.value}",
+                            "body": email_body[:500],
+                            "message_id": email_result.get("message_id", ""),
+                            "attachments": email_result.get("attachments", [])
+                        })
+                        
+                        evidence_portfolio_service.add_to_communication_log(
+                            project_id=project_id,
+                            entry={
+                                "timestamp": datetime.now(timezone.utc).isoformat(),
+                                "action": "email_sent",
+                                "from_agent": agent_id,
+                                "to_agent": next_agent_id,
+                                "email_subject": email_subject,
+                                "attachment_name": Path(full_report_path).name if full_report_path else None,
+                                "pcloud_link": pcloud_link
+                            }
+                        )
+                        logger.info(f"📧 Email with attachment sent from {agent_id} to {next_agent_id}")
+                        
+                except Exception as e:
+                    logger.error(f"Error sending inter-agent email: {e}")
+        
+        return {"report_path": report_path, "pcloud_link": pcloud_link}
+    
     async def resume_deliberation(self, project_id: str, force: bool = False) -> Dict:
         """
         Resume a paused or failed deliberation from the last completed stage.
@@ -1341,13 +1489,16 @@ Sistema Revisar.IA - Revisar.ia
         
         await deliberation_state_repository.update_status(project_id, "in_progress")
         
-        return await self._resume_from_stage(
+        result = await self._resume_from_stage(
             project_id=project_id,
             project=project_data,
             empresa_id=empresa_id,
             last_completed_stage=last_completed_stage,
             previous_results=stage_results
         )
+        if result.get("success"):
+            self._rag_contexts.pop(project_id, None)
+        return result
     
     async def _resume_from_stage(
         self,
@@ -1391,7 +1542,14 @@ Sistema Revisar.IA - Revisar.ia
         remaining_stages = stage_order[start_idx:]
         logger.info(f"Resuming from index {start_idx}, remaining stages: {remaining_stages}")
         
-        preloaded_rag_contexts = preload_rag_contexts_parallel(project, self.rag_service)
+        project.setdefault("id", project_id)
+        preloaded_rag_contexts = await self._load_rag_contexts(project)
+        
+        cliente_id = get_cliente_id_from_project(project)
+        cliente_contextos = {}
+        if cliente_id:
+            resume_agents = [a for a in (STAGE_TO_AGENT.get(WorkflowStage(s)) for s in remaining_stages) if a]
+            cliente_contextos = await self._fetch_cliente_contextos(cliente_id, resume_agents)
         
         for stage_value in remaining_stages:
             stage = WorkflowStage(stage_value)
@@ -1413,20 +1571,12 @@ Sistema Revisar.IA - Revisar.ia
             rag_context = preloaded_rag_contexts.get(agent_id, [])
             rag_texts = [doc.get("content", "") for doc in rag_context] if rag_context else []
             
-            # Obtener contexto evolutivo del cliente si está disponible (resume)
-            cliente_id = get_cliente_id_from_project(project)
+            # Contexto evolutivo del cliente si está disponible (resume)
             project_description = f"{project.get('name', '')} {project.get('description', '')}"
-            if cliente_id:
-                try:
-                    cliente_contexto_str = await cliente_contexto_service.get_contexto_para_agente(
-                        cliente_id=cliente_id,
-                        agente_id=agent_id
-                    )
-                    if cliente_contexto_str and not cliente_contexto_str.startswith("[ERROR]"):
-                        rag_texts = [cliente_contexto_str] + rag_texts
-                        logger.info(f"✅ [RESUME] Contexto evolutivo incluido para {agent_id}, cliente {cliente_id}")
-                except Exception as ctx_err:
-                    logger.warning(f"[RESUME] Error obteniendo contexto evolutivo: {ctx_err}")
+            cliente_contexto_str = cliente_contextos.get(agent_id)
+            if cliente_contexto_str:
+                rag_texts = [cliente_contexto_str] + rag_texts
+                logger.info(f"✅ [RESUME] Contexto evolutivo incluido para {agent_id}, cliente {cliente_id}")
             
             reasoning_start_time = datetime.now(timezone.utc)
             
@@ -23,6 +23,8 @@ from reportlab.platypus import (
 )
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 
+from services.metrics_registry import span
+
 logger = logging.getLogger(__name__)
 
 # Email configuration
@@ -219,6 +221,7 @@ class DevilsAdvocateExportService:
             alignment=TA_JUSTIFY
         ))
 
+    @span("pdf_export", tipo="abogado_diablo")
     def _generate_pdf_sync(self, data: Dict[str, Any]) -> BytesIO:
         """Internal synchronous method to generate PDF."""
         buffer = BytesIO()
@@ -17,18 +17,52 @@ Este módulo genera información altamente sensible (diario interno
 de decisiones). Debe tratarse como herramienta interna de compliance,
 NO como documentación a entregar a autoridades.
 
+PERSISTENCIA:
+La memoria del servicio es un caché write-through de PostgreSQL
+(services/devils_advocate_store.py, migración 010). Los métodos
+síncronos actualizan la memoria y encolan la escritura; las rutas
+llaman a `await sincronizar()` antes de responder. Al iniciar,
+`precargar()` trae huellas en curso, perfiles, lecciones y contadores;
+`refrescar()` vuelve a leer los agregados que escriben otros workers y
+`await cargar_huella(proyecto_id)` trae una huella que no está en memoria
+(abierta por otro worker o cerrada fuera del LRU).
+Cerrar una huella suma a su perfil y a los contadores globales en
+O(1), sin recorrer el historial. Sin DATABASE_URL el servicio opera
+solo en memoria.
+
+Configuración por variables de entorno:
+- DEVILS_ADVOCATE_HUELLAS_CERRADAS_MAX (default 512): huellas cerradas en memoria
+- DEVILS_ADVOCATE_REFRESCO_SEG (default 30): antigüedad máxima de los agregados
+
 ============================================================
 """
 
 from enum import Enum
-from typing import List, Dict, Optional, Any, Tuple
-from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Any, Tuple, Callable
+from dataclasses import dataclass, field, asdict
 from datetime import datetime
+from collections import OrderedDict, deque
+import asyncio
 import logging
 import json
+import os
+import time
+
+import asyncpg
+
+from services.devils_advocate_store import DATABASE_URL, DevilsAdvocateStore
 
 logger = logging.getLogger(__name__)
 
+HUELLAS_CERRADAS_MAX = int(os.environ.get("DEVILS_ADVOCATE_HUELLAS_CERRADAS_MAX", "512"))
+REFRESCO_SEG = float(os.environ.get("DEVILS_ADVOCATE_REFRESCO_SEG", "30"))
+
+# Contadores globales mantenidos de forma incremental
+CONTADORES = (
+    "total_huellas", "huellas_cerradas", "huellas_aprobadas", "huellas_rechazadas",
+    "preguntas_respondidas", "riesgos_documentados", "riesgos_criticos",
+)
+
 
 # ============================================================
 # ENUMS
@@ -238,6 +272,10 @@ class PerfilRiesgoDinamico:
     # Última actualización
     updated_at: datetime = field(default_factory=datetime.now)
 
+    # Acumuladores del promedio (aprobados que reportaron score)
+    suma_score_aprobados: float = 0.0
+    casos_con_score: int = 0
+
 
 @dataclass
 class LeccionAprendida:
@@ -266,6 +304,131 @@ class LeccionAprendida:
     created_at: datetime = field(default_factory=datetime.now)
 
 
+# ============================================================
+# SERIALIZACIÓN (caché <-> PostgreSQL)
+# ============================================================
+
+def _serializable(valor: Any) -> Any:
+    """Enums a su valor y fechas a ISO 8601, recursivamente."""
+    if isinstance(valor, Enum):
+        return valor.value
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, dict):
+        return {k: _serializable(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_serializable(v) for v in valor]
+    return valor
+
+
+def _fecha(valor: Any) -> Optional[datetime]:
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(valor)
+
+
+def huella_a_dict(huella: HuellaRevision) -> Dict[str, Any]:
+    return _serializable(asdict(huella))
+
+
+def huella_desde_dict(datos: Dict[str, Any]) -> HuellaRevision:
+    return HuellaRevision(
+        proyecto_id=datos["proyecto_id"],
+        empresa_id=datos["empresa_id"],
+        industria=CategoriaIndustria(datos["industria"]),
+        tipo_servicio=datos["tipo_servicio"],
+        monto=datos["monto"],
+        proveedor_rfc=datos["proveedor_rfc"],
+        fecha_inicio=_fecha(datos["fecha_inicio"]),
+        fecha_cierre=_fecha(datos.get("fecha_cierre")),
+        resultado_final=datos["resultado_final"],
+        scores_por_fase=datos.get("scores_por_fase") or {},
+        cambios_semaforo=[
+            CambioSemaforo(**{**c, "fase": FaseProyecto(c["fase"]), "fecha": _fecha(c["fecha"])})
+            for c in datos.get("cambios_semaforo", [])
+        ],
+        evidencias_clave=[EvidenciaClave(**e) for e in datos.get("evidencias_clave", [])],
+        preguntas_respondidas=[
+            PreguntaIncomoda(**{**p, "fecha_registro": _fecha(p["fecha_registro"])})
+            for p in datos.get("preguntas_respondidas", [])
+        ],
+        riesgos_residuales=[
+            RiesgoResidual(**{
+                **r, "nivel": NivelRiesgoResidual(r["nivel"]), "fecha_aprobacion": _fecha(r["fecha_aprobacion"])
+            })
+            for r in datos.get("riesgos_residuales", [])
+        ],
+        created_at=_fecha(datos["created_at"]),
+        created_by=datos.get("created_by", ""),
+    )
+
+
+def _es_riesgo_critico(nivel: Any) -> bool:
+    return nivel in (NivelRiesgoResidual.ALTO, NivelRiesgoResidual.CRITICO, "alto", "critico")
+
+
+def contribucion_huella(datos: Dict[str, Any]) -> Dict[str, int]:
+    """Lo que una huella (serializada) aporta a los contadores globales."""
+    riesgos = datos.get("riesgos_residuales", [])
+    return {
+        "total_huellas": 1,
+        "huellas_cerradas": int(bool(datos.get("fecha_cierre"))),
+        "huellas_aprobadas": int(datos.get("resultado_final") == "aprobado"),
+        "huellas_rechazadas": int(datos.get("resultado_final") == "rechazado"),
+        "preguntas_respondidas": len(datos.get("preguntas_respondidas", [])),
+        "riesgos_documentados": len(riesgos),
+        "riesgos_criticos": sum(1 for r in riesgos if _es_riesgo_critico(r["nivel"])),
+    }
+
+
+def leccion_a_dict(leccion: LeccionAprendida) -> Dict[str, Any]:
+    return _serializable(asdict(leccion))
+
+
+def leccion_desde_dict(datos: Dict[str, Any]) -> LeccionAprendida:
+    return LeccionAprendida(
+        id=datos["id"],
+        titulo=datos["titulo"],
+        descripcion=datos.get("descripcion") or "",
+        industria=CategoriaIndustria(datos.get("industria") or CategoriaIndustria.OTRO.value),
+        tipo_servicio=datos.get("tipo_servicio") or "todos",
+        categoria=datos.get("categoria") or "",
+        norma_relacionada=datos.get("norma_relacionada") or "",
+        contexto=datos.get("contexto") or "",
+        problema_detectado=datos.get("problema_detectado") or "",
+        solucion_aplicada=datos.get("solucion_aplicada") or "",
+        aplicable_cuando=list(datos.get("aplicable_cuando") or []),
+        no_aplicable_cuando=list(datos.get("no_aplicable_cuando") or []),
+        veces_aplicada=datos.get("veces_aplicada") or 0,
+        veces_exitosa=datos.get("veces_exitosa") or 0,
+        created_at=_fecha(datos.get("created_at")) or datetime.now(),
+    )
+
+
+def perfil_desde_dict(datos: Dict[str, Any]) -> PerfilRiesgoDinamico:
+    casos_con_score = datos.get("casos_con_score") or 0
+    suma = float(datos.get("suma_score_aprobados") or 0)
+    updated_at = _fecha(datos.get("updated_at")) or datetime.now()
+    if updated_at.tzinfo is not None:
+        updated_at = updated_at.astimezone().replace(tzinfo=None)
+    return PerfilRiesgoDinamico(
+        industria=CategoriaIndustria(datos["industria"]),
+        tipo_servicio=datos["tipo_servicio"],
+        rango_monto=datos["rango_monto"],
+        total_casos=datos["total_casos"],
+        casos_aprobados=datos["casos_aprobados"],
+        casos_rechazados=datos["casos_rechazados"],
+        score_promedio_aprobados=suma / casos_con_score if casos_con_score else 0,
+        evidencias_minimas=list(datos.get("evidencias_minimas") or []),
+        objeciones_frecuentes=list(datos.get("objeciones_frecuentes") or []),
+        patrones_exito=list(datos.get("patrones_exito") or []),
+        alertas=list(datos.get("alertas") or []),
+        updated_at=updated_at,
+        suma_score_aprobados=suma,
+        casos_con_score=casos_con_score,
+    )
+
+
 # ============================================================
 # MODELO DE PREGUNTA ESTRUCTURADA
 # ============================================================
@@ -785,12 +948,196 @@ class DevilsAdvocateService:
     ACCESO: Solo administradores.
     """
 
-    def __init__(self):
-        # En producción, esto vendría de la BD
+    def __init__(self, store: Optional[DevilsAdvocateStore] = None):
+        # Huellas en curso (todas) y cerradas recientes (LRU); perfiles y
+        # lecciones completos. Con `store` es un caché de PostgreSQL.
         self._huellas: Dict[str, HuellaRevision] = {}
+        self._huellas_cerradas: "OrderedDict[str, HuellaRevision]" = OrderedDict()
         self._perfiles: Dict[str, PerfilRiesgoDinamico] = {}
         self._lecciones: Dict[str, LeccionAprendida] = {}
-        self._estadisticas_globales: Dict[str, Any] = {}
+        self._contadores: Dict[str, int] = dict.fromkeys(CONTADORES, 0)
+
+        self._store = store
+        self._pendientes: deque = deque()
+        self._lock_escritura: Optional[asyncio.Lock] = None
+        self._refrescado_en: Optional[float] = None
+        self.stats = {"escrituras": 0, "errores_escritura": 0, "precargas": 0, "refrescos": 0}
+
+    # ============================================================
+    # PERSISTENCIA (CACHÉ WRITE-THROUGH)
+    # ============================================================
+
+    def _persistir(self, metodo: str, *args, al_terminar: Optional[Callable[[Any], None]] = None):
+        """Encola una llamada a `metodo` del store; se aplica en orden con sincronizar()."""
+        if self._store is not None:
+            self._pendientes.append((metodo, args, al_terminar))
+
+    def _desactivar_store(self, error: Exception):
+        logger.warning(
+            f"[ABOGADO_DIABLO] Tablas de agregados no disponibles "
+            f"(migrations/010_abogado_diablo_agregados.sql): {error}; el servicio opera solo en memoria"
+        )
+        self._store = None
+        self._pendientes.clear()
+
+    async def sincronizar(self) -> int:
+        """
+        Aplica en PostgreSQL las escrituras pendientes, en el orden en que se
+        hicieron. Una escritura fallida se registra y no detiene las siguientes.
+        """
+        if not self._pendientes:
+            return 0
+        if self._lock_escritura is None:
+            self._lock_escritura = asyncio.Lock()
+
+        aplicadas = 0
+        async with self._lock_escritura:
+            while self._pendientes and self._store is not None:
+                metodo, args, al_terminar = self._pendientes.popleft()
+                try:
+                    resultado = await getattr(self._store, metodo)(*args)
+                except (asyncpg.exceptions.UndefinedTableError, asyncpg.exceptions.UndefinedColumnError) as e:
+                    self._desactivar_store(e)
+                    break
+                except Exception as e:
+                    self.stats["errores_escritura"] += 1
+                    logger.error(f"[ABOGADO_DIABLO] Escritura '{metodo}' falló: {e}")
+                    continue
+                aplicadas += 1
+                if al_terminar is not None and resultado is not None:
+                    al_terminar(resultado)
+        self.stats["escrituras"] += aplicadas
+        return aplicadas
+
+    async def precargar(self) -> bool:
+        """
+        Calienta el caché al iniciar: huellas en curso, perfiles, lecciones y
+        contadores. Devuelve False si no hay store o no se pudo leer.
+        """
+        if self._store is None:
+            return False
+        await self.sincronizar()
+        try:
+            datos = await self._store.cargar()
+        except (asyncpg.exceptions.UndefinedTableError, asyncpg.exceptions.UndefinedColumnError) as e:
+            self._desactivar_store(e)
+            return False
+        except Exception as e:
+            logger.error(f"[ABOGADO_DIABLO] No se pudo precargar desde la BD: {e}")
+            return False
+
+        self._aplicar_agregados(datos)
+        self._huellas = {}
+        for fila in datos["huellas"]:
+            huella = huella_desde_dict(fila)
+            self._huellas[huella.proyecto_id] = huella
+        self._huellas_cerradas.clear()
+        self.stats["precargas"] += 1
+        logger.info(
+            f"[ABOGADO_DIABLO] Precarga: {len(self._huellas)} huellas en curso, "
+            f"{len(self._perfiles)} perfiles, {len(self._lecciones)} lecciones"
+        )
+        return True
+
+    async def refrescar(self, max_edad: float = REFRESCO_SEG) -> bool:
+        """
+        Vuelve a leer perfiles, lecciones y contadores si tienen más de
+        `max_edad` segundos, para ver lo que escribieron otros workers.
+        """
+        if self._store is None:
+            return False
+        ahora = time.monotonic()
+        if self._refrescado_en is not None and ahora - self._refrescado_en < max_edad:
+            return False
+        await self.sincronizar()
+        try:
+            datos = await self._store.cargar_agregados()
+        except (asyncpg.exceptions.UndefinedTableError, asyncpg.exceptions.UndefinedColumnError) as e:
+            self._desactivar_store(e)
+            return False
+        except Exception as e:
+            logger.error(f"[ABOGADO_DIABLO] No se pudieron refrescar los agregados: {e}")
+            return False
+        self._aplicar_agregados(datos)
+        self.stats["refrescos"] += 1
+        return True
+
+    def _aplicar_agregados(self, datos: Dict[str, Any]):
+        self._contadores = {nombre: int(datos["contadores"].get(nombre, 0)) for nombre in CONTADORES}
+        self._perfiles = {}
+        for fila in datos["perfiles"]:
+            self._recordar_perfil(fila)
+        self._lecciones = {}
+        for fila in datos["lecciones"]:
+            leccion = leccion_desde_dict(fila)
+            self._lecciones[leccion.id] = leccion
+        self._refrescado_en = time.monotonic()
+
+    def _recordar_perfil(self, fila: Dict[str, Any]):
+        perfil = perfil_desde_dict(fila)
+        clave = f"{perfil.industria.value}|{perfil.tipo_servicio}|{perfil.rango_monto}"
+        self._perfiles[clave] = perfil
+
+    def _sumar_contadores(self, delta: Dict[str, int]) -> Dict[str, int]:
+        for nombre, valor in delta.items():
+            self._contadores[nombre] += valor
+        return delta
+
+    def _obtener_huella(self, proyecto_id: str) -> Optional[HuellaRevision]:
+        """Huella en curso o cerrada reciente (la consulta refresca su lugar en el LRU)."""
+        huella = self._huellas.get(proyecto_id)
+        if huella is None:
+            huella = self._huellas_cerradas.get(proyecto_id)
+            if huella is not None:
+                self._huellas_cerradas.move_to_end(proyecto_id)
+        return huella
+
+    async def cargar_huella(self, proyecto_id: str) -> Optional[HuellaRevision]:
+        """
+        Huella del proyecto desde memoria o, si no está, desde la BD: la
+        abrió otro worker, el proceso se reinició o salió del LRU. Las rutas
+        la llaman antes de los métodos síncronos que reciben proyecto_id.
+        """
+        huella = self._obtener_huella(proyecto_id)
+        if huella is not None or self._store is None:
+            return huella
+        await self.sincronizar()
+        try:
+            datos = await self._store.obtener_huella(proyecto_id)
+        except (asyncpg.exceptions.UndefinedTableError, asyncpg.exceptions.UndefinedColumnError) as e:
+            self._desactivar_store(e)
+            return None
+        except Exception as e:
+            logger.error(f"[ABOGADO_DIABLO] No se pudo leer la huella de {proyecto_id}: {e}")
+            return None
+        if datos is None:
+            return None
+
+        huella = huella_desde_dict(datos)
+        if huella.resultado_final == "en_proceso":
+            self._huellas[proyecto_id] = huella
+        else:
+            self._archivar_huella(huella)
+        return huella
+
+    def _archivar_huella(self, huella: HuellaRevision):
+        """Pasa una huella cerrada al LRU; las más antiguas quedan solo en la BD."""
+        self._huellas.pop(huella.proyecto_id, None)
+        self._huellas_cerradas[huella.proyecto_id] = huella
+        self._huellas_cerradas.move_to_end(huella.proyecto_id)
+        while len(self._huellas_cerradas) > HUELLAS_CERRADAS_MAX:
+            self._huellas_cerradas.popitem(last=False)
+
+    @staticmethod
+    def _delta_riesgo(riesgo: RiesgoResidual) -> Dict[str, int]:
+        return {"riesgos_documentados": 1, "riesgos_criticos": int(_es_riesgo_critico(riesgo.nivel))}
+
+    def _agregar_evento(self, huella: HuellaRevision, campo: str, evento: Any, delta: Optional[Dict[str, int]] = None):
+        """Agrega un evento a una lista de la huella en memoria y en la BD."""
+        getattr(huella, campo).append(evento)
+        if delta:
+            self._sumar_contadores(delta)
+        self._persistir("agregar_a_huella", huella.proyecto_id, campo, _serializable(asdict(evento)), delta)
 
     # ============================================================
     # REGISTRO DE HUELLAS
@@ -828,7 +1175,18 @@ class DevilsAdvocateService:
             created_by=admin_id
         )
 
+        # Reemplazar la huella de un proyecto descuenta lo que aportaba
+        anterior = self._obtener_huella(proyecto_id)
+        datos = huella_a_dict(huella)
+        delta = contribucion_huella(datos)
+        if anterior is not None:
+            for nombre, valor in contribucion_huella(huella_a_dict(anterior)).items():
+                delta[nombre] -= valor
+            self._huellas_cerradas.pop(proyecto_id, None)
+        self._sumar_contadores(delta)
+
         self._huellas[proyecto_id] = huella
+        self._persistir("registrar_huella", datos, contribucion_huella)
         logger.info(f"[ABOGADO_DIABLO] Huella iniciada para proyecto {proyecto_id}")
 
         return huella
@@ -850,7 +1208,8 @@ class DevilsAdvocateService:
         Registra un cambio de color en el semáforo.
         Esto es clave para entender qué evidencia hace la diferencia.
         """
-        if proyecto_id not in self._huellas:
+        huella = self._obtener_huella(proyecto_id)
+        if huella is None:
             logger.warning(f"[ABOGADO_DIABLO] Proyecto {proyecto_id} no tiene huella registrada")
             return None
 
@@ -867,7 +1226,7 @@ class DevilsAdvocateService:
             version_entregable=version_entregable
         )
 
-        self._huellas[proyecto_id].cambios_semaforo.append(cambio)
+        self._agregar_evento(huella, "cambios_semaforo", cambio)
 
         # Si pasó de amarillo/rojo a verde, marcar las evidencias como clave
         if color_nuevo == "verde" and color_anterior in ["amarillo", "rojo"]:
@@ -892,7 +1251,8 @@ class DevilsAdvocateService:
         norma_acreditada: str = "general"
     ):
         """Registra una evidencia como clave para el caso"""
-        if proyecto_id not in self._huellas:
+        huella = self._obtener_huella(proyecto_id)
+        if huella is None:
             return
 
         evidencia = EvidenciaClave(
@@ -902,7 +1262,7 @@ class DevilsAdvocateService:
             impacto=impacto
         )
 
-        self._huellas[proyecto_id].evidencias_clave.append(evidencia)
+        self._agregar_evento(huella, "evidencias_clave", evidencia)
 
     def registrar_scores_fase(
         self,
@@ -914,16 +1274,18 @@ class DevilsAdvocateService:
         score_total: float
     ):
         """Registra los scores de una fase específica"""
-        if proyecto_id not in self._huellas:
+        huella = self._obtener_huella(proyecto_id)
+        if huella is None:
             return
 
-        self._huellas[proyecto_id].scores_por_fase[fase.value] = {
+        huella.scores_por_fase[fase.value] = {
             "formal": score_formal,
             "materialidad": score_materialidad,
             "razon_negocios": score_razon,
             "total": score_total,
             "fecha": datetime.now().isoformat()
         }
+        self._persistir("actualizar_huella", proyecto_id, {"scores_por_fase": huella.scores_por_fase})
 
     # ============================================================
     # PREGUNTAS ESTRUCTURADAS (25 PREGUNTAS CON SEVERIDAD)
@@ -1273,7 +1635,8 @@ class DevilsAdvocateService:
         Registra la respuesta a una pregunta incómoda.
         Esto construye la biblioteca de argumentos de defensa.
         """
-        if proyecto_id not in self._huellas:
+        huella = self._obtener_huella(proyecto_id)
+        if huella is None:
             logger.warning(f"[ABOGADO_DIABLO] Proyecto {proyecto_id} no tiene huella")
             return None
 
@@ -1285,7 +1648,7 @@ class DevilsAdvocateService:
             norma_relacionada=norma_relacionada
         )
 
-        self._huellas[proyecto_id].preguntas_respondidas.append(pregunta_obj)
+        self._agregar_evento(huella, "preguntas_respondidas", pregunta_obj, {"preguntas_respondidas": 1})
 
         logger.info(f"[ABOGADO_DIABLO] Pregunta respondida en {proyecto_id}: {pregunta[:50]}...")
 
@@ -1309,7 +1672,8 @@ class DevilsAdvocateService:
         Registra un riesgo aceptado conscientemente.
         Esto es crítico para documentar decisiones con información incompleta.
         """
-        if proyecto_id not in self._huellas:
+        huella = self._obtener_huella(proyecto_id)
+        if huella is None:
             return None
 
         riesgo = RiesgoResidual(
@@ -1322,7 +1686,7 @@ class DevilsAdvocateService:
             monto_exposicion=monto_exposicion
         )
 
-        self._huellas[proyecto_id].riesgos_residuales.append(riesgo)
+        self._agregar_evento(huella, "riesgos_residuales", riesgo, self._delta_riesgo(riesgo))
 
         logger.warning(f"[ABOGADO_DIABLO] Riesgo {nivel.value} registrado en {proyecto_id}: {descripcion[:50]}...")
 
@@ -1341,12 +1705,21 @@ class DevilsAdvocateService:
         """
         Cierra la huella de un proyecto y dispara el aprendizaje.
         """
-        if proyecto_id not in self._huellas:
+        huella = self._obtener_huella(proyecto_id)
+        if huella is None:
             return None
 
-        huella = self._huellas[proyecto_id]
+        delta = {
+            "huellas_cerradas": 0 if huella.fecha_cierre else 1,
+            "huellas_aprobadas": int(resultado == "aprobado") - int(huella.resultado_final == "aprobado"),
+            "huellas_rechazadas": int(resultado == "rechazado") - int(huella.resultado_final == "rechazado"),
+        }
         huella.fecha_cierre = datetime.now()
         huella.resultado_final = resultado
+        self._sumar_contadores(delta)
+        cierre = {"fecha_cierre": huella.fecha_cierre.isoformat(), "resultado_final": resultado}
+        self._persistir("actualizar_huella", proyecto_id, cierre, delta)
+        self._archivar_huella(huella)
 
         # Actualizar perfil de riesgo dinámico
         self._actualizar_perfil_riesgo(huella)
@@ -1381,6 +1754,8 @@ class DevilsAdvocateService:
     def _actualizar_perfil_riesgo(self, huella: HuellaRevision):
         """
         Actualiza el perfil de riesgo dinámico con la información del proyecto.
+        Suma la huella a los contadores del perfil: el costo no depende de
+        cuántos casos tenga ya el perfil.
         """
         clave = self._obtener_clave_perfil(
             huella.industria,
@@ -1405,20 +1780,24 @@ class DevilsAdvocateService:
 
         perfil = self._perfiles[clave]
         perfil.total_casos += 1
+        aprobado = huella.resultado_final == "aprobado"
+        ultimo_score: Optional[float] = None
+        evidencias: List[str] = []
 
-        if huella.resultado_final == "aprobado":
+        if aprobado:
             perfil.casos_aprobados += 1
 
-            # Actualizar score promedio
+            # Promedio sobre los aprobados que reportaron score (última fase)
             if huella.scores_por_fase:
                 ultimo_score = list(huella.scores_por_fase.values())[-1].get("total", 0)
-                perfil.score_promedio_aprobados = (
-                    (perfil.score_promedio_aprobados * (perfil.casos_aprobados - 1) + ultimo_score)
-                    / perfil.casos_aprobados
-                )
+                perfil.suma_score_aprobados += ultimo_score
+                perfil.casos_con_score += 1
+                perfil.score_promedio_aprobados = perfil.suma_score_aprobados / perfil.casos_con_score
 
             # Extraer evidencias que funcionaron
             for ev in huella.evidencias_clave:
+                if ev.tipo_evidencia not in evidencias:
+                    evidencias.append(ev.tipo_evidencia)
                 if ev.tipo_evidencia not in perfil.evidencias_minimas:
                     perfil.evidencias_minimas.append(ev.tipo_evidencia)
 
@@ -1427,6 +1806,13 @@ class DevilsAdvocateService:
 
         perfil.updated_at = datetime.now()
 
+        # La BD devuelve el perfil con lo que sumaron otros workers
+        self._persistir(
+            "acumular_perfil",
+            huella.industria.value, huella.tipo_servicio, perfil.rango_monto, aprobado, ultimo_score, evidencias,
+            al_terminar=self._recordar_perfil
+        )
+
     def obtener_perfil_riesgo(
         self,
         industria: CategoriaIndustria,
@@ -1498,7 +1884,7 @@ class DevilsAdvocateService:
                 leccion_id = f"LECCION_{huella.proyecto_id}_{cambio.fase.value}"
 
                 if leccion_id not in self._lecciones:
-                    self._lecciones[leccion_id] = LeccionAprendida(
+                    leccion = self._lecciones[leccion_id] = LeccionAprendida(
                         id=leccion_id,
                         titulo=f"Cambio {cambio.color_anterior}→verde en {cambio.fase.value}",
                         descripcion=cambio.justificacion,
@@ -1512,6 +1898,7 @@ class DevilsAdvocateService:
                         aplicable_cuando=[f"Tipo: {huella.tipo_servicio}", f"Industria: {huella.industria.value}"],
                         no_aplicable_cuando=[]
                     )
+                    self._persistir("guardar_leccion", leccion_a_dict(leccion))
 
     def registrar_leccion_manual(
         self,
@@ -1549,6 +1936,7 @@ class DevilsAdvocateService:
         )
 
         self._lecciones[leccion_id] = leccion
+        self._persistir("guardar_leccion", leccion_a_dict(leccion), "manual")
 
         logger.info(f"[ABOGADO_DIABLO] Lección manual registrada: {titulo}")
 
@@ -1610,18 +1998,24 @@ class DevilsAdvocateService:
         }
 
         # Marcar la huella si existe
-        if proyecto_id in self._huellas:
-            # Agregar nota de incidente
-            self._huellas[proyecto_id].riesgos_residuales.append(
-                RiesgoResidual(
-                    descripcion=f"INCIDENTE SAT: {descripcion}",
-                    nivel=NivelRiesgoResidual.CRITICO,
-                    justificacion="Incidente registrado post-aprobación",
-                    mitigacion_propuesta="Revisar criterios de aprobación",
-                    aprobado_por="SISTEMA",
-                    fecha_aprobacion=datetime.now(),
-                    monto_exposicion=monto_cuestionado
-                )
+        riesgo = RiesgoResidual(
+            descripcion=f"INCIDENTE SAT: {descripcion}",
+            nivel=NivelRiesgoResidual.CRITICO,
+            justificacion="Incidente registrado post-aprobación",
+            mitigacion_propuesta="Revisar criterios de aprobación",
+            aprobado_por="SISTEMA",
+            fecha_aprobacion=datetime.now(),
+            monto_exposicion=monto_cuestionado
+        )
+        huella = self._obtener_huella(proyecto_id)
+        if huella is not None:
+            self._agregar_evento(huella, "riesgos_residuales", riesgo, self._delta_riesgo(riesgo))
+        else:
+            # Huella cerrada que ya salió del caché: la BD la marca si existe
+            # y los contadores se ven en el siguiente refrescar()
+            self._persistir(
+                "agregar_a_huella", proyecto_id, "riesgos_residuales",
+                _serializable(asdict(riesgo)), self._delta_riesgo(riesgo)
             )
 
         logger.warning(f"[ABOGADO_DIABLO] INCIDENTE SAT registrado para {proyecto_id}: {tipo_acto}")
@@ -1718,19 +2112,16 @@ class DevilsAdvocateService:
     def obtener_estadisticas_globales(self) -> Dict[str, Any]:
         """
         Obtiene estadísticas globales del módulo Abogado del Diablo.
+        Sale de los contadores incrementales, sin recorrer las huellas.
         """
-        total_huellas = len(self._huellas)
-        huellas_cerradas = sum(1 for h in self._huellas.values() if h.fecha_cierre)
-        huellas_aprobadas = sum(1 for h in self._huellas.values() if h.resultado_final == "aprobado")
-        huellas_rechazadas = sum(1 for h in self._huellas.values() if h.resultado_final == "rechazado")
-
-        total_preguntas = sum(len(h.preguntas_respondidas) for h in self._huellas.values())
-        total_riesgos = sum(len(h.riesgos_residuales) for h in self._huellas.values())
-        riesgos_criticos = sum(
-            1 for h in self._huellas.values()
-            for r in h.riesgos_residuales
-            if r.nivel in [NivelRiesgoResidual.ALTO, NivelRiesgoResidual.CRITICO]
-        )
+        total_huellas = self._contadores["total_huellas"]
+        huellas_cerradas = self._contadores["huellas_cerradas"]
+        huellas_aprobadas = self._contadores["huellas_aprobadas"]
+        huellas_rechazadas = self._contadores["huellas_rechazadas"]
+
+        total_preguntas = self._contadores["preguntas_respondidas"]
+        total_riesgos = self._contadores["riesgos_documentados"]
+        riesgos_criticos = self._contadores["riesgos_criticos"]
 
         return {
             "resumen": {
@@ -1757,7 +2148,7 @@ class DevilsAdvocateService:
 # INSTANCIA GLOBAL
 # ============================================================
 
-devils_advocate_service = DevilsAdvocateService()
+devils_advocate_service = DevilsAdvocateService(store=DevilsAdvocateStore() if DATABASE_URL else None)
 
 
 def get_devils_advocate_service() -> DevilsAdvocateService:
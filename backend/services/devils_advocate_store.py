@@ -0,0 +1,315 @@
+"""
+Almacén PostgreSQL de los agregados del Abogado del Diablo.
+
+DevilsAdvocateService guarda en memoria huellas, perfiles, lecciones y
+contadores; este módulo los persiste (migrations/010_abogado_diablo_agregados.sql)
+para que sobrevivan reinicios y se compartan entre workers:
+
+- Huellas como JSONB por proyecto; cada evento (cambio de semáforo,
+  pregunta, riesgo) se agrega al arreglo sin reescribir la huella
+- Cerrar una huella suma al perfil con un solo UPSERT de contadores
+  (total, aprobados, rechazados, suma de scores); el costo no depende
+  del historial
+- Los contadores globales se incrementan en la misma transacción que la
+  escritura que los cambia
+
+Todas las escrituras reciben diccionarios serializables a JSON; la
+conversión desde y hacia los dataclasses vive en el servicio.
+
+Configuración por variables de entorno:
+- DATABASE_URL: conexión a PostgreSQL
+"""
+import os
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.environ.get('DATABASE_URL', '')
+
+_COLUMNAS_PERFIL = """
+    industria, tipo_servicio, rango_monto, total_casos, casos_aprobados, casos_rechazados,
+    suma_score_aprobados, casos_con_score, evidencias_minimas, objeciones_frecuentes,
+    patrones_exito, alertas, updated_at
+"""
+
+_SUMAR_CONTADORES = """
+    INSERT INTO abogado_diablo_contadores AS c (nombre, valor)
+    SELECT key, value::bigint FROM jsonb_each_text($1::jsonb)
+    ON CONFLICT (nombre) DO UPDATE SET valor = c.valor + EXCLUDED.valor
+"""
+
+
+def _json(valor: Any, defecto: Any) -> Any:
+    """asyncpg entrega JSONB como texto salvo que haya un codec registrado."""
+    if valor is None:
+        return defecto
+    if isinstance(valor, str):
+        return json.loads(valor)
+    return valor
+
+
+def _sin_ceros(delta: Optional[Dict[str, int]]) -> Dict[str, int]:
+    return {nombre: valor for nombre, valor in (delta or {}).items() if valor}
+
+
+class DevilsAdvocateStore:
+    """Persistencia de huellas, perfiles, lecciones y contadores del Abogado del Diablo."""
+
+    def __init__(self, database_url: str = DATABASE_URL):
+        self.database_url = database_url
+        self._pool: Optional[asyncpg.Pool] = None
+
+    async def _get_pool(self) -> asyncpg.Pool:
+        """Obtiene o crea el pool de conexiones a PostgreSQL"""
+        if self._pool is None:
+            if not self.database_url:
+                raise RuntimeError("DATABASE_URL no está configurada")
+
+            db_url = self.database_url
+            if db_url.startswith('postgres://'):
+                db_url = db_url.replace('postgres://', 'postgresql://', 1)
+
+            self._pool = await asyncpg.create_pool(
+                db_url,
+                min_size=1,
+                max_size=5,
+                command_timeout=30
+            )
+        return self._pool
+
+    async def close(self):
+        """Cierra el pool de conexiones"""
+        if self._pool:
+            await self._pool.close()
+            self._pool = None
+
+    # ----------------------------------------
+    # Lectura
+    # ----------------------------------------
+
+    async def cargar_agregados(self) -> Dict[str, Any]:
+        """Contadores, perfiles y lecciones (lo que comparten todos los workers)."""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            return await self._leer_agregados(conn)
+
+    async def cargar(self) -> Dict[str, Any]:
+        """Agregados más las huellas en curso, para precargar el servicio al iniciar."""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            datos = await self._leer_agregados(conn)
+            filas = await conn.fetch(
+                """
+                SELECT datos FROM abogado_diablo_huellas_estado
+                WHERE resultado_final = 'en_proceso'
+                ORDER BY updated_at
+                """
+            )
+            datos["huellas"] = [_json(fila["datos"], {}) for fila in filas]
+            return datos
+
+    async def obtener_huella(self, proyecto_id: str) -> Optional[Dict[str, Any]]:
+        """Huella de un proyecto (en curso o cerrada); None si no existe."""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            datos = await conn.fetchval(
+                "SELECT datos FROM abogado_diablo_huellas_estado WHERE proyecto_id = $1",
+                proyecto_id
+            )
+            return _json(datos, None)
+
+    async def _leer_agregados(self, conn) -> Dict[str, Any]:
+        contadores = await conn.fetch("SELECT nombre, valor FROM abogado_diablo_contadores")
+        perfiles = await conn.fetch(f"SELECT {_COLUMNAS_PERFIL} FROM abogado_diablo_perfiles")
+        lecciones = await conn.fetch(
+            """
+            SELECT id, titulo, descripcion, industria, tipo_servicio, categoria,
+                   norma_relacionada, contexto, problema_detectado, solucion_aplicada,
+                   aplicable_cuando, no_aplicable_cuando, veces_aplicada, veces_exitosa,
+                   created_at
+            FROM abogado_diablo_lecciones
+            ORDER BY created_at
+            """
+        )
+        return {
+            "contadores": {fila["nombre"]: fila["valor"] for fila in contadores},
+            "perfiles": [self._perfil(fila) for fila in perfiles],
+            "lecciones": [
+                {
+                    **dict(fila),
+                    "aplicable_cuando": _json(fila["aplicable_cuando"], []),
+                    "no_aplicable_cuando": _json(fila["no_aplicable_cuando"], []),
+                }
+                for fila in lecciones
+            ],
+        }
+
+    @staticmethod
+    def _perfil(fila) -> Dict[str, Any]:
+        perfil = dict(fila)
+        for campo in ("evidencias_minimas", "objeciones_frecuentes", "patrones_exito", "alertas"):
+            perfil[campo] = _json(perfil[campo], [])
+        return perfil
+
+    # ----------------------------------------
+    # Huellas
+    # ----------------------------------------
+
+    async def registrar_huella(self, datos: Dict[str, Any], contribucion: Callable[[Dict[str, Any]], Dict[str, int]]):
+        """
+        Guarda una huella nueva. Si el proyecto ya tenía una, se reemplaza y
+        sus contadores se restan (`contribucion` da los contadores de una huella).
+        """
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                previa = await conn.fetchval(
+                    "SELECT datos FROM abogado_diablo_huellas_estado WHERE proyecto_id = $1 FOR UPDATE",
+                    datos["proyecto_id"]
+                )
+                delta = dict(contribucion(datos))
+                if previa is not None:
+                    for nombre, valor in contribucion(_json(previa, {})).items():
+                        delta[nombre] = delta.get(nombre, 0) - valor
+                await conn.execute(
+                    """
+                    INSERT INTO abogado_diablo_huellas_estado (proyecto_id, empresa_id, resultado_final, datos)
+                    VALUES ($1, $2, $3, $4::jsonb)
+                    ON CONFLICT (proyecto_id) DO UPDATE SET
+                        empresa_id = EXCLUDED.empresa_id,
+                        resultado_final = EXCLUDED.resultado_final,
+                        datos = EXCLUDED.datos,
+                        updated_at = NOW()
+                    """,
+                    datos["proyecto_id"], datos.get("empresa_id"), datos["resultado_final"], json.dumps(datos)
+                )
+                delta = _sin_ceros(delta)
+                if delta:
+                    await conn.execute(_SUMAR_CONTADORES, json.dumps(delta))
+
+    async def agregar_a_huella(
+        self,
+        proyecto_id: str,
+        campo: str,
+        valor: Dict[str, Any],
+        delta: Optional[Dict[str, int]] = None
+    ) -> bool:
+        """Agrega `valor` al arreglo `campo` de la huella; los contadores solo cambian si la huella existe."""
+        return await self._actualizar(
+            """
+            UPDATE abogado_diablo_huellas_estado
+            SET datos = jsonb_set(datos, ARRAY[$2::text],
+                                  COALESCE(datos -> $2, '[]'::jsonb) || jsonb_build_array($3::jsonb)),
+                updated_at = NOW()
+            WHERE proyecto_id = $1
+            """,
+            (proyecto_id, campo, json.dumps(valor)),
+            delta
+        )
+
+    async def actualizar_huella(
+        self,
+        proyecto_id: str,
+        campos: Dict[str, Any],
+        delta: Optional[Dict[str, int]] = None
+    ) -> bool:
+        """Reemplaza campos de primer nivel de la huella (scores, cierre)."""
+        return await self._actualizar(
+            """
+            UPDATE abogado_diablo_huellas_estado
+            SET datos = datos || $2::jsonb,
+                resultado_final = COALESCE($2::jsonb ->> 'resultado_final', resultado_final),
+                updated_at = NOW()
+            WHERE proyecto_id = $1
+            """,
+            (proyecto_id, json.dumps(campos)),
+            delta
+        )
+
+    async def _actualizar(self, sql: str, args: tuple, delta: Optional[Dict[str, int]]) -> bool:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                resultado = await conn.execute(sql, *args)
+                existe = resultado.endswith(" 1")
+                delta = _sin_ceros(delta)
+                if existe and delta:
+                    await conn.execute(_SUMAR_CONTADORES, json.dumps(delta))
+                return existe
+
+    # ----------------------------------------
+    # Perfiles y lecciones
+    # ----------------------------------------
+
+    async def acumular_perfil(
+        self,
+        industria: str,
+        tipo_servicio: str,
+        rango_monto: str,
+        aprobado: bool,
+        score: Optional[float],
+        evidencias: List[str]
+    ) -> Dict[str, Any]:
+        """
+        Suma una huella cerrada a su perfil con un solo UPSERT y devuelve el
+        perfil resultante (incluye lo que hayan sumado otros workers).
+        Las evidencias nuevas se agregan al final en orden de aparición.
+        """
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            fila = await conn.fetchrow(
+                f"""
+                INSERT INTO abogado_diablo_perfiles AS p (
+                    industria, tipo_servicio, rango_monto, total_casos, casos_aprobados,
+                    casos_rechazados, suma_score_aprobados, casos_con_score,
+                    score_promedio_aprobados, evidencias_minimas
+                )
+                VALUES ($1, $2, $3, 1, $4, 1 - $4, $5, $6, CASE WHEN $6 > 0 THEN $5 ELSE 0 END, $7::jsonb)
+                ON CONFLICT (industria, tipo_servicio, rango_monto) DO UPDATE SET
+                    total_casos = p.total_casos + 1,
+                    casos_aprobados = p.casos_aprobados + EXCLUDED.casos_aprobados,
+                    casos_rechazados = p.casos_rechazados + EXCLUDED.casos_rechazados,
+                    suma_score_aprobados = p.suma_score_aprobados + EXCLUDED.suma_score_aprobados,
+                    casos_con_score = p.casos_con_score + EXCLUDED.casos_con_score,
+                    score_promedio_aprobados = COALESCE(
+                        (p.suma_score_aprobados + EXCLUDED.suma_score_aprobados)
+                        / NULLIF(p.casos_con_score + EXCLUDED.casos_con_score, 0),
+                        0
+                    ),
+                    evidencias_minimas = p.evidencias_minimas || COALESCE((
+                        SELECT jsonb_agg(e.valor ORDER BY e.orden)
+                        FROM jsonb_array_elements(EXCLUDED.evidencias_minimas) WITH ORDINALITY AS e(valor, orden)
+                        WHERE NOT p.evidencias_minimas @> jsonb_build_array(e.valor)
+                    ), '[]'::jsonb)
+                RETURNING {_COLUMNAS_PERFIL}
+                """,
+                industria, tipo_servicio, rango_monto, int(aprobado),
+                float(score or 0), int(score is not None), json.dumps(evidencias)
+            )
+            return self._perfil(fila)
+
+    async def guardar_leccion(self, leccion: Dict[str, Any], origen: str = "automatico") -> bool:
+        """Inserta una lección; si el id ya existe (otro worker la extrajo) no hace nada."""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            resultado = await conn.execute(
+                """
+                INSERT INTO abogado_diablo_lecciones (
+                    id, titulo, descripcion, industria, tipo_servicio, categoria,
+                    norma_relacionada, contexto, problema_detectado, solucion_aplicada,
+                    aplicable_cuando, no_aplicable_cuando, veces_aplicada, veces_exitosa, origen
+                )
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11::jsonb, $12::jsonb, $13, $14, $15)
+                ON CONFLICT (id) DO NOTHING
+                """,
+                leccion["id"], leccion["titulo"], leccion["descripcion"], leccion["industria"],
+                leccion["tipo_servicio"], leccion["categoria"], leccion["norma_relacionada"],
+                leccion["contexto"], leccion["problema_detectado"], leccion["solucion_aplicada"],
+                json.dumps(leccion["aplicable_cuando"]), json.dumps(leccion["no_aplicable_cuando"]),
+                leccion["veces_aplicada"], leccion["veces_exitosa"], origen
+            )
+            return resultado.endswith(" 1")
@@ -14,28 +14,24 @@ class DriveIngestionRAG:
         self.drive_service = DriveService()
     
     async def ingest_all_agents(self) -> Dict:
-        """Ingesta inicial de todos los agentes"""
+        """Ingesta de todos los agentes; después de la primera solo procesa cambios"""
         
         from services.agent_service import AGENT_CONFIGURATIONS
         
-        results = {}
+        agentes = [
+            (agent_id, config['drive_folder_id'])
+            for agent_id, config in AGENT_CONFIGURATIONS.items()
+            if agent_id != "PROVEEDOR_IA" and config.get('drive_folder_id')
+        ]
         
-        for agent_id, config in AGENT_CONFIGURATIONS.items():
-            if agent_id == "PROVEEDOR_IA":
-                continue
-            
-            folder_id = config.get('drive_folder_id')
-            if not folder_id:
-                continue
-            
-            logger.info(f"[INGESTION] Procesando {config['name']} ({agent_id})...")
-            
-            result = await self.rag_service.ingest_drive_folder(
-                agent_id=agent_id,
-                folder_id=folder_id
-            )
-            
-            results[agent_id] = result
+        # En paralelo: el presupuesto de descargas y embeddings es global
+        # (DriveSyncService compartido en rag_service)
+        logger.info(f"[INGESTION] Sincronizando {len(agentes)} agentes en paralelo...")
+        resultados = await asyncio.gather(*(
+            self.rag_service.ingest_drive_folder(agent_id=agent_id, folder_id=folder_id)
+            for agent_id, folder_id in agentes
+        ))
+        results = {agent_id: result for (agent_id, _), result in zip(agentes, resultados)}
         
         # Resumen
         total_docs = sum(r.get('docs_processed', 0) for r in results.values())
@@ -0,0 +1,461 @@
+"""
+Sincronización incremental de carpetas de Drive hacia el vector store.
+
+Reemplaza el recorrido completo de ProfessionalRAGService.ingest_drive_folder
+(listar, descargar y re-chunkear los mismos archivos en cada corrida):
+
+- Primera corrida (sin token guardado): se pide changes.getStartPageToken
+  ANTES de listar el árbol, así ningún cambio ocurrido durante el listado
+  se pierde; luego se compara el listado contra el estado guardado
+- Corridas siguientes: una llamada a changes.list desde el token; solo
+  se descargan archivos del árbol cuya revisión (md5Checksum o version)
+  cambió. Si no hubo cambios el costo es esa única llamada
+- Si el texto extraído tiene el mismo hash que el ingerido, solo se
+  actualiza la revisión (y el título si cambió); no se recalculan embeddings
+- Archivos eliminados, enviados a la papelera o movidos fuera del árbol
+  se borran del vector store por metadata file_id
+- Si una carpeta entra o sale del árbol se vuelve a listar y reconciliar
+
+Las descargas y los lotes de embeddings de todos los agentes comparten
+dos semáforos globales; los agentes se sincronizan en paralelo sin
+exceder ese presupuesto. El estado vive en services/drive_sync_store.py.
+
+Configuración por variables de entorno:
+- DRIVE_SYNC_DESCARGAS_CONCURRENTES: descargas simultáneas (default 4)
+- DRIVE_SYNC_EMBEDDINGS_CONCURRENTES: lotes de embeddings/escrituras al
+  vector store simultáneos (default 2)
+"""
+import os
+import io
+import asyncio
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import asyncpg
+
+from services.drive_sync_store import ArchivoSincronizado, DriveSyncStoreMemoria, EstadoSync
+from services.metrics_registry import span
+
+logger = logging.getLogger(__name__)
+
+DESCARGAS_CONCURRENTES = int(os.environ.get('DRIVE_SYNC_DESCARGAS_CONCURRENTES', '4'))
+EMBEDDINGS_CONCURRENTES = int(os.environ.get('DRIVE_SYNC_EMBEDDINGS_CONCURRENTES', '2'))
+
+MIME_CARPETA = 'application/vnd.google-apps.folder'
+CAMPOS_ARCHIVO = "id, name, mimeType, md5Checksum, version, createdTime, modifiedTime, webViewLink, parents, trashed"
+CARPETAS_EXCLUIDAS = ["Plantillas", "Borradores", "Temporal", ".trash", ".Trash"]
+EXPORTACIONES = {
+    'application/vnd.google-apps.document': 'text/plain',
+    'application/vnd.google-apps.spreadsheet': 'text/csv',
+    'application/vnd.google-apps.presentation': 'text/plain',
+}
+MIN_CARACTERES = 50
+
+
+def excluido(nombre: str) -> bool:
+    """Mismas exclusiones que MultiAgentDriveService._list_files_recursive."""
+    return nombre.startswith('~$') or any(e in nombre for e in CARPETAS_EXCLUIDAS)
+
+
+def revision_de(archivo: Dict[str, Any]) -> str:
+    """md5Checksum para binarios; los formatos nativos de Google solo tienen version."""
+    if archivo.get('md5Checksum'):
+        return f"md5:{archivo['md5Checksum']}"
+    if archivo.get('version'):
+        return f"v:{archivo['version']}"
+    return f"t:{archivo.get('modifiedTime', '')}"
+
+
+def enlace_web(archivo: Dict[str, Any]) -> str:
+    """webViewLink o, si falta, el enlace según el tipo de archivo."""
+    if archivo.get('webViewLink'):
+        return archivo['webViewLink']
+    file_id = archivo.get('id')
+    mime_type = archivo.get('mimeType', '')
+    if 'google-apps.document' in mime_type:
+        return f"https://docs.google.com/document/d/{file_id}/view"
+    if 'google-apps.spreadsheet' in mime_type:
+        return f"https://docs.google.com/spreadsheets/d/{file_id}/view"
+    if 'google-apps.presentation' in mime_type:
+        return f"https://docs.google.com/presentation/d/{file_id}/view"
+    return f"https://drive.google.com/file/d/{file_id}/view"
+
+
+def extraer_texto(contenido: Optional[bytes], mime_type: str) -> Optional[str]:
+    """Texto de un archivo descargado (o exportado); None si no es legible."""
+    if not contenido:
+        return None
+    if mime_type in EXPORTACIONES:
+        return contenido.decode('utf-8', errors='ignore')
+    if 'pdf' in mime_type:
+        try:
+            import PyPDF2
+            lector = PyPDF2.PdfReader(io.BytesIO(contenido))
+            return "\n".join((pagina.extract_text() or "") for pagina in lector.pages).strip()
+        except Exception as e:
+            logger.error(f"Error extrayendo PDF: {e}")
+            return None
+    if 'wordprocessingml' in mime_type:
+        try:
+            from docx import Document as DocxDocument
+            documento = DocxDocument(io.BytesIO(contenido))
+            return "\n".join(p.text for p in documento.paragraphs).strip()
+        except Exception as e:
+            logger.error(f"Error extrayendo DOCX: {e}")
+            return None
+    try:
+        return contenido.decode('utf-8')
+    except UnicodeDecodeError:
+        logger.warning(f"Archivo binario no soportado: {mime_type}")
+        return None
+
+
+class DriveAPI:
+    """
+    Llamadas de Drive v3 que usa la sincronización, sobre un servicio de
+    googleapiclient ya autenticado.
+
+    httplib2 no es seguro entre hilos: cada hilo ejecuta las peticiones con
+    su propio cliente HTTP (AuthorizedHttp con las mismas credenciales).
+    """
+
+    def __init__(self, service, http_factory: Optional[Callable[[], Any]] = None):
+        self.service = service
+        self._http_factory = http_factory or self._factory_por_defecto(service)
+        self._local = threading.local()
+
+    @staticmethod
+    def _factory_por_defecto(service) -> Callable[[], Any]:
+        http = service._http
+        credenciales = getattr(http, 'credentials', None)
+        if credenciales is None:
+            return lambda: http
+        import httplib2
+        import google_auth_httplib2
+        return lambda: google_auth_httplib2.AuthorizedHttp(credenciales, http=httplib2.Http())
+
+    def _ejecutar(self, peticion):
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = self._http_factory()
+        return peticion.execute(http=http, num_retries=2)
+
+    def token_inicial(self) -> str:
+        return self._ejecutar(self.service.changes().getStartPageToken())['startPageToken']
+
+    def listar_arbol(self, folder_id: str, max_depth: int = 5) -> Tuple[List[Dict[str, Any]], Set[str]]:
+        """Archivos del árbol (sin carpetas) y los ids de las carpetas recorridas, incluida la raíz."""
+        archivos: List[Dict[str, Any]] = []
+        carpetas = {folder_id}
+        pendientes = [(folder_id, 0)]
+        while pendientes:
+            carpeta, profundidad = pendientes.pop()
+            token = None
+            while True:
+                respuesta = self._ejecutar(self.service.files().list(
+                    q=f"'{carpeta}' in parents and trashed=false",
+                    fields=f"nextPageToken, files({CAMPOS_ARCHIVO})",
+                    pageSize=1000,
+                    pageToken=token
+                ))
+                for item in respuesta.get('files', []):
+                    if excluido(item.get('name', '')):
+                        continue
+                    if item.get('mimeType') == MIME_CARPETA:
+                        if profundidad + 1 < max_depth:
+                            carpetas.add(item['id'])
+                            pendientes.append((item['id'], profundidad + 1))
+                    else:
+                        archivos.append(item)
+                token = respuesta.get('nextPageToken')
+                if not token:
+                    break
+        return archivos, carpetas
+
+    def cambios(self, token: str) -> Tuple[List[Dict[str, Any]], str]:
+        """Cambios desde `token` y el token para la siguiente corrida."""
+        cambios: List[Dict[str, Any]] = []
+        while True:
+            respuesta = self._ejecutar(self.service.changes().list(
+                pageToken=token,
+                spaces='drive',
+                includeRemoved=True,
+                pageSize=1000,
+                fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({CAMPOS_ARCHIVO}))"
+            ))
+            cambios.extend(respuesta.get('changes', []))
+            if respuesta.get('newStartPageToken'):
+                return cambios, respuesta['newStartPageToken']
+            token = respuesta['nextPageToken']
+
+    def descargar(self, archivo: Dict[str, Any]) -> Optional[bytes]:
+        """Contenido del archivo; los formatos nativos de Google se exportan como texto."""
+        mime_type = archivo.get('mimeType', '')
+        if mime_type in EXPORTACIONES:
+            peticion = self.service.files().export_media(fileId=archivo['id'], mimeType=EXPORTACIONES[mime_type])
+        elif mime_type.startswith('application/vnd.google-apps.'):
+            return None
+        else:
+            peticion = self.service.files().get_media(fileId=archivo['id'])
+        return self._ejecutar(peticion)
+
+
+class DriveSyncService:
+    """
+    Sincroniza carpetas de Drive con el vector store de cada agente.
+
+    `vector_store` es un RagRepository (replace_file_chunks,
+    update_file_metadata, delete_file). `fragmentar`, `limpiar` y
+    `tipo_documento` son los del pipeline de ProfessionalRAGService.
+    Una instancia compartida entre agentes comparte el presupuesto de
+    descargas y embeddings.
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        fragmentar: Callable[[str], List[str]],
+        store=None,
+        limpiar: Callable[[str], str] = lambda texto: texto,
+        tipo_documento: Callable[[str, str], str] = lambda nombre, mime_type: 'other',
+        descargas_concurrentes: int = DESCARGAS_CONCURRENTES,
+        embeddings_concurrentes: int = EMBEDDINGS_CONCURRENTES,
+        max_depth: int = 5
+    ):
+        self.vector_store = vector_store
+        self.store = store if store is not None else DriveSyncStoreMemoria()
+        self.fragmentar = fragmentar
+        self.limpiar = limpiar
+        self.tipo_documento = tipo_documento
+        self.descargas_concurrentes = descargas_concurrentes
+        self.embeddings_concurrentes = embeddings_concurrentes
+        self.max_depth = max_depth
+        self._semaforos: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore, asyncio.Semaphore]] = None
+
+    def _presupuesto(self) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        """Semáforos (descargas, embeddings) del loop en curso."""
+        loop = asyncio.get_running_loop()
+        if self._semaforos is None or self._semaforos[0] is not loop:
+            self._semaforos = (
+                loop,
+                asyncio.Semaphore(self.descargas_concurrentes),
+                asyncio.Semaphore(self.embeddings_concurrentes),
+            )
+        return self._semaforos[1], self._semaforos[2]
+
+    async def _cargar_estado(self, agent_id: str, folder_id: str) -> EstadoSync:
+        try:
+            return await self.store.cargar(agent_id, folder_id)
+        except (asyncpg.exceptions.UndefinedTableError, asyncpg.exceptions.UndefinedColumnError) as e:
+            logger.warning(f"[DRIVE SYNC] Tablas de sync no disponibles, estado en memoria: {e}")
+            self.store = DriveSyncStoreMemoria()
+            return EstadoSync()
+
+    @span("drive_sync")
+    async def sincronizar(self, agent_id: str, folder_id: str, drive: DriveAPI) -> Dict[str, Any]:
+        """Lleva el vector store del agente al estado actual de la carpeta."""
+        estado = await self._cargar_estado(agent_id, folder_id)
+        resumen = {
+            "agent_id": agent_id,
+            "folder_id": folder_id,
+            "modo": "incremental" if estado.change_token else "completo",
+            "descargas": 0,
+            "agregados": 0,
+            "modificados": 0,
+            "renombrados": 0,
+            "sin_cambios": 0,
+            "omitidos": 0,
+            "eliminados": 0,
+            "chunks_added": 0,
+            "errores": [],
+        }
+
+        carpetas = estado.carpetas
+        if estado.change_token:
+            cambios, token = await asyncio.to_thread(drive.cambios, estado.change_token)
+            pendientes, eliminados, relistar = self._clasificar(cambios, estado, folder_id)
+            if relistar:
+                resumen["modo"] = "reconciliacion"
+                pendientes, eliminados, carpetas = await self._reconciliar(drive, folder_id, estado)
+        else:
+            token = await asyncio.to_thread(drive.token_inicial)
+            pendientes, eliminados, carpetas = await self._reconciliar(drive, folder_id, estado)
+
+        await asyncio.gather(
+            *(self._eliminar(agent_id, folder_id, file_id, resumen) for file_id in eliminados),
+            *(self._procesar(agent_id, folder_id, archivo, estado, drive, resumen) for archivo in pendientes),
+        )
+
+        if not resumen["errores"]:
+            await self.store.guardar_token(agent_id, folder_id, token, carpetas)
+
+        resumen["success"] = not resumen["errores"]
+        resumen["docs_processed"] = resumen["agregados"] + resumen["modificados"]
+        logger.info(
+            f"[DRIVE SYNC] {agent_id} ({resumen['modo']}): {resumen['agregados']} agregados, "
+            f"{resumen['modificados']} modificados, {resumen['eliminados']} eliminados, "
+            f"{resumen['descargas']} descargas, {len(resumen['errores'])} errores"
+        )
+        return resumen
+
+    async def _reconciliar(
+        self,
+        drive: DriveAPI,
+        folder_id: str,
+        estado: EstadoSync
+    ) -> Tuple[List[Dict[str, Any]], List[str], Set[str]]:
+        """Lista el árbol completo y lo compara con el estado guardado."""
+        archivos, carpetas = await asyncio.to_thread(drive.listar_arbol, folder_id, self.max_depth)
+        pendientes = [a for a in archivos if self._requiere_proceso(a, estado)]
+        vigentes = {a['id'] for a in archivos}
+        eliminados = [file_id for file_id in estado.archivos if file_id not in vigentes]
+        return pendientes, eliminados, carpetas
+
+    def _clasificar(
+        self,
+        cambios: List[Dict[str, Any]],
+        estado: EstadoSync,
+        folder_id: str
+    ) -> Tuple[List[Dict[str, Any]], List[str], bool]:
+        """
+        (pendientes, eliminados, relistar) a partir de changes.list.
+        relistar es True si una carpeta entró o salió del árbol.
+        """
+        ultimos = {cambio['fileId']: cambio for cambio in cambios}
+        pendientes, eliminados = [], []
+        for file_id, cambio in ultimos.items():
+            archivo = cambio.get('file') or {}
+            vigente = not cambio.get('removed') and not archivo.get('trashed')
+
+            if file_id == folder_id:
+                if not vigente:
+                    return [], [], True
+                continue
+
+            en_arbol = (
+                vigente
+                and bool(estado.carpetas.intersection(archivo.get('parents') or []))
+                and not excluido(archivo.get('name', ''))
+            )
+            if archivo.get('mimeType') == MIME_CARPETA or file_id in estado.carpetas:
+                if en_arbol != (file_id in estado.carpetas):
+                    return [], [], True
+                continue
+
+            if en_arbol:
+                if self._requiere_proceso(archivo, estado):
+                    pendientes.append(archivo)
+            elif file_id in estado.archivos:
+                eliminados.append(file_id)
+        return pendientes, eliminados, False
+
+    @staticmethod
+    def _requiere_proceso(archivo: Dict[str, Any], estado: EstadoSync) -> bool:
+        previo = estado.archivos.get(archivo['id'])
+        return previo is None or previo.revision != revision_de(archivo) or previo.nombre != archivo.get('name')
+
+    async def _procesar(
+        self,
+        agent_id: str,
+        folder_id: str,
+        archivo: Dict[str, Any],
+        estado: EstadoSync,
+        drive: DriveAPI,
+        resumen: Dict[str, Any]
+    ):
+        file_id, nombre = archivo['id'], archivo.get('name', '')
+        mime_type = archivo.get('mimeType', '')
+        revision = revision_de(archivo)
+        previo = estado.archivos.get(file_id)
+        descargas, embeddings = self._presupuesto()
+
+        try:
+            if previo is not None and previo.revision == revision:
+                # Solo cambió el nombre: mismo contenido, mismos embeddings
+                await self._renombrar(agent_id, folder_id, previo, nombre)
+                resumen["renombrados"] += 1
+                return
+
+            async with descargas:
+                contenido = await asyncio.to_thread(drive.descargar, archivo)
+            resumen["descargas"] += 1
+
+            texto = extraer_texto(contenido, mime_type)
+            if not texto or len(texto) < MIN_CARACTERES:
+                # Se registra para no descargarlo de nuevo mientras no cambie
+                if previo is not None and previo.chunks:
+                    async with embeddings:
+                        await asyncio.to_thread(self.vector_store.delete_file, agent_id, file_id)
+                await self.store.guardar_archivo(
+                    agent_id, folder_id, ArchivoSincronizado(file_id, nombre, revision)
+                )
+                resumen["omitidos"] += 1
+                return
+
+            texto = self.limpiar(texto)
+            content_hash = hashlib.sha256(texto.encode('utf-8')).hexdigest()
+            if previo is not None and previo.content_hash == content_hash:
+                if previo.nombre != nombre:
+                    await self._renombrar(agent_id, folder_id, previo, nombre)
+                await self.store.guardar_archivo(
+                    agent_id, folder_id,
+                    ArchivoSincronizado(file_id, nombre, revision, content_hash, previo.chunks)
+                )
+                resumen["sin_cambios"] += 1
+                return
+
+            chunks = self.fragmentar(texto)
+            metadatas = [
+                {
+                    "doc_title": nombre,
+                    "file_id": file_id,
+                    "chunk_index": i,
+                    "total_chunks": len(chunks),
+                    "created_at": archivo.get('createdTime', datetime.now(timezone.utc).isoformat()),
+                    "doctype": self.tipo_documento(nombre, mime_type),
+                    "jurisdiction": "MX",
+                    "agent_id": agent_id,
+                    "source": "google_drive",
+                    "web_view_link": enlace_web(archivo),
+                }
+                for i in range(len(chunks))
+            ]
+            async with embeddings:
+                ids = await asyncio.to_thread(
+                    self.vector_store.replace_file_chunks, agent_id, file_id, chunks, metadatas
+                )
+            await self.store.guardar_archivo(
+                agent_id, folder_id, ArchivoSincronizado(file_id, nombre, revision, content_hash, len(ids))
+            )
+            resumen["modificados" if previo is not None else "agregados"] += 1
+            resumen["chunks_added"] += len(ids)
+
+        except Exception as e:
+            logger.error(f"[DRIVE SYNC] Error procesando {nombre} ({file_id}) para {agent_id}: {e}")
+            resumen["errores"].append({"file_id": file_id, "nombre": nombre, "error": str(e)})
+
+    async def _renombrar(self, agent_id: str, folder_id: str, previo: ArchivoSincronizado, nombre: str):
+        if previo.chunks:
+            _, embeddings = self._presupuesto()
+            async with embeddings:
+                await asyncio.to_thread(
+                    self.vector_store.update_file_metadata, agent_id, previo.file_id, {"doc_title": nombre}
+                )
+        await self.store.guardar_archivo(
+            agent_id, folder_id,
+            ArchivoSincronizado(previo.file_id, nombre, previo.revision, previo.content_hash, previo.chunks)
+        )
+
+    async def _eliminar(self, agent_id: str, folder_id: str, file_id: str, resumen: Dict[str, Any]):
+        _, embeddings = self._presupuesto()
+        try:
+            async with embeddings:
+                await asyncio.to_thread(self.vector_store.delete_file, agent_id, file_id)
+            await self.store.borrar_archivo(agent_id, folder_id, file_id)
+            resumen["eliminados"] += 1
+        except Exception as e:
+            logger.error(f"[DRIVE SYNC] Error eliminando {file_id} para {agent_id}: {e}")
+            resumen["errores"].append({"file_id": file_id, "error": str(e)})
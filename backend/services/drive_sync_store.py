@@ -0,0 +1,176 @@
+"""
+Estado de sincronización incremental de carpetas de Drive.
+
+DriveSyncService (services/drive_sync_service.py) guarda por cada par
+(agente, carpeta):
+- El token de cambios de Drive (changes.getStartPageToken / newStartPageToken)
+  desde el que continúa la siguiente corrida
+- Las subcarpetas que forman el árbol sincronizado, para decidir sin
+  consultar a Drive si un cambio pertenece a la carpeta
+- Por archivo: revisión (md5Checksum o version), hash del texto
+  ingerido y número de chunks en el vector store
+
+Cada archivo se guarda en cuanto se procesa; el token solo avanza
+cuando la corrida terminó sin errores, así una falla a media corrida
+se reintenta sin volver a descargar lo que ya quedó al día.
+
+Sin DATABASE_URL se usa DriveSyncStoreMemoria: el estado dura lo que
+el proceso y el primer sync tras reiniciar recorre la carpeta completa.
+
+Configuración por variables de entorno:
+- DATABASE_URL: conexión a PostgreSQL (migrations/012_drive_sync.sql)
+"""
+import os
+import logging
+from dataclasses import dataclass, field, replace
+from typing import Dict, Optional, Set, Tuple
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.environ.get('DATABASE_URL', '')
+
+
+@dataclass
+class ArchivoSincronizado:
+    """Lo que se sabe de un archivo ya ingerido."""
+    file_id: str
+    nombre: str
+    revision: str
+    content_hash: Optional[str] = None
+    chunks: int = 0
+
+
+@dataclass
+class EstadoSync:
+    """Estado de un par (agente, carpeta); change_token None significa que nunca se sincronizó."""
+    change_token: Optional[str] = None
+    carpetas: Set[str] = field(default_factory=set)
+    archivos: Dict[str, ArchivoSincronizado] = field(default_factory=dict)
+
+
+class DriveSyncStoreMemoria:
+    """Estado en memoria del proceso; misma interfaz que DriveSyncStore."""
+
+    def __init__(self):
+        self._estados: Dict[Tuple[str, str], EstadoSync] = {}
+
+    async def cargar(self, agent_id: str, folder_id: str) -> EstadoSync:
+        estado = self._estados.get((agent_id, folder_id))
+        if estado is None:
+            return EstadoSync()
+        # Copia: el servicio modifica su estado durante la corrida
+        return EstadoSync(
+            change_token=estado.change_token,
+            carpetas=set(estado.carpetas),
+            archivos={fid: replace(archivo) for fid, archivo in estado.archivos.items()},
+        )
+
+    async def guardar_archivo(self, agent_id: str, folder_id: str, archivo: ArchivoSincronizado):
+        estado = self._estados.setdefault((agent_id, folder_id), EstadoSync())
+        estado.archivos[archivo.file_id] = replace(archivo)
+
+    async def borrar_archivo(self, agent_id: str, folder_id: str, file_id: str):
+        estado = self._estados.get((agent_id, folder_id))
+        if estado is not None:
+            estado.archivos.pop(file_id, None)
+
+    async def guardar_token(self, agent_id: str, folder_id: str, change_token: str, carpetas: Set[str]):
+        estado = self._estados.setdefault((agent_id, folder_id), EstadoSync())
+        estado.change_token = change_token
+        estado.carpetas = set(carpetas)
+
+
+class DriveSyncStore:
+    """Estado de sincronización en PostgreSQL (drive_sync_estado, drive_sync_archivos)."""
+
+    def __init__(self, database_url: str = DATABASE_URL):
+        self.database_url = database_url
+        self._pool: Optional[asyncpg.Pool] = None
+
+    async def _get_pool(self) -> asyncpg.Pool:
+        """Obtiene o crea el pool de conexiones a PostgreSQL"""
+        if self._pool is None:
+            if not self.database_url:
+                raise RuntimeError("DATABASE_URL no está configurada")
+
+            db_url = self.database_url
+            if db_url.startswith('postgres://'):
+                db_url = db_url.replace('postgres://', 'postgresql://', 1)
+
+            self._pool = await asyncpg.create_pool(
+                db_url,
+                min_size=1,
+                max_size=5,
+                command_timeout=30
+            )
+        return self._pool
+
+    async def close(self):
+        """Cierra el pool de conexiones"""
+        if self._pool:
+            await self._pool.close()
+            self._pool = None
+
+    async def cargar(self, agent_id: str, folder_id: str) -> EstadoSync:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            fila = await conn.fetchrow(
+                "SELECT change_token, carpetas FROM drive_sync_estado WHERE agent_id = $1 AND folder_id = $2",
+                agent_id, folder_id
+            )
+            archivos = await conn.fetch(
+                """
+                SELECT file_id, nombre, revision, content_hash, chunks
+                FROM drive_sync_archivos
+                WHERE agent_id = $1 AND folder_id = $2
+                """,
+                agent_id, folder_id
+            )
+        return EstadoSync(
+            change_token=fila["change_token"] if fila else None,
+            carpetas=set(fila["carpetas"] or []) if fila else set(),
+            archivos={a["file_id"]: ArchivoSincronizado(**dict(a)) for a in archivos},
+        )
+
+    async def guardar_archivo(self, agent_id: str, folder_id: str, archivo: ArchivoSincronizado):
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO drive_sync_archivos (agent_id, folder_id, file_id, nombre, revision, content_hash, chunks)
+                VALUES ($1, $2, $3, $4, $5, $6, $7)
+                ON CONFLICT (agent_id, folder_id, file_id) DO UPDATE SET
+                    nombre = EXCLUDED.nombre,
+                    revision = EXCLUDED.revision,
+                    content_hash = EXCLUDED.content_hash,
+                    chunks = EXCLUDED.chunks,
+                    updated_at = NOW()
+                """,
+                agent_id, folder_id, archivo.file_id, archivo.nombre, archivo.revision,
+                archivo.content_hash, archivo.chunks
+            )
+
+    async def borrar_archivo(self, agent_id: str, folder_id: str, file_id: str):
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                "DELETE FROM drive_sync_archivos WHERE agent_id = $1 AND folder_id = $2 AND file_id = $3",
+                agent_id, folder_id, file_id
+            )
+
+    async def guardar_token(self, agent_id: str, folder_id: str, change_token: str, carpetas: Set[str]):
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO drive_sync_estado (agent_id, folder_id, change_token, carpetas, ultima_sync)
+                VALUES ($1, $2, $3, $4, NOW())
+                ON CONFLICT (agent_id, folder_id) DO UPDATE SET
+                    change_token = EXCLUDED.change_token,
+                    carpetas = EXCLUDED.carpetas,
+                    ultima_sync = NOW()
+                """,
+                agent_id, folder_id, change_token, sorted(carpetas)
+            )
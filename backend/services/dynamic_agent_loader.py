@@ -35,6 +35,8 @@ except ImportError:
     HAS_SPECIALIZED_PROMPTS = False
     SPECIALIZED_PROMPTS = {}
 
+from services.prompt_assembler import PromptBlock, prompt_assembler
+
 logger = logging.getLogger(__name__)
 
 
@@ -309,40 +311,47 @@ class DynamicAgentLoader:
         - Contexto del proyecto/empresa
         - Aprendizajes previos
         - Documentos RAG relevantes
+
+        Devuelve un AssembledPrompt (str): todo menos el contexto forma el
+        prefijo estático memoizado y cacheable por el proveedor.
         """
         agent = await self.load_agent(agent_id, include_learnings)
         if not agent:
             # Intentar usar prompt especializado aunque no haya config en DB
             if HAS_SPECIALIZED_PROMPTS and agent_id in SPECIALIZED_PROMPTS:
                 logger.info(f"Using specialized prompt for {agent_id} (no DB config)")
-                return get_specialized_prompt(agent_id)
+                return prompt_assembler.assemble([get_specialized_prompt(agent_id)], label=agent_id)
             return f"Eres un agente de REVISAR.IA con ID {agent_id}."
 
-        prompt_parts = []
+        # Bloques estáticos de más estable a menos estable; cada grupo cierra
+        # con un breakpoint para que el proveedor reutilice el prefijo
+        blocks: List[PromptBlock] = []
 
         # 1. System prompt - PRIORIZAR PROMPT ESPECIALIZADO CON CONOCIMIENTO TRIBUTARIO
         if HAS_SPECIALIZED_PROMPTS and agent_id in SPECIALIZED_PROMPTS:
             # Usar prompt especializado que tiene el conocimiento tributario integrado
             logger.info(f"✅ Using SPECIALIZED prompt with tax knowledge for {agent_id}")
-            prompt_parts.append(get_specialized_prompt(agent_id))
+            blocks.append(PromptBlock(get_specialized_prompt(agent_id), cache_breakpoint=True))
         else:
             # Fallback al prompt de la base de datos
             logger.info(f"Using DB system prompt for {agent_id}")
-            prompt_parts.append(agent.system_prompt)
+            blocks.append(PromptBlock(agent.system_prompt or "", cache_breakpoint=True))
+
+        profile_parts = []
 
         # 2. Personalidad
         if agent.personalidad:
-            prompt_parts.append(f"\n\nPERSONALIDAD:\n{agent.personalidad}")
+            profile_parts.append(f"\n\nPERSONALIDAD:\n{agent.personalidad}")
 
         # 3. Capacidades
         if agent.capabilities:
             caps = ", ".join(agent.capabilities)
-            prompt_parts.append(f"\n\nTUS CAPACIDADES: {caps}")
+            profile_parts.append(f"\n\nTUS CAPACIDADES: {caps}")
 
         # 4. Fases activas
         if agent.fases_activas:
             fases = ", ".join(agent.fases_activas)
-            prompt_parts.append(f"\n\nFASES EN LAS QUE PARTICIPAS: {fases}")
+            profile_parts.append(f"\n\nFASES EN LAS QUE PARTICIPAS: {fases}")
 
         # 5. Permisos CRUD
         permisos = []
@@ -360,27 +369,32 @@ class DynamicAgentLoader:
             permisos.append("eliminar documentos")
 
         if permisos:
-            prompt_parts.append(f"\n\nPERMISOS: Puedes {', '.join(permisos)}.")
+            profile_parts.append(f"\n\nPERMISOS: Puedes {', '.join(permisos)}.")
+
+        blocks.extend(PromptBlock("\n" + part) for part in profile_parts)
+        if profile_parts:
+            blocks[-1] = PromptBlock(blocks[-1].text, cache_breakpoint=True)
 
-        # 6. Aprendizajes previos (si hay)
+        # 6. Aprendizajes previos (si hay) - cambian al recargar el agente
         if include_learnings and agent.learnings:
             learnings_text = self._format_learnings(agent.learnings)
-            prompt_parts.append(f"\n\nAPRENDIZAJES PREVIOS:\n{learnings_text}")
+            blocks.append(PromptBlock(f"\n\n\nAPRENDIZAJES PREVIOS:\n{learnings_text}"))
 
         # 7. Métricas (para auto-awareness)
         if agent.metrics:
             metrics_text = self._format_metrics(agent.metrics)
-            prompt_parts.append(f"\n\nTUS MÉTRICAS RECIENTES:\n{metrics_text}")
+            blocks.append(PromptBlock(f"\n\n\nTUS MÉTRICAS RECIENTES:\n{metrics_text}"))
 
-        # 8. Contexto específico (si se proporciona)
+        # 8. Contexto específico (si se proporciona) - sufijo volátil
+        volatile = ""
         if context:
             if agent.context_template:
                 context_text = agent.context_template.format(**context)
             else:
                 context_text = json.dumps(context, ensure_ascii=False, indent=2)
-            prompt_parts.append(f"\n\nCONTEXTO ACTUAL:\n{context_text}")
+            volatile = f"\n\n\nCONTEXTO ACTUAL:\n{context_text}"
 
-        return "\n".join(prompt_parts)
+        return prompt_assembler.assemble(blocks, volatile=volatile, label=agent_id)
 
     def _format_learnings(self, learnings: List[Dict]) -> str:
         """Formatear aprendizajes para incluir en prompt."""
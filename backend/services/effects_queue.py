@@ -0,0 +1,83 @@
+"""
+Effects Queue Service
+Ordered background queue for side effects (emails, uploads, state persistence)
+that must not sit on the critical path of a workflow.
+
+- Effects run one at a time, in submission order
+- A failing effect is logged and does not stop the following ones
+- flush() waits until every submitted effect has finished
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EffectsQueue:
+    """FIFO queue of side effects processed by a single background worker."""
+
+    def __init__(self, name: str = "effects"):
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.completed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def submit(self, label: str, fn: Callable[..., Any], *args, **kwargs) -> asyncio.Future:
+        """
+        Enqueue an effect. Coroutine functions are awaited; plain callables run
+        in a worker thread. Returns a future with the effect's result (or None
+        if it failed).
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((label, fn, args, kwargs, future))
+        return future
+
+    async def _run(self):
+        while True:
+            label, fn, args, kwargs, future = await self._queue.get()
+            start = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(fn):
+                    result = await fn(*args, **kwargs)
+                else:
+                    result = await asyncio.to_thread(fn, *args, **kwargs)
+                self.completed += 1
+                if not future.done():
+                    future.set_result(result)
+                logger.debug(f"[{self.name}] {label} done in {(time.perf_counter() - start) * 1000:.0f}ms")
+            except Exception as e:
+                logger.error(f"[{self.name}] Effect '{label}' failed: {e}")
+                self.errors.append({"effect": label, "error": str(e)})
+                if not future.done():
+                    future.set_result(None)
+            finally:
+                self._queue.task_done()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def flush(self):
+        """Wait for every effect submitted so far (and any they submit)."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        """Flush remaining effects and stop the worker."""
+        try:
+            await self.flush()
+        finally:
+            if self._worker is not None:
+                self._worker.cancel()
+                try:
+                    await self._worker
+                except asyncio.CancelledError:
+                    pass
+                self._worker = None
+                self._queue = None
@@ -12,7 +12,7 @@ from pydantic import BaseModel, Field
 from enum import Enum
 
 from services.kb_chunkers import (
-    LegalDocumentChunker, JurisprudenceChunker, ContractChunker,
+    StreamingLegalChunker, JurisprudenceChunker, ContractChunker,
     CriteriaSATChunker, GlossaryChunker, DocumentChunk, ChunkType
 )
 
@@ -85,7 +85,7 @@ class KBAgentService:
     }
     
     def __init__(self):
-        self.legal_chunker = LegalDocumentChunker()
+        self.legal_chunker = StreamingLegalChunker()
         self.juris_chunker = JurisprudenceChunker()
         self.contract_chunker = ContractChunker()
         self.criteria_chunker = CriteriaSATChunker()
@@ -3,7 +3,7 @@ Knowledge Base Chunking System for RAG
 Specialized chunkers for Mexican legal/fiscal documents
 """
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from pydantic import BaseModel, Field
 from datetime import datetime
 from enum import Enum
@@ -229,6 +229,240 @@ class LegalDocumentChunker:
         return len(text) // 4
 
 
+class StreamingLegalChunker(LegalDocumentChunker):
+    """
+    Chunking lineal para leyes largas (LISR, CFF, RMF) leídas por páginas.
+
+    Recorre el texto una vez, línea por línea, con una máquina de estados:
+    - TÍTULO / CAPÍTULO / SECCIÓN al inicio de línea actualizan la jerarquía
+    - "Artículo N." al inicio de línea cierra el artículo anterior y abre otro;
+      las menciones dentro del texto ("del artículo 27") no cortan
+    - Fracciones (I., II., ...) y párrafos son los puntos de corte cuando el
+      artículo excede MAX_CHUNK_TOKENS; cada corte repite los últimos
+      OVERLAP_TOKENS del chunk anterior
+
+    Solo se conserva en memoria el chunk en curso. Los artículos que caben
+    en el presupuesto producen el mismo chunk que LegalDocumentChunker.
+    """
+
+    _ARTICLE_HEADING = re.compile(r'\s*(A(?i:rtículo)\s+(\d+[-\w]*)([\.\-]?)\s*([\.\-]?)\s*)')
+    _FRACTION = re.compile(r'\s*([IVXLCDM]+)\.\s')
+    _HIERARCHY = tuple(
+        (level, re.compile(r'\s*' + LegalDocumentChunker.HIERARCHY_PATTERNS[level]))
+        for level in ('titulo', 'capitulo', 'seccion')
+    )
+
+    def __init__(self, max_chunk_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None):
+        self.max_chunk_tokens = max_chunk_tokens or self.MAX_CHUNK_TOKENS
+        overlap = self.OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+        self.max_chars = self.max_chunk_tokens * 4
+        self.overlap_chars = min(overlap * 4, self.max_chars // 2)
+
+    def chunk_legal_document(self, text: str, source_document: str, source_path: str = None) -> List[DocumentChunk]:
+        return list(self.iter_chunks([text], source_document, source_path))
+
+    def iter_chunks(
+        self,
+        pages: Iterable[str],
+        source_document: str,
+        source_path: str = None
+    ) -> Iterator[DocumentChunk]:
+        """
+        Yield chunks while reading `pages`.
+
+        Las páginas se concatenan tal cual, así que sirven bloques de un
+        archivo (f.read(n)) aunque corten una línea. El texto previo al
+        primer artículo solo aporta encabezados de jerarquía.
+        """
+        hierarchy = {'titulo': '', 'capitulo': '', 'seccion': ''}
+        article: Optional[Dict[str, Any]] = None
+
+        for segment, line_start in self._segments(pages):
+            if line_start:
+                level_value = self._match_hierarchy(segment)
+                if level_value:
+                    if article:
+                        yield from self._flush(article, final=True)
+                        article = None
+                    level, value = level_value
+                    hierarchy[level] = value
+                    if level == 'titulo':
+                        hierarchy['capitulo'] = hierarchy['seccion'] = ''
+                    elif level == 'capitulo':
+                        hierarchy['seccion'] = ''
+                    continue
+
+                heading = self._match_article(segment)
+                if heading:
+                    if article:
+                        yield from self._flush(article, final=True)
+                    article = self._open_article(heading, hierarchy, source_document, source_path)
+                    segment = segment[heading.end():]
+
+                fraction = self._FRACTION.match(segment)
+                if article and fraction:
+                    article['fraction'] = fraction.group(1)
+
+            if article and segment:
+                yield from self._add(article, segment)
+
+        if article:
+            yield from self._flush(article, final=True)
+
+    # --- Lectura ---
+
+    def _segments(self, pages: Iterable[str]) -> Iterator[Tuple[str, bool]]:
+        """Segmentos que concatenados reproducen el texto; líneas con su '\n' final."""
+        pending = ""
+        line_start = True
+        for page in pages:
+            if not page:
+                continue
+            pending += page
+            lines = pending.split("\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line + "\n", line_start
+                line_start = True
+            # Una línea sin saltos más grande que un chunk no se acumula entera
+            while len(pending) > self.max_chars * 2:
+                cut = self._cut_point(pending, self.max_chars)
+                yield pending[:cut], line_start
+                pending = pending[cut:]
+                line_start = False
+        if pending:
+            yield pending, line_start
+
+    def _match_hierarchy(self, line: str) -> Optional[Tuple[str, str]]:
+        for level, pattern in self._HIERARCHY:
+            match = pattern.match(line)
+            if match:
+                return level, match.group(1)
+        return None
+
+    def _match_article(self, line: str):
+        match = self._ARTICLE_HEADING.match(line)
+        if not match:
+            return None
+        # Encabezado: "Artículo 27." / "Artículo 5-A.-" o la línea termina ahí;
+        # "Artículo 27 de esta Ley" al inicio de línea es una mención cortada
+        if match.group(3) or match.group(4) or not line[match.end():].strip():
+            return match
+        return None
+
+    # --- Artículo en curso ---
+
+    def _open_article(self, heading, hierarchy: Dict[str, str], source_document: str, source_path: str) -> Dict[str, Any]:
+        header = heading.group(1).strip()
+        number = heading.group(2)
+        return {
+            'number': number,
+            'header': header,
+            'hierarchy': dict(hierarchy),
+            'source_document': source_document,
+            'source_path': source_path,
+            'fraction': None,
+            'units': [],        # (texto, fracción vigente)
+            'size': 0,
+            'fresh': 0,         # caracteres nuevos (sin contar el traslape)
+            'part': 0,
+            'prefix': f"{header} ",
+        }
+
+    def _add(self, article: Dict[str, Any], segment: str) -> Iterator[DocumentChunk]:
+        while segment:
+            room = self.max_chars - len(article['prefix']) - article['size']
+            if len(segment) <= room:
+                self._append(article, segment)
+                return
+            if article['fresh']:
+                yield from self._flush(article, final=False)
+                continue
+            # Ni un chunk con solo el traslape alcanza: se corta el segmento
+            if room <= 0:
+                article['units'], article['size'] = [], 0
+                continue
+            cut = self._cut_point(segment, room)
+            self._append(article, segment[:cut])
+            segment = segment[cut:]
+            yield from self._flush(article, final=False)
+
+    def _append(self, article: Dict[str, Any], text: str):
+        article['units'].append((text, article['fraction']))
+        article['size'] += len(text)
+        article['fresh'] += len(text)
+
+    def _flush(self, article: Dict[str, Any], final: bool) -> Iterator[DocumentChunk]:
+        units = article['units']
+        if article['fresh'] or article['part'] == 0:
+            body = "".join(text for text, _ in units).strip()
+            split = article['part'] > 0 or not final
+            yield self._build_chunk(article, article['prefix'] + body, units[0][1] if split and units else None)
+        if final:
+            return
+
+        # Siguiente parte: empieza con el final de la anterior
+        overlap: List[Tuple[str, Optional[str]]] = []
+        size = 0
+        for text, fraction in reversed(units):
+            if size + len(text) > self.overlap_chars:
+                if not overlap:
+                    tail = text[self._tail_point(text, self.overlap_chars):]
+                    overlap.append((tail, fraction))
+                    size += len(tail)
+                break
+            overlap.append((text, fraction))
+            size += len(text)
+        overlap.reverse()
+
+        article['part'] += 1
+        article['units'] = overlap
+        article['size'] = size
+        article['fresh'] = 0
+        first_fraction = overlap[0][1] if overlap else article['fraction']
+        if first_fraction:
+            article['prefix'] = f"Artículo {article['number']}, Fracción {first_fraction}:\n"
+        else:
+            article['prefix'] = f"Artículo {article['number']} (continuación):\n"
+
+    def _build_chunk(self, article: Dict[str, Any], content: str, fraction: Optional[str]) -> DocumentChunk:
+        """Chunk con la metadata del artículo; `fraction` solo en partes de un artículo dividido."""
+        hierarchy = article['hierarchy']
+        metadata = ChunkMetadata(
+            chunk_type=ChunkType.LEGAL_FRACTION if fraction else ChunkType.LEGAL_ARTICLE,
+            source_document=article['source_document'],
+            source_path=article['source_path'],
+            hierarchy_path=self._build_hierarchy_path(
+                hierarchy['titulo'], hierarchy['capitulo'], hierarchy['seccion'], article['number']
+            ),
+            article_number=article['number'],
+            fraction=fraction,
+            title=hierarchy['titulo'],
+            chapter=hierarchy['capitulo'],
+            section=hierarchy['seccion'],
+            keywords=self._extract_legal_keywords(content),
+            references=self._extract_references(content)
+        )
+        return DocumentChunk(content=content, metadata=metadata, token_count=self._estimate_tokens(content))
+
+    @staticmethod
+    def _cut_point(text: str, limit: int) -> int:
+        """Corte en el último espacio antes de `limit` (o en `limit` si no hay uno cercano)."""
+        if len(text) <= limit:
+            return len(text)
+        space = max(text.rfind(" ", 0, limit), text.rfind("\n", 0, limit))
+        return space + 1 if space >= limit // 2 else limit
+
+    @staticmethod
+    def _tail_point(text: str, limit: int) -> int:
+        """Inicio de los últimos `limit` caracteres, ajustado al siguiente espacio."""
+        start = len(text) - limit
+        if start <= 0:
+            return 0
+        space = text.find(" ", start, start + limit // 2)
+        return space + 1 if space != -1 else start
+
+
 class JurisprudenceChunker:
     """
     Chunking especializado para tesis y jurisprudencias.
@@ -855,11 +855,13 @@ Responde SOLO en JSON válido:
         query: str,
         agente_id: Optional[str] = None,
         categoria: Optional[str] = None,
-        limit: int = 10
+        limit: int = 10,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
-        """Perform semantic search using embeddings."""
+        """Perform semantic search using embeddings (or a precomputed query_embedding)."""
         try:
-            query_embedding = await self.embeddings_service.generate_embedding(query)
+            if query_embedding is None:
+                query_embedding = await self.embeddings_service.generate_embedding(query)
             
             if not query_embedding:
                 logger.warning("Could not generate embedding for query, falling back to text search")
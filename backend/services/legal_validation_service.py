@@ -17,7 +17,7 @@ Tres capas de validación:
 """
 
 from enum import Enum
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterable, Tuple, Union
 from dataclasses import dataclass, field
 from datetime import datetime
 import logging
@@ -1143,6 +1143,166 @@ EVIDENCIAS_POR_TIPO_SERVICIO: Dict[TipoServicio, List[EvidenciaRequerida]] = {
 }
 
 
+# ============================================================
+# CATÁLOGO COMPILADO (VALIDACIÓN POR LOTE)
+# ============================================================
+
+# Un bit por tipo de evidencia: las evidencias de una operación caben en un int
+BITS_EVIDENCIA: Dict[TipoEvidencia, int] = {t: 1 << i for i, t in enumerate(TipoEvidencia)}
+
+# Reglas cuyo incumplimiento lleva el semáforo a rojo sin importar el score
+REGLAS_CRITICAS = frozenset({"CFF_69B_PROVEEDOR", "LISR_27_I", "CFF_69B_MATERIALIDAD"})
+
+
+def mascara_evidencias(evidencias: Iterable[Union[TipoEvidencia, str]]) -> int:
+    """Bitset de las evidencias presentadas; los valores desconocidos no aportan bits"""
+    mascara = 0
+    for evidencia in evidencias:
+        mascara |= BITS_EVIDENCIA.get(evidencia, 0)
+    return mascara
+
+
+@dataclass
+class OperacionAValidar:
+    """Operación de un lote; mismos campos que LegalValidationService.validar_operacion"""
+    operacion_id: str
+    proveedor_rfc: str
+    monto: float
+    tipo_servicio: TipoServicio
+    evidencias_presentadas: List[TipoEvidencia] = field(default_factory=list)
+    es_parte_relacionada: bool = False
+    proveedor_en_69b: bool = False
+    cfdi_validado: bool = True
+    tiene_opinion_32d: bool = False
+
+
+@dataclass(frozen=True)
+class ReglaCompilada:
+    """Regla con sus evidencias precalculadas como máscaras de bits"""
+    id: str
+    nombre: str
+    capa: CapaValidacion
+    peso: float
+    # (máscara de tipos aceptados, descripción, obligatoria) por evidencia mínima
+    requisitos: Tuple[Tuple[int, str, bool], ...]
+    total_obligatorias: int
+    # Unión de las máscaras: el resultado solo depende de estos bits
+    mascara_relevante: int
+
+
+def compilar_regla(regla: ReglaValidacion) -> ReglaCompilada:
+    """Precalcula las máscaras de una regla (tipo principal + alternativas)"""
+    requisitos = tuple(
+        (mascara_evidencias([ev.tipo] + ev.alternativas), ev.descripcion, ev.obligatoria)
+        for ev in regla.evidencias_minimas
+    )
+    return ReglaCompilada(
+        id=regla.id,
+        nombre=regla.nombre,
+        capa=regla.capa,
+        peso=regla.peso_validacion,
+        requisitos=requisitos,
+        total_obligatorias=sum(1 for ev in regla.evidencias_minimas if ev.obligatoria),
+        mascara_relevante=mascara_evidencias(
+            t for ev in regla.evidencias_minimas for t in [ev.tipo] + ev.alternativas
+        ),
+    )
+
+
+class CatalogoCompilado:
+    """
+    Catálogo de reglas listo para evaluar lotes.
+
+    El resultado de una operación solo depende de su firma: tipo de servicio,
+    máscara de evidencias, parte relacionada, 69-B y CFDI validado. El lote
+    se agrupa por firma y cada firma distinta se evalúa una sola vez; a su
+    vez, cada regla solo mira los bits de sus propias evidencias, así que su
+    fila se memoiza por (regla, máscara & bits relevantes, 69-B, CFDI) y una
+    firma nueva casi siempre se arma con filas ya calculadas.
+    """
+
+    def __init__(self, reglas: List[ReglaValidacion]):
+        self.reglas = [compilar_regla(r) for r in reglas]
+        self._fuente = reglas
+        self._por_servicio: Dict[Any, Tuple[Tuple[ReglaCompilada, ...], Tuple[ReglaCompilada, ...]]] = {}
+        self._filas: Dict[tuple, tuple] = {}
+
+    def reglas_aplicables(self, tipo_servicio: TipoServicio, es_parte_relacionada: bool) -> Tuple[ReglaCompilada, ...]:
+        """Reglas de un servicio en el orden del catálogo (misma selección que validar_operacion)"""
+        par = self._por_servicio.get(tipo_servicio)
+        if par is None:
+            con_partes = tuple(
+                compilada for compilada, regla in zip(self.reglas, self._fuente)
+                if not regla.aplica_a_servicios or tipo_servicio in regla.aplica_a_servicios
+            )
+            sin_partes = tuple(r for r in con_partes if r.id != "LISR_27_PARTES_REL")
+            par = self._por_servicio[tipo_servicio] = (con_partes, sin_partes)
+        return par[0] if es_parte_relacionada else par[1]
+
+    def evaluar_firma(
+        self,
+        tipo_servicio: TipoServicio,
+        mascara: int,
+        es_parte_relacionada: bool,
+        proveedor_en_69b: bool,
+        cfdi_validado: bool
+    ) -> Tuple[tuple, ...]:
+        """
+        Evalúa una firma y regresa, por regla, la tupla de campos de
+        ResultadoValidacion más la capa y el peso para el score.
+        Las tuplas se comparten entre firmas: no modificar sus listas.
+        """
+        filas = []
+        for regla in self.reglas_aplicables(tipo_servicio, es_parte_relacionada):
+            clave = (regla.id, mascara & regla.mascara_relevante, proveedor_en_69b,
+                     cfdi_validado or regla.id != "LISR_27_CFDI")
+            fila = self._filas.get(clave)
+            if fila is None:
+                fila = self._filas[clave] = self._evaluar_regla(regla, mascara, proveedor_en_69b, cfdi_validado)
+            filas.append(fila)
+        return tuple(filas)
+
+    @staticmethod
+    def _evaluar_regla(regla: ReglaCompilada, mascara: int, proveedor_en_69b: bool, cfdi_validado: bool) -> tuple:
+        """Misma lógica que LegalValidationService._evaluar_regla, sobre máscaras"""
+        presentes = [desc for bits, desc, _ in regla.requisitos if mascara & bits]
+        faltantes = [desc for bits, desc, obligatoria in regla.requisitos
+                     if obligatoria and not mascara & bits]
+        observaciones = []
+        recomendaciones = []
+
+        if regla.id == "CFF_69B_PROVEEDOR" and proveedor_en_69b:
+            faltantes.append("Proveedor en lista 69-B - CRÍTICO")
+            observaciones.append("⚠️ ALERTA: Proveedor aparece en lista 69-B del SAT")
+            recomendaciones.append("Suspender operaciones con este proveedor hasta aclarar situación")
+
+        if regla.id == "LISR_27_CFDI" and not cfdi_validado:
+            faltantes.append("CFDI no validado en SAT")
+            recomendaciones.append("Validar CFDI en portal del SAT inmediatamente")
+
+        # Igual que _evaluar_regla: cuenta todas las presentes, no solo las obligatorias
+        if regla.total_obligatorias > 0:
+            nivel = len(presentes) / regla.total_obligatorias
+        else:
+            nivel = 1.0 if not faltantes else 0.0
+
+        cumple = nivel >= 0.8 and not proveedor_en_69b
+
+        if not observaciones:
+            if cumple:
+                observaciones.append("Regla cumplida satisfactoriamente")
+            else:
+                observaciones.append(f"Cumplimiento parcial: {nivel*100:.0f}%")
+
+        if faltantes and not recomendaciones:
+            recomendaciones.append(f"Obtener evidencias faltantes: {', '.join(faltantes[:3])}")
+
+        return (
+            regla.id, regla.nombre, cumple, nivel, presentes, faltantes,
+            "; ".join(observaciones), recomendaciones, regla.capa, regla.peso,
+        )
+
+
 # ============================================================
 # SERVICIO DE VALIDACIÓN
 # ============================================================
@@ -1155,6 +1315,7 @@ class LegalValidationService:
         self.reglas_cff = REGLAS_CFF_MATERIALIDAD
         self.reglas_iva = REGLAS_IVA_CFDI
         self.todas_las_reglas = self.reglas_lisr + self.reglas_cff + self.reglas_iva
+        self.catalogo_compilado = CatalogoCompilado(self.todas_las_reglas)
 
     def obtener_reglas_por_capa(self, capa: CapaValidacion) -> List[ReglaValidacion]:
         """Obtiene todas las reglas de una capa específica"""
@@ -1239,6 +1400,114 @@ class LegalValidationService:
             acciones_correctivas=acciones
         )
 
+    def validar_operaciones(
+        self,
+        operaciones: Iterable[Union[OperacionAValidar, Dict[str, Any]]]
+    ) -> List[EvaluacionCompleta]:
+        """
+        Valida un lote de operaciones (p. ej. el año completo de un cliente).
+        Cada evaluación es idéntica a la de validar_operacion con los mismos
+        argumentos; las operaciones con la misma firma comparten una sola
+        evaluación del catálogo compilado. Acepta OperacionAValidar o dicts
+        con los mismos campos. Todo el lote lleva la misma fecha_evaluacion.
+        """
+        catalogo = self.catalogo_compilado
+        fecha = datetime.now()
+
+        # Pasada columnar: firma de cada operación
+        lote = [op if isinstance(op, OperacionAValidar) else OperacionAValidar(**op) for op in operaciones]
+        firmas = [
+            (op.tipo_servicio, mascara_evidencias(op.evidencias_presentadas),
+             op.es_parte_relacionada, op.proveedor_en_69b, op.cfdi_validado)
+            for op in lote
+        ]
+
+        # Una evaluación por firma distinta
+        plantillas: Dict[tuple, tuple] = {}
+        for firma in firmas:
+            if firma not in plantillas:
+                plantillas[firma] = self._plantilla_evaluacion(catalogo.evaluar_firma(*firma), firma[3])
+
+        return self._materializar(lote, firmas, plantillas, fecha)
+
+    def _materializar(
+        self,
+        lote: List[OperacionAValidar],
+        firmas: List[tuple],
+        plantillas: Dict[tuple, tuple],
+        fecha: datetime
+    ) -> List[EvaluacionCompleta]:
+        """Una EvaluacionCompleta por operación a partir de la plantilla de su firma"""
+        evaluaciones = []
+        for op, firma in zip(lote, firmas):
+            filas, scores, nivel_riesgo, resumen, acciones = plantillas[firma]
+            evaluaciones.append(EvaluacionCompleta(
+                operacion_id=op.operacion_id,
+                proveedor_rfc=op.proveedor_rfc,
+                monto=op.monto,
+                fecha_evaluacion=fecha,
+                nivel_riesgo=nivel_riesgo,
+                score_total=scores[0],
+                score_formal=scores[1],
+                score_materialidad=scores[2],
+                score_razon_negocios=scores[3],
+                # Objetos nuevos por operación: quien los reciba puede modificarlos
+                resultados_por_regla=[
+                    ResultadoValidacion(f[0], f[1], f[2], f[3], f[4][:], f[5][:], f[6], f[7][:])
+                    for f in filas
+                ],
+                resumen=resumen,
+                acciones_correctivas=list(acciones)
+            ))
+        return evaluaciones
+
+    def _plantilla_evaluacion(self, filas: Tuple[tuple, ...], proveedor_en_69b: bool) -> tuple:
+        """Scores, semáforo y resumen de una firma, con la misma aritmética que validar_operacion"""
+        scores = {}
+        for capa in (CapaValidacion.FORMAL_FISCAL, CapaValidacion.MATERIALIDAD, CapaValidacion.RAZON_NEGOCIOS):
+            total_peso = 0
+            score_ponderado = 0
+            for f in filas:
+                if f[8] == capa:
+                    total_peso += f[9]
+                    score_ponderado += f[3] * 100 * f[9]
+            if not any(f[8] == capa for f in filas):
+                scores[capa] = 100.0
+            else:
+                scores[capa] = score_ponderado / total_peso if total_peso > 0 else 0
+
+        score_formal = scores[CapaValidacion.FORMAL_FISCAL]
+        score_materialidad = scores[CapaValidacion.MATERIALIDAD]
+        score_razon = scores[CapaValidacion.RAZON_NEGOCIOS]
+        score_total = (score_formal * 0.35 + score_materialidad * 0.40 + score_razon * 0.25)
+
+        if proveedor_en_69b or any(f[0] in REGLAS_CRITICAS and not f[2] for f in filas):
+            nivel_riesgo = NivelRiesgo.ROJO
+        elif score_total >= 80:
+            nivel_riesgo = NivelRiesgo.VERDE
+        elif score_total >= 50:
+            nivel_riesgo = NivelRiesgo.AMARILLO
+        else:
+            nivel_riesgo = NivelRiesgo.ROJO
+
+        cumplidas = sum(1 for f in filas if f[2])
+        pendientes = [f[7][0] for f in filas if not f[2] and f[7]][:5]
+        if nivel_riesgo == NivelRiesgo.VERDE:
+            resumen = f"✅ Operación con riesgo bajo. {cumplidas}/{len(filas)} reglas cumplidas."
+            acciones = ["Mantener archivo documental actualizado", "Programar revisión periódica"]
+        elif nivel_riesgo == NivelRiesgo.AMARILLO:
+            resumen = f"⚠️ Operación con riesgo medio. {cumplidas}/{len(filas)} reglas cumplidas."
+            acciones = pendientes
+        else:
+            resumen = f"🔴 Operación con riesgo alto. {cumplidas}/{len(filas)} reglas cumplidas."
+            acciones = ["URGENTE: Revisar viabilidad de la deducción"] + pendientes
+
+        scores_redondeados = (
+            round(score_total, 2), round(score_formal, 2),
+            round(score_materialidad, 2), round(score_razon, 2),
+        )
+        return filas, scores_redondeados, nivel_riesgo, resumen, acciones
+
     def _evaluar_regla(
         self,
         regla: ReglaValidacion,
@@ -1346,9 +1615,8 @@ class LegalValidationService:
             return NivelRiesgo.ROJO
 
         # Rojo si alguna regla crítica no cumple
-        reglas_criticas = {"CFF_69B_PROVEEDOR", "LISR_27_I", "CFF_69B_MATERIALIDAD"}
         for resultado in resultados:
-            if resultado.regla_id in reglas_criticas and not resultado.cumple:
+            if resultado.regla_id in REGLAS_CRITICAS and not resultado.cumple:
                 return NivelRiesgo.ROJO
 
         # Semáforo por score
@@ -0,0 +1,484 @@
+"""
+Registro de métricas de bajo costo (contadores e histogramas) con
+exposición en formato de texto de Prometheus.
+
+- Contadores e histogramas de cubetas fijas. Cada hilo escribe en su propia
+  fila, así que observar no toma locks y no se pierden incrementos entre
+  hilos; leer suma las filas.
+- Familias con etiquetas declaradas y un tope de series: las combinaciones
+  que exceden el tope se acumulan en la serie "_otros".
+- `span("nombre")` decora funciones (sync o async) o envuelve bloques y
+  registra su duración en revisar_<nombre>_seconds y sus errores en
+  revisar_<nombre>_errors_total.
+- AgregadorArchivos escribe periódicamente la foto de cada worker en un
+  directorio compartido y combina todas al exponer, de modo que /metrics
+  refleja todos los workers y los contadores sobreviven reinicios.
+
+Configuración:
+    METRICS_DIR: directorio de fotos por worker (sin él, solo el proceso actual)
+    METRICS_FLUSH_SECONDS: intervalo de escritura de la foto (default 15)
+    METRICS_MAX_SERIES: series por familia antes de agrupar en "_otros" (default 500)
+"""
+
+import asyncio
+import atexit
+import fcntl
+import functools
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CUBETAS_LATENCIA = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+ETIQUETA_DESBORDE = "_otros"
+PREFIJO = "revisar_"
+
+
+class _Serie:
+    """Una fila de acumuladores por hilo; `_ancho` posiciones por fila."""
+
+    __slots__ = ("_local", "_filas", "_ancho", "_lock")
+
+    def __init__(self, ancho: int):
+        self._local = threading.local()
+        self._filas: List[list] = []
+        self._ancho = ancho
+        self._lock = threading.Lock()
+
+    def _nueva_fila(self) -> list:
+        fila = [0] * self._ancho
+        # Solo la primera observación de cada hilo toma el lock
+        with self._lock:
+            self._filas.append(fila)
+        self._local.fila = fila
+        return fila
+
+    def _sumar_filas(self) -> list:
+        total = [0] * self._ancho
+        for fila in list(self._filas):
+            for i, valor in enumerate(fila):
+                total[i] += valor
+        return total
+
+
+class Contador(_Serie):
+    """Contador monotónico."""
+
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(1)
+
+    def incrementar(self, n: float = 1) -> None:
+        try:
+            fila = self._local.fila
+        except AttributeError:
+            fila = self._nueva_fila()
+        fila[0] += n
+
+    @property
+    def valor(self) -> float:
+        return self._sumar_filas()[0]
+
+    def _foto(self) -> float:
+        return self.valor
+
+
+class Histograma(_Serie):
+    """Histograma de cubetas fijas; la última posición de cada fila es la suma."""
+
+    __slots__ = ("_limites",)
+
+    def __init__(self, limites: Sequence[float]):
+        self._limites = tuple(limites)
+        # Una cubeta por límite, +Inf y la suma
+        super().__init__(len(self._limites) + 2)
+
+    def observar(self, valor: float) -> None:
+        try:
+            fila = self._local.fila
+        except AttributeError:
+            fila = self._nueva_fila()
+        fila[bisect_left(self._limites, valor)] += 1
+        fila[-1] += valor
+
+    @property
+    def conteo(self) -> int:
+        return sum(self._sumar_filas()[:-1])
+
+    @property
+    def suma(self) -> float:
+        return self._sumar_filas()[-1]
+
+    def _foto(self) -> Dict[str, Any]:
+        total = self._sumar_filas()
+        return {"cubetas": total[:-1], "suma": total[-1]}
+
+
+class FamiliaMetrica:
+    """Métrica con nombre, ayuda y etiquetas; una serie por combinación de valores."""
+
+    def __init__(
+        self,
+        tipo: str,
+        nombre: str,
+        ayuda: str,
+        etiquetas: Sequence[str] = (),
+        limites: Optional[Sequence[float]] = None,
+        max_series: int = 500
+    ):
+        self.tipo = tipo
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.nombres_etiquetas = tuple(etiquetas)
+        self.limites = tuple(limites) if limites is not None else None
+        self.max_series = max_series
+        self._series: Dict[Tuple[str, ...], _Serie] = {}
+        # Búsqueda por los valores tal como llegan (p. ej. enteros) sin convertir
+        self._cache: Dict[Tuple[Any, ...], _Serie] = {}
+        self._lock = threading.Lock()
+        self._desbordada = False
+        self._sin_etiquetas = self._crear() if not self.nombres_etiquetas else None
+        if self._sin_etiquetas is not None:
+            self._series[()] = self._cache[()] = self._sin_etiquetas
+
+    def _crear(self) -> _Serie:
+        return Histograma(self.limites) if self.tipo == "histogram" else Contador()
+
+    def etiquetas(self, *valores: Any) -> Any:
+        """Serie para esos valores de etiqueta (en el orden declarado)."""
+        serie = self._cache.get(valores)
+        if serie is not None:
+            return serie
+        if len(valores) != len(self.nombres_etiquetas):
+            raise ValueError(f"{self.nombre} espera etiquetas {self.nombres_etiquetas}, recibió {valores}")
+        clave = tuple(str(v) for v in valores)
+        with self._lock:
+            serie = self._series.get(clave)
+            # Se reserva un lugar para la serie de desborde
+            if serie is None and len(self._series) >= self.max_series - 1:
+                if not self._desbordada:
+                    self._desbordada = True
+                    logger.warning(f"{self.nombre}: más de {self.max_series} series, se agrupan en '{ETIQUETA_DESBORDE}'")
+                clave = (ETIQUETA_DESBORDE,) * len(self.nombres_etiquetas)
+                serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = self._crear()
+            if len(self._cache) < 4 * self.max_series:
+                self._cache[valores] = serie
+        return serie
+
+    # Atajos para familias sin etiquetas
+    def incrementar(self, n: float = 1) -> None:
+        self._sin_etiquetas.incrementar(n)
+
+    def observar(self, valor: float) -> None:
+        self._sin_etiquetas.observar(valor)
+
+    def _foto(self) -> Dict[str, Any]:
+        return {
+            "tipo": self.tipo,
+            "ayuda": self.ayuda,
+            "etiquetas": list(self.nombres_etiquetas),
+            "limites": list(self.limites) if self.limites is not None else None,
+            "series": [[list(clave), serie._foto()] for clave, serie in list(self._series.items())],
+        }
+
+
+class RegistroMetricas:
+    """Conjunto de familias de un proceso."""
+
+    def __init__(self, max_series: Optional[int] = None):
+        self.max_series = max_series or int(os.environ.get("METRICS_MAX_SERIES", "500"))
+        self._familias: Dict[str, FamiliaMetrica] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, tipo: str, nombre: str, ayuda: str, etiquetas: Sequence[str], limites=None) -> FamiliaMetrica:
+        with self._lock:
+            familia = self._familias.get(nombre)
+            if familia is None:
+                familia = FamiliaMetrica(tipo, nombre, ayuda, etiquetas, limites, self.max_series)
+                self._familias[nombre] = familia
+            elif familia.tipo != tipo or familia.nombres_etiquetas != tuple(etiquetas):
+                raise ValueError(f"La métrica {nombre} ya existe como {familia.tipo}{familia.nombres_etiquetas}")
+            return familia
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> FamiliaMetrica:
+        return self._registrar("counter", nombre, ayuda, etiquetas)
+
+    def histograma(
+        self,
+        nombre: str,
+        ayuda: str,
+        etiquetas: Sequence[str] = (),
+        limites: Sequence[float] = CUBETAS_LATENCIA
+    ) -> FamiliaMetrica:
+        return self._registrar("histogram", nombre, ayuda, etiquetas, limites)
+
+    def foto(self) -> Dict[str, Any]:
+        """Estado serializable (JSON) de todas las familias."""
+        return {nombre: familia._foto() for nombre, familia in list(self._familias.items())}
+
+    def exposicion(self) -> str:
+        return formatear_prometheus(self.foto())
+
+
+def combinar_fotos(fotos: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Suma fotos de varios procesos serie por serie."""
+    combinada: Dict[str, Any] = {}
+    series_por_familia: Dict[str, Dict[Tuple[str, ...], Any]] = {}
+
+    for foto in fotos:
+        for nombre, familia in foto.items():
+            destino = combinada.get(nombre)
+            if destino is None:
+                destino = combinada[nombre] = {k: v for k, v in familia.items() if k != "series"}
+                series_por_familia[nombre] = {}
+            elif destino["tipo"] != familia["tipo"] or destino["limites"] != familia["limites"]:
+                logger.warning(f"Métrica {nombre} con tipo o cubetas distintas entre procesos; se omite una foto")
+                continue
+
+            series = series_por_familia[nombre]
+            for valores, datos in familia["series"]:
+                clave = tuple(valores)
+                previo = series.get(clave)
+                if previo is None:
+                    series[clave] = datos if familia["tipo"] == "counter" else {
+                        "cubetas": list(datos["cubetas"]), "suma": datos["suma"]
+                    }
+                elif familia["tipo"] == "counter":
+                    series[clave] = previo + datos
+                else:
+                    previo["cubetas"] = [a + b for a, b in zip(previo["cubetas"], datos["cubetas"])]
+                    previo["suma"] += datos["suma"]
+
+    for nombre, destino in combinada.items():
+        destino["series"] = [[list(clave), datos] for clave, datos in series_por_familia[nombre].items()]
+    return combinada
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor: float) -> str:
+    if isinstance(valor, float):
+        if math.isinf(valor):
+            return "+Inf" if valor > 0 else "-Inf"
+        if valor.is_integer():
+            return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+def _etiquetas_texto(nombres: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def formatear_prometheus(foto: Dict[str, Any]) -> str:
+    """Formato de exposición de texto 0.0.4 de Prometheus."""
+    lineas: List[str] = []
+    for nombre in sorted(foto):
+        familia = foto[nombre]
+        nombres = familia["etiquetas"]
+        lineas.append(f"# HELP {nombre} {_escapar(familia['ayuda'])}")
+        lineas.append(f"# TYPE {nombre} {familia['tipo']}")
+        for valores, datos in sorted(familia["series"], key=lambda s: s[0]):
+            if familia["tipo"] == "counter":
+                lineas.append(f"{nombre}{_etiquetas_texto(nombres, valores)} {_numero(datos)}")
+                continue
+            acumulado = 0
+            for limite, conteo in zip(list(familia["limites"]) + [math.inf], datos["cubetas"]):
+                acumulado += conteo
+                le = f'le="{_numero(float(limite))}"'
+                lineas.append(f"{nombre}_bucket{_etiquetas_texto(nombres, valores, le)} {acumulado}")
+            lineas.append(f"{nombre}_sum{_etiquetas_texto(nombres, valores)} {_numero(float(datos['suma']))}")
+            lineas.append(f"{nombre}_count{_etiquetas_texto(nombres, valores)} {acumulado}")
+    return "\n".join(lineas) + "\n"
+
+
+class AgregadorArchivos:
+    """
+    Combina las métricas de varios workers a través de un directorio local.
+
+    Cada proceso escribe su foto en worker-<pid>-<token>.json (reemplazo
+    atómico). Al combinar, las fotos de procesos que ya no existen se suman a
+    acumulado.json y se borran, así los contadores no se pierden al reiniciar
+    y el directorio no crece con cada despliegue.
+    """
+
+    ACUMULADO = "acumulado.json"
+
+    def __init__(self, directorio: str, registro: "RegistroMetricas"):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.registro = registro
+        self.archivo_propio = self.directorio / f"worker-{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+
+    def escribir(self) -> None:
+        temporal = self.archivo_propio.with_suffix(".tmp")
+        temporal.write_text(json.dumps(self.registro.foto()))
+        os.replace(temporal, self.archivo_propio)
+
+    @staticmethod
+    def _pid_vivo(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def _leer(ruta: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(ruta.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Foto de métricas ilegible {ruta.name}: {e}")
+            return None
+
+    def _compactar(self) -> None:
+        with open(self.directorio / ".lock", "w") as candado:
+            fcntl.flock(candado, fcntl.LOCK_EX)
+            muertos = []
+            for ruta in self.directorio.glob("worker-*.json"):
+                try:
+                    pid = int(ruta.stem.split("-")[1])
+                except (IndexError, ValueError):
+                    continue
+                if ruta != self.archivo_propio and not self._pid_vivo(pid):
+                    muertos.append(ruta)
+            if not muertos:
+                return
+
+            acumulado_ruta = self.directorio / self.ACUMULADO
+            fotos = [self._leer(ruta) for ruta in [acumulado_ruta, *muertos] if ruta.exists()]
+            temporal = acumulado_ruta.with_suffix(".tmp")
+            temporal.write_text(json.dumps(combinar_fotos(f for f in fotos if f)))
+            os.replace(temporal, acumulado_ruta)
+            for ruta in muertos:
+                ruta.unlink(missing_ok=True)
+
+    def combinar(self) -> Dict[str, Any]:
+        """Foto de todos los workers, con la del proceso actual al momento."""
+        self._compactar()
+        fotos = [self.registro.foto()]
+        for ruta in [self.directorio / self.ACUMULADO, *self.directorio.glob("worker-*.json")]:
+            if ruta != self.archivo_propio and ruta.exists():
+                foto = self._leer(ruta)
+                if foto:
+                    fotos.append(foto)
+        return combinar_fotos(fotos)
+
+
+registro = RegistroMetricas()
+_agregador: Optional[AgregadorArchivos] = None
+
+
+def iniciar_agregador(directorio: Optional[str] = None) -> Optional[AgregadorArchivos]:
+    """Activa la combinación entre workers si METRICS_DIR está configurado."""
+    global _agregador
+    directorio = directorio or os.environ.get("METRICS_DIR")
+    if not directorio or _agregador is not None:
+        return _agregador
+
+    _agregador = AgregadorArchivos(directorio, registro)
+    intervalo = float(os.environ.get("METRICS_FLUSH_SECONDS", "15"))
+
+    def escribir_periodicamente():
+        while True:
+            time.sleep(intervalo)
+            try:
+                _agregador.escribir()
+            except OSError as e:
+                logger.warning(f"No se pudo escribir la foto de métricas: {e}")
+
+    threading.Thread(target=escribir_periodicamente, name="metrics-flush", daemon=True).start()
+    atexit.register(_agregador.escribir)
+    logger.info(f"📈 Métricas combinadas entre workers en {directorio}")
+    return _agregador
+
+
+def exposicion() -> str:
+    """Texto de /metrics: todos los workers si hay agregador, si no el proceso actual."""
+    if _agregador is not None:
+        return formatear_prometheus(_agregador.combinar())
+    return registro.exposicion()
+
+
+class span:
+    """
+    Mide la duración de una función o bloque.
+
+        @span("agent_call")
+        async def reason(...): ...
+
+        with span("pdf_export", tipo="bitacora"):
+            ...
+
+    Las etiquetas son fijas por punto de instrumentación para mantener acotado
+    el número de series. Como bloque, cada `with span(...)` crea su instancia.
+    """
+
+    def __init__(self, nombre: str, **etiquetas: str):
+        nombres = tuple(sorted(etiquetas))
+        valores = tuple(str(etiquetas[n]) for n in nombres)
+        self.duracion = registro.histograma(
+            f"{PREFIJO}{nombre}_seconds", f"Duración de {nombre} en segundos", nombres
+        ).etiquetas(*valores)
+        self.errores = registro.contador(
+            f"{PREFIJO}{nombre}_errors_total", f"Excepciones en {nombre}", nombres
+        ).etiquetas(*valores)
+        self._inicio = 0.0
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_excepcion, *_):
+        if tipo_excepcion is not None:
+            self.errores.incrementar()
+        self.duracion.observar(time.perf_counter() - self._inicio)
+        return False
+
+    def __call__(self, funcion: Callable) -> Callable:
+        duracion, errores = self.duracion, self.errores
+
+        if asyncio.iscoroutinefunction(funcion):
+            @functools.wraps(funcion)
+            async def envoltura_async(*args, **kwargs):
+                inicio = time.perf_counter()
+                try:
+                    return await funcion(*args, **kwargs)
+                except BaseException:
+                    errores.incrementar()
+                    raise
+                finally:
+                    duracion.observar(time.perf_counter() - inicio)
+            return envoltura_async
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            except BaseException:
+                errores.incrementar()
+                raise
+            finally:
+                duracion.observar(time.perf_counter() - inicio)
+        return envoltura
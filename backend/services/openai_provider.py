@@ -3,9 +3,12 @@ OpenAI Provider - Centralized OpenAI client for all AI services
 Replaces Anthropic/Claude with OpenAI GPT-4o
 """
 import os
+import asyncio
 import logging
 from typing import Optional, List, Dict, Any
 
+from services.metrics_registry import span
+
 logger = logging.getLogger(__name__)
 
 # OpenAI client setup - LAZY INITIALIZATION
@@ -74,6 +77,7 @@ DEFAULT_MODEL = "gpt-4o"
 FAST_MODEL = "gpt-4o-mini"
 
 
+@span("llm_call", proveedor="openai")
 async def chat_completion(
     messages: List[Dict[str, str]],
     system_message: Optional[str] = None,
@@ -106,7 +110,10 @@ async def chat_completion(
             all_messages.append({"role": "system", "content": system_message})
         all_messages.extend(messages)
 
-        response = client.chat.completions.create(
+        # El cliente es síncrono: correrlo en un hilo para no bloquear el
+        # event loop y permitir llamadas concurrentes (p. ej. validación paralela)
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
             model=model,
             messages=all_messages,
             max_tokens=max_tokens,
@@ -120,6 +127,7 @@ async def chat_completion(
         return f'{{"error": "{str(e)[:100]}"}}'
 
 
+@span("llm_call", proveedor="openai")
 def chat_completion_sync(
     messages: List[Dict[str, str]],
     system_message: Optional[str] = None,
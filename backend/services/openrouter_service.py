@@ -11,13 +11,24 @@ OpenRouter provides a unified API to access multiple LLM providers:
 
 This enables the LLM Council pattern where multiple models
 review and validate each other's responses.
+
+Variables de entorno:
+- COUNCIL_QUORUM: miembros que deben responder antes de continuar. Por
+  defecto 0 (todos): el modo quórum es opcional; con un valor menor al
+  número de miembros los rezagados se omiten y las revisiones cruzadas
+  arrancan conforme llegan las respuestas de la etapa 1.
+- COUNCIL_SOFT_DEADLINE_SECONDS: deadline suave de la etapa 1 (default 30).
+- COUNCIL_HEDGE_DELAY_SECONDS: espera antes de duplicar una petición
+  mientras no haya muestras suficientes para el p95 (default 20).
 """
 
 import os
+import time
 import logging
 import asyncio
 import httpx
-from typing import Dict, List, Any, Optional
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple, AsyncIterator
 from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
@@ -37,8 +48,72 @@ MODEL_DISPLAY_NAMES = {
     "anthropic/claude-3-opus": "Claude 3 Opus",
     "anthropic/claude-sonnet-4-5": "Claude Sonnet 4.5",
     "anthropic/claude-opus-4-5": "Claude Opus 4.5",
+    "anthropic/claude-3.5-haiku": "Claude 3.5 Haiku",
+}
+
+# Modelo alterno para peticiones "hedged" cuando un miembro excede su p95
+COUNCIL_FALLBACK_MODELS = {
+    "anthropic/claude-3-opus": "anthropic/claude-3.5-sonnet",
+    "anthropic/claude-3.5-sonnet": "anthropic/claude-3.5-haiku",
 }
 
+# Quórum: miembros que deben responder antes de continuar (0 = todos, modo quórum desactivado)
+COUNCIL_QUORUM = int(os.environ.get("COUNCIL_QUORUM", "0"))
+# Deadline suave de la etapa 1: al vencer se continúa con las respuestas recibidas
+COUNCIL_SOFT_DEADLINE_SECONDS = float(os.environ.get("COUNCIL_SOFT_DEADLINE_SECONDS", "30"))
+# Espera antes de duplicar una petición mientras no haya suficientes muestras de p95
+COUNCIL_HEDGE_DELAY_SECONDS = float(os.environ.get("COUNCIL_HEDGE_DELAY_SECONDS", "20"))
+HEDGE_MIN_SAMPLES = 20
+
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 30, 45, 60)
+
+
+class LatencyHistogram:
+    """Histograma de latencias (segundos) con ventana para percentiles."""
+    
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.censored = 0
+        self.total_seconds = 0.0
+    
+    def record(self, seconds: float, success: bool = True, censored: bool = False):
+        """`censored`: la llamada se canceló y su latencia real es al menos `seconds`."""
+        self.count += 1
+        self.total_seconds += seconds
+        if censored:
+            self.censored += 1
+        elif not success:
+            self.errors += 1
+        self.samples.append(seconds)
+        for i, limit in enumerate(LATENCY_BUCKETS):
+            if seconds <= limit:
+                self.bucket_counts[i] += 1
+                break
+        else:
+            self.bucket_counts[-1] += 1
+    
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"le_{limit}s" for limit in LATENCY_BUCKETS] + ["gt_60s"]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "censored": self.censored,
+            "avg_seconds": round(self.total_seconds / self.count, 3) if self.count else None,
+            "p50_seconds": self.percentile(50),
+            "p95_seconds": self.percentile(95),
+            "buckets": dict(zip(labels, self.bucket_counts))
+        }
+
 
 class OpenRouterService:
     """
@@ -50,6 +125,9 @@ class OpenRouterService:
         self.api_key = os.environ.get('OPENROUTER_API_KEY', '')
         self.initialized = bool(self.api_key)
         self.executor = ThreadPoolExecutor(max_workers=4)
+        self.member_latency: Dict[str, LatencyHistogram] = {}
+        self.model_latency: Dict[str, LatencyHistogram] = {}
+        self.hedge_stats = {"issued": 0, "won": 0}
         
         if self.initialized:
             logger.info("OpenRouter service initialized with API key")
@@ -154,6 +232,155 @@ class OpenRouterService:
             logger.error(f"Error in sync call: {e}")
             return {"success": False, "error": str(e), "content": None}
     
+    def _record_latency(self, member: str, model: str, seconds: float, success: bool, censored: bool = False):
+        self.member_latency.setdefault(member, LatencyHistogram()).record(seconds, success, censored)
+        self.model_latency.setdefault(model, LatencyHistogram()).record(seconds, success, censored)
+    
+    def get_latency_stats(self) -> Dict[str, Any]:
+        """Histogramas de latencia por miembro del consejo y por modelo."""
+        return {
+            "members": {member: h.to_dict() for member, h in self.member_latency.items()},
+            "models": {model: h.to_dict() for model, h in self.model_latency.items()},
+            "hedged_requests": dict(self.hedge_stats)
+        }
+    
+    def _hedge_delay(self, model: str) -> float:
+        """p95 observado del modelo, o el retraso por defecto si hay pocas muestras."""
+        histogram = self.model_latency.get(model)
+        if histogram is not None and len(histogram.samples) >= HEDGE_MIN_SAMPLES:
+            return histogram.percentile(95)
+        return COUNCIL_HEDGE_DELAY_SECONDS
+    
+    async def _timed_call(
+        self,
+        member: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            response = await self.call_model(model, messages, temperature, max_tokens)
+        except asyncio.CancelledError:
+            # Rezagado cancelado por quórum o hedge perdido: sin esta muestra
+            # el p95 quedaría sesgado hacia las llamadas rápidas
+            self._record_latency(member, model, time.perf_counter() - start, False, censored=True)
+            raise
+        elapsed = time.perf_counter() - start
+        self._record_latency(member, model, elapsed, bool(response.get("success")))
+        response["latency_seconds"] = round(elapsed, 3)
+        return response
+    
+    async def call_member(
+        self,
+        member: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        hedge: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Llama a un miembro del consejo registrando su latencia. Si la
+        respuesta tarda más que el p95 del modelo, lanza una petición
+        duplicada al modelo alterno y usa la primera respuesta exitosa.
+        """
+        primary = asyncio.create_task(self._timed_call(member, model, messages, temperature, max_tokens))
+        fallback_model = COUNCIL_FALLBACK_MODELS.get(model) if hedge else None
+        if not fallback_model:
+            return await primary
+        
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self._hedge_delay(model))
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done:
+            return primary.result()
+        
+        logger.info(f"⏱️ Council {member}: {model} excede su p95, hedging con {fallback_model}")
+        self.hedge_stats["issued"] += 1
+        hedged = asyncio.create_task(self._timed_call(member, fallback_model, messages, temperature, max_tokens))
+        pending = {primary, hedged}
+        last_response: Dict[str, Any] = {}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    last_response = task.result()
+                    if last_response.get("success"):
+                        if task is hedged:
+                            self.hedge_stats["won"] += 1
+                            last_response["hedged"] = True
+                        return last_response
+            return last_response
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def stream_council(
+        self,
+        prompt: str,
+        system_prompts: Dict[str, str],
+        models: Optional[Dict[str, str]] = None,
+        quorum: Optional[int] = None,
+        soft_deadline: Optional[float] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Stage 1 en modo quórum: produce (rol, respuesta) conforme llegan.
+        Termina al reunir `quorum` respuestas exitosas o al vencer el
+        deadline suave (si ya hay al menos una); los miembros pendientes
+        se cancelan y se reportan como omitidos.
+        """
+        if models is None:
+            models = COUNCIL_MODELS
+        
+        tasks = {}
+        for role, model in models.items():
+            if role in system_prompts and role != "chairman":
+                messages = [
+                    {"role": "system", "content": system_prompts[role]},
+                    {"role": "user", "content": prompt}
+                ]
+                tasks[asyncio.create_task(self.call_member(role, model, messages))] = role
+        
+        quorum = min(quorum or len(tasks), len(tasks))
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + soft_deadline if soft_deadline else None
+        pending = set(tasks)
+        successes = 0
+        try:
+            while pending and successes < quorum:
+                timeout = None
+                if deadline is not None and successes > 0:
+                    timeout = max(deadline - loop.time(), 0)
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    logger.warning(f"⏱️ Council: deadline suave de {soft_deadline}s con {successes}/{len(tasks)} respuestas")
+                    break
+                for task in done:
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        response = {"success": False, "error": str(e), "content": None}
+                    if response.get("success"):
+                        successes += 1
+                    yield tasks[task], response
+            
+            for task in pending:
+                task.cancel()
+                yield tasks[task], {
+                    "success": False,
+                    "error": "Omitido: quórum alcanzado o deadline vencido",
+                    "content": None,
+                    "skipped": True
+                }
+            pending = set()
+        finally:
+            for task in pending:
+                task.cancel()
+    
     async def call_council_parallel(
         self,
         prompt: str,
@@ -181,7 +408,7 @@ class OpenRouterService:
                     {"role": "system", "content": system_prompts[role]},
                     {"role": "user", "content": prompt}
                 ]
-                tasks[role] = self.call_model(model, messages)
+                tasks[role] = self.call_member(role, model, messages)
         
         results = {}
         responses = await asyncio.gather(*tasks.values(), return_exceptions=True)
@@ -215,29 +442,10 @@ class OpenRouterService:
         """
         tasks = {}
         
-        for reviewer_role, reviewer_response in original_responses.items():
-            if not reviewer_response.get("success"):
-                continue
-            
-            other_responses = []
-            for i, (role, resp) in enumerate(original_responses.items()):
-                if role != reviewer_role and resp.get("success"):
-                    other_responses.append(f"Respuesta {i+1}:\n{resp.get('content', '')}")
-            
-            if not other_responses:
-                continue
-            
-            review_prompt = review_prompt_template.format(
-                my_response=reviewer_response.get("content", ""),
-                other_responses="\n\n---\n\n".join(other_responses)
-            )
-            
-            model = COUNCIL_MODELS.get(reviewer_role, "anthropic/claude-3.5-sonnet")
-            messages = [
-                {"role": "system", "content": "Eres un revisor experto. Evalúa las respuestas de forma objetiva e imparcial."},
-                {"role": "user", "content": review_prompt}
-            ]
-            tasks[reviewer_role] = self.call_model(model, messages)
+        for reviewer_role in original_responses:
+            review = self._review_member(reviewer_role, original_responses, review_prompt_template)
+            if review is not None:
+                tasks[reviewer_role] = review
         
         results = {}
         if tasks:
@@ -250,6 +458,91 @@ class OpenRouterService:
         
         return results
     
+    def _review_member(
+        self,
+        reviewer_role: str,
+        original_responses: Dict[str, Dict[str, Any]],
+        review_prompt_template: str
+    ):
+        """Corrutina de revisión de un miembro, o None si no hay qué revisar."""
+        reviewer_response = original_responses.get(reviewer_role, {})
+        if not reviewer_response.get("success"):
+            return None
+        
+        other_responses = []
+        for i, (role, resp) in enumerate(original_responses.items()):
+            if role != reviewer_role and resp.get("success"):
+                other_responses.append(f"Respuesta {i+1}:\n{resp.get('content', '')}")
+        
+        if not other_responses:
+            return None
+        
+        review_prompt = review_prompt_template.format(
+            my_response=reviewer_response.get("content", ""),
+            other_responses="\n\n---\n\n".join(other_responses)
+        )
+        
+        model = COUNCIL_MODELS.get(reviewer_role, "anthropic/claude-3.5-sonnet")
+        messages = [
+            {"role": "system", "content": "Eres un revisor experto. Evalúa las respuestas de forma objetiva e imparcial."},
+            {"role": "user", "content": review_prompt}
+        ]
+        return self.call_member(f"{reviewer_role}:review", model, messages)
+    
+    async def run_council_stages(
+        self,
+        prompt: str,
+        system_prompts: Dict[str, str],
+        review_prompt_template: Optional[str] = None,
+        models: Optional[Dict[str, str]] = None,
+        quorum: Optional[int] = None,
+        soft_deadline: Optional[float] = None
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """
+        Stages 1 y 2 en flujo: las revisiones cruzadas arrancan conforme
+        llegan las respuestas, sin esperar a que termine todo el consejo.
+        La revisión de un miembro inicia en cuanto él y otros (quórum - 1)
+        miembros respondieron; al cerrar la etapa 1 (quórum o deadline) se
+        revisa a los que aún tengan al menos un par.
+        
+        Returns:
+            (respuestas de stage 1, revisiones de stage 2)
+        """
+        stage1: Dict[str, Dict[str, Any]] = {}
+        review_tasks: Dict[str, asyncio.Task] = {}
+        expected = len([r for r in (models or COUNCIL_MODELS) if r in system_prompts and r != "chairman"])
+        peers_needed = max(min(quorum or expected, expected) - 1, 1)
+        
+        def start_reviews(min_peers: int):
+            if review_prompt_template is None:
+                return
+            answered = [r for r, resp in stage1.items() if resp.get("success")]
+            if len(answered) - 1 < min_peers:
+                return
+            for reviewer_role in answered:
+                if reviewer_role not in review_tasks:
+                    review = self._review_member(reviewer_role, dict(stage1), review_prompt_template)
+                    if review is not None:
+                        review_tasks[reviewer_role] = asyncio.create_task(review)
+        
+        try:
+            async for role, response in self.stream_council(prompt, system_prompts, models, quorum, soft_deadline):
+                stage1[role] = response
+                if response.get("success"):
+                    start_reviews(peers_needed)
+            start_reviews(1)
+            
+            reviews = {}
+            for role, task in review_tasks.items():
+                try:
+                    reviews[role] = await task
+                except Exception as e:
+                    reviews[role] = {"success": False, "error": str(e)}
+            return stage1, reviews
+        finally:
+            for task in review_tasks.values():
+                task.cancel()
+    
     async def chairman_synthesize(
         self,
         original_prompt: str,
@@ -302,13 +595,15 @@ Basándote en todas las perspectivas anteriores:
             {"role": "user", "content": synthesis_prompt}
         ]
         
-        return await self.call_model(chairman_model, messages, temperature=0.3)
+        return await self.call_member("chairman", chairman_model, messages, temperature=0.3)
     
     async def run_full_council(
         self,
         prompt: str,
         context: str = "",
-        include_reviews: bool = True
+        include_reviews: bool = True,
+        quorum: Optional[int] = None,
+        soft_deadline: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Run the complete 3-stage LLM Council process.
@@ -317,6 +612,8 @@ Basándote en todas las perspectivas anteriores:
             prompt: The query to evaluate
             context: Additional context (RAG results, project data, etc.)
             include_reviews: Whether to run Stage 2 (cross-review)
+            quorum: Members that must answer before moving on (default COUNCIL_QUORUM, 0 = all)
+            soft_deadline: Seconds after which stage 1 proceeds with the answers received
             
         Returns:
             Complete council result with all stages
@@ -356,12 +653,8 @@ Tu rol es sintetizar las perspectivas del consejo y producir una evaluación fin
 - Produce una conclusión clara y accionable
 - Mantén un tono profesional y objetivo"""
         
-        logger.info("🏛️ Council Stage 1: Gathering individual opinions...")
-        stage1_responses = await self.call_council_parallel(full_prompt, system_prompts)
-        
-        reviews = {}
+        review_template = None
         if include_reviews:
-            logger.info("🔍 Council Stage 2: Cross-review phase...")
             review_template = """
 Mi análisis fue:
 {my_response}
@@ -374,7 +667,15 @@ Evalúa objetivamente:
 2. ¿Hay afirmaciones sin fundamento en alguno?
 3. ¿Qué puntos deberían incluirse en la conclusión final?
 """
-            reviews = await self.run_council_review(stage1_responses, review_template)
+        
+        logger.info("🏛️ Council Stages 1-2: Gathering opinions and streaming cross-reviews...")
+        stage1_responses, reviews = await self.run_council_stages(
+            full_prompt,
+            system_prompts,
+            review_template,
+            quorum=quorum if quorum is not None else COUNCIL_QUORUM,
+            soft_deadline=soft_deadline if soft_deadline is not None else COUNCIL_SOFT_DEADLINE_SECONDS
+        )
         
         logger.info("👨‍⚖️ Council Stage 3: Chairman synthesis...")
         final_response = await self.chairman_synthesize(
@@ -393,7 +694,10 @@ Evalúa objetivamente:
             "council_models": {
                 role: resp.get("model_name", "Unknown") 
                 for role, resp in stage1_responses.items()
-            }
+            },
+            "skipped_members": [
+                role for role, resp in stage1_responses.items() if resp.get("skipped")
+            ]
         }
     
     def run_full_council_sync(
@@ -42,6 +42,8 @@ except ImportError:
     PCLOUD_AVAILABLE = False
     logger.warning("pCloud service not available - investigation results won't be persisted")
 
+from services.oraculo_fases import FASES_INVESTIGACION, MAX_CONCURRENCIA, ejecutar_fases
+
 
 class TipoInvestigacion(str, Enum):
     """Tipos de investigación disponibles en Oráculo Estratégico"""
@@ -308,11 +310,18 @@ class OraculoEstrategicoService:
         tipos_investigacion: Optional[List[TipoInvestigacion]] = None,
         rfc: Optional[str] = None,
         empresa_id: Optional[str] = None,
-        guardar_pcloud: bool = True
+        guardar_pcloud: bool = True,
+        refrescar: bool = False
     ) -> Dict[str, Any]:
         """
         Ejecuta investigación empresarial completa (14 fases).
 
+        Las fases se ejecutan según su grafo de dependencias (solo Competidores,
+        Oportunidades, Materialidad y Reporte esperan a otras fases) y cada
+        resultado se cachea por empresa, fase y entrada, así que repetir una
+        investigación solo vuelve a pedir las fases expiradas o cuya entrada
+        cambió.
+
         Las 14 fases del Worker de Cloudflare:
         1. Scraping Web (si hay URL)
         2. Perfil de Empresa
@@ -338,6 +347,7 @@ class OraculoEstrategicoService:
             rfc: RFC de la empresa (para nombrar carpeta en pCloud)
             empresa_id: ID del tenant que realiza la investigación
             guardar_pcloud: Si guardar automáticamente en pCloud (default: True)
+            refrescar: Ignorar los resultados cacheados de cada fase
 
         Returns:
             Dict con resultados consolidados de todas las fases de investigación
@@ -351,183 +361,37 @@ class OraculoEstrategicoService:
 
         logger.info(f"Iniciando investigación completa de 14 fases: {empresa}")
 
-        # Estructura para acumular resultados de cada fase
-        resultados = {
-            "scraping": None,
-            "empresa": None,
-            "industria": None,
-            "economia": None,
-            "competidores": None,
-            "pestel": None,
-            "porter": None,
-            "tendencias": None,
-            "esg": None,
-            "ecosistema": None,
-            "digital": None,
-            "oportunidades": None,
-            "materialidad": None,
-            "reporte": None
+        params = {
+            "empresa": empresa,
+            "sector": sector or "general",
+            "sitio_web": sitio_web,
+            "contexto_adicional": contexto_adicional,
         }
-
-        fuentes_totales = []
-        fases_completadas = 0
-        contexto_acumulado = contexto_adicional or ""
-        sector_usado = sector or "general"
+        sector_usado = params["sector"]
 
         try:
-            async with aiohttp.ClientSession() as session:
-
-                # ═══════════════════════════════════════════════════════════
-                # FASE 1: SCRAPING WEB (si hay URL)
-                # ═══════════════════════════════════════════════════════════
-                if sitio_web:
-                    logger.info(f"Fase 1/14: Scraping web de {sitio_web}")
-                    try:
-                        async with session.post(
-                            f"{self.worker_url}/api/scrape",
-                            json={"url": sitio_web},
-                            timeout=aiohttp.ClientTimeout(total=60)
-                        ) as resp:
-                            if resp.status == 200:
-                                data = await resp.json()
-                                if data.get("success"):
-                                    resultados["scraping"] = data
-                                    contexto_acumulado += f"\n\nSITIO WEB:\n{data.get('contenido', '')[:15000]}"
-                                    fases_completadas += 1
-                                    logger.info(f"✓ Fase 1: {data.get('paginas', 0)} páginas extraídas")
-                    except Exception as e:
-                        logger.warning(f"Fase 1 (scraping) falló: {e}")
-
-                # ═══════════════════════════════════════════════════════════
-                # FASES 2-12: INVESTIGACIONES CON PERPLEXITY
-                # ═══════════════════════════════════════════════════════════
-                investigaciones_perplexity = [
-                    ("empresa", "Fase 2/14: Perfil de Empresa"),
-                    ("industria", "Fase 3/14: Análisis de Industria"),
-                    ("economia", "Fase 4/14: Panorama Económico"),
-                    ("competidores", "Fase 5/14: Análisis Competitivo"),
-                    ("pestel", "Fase 6/14: Análisis PESTEL"),
-                    ("porter", "Fase 7/14: 5 Fuerzas de Porter"),
-                    ("tendencias", "Fase 8/14: Megatendencias Globales"),
-                    ("esg", "Fase 9/14: Análisis ESG"),
-                    ("ecosistema", "Fase 10/14: Ecosistema de la Industria"),
-                    ("digital", "Fase 11/14: Transformación Digital"),
-                    ("oportunidades", "Fase 12/14: Oportunidades y Proyectos"),
-                ]
-
-                for tipo, descripcion in investigaciones_perplexity:
-                    logger.info(descripcion)
-                    try:
-                        payload = {
-                            "tipo": tipo,
-                            "empresa": empresa,
-                            "sector": sector_usado,
-                            "contexto": contexto_acumulado[:8000] if tipo in ["competidores", "oportunidades"] else ""
-                        }
+            # Las fases independientes corren en paralelo (ver services/oraculo_fases.py)
+            async with aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=MAX_CONCURRENCIA)
+            ) as session:
+                respuestas, ejecutadas = await ejecutar_fases(
+                    session,
+                    self.worker_url,
+                    params,
+                    empresa_id=empresa_id,
+                    refrescar=refrescar,
+                )
 
-                        async with session.post(
-                            f"{self.worker_url}/api/investigar",
-                            json=payload,
-                            timeout=aiohttp.ClientTimeout(total=120)
-                        ) as resp:
-                            if resp.status == 200:
-                                data = await resp.json()
-                                if data.get("success"):
-                                    resultados[tipo] = data.get("resultado")
-                                    if data.get("fuentes"):
-                                        fuentes_totales.extend(data.get("fuentes", []))
-                                    # Acumular contexto para fases siguientes
-                                    if tipo in ["empresa", "industria", "economia", "competidores"]:
-                                        contexto_acumulado += f"\n\n{tipo.upper()}:\n{data.get('resultado', '')[:5000]}"
-                                    fases_completadas += 1
-                                    logger.info(f"✓ {descripcion} completada")
-                    except Exception as e:
-                        logger.warning(f"{descripcion} falló: {e}")
-
-                # ═══════════════════════════════════════════════════════════
-                # FASE 13: MATERIALIDAD CON CLAUDE
-                # ═══════════════════════════════════════════════════════════
-                logger.info("Fase 13/14: Análisis de Materialidad (Claude)")
-                try:
-                    datos_materialidad = f"""
-=== PERFIL DE EMPRESA ===
-{resultados.get('empresa', 'No disponible')}
-
-=== INDUSTRIA ===
-{resultados.get('industria', 'No disponible')}
-
-=== SITIO WEB ===
-{resultados.get('scraping', {}).get('contenido', 'No disponible')[:5000] if resultados.get('scraping') else 'No disponible'}
-"""
-                    async with session.post(
-                        f"{self.worker_url}/api/analizar",
-                        json={"tipo": "materialidad", "empresa": empresa, "datos": datos_materialidad},
-                        timeout=aiohttp.ClientTimeout(total=120)
-                    ) as resp:
-                        if resp.status == 200:
-                            data = await resp.json()
-                            if data.get("success"):
-                                resultados["materialidad"] = data.get("resultado")
-                                fases_completadas += 1
-                                logger.info("✓ Fase 13: Materialidad completada")
-                except Exception as e:
-                    logger.warning(f"Fase 13 (materialidad) falló: {e}")
-
-                # ═══════════════════════════════════════════════════════════
-                # FASE 14: REPORTE FINAL CON CLAUDE
-                # ═══════════════════════════════════════════════════════════
-                logger.info("Fase 14/14: Generación de Reporte Final (Claude)")
-                try:
-                    todo_contexto = f"""
-=== PERFIL DE EMPRESA ===
-{resultados.get('empresa', 'No disponible')}
-
-=== ANÁLISIS DE INDUSTRIA ===
-{resultados.get('industria', 'No disponible')}
-
-=== PANORAMA ECONÓMICO ===
-{resultados.get('economia', 'No disponible')}
-
-=== ANÁLISIS COMPETITIVO ===
-{resultados.get('competidores', 'No disponible')}
-
-=== ANÁLISIS PESTEL ===
-{resultados.get('pestel', 'No disponible')}
-
-=== 5 FUERZAS DE PORTER ===
-{resultados.get('porter', 'No disponible')}
-
-=== MEGATENDENCIAS ===
-{resultados.get('tendencias', 'No disponible')}
-
-=== ANÁLISIS ESG ===
-{resultados.get('esg', 'No disponible')}
-
-=== ECOSISTEMA ===
-{resultados.get('ecosistema', 'No disponible')}
-
-=== TRANSFORMACIÓN DIGITAL ===
-{resultados.get('digital', 'No disponible')}
-
-=== OPORTUNIDADES Y PROYECTOS ===
-{resultados.get('oportunidades', 'No disponible')}
-
-=== MATERIALIDAD SAT ===
-{resultados.get('materialidad', 'No disponible')}
-"""
-                    async with session.post(
-                        f"{self.worker_url}/api/analizar",
-                        json={"tipo": "reporte_final", "empresa": empresa, "datos": todo_contexto[:50000]},
-                        timeout=aiohttp.ClientTimeout(total=180)
-                    ) as resp:
-                        if resp.status == 200:
-                            data = await resp.json()
-                            if data.get("success"):
-                                resultados["reporte"] = data.get("resultado")
-                                fases_completadas += 1
-                                logger.info("✓ Fase 14: Reporte final completado")
-                except Exception as e:
-                    logger.warning(f"Fase 14 (reporte) falló: {e}")
+            resultados: Dict[str, Any] = {"scraping": respuestas.get("scraping")}
+            fuentes_totales = []
+            for fase in FASES_INVESTIGACION:
+                if fase.nombre == "scraping":
+                    continue
+                data = respuestas.get(fase.nombre)
+                resultados[fase.nombre] = data.get("resultado") if data else None
+                if data and data.get("fuentes"):
+                    fuentes_totales.extend(data["fuentes"])
+            fases_completadas = sum(1 for data in respuestas.values() if data)
 
             # ═══════════════════════════════════════════════════════════
             # CONSOLIDAR RESULTADOS
@@ -586,6 +450,10 @@ class OraculoEstrategicoService:
                     "sector": sector_usado,
                     "rfc": rfc,
                     "fases_completadas": fases_completadas,
+                    "fases_desde_cache": sorted(
+                        nombre for nombre, data in respuestas.items()
+                        if data and nombre not in ejecutadas
+                    ),
                     "source": "oraculo_estrategico_worker_14_fases"
                 }
             }
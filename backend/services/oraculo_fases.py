@@ -0,0 +1,285 @@
+"""
+Grafo de fases del Oráculo Estratégico.
+
+Cada fase de la investigación declara qué fases necesita como entrada; las
+que no dependen entre sí se ejecutan en paralelo sobre una sola sesión
+aiohttp, con un límite de peticiones simultáneas al Worker. Solo
+"competidores" y "oportunidades" leen el contexto acumulado, y
+"materialidad"/"reporte" consolidan resultados de fases previas.
+
+El resultado de cada fase se cachea por (empresa_id, fase, hash de la
+entrada): al repetir una investigación solo se vuelven a pedir las fases
+cuyo resultado expiró o cuya entrada cambió (por ejemplo, porque cambió el
+resultado de una fase de la que dependen).
+
+Configuración por variables de entorno:
+- ORACULO_MAX_CONCURRENCIA (default 6): peticiones simultáneas al Worker
+- ORACULO_CACHE_FASES_TTL_SECONDS (default 86400)
+- ORACULO_CACHE_FASES_MAX_ENTRIES (default 512): entradas en memoria
+"""
+import os
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+
+from services.cache_service import CacheService, L1Cache
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCIA = int(os.getenv("ORACULO_MAX_CONCURRENCIA", "6"))
+CACHE_FASES_TTL_SECONDS = int(os.getenv("ORACULO_CACHE_FASES_TTL_SECONDS", "86400"))
+CACHE_FASES_MAX_ENTRIES = int(os.getenv("ORACULO_CACHE_FASES_MAX_ENTRIES", "512"))
+
+NO_DISPONIBLE = "No disponible"
+
+
+@dataclass(frozen=True)
+class FaseInvestigacion:
+    """
+    Una fase del Worker. construir_payload(params, entradas) recibe los
+    parámetros de la investigación y las respuestas de las fases de
+    depende_de; devuelve None si la fase no aplica (p. ej. sin sitio web).
+    """
+    nombre: str
+    descripcion: str
+    endpoint: str
+    construir_payload: Callable[[Dict[str, Any], Dict[str, Optional[Dict]]], Optional[Dict[str, Any]]]
+    depende_de: Tuple[str, ...] = ()
+    timeout: float = 120
+
+
+# ============================================================
+# Construcción de payloads
+# ============================================================
+
+def _resultado(entradas: Dict[str, Optional[Dict]], fase: str) -> Optional[str]:
+    data = entradas.get(fase)
+    return data.get("resultado") if data else None
+
+
+def _contexto_acumulado(params: Dict[str, Any], entradas: Dict[str, Optional[Dict]], fases: Tuple[str, ...]) -> str:
+    """Contexto adicional + sitio web + resultados previos, en el orden de las fases."""
+    contexto = params.get("contexto_adicional") or ""
+    if entradas.get("scraping"):
+        contexto += f"\n\nSITIO WEB:\n{(entradas['scraping'].get('contenido') or '')[:15000]}"
+    for fase in fases:
+        if entradas.get(fase):
+            contexto += f"\n\n{fase.upper()}:\n{(_resultado(entradas, fase) or '')[:5000]}"
+    return contexto[:8000]
+
+
+def _payload_scraping(params, entradas):
+    if not params.get("sitio_web"):
+        return None
+    return {"url": params["sitio_web"]}
+
+
+def _payload_investigar(tipo: str, fases_contexto: Tuple[str, ...] = ()):
+    def construir(params, entradas):
+        return {
+            "tipo": tipo,
+            "empresa": params["empresa"],
+            "sector": params["sector"],
+            "contexto": _contexto_acumulado(params, entradas, fases_contexto) if fases_contexto else "",
+        }
+    return construir
+
+
+def _payload_materialidad(params, entradas):
+    scraping = entradas.get("scraping")
+    sitio = (scraping.get("contenido") or NO_DISPONIBLE)[:5000] if scraping else NO_DISPONIBLE
+    datos = f"""
+=== PERFIL DE EMPRESA ===
+{_resultado(entradas, 'empresa') or NO_DISPONIBLE}
+
+=== INDUSTRIA ===
+{_resultado(entradas, 'industria') or NO_DISPONIBLE}
+
+=== SITIO WEB ===
+{sitio}
+"""
+    return {"tipo": "materialidad", "empresa": params["empresa"], "datos": datos}
+
+
+SECCIONES_REPORTE = (
+    ("empresa", "PERFIL DE EMPRESA"),
+    ("industria", "ANÁLISIS DE INDUSTRIA"),
+    ("economia", "PANORAMA ECONÓMICO"),
+    ("competidores", "ANÁLISIS COMPETITIVO"),
+    ("pestel", "ANÁLISIS PESTEL"),
+    ("porter", "5 FUERZAS DE PORTER"),
+    ("tendencias", "MEGATENDENCIAS"),
+    ("esg", "ANÁLISIS ESG"),
+    ("ecosistema", "ECOSISTEMA"),
+    ("digital", "TRANSFORMACIÓN DIGITAL"),
+    ("oportunidades", "OPORTUNIDADES Y PROYECTOS"),
+    ("materialidad", "MATERIALIDAD SAT"),
+)
+
+
+def _payload_reporte(params, entradas):
+    todo_contexto = "\n" + "".join(
+        f"=== {titulo} ===\n{_resultado(entradas, fase) or NO_DISPONIBLE}\n\n"
+        for fase, titulo in SECCIONES_REPORTE
+    )
+    return {"tipo": "reporte_final", "empresa": params["empresa"], "datos": todo_contexto[:50000]}
+
+
+CONTEXTO_COMPETIDORES = ("empresa", "industria", "economia")
+CONTEXTO_OPORTUNIDADES = CONTEXTO_COMPETIDORES + ("competidores",)
+
+FASES_INVESTIGACION: Tuple[FaseInvestigacion, ...] = (
+    FaseInvestigacion("scraping", "Fase 1/14: Scraping Web", "/api/scrape", _payload_scraping, timeout=60),
+    FaseInvestigacion("empresa", "Fase 2/14: Perfil de Empresa", "/api/investigar", _payload_investigar("empresa")),
+    FaseInvestigacion("industria", "Fase 3/14: Análisis de Industria", "/api/investigar", _payload_investigar("industria")),
+    FaseInvestigacion("economia", "Fase 4/14: Panorama Económico", "/api/investigar", _payload_investigar("economia")),
+    FaseInvestigacion(
+        "competidores", "Fase 5/14: Análisis Competitivo", "/api/investigar",
+        _payload_investigar("competidores", CONTEXTO_COMPETIDORES),
+        depende_de=("scraping",) + CONTEXTO_COMPETIDORES,
+    ),
+    FaseInvestigacion("pestel", "Fase 6/14: Análisis PESTEL", "/api/investigar", _payload_investigar("pestel")),
+    FaseInvestigacion("porter", "Fase 7/14: 5 Fuerzas de Porter", "/api/investigar", _payload_investigar("porter")),
+    FaseInvestigacion("tendencias", "Fase 8/14: Megatendencias Globales", "/api/investigar", _payload_investigar("tendencias")),
+    FaseInvestigacion("esg", "Fase 9/14: Análisis ESG", "/api/investigar", _payload_investigar("esg")),
+    FaseInvestigacion("ecosistema", "Fase 10/14: Ecosistema de la Industria", "/api/investigar", _payload_investigar("ecosistema")),
+    FaseInvestigacion("digital", "Fase 11/14: Transformación Digital", "/api/investigar", _payload_investigar("digital")),
+    FaseInvestigacion(
+        "oportunidades", "Fase 12/14: Oportunidades y Proyectos", "/api/investigar",
+        _payload_investigar("oportunidades", CONTEXTO_OPORTUNIDADES),
+        depende_de=("scraping",) + CONTEXTO_OPORTUNIDADES,
+    ),
+    FaseInvestigacion(
+        "materialidad", "Fase 13/14: Materialidad SAT (Claude)", "/api/analizar", _payload_materialidad,
+        depende_de=("scraping", "empresa", "industria"),
+    ),
+    FaseInvestigacion(
+        "reporte", "Fase 14/14: Reporte Final (Claude)", "/api/analizar", _payload_reporte,
+        depende_de=tuple(fase for fase, _ in SECCIONES_REPORTE), timeout=180,
+    ),
+)
+
+
+def ordenar_fases(fases: Tuple[FaseInvestigacion, ...]) -> List[FaseInvestigacion]:
+    """Orden topológico del grafo; ValueError si hay dependencias desconocidas o ciclos."""
+    por_nombre = {fase.nombre: fase for fase in fases}
+    orden: List[FaseInvestigacion] = []
+    visitadas: Set[str] = set()
+    en_curso: Set[str] = set()
+
+    def visitar(nombre: str, origen: str):
+        if nombre not in por_nombre:
+            raise ValueError(f"La fase '{origen}' depende de '{nombre}', que no existe")
+        if nombre in visitadas:
+            return
+        if nombre in en_curso:
+            raise ValueError(f"Dependencia circular en la fase '{nombre}'")
+        en_curso.add(nombre)
+        for dependencia in por_nombre[nombre].depende_de:
+            visitar(dependencia, nombre)
+        en_curso.discard(nombre)
+        visitadas.add(nombre)
+        orden.append(por_nombre[nombre])
+
+    for fase in fases:
+        visitar(fase.nombre, fase.nombre)
+    return orden
+
+
+# ============================================================
+# Ejecución
+# ============================================================
+
+_cache_fases: Optional[CacheService] = None
+
+
+def get_cache_fases() -> CacheService:
+    """Cache de resultados por fase (Redis si hay REDIS_URL, L1 de larga duración)."""
+    global _cache_fases
+    if _cache_fases is None:
+        _cache_fases = CacheService(l1=L1Cache(max_entries=CACHE_FASES_MAX_ENTRIES, ttl=CACHE_FASES_TTL_SECONDS))
+    return _cache_fases
+
+
+async def _llamar_worker(
+    session: aiohttp.ClientSession,
+    worker_url: str,
+    fase: FaseInvestigacion,
+    payload: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    logger.info(fase.descripcion)
+    try:
+        async with session.post(
+            f"{worker_url}{fase.endpoint}",
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=fase.timeout)
+        ) as resp:
+            if resp.status != 200:
+                logger.warning(f"{fase.descripcion}: el Worker respondió {resp.status}")
+                return None
+            data = await resp.json()
+    except Exception as e:
+        logger.warning(f"{fase.descripcion} falló: {e}")
+        return None
+    if not data.get("success"):
+        logger.warning(f"{fase.descripcion}: {data.get('error', 'sin resultado')}")
+        return None
+    logger.info(f"✓ {fase.descripcion} completada")
+    return data
+
+
+async def ejecutar_fases(
+    session: aiohttp.ClientSession,
+    worker_url: str,
+    params: Dict[str, Any],
+    empresa_id: Optional[str] = None,
+    fases: Tuple[FaseInvestigacion, ...] = FASES_INVESTIGACION,
+    max_concurrencia: int = MAX_CONCURRENCIA,
+    cache: Optional[CacheService] = None,
+    refrescar: bool = False,
+) -> Tuple[Dict[str, Optional[Dict[str, Any]]], Set[str]]:
+    """
+    Ejecuta el grafo de fases. Cada fase arranca en cuanto terminan las fases
+    de las que depende; una fase fallida entrega None a sus dependientes.
+
+    Con refrescar=True se ignoran los resultados cacheados (pero se guardan
+    los nuevos).
+
+    Returns:
+        (respuesta del Worker por fase o None, nombres de las fases que se
+        pidieron al Worker en esta ejecución)
+    """
+    cache = cache or get_cache_fases()
+    semaforo = asyncio.Semaphore(max(1, max_concurrencia))
+    tareas: Dict[str, asyncio.Task] = {}
+    ejecutadas: Set[str] = set()
+
+    async def llamar(fase: FaseInvestigacion, payload: Dict[str, Any]):
+        async with semaforo:
+            ejecutadas.add(fase.nombre)
+            return await _llamar_worker(session, worker_url, fase, payload)
+
+    async def correr(fase: FaseInvestigacion) -> Optional[Dict[str, Any]]:
+        entradas = {dep: await tareas[dep] for dep in fase.depende_de}
+        payload = fase.construir_payload(params, entradas)
+        if payload is None:
+            return None
+        key = await cache.scoped_key(f"oraculo_fase:{fase.nombre}", empresa_id, payload)
+        if refrescar:
+            data = await llamar(fase, payload)
+            if data is not None:
+                await cache.set(key, data, ttl=CACHE_FASES_TTL_SECONDS)
+            return data
+        return await cache.get_or_load(key, lambda: llamar(fase, payload), ttl=CACHE_FASES_TTL_SECONDS)
+
+    for fase in ordenar_fases(fases):
+        tareas[fase.nombre] = asyncio.create_task(correr(fase))
+    try:
+        resultados = await asyncio.gather(*tareas.values())
+    finally:
+        for tarea in tareas.values():
+            tarea.cancel()
+    return dict(zip(tareas, resultados)), ejecutadas
@@ -0,0 +1,104 @@
+"""
+Validación paralela de agentes (Fase 0)
+
+Ejecuta validaciones independientes de agentes al mismo tiempo:
+- Timeout por agente (un agente lento no bloquea a los demás)
+- Resultado parcial cuando un agente falla o excede su timeout
+- Límite de validaciones concurrentes por empresa (tenant)
+- Resultados en el orden declarado, sin importar cuál termina primero
+
+Configuración por variables de entorno:
+- PHASE0_AGENT_TIMEOUT_SECONDS (default 180)
+- PHASE0_MAX_CONCURRENT_VALIDATIONS (default 3, por empresa)
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AGENT_TIMEOUT = float(os.environ.get("PHASE0_AGENT_TIMEOUT_SECONDS", "180"))
+DEFAULT_MAX_CONCURRENT_PER_TENANT = int(os.environ.get("PHASE0_MAX_CONCURRENT_VALIDATIONS", "3"))
+
+# empresa_id -> (event loop, semáforo); el semáforo se recrea si cambia el loop
+_tenant_semaphores: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = {}
+
+
+@dataclass
+class AgentValidation:
+    """Una validación de agente: `run` devuelve el dict del AgentService ({'analysis': ...})."""
+    agent_id: str
+    run: Callable[[], Awaitable[Dict]]
+    timeout: Optional[float] = None
+
+
+def get_tenant_semaphore(tenant_id: str, limit: Optional[int] = None) -> asyncio.Semaphore:
+    """Semáforo compartido por todas las validaciones de una empresa."""
+    loop = asyncio.get_running_loop()
+    entry = _tenant_semaphores.get(tenant_id)
+    if entry is None or entry[0] is not loop:
+        entry = (loop, asyncio.Semaphore(limit or DEFAULT_MAX_CONCURRENT_PER_TENANT))
+        _tenant_semaphores[tenant_id] = entry
+    return entry[1]
+
+
+def partial_result_analysis(agent_id: str, reason: str) -> str:
+    """Texto de análisis para un agente sin resultado (queda como PENDIENTE)."""
+    return (
+        f"[ANÁLISIS AUTOMÁTICO - ERROR TEMPORAL]\n\n"
+        f"El agente {agent_id} no completó su validación. "
+        f"El proyecto requiere revisión manual.\n\nMotivo: {reason}"
+    )
+
+
+async def run_parallel_validations(
+    validations: List[AgentValidation],
+    tenant_id: Optional[str] = None,
+    default_timeout: Optional[float] = None,
+    max_concurrent: Optional[int] = None,
+) -> Dict[str, Dict]:
+    """
+    Ejecuta las validaciones concurrentemente.
+
+    Returns:
+        {agent_id: {..resultado del agente.., "status", "duration_ms", "error"}}
+        en el orden de `validations`. `status` es "ok", "timeout" o "error";
+        en los dos últimos `analysis` contiene un texto de resultado parcial.
+    """
+    semaphore = get_tenant_semaphore(tenant_id or "default", max_concurrent)
+    timeout_default = default_timeout or DEFAULT_AGENT_TIMEOUT
+
+    async def run_one(validation: AgentValidation) -> Dict:
+        timeout = validation.timeout or timeout_default
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = dict(await asyncio.wait_for(validation.run(), timeout=timeout))
+                result.setdefault("analysis", "")
+                status, error = "ok", None
+            except asyncio.TimeoutError:
+                error = f"Timeout de {timeout:.0f}s"
+                logger.warning(f"[VALIDACION_PARALELA] {validation.agent_id}: {error}")
+                result, status = {"analysis": partial_result_analysis(validation.agent_id, error)}, "timeout"
+            except Exception as e:
+                error = str(e)
+                logger.error(f"[VALIDACION_PARALELA] {validation.agent_id} falló: {error}")
+                result, status = {"analysis": partial_result_analysis(validation.agent_id, error)}, "error"
+            result.update({
+                "status": status,
+                "error": error,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            })
+            return result
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_one(v) for v in validations))
+    logger.info(
+        f"[VALIDACION_PARALELA] {len(validations)} validaciones en "
+        f"{(time.perf_counter() - start) * 1000:.0f} ms "
+        f"({sum(1 for r in results if r['status'] == 'ok')} completas)"
+    )
+    return {v.agent_id: r for v, r in zip(validations, results)}
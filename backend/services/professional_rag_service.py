@@ -8,8 +8,14 @@ from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from rank_bm25 import BM25Okapi
 import nltk
-from datetime import datetime, timezone
 from services.rag_repository import RagRepository
+from services.drive_sync_service import DriveAPI, DriveSyncService
+from services.drive_sync_store import DATABASE_URL as SYNC_DATABASE_URL, DriveSyncStore, DriveSyncStoreMemoria
+from services.semantic_cache import (
+    SEMANTIC_CACHE_ENABLED,
+    semantic_answer_cache,
+    document_ids_from_metadatas,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +43,18 @@ class ProfessionalRAGService:
             length_function=len
         )
         
+        # Sincronización incremental de Drive; una instancia para todos los
+        # agentes comparte el presupuesto de descargas y embeddings
+        self.drive_sync = DriveSyncService(
+            self.rag_repo,
+            fragmentar=self.text_splitter.split_text,
+            store=DriveSyncStore() if SYNC_DATABASE_URL else DriveSyncStoreMemoria(),
+            limpiar=self._basic_pii_redaction,
+            tipo_documento=self._infer_doctype
+        )
+        self._multi_drive = None
+        self._drive_apis = {}
+        
         # BM25 indices (se cargan bajo demanda)
         self.bm25_indices = {}
         
@@ -73,8 +91,10 @@ class ProfessionalRAGService:
         folder_id: str
     ) -> Dict:
         """
-        Ingesta documentos de una carpeta de Drive usando token del agente.
-        Pipeline: extract → PII redaction → chunk → embed → upsert
+        Sincroniza una carpeta de Drive usando token del agente.
+        Pipeline: changes.list → extract → PII redaction → chunk → embed → upsert.
+        Solo procesa archivos agregados, modificados o eliminados desde la
+        corrida anterior (services/drive_sync_service.py).
         """
         
         logger.info(f"[INGESTION] Iniciando ingesta para {agent_id} from folder {folder_id}")
@@ -84,118 +104,42 @@ class ProfessionalRAGService:
             return {"error": f"Collection not found for {agent_id}"}
         
         try:
-            # Usar MultiAgentDriveService
-            from services.multi_agent_drive import MultiAgentDriveService
-            multi_drive = MultiAgentDriveService()
-            
-            # Listar archivos en Drive del agente
-            files = multi_drive.list_files_in_folder(agent_id, folder_id)
-            
-            if not files:
-                logger.warning(f"No files found for {agent_id}")
-                return {"success": False, "error": "No files found", "docs_processed": 0, "chunks_added": 0}
+            multi_drive = self._get_multi_drive()
+            agente = multi_drive.services.get(agent_id)
+            if not agente:
+                logger.warning(f"Drive not initialized for {agent_id}")
+                return {"success": False, "error": "Drive not initialized", "docs_processed": 0, "chunks_added": 0}
             
-            chunks_added = 0
-            docs_processed = 0
+            drive = self._drive_apis.get(agent_id)
+            if drive is None:
+                drive = self._drive_apis[agent_id] = DriveAPI(agente['drive'])
             
-            for file in files[:20]:  # Procesar primeros 20 archivos
-                file_id = file.get('id')
-                file_name = file.get('name')
-                mime_type = file.get('mimeType', '')
-                
-                logger.info(f"  Procesando: {file_name} (type: {mime_type})")
-                
-                # Extraer texto
-                content = multi_drive.get_file_content(agent_id, file_id, mime_type)
-                
-                logger.info(f"    Contenido extraído: {len(content) if content else 0} caracteres")
-                
-                if not content:
-                    logger.warning(f"    SKIP: Sin contenido")
-                    continue
-                
-                if content.startswith('[Archivo binario'):
-                    logger.warning(f"    SKIP: Binario no soportado")
-                    continue
-                
-                if len(content) < 50:
-                    logger.warning(f"    SKIP: Contenido muy corto ({len(content)} chars)")
-                    continue
-                
-                # PII redaction básica
-                content_clean = self._basic_pii_redaction(content)
-                
-                # Chunking semántico
-                chunks = self.text_splitter.split_text(content_clean)
-                
-                logger.info(f"    Chunking: {len(chunks)} chunks generados")
-                
-                if not chunks:
-                    logger.warning(f"    SKIP: No se generaron chunks")
-                    continue
-                
-                # Preparar metadatos y upsert
-                for i, chunk in enumerate(chunks):
-                    # Generar webViewLink si falta
-                    web_link = file.get('webViewLink', '')
-                    if not web_link:
-                        if 'google-apps.document' in mime_type:
-                            web_link = f"https://docs.google.com/document/d/{file_id}/view"
-                        elif 'google-apps.spreadsheet' in mime_type:
-                            web_link = f"https://docs.google.com/spreadsheets/d/{file_id}/view"
-                        elif 'google-apps.presentation' in mime_type:
-                            web_link = f"https://docs.google.com/presentation/d/{file_id}/view"
-                        else:
-                            web_link = f"https://drive.google.com/file/d/{file_id}/view"
-                    
-                    metadata = {
-                        "doc_title": file_name,
-                        "file_id": file_id,
-                        "chunk_index": i,
-                        "total_chunks": len(chunks),
-                        "created_at": file.get('createdTime', datetime.now(timezone.utc).isoformat()),
-                        "doctype": self._infer_doctype(file_name, mime_type),
-                        "jurisdiction": "MX",
-                        "agent_id": agent_id,
-                        "source": "google_drive",
-                        "web_view_link": web_link  # ← AHORA CON FALLBACK
-                    }
-                    
-                    # UPSERT usando RagRepository
-                    doc_id = self.rag_repo.upsert_document(
-                        agent_id=agent_id,
-                        text=chunk,
-                        metadata=metadata
-                    )
-                    
-                    if doc_id:
-                        chunks_added += 1
-                
-                docs_processed += 1
-                logger.info(f"  ✅ {file_name}: {len(chunks)} chunks guardados en vector store")
-            
-            logger.info(f"✅ Ingestion completa: {docs_processed} docs, {chunks_added} chunks")
-            
-            return {
-                "success": True,
-                "agent_id": agent_id,
-                "docs_processed": docs_processed,
-                "chunks_added": chunks_added
-            }
+            return await self.drive_sync.sincronizar(agent_id, folder_id, drive)
             
         except Exception as e:
             logger.error(f"Error en ingestion para {agent_id}: {str(e)}")
             return {"error": str(e), "docs_processed": 0, "chunks_added": 0}
     
+    def _get_multi_drive(self):
+        """MultiAgentDriveService compartido: autentica una vez por agente, no en cada ingesta."""
+        if self._multi_drive is None:
+            from services.multi_agent_drive import MultiAgentDriveService
+            self._multi_drive = MultiAgentDriveService()
+        return self._multi_drive
+    
     def query_hybrid(
         self,
         agent_id: str,
         query: str,
         top_k: int = 10,
-        score_threshold: float = 0.20
+        score_threshold: float = 0.20,
+        empresa_id: Optional[str] = None
     ) -> List[Dict]:
         """
         Consulta híbrida: semantic (ChromaDB) + lexical (BM25) + rerank
+        
+        Preguntas casi idénticas de la misma empresa y agente se sirven
+        desde el caché semántico.
         """
         
         collection = self.collections.get(agent_id)
@@ -207,6 +151,13 @@ class ProfessionalRAGService:
             # 1. Semantic search con ChromaDB
             query_embedding = self.embeddings.embed_query(query)
             
+            scope = None
+            if SEMANTIC_CACHE_ENABLED:
+                scope = semantic_answer_cache.scope(empresa_id, agent_id, f"hybrid:{top_k}:{score_threshold}")
+                cached = semantic_answer_cache.lookup(scope, query_embedding, source="query_hybrid")
+                if cached is not None:
+                    return cached
+            
             semantic_results = collection.query(
                 query_embeddings=[query_embedding],
                 n_results=top_k,
@@ -240,6 +191,12 @@ class ProfessionalRAGService:
             
             logger.info(f"✅ Query híbrido para {agent_id}: {len(results)} resultados")
             
+            if scope is not None and results:
+                semantic_answer_cache.store(
+                    scope, query_embedding, results,
+                    document_ids_from_metadatas(r["metadata"] for r in results)
+                )
+            
             return results
             
         except Exception as e:
@@ -1,13 +1,51 @@
 """
 Servicio de Proyectos - PostgreSQL.
 Reemplaza el uso de MongoDB para proyectos.
+
+Paginación por cursor (keyset) sobre (updated_at, id) y búsqueda con
+tsvector + pg_trgm; ambas dependen de migrations/011_projects_keyset_busqueda.sql.
 """
 
 import asyncpg
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Tuple, Union
 from datetime import datetime
+import base64
 import json
+import logging
 import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+# Debe coincidir con la expresión de idx_projects_busqueda_fts para que
+# PostgreSQL use el índice
+VECTOR_BUSQUEDA = (
+    "(setweight(to_tsvector('spanish', COALESCE(nombre, '')), 'A')"
+    " || setweight(to_tsvector('simple', COALESCE(proveedor_rfc, '')), 'A')"
+    " || setweight(to_tsvector('spanish', COALESCE(proveedor_nombre, '')), 'B')"
+    " || setweight(to_tsvector('spanish', COALESCE(descripcion, '')), 'C'))"
+)
+
+
+def encode_cursor(updated_at: datetime, project_id: Any) -> str:
+    """Cursor opaco con la posición (updated_at, id) del último proyecto de la página."""
+    crudo = json.dumps([updated_at.isoformat(), str(project_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Inverso de encode_cursor. ValueError si el cursor no es válido."""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        updated_at, project_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return datetime.fromisoformat(updated_at), uuid.UUID(project_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor!r}") from e
+
+
+def _escapar_like(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
 
 class ProjectService:
@@ -127,6 +165,84 @@ class ProjectService:
 
         rows = await self.db.fetch(query, *params)
         return [self._row_to_dict(row) for row in rows]
+
+    async def list_projects_keyset(
+        self,
+        empresa_id: Optional[str] = None,
+        estado: Optional[str] = None,
+        fase: Optional[int] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> dict:
+        """
+        Listar proyectos por cursor, del más reciente (updated_at) al más antiguo.
+
+        Cada página cuesta lo mismo sin importar su profundidad y los proyectos
+        insertados mientras se pagina quedan antes del cursor, así que no
+        desplazan ni duplican los de páginas siguientes. Un proyecto que se
+        actualiza durante la paginación se mueve al inicio.
+        """
+        query, params = self._keyset_query(empresa_id, estado, fase, limit, cursor)
+        rows = await self.db.fetch(query, *params)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["updated_at"], rows[-1]["id"])
+
+        return {
+            "projects": [self._row_to_dict(row) for row in rows],
+            "next_cursor": next_cursor
+        }
+
+    def _keyset_query(
+        self,
+        empresa_id: Optional[str],
+        estado: Optional[str],
+        fase: Optional[int],
+        limit: int,
+        cursor: Optional[str]
+    ) -> Tuple[str, List[Any]]:
+        """SQL de list_projects_keyset; usa idx_projects_empresa_keyset / idx_projects_keyset."""
+
+        conditions: List[str] = []
+        params: List[Any] = []
+        param_count = 0
+
+        if empresa_id:
+            param_count += 1
+            conditions.append(f"empresa_id = ${param_count}")
+            params.append(empresa_id)
+
+        if estado:
+            param_count += 1
+            conditions.append(f"estado = ${param_count}")
+            params.append(estado)
+
+        if fase is not None:
+            param_count += 1
+            conditions.append(f"fase_actual = ${param_count}")
+            params.append(fase)
+
+        if cursor:
+            updated_at, project_id = decode_cursor(cursor)
+            conditions.append(
+                f"(updated_at, id) < (${param_count + 1}::timestamptz, ${param_count + 2}::uuid)"
+            )
+            params.extend([updated_at, project_id])
+            param_count += 2
+
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+
+        # Una fila extra indica si hay página siguiente
+        query = f"""
+            SELECT * FROM projects
+            WHERE {where_clause}
+            ORDER BY updated_at DESC, id DESC
+            LIMIT ${param_count + 1}
+        """
+        params.append(limit + 1)
+        return query, params
     
     async def update_project(
         self,
@@ -368,21 +484,55 @@ class ProjectService:
         query: str,
         limit: int = 20
     ) -> List[dict]:
-        """Buscar proyectos por nombre, proveedor o RFC."""
-        
-        rows = await self.db.fetch("""
-            SELECT * FROM projects
+        """
+        Buscar proyectos por nombre, proveedor, RFC o descripción.
+
+        Coincide por texto completo (palabras, con raíces en español) o por
+        subcadena de nombre/proveedor/RFC como antes; las subcadenas usan los
+        índices trigram. Los resultados vienen ordenados por relevancia.
+        """
+        sql, params = self._search_query(empresa_id, query, limit)
+        try:
+            rows = await self.db.fetch(sql, *params)
+        except asyncpg.exceptions.UndefinedFunctionError as e:
+            logger.warning(
+                f"pg_trgm no instalado (migrations/011_projects_keyset_busqueda.sql): {e}; "
+                "búsqueda solo por subcadena"
+            )
+            rows = await self.db.fetch("""
+                SELECT * FROM projects
+                WHERE empresa_id = $1
+                AND (
+                    nombre ILIKE $2
+                    OR proveedor_nombre ILIKE $2
+                    OR proveedor_rfc ILIKE $2
+                )
+                ORDER BY updated_at DESC
+                LIMIT $3
+            """, empresa_id, params[2], limit)
+        return [self._row_to_dict(row) for row in rows]
+
+    def _search_query(self, empresa_id: str, query: str, limit: int) -> Tuple[str, List[Any]]:
+        """SQL de search_projects; usa idx_projects_busqueda_fts y los índices *_trgm."""
+
+        texto = query.strip()
+        return f"""
+            SELECT *,
+                   ts_rank({VECTOR_BUSQUEDA}, websearch_to_tsquery('spanish', $2))
+                   + GREATEST(similarity(nombre, $2),
+                              similarity(COALESCE(proveedor_nombre, ''), $2),
+                              similarity(COALESCE(proveedor_rfc, ''), $2)) AS relevancia
+            FROM projects
             WHERE empresa_id = $1
             AND (
-                nombre ILIKE $2
-                OR proveedor_nombre ILIKE $2
-                OR proveedor_rfc ILIKE $2
+                {VECTOR_BUSQUEDA} @@ websearch_to_tsquery('spanish', $2)
+                OR nombre ILIKE $3
+                OR proveedor_nombre ILIKE $3
+                OR proveedor_rfc ILIKE $3
             )
-            ORDER BY updated_at DESC
-            LIMIT $3
-        """, empresa_id, f"%{query}%", limit)
-        
-        return [self._row_to_dict(row) for row in rows]
+            ORDER BY relevancia DESC, updated_at DESC, id DESC
+            LIMIT $4
+        """, [empresa_id, texto, f"%{_escapar_like(texto)}%", limit]
     
     async def get_project_stats(self, empresa_id: Optional[str] = None) -> dict:
         """Estadísticas de proyectos. Si empresa_id=None, retorna estadísticas globales (admin)."""
@@ -0,0 +1,176 @@
+"""
+Ensamblador de prompts con prefijos estables y cacheables.
+
+Los system prompts de los agentes son casi todo texto fijo (rol, marco
+normativo, formato de salida) y una parte pequeña que cambia en cada
+llamada (contexto del proyecto, documentos). Este módulo separa el prompt
+en bloques estáticos ordenados y un sufijo volátil:
+
+- El prefijo estático se renderiza una sola vez y se memoiza por contenido;
+  llamadas con los mismos bloques reciben exactamente el mismo texto
+- Con Anthropic el prefijo se envía como bloques de system con
+  cache_control (máximo 4 breakpoints por request), así el proveedor
+  reutiliza el prefijo y solo procesa el sufijo volátil
+- Se reportan tasas de acierto del memo local y del caché del proveedor
+  (cache_read_input_tokens) por etiqueta de prompt
+
+AssembledPrompt es un str: los llamadores que solo necesitan el texto lo
+usan sin cambios.
+
+Configuración por variables de entorno:
+- PROMPT_PREFIX_CACHE_MAX (default 256): prefijos renderizados en memoria
+"""
+import os
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+PREFIX_CACHE_MAX = int(os.getenv("PROMPT_PREFIX_CACHE_MAX", "256"))
+
+# Anthropic acepta como máximo 4 bloques con cache_control por request
+MAX_CACHE_BREAKPOINTS = 4
+
+
+@dataclass(frozen=True)
+class PromptBlock:
+    """Bloque estático; cache_breakpoint marca el fin de un prefijo reutilizable."""
+    text: str
+    cache_breakpoint: bool = False
+
+
+@dataclass(frozen=True)
+class RenderedPrefix:
+    """Prefijo estático renderizado: texto completo y segmentos hasta cada breakpoint."""
+    text: str
+    segments: Tuple[str, ...]
+    digest: str
+
+
+class AssembledPrompt(str):
+    """Prompt completo (prefijo estático + sufijo volátil) que se comporta como str."""
+
+    def __new__(cls, prefix: RenderedPrefix, volatile: str = "", label: str = ""):
+        prompt = super().__new__(cls, prefix.text + volatile)
+        prompt.prefix = prefix
+        prompt.volatile = volatile
+        prompt.label = label
+        return prompt
+
+    def anthropic_system(self) -> List[Dict[str, Any]]:
+        """Bloques de system para la API de Anthropic con cache_control en cada breakpoint."""
+        blocks: List[Dict[str, Any]] = [
+            {"type": "text", "text": segment, "cache_control": {"type": "ephemeral"}}
+            for segment in self.prefix.segments
+        ]
+        if self.volatile:
+            blocks.append({"type": "text", "text": self.volatile})
+        return blocks
+
+
+BlockLike = Union[str, PromptBlock]
+
+
+def _render(key: Tuple[Tuple[str, bool], ...]) -> RenderedPrefix:
+    texts = [text for text, _ in key]
+    # El último bloque siempre cierra un prefijo; si hay más breakpoints de los
+    # permitidos se conservan los últimos (los prefijos más largos)
+    cuts = [i for i, (_, breakpoint) in enumerate(key) if breakpoint]
+    if texts and (not cuts or cuts[-1] != len(texts) - 1):
+        cuts.append(len(texts) - 1)
+    cuts = cuts[-MAX_CACHE_BREAKPOINTS:]
+
+    segments = []
+    start = 0
+    for cut in cuts:
+        segments.append("".join(texts[start:cut + 1]))
+        start = cut + 1
+    text = "".join(segments)
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    return RenderedPrefix(text=text, segments=tuple(s for s in segments if s), digest=digest)
+
+
+class PromptAssembler:
+    """Memoiza prefijos estáticos y lleva estadísticas de reutilización."""
+
+    def __init__(self, max_entries: int = PREFIX_CACHE_MAX):
+        self.max_entries = max_entries
+        self._prefixes: "OrderedDict[Tuple[Tuple[str, bool], ...], RenderedPrefix]" = OrderedDict()
+        self.stats = {"prefix_hits": 0, "prefix_misses": 0}
+        self._by_label: Dict[str, Dict[str, int]] = {}
+
+    def _label_stats(self, label: str) -> Dict[str, int]:
+        stats = self._by_label.get(label)
+        if stats is None:
+            stats = self._by_label[label] = {
+                "hits": 0, "misses": 0,
+                "input_tokens": 0, "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0,
+            }
+        return stats
+
+    def assemble(
+        self,
+        blocks: Sequence[BlockLike],
+        volatile: str = "",
+        label: str = ""
+    ) -> AssembledPrompt:
+        """
+        Arma un prompt. Los bloques vacíos se omiten; el texto resultante es
+        la concatenación de los bloques (sin separadores) más `volatile`.
+        """
+        key = tuple(
+            (block.text, block.cache_breakpoint) if isinstance(block, PromptBlock) else (block, False)
+            for block in blocks
+            if (block.text if isinstance(block, PromptBlock) else block)
+        )
+        label_stats = self._label_stats(label)
+        prefix = self._prefixes.get(key)
+        if prefix is None:
+            prefix = _render(key)
+            self._prefixes[key] = prefix
+            while len(self._prefixes) > self.max_entries:
+                self._prefixes.popitem(last=False)
+            self.stats["prefix_misses"] += 1
+            label_stats["misses"] += 1
+        else:
+            self._prefixes.move_to_end(key)
+            self.stats["prefix_hits"] += 1
+            label_stats["hits"] += 1
+        return AssembledPrompt(prefix, volatile or "", label)
+
+    def record_usage(self, prompt: AssembledPrompt, usage: Any):
+        """Acumula el uso de caché reportado por el proveedor (response.usage de Anthropic)."""
+        if usage is None:
+            return
+        stats = self._label_stats(getattr(prompt, "label", ""))
+        for field_name in ("input_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"):
+            stats[field_name] += getattr(usage, field_name, 0) or 0
+
+    @staticmethod
+    def _ratio(part: int, total: int) -> Optional[float]:
+        return round(part / total, 4) if total else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits, misses = self.stats["prefix_hits"], self.stats["prefix_misses"]
+        by_label = {}
+        for label, stats in self._by_label.items():
+            prompt_tokens = (
+                stats["input_tokens"] + stats["cache_read_input_tokens"] + stats["cache_creation_input_tokens"]
+            )
+            by_label[label or "-"] = {
+                **stats,
+                "prefix_hit_ratio": self._ratio(stats["hits"], stats["hits"] + stats["misses"]),
+                "provider_cache_hit_ratio": self._ratio(stats["cache_read_input_tokens"], prompt_tokens),
+            }
+        return {
+            **self.stats,
+            "prefix_hit_ratio": self._ratio(hits, hits + misses),
+            "entries": len(self._prefixes),
+            "by_label": by_label,
+        }
+
+
+prompt_assembler = PromptAssembler()
@@ -1,6 +1,7 @@
 import os
 import hashlib
 import pickle
+import threading
 from typing import Dict, Any, List, Optional
 import chromadb
 from chromadb.config import Settings
@@ -28,6 +29,8 @@ class EmbeddingCache:
     def __init__(self, cache_file: str = "/tmp/embedding_cache.pkl"):
         self.cache_file = cache_file
         self.cache = self._load_cache()
+        # set() y _save_cache() pueden llegar desde varios hilos (ingesta de Drive)
+        self._lock = threading.Lock()
         logger.info(f"Embedding cache initialized with {len(self.cache)} entries")
     
     def _load_cache(self) -> Dict[str, List[float]]:
@@ -43,8 +46,10 @@ class EmbeddingCache:
     def _save_cache(self):
         """Guarda caché a disco"""
         try:
+            with self._lock:
+                copia = dict(self.cache)
             with open(self.cache_file, 'wb') as f:
-                pickle.dump(self.cache, f)
+                pickle.dump(copia, f)
         except Exception as e:
             logger.error(f"Could not save embedding cache: {e}")
     
@@ -60,9 +65,11 @@ class EmbeddingCache:
     def set(self, text: str, embedding: List[float]):
         """Guarda embedding en caché"""
         text_hash = self.get_hash(text)
-        self.cache[text_hash] = embedding
+        with self._lock:
+            self.cache[text_hash] = embedding
+            guardar = len(self.cache) % 10 == 0
         
-        if len(self.cache) % 10 == 0:
+        if guardar:
             self._save_cache()
 
 
@@ -123,6 +130,15 @@ def _embed_batch(texts: List[str]) -> List[List[float]]:
     return result
 
 
+def _invalidate_semantic_cache(agent_id: str):
+    """Descarta las respuestas cacheadas del agente cuya KB cambió"""
+    try:
+        from services.semantic_cache import semantic_answer_cache
+        semantic_answer_cache.invalidate_agent(agent_id or 'default')
+    except ImportError:
+        pass
+
+
 class RagRepository:
     def __init__(self, persist_dir: Optional[str] = None, collection_prefix: str = 'satma_prod_'):
         self.persist_dir = persist_dir or PERSIST_DIR
@@ -181,12 +197,65 @@ class RagRepository:
             )
             
             logger.info(f"✅ Upserted chunk {_id} to {col.name}")
+            _invalidate_semantic_cache(agent_id)
             return _id
             
         except Exception as e:
             logger.error(f"Error upserting: {str(e)}")
             return ''
 
+    def replace_file_chunks(
+        self,
+        agent_id: str,
+        file_id: str,
+        chunks: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> List[str]:
+        """
+        Reemplaza todos los chunks de un archivo de Drive: un solo lote de
+        embeddings y un solo add. Los chunks anteriores se borran por
+        metadata file_id, así no quedan huérfanos si el archivo se acortó.
+        """
+        col = self._get_collection(agent_id)
+        pares = [(c.strip(), m) for c, m in zip(chunks, metadatas) if c and c.strip()]
+        ids = [
+            f"{file_id}-{m.get('chunk_index', i)}-{hashlib.md5(c.encode('utf-8', 'ignore')).hexdigest()[:8]}"
+            for i, (c, m) in enumerate(pares)
+        ]
+        vectores = _embed_batch([c for c, _ in pares]) if pares else []
+
+        col.delete(where={"file_id": file_id})
+        if pares:
+            col.add(
+                documents=[c for c, _ in pares],
+                metadatas=[m for _, m in pares],
+                ids=ids,
+                embeddings=vectores
+            )
+        logger.info(f"✅ {len(ids)} chunks de {file_id} en {col.name}")
+        _invalidate_semantic_cache(agent_id)
+        return ids
+
+    def update_file_metadata(self, agent_id: str, file_id: str, cambios: Dict[str, Any]) -> int:
+        """Actualiza metadatos de los chunks de un archivo (p. ej. renombrado) sin recalcular embeddings."""
+        col = self._get_collection(agent_id)
+        actuales = col.get(where={"file_id": file_id}, include=['metadatas'])
+        if not actuales['ids']:
+            return 0
+        col.update(
+            ids=actuales['ids'],
+            metadatas=[{**(m or {}), **cambios} for m in actuales['metadatas']]
+        )
+        _invalidate_semantic_cache(agent_id)
+        return len(actuales['ids'])
+
+    def delete_file(self, agent_id: str, file_id: str):
+        """Borra del vector store todos los chunks de un archivo de Drive."""
+        col = self._get_collection(agent_id)
+        col.delete(where={"file_id": file_id})
+        logger.info(f"🗑️ Chunks de {file_id} eliminados de {col.name}")
+        _invalidate_semantic_cache(agent_id)
+
     def query(self, agent_id: str, query_text: str, top_k: int = 10) -> Dict[str, Any]:
         col = self._get_collection(agent_id)
         
@@ -35,6 +35,12 @@ except ImportError:
     agent_knowledge_service = None
     logger.warning("AgentKnowledgeService not available")
 
+from services.semantic_cache import (
+    SEMANTIC_CACHE_ENABLED,
+    semantic_answer_cache,
+    document_ids_from_metadatas,
+)
+
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
 
 # SYNCED WITH: backend/config/agents_registry.py
@@ -91,9 +97,10 @@ class RagService:
         self,
         rag_repository: Optional[Any] = None,
         knowledge_service: Optional[Any] = None,
-        persist_directory: str = "./chroma_db"
+        persist_directory: Optional[str] = None
     ):
-        self.persist_directory = persist_directory
+        # Colecciones legacy; RAG_LEGACY_PERSIST_DIR permite sacarlas del árbol (tests, arnés de rendimiento)
+        self.persist_directory = persist_directory or os.environ.get('RAG_LEGACY_PERSIST_DIR', './chroma_db')
         self.initialized = False
         
         if RAG_REPOSITORY_AVAILABLE:
@@ -339,6 +346,7 @@ Relevancia: {relevance:.2f}
         try:
             logger.info(f"Refreshing knowledge for {agent_id}...")
             result = self.knowledge_service.ingest_agent_folder(agent_id)
+            semantic_answer_cache.invalidate_agent(agent_id)
             
             return {
                 "success": result.get('success', False),
@@ -384,6 +392,7 @@ Relevancia: {relevance:.2f}
                     documents=[content],
                     metadatas=[doc_metadata]
                 )
+                semantic_answer_cache.invalidate_agent(agent_id)
                 
                 return {"success": True, "document_id": document_id, "agent_id": agent_id}
                 
@@ -398,11 +407,22 @@ Relevancia: {relevance:.2f}
         agent_id: str,
         query_text: str,
         n_results: int = 5,
-        where_filter: Optional[Dict] = None
+        where_filter: Optional[Dict] = None,
+        empresa_id: Optional[str] = None
     ) -> Dict:
         """Query agent's knowledge base - legacy method for compatibility"""
         if self.rag_repo:
             try:
+                scope = None
+                if SEMANTIC_CACHE_ENABLED and where_filter is None:
+                    scope = semantic_answer_cache.scope(empresa_id, agent_id, f"query:{n_results}")
+                use_cache = scope is not None
+                if use_cache:
+                    query_embedding = semantic_answer_cache.embed(query_text)
+                    cached = semantic_answer_cache.lookup(scope, query_embedding, source="rag_service.query")
+                    if cached is not None:
+                        return {**cached, "query": query_text, "cached": True}
+                
                 results = self.rag_repo.query(agent_id, query_text, top_k=n_results)
                 
                 documents = []
@@ -419,13 +439,19 @@ Relevancia: {relevance:.2f}
                             "distance": dists[i] if i < len(dists) else None
                         })
                 
-                return {
+                response = {
                     "success": True,
                     "agent_id": agent_id,
                     "query": query_text,
                     "documents": documents,
                     "count": len(documents)
                 }
+                if use_cache and documents:
+                    semantic_answer_cache.store(
+                        scope, query_embedding, response,
+                        document_ids_from_metadatas(d["metadata"] for d in documents)
+                    )
+                return response
                 
             except Exception as e:
                 logger.error(f"Error querying: {e}")
@@ -3,6 +3,8 @@ Servicio de Rate Limiting y Usage Tracking.
 Protege la API de uso excesivo y trackea consumo para facturación.
 """
 
+import os
+import time
 import asyncpg
 from typing import Optional, Dict, Any, Tuple
 from datetime import datetime, date
@@ -12,6 +14,11 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+PLAN_TTL_SECONDS = float(os.environ.get('RATE_LIMIT_PLAN_TTL_SECONDS', '300'))
+
+# empresa_id -> (cargado_en, plan_id); compartido por todas las instancias
+_plan_cache: Dict[str, Tuple[float, Optional[str]]] = {}
+
 
 class UsageType(str, Enum):
     CHAT = "chat"
@@ -46,6 +53,22 @@ class RateLimiterService:
     def __init__(self, db_pool: asyncpg.Pool):
         self.db = db_pool
     
+    async def _get_plan(self, empresa_id: str) -> Optional[str]:
+        """plan_id de la empresa, cacheado PLAN_TTL_SECONDS."""
+        cached = _plan_cache.get(str(empresa_id))
+        if cached and time.monotonic() - cached[0] < PLAN_TTL_SECONDS:
+            return cached[1]
+        plan = await self.db.fetchval("""
+            SELECT plan_id FROM empresas WHERE id = $1::uuid
+        """, empresa_id)
+        _plan_cache[str(empresa_id)] = (time.monotonic(), plan)
+        return plan
+    
+    @staticmethod
+    def invalidate_plan(empresa_id: str):
+        """Olvida el plan cacheado (llamar tras un cambio de plan)."""
+        _plan_cache.pop(str(empresa_id), None)
+    
     async def check_and_increment(
         self,
         empresa_id: str,
@@ -62,9 +85,7 @@ class RateLimiterService:
                 SELECT * FROM increment_usage($1::uuid, 1, $2, $3, $4)
             """, empresa_id, tokens_in, tokens_out, usage_type.value)
             
-            plan = await self.db.fetchval("""
-                SELECT plan_id FROM empresas WHERE id = $1::uuid
-            """, empresa_id)
+            plan = await self._get_plan(empresa_id)
             
             return UsageCheckResult(
                 allowed=row["allowed"] if row else True,
@@ -10,6 +10,8 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 
+from services.metrics_registry import span
+
 logger = logging.getLogger(__name__)
 
 class ReportGeneratorService:
@@ -41,6 +43,7 @@ class ReportGeneratorService:
             spaceBefore=12
         )
     
+    @span("pdf_export", tipo="agente")
     def generate_agent_report(
         self,
         project_id: str,
@@ -159,6 +162,7 @@ class ReportGeneratorService:
             logger.error(f"Error generating PDF report: {str(e)}")
             return None
     
+    @span("pdf_export", tipo="consolidado")
     def generate_consolidated_report(
         self,
         project_id: str,
@@ -245,6 +249,7 @@ class ReportGeneratorService:
             logger.error(f"Error generating consolidated report: {str(e)}")
             return None
     
+    @span("pdf_export", tipo="bitacora")
     def generate_bitacora_pdf(
         self,
         project_id: str,
@@ -0,0 +1,421 @@
+"""
+Retrieval Facade for RAG
+Single entry point over the vector stores used by the agents:
+- chroma:        RagRepository collections (CHROMA_PERSIST_DIR)
+- chroma_legacy: RagService legacy collections (./chroma_db)
+- pgvector:      knowledge_chunks via VectorSearchService (per empresa)
+- kb_chunks:     Bibliotecar.IA chunks via RAGProcessor
+- rag_chunks:    pgvector table filled by scripts/migrate_chroma_to_pgvector.py
+
+The query is embedded once and shared with every backend that stores vectors
+from the same model. Backends run concurrently under one latency budget; late
+backends are dropped. Scores are normalized to cosine similarity in [0, 1] and
+results are merged and deduplicated by content hash.
+
+Environment:
+- RETRIEVAL_BACKENDS (default "chroma,chroma_legacy,pgvector,kb_chunks")
+- RETRIEVAL_BUDGET_SECONDS (default 3)
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.metrics_registry import registro, span
+
+logger = logging.getLogger(__name__)
+
+backend_seconds = registro.histograma(
+    "revisar_vector_search_backend_seconds", "Vector search latency per retrieval backend", ("backend",)
+)
+
+DEFAULT_BACKENDS = "chroma,chroma_legacy,pgvector,kb_chunks"
+RETRIEVAL_BACKENDS = [
+    b.strip() for b in os.environ.get("RETRIEVAL_BACKENDS", DEFAULT_BACKENDS).split(",") if b.strip()
+]
+RETRIEVAL_BUDGET_SECONDS = float(os.environ.get("RETRIEVAL_BUDGET_SECONDS", "3"))
+QUERY_EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def content_hash(text: str) -> str:
+    """Hash of the whitespace/case-normalized content, used for deduplication."""
+    normalized = " ".join((text or "").lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def chroma_similarity(distance: Optional[float], space: str = "l2") -> float:
+    """
+    Convert a Chroma distance to cosine similarity. Chroma defaults to squared
+    L2; for unit-length embeddings (OpenAI) cosine = 1 - d / 2.
+    """
+    if distance is None:
+        return 0.0
+    if space == "l2":
+        similarity = 1.0 - distance / 2.0
+    else:  # "cosine" and "ip" distances are 1 - similarity
+        similarity = 1.0 - distance
+    return max(0.0, min(1.0, similarity))
+
+
+def make_hit(content: str, score: float, backend: str, metadata: Optional[Dict] = None,
+             document_id: Optional[str] = None) -> Dict[str, Any]:
+    metadata = dict(metadata or {})
+    metadata.setdefault("source", backend)
+    score = max(0.0, min(1.0, float(score)))
+    return {
+        "content": content,
+        "score": score,
+        "distance": 1.0 - score,
+        "metadata": metadata,
+        "document_id": document_id or metadata.get("doc_id") or metadata.get("file_id"),
+        "backend": backend,
+        "backends": [backend],
+        "content_hash": content_hash(content),
+    }
+
+
+def merge_hits(result_lists: List[List[Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+    """Merge backend results keeping the best score per content hash."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for hits in result_lists:
+        for hit in hits:
+            key = hit["content_hash"]
+            current = merged.get(key)
+            if current is None:
+                merged[key] = dict(hit)
+                continue
+            backends = current["backends"] + [b for b in hit["backends"] if b not in current["backends"]]
+            if hit["score"] > current["score"]:
+                current = merged[key] = dict(hit)
+            current["backends"] = backends
+    return sorted(merged.values(), key=lambda h: h["score"], reverse=True)[:limit]
+
+
+class RetrievalBackend:
+    """A vector store the facade can query."""
+
+    name = "backend"
+    # Model of the stored vectors; the shared query embedding is only passed
+    # to backends whose model matches. None means the backend embeds itself.
+    embedding_model: Optional[str] = None
+    # False when results do not depend on the agent (queried once per batch)
+    per_agent: bool = True
+
+    async def search(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]],
+        agent_id: Optional[str],
+        empresa_id: Optional[str],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class ChromaBackend(RetrievalBackend):
+    """Chroma collection per agent (RagRepository or legacy RagService)."""
+
+    def __init__(self, name: str, get_collection: Callable[[str], Any], embedding_model: Optional[str] = None):
+        self.name = name
+        self.get_collection = get_collection
+        self.embedding_model = embedding_model
+
+    def _query(self, query, query_embedding, agent_id, limit):
+        collection = self.get_collection(agent_id)
+        if collection is None:
+            return []
+        kwargs = {"n_results": limit, "include": ["documents", "metadatas", "distances"]}
+        if query_embedding is not None:
+            kwargs["query_embeddings"] = [query_embedding]
+        else:
+            kwargs["query_texts"] = [query]
+        raw = collection.query(**kwargs)
+        space = (getattr(collection, "metadata", None) or {}).get("hnsw:space", "l2")
+
+        docs = (raw.get("documents") or [[]])[0] or []
+        metas = (raw.get("metadatas") or [[]])[0] or []
+        dists = (raw.get("distances") or [[]])[0] or []
+        return [
+            make_hit(
+                doc,
+                chroma_similarity(dists[i] if i < len(dists) else None, space),
+                self.name,
+                metas[i] if i < len(metas) else {},
+            )
+            for i, doc in enumerate(docs) if doc
+        ]
+
+    async def search(self, query, query_embedding, agent_id, empresa_id, limit):
+        if not agent_id:
+            return []
+        return await asyncio.to_thread(self._query, query, query_embedding, agent_id, limit)
+
+
+class PgvectorBackend(RetrievalBackend):
+    """knowledge_chunks (per empresa) through VectorSearchService."""
+
+    name = "pgvector"
+    embedding_model = QUERY_EMBEDDING_MODEL
+    per_agent = False
+
+    def __init__(self, vector_search_service, similarity_threshold: float = 0.3):
+        self.service = vector_search_service
+        self.similarity_threshold = similarity_threshold
+
+    async def search(self, query, query_embedding, agent_id, empresa_id, limit):
+        if not empresa_id:
+            return []
+        rows = await self.service.semantic_search(
+            empresa_id, query, limit,
+            similarity_threshold=self.similarity_threshold,
+            query_embedding=query_embedding
+        )
+        return [
+            make_hit(
+                row.get("full_content") or row.get("content", ""),
+                row.get("similarity", 0.0),
+                self.name,
+                {
+                    "filename": row.get("filename"),
+                    "path": row.get("path"),
+                    "categoria": row.get("categoria"),
+                    "chunk_id": row.get("chunk_id"),
+                },
+                document_id=row.get("document_id"),
+            )
+            for row in rows
+        ]
+
+
+class KbChunksBackend(RetrievalBackend):
+    """Bibliotecar.IA kb_chunks through RAGProcessor (agents as 'A3', not 'A3_FISCAL')."""
+
+    name = "kb_chunks"
+
+    def __init__(self, rag_processor):
+        self.processor = rag_processor
+        voyage = getattr(getattr(rag_processor, "embeddings_service", None), "voyage_key", None)
+        self.embedding_model = "voyage-law-2" if voyage else QUERY_EMBEDDING_MODEL
+
+    async def search(self, query, query_embedding, agent_id, empresa_id, limit):
+        agente = agent_id.split("_")[0] if agent_id else None
+        rows = await self.processor.semantic_search(
+            query, agente_id=agente, limit=limit, query_embedding=query_embedding
+        )
+        return [
+            make_hit(
+                row.get("contenido", ""),
+                row.get("similarity", 0.0),
+                self.name,
+                {
+                    "documento": row.get("documento"),
+                    "categoria": row.get("categoria"),
+                    "ley_codigo": row.get("ley_codigo"),
+                    "articulo": row.get("articulo"),
+                    "tipo": row.get("tipo_contenido"),
+                    "chunk_id": row.get("chunk_id"),
+                },
+                document_id=row.get("documento"),
+            )
+            for row in rows
+        ]
+
+
+class RagChunksBackend(RetrievalBackend):
+    """pgvector table rag_chunks (agent knowledge migrated from Chroma)."""
+
+    name = "rag_chunks"
+    embedding_model = QUERY_EMBEDDING_MODEL
+
+    def __init__(self, database_url: str):
+        self.database_url = database_url.replace("postgres://", "postgresql://", 1)
+        self._pool = None
+
+    async def _get_pool(self):
+        if self._pool is None:
+            import asyncpg
+            self._pool = await asyncpg.create_pool(self.database_url, min_size=1, max_size=5, command_timeout=30)
+        return self._pool
+
+    async def search(self, query, query_embedding, agent_id, empresa_id, limit):
+        if not agent_id or query_embedding is None:
+            return []
+        pool = await self._get_pool()
+        embedding_str = "[" + ",".join(map(str, query_embedding)) + "]"
+        rows = await pool.fetch(
+            """
+            SELECT content, metadata, document_id, 1 - (embedding <=> $1::vector) AS similarity
+            FROM rag_chunks
+            WHERE agent_id = $2
+            ORDER BY embedding <=> $1::vector
+            LIMIT $3
+            """,
+            embedding_str, agent_id.split("_")[0], limit
+        )
+        hits = []
+        for row in rows:
+            metadata = row["metadata"]
+            if isinstance(metadata, str):
+                metadata = json.loads(metadata)
+            hits.append(make_hit(row["content"], row["similarity"], self.name, metadata, row["document_id"]))
+        return hits
+
+
+class RetrievalFacade:
+    """Fan-out retrieval over the configured backends."""
+
+    def __init__(
+        self,
+        backends: List[RetrievalBackend],
+        budget_seconds: float = RETRIEVAL_BUDGET_SECONDS,
+        embed_fn: Optional[Callable[[str], Any]] = None,
+        embedding_model: str = QUERY_EMBEDDING_MODEL
+    ):
+        self.backends = backends
+        self.budget_seconds = budget_seconds
+        self.embedding_model = embedding_model
+        self._embed_fn = embed_fn
+
+    async def _embed(self, query: str) -> Optional[List[float]]:
+        if self._embed_fn is None:
+            from services.embedding_service import embedding_service
+            self._embed_fn = embedding_service.generate_embedding
+        return await self._embed_fn(query)
+
+    async def retrieve(
+        self,
+        query: str,
+        agent_id: Optional[str] = None,
+        empresa_id: Optional[str] = None,
+        limit: int = 5,
+        budget_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Query every backend concurrently within the latency budget.
+
+        Returns:
+            {"results": [hit, ...], "backends": {name: {"status", "count", "ms"}}, "elapsed_ms"}
+            Each hit has content, score, distance, metadata, document_id and backends.
+        """
+        results = await self.retrieve_many(query, [agent_id], empresa_id, limit, budget_seconds)
+        return results[agent_id]
+
+    @span("vector_search")
+    async def retrieve_many(
+        self,
+        query: str,
+        agent_ids: List[Optional[str]],
+        empresa_id: Optional[str] = None,
+        limit: int = 5,
+        budget_seconds: Optional[float] = None
+    ) -> Dict[Optional[str], Dict[str, Any]]:
+        """
+        Same query for several agents in one batch: the query is embedded once,
+        agent-independent backends run once, and every (agent, backend) lookup
+        runs concurrently under a single latency budget.
+
+        Returns:
+            {agent_id: retrieve()-style result}
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        deadline = loop.time() + (budget_seconds if budget_seconds is not None else self.budget_seconds)
+        reports: Dict[Optional[str], Dict[str, Dict[str, Any]]] = {agent_id: {} for agent_id in agent_ids}
+
+        embedding = None
+        if any(b.embedding_model == self.embedding_model for b in self.backends):
+            try:
+                embedding = await asyncio.wait_for(self._embed(query), timeout=max(deadline - loop.time(), 0))
+            except Exception as e:
+                logger.warning(f"Retrieval: query embedding failed ({e or type(e).__name__}), backends embed themselves")
+
+        async def run(backend: RetrievalBackend, agent_id: Optional[str], report: Dict[str, Dict[str, Any]]):
+            backend_start = time.perf_counter()
+            shared = embedding if backend.embedding_model == self.embedding_model else None
+            try:
+                hits = await backend.search(query, shared, agent_id, empresa_id, limit)
+                report[backend.name] = {"status": "ok", "count": len(hits)}
+                return hits
+            except Exception as e:
+                logger.warning(f"Retrieval backend {backend.name} failed: {e}")
+                report[backend.name] = {"status": "error", "count": 0, "error": str(e)}
+                return []
+            finally:
+                elapsed = time.perf_counter() - backend_start
+                backend_seconds.etiquetas(backend.name).observar(elapsed)
+                report.setdefault(backend.name, {})["ms"] = round(elapsed * 1000, 1)
+
+        # One task per (backend, agent); agent-independent backends run once for all agents
+        shared_report: Dict[str, Dict[str, Any]] = {}
+        tasks: Dict[asyncio.Task, Tuple[RetrievalBackend, List[Optional[str]], Dict[str, Dict[str, Any]]]] = {}
+        for backend in self.backends:
+            if backend.per_agent:
+                for agent_id in agent_ids:
+                    report = reports[agent_id]
+                    tasks[asyncio.create_task(run(backend, agent_id, report))] = (backend, [agent_id], report)
+            else:
+                task = asyncio.create_task(run(backend, None, shared_report))
+                tasks[task] = (backend, list(agent_ids), shared_report)
+
+        result_lists: Dict[Optional[str], List[List[Dict[str, Any]]]] = {agent_id: [] for agent_id in agent_ids}
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=max(deadline - loop.time(), 0))
+            for task in pending:
+                task.cancel()
+                backend, _, report = tasks[task]
+                report[backend.name] = {"status": "timeout", "count": 0}
+            for task in done:
+                _, targets, _ = tasks[task]
+                for agent_id in targets:
+                    result_lists[agent_id].append(task.result())
+            if pending:
+                late = sorted({tasks[t][0].name for t in pending})
+                logger.warning(f"Retrieval: {late} exceeded the latency budget")
+
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        return {
+            agent_id: {
+                "query": query,
+                "agent_id": agent_id,
+                "results": merge_hits(result_lists[agent_id], limit),
+                "backends": {**shared_report, **reports[agent_id]},
+                "elapsed_ms": elapsed_ms,
+            }
+            for agent_id in agent_ids
+        }
+
+
+def build_retrieval_facade(rag_service=None, backends: Optional[List[str]] = None) -> RetrievalFacade:
+    """Facade over the backends in RETRIEVAL_BACKENDS that are available in this process."""
+    wanted = backends or RETRIEVAL_BACKENDS
+    selected: List[RetrievalBackend] = []
+    database_url = os.environ.get("DATABASE_URL", "")
+
+    rag_repo = getattr(rag_service, "rag_repo", None)
+    if "chroma" in wanted and rag_repo is not None:
+        from services import rag_repository
+        model = rag_repository.EMB_MODEL if rag_repository.EMB_PROVIDER == "openai" else None
+        selected.append(ChromaBackend("chroma", rag_repo._get_collection, model))
+
+    legacy = getattr(rag_service, "collections", None)
+    if "chroma_legacy" in wanted and legacy:
+        selected.append(ChromaBackend("chroma_legacy", legacy.get, QUERY_EMBEDDING_MODEL))
+
+    if "pgvector" in wanted and database_url:
+        from services.vector_search_service import vector_search_service
+        selected.append(PgvectorBackend(vector_search_service))
+
+    if "kb_chunks" in wanted:
+        from services.knowledge_base import rag_processor as kb
+        if kb.rag_processor is not None:
+            selected.append(KbChunksBackend(kb.rag_processor))
+
+    if "rag_chunks" in wanted and database_url:
+        selected.append(RagChunksBackend(database_url))
+
+    logger.info(f"Retrieval facade backends: {[b.name for b in selected]}")
+    return RetrievalFacade(selected)
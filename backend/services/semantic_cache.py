@@ -0,0 +1,228 @@
+"""
+Caché semántico de respuestas para consultas RAG de agentes.
+
+Reutiliza la respuesta de una pregunta casi idéntica ya contestada:
+- Ámbito por empresa (tenant) + agente (+ contexto exacto cuando aplica);
+  sin empresa (ni explícita ni en el contexto del request) no se cachea
+- Búsqueda por similitud coseno del embedding de la consulta con umbral
+- Invalidación de todo el agente en cada ingesta a su KB, además de por
+  document_id de los chunks citados
+- Expulsión LRU por ámbito y expiración por TTL
+
+Configuración por variables de entorno:
+- SEMANTIC_CACHE_ENABLED (default true)
+- SEMANTIC_CACHE_THRESHOLD (default 0.95)
+- SEMANTIC_CACHE_TTL_SECONDS (default 21600)
+- SEMANTIC_CACHE_MAX_PER_SCOPE (default 256)
+"""
+import os
+import time
+import logging
+import itertools
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    from routes.metrics import track_semantic_cache
+except ImportError:
+    def track_semantic_cache(source: str, hit: bool):
+        pass
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.environ.get("SEMANTIC_CACHE_TTL_SECONDS", "21600"))
+SEMANTIC_CACHE_MAX_PER_SCOPE = int(os.environ.get("SEMANTIC_CACHE_MAX_PER_SCOPE", "256"))
+
+Scope = Tuple[str, ...]
+
+
+def document_ids_from_metadatas(metadatas: Iterable[Optional[Dict[str, Any]]]) -> Set[str]:
+    """IDs de documento de los chunks citados (doc_id o file_id de Drive)."""
+    ids = set()
+    for meta in metadatas or []:
+        if not meta:
+            continue
+        doc_id = meta.get("doc_id") or meta.get("file_id")
+        if doc_id:
+            ids.add(str(doc_id))
+    return ids
+
+
+@dataclass
+class _Entry:
+    vector: np.ndarray
+    value: Any
+    doc_ids: Set[str]
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticAnswerCache:
+    """Caché de respuestas indexado por embedding de la consulta."""
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        max_per_scope: int = SEMANTIC_CACHE_MAX_PER_SCOPE,
+        embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_per_scope = max_per_scope
+        self._embed_fn = embed_fn
+        self._scopes: Dict[Scope, "OrderedDict[int, _Entry]"] = {}
+        self._by_document: Dict[str, Set[Tuple[Scope, int]]] = {}
+        self._ids = itertools.count()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def scope(tenant_id: Optional[str], agent_id: str, *extra: str) -> Optional[Scope]:
+        """
+        Ámbito de una consulta. Sin tenant_id se usa la empresa del request
+        (middleware.tenant_context); si tampoco hay, devuelve None y la
+        consulta no se cachea: un ámbito compartido serviría a una empresa
+        respuestas de otra.
+        """
+        if not tenant_id:
+            try:
+                from middleware.tenant_context import get_current_empresa_id
+                tenant_id = get_current_empresa_id()
+            except ImportError:
+                tenant_id = None
+        if not tenant_id:
+            return None
+        return (tenant_id, agent_id, *extra)
+
+    @staticmethod
+    def _misma_coleccion(agent_a: str, agent_b: str) -> bool:
+        # RagRepository agrupa agentes por prefijo: A3_FISCAL y A3 comparten colección
+        return agent_a.split("_")[0] == agent_b.split("_")[0]
+
+    def embed(self, text: str) -> Optional[List[float]]:
+        """Embedding de la consulta (usa el caché de embeddings del RagRepository)."""
+        if self._embed_fn is None:
+            from services.rag_repository import _embed_batch
+            self._embed_fn = _embed_batch
+        try:
+            return self._embed_fn([text])[0]
+        except Exception as e:
+            logger.warning(f"Semantic cache: no se pudo generar embedding: {e}")
+            return None
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        return vector / norm
+
+    def _expired(self, entry: _Entry) -> bool:
+        return time.time() - entry.created_at > self.ttl_seconds
+
+    def _remove(self, scope: Scope, entry_id: int):
+        entries = self._scopes.get(scope)
+        if entries is None or entry_id not in entries:
+            return
+        entry = entries.pop(entry_id)
+        for doc_id in entry.doc_ids:
+            refs = self._by_document.get(doc_id)
+            if refs is not None:
+                refs.discard((scope, entry_id))
+                if not refs:
+                    del self._by_document[doc_id]
+        if not entries:
+            del self._scopes[scope]
+
+    def lookup(self, scope: Optional[Scope], embedding: Optional[List[float]], source: str = "rag") -> Optional[Any]:
+        """Respuesta de la entrada más similar del ámbito si supera el umbral."""
+        if scope is None:
+            return None
+        hit = None
+        entries = self._scopes.get(scope)
+        vector = self._normalize(embedding) if embedding is not None else None
+        if entries and vector is not None:
+            for entry_id in [i for i, e in entries.items() if self._expired(e)]:
+                self._remove(scope, entry_id)
+            entries = self._scopes.get(scope)
+            if entries:
+                ids = list(entries)
+                matrix = np.stack([entries[i].vector for i in ids])
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entries.move_to_end(ids[best])
+                    hit = entries[ids[best]].value
+
+        self.stats["hits" if hit is not None else "misses"] += 1
+        track_semantic_cache(source, hit is not None)
+        return hit
+
+    def store(self, scope: Optional[Scope], embedding: Optional[List[float]], value: Any, doc_ids: Iterable[str] = ()):
+        if scope is None:
+            return
+        vector = self._normalize(embedding) if embedding is not None else None
+        if vector is None:
+            return
+        entries = self._scopes.setdefault(scope, OrderedDict())
+        entry_id = next(self._ids)
+        entry = _Entry(vector=vector, value=value, doc_ids=set(doc_ids))
+        entries[entry_id] = entry
+        for doc_id in entry.doc_ids:
+            self._by_document.setdefault(doc_id, set()).add((scope, entry_id))
+        self.stats["stores"] += 1
+
+        while len(entries) > self.max_per_scope:
+            oldest = next(iter(entries))
+            self._remove(scope, oldest)
+            self.stats["evictions"] += 1
+
+    def invalidate_documents(self, doc_ids: Iterable[str]) -> int:
+        """Elimina las respuestas que citaron alguno de los documentos."""
+        removed = 0
+        for doc_id in doc_ids:
+            for scope, entry_id in list(self._by_document.get(str(doc_id), ())):
+                self._remove(scope, entry_id)
+                removed += 1
+        if removed:
+            self.stats["invalidations"] += removed
+            logger.info(f"Semantic cache: {removed} respuestas invalidadas por cambios en KB")
+        return removed
+
+    def invalidate_agent(self, agent_id: str) -> int:
+        """
+        Elimina todas las respuestas de los agentes que leen la colección de
+        `agent_id` (en todas las empresas). Se llama en cada ingesta: un
+        documento nuevo puede cambiar respuestas que no citaban ninguno de
+        los documentos modificados.
+        """
+        removed = 0
+        for scope in [s for s in self._scopes if self._misma_coleccion(s[1], agent_id)]:
+            for entry_id in list(self._scopes.get(scope, ())):
+                self._remove(scope, entry_id)
+                removed += 1
+        if removed:
+            self.stats["invalidations"] += removed
+            logger.info(f"Semantic cache: {removed} respuestas de {agent_id} invalidadas por ingesta")
+        return removed
+
+    def clear(self):
+        self._scopes.clear()
+        self._by_document.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": sum(len(e) for e in self._scopes.values()),
+            "scopes": len(self._scopes),
+            "hit_rate_percent": round(self.stats["hits"] / lookups * 100, 1) if lookups else 0.0,
+        }
+
+
+semantic_answer_cache = SemanticAnswerCache()
@@ -0,0 +1,238 @@
+"""
+Caché de validación de sesiones de autenticación.
+
+Evita consultar y escribir auth_sessions en cada request autenticado:
+- Caché en proceso token_hash -> (Session, User) con TTL corto
+- Revocación difundida entre workers con LISTEN/NOTIFY de PostgreSQL
+  (canal auth_session_revoked, payload "token:<hash>", "user:<id>" o
+  "all" para vaciarlo, p. ej. tras borrar usuarios en bloque);
+  si el listener no está conectado el caché se omite, así un logout o
+  revocación nunca queda oculto por una entrada cacheada
+- last_activity_at se acumula en memoria y se escribe en un solo UPDATE
+  por lote cada AUTH_ACTIVITY_FLUSH_SECONDS
+
+Configuración por variables de entorno:
+- AUTH_SESSION_CACHE_TTL_SECONDS (default 30)
+- AUTH_SESSION_CACHE_MAX_ENTRIES (default 10000)
+- AUTH_ACTIVITY_FLUSH_SECONDS (default 30)
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SESSION_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_SESSION_CACHE_TTL_SECONDS", "30"))
+SESSION_CACHE_MAX_ENTRIES = int(os.environ.get("AUTH_SESSION_CACHE_MAX_ENTRIES", "10000"))
+ACTIVITY_FLUSH_SECONDS = float(os.environ.get("AUTH_ACTIVITY_FLUSH_SECONDS", "30"))
+
+REVOCATION_CHANNEL = "auth_session_revoked"
+
+ACTIVITY_SQL = """
+    UPDATE auth_sessions s SET last_activity_at = d.seen_at
+    FROM unnest($1::uuid[], $2::timestamptz[]) AS d(id, seen_at)
+    WHERE s.id = d.id AND (s.last_activity_at IS NULL OR s.last_activity_at < d.seen_at)
+"""
+
+
+class SessionCache:
+    """Sesiones validadas recientemente, invalidadas por NOTIFY."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = SESSION_CACHE_TTL_SECONDS,
+        max_entries: int = SESSION_CACHE_MAX_ENTRIES,
+        flush_seconds: float = ACTIVITY_FLUSH_SECONDS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.flush_seconds = flush_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any, Any]]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        self._activity: Dict[str, datetime] = {}
+        self._pool = None
+        self._listener_conn = None
+        self._flusher: Optional[asyncio.Task] = None
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "activity_flushes": 0}
+
+    # ----------------------------------------
+    # Entradas
+    # ----------------------------------------
+
+    @property
+    def active(self) -> bool:
+        """Solo se sirven sesiones cacheadas mientras se reciben revocaciones."""
+        return self._listener_conn is not None and not self._listener_conn.is_closed()
+
+    def get(self, token_hash: str) -> Optional[Tuple[Any, Any]]:
+        entry = self._entries.get(token_hash) if self.active else None
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        cached_at, session, user = entry
+        expires_at = session.expires_at
+        if expires_at is not None and expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if time.monotonic() - cached_at > self.ttl_seconds or (
+            expires_at is not None and expires_at <= datetime.now(timezone.utc)
+        ):
+            self._remove(token_hash)
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(token_hash)
+        self.stats["hits"] += 1
+        return session, user
+
+    def put(self, token_hash: str, session: Any, user: Any):
+        if not self.active:
+            return
+        self._remove(token_hash)
+        self._entries[token_hash] = (time.monotonic(), session, user)
+        self._by_user.setdefault(str(user.id), set()).add(token_hash)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, token_hash: str) -> bool:
+        entry = self._entries.pop(token_hash, None)
+        if entry is None:
+            return False
+        user_id = str(entry[2].id)
+        hashes = self._by_user.get(user_id)
+        if hashes is not None:
+            hashes.discard(token_hash)
+            if not hashes:
+                del self._by_user[user_id]
+        return True
+
+    def invalidate_token(self, token_hash: str) -> int:
+        removed = int(self._remove(token_hash))
+        self.stats["invalidations"] += removed
+        return removed
+
+    def invalidate_user(self, user_id: str) -> int:
+        removed = sum(self._remove(h) for h in list(self._by_user.get(str(user_id), ())))
+        self.stats["invalidations"] += removed
+        return removed
+
+    def clear(self):
+        self._entries.clear()
+        self._by_user.clear()
+
+    def handle_revocation(self, payload: str):
+        """Aplica un mensaje del canal de revocación."""
+        kind, _, value = (payload or "").partition(":")
+        if kind == "token":
+            self.invalidate_token(value)
+        elif kind == "user":
+            self.invalidate_user(value)
+        else:
+            self.clear()
+
+    @staticmethod
+    async def broadcast(conn, payload: str):
+        """Notifica una revocación a todos los workers (se entrega al hacer commit)."""
+        await conn.execute("SELECT pg_notify($1, $2)", REVOCATION_CHANNEL, payload)
+
+    # ----------------------------------------
+    # Última actividad (escritura diferida)
+    # ----------------------------------------
+
+    def touch(self, session_id: str) -> bool:
+        """
+        Registra actividad de la sesión para el próximo flush. Devuelve False si
+        no hay flush periódico en marcha (el llamador debe escribirla él mismo).
+        """
+        if self._flusher is None or self._flusher.done():
+            return False
+        self._activity[str(session_id)] = datetime.now(timezone.utc)
+        return True
+
+    async def flush_activity(self) -> int:
+        if not self._activity or self._pool is None:
+            return 0
+        pending, self._activity = self._activity, {}
+        try:
+            async with self._pool.acquire() as conn:
+                await conn.execute(ACTIVITY_SQL, list(pending), list(pending.values()))
+            self.stats["activity_flushes"] += 1
+            return len(pending)
+        except Exception as e:
+            logger.warning(f"No se pudo escribir last_activity_at ({len(pending)} sesiones): {e}")
+            for session_id, seen_at in pending.items():
+                self._activity.setdefault(session_id, seen_at)
+            return 0
+
+    # ----------------------------------------
+    # Ciclo de vida
+    # ----------------------------------------
+
+    def _on_notification(self, connection, pid, channel, payload):
+        self.handle_revocation(payload)
+
+    def _on_listener_lost(self, connection):
+        logger.warning("Listener de revocación de sesiones desconectado; caché de sesiones desactivado")
+        self._listener_conn = None
+        self.clear()
+
+    async def _connect_listener(self):
+        try:
+            conn = await self._pool.acquire()
+            await conn.add_listener(REVOCATION_CHANNEL, self._on_notification)
+            conn.add_termination_listener(self._on_listener_lost)
+            self._listener_conn = conn
+        except Exception as e:
+            logger.warning(f"No se pudo escuchar {REVOCATION_CHANNEL}: {e}")
+            self._listener_conn = None
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            if not self.active:
+                await self._release_listener()
+                await self._connect_listener()
+            await self.flush_activity()
+
+    async def start(self, pool):
+        """Conecta el listener de revocaciones y arranca el flush periódico."""
+        self._pool = pool
+        await self._connect_listener()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _release_listener(self):
+        conn, self._listener_conn = self._listener_conn, None
+        if conn is None or self._pool is None:
+            return
+        try:
+            await conn.remove_listener(REVOCATION_CHANNEL, self._on_notification)
+            await self._pool.release(conn)
+        except Exception as e:
+            logger.debug(f"Error liberando listener de revocación: {e}")
+
+    async def stop(self):
+        """Escribe la actividad pendiente y libera el listener."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush_activity()
+        await self._release_listener()
+        self.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "active": self.active,
+            "entries": len(self._entries),
+            "pending_activity": len(self._activity),
+        }
+
+
+session_cache = SessionCache()
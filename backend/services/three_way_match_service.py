@@ -0,0 +1,686 @@
+"""
+three_way_match_service.py - Conciliación masiva 3-Way Match REVISAR.IA
+
+Concilia en lote CFDIs, estados de cuenta bancarios y contratos:
+1. Bloqueo de candidatos por RFC, tolerancia de monto y ventana de fechas
+   (joins vectorizados con pandas/NumPy, sin comparar todo contra todo)
+2. Asignación 1:1 de costo mínimo por componente de candidatos
+3. Escritura masiva en three_way_match con banderas de discrepancia
+
+El cierre de mes de un cliente implica miles de CFDIs; el endpoint
+POST /api/3way-match valida una sola terna y no escala a ese volumen.
+
+Fecha: 2026-10-18
+"""
+
+import io
+import json
+import logging
+import re
+import uuid
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SCIPY_AVAILABLE = False
+try:
+    from scipy.optimize import linear_sum_assignment
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    SCIPY_AVAILABLE = True
+except ImportError:
+    logger.warning("scipy no disponible - la conciliación usará asignación greedy")
+
+
+# =============================================================================
+# CONCEPTOS GENÉRICOS
+# =============================================================================
+
+PATRONES_GENERICOS = [
+    "servicios",
+    "servicio profesional",
+    "servicios profesionales",
+    "honorarios",
+    "pago de servicios",
+    "consultoria",
+    "asesoria",
+    "varios",
+    "por servicios",
+    "pago",
+    "factura",
+    "cobro",
+]
+
+# Una sola alternancia compilada: equivale a `concepto == patron` o
+# `concepto.startswith(patron + " ")` para cualquiera de los patrones.
+PATRON_CFDI_GENERICO = re.compile(
+    r"^(?:" + "|".join(re.escape(p) for p in PATRONES_GENERICOS) + r")(?: |$)"
+)
+
+# Conceptos con 20 caracteres o más se consideran suficientemente específicos
+LONGITUD_MINIMA_ESPECIFICA = 20
+
+PATRON_RFC = re.compile(r"\b([A-ZÑ&]{3,4}\d{6}[A-Z0-9]{3})\b")
+
+
+def es_cfdi_generico(concepto: Optional[str]) -> bool:
+    """Detecta si un CFDI tiene una descripción genérica."""
+    if not concepto:
+        return True
+    concepto_lower = concepto.lower().strip()
+    if len(concepto_lower) >= LONGITUD_MINIMA_ESPECIFICA:
+        return False
+    return PATRON_CFDI_GENERICO.match(concepto_lower) is not None
+
+
+def marcar_conceptos_genericos(conceptos: pd.Series) -> pd.Series:
+    """Versión vectorizada de es_cfdi_generico para una columna de conceptos."""
+    normalizados = conceptos.fillna("").astype(str).str.lower().str.strip()
+    cortos = normalizados.str.len() < LONGITUD_MINIMA_ESPECIFICA
+    genericos = normalizados.str.match(PATRON_CFDI_GENERICO.pattern)
+    return (normalizados == "") | (cortos & genericos)
+
+
+# =============================================================================
+# NORMALIZACIÓN DE ENTRADAS
+# =============================================================================
+
+COLUMNAS_CFDI = ["uuid", "folio", "rfc_emisor", "rfc_receptor", "monto", "fecha", "concepto", "documento_id"]
+COLUMNAS_PAGO = ["pago_id", "rfc", "monto", "fecha", "referencia", "banco", "documento_id"]
+COLUMNAS_CONTRATO = ["contrato_id", "proyecto_id", "rfc_proveedor", "monto", "fecha", "concepto", "documento_id"]
+
+# Encabezados comunes en estados de cuenta de bancos mexicanos
+ALIAS_ESTADO_CUENTA = {
+    "fecha": ["fecha", "fecha operacion", "fecha operación", "fecha de operacion", "fecha de operación", "fecha valor"],
+    "referencia": ["referencia", "descripcion", "descripción", "concepto", "detalle", "movimiento"],
+    "cargo": ["cargo", "cargos", "retiro", "retiros", "egreso"],
+    "abono": ["abono", "abonos", "deposito", "depósito", "depositos", "depósitos", "ingreso"],
+    "monto": ["monto", "importe"],
+    "rfc": ["rfc", "rfc beneficiario", "rfc ordenante"],
+    "banco": ["banco", "institucion", "institución"],
+}
+
+
+def _a_numero(serie: pd.Series) -> pd.Series:
+    limpia = serie.astype(str).str.replace(r"[$,\s]", "", regex=True)
+    return pd.to_numeric(limpia, errors="coerce")
+
+
+def _a_fecha(serie: pd.Series) -> pd.Series:
+    return pd.to_datetime(serie, errors="coerce", dayfirst=True).dt.normalize()
+
+
+def _normalizar_rfc(serie: pd.Series) -> pd.Series:
+    rfc = serie.fillna("").astype(str).str.strip().str.upper()
+    return rfc.where(rfc != "", None)
+
+
+def _tabla(registros: Union[pd.DataFrame, List[Dict[str, Any]], None], columnas: List[str]) -> pd.DataFrame:
+    df = registros.copy() if isinstance(registros, pd.DataFrame) else pd.DataFrame(list(registros or []))
+    for columna in columnas:
+        if columna not in df.columns:
+            df[columna] = None
+    return df[columnas].reset_index(drop=True)
+
+
+def normalizar_cfdis(cfdis: Union[pd.DataFrame, List[Dict[str, Any]]]) -> pd.DataFrame:
+    """Convierte CFDIs (dicts o DataFrame) a la tabla columnar de conciliación."""
+    df = _tabla(cfdis, COLUMNAS_CFDI)
+    df["rfc_emisor"] = _normalizar_rfc(df["rfc_emisor"])
+    df["rfc_receptor"] = _normalizar_rfc(df["rfc_receptor"])
+    df["monto"] = _a_numero(df["monto"])
+    df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce").dt.normalize()
+    df["es_generico"] = marcar_conceptos_genericos(df["concepto"])
+    return df
+
+
+def normalizar_contratos(contratos: Union[pd.DataFrame, List[Dict[str, Any]], None]) -> pd.DataFrame:
+    """Convierte contratos (dicts o DataFrame) a la tabla columnar de conciliación."""
+    df = _tabla(contratos, COLUMNAS_CONTRATO)
+    df["rfc_proveedor"] = _normalizar_rfc(df["rfc_proveedor"])
+    df["monto"] = _a_numero(df["monto"])
+    df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce").dt.normalize()
+    return df
+
+
+def normalizar_pagos(pagos: Union[pd.DataFrame, List[Dict[str, Any]], None]) -> pd.DataFrame:
+    """Convierte pagos (dicts o DataFrame) a la tabla columnar de conciliación."""
+    df = _tabla(pagos, COLUMNAS_PAGO)
+    df["rfc"] = _normalizar_rfc(df["rfc"])
+    df["monto"] = _a_numero(df["monto"]).abs()
+    df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce").dt.normalize()
+    return df
+
+
+def cargar_estado_cuenta_csv(
+    contenido: Union[str, bytes],
+    columnas: Optional[Dict[str, str]] = None,
+    banco: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Lee un estado de cuenta bancario en CSV y lo normaliza a pagos.
+
+    Args:
+        contenido: Texto o bytes del CSV
+        columnas: Mapeo opcional {campo_normalizado: encabezado_csv}
+            para formatos que no siguen los encabezados comunes
+        banco: Nombre del banco si el CSV no lo incluye
+
+    Returns:
+        DataFrame con COLUMNAS_PAGO. Sólo se conservan los cargos (egresos);
+        si el CSV trae una sola columna de monto se toma su valor absoluto.
+    """
+    if isinstance(contenido, bytes):
+        contenido = contenido.decode("utf-8-sig", errors="replace")
+
+    crudo = pd.read_csv(io.StringIO(contenido), dtype=str, skipinitialspace=True)
+    encabezados = {c.strip().lower(): c for c in crudo.columns}
+
+    mapeo: Dict[str, str] = {}
+    for campo, alias in ALIAS_ESTADO_CUENTA.items():
+        for nombre in alias:
+            if nombre in encabezados:
+                mapeo[campo] = encabezados[nombre]
+                break
+    mapeo.update(columnas or {})
+
+    if "fecha" not in mapeo:
+        raise ValueError("El estado de cuenta no tiene columna de fecha reconocible")
+
+    if "cargo" in mapeo:
+        monto = _a_numero(crudo[mapeo["cargo"]])
+    elif "monto" in mapeo:
+        monto = _a_numero(crudo[mapeo["monto"]]).abs()
+    else:
+        raise ValueError("El estado de cuenta no tiene columna de cargo/monto reconocible")
+
+    referencia = crudo[mapeo["referencia"]].fillna("") if "referencia" in mapeo else pd.Series("", index=crudo.index)
+    if "rfc" in mapeo:
+        rfc = crudo[mapeo["rfc"]]
+    else:
+        rfc = referencia.str.upper().str.extract(PATRON_RFC, expand=False)
+
+    pagos = pd.DataFrame({
+        "pago_id": None,
+        "rfc": _normalizar_rfc(rfc),
+        "monto": monto,
+        "fecha": _a_fecha(crudo[mapeo["fecha"]]),
+        "referencia": referencia.str.strip().str[:100],
+        "banco": crudo[mapeo["banco"]] if "banco" in mapeo else banco,
+        "documento_id": None,
+    })
+    pagos = pagos[pagos["monto"].notna() & (pagos["monto"] > 0)]
+    return pagos[COLUMNAS_PAGO].reset_index(drop=True)
+
+
+# =============================================================================
+# BLOQUEO DE CANDIDATOS
+# =============================================================================
+
+def _expandir_rangos(inicios: np.ndarray, conteos: np.ndarray) -> np.ndarray:
+    """[inicio, inicio + conteo) para cada par, concatenado, sin bucles Python."""
+    total = int(conteos.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    desplazamientos = np.repeat(np.cumsum(conteos) - conteos, conteos)
+    return np.arange(total, dtype=np.int64) - desplazamientos + np.repeat(inicios, conteos)
+
+
+def _candidatos_por_monto(
+    idx_izq: np.ndarray,
+    montos_izq: np.ndarray,
+    idx_der: np.ndarray,
+    montos_der: np.ndarray,
+    tolerancia: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pares (izq, der) cuyo monto derecho cae en [m·(1-tol), m·(1+tol)].
+
+    Ordena el lado derecho una vez y usa searchsorted para obtener cada
+    ventana de montos: O((n + m) log m + pares).
+    """
+    if len(idx_izq) == 0 or len(idx_der) == 0:
+        vacio = np.empty(0, dtype=np.int64)
+        return vacio, vacio
+
+    orden = np.argsort(montos_der, kind="mergesort")
+    montos_ordenados = montos_der[orden]
+    inicio = np.searchsorted(montos_ordenados, montos_izq * (1 - tolerancia), side="left")
+    fin = np.searchsorted(montos_ordenados, montos_izq * (1 + tolerancia), side="right")
+    conteos = np.maximum(fin - inicio, 0)
+
+    izq = np.repeat(idx_izq, conteos)
+    der = idx_der[orden[_expandir_rangos(inicio, conteos)]]
+    return izq, der
+
+
+def generar_candidatos(
+    izq: pd.DataFrame,
+    der: pd.DataFrame,
+    rfc_izq: str,
+    rfc_der: str,
+    tolerancia_bloqueo: float,
+    tolerancia_sin_rfc: float,
+    ventana_dias: int,
+) -> pd.DataFrame:
+    """
+    Genera pares candidatos entre dos tablas.
+
+    - Filas con RFC en ambos lados se bloquean por RFC exacto y monto dentro
+      de `tolerancia_bloqueo` (permite registrar discrepancias de monto).
+    - Filas del lado derecho sin RFC (p. ej. cargos bancarios sin RFC en la
+      descripción) sólo se emparejan por monto dentro de `tolerancia_sin_rfc`.
+    - En ambos casos la diferencia de fechas debe caer en `ventana_dias`.
+
+    Returns:
+        DataFrame con columnas i, j, dif_monto, dif_dias, sin_rfc
+    """
+    izq_validos = izq[izq["monto"].notna()]
+    der_validos = der[der["monto"].notna()]
+
+    pares_i: List[np.ndarray] = []
+    pares_j: List[np.ndarray] = []
+    pares_sin_rfc: List[np.ndarray] = []
+
+    # Las posiciones de .indices son relativas al frame agrupado, no al original
+    der_con_rfc = der_validos[der_validos[rfc_der].notna()]
+    izq_con_rfc = izq_validos[izq_validos[rfc_izq].notna()]
+    grupos_der = der_con_rfc.groupby(rfc_der).indices
+    for rfc, posiciones_izq in izq_con_rfc.groupby(rfc_izq).indices.items():
+        posiciones_der = grupos_der.get(rfc)
+        if posiciones_der is None:
+            continue
+        bloque_izq = izq_con_rfc.iloc[posiciones_izq]
+        bloque_der = der_con_rfc.iloc[posiciones_der]
+        i, j = _candidatos_por_monto(
+            bloque_izq.index.to_numpy(), bloque_izq["monto"].to_numpy(dtype=float),
+            bloque_der.index.to_numpy(), bloque_der["monto"].to_numpy(dtype=float),
+            tolerancia_bloqueo,
+        )
+        pares_i.append(i)
+        pares_j.append(j)
+        pares_sin_rfc.append(np.zeros(len(i), dtype=bool))
+
+    der_sin_rfc = der_validos[der_validos[rfc_der].isna()]
+    i, j = _candidatos_por_monto(
+        izq_validos.index.to_numpy(), izq_validos["monto"].to_numpy(dtype=float),
+        der_sin_rfc.index.to_numpy(), der_sin_rfc["monto"].to_numpy(dtype=float),
+        tolerancia_sin_rfc,
+    )
+    pares_i.append(i)
+    pares_j.append(j)
+    pares_sin_rfc.append(np.ones(len(i), dtype=bool))
+
+    i = np.concatenate(pares_i)
+    j = np.concatenate(pares_j)
+    candidatos = pd.DataFrame({"i": i, "j": j, "sin_rfc": np.concatenate(pares_sin_rfc)})
+    if candidatos.empty:
+        return candidatos.assign(dif_monto=pd.Series(dtype=float), dif_dias=pd.Series(dtype=float))
+
+    montos_izq = izq["monto"].to_numpy(dtype=float)[i]
+    montos_der = der["monto"].to_numpy(dtype=float)[j]
+    fechas_izq = izq["fecha"].to_numpy()[i]
+    fechas_der = der["fecha"].to_numpy()[j]
+
+    candidatos["dif_monto"] = np.abs(montos_izq - montos_der) / np.maximum(np.maximum(montos_izq, montos_der), 1e-9)
+    candidatos["dif_dias"] = (fechas_der - fechas_izq) / np.timedelta64(1, "D")
+
+    # Fechas faltantes no descartan el par, pero lo penalizan en el costo
+    dentro_ventana = candidatos["dif_dias"].isna() | (candidatos["dif_dias"].abs() <= ventana_dias)
+    return candidatos[dentro_ventana].reset_index(drop=True)
+
+
+# =============================================================================
+# ASIGNACIÓN
+# =============================================================================
+
+def _costos(candidatos: pd.DataFrame, ventana_dias: int) -> np.ndarray:
+    dias = candidatos["dif_dias"].abs().fillna(ventana_dias).to_numpy(dtype=float)
+    return (
+        candidatos["dif_monto"].to_numpy(dtype=float)
+        + 0.1 * dias / max(ventana_dias, 1)
+        + 0.05 * candidatos["sin_rfc"].to_numpy(dtype=float)
+    )
+
+
+def _asignacion_greedy(i: np.ndarray, j: np.ndarray, costo: np.ndarray) -> np.ndarray:
+    usados_i, usados_j, elegidos = set(), set(), []
+    for k in np.argsort(costo, kind="mergesort"):
+        if i[k] in usados_i or j[k] in usados_j:
+            continue
+        usados_i.add(i[k])
+        usados_j.add(j[k])
+        elegidos.append(k)
+    return np.array(elegidos, dtype=np.int64)
+
+
+def _asignacion_optima(i: np.ndarray, j: np.ndarray, costo: np.ndarray) -> np.ndarray:
+    """
+    Asignación 1:1 de costo mínimo que maximiza el número de pares.
+
+    El grafo bipartito de candidatos se parte en componentes conexas y cada
+    componente (pequeña tras el bloqueo) se resuelve con linear_sum_assignment.
+    """
+    codigos_i, i_local = np.unique(i, return_inverse=True)
+    codigos_j, j_local = np.unique(j, return_inverse=True)
+    n_i, n_j = len(codigos_i), len(codigos_j)
+
+    grafo = coo_matrix((np.ones(len(i)), (i_local, n_i + j_local)), shape=(n_i + n_j, n_i + n_j))
+    _, componente = connected_components(grafo, directed=False)
+    componente_par = componente[i_local]
+
+    # Costo "no candidato": mayor que cualquier asignación válida de la componente
+    penalizacion = float(costo.max() + 1) * (len(costo) + 1)
+
+    elegidos: List[np.ndarray] = []
+    orden = np.argsort(componente_par, kind="mergesort")
+    limites = np.flatnonzero(np.diff(componente_par[orden])) + 1
+    for bloque in np.split(orden, limites):
+        if len(bloque) == 1:
+            elegidos.append(bloque)
+            continue
+        filas, fila_local = np.unique(i_local[bloque], return_inverse=True)
+        cols, col_local = np.unique(j_local[bloque], return_inverse=True)
+        matriz = np.full((len(filas), len(cols)), penalizacion)
+        posicion = np.full((len(filas), len(cols)), -1, dtype=np.int64)
+        matriz[fila_local, col_local] = costo[bloque]
+        posicion[fila_local, col_local] = bloque
+        r, c = linear_sum_assignment(matriz)
+        seleccion = posicion[r, c]
+        elegidos.append(seleccion[seleccion >= 0])
+
+    return np.concatenate(elegidos) if elegidos else np.empty(0, dtype=np.int64)
+
+
+def resolver_asignacion(candidatos: pd.DataFrame, ventana_dias: int) -> pd.DataFrame:
+    """Elige a lo más un par por fila de cada lado minimizando el costo total."""
+    if candidatos.empty:
+        return candidatos
+    i = candidatos["i"].to_numpy()
+    j = candidatos["j"].to_numpy()
+    costo = _costos(candidatos, ventana_dias)
+    if SCIPY_AVAILABLE:
+        elegidos = _asignacion_optima(i, j, costo)
+    else:
+        elegidos = _asignacion_greedy(i, j, costo)
+    return candidatos.iloc[np.sort(elegidos)].reset_index(drop=True)
+
+
+# =============================================================================
+# CONCILIACIÓN
+# =============================================================================
+
+def _estatus_montos(contrato: np.ndarray, cfdi: np.ndarray, pago: np.ndarray, tolerancia: float) -> Dict[str, np.ndarray]:
+    """Misma regla que POST /api/3way-match/validar, aplicada por columnas."""
+    referencia = np.fmax(np.fmax(contrato, cfdi), pago)
+    tolerancia_absoluta = referencia * tolerancia
+    diferencias = {
+        "contrato_vs_cfdi": np.abs(contrato - cfdi),
+        "cfdi_vs_pago": np.abs(cfdi - pago),
+        "contrato_vs_pago": np.abs(contrato - pago),
+    }
+    excede = {k: np.nan_to_num(v, nan=0.0) > tolerancia_absoluta for k, v in diferencias.items()}
+    n_discrepancias = sum(e.astype(int) for e in excede.values())
+    completo = ~(np.isnan(contrato) | np.isnan(cfdi) | np.isnan(pago))
+
+    estatus = np.where(
+        ~completo, "pendiente",
+        np.where(n_discrepancias == 0, "completo", np.where(n_discrepancias < 3, "parcial", "discrepancia"))
+    )
+    return {"estatus": estatus, "diferencias": diferencias, "excede": excede, "tolerancia_absoluta": tolerancia_absoluta}
+
+
+class ConciliacionMasivaService:
+    """Conciliación 3-way en lote para cierres de mes."""
+
+    def conciliar(
+        self,
+        cfdis: Union[pd.DataFrame, List[Dict[str, Any]]],
+        pagos: Union[pd.DataFrame, List[Dict[str, Any]], None] = None,
+        contratos: Union[pd.DataFrame, List[Dict[str, Any]], None] = None,
+        tolerancia_monto: float = 0.01,
+        tolerancia_bloqueo: float = 0.10,
+        ventana_dias: int = 45,
+        ventana_contrato_dias: int = 366,
+    ) -> Dict[str, Any]:
+        """
+        Concilia un lote de CFDIs contra pagos y contratos.
+
+        Args:
+            cfdis: CFDIs recibidos (uuid, rfc_emisor, monto, fecha, concepto, ...)
+            pagos: Cargos bancarios normalizados (ver cargar_estado_cuenta_csv)
+            contratos: Contratos (contrato_id, proyecto_id, rfc_proveedor, monto, fecha)
+            tolerancia_monto: Tolerancia del match final (0.01 = 1%)
+            tolerancia_bloqueo: Tolerancia para considerar candidatos con el
+                mismo RFC; lo que exceda tolerancia_monto queda como discrepancia
+            ventana_dias: Ventana máxima entre fecha de CFDI y fecha de pago
+            ventana_contrato_dias: Ventana máxima entre contrato y CFDI
+
+        Returns:
+            Dict con `matches` (DataFrame, una fila por CFDI), `pagos_sin_cfdi`
+            (DataFrame) y `resumen`.
+        """
+        tabla_cfdis = normalizar_cfdis(cfdis)
+        tabla_pagos = normalizar_pagos(pagos)
+        tabla_contratos = normalizar_contratos(contratos)
+
+        pares_pago = resolver_asignacion(
+            generar_candidatos(
+                tabla_cfdis, tabla_pagos, "rfc_emisor", "rfc",
+                tolerancia_bloqueo, tolerancia_monto, ventana_dias,
+            ),
+            ventana_dias,
+        )
+        pares_contrato = resolver_asignacion(
+            generar_candidatos(
+                tabla_cfdis, tabla_contratos, "rfc_emisor", "rfc_proveedor",
+                tolerancia_bloqueo, tolerancia_monto, ventana_contrato_dias,
+            ),
+            ventana_contrato_dias,
+        )
+
+        indice_pago = pd.Series(pares_pago["j"].to_numpy(), index=pares_pago["i"].to_numpy(), dtype="Int64")
+        indice_contrato = pd.Series(pares_contrato["j"].to_numpy(), index=pares_contrato["i"].to_numpy(), dtype="Int64")
+
+        matches = tabla_cfdis.add_prefix("cfdi_")
+        matches["pago_idx"] = indice_pago.reindex(matches.index)
+        matches["contrato_idx"] = indice_contrato.reindex(matches.index)
+
+        pagos_unidos = tabla_pagos.add_prefix("pago_").reset_index(names="pago_idx")
+        contratos_unidos = tabla_contratos.add_prefix("contrato_").reset_index(names="contrato_idx")
+        pagos_unidos["pago_idx"] = pagos_unidos["pago_idx"].astype("Int64")
+        contratos_unidos["contrato_idx"] = contratos_unidos["contrato_idx"].astype("Int64")
+        matches = matches.merge(pagos_unidos, on="pago_idx", how="left").merge(contratos_unidos, on="contrato_idx", how="left")
+
+        montos = _estatus_montos(
+            matches["contrato_monto"].to_numpy(dtype=float),
+            matches["cfdi_monto"].to_numpy(dtype=float),
+            matches["pago_monto"].to_numpy(dtype=float),
+            tolerancia_monto,
+        )
+        matches["match_status"] = montos["estatus"]
+        matches["tolerancia_monto_aplicada"] = np.round(np.nan_to_num(montos["tolerancia_absoluta"]), 2)
+        matches["discrepancia_monto"] = np.logical_or.reduce(list(montos["excede"].values()))
+        matches["discrepancia_monto_detalle"] = self._detalle_montos(matches, montos)
+
+        matches["discrepancia_concepto"] = matches["cfdi_es_generico"].astype(bool)
+        matches["discrepancia_concepto_detalle"] = np.where(
+            matches["discrepancia_concepto"], "El CFDI tiene una descripción genérica", None
+        )
+
+        cfdi_antes_contrato = (matches["cfdi_fecha"] < matches["contrato_fecha"]).fillna(False)
+        pago_antes_contrato = (matches["pago_fecha"] < matches["contrato_fecha"]).fillna(False)
+        matches["discrepancia_fecha"] = (cfdi_antes_contrato | pago_antes_contrato).to_numpy()
+        matches["discrepancia_fecha_detalle"] = np.select(
+            [cfdi_antes_contrato & pago_antes_contrato, cfdi_antes_contrato, pago_antes_contrato],
+            ["CFDI y pago anteriores al contrato", "CFDI anterior al contrato", "Pago anterior al contrato"],
+            default=None,
+        )
+
+        pagos_asignados = set(pares_pago["j"].tolist())
+        pagos_sin_cfdi = tabla_pagos[~tabla_pagos.index.isin(pagos_asignados)].reset_index(drop=True)
+
+        conteo = matches["match_status"].value_counts()
+        resumen = {
+            "total_cfdis": int(len(tabla_cfdis)),
+            "total_pagos": int(len(tabla_pagos)),
+            "total_contratos": int(len(tabla_contratos)),
+            "cfdis_con_pago": int(matches["pago_idx"].notna().sum()),
+            "cfdis_con_contrato": int(matches["contrato_idx"].notna().sum()),
+            "pagos_sin_cfdi": int(len(pagos_sin_cfdi)),
+            "cfdis_genericos": int(matches["discrepancia_concepto"].sum()),
+            "por_status": {s: int(conteo.get(s, 0)) for s in ("completo", "parcial", "discrepancia", "pendiente")},
+        }
+        return {"matches": matches, "pagos_sin_cfdi": pagos_sin_cfdi, "resumen": resumen}
+
+    @staticmethod
+    def _detalle_montos(matches: pd.DataFrame, montos: Dict[str, Any]) -> List[Optional[str]]:
+        detalles: List[Optional[str]] = []
+        columnas = list(montos["excede"].keys())
+        excede = np.column_stack([montos["excede"][c] for c in columnas])
+        diferencias = np.column_stack([montos["diferencias"][c] for c in columnas])
+        con_discrepancia = excede.any(axis=1)
+        for fila in range(len(matches)):
+            if not con_discrepancia[fila]:
+                detalles.append(None)
+                continue
+            detalles.append(json.dumps([
+                {"tipo": columnas[k], "diferencia": round(float(diferencias[fila, k]), 2)}
+                for k in range(len(columnas)) if excede[fila, k]
+            ]))
+        return detalles
+
+    async def guardar(
+        self,
+        matches: pd.DataFrame,
+        empresa_id: str,
+        proyecto_id: Optional[str] = None,
+        tolerancia_monto: float = 0.01,
+    ) -> Dict[str, Any]:
+        """
+        Inserta los matches en three_way_match en una sola transacción.
+
+        Usa el pool de services.database_pg y executemany (un solo viaje
+        pipelined) en lugar de una conexión por terna. Las filas sin proyecto
+        (ni en el contrato ni `proyecto_id`) no se guardan.
+        """
+        from services.database_pg import get_connection
+
+        registros = []
+        omitidos = 0
+        for fila in matches.to_dict(orient="records"):
+            proyecto = _uuid_o_none(fila.get("contrato_proyecto_id")) or _uuid_o_none(proyecto_id)
+            if proyecto is None:
+                omitidos += 1
+                continue
+            registros.append((
+                proyecto, empresa_id,
+                _uuid_o_none(fila.get("contrato_contrato_id")), _decimal(fila.get("contrato_monto")),
+                _texto(fila.get("contrato_concepto")), _fecha(fila.get("contrato_fecha")),
+                _uuid_o_none(fila.get("contrato_documento_id")),
+                _texto(fila.get("cfdi_uuid")), _texto(fila.get("cfdi_folio")), _decimal(fila.get("cfdi_monto")),
+                _texto(fila.get("cfdi_concepto")), _fecha(fila.get("cfdi_fecha")),
+                _texto(fila.get("cfdi_rfc_emisor")), _texto(fila.get("cfdi_rfc_receptor")),
+                _uuid_o_none(fila.get("cfdi_documento_id")), bool(fila.get("cfdi_es_generico")),
+                _uuid_o_none(fila.get("pago_pago_id")), _decimal(fila.get("pago_monto")), _fecha(fila.get("pago_fecha")),
+                _texto(fila.get("pago_referencia")), _texto(fila.get("pago_banco")),
+                _uuid_o_none(fila.get("pago_documento_id")),
+                fila["match_status"],
+                bool(fila["discrepancia_monto"]), fila["discrepancia_monto_detalle"],
+                bool(fila["discrepancia_concepto"]), fila["discrepancia_concepto_detalle"],
+                bool(fila["discrepancia_fecha"]), fila["discrepancia_fecha_detalle"],
+                float(fila["tolerancia_monto_aplicada"]), tolerancia_monto * 100,
+            ))
+
+        if registros:
+            async with get_connection() as conn:
+                async with conn.transaction():
+                    await conn.executemany("""
+                        INSERT INTO three_way_match (
+                            proyecto_id, empresa_id,
+                            contrato_id, contrato_monto, contrato_concepto, contrato_fecha, contrato_documento_id,
+                            cfdi_uuid, cfdi_folio, cfdi_monto, cfdi_concepto, cfdi_fecha,
+                            cfdi_rfc_emisor, cfdi_rfc_receptor, cfdi_documento_id, cfdi_es_generico,
+                            pago_id, pago_monto, pago_fecha, pago_referencia, pago_banco, pago_documento_id,
+                            match_status, discrepancia_monto, discrepancia_monto_detalle,
+                            discrepancia_concepto, discrepancia_concepto_detalle,
+                            discrepancia_fecha, discrepancia_fecha_detalle,
+                            tolerancia_monto_aplicada, tolerancia_porcentaje
+                        ) VALUES (
+                            $1, $2,
+                            $3, $4, $5, $6, $7,
+                            $8, $9, $10, $11, $12, $13, $14, $15, $16,
+                            $17, $18, $19, $20, $21, $22,
+                            $23, $24, $25::jsonb,
+                            $26, $27,
+                            $28, $29,
+                            $30, $31
+                        )
+                    """, registros)
+
+        logger.info(f"Conciliación masiva guardada: {len(registros)} matches ({omitidos} sin proyecto)")
+        return {"guardados": len(registros), "omitidos_sin_proyecto": omitidos}
+
+
+def _es_nulo(valor: Any) -> bool:
+    return valor is None or (not isinstance(valor, str) and pd.isna(valor))
+
+
+def _uuid_o_none(valor: Any) -> Optional[str]:
+    if _es_nulo(valor):
+        return None
+    try:
+        return str(uuid.UUID(str(valor)))
+    except ValueError:
+        return None
+
+
+def _texto(valor: Any) -> Optional[str]:
+    return None if _es_nulo(valor) else str(valor)
+
+
+def _decimal(valor: Any) -> Optional[float]:
+    return None if _es_nulo(valor) else round(float(valor), 2)
+
+
+def _fecha(valor: Any):
+    return None if _es_nulo(valor) else pd.Timestamp(valor).date()
+
+
+def matches_a_registros(matches: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Serializa el DataFrame de matches al formato de respuesta de la API."""
+    items = []
+    for fila in matches.to_dict(orient="records"):
+        items.append({
+            "cfdi": {
+                "uuid": _texto(fila["cfdi_uuid"]),
+                "rfc_emisor": _texto(fila["cfdi_rfc_emisor"]),
+                "monto": _decimal(fila["cfdi_monto"]),
+                "fecha": _fecha(fila["cfdi_fecha"]).isoformat() if not _es_nulo(fila["cfdi_fecha"]) else None,
+                "es_generico": bool(fila["cfdi_es_generico"]),
+            },
+            "pago": None if _es_nulo(fila["pago_idx"]) else {
+                "referencia": _texto(fila["pago_referencia"]),
+                "monto": _decimal(fila["pago_monto"]),
+                "fecha": _fecha(fila["pago_fecha"]).isoformat() if not _es_nulo(fila["pago_fecha"]) else None,
+            },
+            "contrato": None if _es_nulo(fila["contrato_idx"]) else {
+                "id": _texto(fila["contrato_contrato_id"]),
+                "monto": _decimal(fila["contrato_monto"]),
+            },
+            "status": fila["match_status"],
+            "discrepancias": {
+                "monto": bool(fila["discrepancia_monto"]),
+                "monto_detalle": json.loads(fila["discrepancia_monto_detalle"]) if fila["discrepancia_monto_detalle"] else [],
+                "concepto": bool(fila["discrepancia_concepto"]),
+                "fecha": bool(fila["discrepancia_fecha"]),
+                "fecha_detalle": fila["discrepancia_fecha_detalle"],
+            },
+        })
+    return items
+
+
+conciliacion_masiva_service = ConciliacionMasivaService()
@@ -0,0 +1,139 @@
+"""
+Tráfico.IA - Agenda de plazos por proyecto
+Min-heap de vencimientos (inactividad y entregables) con
+invalidación perezosa por versión: reprogramar un proyecto sólo
+incrementa su versión y agrega sus nuevos plazos, sin recorrer el heap.
+"""
+import heapq
+import itertools
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+MEXICO_TZ = ZoneInfo('America/Mexico_City')
+
+# Margen para evaluar justo después de que el umbral (en días enteros) se cumple
+MARGEN_EVALUACION = timedelta(seconds=1)
+
+
+def parsear_fecha(valor) -> Optional[datetime]:
+    """Convierte ISO-8601 o datetime a datetime con zona horaria de México."""
+    if not valor:
+        return None
+    if isinstance(valor, datetime):
+        fecha = valor
+    else:
+        try:
+            fecha = datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=MEXICO_TZ)
+    return fecha
+
+
+def calcular_plazos(proyecto: Dict, configuracion: Dict, ahora: datetime) -> List[datetime]:
+    """
+    Momentos futuros en que el análisis de un proyecto puede cambiar de
+    resultado, según las reglas de TraficoIAService._analizar_proyecto:
+
+    - Inactividad: al cumplir el umbral (MEDIA) y el doble del umbral (ALTA)
+    - Vencimiento: al entrar en la ventana de aviso, al quedar ≤ 2 días
+      (CRITICA) y al vencer
+
+    Los candados pendientes no generan plazos: cambian sólo cuando el
+    proyecto cambia, y todo cambio se evalúa de inmediato.
+
+    Los días se cuentan como en el análisis (`timedelta.days`, truncado),
+    por eso un umbral de N días se cumple a las N·24 h exactas.
+    """
+    plazos: List[datetime] = []
+
+    ultima_actividad = parsear_fecha(proyecto.get("ultima_actividad"))
+    if ultima_actividad:
+        umbral = timedelta(days=configuracion["dias_inactividad_alerta"])
+        plazos.append(ultima_actividad + umbral)
+        plazos.append(ultima_actividad + 2 * umbral)
+
+    fecha_vencimiento = parsear_fecha(proyecto.get("fecha_vencimiento"))
+    if fecha_vencimiento:
+        # dias_para_vencer = (vencimiento - ahora).days ≤ N  ⇔  faltan < N+1 días
+        ventana = configuracion["dias_vencimiento_alerta"]
+        plazos.append(fecha_vencimiento - timedelta(days=ventana + 1))
+        plazos.append(fecha_vencimiento - timedelta(days=3))
+        plazos.append(fecha_vencimiento - timedelta(days=1))
+
+    return [p + MARGEN_EVALUACION for p in plazos if p + MARGEN_EVALUACION > ahora]
+
+
+class AgendaPlazos:
+    """
+    Cola de prioridad de evaluaciones pendientes por proyecto.
+
+    Cada entrada es (momento, secuencia, proyecto_id, versión). Al
+    reprogramar o cancelar un proyecto se incrementa su versión; las
+    entradas viejas se descartan al llegar al tope del heap. El costo en
+    reposo es nulo: el scheduler duerme hasta `segundos_hasta_proximo()`.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int, str, int]] = []
+        self._versiones: Dict[str, int] = {}
+        self._pendientes: Dict[str, int] = {}
+        self._secuencia = itertools.count()
+
+    def __len__(self) -> int:
+        return sum(self._pendientes.values())
+
+    def programar(self, proyecto_id: str, momentos: Iterable[datetime]):
+        """Reemplaza los plazos de un proyecto."""
+        version = self._versiones.get(proyecto_id, 0) + 1
+        self._versiones[proyecto_id] = version
+        momentos = sorted(set(momentos))
+        self._pendientes[proyecto_id] = len(momentos)
+        for momento in momentos:
+            heapq.heappush(self._heap, (momento, next(self._secuencia), proyecto_id, version))
+        self._compactar_si_necesario()
+
+    def cancelar(self, proyecto_id: str):
+        """Elimina los plazos de un proyecto (cerrado, rechazado, completado)."""
+        if proyecto_id in self._versiones:
+            self._versiones[proyecto_id] += 1
+            self._pendientes.pop(proyecto_id, None)
+            self._compactar_si_necesario()
+
+    def _vigente(self, entrada: Tuple[datetime, int, str, int]) -> bool:
+        return self._versiones.get(entrada[2]) == entrada[3]
+
+    def _limpiar_tope(self):
+        while self._heap and not self._vigente(self._heap[0]):
+            heapq.heappop(self._heap)
+
+    def _compactar_si_necesario(self):
+        vigentes = sum(self._pendientes.values())
+        if len(self._heap) > 64 and len(self._heap) > 2 * vigentes:
+            self._heap = [e for e in self._heap if self._vigente(e)]
+            heapq.heapify(self._heap)
+
+    def proximo(self) -> Optional[datetime]:
+        """Momento de la siguiente evaluación, o None si no hay plazos."""
+        self._limpiar_tope()
+        return self._heap[0][0] if self._heap else None
+
+    def segundos_hasta_proximo(self, ahora: datetime, maximo: float) -> float:
+        proximo = self.proximo()
+        if proximo is None:
+            return maximo
+        return min(max((proximo - ahora).total_seconds(), 0.0), maximo)
+
+    def extraer_vencidos(self, ahora: datetime) -> List[str]:
+        """Saca del heap los plazos cumplidos y devuelve sus proyectos (sin repetir)."""
+        vencidos: Dict[str, None] = {}
+        while True:
+            self._limpiar_tope()
+            if not self._heap or self._heap[0][0] > ahora:
+                break
+            _, _, proyecto_id, _ = heapq.heappop(self._heap)
+            self._pendientes[proyecto_id] = self._pendientes.get(proyecto_id, 1) - 1
+            vencidos[proyecto_id] = None
+        return list(vencidos)
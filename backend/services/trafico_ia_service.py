@@ -11,6 +11,8 @@ from enum import Enum
 from zoneinfo import ZoneInfo
 import httpx
 
+from services.trafico_agenda import AgendaPlazos, calcular_plazos
+
 logger = logging.getLogger(__name__)
 
 MEXICO_TZ = ZoneInfo('America/Mexico_City')
@@ -40,9 +42,10 @@ class Alerta:
         titulo: str,
         descripcion: str,
         prioridad: PrioridadAlerta = PrioridadAlerta.MEDIA,
-        datos_extra: Dict = None
+        datos_extra: Dict = None,
+        clave: Optional[str] = None
     ):
-        self.id = f"ALR-{datetime.now().strftime('%Y%m%d%H%M%S')}-{proyecto_id[:8]}"
+        self.id = f"ALR-{datetime.now().strftime('%Y%m%d%H%M%S')}-{proyecto_id[:8]}-{tipo.value[:4].upper()}"
         self.tipo = tipo
         self.proyecto_id = proyecto_id
         self.titulo = titulo
@@ -52,10 +55,13 @@ class Alerta:
         self.creada_en = datetime.now(MEXICO_TZ)
         self.leida = False
         self.resuelta = False
+        self.fecha_resolucion: Optional[str] = None
+        self.clave = clave or f"{proyecto_id}|{tipo.value}"
 
     def to_dict(self) -> Dict:
         return {
             "id": self.id,
+            "clave": self.clave,
             "tipo": self.tipo.value,
             "proyecto_id": self.proyecto_id,
             "titulo": self.titulo,
@@ -64,9 +70,59 @@ class Alerta:
             "datos_extra": self.datos_extra,
             "creada_en": self.creada_en.isoformat(),
             "leida": self.leida,
-            "resuelta": self.resuelta
+            "resuelta": self.resuelta,
+            "fecha_resolucion": self.fecha_resolucion
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Alerta":
+        alerta = cls(
+            tipo=TipoAlerta(data["tipo"]),
+            proyecto_id=data["proyecto_id"],
+            titulo=data.get("titulo", ""),
+            descripcion=data.get("descripcion", ""),
+            prioridad=PrioridadAlerta(data.get("prioridad", PrioridadAlerta.MEDIA.value)),
+            datos_extra=data.get("datos_extra"),
+            clave=data.get("clave")
+        )
+        alerta.id = data.get("id", alerta.id)
+        if data.get("creada_en"):
+            alerta.creada_en = datetime.fromisoformat(data["creada_en"])
+        alerta.leida = data.get("leida", False)
+        alerta.resuelta = data.get("resuelta", False)
+        alerta.fecha_resolucion = data.get("fecha_resolucion")
+        return alerta
+
+
+ORDEN_PRIORIDAD = {
+    PrioridadAlerta.BAJA: 0,
+    PrioridadAlerta.MEDIA: 1,
+    PrioridadAlerta.ALTA: 2,
+    PrioridadAlerta.CRITICA: 3
+}
+
+ESTADOS_CERRADOS = ("closed", "rejected", "completed")
+
+# Campos del proyecto que determinan sus alertas (y su huella de cambio)
+CAMPOS_MONITOREO = (
+    "project_id", "project_name", "current_phase", "current_status", "sponsor_email",
+    "ultima_actividad", "fecha_vencimiento", "candados_pendientes", "calificacion_actual"
+)
+
+# Alertas resueltas que se conservan en memoria (el historial completo queda en DB;
+# de las demás sólo se recuerda la clave para no volver a abrirlas)
+MAX_ALERTAS_RESUELTAS_MEMORIA = 1000
+
+# Campos que sólo cambia resolver_alerta; el upsert de una alerta regenerada no los toca
+CAMPOS_RESOLUCION = ("resuelta", "fecha_resolucion")
+
+
+def _huella_proyecto(proyecto: Dict) -> tuple:
+    return tuple(
+        tuple(valor) if isinstance(valor, list) else valor
+        for valor in (proyecto.get(campo) for campo in CAMPOS_MONITOREO)
+    )
+
 
 async def get_sendgrid_credentials() -> Optional[Dict[str, str]]:
     """Obtiene credenciales de SendGrid desde variables de entorno."""
@@ -87,7 +143,15 @@ class TraficoIAService:
         self.db = db
         self.running = False
         self.scheduler_task: Optional[asyncio.Task] = None
-        self.alertas: List[Alerta] = []
+        self.alertas: Dict[str, Alerta] = {}
+        self._claves_resueltas: set = set()
+        self.agenda = AgendaPlazos()
+        self._proyectos: Dict[str, Dict] = {}
+        self._huellas: Dict[str, tuple] = {}
+        self._cambios_pendientes: Dict[str, Optional[Dict]] = {}
+        self._cambio = asyncio.Event()
+        self._ultima_sincronizacion: Optional[datetime] = None
+        self._proyectos_ejemplo: Optional[List[Dict]] = None
         self.metricas: Dict[str, Any] = {
             "proyectos_monitoreados": 0,
             "alertas_generadas_hoy": 0,
@@ -113,6 +177,7 @@ class TraficoIAService:
             return
         
         self.running = True
+        await self._cargar_alertas_persistidas()
         self.scheduler_task = asyncio.create_task(self._loop_monitoreo())
         logger.info("🚦 Tráfico.IA: Scheduler iniciado")
     
@@ -125,24 +190,37 @@ class TraficoIAService:
         logger.info("🚦 Tráfico.IA: Scheduler detenido")
     
     async def _loop_monitoreo(self):
-        """Loop principal de monitoreo programado."""
+        """
+        Loop del scheduler por plazos.
+
+        En lugar de re-analizar todos los proyectos cada N minutos, duerme
+        hasta el siguiente plazo de la agenda (o hasta que se notifique un
+        cambio) y sólo evalúa los proyectos cuyo plazo se cumplió o que
+        cambiaron. Cada `frecuencia_monitoreo_minutos` compara la huella de
+        los proyectos activos contra la DB para detectar cambios hechos por
+        rutas que no llaman a notificar_cambio_proyecto.
+        """
         while self.running:
             try:
                 ahora = datetime.now(MEXICO_TZ)
-                hora_actual = ahora.strftime("%H:%M")
-                
-                inicio = self.configuracion["horario_inicio"]
-                fin = self.configuracion["horario_fin"]
-                
-                if inicio <= hora_actual <= fin:
-                    logger.info(f"🚦 Tráfico.IA: Ejecutando monitoreo programado [{hora_actual}]")
-                    await self.ejecutar_monitoreo()
-                else:
-                    logger.debug(f"🚦 Tráfico.IA: Fuera de horario de monitoreo ({inicio}-{fin})")
-                
-                frecuencia = self.configuracion["frecuencia_monitoreo_minutos"] * 60
-                await asyncio.sleep(frecuencia)
-                
+                intervalo_sync = self.configuracion["frecuencia_monitoreo_minutos"] * 60
+
+                if not self._en_horario(ahora):
+                    espera = self._segundos_hasta_horario(ahora)
+                    logger.debug(f"🚦 Tráfico.IA: Fuera de horario, esperando {espera:.0f}s")
+                    await asyncio.sleep(espera)
+                    continue
+
+                if (self._ultima_sincronizacion is None or
+                        (ahora - self._ultima_sincronizacion).total_seconds() >= intervalo_sync):
+                    await self._sincronizar_proyectos()
+
+                await self._procesar_pendientes(ahora)
+
+                ahora = datetime.now(MEXICO_TZ)
+                restante_sync = intervalo_sync - (ahora - self._ultima_sincronizacion).total_seconds()
+                await self._esperar_cambio(self.agenda.segundos_hasta_proximo(ahora, maximo=max(restante_sync, 0)))
+
             except asyncio.CancelledError:
                 logger.info("🚦 Tráfico.IA: Loop de monitoreo cancelado")
                 break
@@ -150,9 +228,255 @@ class TraficoIAService:
                 logger.error(f"❌ Tráfico.IA: Error en loop de monitoreo: {e}")
                 self.metricas["errores_hoy"] += 1
                 await asyncio.sleep(300)
-    
+
+    async def _esperar_cambio(self, segundos: float):
+        """Duerme hasta `segundos` o hasta que se notifique un cambio de proyecto."""
+        self._cambio.clear()
+        if self._cambios_pendientes:
+            return
+        try:
+            await asyncio.wait_for(self._cambio.wait(), timeout=segundos)
+        except asyncio.TimeoutError:
+            pass
+
+    def _en_horario(self, ahora: datetime) -> bool:
+        hora_actual = ahora.strftime("%H:%M")
+        return self.configuracion["horario_inicio"] <= hora_actual <= self.configuracion["horario_fin"]
+
+    def _segundos_hasta_horario(self, ahora: datetime) -> float:
+        hora, minuto = (int(x) for x in self.configuracion["horario_inicio"].split(":"))
+        inicio = ahora.replace(hour=hora, minute=minuto, second=0, microsecond=0)
+        if inicio <= ahora:
+            inicio += timedelta(days=1)
+        return (inicio - ahora).total_seconds()
+
+    def notificar_cambio_proyecto(self, proyecto: Dict):
+        """
+        Registra que un proyecto cambió (actividad, vencimiento, candados,
+        estado). Se re-evalúa en el siguiente ciclo del scheduler, que se
+        despierta de inmediato.
+        """
+        proyecto_id = proyecto.get("project_id")
+        if not proyecto_id:
+            return
+        self._cambios_pendientes[proyecto_id] = proyecto
+        self._cambio.set()
+
+    async def notificar_proyecto_actualizado(self, proyecto_id: str):
+        """
+        Relee de `projects` los campos monitoreados de un proyecto recién
+        creado o modificado y lo notifica al scheduler. Sin scheduler
+        corriendo no hace nada: al iniciar se sincronizan todos.
+        """
+        if self.db is None or not self.running:
+            return
+        try:
+            proyecto = await self.db.projects.find_one(
+                {"project_id": proyecto_id},
+                {campo: 1 for campo in CAMPOS_MONITOREO}
+            )
+        except Exception as e:
+            logger.error(f"❌ Tráfico.IA: Error leyendo proyecto {proyecto_id}: {e}")
+            return
+        if proyecto is None:
+            self.notificar_proyecto_cerrado(proyecto_id)
+        else:
+            self.notificar_cambio_proyecto(proyecto)
+
+    def notificar_proyecto_cerrado(self, proyecto_id: str):
+        """Deja de monitorear un proyecto cerrado, rechazado o completado."""
+        self._cambios_pendientes[proyecto_id] = None
+        self._cambio.set()
+
+    async def _procesar_pendientes(self, ahora: datetime) -> Dict[str, Any]:
+        """Evalúa los proyectos que cambiaron y los que tienen plazos cumplidos."""
+        resultado = {"alertas_nuevas": 0, "emails_enviados": 0, "proyectos_revisados": 0}
+
+        cambios, self._cambios_pendientes = self._cambios_pendientes, {}
+        for proyecto_id, proyecto in cambios.items():
+            if proyecto is None or proyecto.get("current_status") in ESTADOS_CERRADOS:
+                self._olvidar_proyecto(proyecto_id)
+                continue
+            await self._evaluar_proyecto(proyecto, ahora, resultado)
+
+        for proyecto_id in self.agenda.extraer_vencidos(ahora):
+            proyecto = self._proyectos.get(proyecto_id)
+            if proyecto is not None and proyecto_id not in cambios:
+                await self._evaluar_proyecto(proyecto, ahora, resultado, reprogramar=False)
+
+        if resultado["proyectos_revisados"]:
+            self.metricas["ultima_ejecucion"] = ahora.isoformat()
+            logger.info(
+                f"🚦 Tráfico.IA: {resultado['proyectos_revisados']} proyectos evaluados - "
+                f"{resultado['alertas_nuevas']} alertas, {resultado['emails_enviados']} emails"
+            )
+        return resultado
+
+    def _olvidar_proyecto(self, proyecto_id: str):
+        self.agenda.cancelar(proyecto_id)
+        self._proyectos.pop(proyecto_id, None)
+        self._huellas.pop(proyecto_id, None)
+        self.metricas["proyectos_monitoreados"] = len(self._proyectos)
+
+    async def _evaluar_proyecto(
+        self,
+        proyecto: Dict,
+        ahora: datetime,
+        resultado: Dict[str, Any],
+        reprogramar: bool = True
+    ):
+        proyecto_id = proyecto.get("project_id", "UNKNOWN")
+        self._proyectos[proyecto_id] = proyecto
+        self._huellas[proyecto_id] = _huella_proyecto(proyecto)
+        self.metricas["proyectos_monitoreados"] = len(self._proyectos)
+        if reprogramar:
+            self.agenda.programar(proyecto_id, calcular_plazos(proyecto, self.configuracion, ahora))
+
+        resultado["proyectos_revisados"] += 1
+        alertas = await self._analizar_proyecto(proyecto)
+        await self._registrar_alertas(alertas, proyecto, resultado)
+
+    async def _sincronizar_proyectos(self):
+        """
+        Compara la huella de los proyectos activos con la última evaluada;
+        sólo los nuevos o modificados se marcan como cambios.
+        """
+        proyectos = await self._obtener_proyectos_activos()
+        activos = set()
+        for proyecto in proyectos:
+            proyecto_id = proyecto.get("project_id")
+            if not proyecto_id:
+                continue
+            activos.add(proyecto_id)
+            if self._huellas.get(proyecto_id) != _huella_proyecto(proyecto):
+                self._cambios_pendientes[proyecto_id] = proyecto
+
+        for proyecto_id in list(self._proyectos):
+            if proyecto_id not in activos:
+                self._cambios_pendientes[proyecto_id] = None
+
+        self._ultima_sincronizacion = datetime.now(MEXICO_TZ)
+
+    def _clave_alerta(self, alerta: Alerta, proyecto: Dict) -> str:
+        """
+        Identifica el episodio de una alerta: la misma condición sobre el mismo
+        dato (misma última actividad, mismo vencimiento, mismos candados) no
+        vuelve a alertar; un nuevo episodio sí.
+        """
+        if alerta.tipo == TipoAlerta.PROYECTO_INACTIVO:
+            episodio = proyecto.get("ultima_actividad")
+        elif alerta.tipo in (TipoAlerta.ENTREGABLE_PROXIMO, TipoAlerta.VENCIMIENTO_CRITICO):
+            episodio = proyecto.get("fecha_vencimiento")
+        elif alerta.tipo == TipoAlerta.CANDADO_PENDIENTE:
+            episodio = ",".join(sorted(proyecto.get("candados_pendientes", [])))
+        else:
+            episodio = ""
+        return f"{alerta.proyecto_id}|{alerta.tipo.value}|{episodio}"
+
+    async def _registrar_alertas(self, alertas: List[Alerta], proyecto: Dict, resultado: Dict[str, Any]):
+        """
+        Guarda alertas sin duplicar: una alerta ya registrada para el mismo
+        episodio sólo se actualiza si sube de prioridad.
+        """
+        for alerta in alertas:
+            alerta.clave = self._clave_alerta(alerta, proyecto)
+            if alerta.clave in self._claves_resueltas:
+                continue
+            existente = self.alertas.get(alerta.clave)
+
+            if existente is not None:
+                if ORDEN_PRIORIDAD[alerta.prioridad] <= ORDEN_PRIORIDAD[existente.prioridad]:
+                    continue
+                existente.prioridad = alerta.prioridad
+                existente.titulo = alerta.titulo
+                existente.descripcion = alerta.descripcion
+                existente.datos_extra = alerta.datos_extra
+                existente.leida = False
+                alerta = existente
+            else:
+                self.alertas[alerta.clave] = alerta
+
+            await self._persistir_alerta(alerta)
+            resultado["alertas_nuevas"] += 1
+            self.metricas["alertas_generadas_hoy"] += 1
+
+            if alerta.prioridad in [PrioridadAlerta.ALTA, PrioridadAlerta.CRITICA]:
+                if self.configuracion["emails_habilitados"]:
+                    email_result = await self._enviar_alerta_email(alerta, proyecto)
+                    if email_result.get("success"):
+                        resultado["emails_enviados"] += 1
+                        self.metricas["emails_enviados_hoy"] += 1
+
+        self._podar_alertas_resueltas()
+
+    def _podar_alertas_resueltas(self):
+        resueltas = [a for a in self.alertas.values() if a.resuelta]
+        if len(resueltas) > MAX_ALERTAS_RESUELTAS_MEMORIA:
+            resueltas.sort(key=lambda a: a.creada_en)
+            for alerta in resueltas[:len(resueltas) - MAX_ALERTAS_RESUELTAS_MEMORIA]:
+                del self.alertas[alerta.clave]
+                self._claves_resueltas.add(alerta.clave)
+
+    async def _persistir_alerta(self, alerta: Alerta):
+        """
+        Upsert de la alerta por clave de episodio en la colección trafico_alertas.
+        Mientras la alerta no se resuelva en este proceso, `resuelta` y
+        `fecha_resolucion` sólo se escriben al insertar: regenerar el mismo
+        episodio no reabre una alerta que ya se resolvió.
+        """
+        if self.db is None:
+            return
+        datos = alerta.to_dict()
+        resolucion = {campo: datos.pop(campo) for campo in CAMPOS_RESOLUCION}
+        if alerta.resuelta:
+            cambios = {"$set": {**datos, **resolucion}}
+        else:
+            cambios = {"$set": datos, "$setOnInsert": resolucion}
+        try:
+            await self.db.trafico_alertas.update_one(
+                {"clave": alerta.clave},
+                cambios,
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"❌ Tráfico.IA: Error persistiendo alerta {alerta.id}: {e}")
+
+    def _persistir_en_segundo_plano(self, alerta: Alerta):
+        try:
+            asyncio.get_running_loop().create_task(self._persistir_alerta(alerta))
+        except RuntimeError:
+            pass
+
+    async def _cargar_alertas_persistidas(self):
+        """
+        Recupera las alertas activas y las claves de las resueltas para no
+        repetirlas ni reabrirlas tras un reinicio.
+        """
+        if self.db is None:
+            return
+        try:
+            documentos = await self.db.trafico_alertas.find({"resuelta": False}).to_list(length=None)
+            for documento in documentos:
+                alerta = Alerta.from_dict(documento)
+                self.alertas.setdefault(alerta.clave, alerta)
+            resueltas = await self.db.trafico_alertas.find(
+                {"resuelta": True}, {"clave": 1}
+            ).to_list(length=None)
+            self._claves_resueltas.update(
+                documento["clave"] for documento in resueltas if documento.get("clave")
+            )
+            logger.info(
+                f"🚦 Tráfico.IA: {len(documentos)} alertas activas recuperadas, "
+                f"{len(resueltas)} resueltas"
+            )
+        except Exception as e:
+            logger.error(f"❌ Tráfico.IA: Error cargando alertas persistidas: {e}")
+
     async def ejecutar_monitoreo(self) -> Dict[str, Any]:
-        """Ejecuta un ciclo completo de monitoreo."""
+        """
+        Ejecuta un ciclo completo de monitoreo (evaluación forzada de todos
+        los proyectos activos). Las alertas ya registradas no se duplican.
+        """
         resultado = {
             "ejecutado_en": datetime.now(MEXICO_TZ).isoformat(),
             "alertas_nuevas": 0,
@@ -162,24 +486,17 @@ class TraficoIAService:
         }
         
         try:
+            ahora = datetime.now(MEXICO_TZ)
             proyectos = await self._obtener_proyectos_activos()
-            resultado["proyectos_revisados"] = len(proyectos)
-            self.metricas["proyectos_monitoreados"] = len(proyectos)
-            
+            activos = {p.get("project_id") for p in proyectos}
+            for proyecto_id in list(self._proyectos):
+                if proyecto_id not in activos:
+                    self._olvidar_proyecto(proyecto_id)
+
             for proyecto in proyectos:
-                alertas_proyecto = await self._analizar_proyecto(proyecto)
-                for alerta in alertas_proyecto:
-                    self.alertas.append(alerta)
-                    resultado["alertas_nuevas"] += 1
-                    self.metricas["alertas_generadas_hoy"] += 1
-                    
-                    if alerta.prioridad in [PrioridadAlerta.ALTA, PrioridadAlerta.CRITICA]:
-                        if self.configuracion["emails_habilitados"]:
-                            email_result = await self._enviar_alerta_email(alerta, proyecto)
-                            if email_result.get("success"):
-                                resultado["emails_enviados"] += 1
-                                self.metricas["emails_enviados_hoy"] += 1
+                await self._evaluar_proyecto(proyecto, ahora, resultado)
             
+            self._ultima_sincronizacion = ahora
             self.metricas["ultima_ejecucion"] = resultado["ejecutado_en"]
             logger.info(f"🚦 Tráfico.IA: Monitoreo completado - {resultado['alertas_nuevas']} alertas, {resultado['emails_enviados']} emails")
             
@@ -198,18 +515,21 @@ class TraficoIAService:
             return self._generar_proyectos_ejemplo()
         
         try:
-            proyectos = await self.db.projects.find({
-                "current_status": {"$nin": ["closed", "rejected", "completed"]}
-            }).to_list(length=100)
+            proyectos = await self.db.projects.find(
+                {"current_status": {"$nin": list(ESTADOS_CERRADOS)}},
+                {campo: 1 for campo in CAMPOS_MONITOREO}
+            ).to_list(length=None)
             return proyectos
         except Exception as e:
             logger.error(f"❌ Tráfico.IA: Error obteniendo proyectos: {e}")
             return []
     
     def _generar_proyectos_ejemplo(self) -> List[Dict]:
-        """Genera proyectos de ejemplo para demostración."""
+        """Genera proyectos de ejemplo para demostración (estables entre ciclos)."""
+        if self._proyectos_ejemplo is not None:
+            return self._proyectos_ejemplo
         ahora = datetime.now(MEXICO_TZ)
-        return [
+        self._proyectos_ejemplo = [
             {
                 "project_id": "PROJ-001",
                 "project_name": "Consultoría Marketing Digital",
@@ -233,6 +553,7 @@ class TraficoIAService:
                 "calificacion_actual": 88
             }
         ]
+        return self._proyectos_ejemplo
     
     async def _analizar_proyecto(self, proyecto: Dict) -> List[Alerta]:
         """Analiza un proyecto y genera alertas si es necesario."""
@@ -452,7 +773,7 @@ class TraficoIAService:
         if not credenciales:
             return {"success": False, "error": "SendGrid no configurado"}
         
-        alertas_activas = [a for a in self.alertas if not a.resuelta]
+        alertas_activas = [a for a in self.alertas.values() if not a.resuelta]
         alertas_criticas = len([a for a in alertas_activas if a.prioridad == PrioridadAlerta.CRITICA])
         alertas_altas = len([a for a in alertas_activas if a.prioridad == PrioridadAlerta.ALTA])
         
@@ -591,7 +912,7 @@ class TraficoIAService:
     
     def obtener_status(self) -> Dict[str, Any]:
         """Obtiene el estado actual del sistema de monitoreo."""
-        alertas_activas = len([a for a in self.alertas if not a.resuelta])
+        alertas_activas = len([a for a in self.alertas.values() if not a.resuelta])
         return {
             "servicio": "Tráfico.IA",
             "version": "1.0.0",
@@ -606,7 +927,7 @@ class TraficoIAService:
     
     def obtener_alertas(self, solo_activas: bool = True, limite: int = 50) -> List[Dict]:
         """Obtiene la lista de alertas."""
-        alertas = self.alertas
+        alertas = list(self.alertas.values())
         if solo_activas:
             alertas = [a for a in alertas if not a.resuelta]
         
@@ -618,7 +939,7 @@ class TraficoIAService:
         alertas_por_tipo = {}
         alertas_por_prioridad = {}
         
-        for alerta in self.alertas:
+        for alerta in self.alertas.values():
             tipo = alerta.tipo.value
             prioridad = alerta.prioridad.value
             alertas_por_tipo[tipo] = alertas_por_tipo.get(tipo, 0) + 1
@@ -627,7 +948,8 @@ class TraficoIAService:
         return {
             "resumen": self.metricas,
             "alertas_totales": len(self.alertas),
-            "alertas_activas": len([a for a in self.alertas if not a.resuelta]),
+            "alertas_activas": len([a for a in self.alertas.values() if not a.resuelta]),
+            "plazos_programados": len(self.agenda),
             "alertas_por_tipo": alertas_por_tipo,
             "alertas_por_prioridad": alertas_por_prioridad,
             "timestamp": datetime.now(MEXICO_TZ).isoformat()
@@ -650,6 +972,12 @@ class TraficoIAService:
                 self.configuracion[campo] = nueva_config[campo]
                 logger.info(f"🚦 Tráfico.IA: Configuración '{campo}' actualizada a '{nueva_config[campo]}'")
         
+        if any(campo in nueva_config for campo in ("dias_inactividad_alerta", "dias_vencimiento_alerta")):
+            # Los umbrales definen los plazos: reprogramar todos los proyectos conocidos
+            for proyecto_id, proyecto in self._proyectos.items():
+                self._cambios_pendientes.setdefault(proyecto_id, proyecto)
+            self._cambio.set()
+        
         return {
             "success": True,
             "configuracion_actual": self.configuracion
@@ -657,17 +985,20 @@ class TraficoIAService:
     
     def marcar_alerta_leida(self, alerta_id: str) -> bool:
         """Marca una alerta como leída."""
-        for alerta in self.alertas:
+        for alerta in self.alertas.values():
             if alerta.id == alerta_id:
                 alerta.leida = True
+                self._persistir_en_segundo_plano(alerta)
                 return True
         return False
     
     def resolver_alerta(self, alerta_id: str) -> bool:
         """Marca una alerta como resuelta."""
-        for alerta in self.alertas:
+        for alerta in self.alertas.values():
             if alerta.id == alerta_id:
                 alerta.resuelta = True
+                alerta.fecha_resolucion = datetime.now(MEXICO_TZ).isoformat()
+                self._persistir_en_segundo_plano(alerta)
                 logger.info(f"🚦 Tráfico.IA: Alerta {alerta_id} marcada como resuelta")
                 return True
         return False
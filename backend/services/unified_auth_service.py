@@ -35,6 +35,8 @@ import asyncpg
 import bcrypt
 from jose import jwt, JWTError
 
+from services.session_cache import session_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -321,6 +323,9 @@ class DatabasePool:
 
             cls._initialized = True
             logger.info("✅ Pool de conexiones de autenticación inicializado")
+
+            # Caché de sesiones: listener de revocaciones + flush de last_activity_at
+            await session_cache.start(cls._pool)
             return True
 
         except Exception as e:
@@ -344,6 +349,7 @@ class DatabasePool:
     async def close(cls):
         """Cierra el pool de conexiones."""
         if cls._pool:
+            await session_cache.stop()
             await cls._pool.close()
             cls._pool = None
             cls._initialized = False
@@ -718,9 +724,19 @@ class UnifiedAuthService:
         )
 
     async def validate_session(self, token: str) -> Tuple[Optional[Session], Optional[User]]:
-        """Valida una sesión y retorna la sesión y el usuario."""
+        """
+        Valida una sesión y retorna la sesión y el usuario.
+        Usa el caché de sesiones (revocaciones vía NOTIFY) y difiere la
+        actualización de last_activity_at al flush por lotes.
+        """
         token_hash = self.hash_token(token)
 
+        cached = session_cache.get(token_hash)
+        if cached is not None:
+            session, user = cached
+            session_cache.touch(session.id)
+            return session, user
+
         async with await DatabasePool.get_connection() as conn:
             row = await conn.fetchrow('''
                 SELECT s.id, s.user_id, s.auth_method, s.expires_at, s.is_active,
@@ -740,10 +756,11 @@ class UnifiedAuthService:
             if row['status'] != 'active':
                 return None, None
 
-            # Actualizar última actividad
-            await conn.execute('''
-                UPDATE auth_sessions SET last_activity_at = NOW() WHERE id = $1
-            ''', row['id'])
+            # Actualizar última actividad (por lotes si el flush periódico está activo)
+            if not session_cache.touch(str(row['id'])):
+                await conn.execute('''
+                    UPDATE auth_sessions SET last_activity_at = NOW() WHERE id = $1
+                ''', row['id'])
 
             session = Session(
                 id=str(row['id']),
@@ -768,6 +785,7 @@ class UnifiedAuthService:
                 email_verified=row['email_verified']
             )
 
+            session_cache.put(token_hash, session, user)
             return session, user
 
     async def revoke_session(self, token: str, reason: str = 'logout') -> bool:
@@ -775,26 +793,41 @@ class UnifiedAuthService:
         token_hash = self.hash_token(token)
 
         async with await DatabasePool.get_connection() as conn:
-            result = await conn.execute('''
-                UPDATE auth_sessions
-                SET is_active = false, revoked_at = NOW(), revoked_reason = $1
-                WHERE token_hash = $2 AND is_active = true
-            ''', reason, token_hash)
+            async with conn.transaction():
+                result = await conn.execute('''
+                    UPDATE auth_sessions
+                    SET is_active = false, revoked_at = NOW(), revoked_reason = $1
+                    WHERE token_hash = $2 AND is_active = true
+                ''', reason, token_hash)
+                await session_cache.broadcast(conn, f"token:{token_hash}")
 
-            return 'UPDATE 1' in result
+        session_cache.invalidate_token(token_hash)
+        return 'UPDATE 1' in result
 
     async def revoke_all_sessions(self, user_id: str, reason: str = 'logout_all') -> int:
         """Revoca todas las sesiones de un usuario."""
         async with await DatabasePool.get_connection() as conn:
-            result = await conn.execute('''
-                UPDATE auth_sessions
-                SET is_active = false, revoked_at = NOW(), revoked_reason = $1
-                WHERE user_id = $2 AND is_active = true
-            ''', reason, user_id)
-
-            # Extraer número de filas afectadas
-            count = int(result.split()[-1]) if result else 0
-            return count
+            async with conn.transaction():
+                result = await conn.execute('''
+                    UPDATE auth_sessions
+                    SET is_active = false, revoked_at = NOW(), revoked_reason = $1
+                    WHERE user_id = $2 AND is_active = true
+                ''', reason, user_id)
+                await session_cache.broadcast(conn, f"user:{user_id}")
+
+        session_cache.invalidate_user(user_id)
+        # Extraer número de filas afectadas
+        count = int(result.split()[-1]) if result else 0
+        return count
+
+    async def invalidate_user_sessions(self, user_id: str):
+        """
+        Descarta las sesiones cacheadas de un usuario en todos los workers
+        (p. ej. tras bloquearlo) sin revocarlas en la base de datos.
+        """
+        async with await DatabasePool.get_connection() as conn:
+            await session_cache.broadcast(conn, f"user:{user_id}")
+        session_cache.invalidate_user(user_id)
 
     # ========================================
     # LOGIN CON CONTRASEÑA
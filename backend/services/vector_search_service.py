@@ -50,13 +50,16 @@ class VectorSearchService:
         query: str,
         limit: int = 10,
         categoria_filter: Optional[str] = None,
-        similarity_threshold: float = 0.65
+        similarity_threshold: float = 0.65,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Perform semantic search using vector similarity.
         Uses cosine distance with pgvector.
+        Pass query_embedding to reuse an embedding already computed for the query.
         """
-        query_embedding = await self.embedder.generate_embedding(query)
+        if query_embedding is None:
+            query_embedding = await self.embedder.generate_embedding(query)
         
         if not query_embedding:
             logger.warning("Could not generate query embedding, falling back to keyword search")
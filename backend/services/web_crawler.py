@@ -0,0 +1,233 @@
+"""
+Web Crawler asíncrono para Deep Research
+Descarga páginas candidatas de un sitio de forma concurrente:
+- Límite de peticiones simultáneas por host (semáforo)
+- Respeta robots.txt (cacheado por host con TTL) y timeout por página
+- Robots y semáforos por host viven en un LRU acotado: el crawler es un
+  singleton de larga vida y no debe crecer con cada host visitado
+- Caché persistente de páginas por URL con TTL; al expirar se revalida
+  con If-None-Match / If-Modified-Since (ETag / Last-Modified)
+- La extracción HTML -> texto corre fuera del event loop
+
+Configuración por variables de entorno:
+- WEB_CRAWLER_CACHE_DIR (default /tmp/web_crawler_cache)
+- WEB_CRAWLER_CACHE_TTL_SECONDS (default 86400)
+- WEB_CRAWLER_MAX_PER_HOST (default 4)
+- WEB_CRAWLER_MAX_HOSTS (default 1024): hosts con robots/semáforo en memoria
+- WEB_CRAWLER_ROBOTS_TTL_SECONDS (default 3600)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get("WEB_CRAWLER_CACHE_DIR", "/tmp/web_crawler_cache")
+CACHE_TTL_SECONDS = float(os.environ.get("WEB_CRAWLER_CACHE_TTL_SECONDS", "86400"))
+MAX_PER_HOST = int(os.environ.get("WEB_CRAWLER_MAX_PER_HOST", "4"))
+MAX_HOSTS = int(os.environ.get("WEB_CRAWLER_MAX_HOSTS", "1024"))
+ROBOTS_TTL_SECONDS = float(os.environ.get("WEB_CRAWLER_ROBOTS_TTL_SECONDS", "3600"))
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'es-MX,es;q=0.9,en;q=0.8',
+}
+
+ETIQUETAS_RUIDO = ["script", "style", "nav", "header", "footer", "aside"]
+
+
+def extraer_texto_html(html: str, max_chars: int = 8000) -> Tuple[str, str]:
+    """Convierte HTML en (texto, título) eliminando navegación y scripts."""
+    soup = BeautifulSoup(html, 'lxml')
+    titulo = soup.title.string if soup.title and soup.title.string else ""
+    for tag in soup(ETIQUETAS_RUIDO):
+        tag.decompose()
+    texto = soup.get_text(separator=' ', strip=True)
+    texto = re.sub(r'\s+', ' ', texto)
+    return texto[:max_chars], titulo
+
+
+class CachePaginas:
+    """Caché en disco de páginas ya procesadas: un JSON por URL."""
+
+    def __init__(self, directorio: str = CACHE_DIR, ttl_segundos: float = CACHE_TTL_SECONDS):
+        self.directorio = directorio
+        self.ttl_segundos = ttl_segundos
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, url: str) -> str:
+        return os.path.join(self.directorio, hashlib.sha256(url.encode('utf-8')).hexdigest() + ".json")
+
+    def obtener(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._ruta(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def guardar(self, url: str, entrada: Dict[str, Any]):
+        ruta = self._ruta(url)
+        temporal = ruta + ".tmp"
+        try:
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(entrada, f, ensure_ascii=False)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar caché de {url}: {e}")
+
+    def vigente(self, entrada: Dict[str, Any]) -> bool:
+        return time.time() - entrada.get("descargado_en", 0) < self.ttl_segundos
+
+
+class AsyncWebCrawler:
+    """Descarga concurrente de páginas con caché, robots.txt y límite por host."""
+
+    def __init__(
+        self,
+        cache: Optional[CachePaginas] = None,
+        max_por_host: int = MAX_PER_HOST,
+        timeout_segundos: float = 15,
+        respetar_robots: bool = True,
+        headers: Optional[Dict[str, str]] = None,
+        max_hosts: int = MAX_HOSTS,
+        robots_ttl_segundos: float = ROBOTS_TTL_SECONDS,
+    ):
+        self.cache = cache if cache is not None else CachePaginas()
+        self.max_por_host = max_por_host
+        self.timeout_segundos = timeout_segundos
+        self.respetar_robots = respetar_robots
+        self.headers = headers or DEFAULT_HEADERS
+        self.max_hosts = max_hosts
+        self.robots_ttl_segundos = robots_ttl_segundos
+        self._semaforos: "OrderedDict[str, asyncio.Semaphore]" = OrderedDict()
+        self._en_uso: Dict[str, int] = {}
+        self._robots: "OrderedDict[str, Tuple[asyncio.Future, float]]" = OrderedDict()
+        self.stats = {"descargas": 0, "cache": 0, "revalidadas": 0, "bloqueadas_robots": 0, "errores": 0}
+
+    def _semaforo(self, host: str) -> asyncio.Semaphore:
+        if host in self._semaforos:
+            self._semaforos.move_to_end(host)
+            return self._semaforos[host]
+        semaforo = self._semaforos[host] = asyncio.Semaphore(self.max_por_host)
+        self._podar_semaforos(conservar=host)
+        return semaforo
+
+    def _podar_semaforos(self, conservar: Optional[str] = None):
+        # Solo se desalojan hosts sin descargas en curso: reemplazar un
+        # semáforo ocupado rompería el límite por host
+        exceso = len(self._semaforos) - self.max_hosts
+        if exceso <= 0:
+            return
+        libres = [h for h in self._semaforos if h not in self._en_uso and h != conservar]
+        for viejo in libres[:exceso]:
+            del self._semaforos[viejo]
+
+    @asynccontextmanager
+    async def _limite_host(self, host: str):
+        semaforo = self._semaforo(host)
+        self._en_uso[host] = self._en_uso.get(host, 0) + 1
+        try:
+            async with semaforo:
+                yield
+        finally:
+            self._en_uso[host] -= 1
+            if not self._en_uso[host]:
+                del self._en_uso[host]
+                self._podar_semaforos()
+
+    async def _cargar_robots(self, session: aiohttp.ClientSession, base: str) -> Optional[RobotFileParser]:
+        try:
+            async with session.get(f"{base}/robots.txt") as resp:
+                if resp.status == 200:
+                    parser = RobotFileParser()
+                    parser.parse((await resp.text(errors='replace')).splitlines())
+                    return parser
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+        return None
+
+    async def _permitido(self, session: aiohttp.ClientSession, url: str) -> bool:
+        if not self.respetar_robots:
+            return True
+        partes = urlparse(url)
+        base = f"{partes.scheme}://{partes.netloc}"
+        # Una sola descarga de robots.txt por host aunque lleguen varias páginas a la vez
+        entrada = self._robots.get(base)
+        if entrada is None or (entrada[0].done() and time.monotonic() - entrada[1] > self.robots_ttl_segundos):
+            entrada = (asyncio.ensure_future(self._cargar_robots(session, base)), time.monotonic())
+            self._robots[base] = entrada
+            while len(self._robots) > self.max_hosts:
+                self._robots.popitem(last=False)
+        self._robots.move_to_end(base)
+        parser = await entrada[0]
+        return parser is None or parser.can_fetch(self.headers.get('User-Agent', '*'), url)
+
+    async def obtener_pagina(self, session: aiohttp.ClientSession, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Devuelve {"url", "text", "title"} de la página, o None si no se pudo
+        obtener (error HTTP, timeout o bloqueada por robots.txt).
+        """
+        entrada = await asyncio.to_thread(self.cache.obtener, url)
+        if entrada and self.cache.vigente(entrada):
+            self.stats["cache"] += 1
+            return entrada["pagina"]
+
+        if not await self._permitido(session, url):
+            self.stats["bloqueadas_robots"] += 1
+            logger.info(f"robots.txt no permite {url}")
+            return None
+
+        headers = {}
+        if entrada:
+            if entrada.get("etag"):
+                headers["If-None-Match"] = entrada["etag"]
+            if entrada.get("last_modified"):
+                headers["If-Modified-Since"] = entrada["last_modified"]
+
+        async with self._limite_host(urlparse(url).netloc):
+            try:
+                async with session.get(url, headers=headers, allow_redirects=True) as resp:
+                    if resp.status == 304 and entrada:
+                        self.stats["revalidadas"] += 1
+                        entrada["descargado_en"] = time.time()
+                        await asyncio.to_thread(self.cache.guardar, url, entrada)
+                        return entrada["pagina"]
+                    if resp.status != 200:
+                        return None
+                    html = await resp.text(errors='replace')
+                    etag = resp.headers.get("ETag")
+                    last_modified = resp.headers.get("Last-Modified")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.stats["errores"] += 1
+                logger.debug(f"Error descargando {url}: {e}")
+                return None
+
+        self.stats["descargas"] += 1
+        texto, titulo = await asyncio.to_thread(extraer_texto_html, html)
+        pagina = {"url": url, "text": texto, "title": titulo}
+        await asyncio.to_thread(self.cache.guardar, url, {
+            "pagina": pagina,
+            "etag": etag,
+            "last_modified": last_modified,
+            "descargado_en": time.time(),
+        })
+        return pagina
+
+    async def obtener_paginas(self, urls: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Descarga todas las URLs concurrentemente; conserva el orden de entrada."""
+        timeout = aiohttp.ClientTimeout(total=self.timeout_segundos)
+        async with aiohttp.ClientSession(headers=self.headers, timeout=timeout) as session:
+            return await asyncio.gather(*(self.obtener_pagina(session, url) for url in urls))
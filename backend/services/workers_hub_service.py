@@ -123,6 +123,9 @@ class WorkersHubService:
         self.hub_url = self.HUB_URL
         self.available = self._check_configuration()
         self._pending_callbacks: Dict[str, Callable] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dag_executor = None
 
         if self.available:
             logger.info(f"WorkersHubService inicializado: {self.hub_url}")
@@ -133,6 +136,28 @@ class WorkersHubService:
         """Verifica si el servicio está configurado"""
         return bool(self.hub_url and "workers.dev" in self.hub_url)
 
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Sesión HTTP compartida (pool de conexiones reutilizado entre tareas)."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            if self._session is not None and not self._session.closed:
+                # Sesión de otro event loop (p. ej. tras reiniciar el loop): liberar su conector
+                try:
+                    await self._session.close()
+                except Exception as e:
+                    logger.debug(f"WorkersHubService: no se pudo cerrar la sesión anterior: {e}")
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=50, ttl_dns_cache=300)
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def close(self):
+        """Cierra la sesión HTTP compartida."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
     # =========================================================================
     # MÉTODOS PRINCIPALES
     # =========================================================================
@@ -183,34 +208,34 @@ class WorkersHubService:
         }
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.hub_url}/execute",
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=timeout or self.DEFAULT_TIMEOUT),
-                    headers={
-                        "Content-Type": "application/json",
-                        "X-Empresa-ID": empresa_id or "",
-                        "X-Agent-ID": agente_id or ""
-                    }
-                ) as response:
-                    data = await response.json()
-
-                    if response.status == 200 and data.get("success"):
-                        return WorkerResult(
-                            success=True,
-                            worker_id=data.get("worker_id", "unknown"),
-                            tarea=tarea,
-                            resultado=data
-                        )
-                    else:
-                        return WorkerResult(
-                            success=False,
-                            worker_id=data.get("worker_id", "none"),
-                            tarea=tarea,
-                            resultado=data,
-                            error=data.get("error", f"HTTP {response.status}")
-                        )
+            session = await self._get_session()
+            async with session.post(
+                f"{self.hub_url}/execute",
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=timeout or self.DEFAULT_TIMEOUT),
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Empresa-ID": empresa_id or "",
+                    "X-Agent-ID": agente_id or ""
+                }
+            ) as response:
+                data = await response.json()
+
+                if response.status == 200 and data.get("success"):
+                    return WorkerResult(
+                        success=True,
+                        worker_id=data.get("worker_id", "unknown"),
+                        tarea=tarea,
+                        resultado=data
+                    )
+                else:
+                    return WorkerResult(
+                        success=False,
+                        worker_id=data.get("worker_id", "none"),
+                        tarea=tarea,
+                        resultado=data,
+                        error=data.get("error", f"HTTP {response.status}")
+                    )
 
         except asyncio.TimeoutError:
             logger.error(f"Timeout en tarea: {tarea}")
@@ -266,19 +291,61 @@ class WorkersHubService:
         }
 
         try:
-            async with aiohttp.ClientSession() as session:
-                # Timeout largo para pipelines (10 minutos)
-                async with session.post(
-                    f"{self.hub_url}/pipeline",
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=600)
-                ) as response:
-                    return await response.json()
+            session = await self._get_session()
+            # Timeout largo para pipelines (10 minutos)
+            async with session.post(
+                f"{self.hub_url}/pipeline",
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=600)
+            ) as response:
+                return await response.json()
 
         except Exception as e:
             logger.error(f"Error en pipeline: {e}")
             return {"success": False, "error": str(e)}
 
+    async def ejecutar_pipeline_dag(
+        self,
+        pasos: List[Dict[str, Any]],
+        empresa_id: Optional[str] = None,
+        proyecto_id: Optional[str] = None,
+        agente_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Ejecuta un pipeline con dependencias declaradas entre pasos.
+        Los pasos independientes corren en paralelo y los resultados se
+        memoizan (ver services/workers_pipeline.py). Una lista sin
+        dependencias declaradas se corre en secuencia, como ejecutar_pipeline.
+
+        Args:
+            pasos: Lista de pasos [{id, tarea, parametros, depende_de, entradas}, ...]
+            empresa_id: ID de empresa
+            proyecto_id: ID del proyecto relacionado
+            agente_id: Agente por defecto de los pasos
+
+        Returns:
+            Dict con resultados de todos los pasos
+        """
+        if not self.available:
+            return {
+                "success": False,
+                "error": "Workers Hub no configurado"
+            }
+
+        from services.workers_pipeline import EjecutorPipelineDAG, normalizar_pasos
+
+        if self._dag_executor is None:
+            self._dag_executor = EjecutorPipelineDAG(hub=self)
+        if all(isinstance(p, dict) for p in pasos):
+            pasos = normalizar_pasos(pasos)
+
+        try:
+            return await self._dag_executor.ejecutar(
+                pasos, empresa_id=empresa_id, proyecto_id=proyecto_id, agente_id=agente_id
+            )
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+
     # =========================================================================
     # MÉTODOS DE CONVENIENCIA PARA AGENTES
     # =========================================================================
@@ -311,6 +378,37 @@ class WorkersHubService:
             proyecto_id=proyecto_id
         )
 
+    async def due_diligence_proveedor(
+        self,
+        empresa: str,
+        rfc: Optional[str] = None,
+        sitio_web: Optional[str] = None,
+        monto: Optional[float] = None,
+        tipo_servicio: Optional[str] = None,
+        documento_url: Optional[str] = None,
+        empresa_id: Optional[str] = None,
+        proyecto_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Due diligence completo de proveedor como DAG: investigación,
+        lista 69-B (si hay RFC) y análisis del documento en paralelo,
+        luego el reporte.
+        """
+        from services.workers_pipeline import pipeline_due_diligence_proveedor
+
+        return await self.ejecutar_pipeline_dag(
+            pipeline_due_diligence_proveedor(
+                empresa=empresa,
+                rfc=rfc,
+                sitio_web=sitio_web,
+                monto=monto,
+                tipo_servicio=tipo_servicio,
+                documento_url=documento_url
+            ),
+            empresa_id=empresa_id,
+            proyecto_id=proyecto_id
+        )
+
     async def documentar_materialidad(
         self,
         empresa: str,
@@ -407,12 +505,12 @@ class WorkersHubService:
             return {"error": "Hub no configurado"}
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.hub_url}/workers/health",
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    return await response.json()
+            session = await self._get_session()
+            async with session.get(
+                f"{self.hub_url}/workers/health",
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                return await response.json()
         except Exception as e:
             return {"error": str(e)}
 
@@ -422,16 +520,16 @@ class WorkersHubService:
             return []
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.hub_url}/workers",
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    data = await response.json()
-                    capabilities = set()
-                    for worker in data.get("workers", []):
-                        capabilities.update(worker.get("capabilities", []))
-                    return list(capabilities)
+            session = await self._get_session()
+            async with session.get(
+                f"{self.hub_url}/workers",
+                timeout=aiohttp.ClientTimeout(total=10)
+            ) as response:
+                data = await response.json()
+                capabilities = set()
+                for worker in data.get("workers", []):
+                    capabilities.update(worker.get("capabilities", []))
+                return list(capabilities)
         except Exception as e:
             logger.error(f"Error obteniendo capacidades: {e}")
             return []
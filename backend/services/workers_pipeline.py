@@ -0,0 +1,419 @@
+"""
+Workers Pipeline - Ejecutor local de pipelines de Workers como DAG
+
+A diferencia de WorkersHubService.ejecutar_pipeline (que envía la lista de
+pasos al Hub y éste los corre en secuencia), aquí cada paso declara sus
+dependencias y los pasos independientes se ejecutan en paralelo:
+
+- Un pipeline tarda lo que su ruta crítica, no la suma de todos los pasos
+- Límite de concurrencia por capacidad (p. ej. pocos OCR simultáneos)
+- Resultados memoizados por hash de entrada con TTL
+- Un paso cuya dependencia falla no se ejecuta
+
+Funciona con cualquier objeto que exponga `ejecutar_tarea(...)` con la
+firma de WorkersHubService, lo que permite correrlo contra un Hub local.
+
+Última actualización: 2026-10-18
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.workers_hub_service import WorkerCapability, WorkerResult
+
+logger = logging.getLogger(__name__)
+
+
+# Concurrencia máxima por capacidad cuando no se indica otra
+LIMITE_CONCURRENCIA_DEFAULT = 4
+
+LIMITES_CONCURRENCIA = {
+    WorkerCapability.OCR.value: 2,
+    WorkerCapability.ANALISIS_PDF.value: 2,
+    WorkerCapability.SCRAPING.value: 2,
+    WorkerCapability.LISTA_69B.value: 8,
+    WorkerCapability.RFC.value: 8,
+}
+
+
+@dataclass
+class PasoPipeline:
+    """
+    Un paso del pipeline.
+
+    `entradas` inyecta resultados de otros pasos en los parámetros:
+    {"datos": "investigacion"} pasa el resultado completo del paso
+    "investigacion"; {"situacion": "lista_69b.situacion"} sólo ese campo;
+    {"datos.fiscal": "lista_69b"} lo anida en parametros["datos"]["fiscal"].
+    Todo paso referenciado en `entradas` es dependencia implícita.
+    """
+    id: str
+    tarea: str
+    parametros: Dict[str, Any] = field(default_factory=dict)
+    depende_de: List[str] = field(default_factory=list)
+    entradas: Dict[str, str] = field(default_factory=dict)
+    agente_id: Optional[str] = None
+    usar_cache: bool = True
+    timeout: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PasoPipeline":
+        return cls(
+            id=data.get("id") or data["tarea"],
+            tarea=data["tarea"],
+            parametros=data.get("parametros", {}),
+            depende_de=list(data.get("depende_de", [])),
+            entradas=dict(data.get("entradas", {})),
+            agente_id=data.get("agente_id"),
+            usar_cache=data.get("usar_cache", True),
+            timeout=data.get("timeout"),
+        )
+
+    def dependencias(self) -> List[str]:
+        origenes = [ref.split(".", 1)[0] for ref in self.entradas.values()]
+        return list(dict.fromkeys(self.depende_de + origenes))
+
+
+def validar_dag(pasos: List[PasoPipeline]) -> List[str]:
+    """
+    Verifica ids únicos, dependencias existentes y ausencia de ciclos.
+
+    Returns:
+        Orden topológico de los ids
+
+    Raises:
+        ValueError: si el pipeline no es un DAG válido
+    """
+    ids = [p.id for p in pasos]
+    duplicados = {i for i in ids if ids.count(i) > 1}
+    if duplicados:
+        raise ValueError(f"Pasos duplicados en el pipeline: {sorted(duplicados)}")
+
+    por_id = {p.id: p for p in pasos}
+    pendientes = {}
+    for paso in pasos:
+        faltantes = [d for d in paso.dependencias() if d not in por_id]
+        if faltantes:
+            raise ValueError(f"El paso '{paso.id}' depende de pasos inexistentes: {faltantes}")
+        pendientes[paso.id] = len(paso.dependencias())
+
+    dependientes: Dict[str, List[str]] = {i: [] for i in ids}
+    for paso in pasos:
+        for dep in paso.dependencias():
+            dependientes[dep].append(paso.id)
+
+    orden = []
+    listos = [i for i in ids if pendientes[i] == 0]
+    while listos:
+        actual = listos.pop(0)
+        orden.append(actual)
+        for siguiente in dependientes[actual]:
+            pendientes[siguiente] -= 1
+            if pendientes[siguiente] == 0:
+                listos.append(siguiente)
+
+    if len(orden) != len(pasos):
+        ciclo = sorted(i for i in ids if i not in orden)
+        raise ValueError(f"El pipeline tiene un ciclo entre los pasos: {ciclo}")
+    return orden
+
+
+def _resolver_referencia(referencia: str, resultados: Dict[str, WorkerResult]) -> Any:
+    paso_id, _, ruta = referencia.partition(".")
+    valor: Any = resultados[paso_id].resultado
+    for parte in filter(None, ruta.split(".")):
+        valor = valor.get(parte) if isinstance(valor, dict) else None
+    return valor
+
+
+def _asignar_parametro(parametros: Dict[str, Any], destino: str, valor: Any):
+    *ruta, nombre = destino.split(".")
+    for parte in ruta:
+        parametros = parametros.setdefault(parte, {})
+    parametros[nombre] = valor
+
+
+def clave_cache(tarea: str, parametros: Dict[str, Any], empresa_id: Optional[str]) -> str:
+    """Hash estable de la entrada de un paso (el resultado depende sólo de esto)."""
+    contenido = json.dumps(
+        {"tarea": tarea, "parametros": parametros, "empresa_id": empresa_id},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class CacheResultados:
+    """Cache LRU con TTL de resultados exitosos de Workers."""
+
+    def __init__(self, ttl_segundos: float = 3600, max_entradas: int = 1000):
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[str, Tuple[float, WorkerResult]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def obtener(self, clave: str) -> Optional[WorkerResult]:
+        entrada = self._entradas.get(clave)
+        if entrada is None or entrada[0] < time.monotonic():
+            self._entradas.pop(clave, None)
+            self.misses += 1
+            return None
+        self._entradas.move_to_end(clave)
+        self.hits += 1
+        return entrada[1]
+
+    def guardar(self, clave: str, resultado: WorkerResult):
+        self._entradas[clave] = (time.monotonic() + self.ttl_segundos, resultado)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        self._entradas.clear()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+class EjecutorPipelineDAG:
+    """
+    Ejecuta pipelines de Workers respetando dependencias.
+
+    Los semáforos por capacidad y el cache son compartidos entre pipelines
+    concurrentes del mismo ejecutor; dos pasos con la misma entrada que
+    corren al mismo tiempo comparten una sola llamada al Worker.
+    """
+
+    def __init__(
+        self,
+        hub=None,
+        limites_concurrencia: Optional[Dict[str, int]] = None,
+        cache_ttl_segundos: float = 3600,
+        cache_max_entradas: int = 1000,
+    ):
+        if hub is None:
+            from services.workers_hub_service import workers_hub_service
+            hub = workers_hub_service
+        self.hub = hub
+        self.limites_concurrencia = {**LIMITES_CONCURRENCIA, **(limites_concurrencia or {})}
+        self.cache = CacheResultados(cache_ttl_segundos, cache_max_entradas)
+        self._semaforos: Dict[str, asyncio.Semaphore] = {}
+        self._en_vuelo: Dict[str, asyncio.Future] = {}
+
+    def _semaforo(self, tarea: str) -> asyncio.Semaphore:
+        if tarea not in self._semaforos:
+            limite = self.limites_concurrencia.get(tarea, LIMITE_CONCURRENCIA_DEFAULT)
+            self._semaforos[tarea] = asyncio.Semaphore(limite)
+        return self._semaforos[tarea]
+
+    async def ejecutar(
+        self,
+        pasos: List[Any],
+        empresa_id: Optional[str] = None,
+        proyecto_id: Optional[str] = None,
+        agente_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Ejecuta el pipeline.
+
+        Args:
+            pasos: PasoPipeline o dicts {id, tarea, parametros, depende_de, entradas}
+            empresa_id: ID de empresa (multi-tenant, parte de la clave de cache)
+            proyecto_id: ID del proyecto relacionado
+            agente_id: Agente por defecto para pasos sin agente propio
+
+        Returns:
+            Dict con el resultado de cada paso, en orden topológico
+        """
+        pasos = [p if isinstance(p, PasoPipeline) else PasoPipeline.from_dict(p) for p in pasos]
+        orden = validar_dag(pasos)
+        por_id = {p.id: p for p in pasos}
+
+        inicio = time.perf_counter()
+        resultados: Dict[str, WorkerResult] = {}
+        detalles: Dict[str, Dict[str, Any]] = {}
+        terminados: Dict[str, asyncio.Future] = {
+            paso_id: asyncio.get_running_loop().create_future() for paso_id in orden
+        }
+
+        async def correr(paso: PasoPipeline):
+            try:
+                for dep in paso.dependencias():
+                    await terminados[dep]
+
+                fallidas = [d for d in paso.dependencias() if not resultados[d].success]
+                if fallidas:
+                    resultados[paso.id] = WorkerResult(
+                        success=False, worker_id="omitido", tarea=paso.tarea, resultado={},
+                        error=f"Dependencias fallidas: {fallidas}"
+                    )
+                    detalles[paso.id] = {"desde_cache": False, "duracion_ms": 0}
+                    return
+
+                parametros = json.loads(json.dumps(paso.parametros, default=str))
+                for destino, referencia in paso.entradas.items():
+                    _asignar_parametro(parametros, destino, _resolver_referencia(referencia, resultados))
+
+                t0 = time.perf_counter()
+                resultado, desde_cache = await self._ejecutar_paso(
+                    paso, parametros, empresa_id, proyecto_id, agente_id
+                )
+                resultados[paso.id] = resultado
+                detalles[paso.id] = {
+                    "desde_cache": desde_cache,
+                    "duracion_ms": round((time.perf_counter() - t0) * 1000, 1),
+                }
+            except Exception as e:
+                logger.error(f"Error en paso {paso.id} del pipeline: {e}")
+                resultados[paso.id] = WorkerResult(
+                    success=False, worker_id="error", tarea=paso.tarea, resultado={}, error=str(e)
+                )
+                detalles.setdefault(paso.id, {"desde_cache": False, "duracion_ms": 0})
+            finally:
+                terminados[paso.id].set_result(None)
+
+        logger.info(f"Ejecutando pipeline DAG de {len(pasos)} pasos")
+        await asyncio.gather(*(correr(por_id[paso_id]) for paso_id in orden))
+
+        return {
+            "success": all(resultados[i].success for i in orden),
+            "orden": orden,
+            "pasos": {
+                paso_id: {
+                    "tarea": resultados[paso_id].tarea,
+                    "success": resultados[paso_id].success,
+                    "worker_id": resultados[paso_id].worker_id,
+                    "resultado": resultados[paso_id].resultado,
+                    "error": resultados[paso_id].error,
+                    **detalles[paso_id],
+                }
+                for paso_id in orden
+            },
+            "duracion_ms": round((time.perf_counter() - inicio) * 1000, 1),
+            "cache": {"hits": self.cache.hits, "misses": self.cache.misses},
+        }
+
+    async def _ejecutar_paso(
+        self,
+        paso: PasoPipeline,
+        parametros: Dict[str, Any],
+        empresa_id: Optional[str],
+        proyecto_id: Optional[str],
+        agente_id: Optional[str],
+    ) -> Tuple[WorkerResult, bool]:
+        clave = clave_cache(paso.tarea, parametros, empresa_id) if paso.usar_cache else None
+        if clave is not None:
+            en_cache = self.cache.obtener(clave)
+            if en_cache is not None:
+                return en_cache, True
+            if clave in self._en_vuelo:
+                return await asyncio.shield(self._en_vuelo[clave]), True
+
+        futuro = asyncio.get_running_loop().create_future() if clave is not None else None
+        if futuro is not None:
+            self._en_vuelo[clave] = futuro
+        try:
+            async with self._semaforo(paso.tarea):
+                resultado = await self.hub.ejecutar_tarea(
+                    tarea=paso.tarea,
+                    parametros=parametros,
+                    agente_id=paso.agente_id or agente_id,
+                    empresa_id=empresa_id,
+                    proyecto_id=proyecto_id,
+                    timeout=paso.timeout,
+                )
+            if clave is not None and resultado.success:
+                self.cache.guardar(clave, resultado)
+            if futuro is not None:
+                futuro.set_result(resultado)
+            return resultado, False
+        except asyncio.CancelledError:
+            if futuro is not None:
+                futuro.cancel()
+            raise
+        except Exception as e:
+            if futuro is not None:
+                futuro.set_exception(e)
+                futuro.exception()  # evita el aviso "exception never retrieved" sin esperas
+            raise
+        finally:
+            if clave is not None:
+                self._en_vuelo.pop(clave, None)
+
+
+def normalizar_pasos(pasos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Acepta también el formato de WorkersHubService.ejecutar_pipeline
+    ([{tarea, parametros}, ...] sin dependencias declaradas): se conserva
+    su semántica secuencial encadenando cada paso al anterior. Si algún
+    paso declara `depende_de` o `entradas`, los pasos se usan tal cual.
+    """
+    if any(p.get("depende_de") or p.get("entradas") for p in pasos):
+        return pasos
+    normalizados = []
+    for i, paso in enumerate(pasos):
+        paso = dict(paso)
+        paso.setdefault("id", f"{i + 1}_{paso.get('tarea')}")
+        if normalizados:
+            paso["depende_de"] = [normalizados[-1]["id"]]
+        normalizados.append(paso)
+    return normalizados
+
+
+def pipeline_due_diligence_proveedor(
+    empresa: str,
+    rfc: Optional[str],
+    sitio_web: Optional[str] = None,
+    monto: Optional[float] = None,
+    tipo_servicio: Optional[str] = None,
+    documento_url: Optional[str] = None,
+    tipo_documento: str = "contrato",
+) -> List[PasoPipeline]:
+    """
+    Due diligence de proveedor: investigación, lista 69-B (si hay RFC) y
+    análisis del documento corren en paralelo; el reporte espera a todos.
+    """
+    pasos = [
+        PasoPipeline(
+            id="investigar_proveedor",
+            tarea=WorkerCapability.DUE_DILIGENCE.value,
+            parametros={
+                "empresa": empresa,
+                "rfc": rfc,
+                "sitio_web": sitio_web,
+                "monto_operacion": monto,
+                "tipo_servicio": tipo_servicio
+            },
+            agente_id="A6_PROVEEDOR",
+        ),
+    ]
+    if rfc:
+        pasos.append(PasoPipeline(
+            id="verificar_lista_69b",
+            tarea=WorkerCapability.LISTA_69B.value,
+            parametros={"rfc": rfc},
+            agente_id="A3_FISCAL",
+        ))
+    if documento_url:
+        pasos.append(PasoPipeline(
+            id="analizar_documento",
+            tarea=WorkerCapability.ANALISIS_PDF.value,
+            parametros={"url": documento_url, "tipo": tipo_documento},
+            agente_id="A8_AUDITOR",
+        ))
+
+    pasos.append(PasoPipeline(
+        id="generar_reporte",
+        tarea=WorkerCapability.REPORTES.value,
+        parametros={"tipo": "due_diligence_proveedor"},
+        entradas={f"datos.{p.id}": p.id for p in pasos},
+        agente_id="A7_DEFENSA",
+        usar_cache=False,
+    ))
+    return pasos
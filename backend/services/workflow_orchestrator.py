@@ -15,6 +15,8 @@ from services.agent_email_service import AgentEmailService
 from services.agent_discussion_service import AgentDiscussionService
 from services.dreamhost_email_service import DreamHostEmailService
 from services.state_machine import ProjectStateMachine, ProjectState, AgentDecision
+from services.parallel_validation import AgentValidation, run_parallel_validations
+from services.trafico_ia_service import trafico_ia_service
 from models.projects import Project, ProjectPhase, ProjectStatus, StrategicInitiativeBrief, ValidationReport
 
 logger = logging.getLogger(__name__)
@@ -25,6 +27,13 @@ class WorkflowOrchestrator:
     A2-PMO actúa como hub central de coordinación.
     """
     
+    # Reportes de la validación paralela de Fase 0: agent_id -> (nombre, rol, tipo, hallazgo)
+    PHASE_0_REPORTS = {
+        "A1_SPONSOR": ("María Rodríguez", "sponsor", "Estrategico", "Análisis estratégico completado"),
+        "A3_FISCAL": ("Laura Sánchez", "fiscal", "Fiscal", "Análisis fiscal completado"),
+        "A5_FINANZAS": ("Roberto Torres", "finanzas", "Financiero", "Análisis financiero completado"),
+    }
+    
     def __init__(self, db: AsyncIOMotorClient):
         self.db = db
         self.agent_service = AgentService()
@@ -47,6 +56,11 @@ class WorkflowOrchestrator:
             self.gmail_service = None
             logger.warning(f"Gmail not available - emails will be logged only: {e}")
     
+    def _get_tenant_id(self, sib_data: Dict) -> str:
+        """Empresa del SIB para el límite de concurrencia por tenant."""
+        form_data = sib_data.get('form_data') or {}
+        return str(sib_data.get('empresa_id') or form_data.get('empresa_id') or "default")
+    
     def _get_provider_email(self, sib: StrategicInitiativeBrief) -> str:
         """
         Gets the provider/vendor email from SIB form data.
@@ -458,6 +472,7 @@ Revisar.ia
             submitted_at=datetime.now(timezone.utc)
         )
         await self.db.projects.insert_one(project.model_dump())
+        await trafico_ia_service.notificar_proyecto_actualizado(project_id)
         
         # Analizar archivos adjuntos
         attachments_content = ""
@@ -479,55 +494,15 @@ Revisar.ia
         if attachments_content:
             sib_with_files['attachments_content'] = attachments_content
         
-        # A1-Sponsor: Validación estratégica (solo análisis, SIN email al sponsor)
-        strategic_val = await self.agent_service.validate_strategic_alignment(sib_with_files)
-        strategic_decision = self._extract_decision(strategic_val['analysis'])
-        strategic_pdf = self.report_generator.generate_agent_report(
-            project_id=project_id,
-            agent_id="A1_SPONSOR",
-            agent_name="María Rodríguez",
-            agent_role="sponsor",
-            report_type="Estrategico",
-            version=1,
-            project_data=sib_with_files,
-            analysis=strategic_val['analysis'],
-            decision=strategic_decision,
-            findings=["Análisis estratégico completado"],
-            recommendations=[]
-        )
-        
-        # A3-Fiscal: Validación fiscal (solo análisis, SIN email al sponsor)
-        fiscal_val = await self.agent_service.validate_fiscal_compliance(sib_with_files)
-        fiscal_decision = self._extract_decision(fiscal_val['analysis'])
-        fiscal_pdf = self.report_generator.generate_agent_report(
-            project_id=project_id,
-            agent_id="A3_FISCAL",
-            agent_name="Laura Sánchez",
-            agent_role="fiscal",
-            report_type="Fiscal",
-            version=1,
-            project_data=sib_with_files,
-            analysis=fiscal_val['analysis'],
-            decision=fiscal_decision,
-            findings=["Análisis fiscal completado"],
-            recommendations=[]
-        )
-        
-        # A5-Finanzas: Validación financiera (solo análisis, SIN email al sponsor)
-        financial_val = await self.agent_service.verify_budget(sib_with_files, {"po_amount": sib.budget_estimate})
-        financial_decision = self._extract_decision(financial_val['analysis'])
-        financial_pdf = self.report_generator.generate_agent_report(
-            project_id=project_id,
-            agent_id="A5_FINANZAS",
-            agent_name="Roberto Torres",
-            agent_role="finanzas",
-            report_type="Financiero",
-            version=1,
-            project_data=sib_with_files,
-            analysis=financial_val['analysis'],
-            decision=financial_decision,
-            findings=["Análisis financiero completado"],
-            recommendations=[]
+        # A1 (estratégica), A3 (fiscal) y A5 (financiera) sólo leen el SIB:
+        # se ejecutan al mismo tiempo, con timeout por agente
+        validations = await run_parallel_validations(
+            [
+                AgentValidation("A1_SPONSOR", lambda: self.agent_service.validate_strategic_alignment(sib_with_files)),
+                AgentValidation("A3_FISCAL", lambda: self.agent_service.validate_fiscal_compliance(sib_with_files)),
+                AgentValidation("A5_FINANZAS", lambda: self.agent_service.verify_budget(sib_with_files, {"po_amount": sib.budget_estimate})),
+            ],
+            tenant_id=self._get_tenant_id(sib_data)
         )
         
         # ===== PASO 3: DISCUSIÓN ENTRE AGENTES (3-5 RONDAS) =====
@@ -536,24 +511,30 @@ Revisar.ia
         
         logger.info(f"[STATE MACHINE] Iniciando discusión entre agentes (3-5 rondas)")
         
-        # Preparar análisis iniciales con PDFs
-        initial_analyses = {
-            "A1_SPONSOR": {
-                "analysis": strategic_val['analysis'],
-                "decision": strategic_decision,
-                "pdf_path": f"/app/backend{strategic_pdf}" if strategic_pdf else None
-            },
-            "A3_FISCAL": {
-                "analysis": fiscal_val['analysis'],
-                "decision": fiscal_decision,
-                "pdf_path": f"/app/backend{fiscal_pdf}" if fiscal_pdf else None
-            },
-            "A5_FINANZAS": {
-                "analysis": financial_val['analysis'],
-                "decision": financial_decision,
-                "pdf_path": f"/app/backend{financial_pdf}" if financial_pdf else None
+        # Preparar análisis iniciales con PDFs (en orden fijo: A1, A3, A5)
+        initial_analyses = {}
+        for agent_id, (agent_name, agent_role, report_type, finding) in self.PHASE_0_REPORTS.items():
+            validation = validations[agent_id]
+            decision = self._extract_decision(validation['analysis'])
+            pdf = self.report_generator.generate_agent_report(
+                project_id=project_id,
+                agent_id=agent_id,
+                agent_name=agent_name,
+                agent_role=agent_role,
+                report_type=report_type,
+                version=1,
+                project_data=sib_with_files,
+                analysis=validation['analysis'],
+                decision=decision,
+                findings=[finding if validation['status'] == "ok" else f"Validación incompleta: {validation['error']}"],
+                recommendations=[]
+            )
+            initial_analyses[agent_id] = {
+                "analysis": validation['analysis'],
+                "decision": decision,
+                "pdf_path": f"/app/backend{pdf}" if pdf else None,
+                "validation_status": validation['status']
             }
-        }
         
         # Iniciar sistema de discusión iterativa
         discussion_result = await self.discussion_service.initiate_discussion(
@@ -842,6 +823,7 @@ Revisar.ia
                 {"project_id": project_id},
                 {"$set": {"current_status": ProjectStatus.REJECTED}}
             )
+        await trafico_ia_service.notificar_proyecto_actualizado(project_id)
         
         # Enviar email al sponsor con resultados
         await self._send_final_decision_email(
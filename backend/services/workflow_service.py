@@ -7,6 +7,7 @@ import uuid
 from services.agent_service import AgentService, AGENT_CONFIGURATIONS
 from services.gmail_service import GmailService
 from services.file_analysis_service import FileAnalysisService
+from services.trafico_ia_service import trafico_ia_service
 from models.projects import (
     Project, ProjectPhase, ProjectStatus,
     StrategicInitiativeBrief, ValidationReport, Evidence
@@ -84,6 +85,7 @@ class WorkflowService:
         )
         
         await self.db.projects.insert_one(project.model_dump())
+        await trafico_ia_service.notificar_proyecto_actualizado(project_id)
         
         # 2.5 ANALIZAR ARCHIVOS ADJUNTOS si existen
         attachments_analysis = ""
@@ -202,6 +204,7 @@ class WorkflowService:
                     "approved_at": datetime.now(timezone.utc).isoformat()
                 }}
             )
+            await trafico_ia_service.notificar_proyecto_actualizado(project_id)
         
         # 7. ENVIAR EMAIL AL SPONSOR CON RESULTADOS
         await self._send_validation_summary_email(
@@ -271,6 +274,7 @@ class WorkflowService:
                 "metadata.provider": provider_selection
             }}
         )
+        await trafico_ia_service.notificar_proyecto_actualizado(project_id)
         
         # 2. Verificación presupuestal (A5-Finanzas)
         logger.info("Verificación presupuestal - A5-Finanzas")
@@ -324,6 +328,7 @@ class WorkflowService:
                 "current_status": ProjectStatus.CONTRACTED
             }}
         )
+        await trafico_ia_service.notificar_proyecto_actualizado(project_id)
         
         logger.info(f"STAGE 2 completado para proyecto {project_id}")
         
@@ -384,6 +389,7 @@ class WorkflowService:
                 "started_at": execution_log['started_at']
             }}
         )
+        await trafico_ia_service.notificar_proyecto_actualizado(project_id)
         
         # 2. Monitoreo de materialidad (A3-Fiscal)
         logger.info("Monitoreo de materialidad - A3-Fiscal")
@@ -454,6 +460,7 @@ Evidencia generada: {', '.join(execution_log['evidence_generated'])}
             {"project_id": project_id},
             {"$set": {"current_phase": ProjectPhase.PHASE_5_DELIVERY}}
         )
+        await trafico_ia_service.notificar_proyecto_actualizado(project_id)
         
         # 2. Validación técnica (A1-Sponsor)
         logger.info("Fase 6: Validación técnica - A1-Sponsor")
@@ -527,6 +534,7 @@ Validación Técnica: {technical_validation[:200]}...
                 "completed_at": datetime.now(timezone.utc).isoformat()
             }}
         )
+        await trafico_ia_service.notificar_proyecto_actualizado(project_id)
         
         logger.info(f"STAGE 4 completado para proyecto {project_id}")
         
@@ -626,6 +634,7 @@ Acta de Entrega-Recepción: Firmada y archivada
                 "actual_cost": po_data['amount']
             }}
         )
+        await trafico_ia_service.notificar_proyecto_actualizado(project_id)
         
         # 3. Medición de impacto (A1-Sponsor + A5-Finanzas)
         logger.info("Fase 9: Medición de impacto")
@@ -679,6 +688,7 @@ Duración Real: [A calcular en producción]
                 "closed_at": datetime.now(timezone.utc).isoformat()
             }}
         )
+        await trafico_ia_service.notificar_proyecto_actualizado(project_id)
         
         logger.info(f"STAGE 5 completado - Proyecto {project_id} CERRADO")
         
@@ -0,0 +1,202 @@
+"""
+Pruebas Unitarias: Servicio de cache - Revisar.IA
+Verifica L1 + Redis asíncrono, invalidación por generación sin SCAN,
+coalescencia de misses y el decorator @cached
+"""
+
+import asyncio
+import fnmatch
+import pytest
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import services.cache_service as cache_module
+from services.cache_service import CacheService, L1Cache, cached
+
+
+class RedisFalso:
+    """Cliente redis.asyncio en memoria con registro de comandos."""
+
+    def __init__(self):
+        self.datos = {}
+        self.comandos = []
+
+    async def get(self, key):
+        self.comandos.append("GET")
+        return self.datos.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.comandos.append("SET")
+        self.datos[key] = value
+
+    async def delete(self, key):
+        self.comandos.append("DEL")
+        self.datos.pop(key, None)
+
+    async def incr(self, key):
+        self.comandos.append("INCR")
+        self.datos[key] = str(int(self.datos.get(key) or 0) + 1).encode()
+        return int(self.datos[key])
+
+    async def scan_iter(self, match=None, count=None):
+        self.comandos.append("SCAN")
+        for key in list(self.datos):
+            if fnmatch.fnmatch(key, match):
+                yield key
+
+    async def unlink(self, *keys):
+        self.comandos.append("UNLINK")
+        return sum(1 for k in keys if self.datos.pop(k, None) is not None)
+
+    def keys(self, pattern):
+        raise AssertionError("KEYS bloquea Redis")
+
+
+@pytest.fixture
+def redis_falso(monkeypatch):
+    redis = RedisFalso()
+    servicio = CacheService(client=redis)
+    monkeypatch.setattr(cache_module, "_cache_service", servicio)
+    return redis, servicio
+
+
+class TestCacheService:
+
+    @pytest.mark.asyncio
+    async def test_l1_evita_ir_a_redis(self, redis_falso):
+        redis, servicio = redis_falso
+        key = await servicio.scoped_key("proyectos", "emp1", {"q": "TP"})
+        await servicio.set(key, {"total": 3, "monto": 1500.5})
+        assert await servicio.get(key) == {"total": 3, "monto": 1500.5}
+        assert servicio.stats["l1_hits"] == 1
+
+        servicio.l1 = L1Cache()
+        assert await servicio.get(key) == {"total": 3, "monto": 1500.5}
+        assert servicio.stats["redis_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_l1_y_redis_devuelven_el_mismo_tipo(self, redis_falso):
+        redis, servicio = redis_falso
+        valor = {"fecha": datetime(2026, 1, 15, 10, 30), "rango": (1, 2)}
+        await servicio.set("revisar:global:g0:k", valor)
+        desde_l1 = await servicio.get("revisar:global:g0:k")
+
+        servicio.l1 = L1Cache()
+        desde_redis = await servicio.get("revisar:global:g0:k")
+        assert desde_l1 == desde_redis == {"fecha": "2026-01-15T10:30:00", "rango": [1, 2]}
+
+    @pytest.mark.asyncio
+    async def test_invalidar_empresa_sin_escanear(self, redis_falso):
+        redis, servicio = redis_falso
+        key_emp1 = await servicio.scoped_key("proyectos", "emp1", {"q": "TP"})
+        key_emp2 = await servicio.scoped_key("proyectos", "emp2", {"q": "TP"})
+        await servicio.set(key_emp1, [1])
+        await servicio.set(key_emp2, [2])
+
+        redis.comandos.clear()
+        assert await servicio.invalidate_empresa("emp1") == 1
+        assert redis.comandos == ["INCR"]
+
+        nueva_key = await servicio.scoped_key("proyectos", "emp1", {"q": "TP"})
+        assert nueva_key != key_emp1
+        assert await servicio.get(nueva_key) is None
+        assert await servicio.get(key_emp2) == [2]
+
+    @pytest.mark.asyncio
+    async def test_otro_proceso_ve_la_invalidacion(self, redis_falso, monkeypatch):
+        redis, servicio = redis_falso
+        otro = CacheService(client=redis)
+        key = await otro.scoped_key("kpis", "emp1", {})
+        await servicio.invalidate_empresa("emp1")
+
+        monkeypatch.setattr(cache_module, "GENERATION_TTL_SECONDS", 0)
+        assert await otro.scoped_key("kpis", "emp1", {}) != key
+
+    @pytest.mark.asyncio
+    async def test_delete_pattern_usa_scan(self, redis_falso):
+        redis, servicio = redis_falso
+        await servicio.set("revisar:global:g0:kpis:a", 1)
+        await servicio.set("revisar:global:g0:otros:b", 2)
+        assert await servicio.delete_pattern("global:g0:kpis") == 1
+        assert "SCAN" in redis.comandos and "UNLINK" in redis.comandos
+
+    @pytest.mark.asyncio
+    async def test_sin_redis_usa_solo_l1(self):
+        servicio = CacheService(redis_url=None)
+        await servicio.set("k", "v")
+        assert await servicio.get("k") == "v"
+        assert await servicio.invalidate_empresa("emp1") == 1
+
+
+class TestCachedDecorator:
+
+    @pytest.mark.asyncio
+    async def test_coalesce_misses_concurrentes(self, redis_falso):
+        llamadas = []
+
+        @cached("busqueda", ttl=60)
+        async def buscar(query: str, empresa_id: str):
+            llamadas.append(query)
+            await asyncio.sleep(0.05)
+            return {"query": query, "empresa": empresa_id}
+
+        resultados = await asyncio.gather(*(buscar("materialidad", "emp1") for _ in range(10)))
+        assert llamadas == ["materialidad"]
+        assert all(r == {"query": "materialidad", "empresa": "emp1"} for r in resultados)
+        assert await buscar("materialidad", empresa_id="emp1") == resultados[0]
+        assert llamadas == ["materialidad"]
+
+    @pytest.mark.asyncio
+    async def test_primera_llamada_devuelve_lo_mismo_que_un_hit(self, redis_falso):
+        @cached("reporte", ttl=60)
+        async def reporte(empresa_id: str):
+            return {"periodo": (2026, 1)}
+
+        assert await reporte("emp1") == {"periodo": [2026, 1]}
+        assert await reporte("emp1") == {"periodo": [2026, 1]}
+
+    @pytest.mark.asyncio
+    async def test_key_incluye_primer_argumento(self, redis_falso):
+        @cached("busqueda")
+        async def buscar(query: str, empresa_id: str):
+            return query
+
+        assert await buscar("a", "emp1") == "a"
+        assert await buscar("b", "emp1") == "b"
+
+    @pytest.mark.asyncio
+    async def test_error_se_propaga_a_todos_y_no_se_cachea(self, redis_falso):
+        intentos = []
+
+        @cached("fragil")
+        async def cargar(empresa_id: str):
+            intentos.append(1)
+            await asyncio.sleep(0.02)
+            raise RuntimeError("BD caída")
+
+        resultados = await asyncio.gather(*(cargar("emp1") for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in resultados)
+        assert len(intentos) == 1
+        with pytest.raises(RuntimeError):
+            await cargar("emp1")
+        assert len(intentos) == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidacion_de_empresa_en_decorator(self, redis_falso):
+        redis, servicio = redis_falso
+        version = {"n": 1}
+
+        class Repo:
+            @cached("resumen")
+            async def resumen(self, empresa_id: str):
+                return dict(version)
+
+        repo = Repo()
+        assert await repo.resumen("emp1") == {"n": 1}
+        version["n"] = 2
+        assert await repo.resumen("emp1") == {"n": 1}
+        await servicio.invalidate_empresa("emp1")
+        assert await repo.resumen("emp1") == {"n": 2}
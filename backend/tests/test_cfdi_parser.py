@@ -0,0 +1,236 @@
+"""
+Pruebas Unitarias: Parser streaming de CFDI - Revisar.IA
+Verifica extracción de CFDI 3.3/4.0 e importación de ZIPs
+"""
+
+import io
+import pytest
+import sys
+import zipfile
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import services.cfdi_parser as cfdi_parser
+from services.cfdi_parser import (
+    CFDIParseError,
+    iterar_cfdis_zip,
+    parsear_cfdi,
+)
+
+
+CFDI_40 = """<?xml version="1.0" encoding="UTF-8"?>
+<cfdi:Comprobante xmlns:cfdi="http://www.sat.gob.mx/cfd/4" xmlns:tfd="http://www.sat.gob.mx/TimbreFiscalDigital"
+    Version="4.0" Serie="A" Folio="{folio}" Fecha="2026-01-15T10:30:00" SubTotal="100000.00" Total="105333.33"
+    Moneda="MXN" TipoDeComprobante="I" MetodoPago="PUE" FormaPago="03" LugarExpedicion="64000">
+  <cfdi:Emisor Rfc="aaa010101aaa" Nombre="CONSULTORES SA" RegimenFiscal="601"/>
+  <cfdi:Receptor Rfc="EMP010101AAA" Nombre="CLIENTE SA" UsoCFDI="G03"/>
+  <cfdi:Conceptos>
+    <cfdi:Concepto ClaveProdServ="80101500" Cantidad="1" ClaveUnidad="E48"
+        Descripcion="Estudio de mercado inmobiliario" ValorUnitario="100000.00" Importe="100000.00">
+      <cfdi:Impuestos>
+        <cfdi:Traslados>
+          <cfdi:Traslado Base="100000.00" Impuesto="002" TipoFactor="Tasa" TasaOCuota="0.160000" Importe="16000.00"/>
+        </cfdi:Traslados>
+      </cfdi:Impuestos>
+    </cfdi:Concepto>
+  </cfdi:Conceptos>
+  <cfdi:Impuestos TotalImpuestosTrasladados="16000.00" TotalImpuestosRetenidos="10666.67">
+    <cfdi:Retenciones>
+      <cfdi:Retencion Impuesto="001" Importe="10000.00"/>
+      <cfdi:Retencion Impuesto="002" Importe="666.67"/>
+    </cfdi:Retenciones>
+    <cfdi:Traslados>
+      <cfdi:Traslado Base="100000.00" Impuesto="002" TipoFactor="Tasa" TasaOCuota="0.160000" Importe="16000.00"/>
+    </cfdi:Traslados>
+  </cfdi:Impuestos>
+  <cfdi:Complemento>
+    <tfd:TimbreFiscalDigital Version="1.1" UUID="{uuid}"
+        FechaTimbrado="2026-01-15T10:31:00" RfcProvCertif="SAT970701NN3" NoCertificadoSAT="00001000000509846663"/>
+  </cfdi:Complemento>
+</cfdi:Comprobante>
+"""
+
+CFDI_33 = """<?xml version="1.0" encoding="UTF-8"?>
+<cfdi:Comprobante xmlns:cfdi="http://www.sat.gob.mx/cfd/3" xmlns:tfd="http://www.sat.gob.mx/TimbreFiscalDigital"
+    Version="3.3" Folio="99" Fecha="2021-06-30T12:00:00" SubTotal="500.00" Total="580.00" TipoDeComprobante="I">
+  <cfdi:Emisor Rfc="BBB010101BBB" Nombre="PROVEEDOR" RegimenFiscal="601"/>
+  <cfdi:Receptor Rfc="EMP010101AAA" UsoCFDI="G03"/>
+  <cfdi:Conceptos>
+    <cfdi:Concepto ClaveProdServ="84111506" Cantidad="1" Descripcion="Servicios" ValorUnitario="500" Importe="500"/>
+  </cfdi:Conceptos>
+  <cfdi:Complemento>
+    <tfd:TimbreFiscalDigital UUID="11111111-2222-3333-4444-555555555555" FechaTimbrado="2021-06-30T12:01:00"/>
+  </cfdi:Complemento>
+</cfdi:Comprobante>
+"""
+
+
+def cfdi_40(uuid="6f0c7e2a-1b2c-4d5e-8f90-aabbccddeeff", folio="1"):
+    return CFDI_40.format(uuid=uuid, folio=folio).encode("utf-8")
+
+
+class TestParserCFDI:
+    """Extracción de datos de un CFDI"""
+
+    def test_cfdi_40_completo(self):
+        r = parsear_cfdi(cfdi_40(), archivo="a.xml")
+        assert r["version"] == "4.0"
+        assert r["uuid"] == "6F0C7E2A-1B2C-4D5E-8F90-AABBCCDDEEFF"
+        assert r["emisor_rfc"] == "AAA010101AAA"
+        assert r["receptor_rfc"] == "EMP010101AAA"
+        assert r["periodo"] == "2026-01"
+        assert r["total"] == Decimal("105333.33")
+        assert r["archivo"] == "a.xml"
+
+    def test_impuestos_globales_no_suman_los_de_concepto(self):
+        r = parsear_cfdi(cfdi_40())
+        assert r["iva_trasladado"] == Decimal("16000.00")
+        assert r["isr_retenido"] == Decimal("10000.00")
+        assert r["iva_retenido"] == Decimal("666.67")
+
+    def test_conceptos(self):
+        r = parsear_cfdi(cfdi_40())
+        assert len(r["conceptos"]) == 1
+        assert r["conceptos"][0]["clave_prod_serv"] == "80101500"
+        assert r["conceptos"][0]["descripcion"] == "Estudio de mercado inmobiliario"
+
+    def test_cfdi_33(self):
+        r = parsear_cfdi(CFDI_33.encode("utf-8"))
+        assert r["version"] == "3.3"
+        assert r["uuid"] == "11111111-2222-3333-4444-555555555555"
+        assert r["iva_trasladado"] is None
+
+    def test_version_no_soportada(self):
+        xml = CFDI_33.replace('Version="3.3"', 'Version="3.2"').encode("utf-8")
+        with pytest.raises(CFDIParseError):
+            parsear_cfdi(xml)
+
+    def test_xml_mal_formado(self):
+        with pytest.raises(CFDIParseError):
+            parsear_cfdi(b"<cfdi:Comprobante")
+
+    def test_entidades_rechazadas(self):
+        bomba = b"""<?xml version="1.0"?>
+<!DOCTYPE lol [<!ENTITY lol "lol"><!ENTITY lol2 "&lol;&lol;&lol;&lol;">]>
+<cfdi:Comprobante xmlns:cfdi="http://www.sat.gob.mx/cfd/4" Version="4.0" Serie="&lol2;"/>"""
+        with pytest.raises(CFDIParseError, match="entidades"):
+            parsear_cfdi(bomba)
+
+    def test_raiz_distinta(self):
+        with pytest.raises(CFDIParseError):
+            parsear_cfdi(b"<Factura Version='4.0'/>")
+
+
+class TestImportacionZip:
+    """Parseo de ZIPs con muchos XMLs"""
+
+    @pytest.fixture
+    def zip_cfdis(self, tmp_path):
+        ruta = tmp_path / "cfdis.zip"
+        with zipfile.ZipFile(ruta, "w") as zf:
+            for k in range(40):
+                zf.writestr(f"2026/{k:04d}.xml", cfdi_40(uuid=f"00000000-0000-0000-0000-{k:012d}", folio=str(k)))
+            zf.writestr("2026/roto.xml", b"<no-es-cfdi")
+            zf.writestr("__MACOSX/2026/._0000.xml", b"basura")
+            zf.writestr("2026/leeme.txt", b"no es xml")
+        return str(ruta)
+
+    def test_secuencial(self, zip_cfdis):
+        registros = list(iterar_cfdis_zip(zip_cfdis, max_workers=0))
+        validos = [r for r in registros if not r.get("error")]
+        errores = [r for r in registros if r.get("error")]
+        assert len(validos) == 40
+        assert [e["archivo"] for e in errores] == ["2026/roto.xml"]
+
+    def test_miembro_excede_tamano(self, zip_cfdis, monkeypatch):
+        monkeypatch.setattr(cfdi_parser, "CFDI_XML_MAX_BYTES", 100)
+        registros = list(iterar_cfdis_zip(zip_cfdis, max_workers=0))
+        assert all("máximo" in r["error"] for r in registros if r["archivo"] != "2026/roto.xml")
+
+    def test_razon_de_compresion(self, tmp_path):
+        ruta = tmp_path / "bomba.zip"
+        with zipfile.ZipFile(ruta, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("bomba.xml", cfdi_40().replace(b"Estudio", b" " * 500_000 + b"Estudio"))
+            zf.writestr("normal.xml", cfdi_40())
+        errores = {r["archivo"]: r.get("error") for r in iterar_cfdis_zip(str(ruta), max_workers=0)}
+        assert "compresión" in errores["bomba.xml"]
+        assert errores["normal.xml"] is None
+
+    def test_demasiados_miembros(self, zip_cfdis, monkeypatch):
+        monkeypatch.setattr(cfdi_parser, "CFDI_ZIP_MAX_MIEMBROS", 10)
+        with pytest.raises(CFDIParseError, match="máximo"):
+            list(iterar_cfdis_zip(zip_cfdis, max_workers=0))
+
+    def test_pool_de_procesos_equivale_a_secuencial(self, zip_cfdis):
+        secuencial = list(iterar_cfdis_zip(zip_cfdis, max_workers=0))
+        paralelo = list(iterar_cfdis_zip(zip_cfdis, max_workers=2, tamano_lote=7, lotes_en_vuelo=2))
+        clave = lambda r: r["archivo"]
+        assert sorted(paralelo, key=clave) == sorted(secuencial, key=clave)
+
+    def test_tabla_conciliacion(self, zip_cfdis):
+        pd = pytest.importorskip("pandas")
+        from services.cfdi_parser import registros_a_tabla_conciliacion
+        from services.three_way_match_service import ConciliacionMasivaService
+
+        tabla = registros_a_tabla_conciliacion(list(iterar_cfdis_zip(zip_cfdis, max_workers=0)))
+        assert len(tabla) == 40
+        assert tabla.iloc[0]["monto"] == 105333.33
+
+        resultado = ConciliacionMasivaService().conciliar(
+            cfdis=tabla,
+            pagos=[{"referencia": "SPEI", "rfc": "AAA010101AAA", "monto": 105333.33, "fecha": "2026-01-20"}]
+        )
+        assert resultado["resumen"]["cfdis_con_pago"] == 1
+
+
+@pytest.fixture
+def zip_cfdis_bytes():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("0001.xml", cfdi_40())
+    return buffer.getvalue()
+
+
+class TestRutaImportacion:
+    """Endpoint /api/cfdis/importar-zip"""
+
+    @pytest.fixture
+    def cliente(self, monkeypatch):
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from routes import cfdi_routes
+
+        monkeypatch.setenv("DATABASE_URL", "postgresql://falso")
+        recibidos = []
+
+        async def importar_zip(empresa_id, ruta):
+            recibidos.append(Path(ruta).read_bytes())
+            return {"procesados": 0, "nuevos": 0, "duplicados": 0, "errores": []}
+
+        monkeypatch.setattr(cfdi_routes.cfdi_store_service, "importar_zip", importar_zip)
+        app = FastAPI()
+        app.include_router(cfdi_routes.router)
+        cliente = TestClient(app)
+        cliente.recibidos = recibidos
+        return cliente
+
+    def test_copia_el_zip_completo(self, cliente, zip_cfdis_bytes):
+        r = cliente.post("/api/cfdis/importar-zip", data={"empresa_id": "e1"},
+                         files={"archivo": ("cfdis.zip", zip_cfdis_bytes, "application/zip")})
+        assert r.status_code == 200
+        assert cliente.recibidos == [zip_cfdis_bytes]
+
+    def test_zip_rechazado_es_400(self, cliente, zip_cfdis_bytes, monkeypatch):
+        from routes import cfdi_routes
+
+        async def rechazar(empresa_id, ruta):
+            raise CFDIParseError("El ZIP contiene 11 XMLs; el máximo es 10")
+
+        monkeypatch.setattr(cfdi_routes.cfdi_store_service, "importar_zip", rechazar)
+        r = cliente.post("/api/cfdis/importar-zip", data={"empresa_id": "e1"},
+                         files={"archivo": ("cfdis.zip", zip_cfdis_bytes, "application/zip")})
+        assert r.status_code == 400
+        assert "máximo" in r.json()["detail"]
+
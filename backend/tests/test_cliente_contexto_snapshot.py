@@ -0,0 +1,190 @@
+"""
+Pruebas Unitarias: Snapshot de contexto por cliente - Revisar.IA
+Verifica lectura en una sola consulta con LRU por versión, invalidación
+al escribir, proyecciones por agente desde un snapshot y aislamiento por empresa
+"""
+
+import json
+import pytest
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import asyncpg
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.cliente_contexto_service import ClienteContextoService
+from services.deliberation_orchestrator import STAGE_TO_AGENT
+
+AGENTES = list(STAGE_TO_AGENT.values())
+AHORA = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class BDFalsa:
+    """Tablas de clientes en memoria; `escribir` simula los triggers de versión."""
+
+    def __init__(self, con_snapshots=True):
+        self.con_snapshots = con_snapshots
+        self.consultas = []
+        self.snapshots = {}
+        self.cliente = {
+            "id": 7, "nombre": "ACME", "rfc": "ACM010101AAA", "razon_social": "ACME SA de CV",
+            "direccion": None, "email": None, "telefono": None, "giro": "Manufactura",
+            "regimen_fiscal": "601", "tipo_persona": "moral", "actividad_economica": None,
+            "estado": "activo", "notas_internas": None, "empresa_id": "emp1",
+            "created_at": AHORA, "updated_at": AHORA,
+        }
+        self.documentos = [
+            {"nombre_archivo": "acta.pdf", "tipo_documento": "Acta", "categoria": None, "subcategoria": None,
+             "resumen_ia": "Acta constitutiva", "fecha_documento": None, "fecha_vigencia_fin": None,
+             "version": 1, "es_version_actual": True, "created_at": AHORA},
+        ]
+        self.interacciones = [
+            {"agente_id": agente, "agente_nombre": agente, "tipo": "consulta",
+             "pregunta_usuario": f"pregunta para {agente}", "respuesta_agente": "ok",
+             "hallazgos": json.dumps({"decision": "approve"}), "recomendaciones": None,
+             "alertas": None, "fue_util": True, "created_at": AHORA - timedelta(minutes=i)}
+            for i, agente in enumerate(AGENTES)
+        ]
+        self.historial = []
+
+    def escribir(self, **cambios):
+        self.cliente.update(cambios)
+        fila = self.snapshots.setdefault(7, {"version": 0, "snapshot": None, "snapshot_version": None})
+        fila["version"] += 1
+
+    # --- API de conexión asyncpg ---
+
+    async def fetchrow(self, sql, *args):
+        if "FROM clientes_contexto_snapshot" in sql:
+            self.consultas.append("snapshot")
+            if not self.con_snapshots:
+                raise asyncpg.exceptions.UndefinedTableError("no existe")
+            fila = self.snapshots.get(args[0])
+            if fila is None:
+                return None
+            vigente = fila["snapshot_version"] == fila["version"] and fila["version"] != args[1]
+            return {"version": fila["version"], "snapshot": fila["snapshot"] if vigente else None}
+        if "FROM clientes_contexto" in sql:
+            self.consultas.append("contexto_evolutivo")
+            return None
+        self.consultas.append("cliente")
+        return dict(self.cliente) if args[0] == self.cliente["id"] else None
+
+    async def fetch(self, sql, *args):
+        if "clientes_documentos" in sql:
+            self.consultas.append("documentos")
+            return self.documentos
+        if "clientes_interacciones" in sql:
+            self.consultas.append("interacciones")
+            if len(args) == 3:
+                return [i for i in self.interacciones if i["agente_id"] == args[1]]
+            return self.interacciones
+        self.consultas.append("historial")
+        return self.historial
+
+    async def fetchval(self, sql, cliente_id):
+        self.consultas.append("crear_version")
+        fila = self.snapshots.setdefault(cliente_id, {"version": 1, "snapshot": None, "snapshot_version": None})
+        return fila["version"]
+
+    async def execute(self, sql, cliente_id, snapshot, version, empresa_id):
+        self.consultas.append("guardar_snapshot")
+        fila = self.snapshots[cliente_id]
+        if fila["version"] == version:
+            fila.update(snapshot=snapshot, snapshot_version=version)
+
+    def acquire(self):
+        bd = self
+
+        class Adquisicion:
+            async def __aenter__(self):
+                return bd
+
+            async def __aexit__(self, *_):
+                pass
+
+        return Adquisicion()
+
+
+def servicio_con(bd):
+    servicio = ClienteContextoService()
+    servicio._pool = bd
+    return servicio
+
+
+class TestSnapshotContexto:
+
+    @pytest.mark.asyncio
+    async def test_deliberacion_lee_una_vez(self):
+        bd = BDFalsa()
+        servicio = servicio_con(bd)
+
+        contextos = await servicio.get_contextos_para_agentes(7, AGENTES)
+        assert set(contextos) == set(AGENTES)
+        assert bd.consultas == [
+            "snapshot", "crear_version", "cliente", "documentos",
+            "interacciones", "historial", "contexto_evolutivo", "guardar_snapshot",
+        ]
+        for agente in AGENTES:
+            assert f"pregunta para {agente}" in contextos[agente]
+            otros = [a for a in AGENTES if a != agente]
+            assert not any(f"pregunta para {a}" in contextos[agente] for a in otros)
+
+        bd.consultas.clear()
+        await servicio.get_contextos_para_agentes(7, AGENTES)
+        for agente in AGENTES:
+            await servicio.get_contexto_para_agente(7, agente)
+        assert bd.consultas == ["snapshot"] * (1 + len(AGENTES))
+        assert servicio.stats["lru_hits"] == 1 + len(AGENTES)
+
+    @pytest.mark.asyncio
+    async def test_otro_proceso_usa_el_snapshot_guardado(self):
+        bd = BDFalsa()
+        await servicio_con(bd).get_contextos_para_agentes(7, AGENTES)
+
+        bd.consultas.clear()
+        otro = servicio_con(bd)
+        contextos = await otro.get_contextos_para_agentes(7, AGENTES)
+        assert bd.consultas == ["snapshot"]
+        assert otro.stats["db_hits"] == 1
+        assert "[Acta] acta.pdf (v1) - 2026-03-01" in contextos[AGENTES[0]]
+
+    @pytest.mark.asyncio
+    async def test_escritura_invalida_el_snapshot(self):
+        bd = BDFalsa()
+        servicio = servicio_con(bd)
+        await servicio.get_contexto_para_agente(7, AGENTES[0])
+
+        bd.escribir(giro="Servicios")
+        bd.consultas.clear()
+        contexto = await servicio.get_contexto_para_agente(7, AGENTES[0])
+        assert "Giro: Servicios" in contexto
+        assert bd.consultas[-1] == "guardar_snapshot"
+        assert "crear_version" not in bd.consultas
+
+    @pytest.mark.asyncio
+    async def test_empresa_distinta_no_ve_el_cliente(self):
+        servicio = servicio_con(BDFalsa())
+        contexto = await servicio.get_contexto_para_agente(7, AGENTES[0], empresa_id="emp2")
+        assert contexto.startswith("[ERROR]")
+        assert (await servicio.get_contexto_para_agente(7, AGENTES[0], empresa_id="emp1")).startswith("=")
+
+    @pytest.mark.asyncio
+    async def test_sin_migracion_lee_las_tablas(self):
+        bd = BDFalsa(con_snapshots=False)
+        servicio = servicio_con(bd)
+        contextos = await servicio.get_contextos_para_agentes(7, AGENTES)
+        assert all(f"pregunta para {a}" in contextos[a] for a in AGENTES)
+        assert bd.consultas.count("cliente") == 1
+
+        bd.consultas.clear()
+        await servicio.get_contexto_para_agente(7, AGENTES[0])
+        assert bd.consultas == ["cliente", "documentos", "interacciones", "historial", "contexto_evolutivo"]
+
+    @pytest.mark.asyncio
+    async def test_cliente_inexistente(self):
+        servicio = servicio_con(BDFalsa())
+        contextos = await servicio.get_contextos_para_agentes(99, AGENTES[:2])
+        assert all(c.startswith("[ERROR]") for c in contextos.values())
@@ -0,0 +1,409 @@
+"""
+Pruebas Unitarias: Agregados persistentes del Abogado del Diablo - Revisar.IA
+Verifica que huellas, perfiles, lecciones y contadores sobreviven un reinicio,
+que cerrar una huella cuesta O(1) sin importar el historial, que dos workers
+comparten perfiles y que sin la migración el servicio opera en memoria
+"""
+
+import json
+import statistics
+import time
+import pytest
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import asyncpg
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import services.devils_advocate_service as da
+from services.devils_advocate_service import (
+    CategoriaIndustria, DevilsAdvocateService, FaseProyecto, NivelRiesgoResidual, contribucion_huella,
+)
+from services.devils_advocate_store import DevilsAdvocateStore
+
+
+class StoreEnMemoria:
+    """Misma API que DevilsAdvocateStore; guarda JSON como lo haría PostgreSQL."""
+
+    def __init__(self, sin_tablas=False):
+        self.sin_tablas = sin_tablas
+        self.huellas = {}
+        self.perfiles = {}
+        self.lecciones = {}
+        self.contadores = {}
+        self.llamadas = []
+
+    def _registrar(self, metodo, *args):
+        if self.sin_tablas:
+            raise asyncpg.exceptions.UndefinedTableError("no existe")
+        self.llamadas.append((metodo, len(json.dumps(args, default=str))))
+
+    def _sumar(self, delta):
+        for nombre, valor in (delta or {}).items():
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + valor
+
+    async def cargar_agregados(self):
+        self._registrar("cargar_agregados")
+        return {
+            "contadores": dict(self.contadores),
+            "perfiles": [json.loads(p) for p in self.perfiles.values()],
+            "lecciones": [json.loads(l) for l in self.lecciones.values()],
+        }
+
+    async def cargar(self):
+        datos = await self.cargar_agregados()
+        datos["huellas"] = [
+            json.loads(h) for h in self.huellas.values() if json.loads(h)["resultado_final"] == "en_proceso"
+        ]
+        return datos
+
+    async def obtener_huella(self, proyecto_id):
+        self._registrar("obtener_huella", proyecto_id)
+        datos = self.huellas.get(proyecto_id)
+        return json.loads(datos) if datos is not None else None
+
+    async def registrar_huella(self, datos, contribucion):
+        self._registrar("registrar_huella", datos)
+        delta = dict(contribucion(datos))
+        previa = self.huellas.get(datos["proyecto_id"])
+        if previa is not None:
+            for nombre, valor in contribucion(json.loads(previa)).items():
+                delta[nombre] -= valor
+        self.huellas[datos["proyecto_id"]] = json.dumps(datos)
+        self._sumar(delta)
+
+    async def agregar_a_huella(self, proyecto_id, campo, valor, delta=None):
+        self._registrar("agregar_a_huella", proyecto_id, campo, valor, delta)
+        if proyecto_id not in self.huellas:
+            return False
+        datos = json.loads(self.huellas[proyecto_id])
+        datos.setdefault(campo, []).append(valor)
+        self.huellas[proyecto_id] = json.dumps(datos)
+        self._sumar(delta)
+        return True
+
+    async def actualizar_huella(self, proyecto_id, campos, delta=None):
+        self._registrar("actualizar_huella", proyecto_id, campos, delta)
+        if proyecto_id not in self.huellas:
+            return False
+        self.huellas[proyecto_id] = json.dumps({**json.loads(self.huellas[proyecto_id]), **campos})
+        self._sumar(delta)
+        return True
+
+    async def acumular_perfil(self, industria, tipo_servicio, rango_monto, aprobado, score, evidencias):
+        self._registrar("acumular_perfil", industria, tipo_servicio, rango_monto, aprobado, score, evidencias)
+        clave = (industria, tipo_servicio, rango_monto)
+        perfil = json.loads(self.perfiles.get(clave, "null")) or {
+            "industria": industria, "tipo_servicio": tipo_servicio, "rango_monto": rango_monto,
+            "total_casos": 0, "casos_aprobados": 0, "casos_rechazados": 0,
+            "suma_score_aprobados": 0.0, "casos_con_score": 0, "evidencias_minimas": [],
+            "objeciones_frecuentes": [], "patrones_exito": [], "alertas": [],
+        }
+        perfil["total_casos"] += 1
+        perfil["casos_aprobados"] += int(aprobado)
+        perfil["casos_rechazados"] += 1 - int(aprobado)
+        if score is not None:
+            perfil["suma_score_aprobados"] += score
+            perfil["casos_con_score"] += 1
+        perfil["evidencias_minimas"] += [e for e in evidencias if e not in perfil["evidencias_minimas"]]
+        perfil["updated_at"] = datetime.now(timezone.utc).isoformat()
+        self.perfiles[clave] = json.dumps(perfil)
+        return perfil
+
+    async def guardar_leccion(self, leccion, origen="automatico"):
+        self._registrar("guardar_leccion", leccion)
+        if leccion["id"] in self.lecciones:
+            return False
+        self.lecciones[leccion["id"]] = json.dumps(leccion)
+        return True
+
+
+def abrir(servicio, proyecto_id, monto=100000, industria=CategoriaIndustria.RETAIL, tipo="marketing"):
+    return servicio.registrar_huella_proyecto(proyecto_id, "emp1", industria, tipo, monto, "AAA010101AAA", "admin")
+
+
+def ciclo_completo(servicio, proyecto_id, resultado="aprobado", score=85.0):
+    abrir(servicio, proyecto_id)
+    servicio.registrar_scores_fase(proyecto_id, FaseProyecto.F2_CANDADO, 80, 75, 90, score)
+    servicio.registrar_cambio_semaforo(
+        proyecto_id, FaseProyecto.F2_CANDADO, "amarillo", "verde", 60, score, "A3_FISCAL",
+        ["contrato_detallado", "entregables"], "Se integraron entregables", "v2"
+    )
+    servicio.registrar_respuesta_pregunta(proyecto_id, "materialidad", "¿Existe?", "Sí", ["fotos"], "CFF_69B")
+    servicio.registrar_riesgo_residual(proyecto_id, "Proveedor nuevo", NivelRiesgoResidual.ALTO, "j", "m", "admin")
+    return servicio.cerrar_huella_proyecto(proyecto_id, resultado)
+
+
+def estadisticas(servicio):
+    datos = servicio.obtener_estadisticas_globales()
+    datos.pop("ultima_actualizacion")
+    return datos
+
+
+class TestPersistencia:
+
+    @pytest.mark.asyncio
+    async def test_agregados_sobreviven_reinicio(self):
+        store = StoreEnMemoria()
+        servicio = DevilsAdvocateService(store=store)
+        ciclo_completo(servicio, "P1")
+        ciclo_completo(servicio, "P2", resultado="rechazado")
+        ciclo_completo(servicio, "P3", score=95.0)
+        abrir(servicio, "P4", monto=3_000_000)
+        servicio.registrar_riesgo_residual("P4", "Sin entregables", NivelRiesgoResidual.MEDIO, "j", "m", "admin")
+        servicio.registrar_leccion_manual(
+            "Pedir minutas", "d", CategoriaIndustria.RETAIL, "marketing", "materialidad",
+            "CFF_69B", "c", "p", "s", ["siempre"], "admin"
+        )
+        assert await servicio.sincronizar() == len(store.llamadas)
+
+        reiniciado = DevilsAdvocateService(store=store)
+        assert await reiniciado.precargar()
+
+        assert estadisticas(reiniciado) == estadisticas(servicio)
+        assert estadisticas(reiniciado)["resumen"]["total_proyectos_monitoreados"] == 4
+        assert reiniciado._huellas == {"P4": servicio._huellas["P4"]}
+        assert set(reiniciado._lecciones) == set(servicio._lecciones)
+
+        perfil = reiniciado.obtener_perfil_riesgo(CategoriaIndustria.RETAIL, "marketing", 100000)
+        assert (perfil.total_casos, perfil.casos_aprobados, perfil.casos_rechazados) == (3, 2, 1)
+        assert perfil.score_promedio_aprobados == 90.0
+        assert perfil.evidencias_minimas == ["contrato_detallado", "entregables"]
+
+        # La huella en curso sigue recibiendo eventos después del reinicio
+        assert reiniciado.registrar_respuesta_pregunta("P4", "formal", "¿CFDI?", "Sí", [], "CFF_29") is not None
+        reiniciado.cerrar_huella_proyecto("P4", "aprobado")
+        await reiniciado.sincronizar()
+        assert json.loads(store.huellas["P4"])["resultado_final"] == "aprobado"
+        assert len(json.loads(store.huellas["P4"])["preguntas_respondidas"]) == 1
+
+    @pytest.mark.asyncio
+    async def test_huella_en_curso_se_recarga_en_instancia_nueva(self):
+        """Sin precargar (otro worker o reinicio): la huella se lee de la BD al usarla"""
+        store = StoreEnMemoria()
+        servicio = DevilsAdvocateService(store=store)
+        abrir(servicio, "P1")
+        servicio.registrar_respuesta_pregunta("P1", "materialidad", "¿Existe?", "Sí", ["fotos"], "CFF_69B")
+        await servicio.sincronizar()
+
+        otro = DevilsAdvocateService(store=store)
+        assert otro.registrar_respuesta_pregunta("P1", "formal", "¿CFDI?", "Sí", [], "CFF_29") is None
+
+        huella = await otro.cargar_huella("P1")
+        assert huella is not None and huella.resultado_final == "en_proceso"
+        assert len(huella.preguntas_respondidas) == 1
+        assert otro.registrar_respuesta_pregunta("P1", "formal", "¿CFDI?", "Sí", [], "CFF_29") is not None
+        otro.cerrar_huella_proyecto("P1", "aprobado")
+        await otro.sincronizar()
+
+        datos = json.loads(store.huellas["P1"])
+        assert datos["resultado_final"] == "aprobado"
+        assert len(datos["preguntas_respondidas"]) == 2
+
+    @pytest.mark.asyncio
+    async def test_cargar_huella_inexistente_o_en_memoria(self):
+        store = StoreEnMemoria()
+        servicio = DevilsAdvocateService(store=store)
+        assert await servicio.cargar_huella("NO_EXISTE") is None
+
+        abrir(servicio, "P1")
+        llamadas = len(store.llamadas)
+        assert await servicio.cargar_huella("P1") is servicio._huellas["P1"]
+        assert len(store.llamadas) == llamadas  # en memoria: no consulta la BD
+
+    @pytest.mark.asyncio
+    async def test_huella_cerrada_fuera_del_lru_se_recarga(self, monkeypatch):
+        monkeypatch.setattr(da, "HUELLAS_CERRADAS_MAX", 1)
+        store = StoreEnMemoria()
+        servicio = DevilsAdvocateService(store=store)
+        ciclo_completo(servicio, "P1")
+        ciclo_completo(servicio, "P2")
+        await servicio.sincronizar()
+        assert "P1" not in servicio._huellas_cerradas
+
+        huella = await servicio.cargar_huella("P1")
+        assert huella.resultado_final == "aprobado"
+        assert list(servicio._huellas_cerradas) == ["P1"]
+        assert "P1" not in servicio._huellas
+
+    @pytest.mark.asyncio
+    async def test_contadores_coinciden_con_recalcular(self):
+        store = StoreEnMemoria()
+        servicio = DevilsAdvocateService(store=store)
+        for i in range(30):
+            ciclo_completo(servicio, f"P{i}", resultado="aprobado" if i % 3 else "rechazado")
+        abrir(servicio, "P5")                         # reemplaza una huella cerrada
+        ciclo_completo(servicio, "P7", "rechazado")   # reemplaza y vuelve a cerrar
+        servicio.cerrar_huella_proyecto("P8", "rechazado")  # cierre repetido
+        servicio.registrar_incidente_sat("P9", "Revisión", "revision", 1000.0, datetime(2026, 1, 1))
+        await servicio.sincronizar()
+
+        recalculado = {}
+        for datos in store.huellas.values():
+            for nombre, valor in contribucion_huella(json.loads(datos)).items():
+                recalculado[nombre] = recalculado.get(nombre, 0) + valor
+        assert store.contadores == recalculado
+        assert servicio._contadores == recalculado
+
+    @pytest.mark.asyncio
+    async def test_dos_workers_comparten_perfiles(self):
+        store = StoreEnMemoria()
+        uno, otro = DevilsAdvocateService(store=store), DevilsAdvocateService(store=store)
+        ciclo_completo(uno, "A1")
+        await uno.sincronizar()
+        ciclo_completo(otro, "B1", resultado="rechazado")
+        await otro.sincronizar()
+
+        # El UPSERT devuelve el perfil con lo que sumó el otro worker
+        perfil = otro.obtener_perfil_riesgo(CategoriaIndustria.RETAIL, "marketing", 100000)
+        assert (perfil.total_casos, perfil.casos_rechazados) == (2, 1)
+
+        # Los contadores de cada worker incluyen a los demás después de refrescar
+        assert estadisticas(otro)["resumen"]["total_proyectos_monitoreados"] == 1
+        assert await uno.refrescar()
+        assert uno.obtener_perfil_riesgo(CategoriaIndustria.RETAIL, "marketing", 100000).total_casos == 2
+        assert estadisticas(uno)["resumen"]["total_proyectos_monitoreados"] == 2
+
+        ciclo_completo(otro, "B2")
+        await otro.sincronizar()
+        assert not await uno.refrescar()  # todavía fresco
+        assert await uno.refrescar(max_edad=0)
+        assert uno.obtener_perfil_riesgo(CategoriaIndustria.RETAIL, "marketing", 100000).total_casos == 3
+
+    @pytest.mark.asyncio
+    async def test_incidente_en_huella_fuera_del_cache(self, monkeypatch):
+        monkeypatch.setattr(da, "HUELLAS_CERRADAS_MAX", 2)
+        store = StoreEnMemoria()
+        servicio = DevilsAdvocateService(store=store)
+        for i in range(5):
+            ciclo_completo(servicio, f"P{i}")
+        assert list(servicio._huellas_cerradas) == ["P3", "P4"]
+
+        servicio.registrar_incidente_sat("P0", "Revisión", "revision", 5000.0, datetime(2026, 2, 1))
+        await servicio.sincronizar()
+        riesgos = json.loads(store.huellas["P0"])["riesgos_residuales"]
+        assert riesgos[-1]["descripcion"] == "INCIDENTE SAT: Revisión"
+
+        await servicio.refrescar(max_edad=0)
+        assert estadisticas(servicio)["cuestionamientos"]["riesgos_criticos"] == 6
+
+    @pytest.mark.asyncio
+    async def test_sin_migracion_opera_en_memoria(self):
+        servicio = DevilsAdvocateService(store=StoreEnMemoria(sin_tablas=True))
+        ciclo_completo(servicio, "P1")
+        assert await servicio.sincronizar() == 0
+        assert servicio._store is None
+        assert not await servicio.precargar()
+        assert estadisticas(servicio)["resumen"]["proyectos_aprobados"] == 1
+
+    @pytest.mark.asyncio
+    async def test_error_de_escritura_no_detiene_las_siguientes(self):
+        store = StoreEnMemoria()
+        servicio = DevilsAdvocateService(store=store)
+
+        async def falla(*args):
+            raise ConnectionError("sin conexión")
+
+        store.guardar_leccion = falla
+        ciclo_completo(servicio, "P1")
+        await servicio.sincronizar()
+        assert servicio.stats["errores_escritura"] == 1
+        assert json.loads(store.huellas["P1"])["resultado_final"] == "aprobado"
+
+
+class ConteoIteraciones(dict):
+    """dict que cuenta cuántas veces se recorre."""
+
+    recorridos = 0
+
+    def values(self):
+        ConteoIteraciones.recorridos += 1
+        return super().values()
+
+    def items(self):
+        ConteoIteraciones.recorridos += 1
+        return super().items()
+
+    def __iter__(self):
+        ConteoIteraciones.recorridos += 1
+        return super().__iter__()
+
+
+class TestCostoConstante:
+
+    @staticmethod
+    async def costo_de_cerrar(historial: int):
+        """Llamadas al store y tiempo de cerrar huellas con `historial` casos previos en el perfil."""
+        store = StoreEnMemoria()
+        servicio = DevilsAdvocateService(store=store)
+        for i in range(historial):
+            ciclo_completo(servicio, f"H{i}")
+        await servicio.sincronizar()
+        servicio._huellas = ConteoIteraciones(servicio._huellas)
+        ConteoIteraciones.recorridos = 0
+
+        tiempos = []
+        for i in range(200):
+            abrir(servicio, f"N{i}")
+            servicio.registrar_scores_fase(f"N{i}", FaseProyecto.F2_CANDADO, 80, 75, 90, 88)
+            await servicio.sincronizar()
+            store.llamadas.clear()
+            inicio = time.perf_counter()
+            servicio.cerrar_huella_proyecto(f"N{i}", "aprobado")
+            servicio.obtener_estadisticas_globales()
+            tiempos.append(time.perf_counter() - inicio)
+            await servicio.sincronizar()
+        return store.llamadas, statistics.median(tiempos), ConteoIteraciones.recorridos
+
+    @pytest.mark.asyncio
+    async def test_actualizar_perfil_no_depende_del_historial(self):
+        llamadas_poco, t_poco, recorridos_poco = await self.costo_de_cerrar(10)
+        llamadas_mucho, t_mucho, recorridos_mucho = await self.costo_de_cerrar(3000)
+
+        print(f"\ncerrar huella: historial 10 -> {t_poco * 1e6:.1f} us, historial 3000 -> {t_mucho * 1e6:.1f} us")
+        # Mismas escrituras, del mismo tamaño, y nunca se recorren las huellas
+        assert llamadas_poco == llamadas_mucho
+        assert [m for m, _ in llamadas_mucho] == ["actualizar_huella", "acumular_perfil"]
+        assert recorridos_poco == recorridos_mucho == 0
+        assert t_mucho < t_poco * 3
+
+    @pytest.mark.asyncio
+    async def test_acumular_perfil_es_un_solo_upsert(self):
+        sentencias = []
+
+        class Conexion:
+            async def fetchrow(self, sql, *args):
+                sentencias.append((sql, args))
+                return {
+                    "industria": "retail", "tipo_servicio": "marketing", "rango_monto": "<500k",
+                    "total_casos": 10_001, "casos_aprobados": 9_000, "casos_rechazados": 1_001,
+                    "suma_score_aprobados": 765_000.0, "casos_con_score": 9_000,
+                    "evidencias_minimas": '["contrato"]', "objeciones_frecuentes": "[]",
+                    "patrones_exito": "[]", "alertas": "[]", "updated_at": datetime.now(timezone.utc),
+                }
+
+        class Pool:
+            def acquire(self):
+                class Adquisicion:
+                    async def __aenter__(self):
+                        return Conexion()
+
+                    async def __aexit__(self, *_):
+                        pass
+
+                return Adquisicion()
+
+        store = DevilsAdvocateStore()
+        store._pool = Pool()
+        perfil = await store.acumular_perfil("retail", "marketing", "<500k", True, 88.0, ["contrato"])
+
+        assert len(sentencias) == 1
+        sql, args = sentencias[0]
+        assert "ON CONFLICT (industria, tipo_servicio, rango_monto) DO UPDATE" in sql
+        assert "total_casos = p.total_casos + 1" in sql
+        assert "abogado_diablo_huellas" not in sql
+        assert args == ("retail", "marketing", "<500k", 1, 88.0, 1, '["contrato"]')
+        assert perfil["evidencias_minimas"] == ["contrato"]
+        assert da.perfil_desde_dict(perfil).score_promedio_aprobados == 85.0
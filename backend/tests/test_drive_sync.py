@@ -0,0 +1,526 @@
+"""
+Tests de la sincronización incremental de Drive (services/drive_sync_service.py).
+
+La API de Drive es un servidor falso en memoria detrás del cliente real de
+googleapiclient (build(..., http=FakeDrive)): las peticiones pasan por el
+mismo armado de URLs que en producción y se cuentan por endpoint. El
+vector store es un RagRepository real sobre Chroma en un directorio
+temporal, con embeddings deterministas que cuentan los textos embebidos.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from googleapiclient.discovery import build
+
+import services.rag_repository as rag_repository
+from services.drive_sync_service import DriveAPI, DriveSyncService
+from services.drive_sync_store import DriveSyncStoreMemoria
+from services.rag_repository import RagRepository
+
+MIME_DOC = "application/vnd.google-apps.document"
+MIME_CARPETA = "application/vnd.google-apps.folder"
+
+
+class FakeDrive:
+    """Drive v3 en memoria con log de cambios; cuenta peticiones y descargas simultáneas."""
+
+    def __init__(self, demora: float = 0.0, tamano_pagina: int = 1000):
+        self.archivos = {}
+        self.log = []
+        self.peticiones = Counter()
+        self.demora = demora
+        self.tamano_pagina = tamano_pagina
+        self.fallar = set()
+        self.descargas_activas = 0
+        self.max_descargas_activas = 0
+        self._lock = threading.Lock()
+
+    # Mutaciones (cada una agrega un cambio, como Drive)
+
+    def crear(self, file_id, nombre, texto, padre, mime="text/plain"):
+        self.archivos[file_id] = {
+            "id": file_id, "name": nombre, "mimeType": mime, "parents": [padre],
+            "version": "1", "trashed": False, "contenido": texto.encode("utf-8"),
+            "createdTime": "2026-01-01T00:00:00Z",
+        }
+        self.log.append(file_id)
+
+    def crear_carpeta(self, file_id, nombre, padre):
+        self.archivos[file_id] = {
+            "id": file_id, "name": nombre, "mimeType": MIME_CARPETA, "parents": [padre],
+            "version": "1", "trashed": False, "contenido": b"",
+        }
+        self.log.append(file_id)
+
+    def _tocar(self, file_id, **campos):
+        archivo = self.archivos[file_id]
+        archivo.update(campos)
+        archivo["version"] = str(int(archivo["version"]) + 1)
+        self.log.append(file_id)
+
+    def modificar(self, file_id, texto):
+        self._tocar(file_id, contenido=texto.encode("utf-8"))
+
+    def renombrar(self, file_id, nombre):
+        self._tocar(file_id, name=nombre)
+
+    def mover(self, file_id, padre):
+        self._tocar(file_id, parents=[padre])
+
+    def papelera(self, file_id):
+        self._tocar(file_id, trashed=True)
+
+    def eliminar(self, file_id):
+        del self.archivos[file_id]
+        self.log.append(file_id)
+
+    # Servidor
+
+    def _metadatos(self, archivo):
+        datos = {k: v for k, v in archivo.items() if k != "contenido"}
+        if not archivo["mimeType"].startswith("application/vnd.google-apps."):
+            datos["md5Checksum"] = hashlib.md5(archivo["contenido"]).hexdigest()
+        return datos
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=None, connection_type=None):
+        url = urlparse(uri)
+        qs = {k: v[0] for k, v in parse_qs(url.query).items()}
+        ruta = url.path.replace("/drive/v3/", "")
+
+        if ruta.endswith("/export") or qs.get("alt") == "media":
+            return self._descargar(ruta.split("/")[1])
+
+        with self._lock:
+            if ruta == "changes/startPageToken":
+                self.peticiones["startPageToken"] += 1
+                return self._json({"startPageToken": str(len(self.log))})
+            if ruta == "changes":
+                self.peticiones["changes"] += 1
+                inicio = int(qs["pageToken"])
+                fin = min(inicio + self.tamano_pagina, len(self.log))
+                cambios = []
+                for file_id in self.log[inicio:fin]:
+                    if file_id in self.archivos:
+                        cambios.append({"fileId": file_id, "removed": False,
+                                        "file": self._metadatos(self.archivos[file_id])})
+                    else:
+                        cambios.append({"fileId": file_id, "removed": True})
+                pagina = {"changes": cambios}
+                if fin < len(self.log):
+                    pagina["nextPageToken"] = str(fin)
+                else:
+                    pagina["newStartPageToken"] = str(len(self.log))
+                return self._json(pagina)
+            if ruta == "files":
+                self.peticiones["files.list"] += 1
+                padre = re.match(r"'([^']+)' in parents", qs["q"]).group(1)
+                hijos = [
+                    self._metadatos(a) for a in self.archivos.values()
+                    if padre in a["parents"] and not a["trashed"]
+                ]
+                inicio = int(qs.get("pageToken", 0))
+                fin = inicio + min(int(qs["pageSize"]), self.tamano_pagina)
+                pagina = {"files": hijos[inicio:fin]}
+                if fin < len(hijos):
+                    pagina["nextPageToken"] = str(fin)
+                return self._json(pagina)
+        raise AssertionError(f"Endpoint no simulado: {method} {uri}")
+
+    def _descargar(self, file_id):
+        with self._lock:
+            self.peticiones["descargas"] += 1
+            self.descargas_activas += 1
+            self.max_descargas_activas = max(self.max_descargas_activas, self.descargas_activas)
+        try:
+            time.sleep(self.demora)
+            if file_id in self.fallar:
+                return httplib2.Response({"status": "404"}), b'{"error": {"code": 404, "message": "no"}}'
+            return httplib2.Response({"status": "200"}), self.archivos[file_id]["contenido"]
+        finally:
+            with self._lock:
+                self.descargas_activas -= 1
+
+    @staticmethod
+    def _json(datos):
+        return httplib2.Response({"status": "200", "content-type": "application/json"}), json.dumps(datos).encode()
+
+    def reiniciar_conteo(self):
+        self.peticiones.clear()
+
+
+def texto(tema: str) -> str:
+    return f"Contrato de servicios de {tema}. " * 6
+
+
+def fragmentar(texto: str):
+    return [texto[i:i + 80] for i in range(0, len(texto), 80)]
+
+
+class EmbeddingsFalsos:
+    """Embeddings deterministas; cuenta textos y lotes simultáneos."""
+
+    def __init__(self, demora: float = 0.0):
+        self.textos = 0
+        self.demora = demora
+        self.activos = 0
+        self.max_activos = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, textos):
+        with self._lock:
+            self.textos += len(textos)
+            self.activos += 1
+            self.max_activos = max(self.max_activos, self.activos)
+        time.sleep(self.demora)
+        with self._lock:
+            self.activos -= 1
+        return [[float(len(t) % 7), 1.0, float(sum(map(ord, t)) % 13)] for t in textos]
+
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    falsos = EmbeddingsFalsos()
+    monkeypatch.setattr(rag_repository, "_embed_batch", falsos)
+    return falsos
+
+
+@pytest.fixture
+def repo(tmp_path):
+    return RagRepository(persist_dir=str(tmp_path / "chroma"), collection_prefix=f"t{uuid.uuid4().hex[:8]}_")
+
+
+@pytest.fixture
+def drive():
+    fake = FakeDrive()
+    fake.crear_carpeta("raiz", "A1", "root")
+    fake.crear("f1", "contrato.txt", texto("consultoría"), "raiz")
+    fake.crear("d1", "Minuta", texto("auditoría"), "raiz", mime=MIME_DOC)
+    fake.crear_carpeta("sub", "Entregables", "raiz")
+    fake.crear("f2", "entregable.txt", texto("capacitación"), "sub")
+    fake.crear_carpeta("borr", "Borradores", "raiz")
+    fake.crear("f3", "borrador.txt", texto("borrador"), "borr")
+    fake.crear("f4", "corto.txt", "breve", "raiz")
+    return fake
+
+
+def api_de(fake: FakeDrive) -> DriveAPI:
+    return DriveAPI(build("drive", "v3", http=fake, static_discovery=True, cache_discovery=False))
+
+
+def chunks_por_archivo(repo: RagRepository, agent_id: str = "A1_SPONSOR"):
+    datos = repo._get_collection(agent_id).get(include=["metadatas"])
+    return Counter(m["file_id"] for m in datos["metadatas"])
+
+
+def titulos(repo: RagRepository, file_id: str, agent_id: str = "A1_SPONSOR"):
+    datos = repo._get_collection(agent_id).get(where={"file_id": file_id}, include=["metadatas"])
+    return {m["doc_title"] for m in datos["metadatas"]}
+
+
+@pytest.fixture
+def servicio(repo, embeddings):
+    return DriveSyncService(repo, fragmentar=fragmentar, store=DriveSyncStoreMemoria())
+
+
+async def primera_sync(servicio, drive):
+    api = api_de(drive)
+    resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+    drive.reiniciar_conteo()
+    return api, resumen
+
+
+class TestPrimeraSincronizacion:
+    """Sin token guardado: listado completo y diff contra el estado vacío"""
+
+    @pytest.mark.asyncio
+    async def test_ingiere_arbol_respetando_exclusiones(self, servicio, drive, repo, embeddings):
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api_de(drive))
+
+        assert resumen["success"] and resumen["modo"] == "completo"
+        assert resumen["agregados"] == 3
+        assert resumen["omitidos"] == 1  # corto.txt
+        por_archivo = chunks_por_archivo(repo)
+        assert set(por_archivo) == {"f1", "d1", "f2"}
+        assert resumen["chunks_added"] == sum(por_archivo.values()) == embeddings.textos
+        # token + un listado por carpeta (raíz y Entregables) + una descarga por archivo
+        assert drive.peticiones == Counter({"startPageToken": 1, "files.list": 2, "descargas": 4})
+
+    @pytest.mark.asyncio
+    async def test_metadatos_compatibles_con_ingesta_anterior(self, servicio, drive, repo):
+        await servicio.sincronizar("A1_SPONSOR", "raiz", api_de(drive))
+
+        datos = repo._get_collection("A1_SPONSOR").get(where={"file_id": "d1"}, include=["metadatas"])
+        meta = datos["metadatas"][0]
+        assert meta["doc_title"] == "Minuta"
+        assert meta["source"] == "google_drive"
+        assert meta["web_view_link"] == "https://docs.google.com/document/d/d1/view"
+        assert meta["total_chunks"] == len(datos["ids"])
+
+    @pytest.mark.asyncio
+    async def test_listado_paginado(self, servicio, repo):
+        fake = FakeDrive(tamano_pagina=2)
+        fake.crear_carpeta("raiz", "A1", "root")
+        for i in range(5):
+            fake.crear(f"p{i}", f"doc{i}.txt", texto(f"tema {i}"), "raiz")
+
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api_de(fake))
+
+        assert resumen["agregados"] == 5
+        assert fake.peticiones["files.list"] == 3
+
+
+class TestSincronizacionIncremental:
+    """Con token: solo changes.list y lo que cambió"""
+
+    @pytest.mark.asyncio
+    async def test_sin_cambios_cuesta_una_peticion(self, servicio, drive, repo, embeddings):
+        api, _ = await primera_sync(servicio, drive)
+        embebidos, antes = embeddings.textos, chunks_por_archivo(repo)
+
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+
+        assert resumen["success"] and resumen["modo"] == "incremental"
+        assert drive.peticiones == Counter({"changes": 1})
+        assert embeddings.textos == embebidos
+        assert chunks_por_archivo(repo) == antes
+        assert resumen["docs_processed"] == resumen["chunks_added"] == 0
+
+    @pytest.mark.asyncio
+    async def test_modificacion_reemplaza_solo_ese_archivo(self, servicio, drive, repo, embeddings):
+        api, _ = await primera_sync(servicio, drive)
+        embebidos, antes = embeddings.textos, chunks_por_archivo(repo)
+        drive.modificar("f1", "Adenda al contrato de consultoría. " * 2)
+
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+
+        assert resumen["modificados"] == 1 and resumen["agregados"] == 0
+        assert drive.peticiones == Counter({"changes": 1, "descargas": 1})
+        despues = chunks_por_archivo(repo)
+        assert despues["f1"] == 1 < antes["f1"]  # sin chunks huérfanos de la versión larga
+        assert {k: v for k, v in despues.items() if k != "f1"} == {k: v for k, v in antes.items() if k != "f1"}
+        assert embeddings.textos == embebidos + 1
+
+    @pytest.mark.asyncio
+    async def test_renombrar_binario_no_descarga_ni_embebe(self, servicio, drive, repo, embeddings):
+        api, _ = await primera_sync(servicio, drive)
+        embebidos = embeddings.textos
+        drive.renombrar("f1", "contrato_firmado.txt")
+
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+
+        assert resumen["renombrados"] == 1
+        assert drive.peticiones == Counter({"changes": 1})
+        assert embeddings.textos == embebidos
+        assert titulos(repo, "f1") == {"contrato_firmado.txt"}
+
+    @pytest.mark.asyncio
+    async def test_google_doc_con_mismo_texto_no_reembebe(self, servicio, drive, repo, embeddings):
+        """Los Google Docs no tienen md5: cambia version, se descarga, pero el hash coincide"""
+        api, _ = await primera_sync(servicio, drive)
+        embebidos = embeddings.textos
+        drive.renombrar("d1", "Minuta final")
+
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+
+        assert resumen["sin_cambios"] == 1
+        assert drive.peticiones["descargas"] == 1
+        assert embeddings.textos == embebidos
+        assert titulos(repo, "d1") == {"Minuta final"}
+
+        drive.reiniciar_conteo()
+        await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+        assert drive.peticiones == Counter({"changes": 1})
+
+    @pytest.mark.asyncio
+    async def test_archivo_nuevo_en_subcarpeta(self, servicio, drive, repo):
+        api, _ = await primera_sync(servicio, drive)
+        drive.crear("f5", "anexo.txt", texto("logística"), "sub")
+        drive.crear("f6", "ajeno.txt", texto("otro cliente"), "otra_carpeta")
+
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+
+        assert resumen["agregados"] == 1
+        assert drive.peticiones == Counter({"changes": 1, "descargas": 1})
+        assert "f5" in chunks_por_archivo(repo) and "f6" not in chunks_por_archivo(repo)
+
+    @pytest.mark.asyncio
+    async def test_cambios_paginados(self, servicio, repo):
+        fake = FakeDrive(tamano_pagina=2)
+        fake.crear_carpeta("raiz", "A1", "root")
+        api = api_de(fake)
+        await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+        for i in range(5):
+            fake.crear(f"p{i}", f"doc{i}.txt", texto(f"tema {i}"), "raiz")
+        fake.reiniciar_conteo()
+
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+
+        assert resumen["agregados"] == 5
+        assert fake.peticiones == Counter({"changes": 3, "descargas": 5})
+
+
+class TestEliminaciones:
+    """Lo que sale del árbol se borra del vector store"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("accion", ["eliminar", "papelera", "mover"])
+    async def test_eliminacion_se_propaga(self, servicio, drive, repo, accion):
+        api, _ = await primera_sync(servicio, drive)
+        if accion == "mover":
+            drive.mover("f2", "otra_carpeta")
+        else:
+            getattr(drive, accion)("f2")
+
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+
+        assert resumen["eliminados"] == 1
+        assert drive.peticiones == Counter({"changes": 1})
+        assert "f2" not in chunks_por_archivo(repo)
+        estado = await servicio.store.cargar("A1_SPONSOR", "raiz")
+        assert "f2" not in estado.archivos
+
+    @pytest.mark.asyncio
+    async def test_carpeta_a_la_papelera_reconcilia(self, servicio, drive, repo):
+        api, _ = await primera_sync(servicio, drive)
+        drive.papelera("sub")
+
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+
+        assert resumen["modo"] == "reconciliacion"
+        assert resumen["eliminados"] == 1
+        assert drive.peticiones["descargas"] == 0
+        assert set(chunks_por_archivo(repo)) == {"f1", "d1"}
+
+    @pytest.mark.asyncio
+    async def test_carpeta_movida_al_arbol_se_ingiere(self, servicio, drive, repo):
+        api, _ = await primera_sync(servicio, drive)
+        drive.crear_carpeta("ext", "Externos", "otra_carpeta")
+        drive.crear("f7", "externo.txt", texto("externo"), "ext")
+        await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+        assert "f7" not in chunks_por_archivo(repo)
+
+        drive.mover("ext", "raiz")
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+
+        assert resumen["agregados"] == 1
+        assert "f7" in chunks_por_archivo(repo)
+
+
+class TestFallas:
+    """Una descarga fallida no avanza el token y se reintenta"""
+
+    @pytest.mark.asyncio
+    async def test_reintento_sin_repetir_lo_ya_procesado(self, servicio, drive, repo, embeddings):
+        api, _ = await primera_sync(servicio, drive)
+        drive.modificar("f1", texto("consultoría fiscal"))
+        drive.modificar("f2", texto("capacitación fiscal"))
+        drive.fallar.add("f2")
+
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+        assert not resumen["success"]
+        assert [e["file_id"] for e in resumen["errores"]] == ["f2"]
+        assert resumen["modificados"] == 1
+
+        drive.fallar.clear()
+        drive.reiniciar_conteo()
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+
+        assert resumen["success"] and resumen["modificados"] == 1
+        assert drive.peticiones == Counter({"changes": 1, "descargas": 1})
+
+    @pytest.mark.asyncio
+    async def test_primera_sync_fallida_repite_listado(self, servicio, drive, repo):
+        drive.fallar.add("f1")
+        api = api_de(drive)
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+        assert not resumen["success"] and resumen["agregados"] == 2
+
+        drive.fallar.clear()
+        drive.reiniciar_conteo()
+        resumen = await servicio.sincronizar("A1_SPONSOR", "raiz", api)
+
+        assert resumen["modo"] == "completo" and resumen["agregados"] == 1
+        # Solo f1: corto.txt quedó registrado como omitido y no se vuelve a descargar
+        assert drive.peticiones["descargas"] == 1
+
+
+class TestAgentesConcurrentes:
+    """Varios agentes en paralelo bajo un presupuesto global"""
+
+    @staticmethod
+    def drive_compartido(archivos_por_agente: int, demora: float) -> FakeDrive:
+        fake = FakeDrive(demora=demora)
+        for agente in ("A1", "A2", "A3"):
+            fake.crear_carpeta(f"raiz_{agente}", agente, "root")
+            for i in range(archivos_por_agente):
+                fake.crear(f"{agente}_{i}", f"doc{i}.txt", texto(f"{agente} tema {i}"), f"raiz_{agente}")
+        return fake
+
+    @staticmethod
+    async def sincronizar_todos(servicio, api):
+        return await asyncio.gather(*(
+            servicio.sincronizar(agent_id, f"raiz_{agent_id.split('_')[0]}", api)
+            for agent_id in ("A1_SPONSOR", "A2_PMO", "A3_FISCAL")
+        ))
+
+    @pytest.mark.asyncio
+    async def test_descargas_respetan_presupuesto(self, repo, embeddings):
+        fake = self.drive_compartido(archivos_por_agente=3, demora=0.05)
+        servicio = DriveSyncService(repo, fragmentar=fragmentar, descargas_concurrentes=2)
+
+        resumenes = await self.sincronizar_todos(servicio, api_de(fake))
+
+        assert [r["agregados"] for r in resumenes] == [3, 3, 3]
+        assert fake.max_descargas_activas == 2
+
+    @pytest.mark.asyncio
+    async def test_agentes_descargan_en_paralelo(self, repo, embeddings):
+        fake = self.drive_compartido(archivos_por_agente=1, demora=0.1)
+        servicio = DriveSyncService(repo, fragmentar=fragmentar, descargas_concurrentes=4)
+
+        await self.sincronizar_todos(servicio, api_de(fake))
+
+        assert fake.max_descargas_activas == 3
+
+    @pytest.mark.asyncio
+    async def test_embeddings_respetan_presupuesto(self, repo, monkeypatch):
+        lentos = EmbeddingsFalsos(demora=0.05)
+        monkeypatch.setattr(rag_repository, "_embed_batch", lentos)
+        fake = self.drive_compartido(archivos_por_agente=2, demora=0.0)
+        servicio = DriveSyncService(repo, fragmentar=fragmentar, embeddings_concurrentes=1)
+
+        await self.sincronizar_todos(servicio, api_de(fake))
+
+        assert lentos.max_activos == 1
+        for agent_id in ("A1_SPONSOR", "A2_PMO", "A3_FISCAL"):
+            assert len(chunks_por_archivo(repo, agent_id)) == 2
+
+    @pytest.mark.asyncio
+    async def test_no_op_de_todos_los_agentes(self, repo, embeddings):
+        fake = self.drive_compartido(archivos_por_agente=3, demora=0.0)
+        servicio = DriveSyncService(repo, fragmentar=fragmentar)
+        api = api_de(fake)
+        await self.sincronizar_todos(servicio, api)
+        fake.reiniciar_conteo()
+        embebidos = embeddings.textos
+
+        resumenes = await self.sincronizar_todos(servicio, api)
+
+        assert all(r["success"] and r["docs_processed"] == 0 for r in resumenes)
+        assert fake.peticiones == Counter({"changes": 3})
+        assert embeddings.textos == embebidos
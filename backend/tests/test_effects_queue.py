@@ -0,0 +1,68 @@
+"""
+Pruebas Unitarias: Cola de efectos de la deliberación - Revisar.IA
+Verifica orden FIFO, aislamiento de errores y flush
+"""
+
+import asyncio
+import pytest
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.effects_queue import EffectsQueue
+
+
+class TestEffectsQueue:
+
+    @pytest.mark.asyncio
+    async def test_orden_de_envio(self):
+        efectos = EffectsQueue()
+        orden = []
+
+        async def lento(n):
+            await asyncio.sleep(0.02)
+            orden.append(n)
+
+        def sincrono(n):
+            orden.append(n)
+
+        efectos.submit("a", lento, 1)
+        efectos.submit("b", sincrono, 2)
+        efectos.submit("c", lento, 3)
+        await efectos.close()
+        assert orden == [1, 2, 3]
+        assert efectos.completed == 3
+
+    @pytest.mark.asyncio
+    async def test_submit_no_bloquea(self):
+        efectos = EffectsQueue()
+        inicio = time.perf_counter()
+        futuro = efectos.submit("email", asyncio.sleep, 0.1, result="enviado")
+        assert time.perf_counter() - inicio < 0.01
+        assert efectos.pending == 1
+        await efectos.flush()
+        assert futuro.result() == "enviado"
+        await efectos.close()
+
+    @pytest.mark.asyncio
+    async def test_error_no_detiene_la_cola(self):
+        efectos = EffectsQueue()
+        hechos = []
+
+        async def falla():
+            raise RuntimeError("pCloud caído")
+
+        fallido = efectos.submit("upload", falla)
+        efectos.submit("save_state", hechos.append, "ok")
+        await efectos.close()
+        assert hechos == ["ok"]
+        assert fallido.result() is None
+        assert efectos.errors == [{"effect": "upload", "error": "pCloud caído"}]
+
+    @pytest.mark.asyncio
+    async def test_close_sin_efectos(self):
+        efectos = EffectsQueue()
+        await efectos.close()
+        assert efectos.completed == 0
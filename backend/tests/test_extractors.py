@@ -0,0 +1,113 @@
+"""
+Pruebas Unitarias: Extracción de entidades en una pasada - Revisar.IA
+Verifica paridad con las salidas de la implementación anterior (un recorrido
+por patrón) sobre un corpus dorado, entidades tipadas con posición,
+extract_many en lote y con pool de procesos, y throughput en MB/s
+"""
+
+import json
+import time
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.extractors import (
+    TIPOS, escanear, extract_many, extraer_articulos, extraer_entidades, extraer_fechas,
+    extraer_leyes, extraer_montos, extraer_rfcs, extraer_texto, extraer_uuids,
+)
+
+# Generado con utils/extractors.py antes del escáner de una pasada; los UUIDs
+# van ordenados porque la versión anterior los devolvía desde un set
+GOLDEN = json.loads((Path(__file__).parent / "fixtures" / "extractores_golden.json").read_text(encoding="utf-8"))
+
+EXTRACTORES = {
+    "rfcs": extraer_rfcs,
+    "articulos": extraer_articulos,
+    "montos": extraer_montos,
+    "leyes": extraer_leyes,
+    "fechas": extraer_fechas,
+}
+
+
+def normalizar(entidades):
+    if "uuids" in entidades:
+        entidades = {**entidades, "uuids": sorted(entidades["uuids"])}
+    return entidades
+
+
+class TestParidadGolden:
+
+    @pytest.mark.parametrize("caso", GOLDEN["textos"], ids=lambda c: c["texto"][:30] or "vacio")
+    def test_funciones_individuales(self, caso):
+        texto, esperado = caso["texto"], caso["esperado"]
+        for clave, extractor in EXTRACTORES.items():
+            assert extractor(texto) == esperado[clave], clave
+        assert sorted(extraer_uuids(texto)) == esperado["uuids"]
+
+    @pytest.mark.parametrize("caso", GOLDEN["textos"], ids=lambda c: c["texto"][:30] or "vacio")
+    def test_una_pasada_todos_los_tipos(self, caso):
+        assert normalizar(extraer_texto(caso["texto"])) == caso["esperado"]
+
+    @pytest.mark.parametrize("caso", GOLDEN["datos"])
+    def test_extraer_entidades(self, caso):
+        assert normalizar(extraer_entidades(caso["datos"])) == caso["esperado"]
+
+    def test_traslapes_entre_patrones(self):
+        texto = "MXN 1,000 pesos y artículo 27, Art. 27"
+        assert extraer_montos(texto) == ["$1,000", "$1,000"]
+        assert extraer_articulos(texto) == ["Art. 27"]
+
+
+class TestEntidadesTipadas:
+
+    def test_posiciones_en_el_texto_original(self):
+        texto = "Pago de $1,500.00 al rfc abc123456xy9 (art. 27 LISR) el 2024-01-15, uuid a1b2c3d4-e5f6-7890-abcd-ef1234567890"
+        entidades = escanear(texto)
+        assert [e.inicio for e in entidades] == sorted(e.inicio for e in entidades)
+        por_tipo = {e.tipo: e for e in entidades}
+        assert set(por_tipo) == set(TIPOS)
+
+        rfc = por_tipo["rfc"]
+        assert rfc.valor == "ABC123456XY9" and texto[rfc.inicio:rfc.fin] == "abc123456xy9"
+        uuid = por_tipo["uuid"]
+        assert texto[uuid.inicio:uuid.fin].upper() == uuid.valor
+        assert texto[por_tipo["articulo"].inicio:por_tipo["articulo"].fin] == "art. 27"
+        assert por_tipo["ley"].valor == "LISR"
+        assert por_tipo["monto"].valor == "$1,500.00"
+
+    def test_filtra_por_tipo(self):
+        entidades = escanear("ABC123456XY9 $100 CFF", tipos=("rfc", "ley"))
+        assert [(e.tipo, e.valor) for e in entidades] == [("rfc", "ABC123456XY9"), ("ley", "CFF")]
+        with pytest.raises(ValueError):
+            escanear("texto", tipos=("telefono",))
+
+
+class TestExtractMany:
+
+    def test_lote_igual_a_documentos_individuales(self):
+        docs = [caso["texto"] for caso in GOLDEN["textos"]]
+        assert extract_many(docs, max_workers=1) == [extraer_texto(d) for d in docs]
+
+    def test_pool_de_procesos_conserva_el_orden(self):
+        docs = [caso["texto"] for caso in GOLDEN["textos"]] + [caso["datos"] for caso in GOLDEN["datos"]]
+        en_serie = extract_many(docs, max_workers=1)
+        en_pool = extract_many(docs, max_workers=2, tamano_lote=5, min_bytes_pool=0)
+        assert en_pool == en_serie
+        assert normalizar({k: v for k, v in en_pool[-2].items() if v and k != "fechas"}) == GOLDEN["datos"][0]["esperado"]
+
+
+class TestThroughput:
+
+    def test_mb_por_segundo(self):
+        corpus = " ".join(caso["texto"] for caso in GOLDEN["textos"]) * 20
+        megabytes = len(corpus.encode("utf-8")) / 1e6
+
+        inicio = time.perf_counter()
+        entidades = escanear(corpus)
+        segundos = time.perf_counter() - inicio
+
+        print(f"\nuna pasada: {megabytes:.2f} MB, {len(entidades)} entidades, {megabytes / segundos:.2f} MB/s")
+        assert entidades
+        assert megabytes / segundos > 0.2
@@ -0,0 +1,180 @@
+"""
+Pruebas Unitarias: Chunker legal en streaming - Revisar.IA
+Verifica equivalencia con LegalDocumentChunker en leyes bien formadas,
+metadata de jerarquía, presupuesto de tokens con traslape y lectura por páginas
+"""
+
+import random
+import re
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.kb_chunkers import ChunkType, LegalDocumentChunker, StreamingLegalChunker
+
+FRASES = [
+    "Los contribuyentes podrán efectuar la deducción de las erogaciones estrictamente indispensables.",
+    "El comprobante fiscal digital deberá reunir los requisitos que señalen las disposiciones.",
+    "La retención se enterará a más tardar el día 17 del mes inmediato posterior.",
+    "Se presumirá la inexistencia de las operaciones cuando el proveedor no acredite la materialidad.",
+    "Las personas morales determinarán el impuesto aplicando la tasa sobre el resultado fiscal.",
+]
+
+
+def ley(articulos: int, semilla: int = 44, fracciones: bool = True, largo_max: int = 1300) -> str:
+    """Ley sintética: artículos al inicio de línea, sin menciones a otros artículos."""
+    rng = random.Random(semilla)
+    lineas = []
+    for n in range(1, articulos + 1):
+        numero = f"{n}-A" if n % 7 == 0 else str(n)
+        cuerpo = " ".join(rng.choice(FRASES) for _ in range(rng.randint(1, 3)))
+        lineas.append(f"Artículo {numero}.- {cuerpo}")
+        if fracciones and n % 3 == 0:
+            for romano in ("I", "II", "III"):
+                lineas.append(f"{romano}. {rng.choice(FRASES)}")
+        while len("\n".join(lineas[-4:])) > largo_max:
+            lineas.pop()
+    return "\n".join(lineas) + "\n"
+
+
+def bloques(texto: str, tamano: int):
+    for i in range(0, len(texto), tamano):
+        yield texto[i:i + tamano]
+
+
+def resumen(chunks):
+    return [
+        (c.content, c.metadata.article_number, c.metadata.chunk_type, c.metadata.hierarchy_path,
+         c.metadata.fraction, c.metadata.keywords, set(c.metadata.references), c.token_count)
+        for c in chunks
+    ]
+
+
+def palabras(texto: str):
+    return re.findall(r"\S+", texto)
+
+
+class TestEquivalencia:
+
+    def test_mismos_chunks_que_el_chunker_actual(self):
+        texto = ley(120)
+        actual = LegalDocumentChunker().chunk_legal_document(texto, "LISR", "/kb/lisr.txt")
+        nuevo = StreamingLegalChunker().chunk_legal_document(texto, "LISR", "/kb/lisr.txt")
+
+        assert len(nuevo) == 120
+        assert resumen(nuevo) == resumen(actual)
+        assert all(c.metadata.source_path == "/kb/lisr.txt" for c in nuevo)
+
+    def test_paginas_dan_el_mismo_resultado(self):
+        texto = ley(60)
+        chunker = StreamingLegalChunker(max_chunk_tokens=120, overlap_tokens=20)
+        completo = resumen(chunker.chunk_legal_document(texto, "CFF"))
+        for tamano in (1, 37, 4096):
+            assert resumen(chunker.iter_chunks(bloques(texto, tamano), "CFF")) == completo
+
+    def test_es_un_generador(self):
+        chunker = StreamingLegalChunker()
+        paginas = iter(["Artículo 1.- Primero.\n", "Artículo 2.- Segundo.\n", "Artículo 3.- Tercero.\n"])
+        chunks = chunker.iter_chunks(paginas, "LIVA")
+        assert next(chunks).content == "Artículo 1.- Primero."
+        # El segundo artículo se emite al leer el encabezado del tercero
+        assert next(chunks).metadata.article_number == "2"
+        assert next(paginas, None) is None
+
+
+class TestLimites:
+
+    def test_menciones_en_el_texto_no_cortan(self):
+        texto = (
+            "Artículo 5.- Para efectos del artículo 27 de esta Ley, se estará a lo dispuesto\n"
+            "Artículo 31 de la Ley del Impuesto al Valor Agregado y demás disposiciones.\n"
+            "Artículo 6. Las deducciones autorizadas.\n"
+        )
+        chunks = StreamingLegalChunker().chunk_legal_document(texto, "LISR")
+        assert [c.metadata.article_number for c in chunks] == ["5", "6"]
+        assert "Artículo 31 de la Ley" in chunks[0].content
+        assert {"27", "31"} <= set(chunks[0].metadata.references)
+
+        # El chunker actual parte el artículo en cada mención
+        actual = LegalDocumentChunker().chunk_legal_document(texto, "LISR")
+        assert [c.metadata.article_number for c in actual] == ["5", "27", "31", "6"]
+
+    def test_jerarquia_en_metadata(self):
+        texto = (
+            "LEY DEL IMPUESTO SOBRE LA RENTA\n"
+            "TÍTULO II\nDE LAS PERSONAS MORALES\n"
+            "CAPÍTULO I\nDE LOS INGRESOS\n"
+            "Artículo 16.- Se consideran ingresos acumulables.\n"
+            "CAPÍTULO II\nDE LAS DEDUCCIONES\n"
+            "SECCIÓN PRIMERA\n"
+            "Artículo 25.- Los contribuyentes podrán efectuar las deducciones.\n"
+            "TÍTULO III\n"
+            "Artículo 79.- No son contribuyentes del impuesto.\n"
+        )
+        chunks = StreamingLegalChunker().chunk_legal_document(texto, "LISR")
+        assert [c.metadata.hierarchy_path for c in chunks] == [
+            "Título II > Capítulo I > Artículo 16",
+            "Título II > Capítulo II > Sección PRIMERA > Artículo 25",
+            "Título III > Artículo 79",
+        ]
+        assert (chunks[1].metadata.title, chunks[1].metadata.chapter, chunks[1].metadata.section) == (
+            "II", "II", "PRIMERA")
+        # Los encabezados son metadata, no texto del artículo anterior
+        assert "CAPÍTULO II" not in chunks[0].content
+        assert chunks[0].content == "Artículo 16.- Se consideran ingresos acumulables."
+
+    def test_texto_sin_articulos(self):
+        chunker = StreamingLegalChunker()
+        assert chunker.chunk_legal_document("Exposición de motivos.\nTÍTULO I\n", "X") == []
+        assert chunker.chunk_legal_document("", "X") == []
+
+
+class TestPresupuesto:
+
+    @pytest.mark.parametrize("fracciones", [True, False])
+    def test_articulo_largo_respeta_tokens_y_traslape(self, fracciones):
+        rng = random.Random(7)
+        if fracciones:
+            cuerpo = "\n".join(f"{r}. " + " ".join(rng.choice(FRASES) for _ in range(4))
+                               for r in ("I", "II", "III", "IV", "V", "VI", "VII", "VIII"))
+        else:
+            cuerpo = " ".join(rng.choice(FRASES) for _ in range(60))
+        texto = f"Artículo 27.- Las deducciones deberán reunir los requisitos siguientes:\n{cuerpo}\nArtículo 28.- Fin.\n"
+
+        chunker = StreamingLegalChunker(max_chunk_tokens=150, overlap_tokens=30)
+        chunks = chunker.chunk_legal_document(texto, "LISR")
+        partes = [c for c in chunks if c.metadata.article_number == "27"]
+
+        assert len(partes) > 3
+        assert all(len(c.content) <= 150 * 4 for c in chunks)
+        assert all(c.token_count <= 150 for c in chunks)
+        assert partes[0].content.startswith("Artículo 27.- Las deducciones")
+        for anterior, siguiente in zip(partes, partes[1:]):
+            cola = anterior.content[-60:].split(None, 1)[-1]
+            assert cola in siguiente.content
+        if fracciones:
+            # La primera parte es el proemio, antes de la fracción I
+            assert partes[0].metadata.chunk_type == ChunkType.LEGAL_ARTICLE
+            assert all(c.metadata.chunk_type == ChunkType.LEGAL_FRACTION for c in partes[1:])
+            # Cada parte se etiqueta con la fracción donde empieza (el traslape)
+            etiquetas = [c.metadata.fraction for c in partes[1:]]
+            assert etiquetas == ["I", "II", "III", "IV", "V", "VI", "VII"]
+            assert all(c.content.startswith(f"Artículo 27, Fracción {c.metadata.fraction}:\n") for c in partes[1:])
+            assert "\nVIII. " in partes[-1].content
+        else:
+            assert all(c.content.startswith("Artículo 27 (continuación):\n") for c in partes[1:])
+
+        # Sin pérdida: cada palabra del artículo aparece en orden en algún chunk
+        vistas = " ".join(c.content for c in partes)
+        assert set(palabras(cuerpo)) <= set(palabras(vistas))
+        assert chunks[-1].content == "Artículo 28.- Fin."
+
+    def test_linea_gigante_sin_saltos(self):
+        texto = "Artículo 1.- " + "palabra " * 50_000
+        chunker = StreamingLegalChunker(max_chunk_tokens=100, overlap_tokens=10)
+        chunks = list(chunker.iter_chunks(bloques(texto, 1000), "RMF"))
+        assert len(chunks) > 900
+        assert all(len(c.content) <= 400 for c in chunks)
+        assert sum(c.content.count("palabra") for c in chunks) >= 50_000
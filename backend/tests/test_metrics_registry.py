@@ -0,0 +1,290 @@
+"""
+Pruebas Unitarias: Registro de métricas y spans - Revisar.IA
+Verifica contadores e histogramas sin pérdidas entre hilos, el tope de
+series por familia, el formato de texto de Prometheus, la combinación de
+workers por archivos (incluidos procesos que ya terminaron) y los spans
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services import metrics_registry
+from services.metrics_registry import (
+    AgregadorArchivos, ETIQUETA_DESBORDE, RegistroMetricas, combinar_fotos, formatear_prometheus, span,
+)
+
+BACKEND = Path(__file__).parent.parent
+
+
+def lineas_metricas(texto):
+    return {
+        linea.rsplit(" ", 1)[0]: float(linea.rsplit(" ", 1)[1].replace("+Inf", "inf"))
+        for linea in texto.splitlines() if linea and not linea.startswith("#")
+    }
+
+
+class TestContadoresEHistogramas:
+    """Acumulación por hilo"""
+
+    def test_contador(self):
+        registro = RegistroMetricas()
+        contador = registro.contador("revisar_prueba_total", "Prueba")
+        contador.incrementar()
+        contador.incrementar(2.5)
+        assert registro.foto()["revisar_prueba_total"]["series"] == [[[], 3.5]]
+
+    def test_histograma_limite_inclusivo(self):
+        registro = RegistroMetricas()
+        familia = registro.histograma("revisar_lat_seconds", "Latencia", limites=(0.1, 1.0))
+        for valor in (0.05, 0.1, 0.5, 1.0, 3.0):
+            familia.observar(valor)
+        serie = familia.etiquetas()
+        assert serie._foto() == {"cubetas": [2, 2, 1], "suma": pytest.approx(4.65)}
+        assert serie.conteo == 5
+
+    def test_hilos_no_pierden_incrementos(self):
+        registro = RegistroMetricas()
+        contador = registro.contador("revisar_hilos_total", "Hilos", ("hilo",)).etiquetas("todos")
+        histograma = registro.histograma("revisar_hilos_seconds", "Hilos").etiquetas()
+
+        def trabajar():
+            for _ in range(20000):
+                contador.incrementar()
+                histograma.observar(0.01)
+
+        hilos = [threading.Thread(target=trabajar) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert contador.valor == 160000
+        assert histograma.conteo == 160000
+        assert histograma.suma == pytest.approx(1600.0)
+
+    def test_series_acotadas(self):
+        registro = RegistroMetricas(max_series=3)
+        familia = registro.contador("revisar_fuentes_total", "Fuentes", ("source",))
+        for i in range(50):
+            familia.etiquetas(f"fuente-{i}").incrementar()
+
+        series = dict((tuple(v), d) for v, d in registro.foto()["revisar_fuentes_total"]["series"])
+        assert len(series) == 3
+        assert series[(ETIQUETA_DESBORDE,)] == 48
+        assert sum(series.values()) == 50
+
+    def test_valores_no_texto_comparten_serie(self):
+        registro = RegistroMetricas()
+        familia = registro.contador("revisar_fase_total", "Fases", ("fase",))
+        familia.etiquetas(3).incrementar()
+        familia.etiquetas("3").incrementar()
+        assert registro.foto()["revisar_fase_total"]["series"] == [[["3"], 2]]
+
+    def test_redefinir_con_otras_etiquetas_falla(self):
+        registro = RegistroMetricas()
+        registro.contador("revisar_x_total", "X", ("a",))
+        assert registro.contador("revisar_x_total", "X", ("a",)) is registro.contador("revisar_x_total", "X", ("a",))
+        with pytest.raises(ValueError):
+            registro.contador("revisar_x_total", "X", ("b",))
+        with pytest.raises(ValueError):
+            registro.contador("revisar_x_total", "X", ("a",)).etiquetas("1", "2")
+
+
+class TestFormatoPrometheus:
+    """Texto de exposición 0.0.4"""
+
+    def test_histograma_acumulado(self):
+        registro = RegistroMetricas()
+        familia = registro.histograma("revisar_q_seconds", "Consultas", ("op",), limites=(0.01, 0.1))
+        for valor in (0.005, 0.05, 0.05, 2):
+            familia.etiquetas("fetch").observar(valor)
+
+        texto = registro.exposicion()
+        valores = lineas_metricas(texto)
+
+        assert "# TYPE revisar_q_seconds histogram" in texto
+        assert valores['revisar_q_seconds_bucket{op="fetch",le="0.01"}'] == 1
+        assert valores['revisar_q_seconds_bucket{op="fetch",le="0.1"}'] == 3
+        assert valores['revisar_q_seconds_bucket{op="fetch",le="+Inf"}'] == 4
+        assert valores['revisar_q_seconds_count{op="fetch"}'] == 4
+        assert valores['revisar_q_seconds_sum{op="fetch"}'] == pytest.approx(2.105)
+
+    def test_escapa_valores_de_etiqueta(self):
+        registro = RegistroMetricas()
+        registro.contador("revisar_e_total", 'Ayuda con \\ y\nsalto', ("source",)).etiquetas('a"b\\c\nd').incrementar()
+        texto = registro.exposicion()
+        assert 'revisar_e_total{source="a\\"b\\\\c\\nd"} 1' in texto
+        assert "# HELP revisar_e_total Ayuda con \\\\ y\\nsalto" in texto
+
+
+class TestCombinacionWorkers:
+    """Fotos por worker en un directorio compartido"""
+
+    @staticmethod
+    def _registro_con(valor_contador, latencias):
+        registro = RegistroMetricas()
+        registro.contador("revisar_llamadas_total", "Llamadas", ("agente",)).etiquetas("A1").incrementar(valor_contador)
+        histograma = registro.histograma("revisar_llm_seconds", "LLM", limites=(1.0,))
+        for latencia in latencias:
+            histograma.observar(latencia)
+        return registro
+
+    def test_combinar_fotos(self):
+        combinada = combinar_fotos([
+            self._registro_con(2, [0.5]).foto(),
+            self._registro_con(3, [0.5, 4.0]).foto(),
+        ])
+        valores = lineas_metricas(formatear_prometheus(combinada))
+        assert valores['revisar_llamadas_total{agente="A1"}'] == 5
+        assert valores['revisar_llm_seconds_bucket{le="1"}'] == 2
+        assert valores["revisar_llm_seconds_count"] == 3
+
+    def test_cubetas_distintas_no_se_mezclan(self):
+        otro = RegistroMetricas()
+        otro.histograma("revisar_llm_seconds", "LLM", limites=(2.0,)).observar(1)
+        combinada = combinar_fotos([self._registro_con(1, [0.5]).foto(), otro.foto()])
+        assert combinada["revisar_llm_seconds"]["series"] == [[[], {"cubetas": [1, 0], "suma": 0.5}]]
+
+    def test_procesos_reales_y_reinicio(self, tmp_path):
+        script = (
+            "import sys; sys.path.insert(0, sys.argv[2])\n"
+            "from services.metrics_registry import AgregadorArchivos, registro\n"
+            "registro.contador('revisar_llamadas_total', 'Llamadas', ('agente',)).etiquetas('A1').incrementar(7)\n"
+            "AgregadorArchivos(sys.argv[1], registro).escribir()\n"
+        )
+        for _ in range(2):
+            subprocess.run([sys.executable, "-c", script, str(tmp_path), str(BACKEND)], check=True)
+
+        actual = self._registro_con(1, [])
+        valores = lineas_metricas(formatear_prometheus(AgregadorArchivos(str(tmp_path), actual).combinar()))
+        assert valores['revisar_llamadas_total{agente="A1"}'] == 15
+
+        # Los procesos terminados se compactan en acumulado.json
+        assert [p.name for p in tmp_path.glob("*.json")] == ["acumulado.json"]
+
+        # Un worker nuevo (reinicio) sigue viendo los contadores anteriores
+        nuevo = self._registro_con(0, [])
+        valores = lineas_metricas(formatear_prometheus(AgregadorArchivos(str(tmp_path), nuevo).combinar()))
+        assert valores['revisar_llamadas_total{agente="A1"}'] == 14
+
+    def test_workers_vivos_no_se_compactan(self, tmp_path):
+        uno, otro = self._registro_con(1, []), self._registro_con(2, [])
+        agregador_uno = AgregadorArchivos(str(tmp_path), uno)
+        AgregadorArchivos(str(tmp_path), otro).escribir()
+        agregador_uno.escribir()
+
+        uno.contador("revisar_llamadas_total", "Llamadas", ("agente",)).etiquetas("A1").incrementar(10)
+        valores = lineas_metricas(formatear_prometheus(agregador_uno.combinar()))
+
+        # La foto propia se toma en vivo, no del archivo
+        assert valores['revisar_llamadas_total{agente="A1"}'] == 13
+        assert not (tmp_path / "acumulado.json").exists()
+
+    def test_foto_corrupta_se_ignora(self, tmp_path):
+        (tmp_path / f"worker-{os.getpid()}-roto.json").write_text("{no es json")
+        valores = lineas_metricas(formatear_prometheus(
+            AgregadorArchivos(str(tmp_path), self._registro_con(4, [])).combinar()
+        ))
+        assert valores['revisar_llamadas_total{agente="A1"}'] == 4
+
+
+class TestSpans:
+    """span como decorador (sync/async) y como bloque"""
+
+    @staticmethod
+    def _series(nombre):
+        foto = metrics_registry.registro.foto()
+        return {tuple(v): d for v, d in foto.get(nombre, {}).get("series", [])}
+
+    def test_decorador_sync_y_errores(self):
+        @span("prueba_sync", tipo="ok")
+        def sumar(a, b):
+            return a + b
+
+        @span("prueba_sync", tipo="falla")
+        def fallar():
+            raise RuntimeError("x")
+
+        assert sumar(2, 3) == 5
+        assert sumar.__name__ == "sumar"
+        with pytest.raises(RuntimeError):
+            fallar()
+
+        duraciones = self._series("revisar_prueba_sync_seconds")
+        errores = self._series("revisar_prueba_sync_errors_total")
+        assert sum(duraciones[("ok",)]["cubetas"]) == 1
+        assert sum(duraciones[("falla",)]["cubetas"]) == 1
+        assert errores[("ok",)] == 0 and errores[("falla",)] == 1
+
+    @pytest.mark.asyncio
+    async def test_decorador_async_mide_la_espera(self):
+        @span("prueba_async")
+        async def esperar():
+            await asyncio.sleep(0.02)
+            return "listo"
+
+        assert asyncio.iscoroutinefunction(esperar)
+        assert await esperar() == "listo"
+        assert self._series("revisar_prueba_async_seconds")[()]["suma"] >= 0.02
+
+    def test_bloque(self):
+        with pytest.raises(KeyError):
+            with span("prueba_bloque", tipo="b"):
+                raise KeyError("k")
+        with span("prueba_bloque", tipo="b"):
+            pass
+        assert sum(self._series("revisar_prueba_bloque_seconds")[("b",)]["cubetas"]) == 2
+        assert self._series("revisar_prueba_bloque_errors_total")[("b",)] == 1
+
+    def test_puntos_instrumentados_registran_familias(self):
+        import services.database_pg  # noqa: F401
+        import services.retrieval_facade  # noqa: F401
+        import services.report_generator  # noqa: F401
+
+        foto = metrics_registry.registro.foto()
+        for nombre in ("revisar_db_query_seconds", "revisar_vector_search_seconds",
+                       "revisar_vector_search_backend_seconds", "revisar_pdf_export_seconds"):
+            assert nombre in foto
+
+
+class TestEndpoint:
+    """GET /metrics"""
+
+    @staticmethod
+    def _cliente():
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from routes import metrics
+
+        app = FastAPI()
+        app.include_router(metrics.prometheus_router)
+        return TestClient(app)
+
+    def test_texto_prometheus_con_uso_de_cache(self, monkeypatch):
+        from routes.metrics import track_semantic_cache
+
+        monkeypatch.delenv("METRICS_TOKEN", raising=False)
+        antes = lineas_metricas(self._cliente().get("/metrics").text)
+        track_semantic_cache("prueba_endpoint", True)
+
+        respuesta = self._cliente().get("/metrics")
+        assert respuesta.status_code == 200
+        assert respuesta.headers["content-type"].startswith("text/plain; version=0.0.4")
+        clave = 'revisar_semantic_cache_requests_total{source="prueba_endpoint",resultado="hit"}'
+        assert lineas_metricas(respuesta.text)[clave] == antes.get(clave, 0) + 1
+
+    def test_token(self, monkeypatch):
+        monkeypatch.setenv("METRICS_TOKEN", "secreto")
+        cliente = self._cliente()
+        assert cliente.get("/metrics").status_code == 401
+        assert cliente.get("/metrics", headers={"Authorization": "Bearer otro"}).status_code == 401
+        assert cliente.get("/metrics", headers={"Authorization": "Bearer secreto"}).status_code == 200
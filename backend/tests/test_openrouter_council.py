@@ -0,0 +1,168 @@
+"""
+Pruebas Unitarias: Consejo LLM con quórum y hedging - Revisar.IA
+Verifica quórum, deadline suave, peticiones hedged e histogramas de latencia
+"""
+
+import asyncio
+import pytest
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import services.openrouter_service as openrouter
+from services.openrouter_service import OpenRouterService
+
+SONNET = "anthropic/claude-3.5-sonnet"
+OPUS = "anthropic/claude-3-opus"
+HAIKU = "anthropic/claude-3.5-haiku"
+
+PROMPTS = {
+    "fact_auditor": "auditor",
+    "business_strategist": "estratega",
+    "devils_advocate": "abogado del diablo",
+}
+
+
+def servicio(latencias, fallan=()):
+    """Servicio con call_model falso: cada modelo tarda `latencias[modelo]` segundos."""
+    s = OpenRouterService()
+    s.initialized = True
+    s.llamadas = []
+
+    async def call_model(model, messages, temperature=0.7, max_tokens=2000):
+        s.llamadas.append(model)
+        await asyncio.sleep(latencias.get(model, 0.01))
+        if model in fallan:
+            return {"success": False, "error": "falla", "content": None, "model": model}
+        return {"success": True, "content": f"{model}: {messages[-1]['content'][:20]}", "model": model,
+                "model_name": model}
+
+    s.call_model = call_model
+    return s
+
+
+class TestQuorum:
+
+    @pytest.mark.asyncio
+    async def test_quorum_no_espera_al_rezagado(self, monkeypatch):
+        monkeypatch.setattr(openrouter, "COUNCIL_FALLBACK_MODELS", {})
+        s = servicio({SONNET: 0.02, OPUS: 1.0})
+        inicio = time.perf_counter()
+        stage1, reviews = await s.run_council_stages("¿Aprobar?", PROMPTS, "{my_response} vs {other_responses}", quorum=2)
+        assert time.perf_counter() - inicio < 0.3
+        assert stage1["devils_advocate"]["skipped"]
+        assert set(reviews) == {"fact_auditor", "business_strategist"}
+        assert all(r["success"] for r in reviews.values())
+
+    @pytest.mark.asyncio
+    async def test_deadline_suave(self, monkeypatch):
+        monkeypatch.setattr(openrouter, "COUNCIL_FALLBACK_MODELS", {})
+        s = servicio({SONNET: 0.02, OPUS: 1.0})
+        inicio = time.perf_counter()
+        stage1, _ = await s.run_council_stages("¿Aprobar?", PROMPTS, quorum=3, soft_deadline=0.1)
+        assert time.perf_counter() - inicio < 0.3
+        assert {r for r, resp in stage1.items() if resp.get("success")} == {"fact_auditor", "business_strategist"}
+        assert stage1["devils_advocate"]["skipped"]
+
+    @pytest.mark.asyncio
+    async def test_sin_quorum_espera_a_todos(self, monkeypatch):
+        monkeypatch.setattr(openrouter, "COUNCIL_FALLBACK_MODELS", {})
+        s = servicio({SONNET: 0.01, OPUS: 0.1})
+        resultados = await s.call_council_parallel("¿Aprobar?", PROMPTS)
+        assert list(resultados) == list(PROMPTS)
+        assert all(r["success"] for r in resultados.values())
+
+    @pytest.mark.asyncio
+    async def test_revisiones_comienzan_antes_del_ultimo(self, monkeypatch):
+        monkeypatch.setattr(openrouter, "COUNCIL_FALLBACK_MODELS", {})
+        monkeypatch.setattr(openrouter, "COUNCIL_QUORUM", 2)
+        monkeypatch.setattr(openrouter, "COUNCIL_SOFT_DEADLINE_SECONDS", 5)
+        s = servicio({SONNET: 0.02, OPUS: 2.0})
+        resultado = await s.run_full_council("¿Aprobar?")
+        assert resultado["skipped_members"] == ["devils_advocate"]
+        assert resultado["success"]
+
+
+class TestHedging:
+
+    @pytest.mark.asyncio
+    async def test_hedge_tras_p95_gana_el_alterno(self):
+        s = servicio({OPUS: 0.01, SONNET: 0.02})
+        for _ in range(openrouter.HEDGE_MIN_SAMPLES):
+            await s.call_member("devils_advocate", OPUS, [{"role": "user", "content": "x"}], hedge=False)
+        assert s._hedge_delay(OPUS) == pytest.approx(0.01, abs=0.01)
+
+        async def lento(model, messages, temperature=0.7, max_tokens=2000):
+            await asyncio.sleep(1.0 if model == OPUS else 0.02)
+            return {"success": True, "content": model, "model": model}
+
+        s.call_model = lento
+        inicio = time.perf_counter()
+        respuesta = await s.call_member("devils_advocate", OPUS, [{"role": "user", "content": "x"}])
+        assert time.perf_counter() - inicio < 0.3
+        assert respuesta["model"] == SONNET
+        assert respuesta["hedged"]
+        assert s.hedge_stats == {"issued": 1, "won": 1}
+
+    @pytest.mark.asyncio
+    async def test_sin_hedge_si_responde_a_tiempo(self):
+        s = servicio({SONNET: 0.01})
+        respuesta = await s.call_member("fact_auditor", SONNET, [{"role": "user", "content": "x"}])
+        assert respuesta["model"] == SONNET
+        assert s.llamadas == [SONNET]
+
+    @pytest.mark.asyncio
+    async def test_primario_gana_sin_marca_hedged(self, monkeypatch):
+        monkeypatch.setattr(openrouter, "COUNCIL_HEDGE_DELAY_SECONDS", 0.02)
+        s = servicio({SONNET: 0.05, HAIKU: 1.0})
+        respuesta = await s.call_member("fact_auditor", SONNET, [{"role": "user", "content": "x"}])
+        await asyncio.sleep(0)
+        assert respuesta["model"] == SONNET
+        assert "hedged" not in respuesta
+        assert s.hedge_stats == {"issued": 1, "won": 0}
+        # El alterno perdedor se registra como muestra censurada
+        assert s.get_latency_stats()["models"][HAIKU]["censored"] == 1
+
+    @pytest.mark.asyncio
+    async def test_hedge_si_el_primario_falla_despues(self, monkeypatch):
+        monkeypatch.setattr(openrouter, "COUNCIL_HEDGE_DELAY_SECONDS", 0.02)
+        s = servicio({SONNET: 0.05, HAIKU: 0.1}, fallan={SONNET})
+        respuesta = await s.call_member("fact_auditor", SONNET, [{"role": "user", "content": "x"}])
+        assert respuesta["success"]
+        assert respuesta["model"] == HAIKU
+
+
+class TestHistogramas:
+
+    @pytest.mark.asyncio
+    async def test_latencia_por_miembro_y_modelo(self, monkeypatch):
+        monkeypatch.setattr(openrouter, "COUNCIL_FALLBACK_MODELS", {})
+        s = servicio({SONNET: 0.01, OPUS: 0.03}, fallan={OPUS})
+        await s.call_council_parallel("¿Aprobar?", PROMPTS)
+        stats = s.get_latency_stats()
+        assert set(stats["members"]) == set(PROMPTS)
+        assert stats["models"][SONNET]["count"] == 2
+        assert stats["models"][OPUS]["errors"] == 1
+        assert stats["members"]["devils_advocate"]["buckets"]["le_1s"] == 1
+
+    @pytest.mark.asyncio
+    async def test_rezagado_omitido_cuenta_como_censurado(self, monkeypatch):
+        monkeypatch.setattr(openrouter, "COUNCIL_FALLBACK_MODELS", {})
+        s = servicio({SONNET: 0.02, OPUS: 1.0})
+        await s.run_council_stages("¿Aprobar?", PROMPTS, quorum=2)
+        await asyncio.sleep(0)
+        opus = s.get_latency_stats()["members"]["devils_advocate"]
+        assert opus["count"] == 1
+        assert opus["censored"] == 1
+        assert opus["errors"] == 0
+        assert opus["p95_seconds"] >= 0.02
+
+    def test_percentiles(self):
+        h = openrouter.LatencyHistogram()
+        for k in range(1, 101):
+            h.record(k / 10)
+        assert h.percentile(50) == pytest.approx(5.0, abs=0.1)
+        assert h.percentile(95) == pytest.approx(9.5, abs=0.1)
+        assert h.to_dict()["buckets"]["gt_60s"] == 0
@@ -0,0 +1,178 @@
+"""
+Pruebas Unitarias: Grafo de fases del Oráculo Estratégico - Revisar.IA
+Verifica ejecución en paralelo contra un Worker falso con latencia,
+orden de dependencias, límite de concurrencia y caché por fase/entrada
+"""
+
+import asyncio
+import time
+import pytest
+import pytest_asyncio
+import sys
+from pathlib import Path
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import services.oraculo_fases as oraculo_fases
+from services.cache_service import CacheService, L1Cache
+from services.oraculo_estrategico_service import OraculoEstrategicoService
+from services.oraculo_fases import FaseInvestigacion, ordenar_fases
+
+LATENCIA = 0.1
+
+
+class WorkerFalso:
+    """Worker de Cloudflare local que registra inicio/fin de cada fase."""
+
+    def __init__(self):
+        self.llamadas = []
+        self.activas = 0
+        self.max_activas = 0
+
+    async def _atender(self, fase, payload):
+        inicio = time.monotonic()
+        self.activas += 1
+        self.max_activas = max(self.max_activas, self.activas)
+        await asyncio.sleep(LATENCIA)
+        self.activas -= 1
+        self.llamadas.append({"fase": fase, "inicio": inicio, "fin": time.monotonic(), "payload": payload})
+
+    async def scrape(self, request):
+        payload = await request.json()
+        await self._atender("scraping", payload)
+        return web.json_response({"success": True, "contenido": "Sitio de ACME", "paginas": 3})
+
+    async def investigar(self, request):
+        payload = await request.json()
+        await self._atender(payload["tipo"], payload)
+        return web.json_response({
+            "success": True,
+            "resultado": f"resultado {payload['tipo']}",
+            "fuentes": [f"https://fuente/{payload['tipo']}"],
+        })
+
+    async def analizar(self, request):
+        payload = await request.json()
+        fase = "reporte" if payload["tipo"] == "reporte_final" else payload["tipo"]
+        await self._atender(fase, payload)
+        return web.json_response({"success": True, "resultado": f"resultado {fase}"})
+
+    def llamada(self, fase):
+        return next(l for l in self.llamadas if l["fase"] == fase)
+
+    def fases(self):
+        return sorted(l["fase"] for l in self.llamadas)
+
+
+@pytest_asyncio.fixture
+async def worker(monkeypatch):
+    falso = WorkerFalso()
+    app = web.Application()
+    app.router.add_post("/api/scrape", falso.scrape)
+    app.router.add_post("/api/investigar", falso.investigar)
+    app.router.add_post("/api/analizar", falso.analizar)
+    server = TestServer(app)
+    await server.start_server()
+
+    monkeypatch.setattr(oraculo_fases, "_cache_fases", CacheService(redis_url=None, l1=L1Cache(ttl=3600)))
+    servicio = OraculoEstrategicoService()
+    servicio.worker_url = str(server.make_url("")).rstrip("/")
+    servicio.available = True
+    yield servicio, falso
+    await server.close()
+
+
+async def investigar(servicio, **kwargs):
+    return await servicio.investigar_completo(
+        empresa="ACME", sitio_web="https://acme.mx", sector="manufactura",
+        empresa_id="emp1", guardar_pcloud=False, **kwargs
+    )
+
+
+class TestGrafoDeFases:
+
+    @pytest.mark.asyncio
+    async def test_fases_independientes_en_paralelo(self, worker):
+        servicio, falso = worker
+        inicio = time.monotonic()
+        resultado = await investigar(servicio)
+        duracion = time.monotonic() - inicio
+
+        assert resultado["success"]
+        assert resultado["fases_completadas"] == 14
+        assert len(falso.llamadas) == 14
+        # Secuencial serían 14 * LATENCIA; el camino crítico es de ~5 niveles
+        assert duracion < 8 * LATENCIA
+        assert 1 < falso.max_activas <= oraculo_fases.MAX_CONCURRENCIA
+        assert resultado["consolidado"]["reporte_completo"] == "resultado reporte"
+        assert resultado["consolidado"]["fuentes"]["perplexity"] == 11
+
+    @pytest.mark.asyncio
+    async def test_respeta_dependencias(self, worker):
+        servicio, falso = worker
+        await investigar(servicio, contexto_adicional="Cliente desde 2019")
+
+        competidores = falso.llamada("competidores")
+        for dep in ("scraping", "empresa", "industria", "economia"):
+            assert falso.llamada(dep)["fin"] <= competidores["inicio"]
+        assert competidores["fin"] <= falso.llamada("oportunidades")["inicio"]
+        reporte = falso.llamada("reporte")
+        assert all(l["fin"] <= reporte["inicio"] for l in falso.llamadas if l["fase"] != "reporte")
+
+        contexto = competidores["payload"]["contexto"]
+        assert contexto.startswith("Cliente desde 2019")
+        assert "SITIO WEB:\nSitio de ACME" in contexto
+        assert "EMPRESA:\nresultado empresa" in contexto
+        assert falso.llamada("pestel")["payload"]["contexto"] == ""
+        assert "=== MATERIALIDAD SAT ===\nresultado materialidad" in reporte["payload"]["datos"]
+
+    @pytest.mark.asyncio
+    async def test_repeticion_solo_refresca_fases_cambiadas(self, worker):
+        servicio, falso = worker
+        await investigar(servicio, contexto_adicional="v1")
+
+        falso.llamadas.clear()
+        resultado = await investigar(servicio, contexto_adicional="v1")
+        assert falso.llamadas == []
+        assert len(resultado["meta"]["fases_desde_cache"]) == 14
+
+        # Solo competidores y oportunidades leen el contexto adicional; como su
+        # resultado no cambia, el reporte sigue sirviéndose del caché
+        await investigar(servicio, contexto_adicional="v2")
+        assert falso.fases() == ["competidores", "oportunidades"]
+
+        falso.llamadas.clear()
+        await investigar(servicio, contexto_adicional="v2", refrescar=True)
+        assert len(falso.llamadas) == 14
+
+    @pytest.mark.asyncio
+    async def test_sin_sitio_web_omite_scraping(self, worker):
+        servicio, falso = worker
+        resultado = await servicio.investigar_completo(empresa="ACME", guardar_pcloud=False)
+        assert resultado["fases_completadas"] == 13
+        assert "scraping" not in falso.fases()
+        assert "SITIO WEB ===\nNo disponible" in falso.llamada("materialidad")["payload"]["datos"]
+
+
+class TestOrdenTopologico:
+
+    def test_detecta_ciclos_y_dependencias_desconocidas(self):
+        def payload(params, entradas):
+            return {}
+
+        a = FaseInvestigacion("a", "A", "/x", payload, depende_de=("b",))
+        b = FaseInvestigacion("b", "B", "/x", payload, depende_de=("a",))
+        with pytest.raises(ValueError, match="circular"):
+            ordenar_fases((a, b))
+        with pytest.raises(ValueError, match="no existe"):
+            ordenar_fases((a,))
+
+    def test_fases_del_oraculo_en_orden_valido(self):
+        vistas = set()
+        for fase in ordenar_fases(oraculo_fases.FASES_INVESTIGACION):
+            assert set(fase.depende_de) <= vistas
+            vistas.add(fase.nombre)
+        assert len(vistas) == 14
@@ -0,0 +1,120 @@
+"""
+Pruebas Unitarias: Validación paralela de Fase 0 - Revisar.IA
+Verifica concurrencia, timeouts por agente, resultados parciales y límite por empresa
+"""
+
+import asyncio
+import pytest
+import sys
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.parallel_validation import AgentValidation, run_parallel_validations
+
+
+def agente(analysis, demora=0.05, error=None):
+    async def run(*_):
+        await asyncio.sleep(demora)
+        if error:
+            raise RuntimeError(error)
+        return {"analysis": analysis}
+    return run
+
+
+class TestRunParallelValidations:
+
+    @pytest.mark.asyncio
+    async def test_tarda_lo_del_mas_lento(self):
+        inicio = time.perf_counter()
+        resultados = await run_parallel_validations([
+            AgentValidation("A1_SPONSOR", agente("Recomiendo aprobar", 0.1)),
+            AgentValidation("A3_FISCAL", agente("Aprobado", 0.1)),
+            AgentValidation("A5_FINANZAS", agente("Aprobado", 0.1)),
+        ], tenant_id="t-rapido")
+        assert time.perf_counter() - inicio < 0.25
+        assert all(r["status"] == "ok" for r in resultados.values())
+
+    @pytest.mark.asyncio
+    async def test_orden_determinista(self):
+        resultados = await run_parallel_validations([
+            AgentValidation("A1_SPONSOR", agente("a", 0.06)),
+            AgentValidation("A3_FISCAL", agente("b", 0.0)),
+            AgentValidation("A5_FINANZAS", agente("c", 0.03)),
+        ])
+        assert list(resultados) == ["A1_SPONSOR", "A3_FISCAL", "A5_FINANZAS"]
+
+    @pytest.mark.asyncio
+    async def test_resultado_parcial_por_timeout_y_error(self):
+        resultados = await run_parallel_validations([
+            AgentValidation("A1_SPONSOR", agente("Aprobado", 0.01)),
+            AgentValidation("A3_FISCAL", agente("nunca", 5), timeout=0.05),
+            AgentValidation("A5_FINANZAS", agente(None, 0.01, error="LLM caído")),
+        ])
+        assert resultados["A1_SPONSOR"]["status"] == "ok"
+        assert resultados["A3_FISCAL"]["status"] == "timeout"
+        assert resultados["A5_FINANZAS"]["status"] == "error"
+        assert "LLM caído" in resultados["A5_FINANZAS"]["analysis"]
+        assert "revisión manual" in resultados["A3_FISCAL"]["analysis"]
+
+    @pytest.mark.asyncio
+    async def test_limite_por_empresa(self):
+        activas = {"actual": 0, "max": 0}
+
+        def contar():
+            async def run():
+                activas["actual"] += 1
+                activas["max"] = max(activas["max"], activas["actual"])
+                await asyncio.sleep(0.02)
+                activas["actual"] -= 1
+                return {"analysis": "ok"}
+            return run
+
+        await asyncio.gather(*(
+            run_parallel_validations(
+                [AgentValidation(f"A{k}", contar()) for k in range(3)],
+                tenant_id="empresa-limitada", max_concurrent=2
+            )
+            for _ in range(3)
+        ))
+        assert activas["max"] == 2
+
+
+class TestFase0Orquestador:
+
+    @pytest.mark.asyncio
+    async def test_validaciones_concurrentes_en_fase_0(self):
+        from services.workflow_orchestrator import WorkflowOrchestrator
+
+        orquestador = WorkflowOrchestrator.__new__(WorkflowOrchestrator)
+        orquestador.db = MagicMock()
+        orquestador.db.strategic_briefs.insert_one = AsyncMock()
+        orquestador.db.projects.insert_one = AsyncMock()
+        orquestador._transition_state = AsyncMock()
+        orquestador.file_analysis = MagicMock()
+        orquestador.report_generator = MagicMock()
+        orquestador.report_generator.generate_agent_report.return_value = "/reports/x.pdf"
+        orquestador.discussion_service = MagicMock()
+        orquestador.discussion_service.initiate_discussion = AsyncMock(return_value={"status": "ok"})
+        orquestador.agent_service = MagicMock()
+        orquestador.agent_service.validate_strategic_alignment = agente("Recomiendo aprobar", 0.1)
+        orquestador.agent_service.validate_fiscal_compliance = agente(None, 0.1, error="timeout LLM")
+        orquestador.agent_service.verify_budget = agente("Rechazado por presupuesto", 0.1)
+
+        sib = {
+            "project_name": "Estudio", "sponsor_name": "Ana", "sponsor_email": "a@x.mx",
+            "department": "Finanzas", "description": "d", "strategic_alignment": "s",
+            "expected_economic_benefit": 10.0, "budget_estimate": 5.0, "duration_months": 3,
+        }
+        inicio = time.perf_counter()
+        await orquestador.process_phase_0_intake(sib)
+        assert time.perf_counter() - inicio < 0.25
+
+        analyses = orquestador.discussion_service.initiate_discussion.call_args.kwargs["initial_analyses"]
+        assert list(analyses) == ["A1_SPONSOR", "A3_FISCAL", "A5_FINANZAS"]
+        assert analyses["A1_SPONSOR"]["decision"] == "APROBADO"
+        assert analyses["A3_FISCAL"]["validation_status"] == "error"
+        assert analyses["A3_FISCAL"]["decision"] == "PENDIENTE"
+        assert analyses["A5_FINANZAS"]["decision"] == "RECHAZADO"
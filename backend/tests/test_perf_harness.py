@@ -0,0 +1,150 @@
+"""
+Pruebas Unitarias: Arnés de rendimiento sin red - Revisar.IA
+Verifica proveedores falsos deterministas (vía los SDK reales), bloqueo de
+red, reporte JSON de percentiles y comparación entre corridas
+"""
+
+import json
+import socket
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+
+from scripts.perf_fakes import (
+    ConfigProveedoresFalsos,
+    PerfilLatencia,
+    RedBloqueada,
+    bloquear_red,
+    instalar_proveedores_falsos,
+)
+from scripts import perf_harness
+
+SIN_LATENCIA = ConfigProveedoresFalsos(llm=PerfilLatencia(), embeddings=PerfilLatencia())
+
+
+class TestProveedoresFalsos:
+
+    def test_openai_sdk_chat_y_embeddings(self):
+        openai = pytest.importorskip("openai")
+        with instalar_proveedores_falsos(SIN_LATENCIA) as proveedores:
+            cliente = openai.OpenAI(api_key="x")
+            mensajes = [{"role": "user", "content": "¿Es deducible?"}]
+            uno = cliente.chat.completions.create(model="gpt-4o", messages=mensajes, max_tokens=300)
+            dos = cliente.chat.completions.create(model="gpt-4o", messages=mensajes, max_tokens=300)
+            vectores = cliente.embeddings.create(model="text-embedding-3-small", input=["a", "b", "a"])
+
+        assert uno.choices[0].message.content == dos.choices[0].message.content
+        assert "APROBAR" in uno.choices[0].message.content
+        assert 200 <= uno.usage.completion_tokens <= 300
+        a, b, a2 = (d.embedding for d in vectores.data)
+        assert len(a) == 1536 and a == pytest.approx(a2) and a != b
+        assert proveedores.resumen_uso()["openai"]["llamadas"] == 2
+        assert proveedores.resumen_uso()["openai_embeddings"]["llamadas"] == 1
+
+    def test_anthropic_sdk(self):
+        anthropic = pytest.importorskip("anthropic")
+        config = ConfigProveedoresFalsos(llm=PerfilLatencia(tokens_min=50, tokens_max=50), decision="rechazar")
+        with instalar_proveedores_falsos(config) as proveedores:
+            respuesta = anthropic.Anthropic(api_key="x").messages.create(
+                model="claude-sonnet-4-5", max_tokens=100,
+                system=[{"type": "text", "text": "Eres un auditor"}],
+                messages=[{"role": "user", "content": "Evalúa"}],
+            )
+        assert "RECHAZAR" in respuesta.content[0].text
+        assert respuesta.usage.output_tokens == 50
+        assert proveedores.resumen_uso()["anthropic"]["tokens_salida"] == 50
+
+    @pytest.mark.asyncio
+    async def test_latencia_simulada_y_endpoints_no_simulados(self):
+        config = ConfigProveedoresFalsos(llm=PerfilLatencia(base_ms=30, tokens_min=10, tokens_max=10))
+        with instalar_proveedores_falsos(config) as proveedores:
+            async with httpx.AsyncClient() as cliente:
+                respuesta = await cliente.post("https://openrouter.ai/api/v1/chat/completions",
+                                               json={"model": "m", "messages": [{"role": "user", "content": "x"}]})
+                perdida = await cliente.get("https://example.com/algo")
+        assert respuesta.status_code == 200
+        assert respuesta.json()["usage"]["completion_tokens"] == 10
+        assert proveedores.resumen_uso()["openrouter"]["segundos_simulados"] == pytest.approx(0.03)
+        assert perdida.status_code == 404
+        assert proveedores.no_simuladas == {"GET example.com/algo": 1}
+
+    def test_restaura_httpx_y_entorno(self, monkeypatch):
+        monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+        init = httpx.Client.__init__
+        with instalar_proveedores_falsos(SIN_LATENCIA):
+            assert httpx.Client.__init__ is not init
+        assert httpx.Client.__init__ is init
+        import os
+        assert "OPENROUTER_API_KEY" not in os.environ
+
+
+class TestSinRed:
+
+    def test_bloquea_hosts_externos(self):
+        with bloquear_red():
+            with pytest.raises(socket.gaierror):
+                socket.getaddrinfo("api.openai.com", 443)
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                with pytest.raises(RedBloqueada):
+                    s.connect(("8.8.8.8", 53))
+            # Loopback sigue permitido (Postgres local)
+            assert socket.getaddrinfo("localhost", 5432)
+        assert socket.socket.connect is not None
+
+
+class TestReporte:
+
+    def test_corrida_sin_red_emite_json(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("DATABASE_URL", raising=False)
+        # Con las llaves falsas RagService abre sus colecciones legacy: fuera del árbol
+        monkeypatch.setenv("RAG_LEGACY_PERSIST_DIR", str(tmp_path / "chroma"))
+        salida = tmp_path / "corrida.json"
+        codigo = perf_harness.main([
+            "--escenarios", "defense_file", "biblioteca", "consejo", "deliberacion",
+            "--iteraciones", "3", "--calentamiento", "0", "--concurrencia", "2",
+            "--latencia-llm-ms", "0", "--jitter-llm-ms", "0", "--ms-por-token", "0",
+            "--latencia-embeddings-ms", "0", "--jitter-embeddings-ms", "0",
+            "--salida", str(salida),
+        ])
+        reporte = json.loads(salida.read_text())
+
+        assert codigo == 0
+        assert reporte["version"] == perf_harness.VERSION_FORMATO
+        assert reporte["escenarios"]["biblioteca"] == {"omitido": "requiere DATABASE_URL a un Postgres local"}
+        for nombre in ("defense_file", "consejo", "deliberacion"):
+            escenario = reporte["escenarios"][nombre]
+            assert escenario["exitosas"] == 3 and escenario["errores"] == 0
+            assert set(escenario["latencia_ms"]) >= {"p50", "p95", "p99"}
+            assert escenario["throughput_por_s"] > 0
+        assert reporte["escenarios"]["consejo"]["proveedores"]["openrouter"]["llamadas"] > 0
+        assert reporte["no_simuladas"] == {}
+
+    def test_rechaza_postgres_remoto(self, monkeypatch):
+        monkeypatch.setenv("DATABASE_URL", "postgresql://u:p@db.ejemplo.com:5432/revisar")
+        with pytest.raises(SystemExit):
+            perf_harness.main(["--escenarios", "defense_file", "--iteraciones", "1"])
+
+
+class TestComparacion:
+
+    @staticmethod
+    def corrida(p50, p95, p99, throughput):
+        return {"escenarios": {
+            "deliberacion": {"latencia_ms": {"p50": p50, "p95": p95, "p99": p99}, "throughput_por_s": throughput},
+            "biblioteca": {"omitido": "sin Postgres"},
+        }}
+
+    def test_detecta_regresiones_por_umbral(self):
+        base = self.corrida(100, 200, 300, 10.0)
+        filas = perf_harness.comparar(base, self.corrida(105, 260, 290, 8.0), umbral=0.10)
+        regresiones = {f["metrica"] for f in filas if f["regresion"]}
+        assert regresiones == {"p95", "throughput_por_s"}
+        assert {f["escenario"] for f in filas} == {"deliberacion"}
+
+    def test_sin_cambios_no_hay_regresion(self):
+        base = self.corrida(100, 200, 300, 10.0)
+        assert not any(f["regresion"] for f in perf_harness.comparar(base, base, umbral=0.0))
@@ -0,0 +1,339 @@
+"""
+Pruebas Unitarias: Paginación por cursor y búsqueda de proyectos - Revisar.IA
+Verifica que el cursor (updated_at, id) recorre todos los proyectos sin
+duplicados ni huecos aunque se inserten proyectos entre páginas, que la
+búsqueda escapa comodines y degrada sin pg_trgm, y (con un PostgreSQL local)
+que los planes usan los índices de migrations/011_projects_keyset_busqueda.sql
+"""
+
+import json
+import os
+import re
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import urlparse
+
+import asyncpg
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.project_service import ProjectService, decode_cursor, encode_cursor
+
+MIGRACION = Path(__file__).parent.parent / "migrations" / "011_projects_keyset_busqueda.sql"
+INICIO = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class PoolProyectosEnMemoria:
+    """Interpreta las consultas de list_projects / list_projects_keyset sobre una lista."""
+
+    def __init__(self):
+        self.filas = []
+        self.consultas = []
+
+    def insertar(self, empresa_id="emp1", updated_at=None, estado="activo", nombre="Proyecto"):
+        fila = {
+            "id": uuid.uuid4(),
+            "empresa_id": empresa_id,
+            "nombre": nombre,
+            "estado": estado,
+            "fase_actual": 0,
+            "created_at": updated_at or INICIO,
+            "updated_at": updated_at or INICIO,
+        }
+        self.filas.append(fila)
+        return fila
+
+    async def fetch(self, query, *params):
+        self.consultas.append((query, params))
+        filas = list(self.filas)
+        for columna, n in re.findall(r"\b(empresa_id|estado|fase_actual) = \$(\d+)", query):
+            filas = [f for f in filas if f[columna] == params[int(n) - 1]]
+
+        cursor = re.search(r"\(updated_at, id\) < \(\$(\d+)::timestamptz, \$(\d+)::uuid\)", query)
+        if cursor:
+            posicion = (params[int(cursor.group(1)) - 1], params[int(cursor.group(2)) - 1])
+            filas = [f for f in filas if (f["updated_at"], f["id"]) < posicion]
+
+        if "ORDER BY updated_at DESC, id DESC" in query:
+            filas.sort(key=lambda f: (f["updated_at"], f["id"]), reverse=True)
+        else:
+            filas.sort(key=lambda f: f["created_at"], reverse=True)
+
+        limite = int(params[int(re.search(r"LIMIT \$(\d+)", query).group(1)) - 1])
+        salto = re.search(r"OFFSET \$(\d+)", query)
+        desde = int(params[int(salto.group(1)) - 1]) if salto else 0
+        return filas[desde:desde + limite]
+
+
+async def recorrer(servicio, limite, entre_paginas=None, **filtros):
+    vistos, cursor, paginas = [], None, 0
+    while True:
+        pagina = await servicio.list_projects_keyset(limit=limite, cursor=cursor, **filtros)
+        vistos.extend(uuid.UUID(p["id"]) for p in pagina["projects"])
+        paginas += 1
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            return vistos, paginas
+        if entre_paginas:
+            entre_paginas(paginas)
+
+
+class TestCursor:
+    """Codificación del cursor opaco"""
+
+    def test_ida_y_vuelta(self):
+        momento = datetime(2026, 3, 4, 5, 6, 7, 891011, tzinfo=timezone.utc)
+        proyecto = uuid.uuid4()
+        assert decode_cursor(encode_cursor(momento, proyecto)) == (momento, proyecto)
+
+    def test_cursor_es_seguro_en_url(self):
+        cursor = encode_cursor(datetime.now(timezone.utc), uuid.uuid4())
+        assert re.fullmatch(r"[A-Za-z0-9_-]+", cursor)
+
+    @pytest.mark.parametrize("cursor", ["no-es-base64!", "bm9wZQ", encode_cursor(INICIO, uuid.uuid4())[:-6]])
+    def test_cursor_invalido(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+class TestPaginacionKeyset:
+    """list_projects_keyset sobre el pool en memoria"""
+
+    @pytest.mark.asyncio
+    async def test_recorre_todo_sin_duplicados(self):
+        pool = PoolProyectosEnMemoria()
+        esperados = [pool.insertar(updated_at=INICIO + timedelta(minutes=i))["id"] for i in range(103)]
+
+        vistos, paginas = await recorrer(ProjectService(pool), 10)
+
+        assert paginas == 11
+        assert len(vistos) == len(set(vistos)) == 103
+        assert vistos == list(reversed(esperados))
+
+    @pytest.mark.asyncio
+    async def test_empates_en_updated_at_se_resuelven_por_id(self):
+        pool = PoolProyectosEnMemoria()
+        for _ in range(57):
+            pool.insertar(updated_at=INICIO)
+
+        vistos, _ = await recorrer(ProjectService(pool), 8)
+
+        assert sorted(vistos) == sorted(f["id"] for f in pool.filas)
+        assert len(set(vistos)) == 57
+
+    @pytest.mark.asyncio
+    async def test_estable_con_inserciones_concurrentes(self):
+        pool = PoolProyectosEnMemoria()
+        originales = {pool.insertar(updated_at=INICIO + timedelta(seconds=i))["id"] for i in range(200)}
+        ahora = [INICIO + timedelta(days=1)]
+
+        def insertar_entre_paginas(_pagina):
+            for _ in range(7):
+                ahora[0] += timedelta(milliseconds=1)
+                pool.insertar(updated_at=ahora[0])
+
+        vistos, _ = await recorrer(ProjectService(pool), 25, entre_paginas=insertar_entre_paginas)
+
+        assert len(vistos) == len(set(vistos))
+        assert set(vistos) == originales
+
+    @pytest.mark.asyncio
+    async def test_offset_duplica_con_inserciones_concurrentes(self):
+        """Referencia: el mismo escenario con OFFSET repite proyectos."""
+        pool = PoolProyectosEnMemoria()
+        for i in range(60):
+            pool.insertar(updated_at=INICIO + timedelta(seconds=i))
+        servicio = ProjectService(pool)
+
+        vistos = []
+        for offset in range(0, 60, 20):
+            vistos.extend(uuid.UUID(p["id"]) for p in await servicio.list_projects(limit=20, offset=offset))
+            pool.insertar(updated_at=INICIO + timedelta(days=1, seconds=offset))
+
+        assert len(vistos) > len(set(vistos))
+
+    @pytest.mark.asyncio
+    async def test_filtros_se_combinan_con_el_cursor(self):
+        pool = PoolProyectosEnMemoria()
+        for i in range(90):
+            pool.insertar(
+                empresa_id=("emp1", "emp2")[i % 2],
+                estado=("activo", "completado", "activo")[i % 3],
+                updated_at=INICIO + timedelta(minutes=i),
+            )
+
+        vistos, _ = await recorrer(ProjectService(pool), 4, empresa_id="emp1", estado="activo")
+
+        esperados = {f["id"] for f in pool.filas if f["empresa_id"] == "emp1" and f["estado"] == "activo"}
+        assert set(vistos) == esperados and len(vistos) == len(esperados)
+
+    @pytest.mark.asyncio
+    async def test_ultima_pagina_exacta_no_da_cursor(self):
+        pool = PoolProyectosEnMemoria()
+        for i in range(20):
+            pool.insertar(updated_at=INICIO + timedelta(minutes=i))
+
+        pagina = await ProjectService(pool).list_projects_keyset(limit=20)
+
+        assert len(pagina["projects"]) == 20
+        assert pagina["next_cursor"] is None
+        assert pool.consultas[-1][1][-1] == 21
+
+    @pytest.mark.asyncio
+    async def test_filas_se_serializan(self):
+        pool = PoolProyectosEnMemoria()
+        pool.insertar()
+
+        proyecto = (await ProjectService(pool).list_projects_keyset())["projects"][0]
+
+        assert isinstance(proyecto["id"], str)
+        assert proyecto["updated_at"] == INICIO.isoformat()
+
+    @pytest.mark.asyncio
+    async def test_cursor_invalido_no_consulta(self):
+        pool = PoolProyectosEnMemoria()
+        with pytest.raises(ValueError):
+            await ProjectService(pool).list_projects_keyset(cursor="basura")
+        assert pool.consultas == []
+
+
+class PoolBusqueda:
+    def __init__(self, sin_trgm=False):
+        self.sin_trgm = sin_trgm
+        self.consultas = []
+
+    async def fetch(self, query, *params):
+        self.consultas.append((query, params))
+        if self.sin_trgm and "similarity(" in query:
+            raise asyncpg.exceptions.UndefinedFunctionError("function similarity(text, text) does not exist")
+        return [{"id": uuid.uuid4(), "nombre": "Consultoría fiscal", "relevancia": 0.8}]
+
+
+class TestBusqueda:
+    """search_projects: SQL generado y degradación sin pg_trgm"""
+
+    @pytest.mark.asyncio
+    async def test_ordena_por_relevancia_y_escapa_comodines(self):
+        pool = PoolBusqueda()
+
+        resultados = await ProjectService(pool).search_projects("emp1", "  50%_desc\\uento ", limit=5)
+
+        query, params = pool.consultas[0]
+        assert "websearch_to_tsquery('spanish', $2)" in query
+        assert "ORDER BY relevancia DESC, updated_at DESC, id DESC" in query
+        assert params == ("emp1", "50%_desc\\uento", "%50\\%\\_desc\\\\uento%", 5)
+        assert resultados[0]["relevancia"] == 0.8
+
+    def test_expresion_coincide_con_el_indice(self):
+        from services.project_service import VECTOR_BUSQUEDA
+
+        def normalizar(sql):
+            return re.sub(r"[\s()]", "", sql)
+
+        assert normalizar(VECTOR_BUSQUEDA) in normalizar(MIGRACION.read_text())
+
+    @pytest.mark.asyncio
+    async def test_sin_pg_trgm_usa_subcadena(self):
+        pool = PoolBusqueda(sin_trgm=True)
+
+        resultados = await ProjectService(pool).search_projects("emp1", "fiscal")
+
+        assert len(pool.consultas) == 2
+        query, params = pool.consultas[1]
+        assert "similarity(" not in query and "ILIKE $2" in query
+        assert params == ("emp1", "%fiscal%", 20)
+        assert resultados
+
+
+def _postgres_local():
+    url = os.environ.get("DATABASE_URL", "")
+    host = urlparse(url).hostname if url else None
+    return url if host in ("localhost", "127.0.0.1", "::1") else None
+
+
+@pytest.mark.skipif(not _postgres_local(), reason="requiere DATABASE_URL a un PostgreSQL local")
+class TestPlanesPostgres:
+    """EXPLAIN de las consultas reales sobre una tabla temporal con la migración aplicada"""
+
+    @staticmethod
+    async def _conexion_con_datos():
+        conn = await asyncpg.connect(_postgres_local())
+        try:
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except asyncpg.exceptions.InsufficientPrivilegeError:
+            await conn.close()
+            pytest.skip("sin privilegios para instalar pg_trgm")
+
+        # La tabla temporal oculta a public.projects durante la sesión; con dos
+        # empresas el filtro por empresa no es selectivo y el plan depende de
+        # los índices de la migración
+        await conn.execute("""
+            CREATE TEMP TABLE projects (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                empresa_id TEXT NOT NULL,
+                nombre TEXT NOT NULL,
+                descripcion TEXT,
+                tipo TEXT,
+                estado TEXT DEFAULT 'activo',
+                fase_actual INTEGER DEFAULT 0,
+                proveedor_rfc TEXT,
+                proveedor_nombre TEXT,
+                created_at TIMESTAMPTZ DEFAULT NOW(),
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """)
+        await conn.execute(MIGRACION.read_text().replace("CREATE EXTENSION IF NOT EXISTS pg_trgm;", ""))
+        await conn.execute("""
+            INSERT INTO projects (empresa_id, nombre, descripcion, proveedor_rfc, proveedor_nombre, updated_at)
+            SELECT 'emp' || (i % 2),
+                   'Proyecto ' || md5(i::text),
+                   'Servicio de ' || (ARRAY['consultoría', 'auditoría', 'marketing', 'software'])[1 + i % 4],
+                   upper(substr(md5((i * 7)::text), 1, 12)),
+                   'Proveedor ' || md5((i * 3)::text),
+                   NOW() - (i || ' minutes')::interval
+            FROM generate_series(1, 40000) AS i
+        """)
+        await conn.execute("ANALYZE projects")
+        return conn
+
+    @staticmethod
+    async def _plan(conn, sql, params):
+        plan = await conn.fetchval("EXPLAIN (FORMAT JSON) " + sql, *params)
+        return json.dumps(plan if isinstance(plan, list) else json.loads(plan))
+
+    @pytest.mark.asyncio
+    async def test_keyset_usa_indice_en_paginas_profundas(self):
+        conn = await self._conexion_con_datos()
+        try:
+            servicio = ProjectService(conn)
+            fila = await conn.fetchrow(
+                "SELECT updated_at, id FROM projects WHERE empresa_id = 'emp1' ORDER BY updated_at DESC, id DESC OFFSET 150 LIMIT 1"
+            )
+            sql, params = servicio._keyset_query("emp1", None, None, 50, encode_cursor(fila["updated_at"], fila["id"]))
+            plan = await self._plan(conn, sql, params)
+            assert "idx_projects_empresa_keyset" in plan
+            assert "Seq Scan" not in plan and '"Sort"' not in plan
+
+            sql, params = servicio._keyset_query(None, None, None, 50, encode_cursor(fila["updated_at"], fila["id"]))
+            assert "idx_projects_keyset" in await self._plan(conn, sql, params)
+        finally:
+            await conn.close()
+
+    @pytest.mark.asyncio
+    async def test_busqueda_usa_indices_trigram_y_fts(self):
+        conn = await self._conexion_con_datos()
+        try:
+            objetivo = await conn.fetchval("SELECT proveedor_rfc FROM projects WHERE empresa_id = 'emp1' LIMIT 1")
+            sql, params = ProjectService(conn)._search_query("emp1", objetivo[2:9], 20)
+            plan = await self._plan(conn, sql, params)
+            assert "Seq Scan" not in plan
+            assert "idx_projects_proveedor_rfc_trgm" in plan
+            assert "idx_projects_busqueda_fts" in plan
+
+            encontrados = await ProjectService(conn).search_projects("emp1", objetivo[2:9])
+            assert encontrados and encontrados[0]["proveedor_rfc"] == objetivo
+        finally:
+            await conn.close()
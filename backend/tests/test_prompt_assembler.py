@@ -0,0 +1,126 @@
+"""
+Pruebas Unitarias: Ensamblador de prompts con prefijos cacheables - Revisar.IA
+Verifica prefijos idénticos byte a byte entre llamadas, envío a Anthropic con
+cache_control, tasas de acierto y tiempo de ensamblado por llamada
+"""
+
+import time
+import pytest
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import services.anthropic_provider as anthropic_provider
+from services.agent_prompts import OPTIMIZED_PROMPTS, build_full_prompt
+from services.dynamic_agent_loader import DynamicAgentLoader
+from services.specialized_agent_prompts import get_specialized_prompt
+from services.prompt_assembler import (
+    MAX_CACHE_BREAKPOINTS, AssembledPrompt, PromptAssembler, PromptBlock, prompt_assembler,
+)
+
+AGENTE = next(iter(OPTIMIZED_PROMPTS))
+
+
+class TestPrefijosEstables:
+
+    def test_build_full_prompt_prefijo_identico(self):
+        uno = build_full_prompt(AGENTE, {"contexto_empresa": "Empresa: ABC", "datos_operacion": "Monto: $50,000"})
+        dos = build_full_prompt(AGENTE, {"contexto_empresa": "Empresa: XYZ", "datos_operacion": "Monto: $9,999"})
+
+        assert isinstance(uno, AssembledPrompt)
+        assert uno.prefix is dos.prefix
+        assert uno.prefix.text.encode("utf-8") == dos.prefix.text.encode("utf-8")
+        assert uno != dos
+        assert uno.startswith(uno.prefix.text) and dos.startswith(dos.prefix.text)
+        assert "Empresa: ABC" in uno.volatile and "Empresa: ABC" not in uno.prefix.text
+        assert OPTIMIZED_PROMPTS[AGENTE].output_format in uno.prefix.text
+
+    @pytest.mark.asyncio
+    async def test_prompt_dinamico_conserva_el_texto(self):
+        loader = DynamicAgentLoader()
+        contexto = {"proyecto": "Consultoría fiscal", "monto": 150000}
+        uno = await loader.get_dynamic_prompt("A1_ESTRATEGIA", context=contexto)
+        dos = await loader.get_dynamic_prompt("A1_ESTRATEGIA", context={"proyecto": "Otro"})
+
+        assert uno.prefix is dos.prefix
+        assert "CONTEXTO ACTUAL" in uno.volatile and "Consultoría fiscal" not in uno.prefix.text
+
+        # Mismo texto que la concatenación original con "\n".join(partes)
+        agente = loader._get_fallback_agent("A1_ESTRATEGIA")
+        partes = [get_specialized_prompt("A1_ESTRATEGIA")]
+        partes.append(f"\n\nPERSONALIDAD:\n{agente.personalidad}")
+        partes.append(f"\n\nTUS CAPACIDADES: {', '.join(agente.capabilities)}")
+        partes.append(f"\n\nFASES EN LAS QUE PARTICIPAS: {', '.join(agente.fases_activas)}")
+        assert str(uno).startswith("\n".join(partes))
+
+    def test_breakpoints_maximos(self):
+        ensamblador = PromptAssembler()
+        bloques = [PromptBlock(f"bloque {i}. ", cache_breakpoint=True) for i in range(7)]
+        prompt = ensamblador.assemble(bloques, volatile="pregunta")
+        assert len(prompt.prefix.segments) == MAX_CACHE_BREAKPOINTS
+        assert "".join(prompt.prefix.segments) == prompt.prefix.text
+        sistema = prompt.anthropic_system()
+        assert sum("cache_control" in b for b in sistema) == MAX_CACHE_BREAKPOINTS
+        assert sistema[-1] == {"type": "text", "text": "pregunta"}
+
+    def test_tasa_de_aciertos(self):
+        ensamblador = PromptAssembler()
+        for i in range(10):
+            ensamblador.assemble(["fijo A", "fijo B"], volatile=f"consulta {i}", label="A3_FISCAL")
+        ensamblador.assemble(["otro prefijo"], label="A5_FINANZAS")
+        stats = ensamblador.get_stats()
+        assert stats["prefix_hits"] == 9 and stats["prefix_misses"] == 2
+        assert stats["by_label"]["A3_FISCAL"]["prefix_hit_ratio"] == 0.9
+        assert stats["entries"] == 2
+
+
+class TestAnthropicCacheControl:
+
+    def test_envia_bloques_y_registra_uso(self, monkeypatch):
+        enviados = []
+
+        def crear(**kwargs):
+            enviados.append(kwargs)
+            usage = SimpleNamespace(input_tokens=50, cache_read_input_tokens=950, cache_creation_input_tokens=0)
+            return SimpleNamespace(content=[SimpleNamespace(text="ok")], usage=usage)
+
+        cliente = SimpleNamespace(messages=SimpleNamespace(create=crear))
+        monkeypatch.setattr(anthropic_provider, "_get_client", lambda: cliente)
+
+        sistema = prompt_assembler.assemble(
+            [PromptBlock("Eres el agente fiscal. " * 50, cache_breakpoint=True)],
+            volatile="Proyecto: ABC",
+            label="test-anthropic",
+        )
+        assert anthropic_provider.chat_completion_sync([{"role": "user", "content": "hola"}], sistema) == "ok"
+        assert enviados[0]["system"][0]["cache_control"] == {"type": "ephemeral"}
+        assert enviados[0]["system"][-1] == {"type": "text", "text": "Proyecto: ABC"}
+
+        anthropic_provider.chat_completion_sync([{"role": "user", "content": "hola"}], "texto plano")
+        assert enviados[1]["system"] == "texto plano"
+
+        stats = prompt_assembler.get_stats()["by_label"]["test-anthropic"]
+        assert stats["provider_cache_hit_ratio"] == 0.95
+
+
+class TestTiempoDeEnsamblado:
+
+    def test_tiempo_por_llamada(self):
+        ensamblador = PromptAssembler()
+        bloques = [PromptBlock("Marco normativo. " * 4000, cache_breakpoint=True), PromptBlock("Formato. " * 500)]
+
+        inicio = time.perf_counter()
+        frio = ensamblador.assemble(bloques, volatile="consulta 0")
+        ms_frio = (time.perf_counter() - inicio) * 1000
+
+        llamadas = 1000
+        inicio = time.perf_counter()
+        for i in range(llamadas):
+            prompt = ensamblador.assemble(bloques, volatile=f"consulta {i}")
+        ms_por_llamada = (time.perf_counter() - inicio) * 1000 / llamadas
+
+        print(f"\nensamblado ({len(frio)} chars): frío {ms_frio:.3f} ms, memoizado {ms_por_llamada:.4f} ms/llamada")
+        assert prompt.prefix is frio.prefix
+        assert ms_por_llamada < 1.0
@@ -0,0 +1,280 @@
+"""
+Pruebas Unitarias: Rate limiter con cuota reservada por worker - Revisar.IA
+Verifica consumo local sin ir a la BD, límite global entre workers,
+escritura diferida en lote, caché de planes y liberación de reservas
+"""
+
+import asyncio
+import importlib
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from middleware.rate_limiter import RateLimiter, RateLimitExceeded
+
+# middleware/__init__ re-exporta la instancia `rate_limiter` con el mismo nombre que el módulo
+rl = importlib.import_module("middleware.rate_limiter")
+
+EMPRESA = "00000000-0000-0000-0000-000000000001"
+
+
+class PoolFalso:
+    """Pool asyncpg en memoria con empresas, usage_tracking y usage_leases; `ahora` es NOW()."""
+
+    def __init__(self, plan="starter", falla=False):
+        self.plan = plan
+        self.falla = falla
+        self.filas = {}
+        self.leases = {}
+        self.ahora = 0.0
+        self.consultas = []
+
+    def acquire(self):
+        pool = self
+
+        class Adquisicion:
+            async def __aenter__(self):
+                if pool.falla:
+                    raise ConnectionError("BD caída")
+                return pool
+
+            async def __aexit__(self, *_):
+                pass
+
+        return Adquisicion()
+
+    def transaction(self):
+        class Transaccion:
+            async def __aenter__(self):
+                pass
+
+            async def __aexit__(self, *_):
+                pass
+
+        return Transaccion()
+
+    async def fetchval(self, sql, empresa_id):
+        self.consultas.append("plan")
+        return self.plan
+
+    async def fetchrow(self, sql, empresa_id, fecha, *args):
+        if "usage_leases" in sql:
+            self.consultas.append("reclaim")
+            (vencimiento,) = args
+            vivos, vencidos = [], 0
+            for clave, lease in list(self.leases.items()):
+                if clave[:2] != (empresa_id, fecha):
+                    continue
+                if lease["heartbeat"] < self.ahora - vencimiento:
+                    vencidos += 1
+                    del self.leases[clave]
+                elif lease["requests"] == 0 and lease["tokens"] == 0:
+                    del self.leases[clave]
+                else:
+                    vivos.append(lease)
+            return {
+                "requests": sum(l["requests"] for l in vivos),
+                "tokens": sum(l["tokens"] for l in vivos),
+                "expired": vencidos,
+            }
+        self.consultas.append("select")
+        return dict(self.filas[(empresa_id, fecha)])
+
+    async def execute(self, sql, *args):
+        if "INSERT INTO usage_tracking" in sql:
+            self.consultas.append("insert")
+            self.filas.setdefault((args[0], args[1]), {
+                "requests_today": 0, "tokens_today": 0, "requests_reserved": 0, "tokens_reserved": 0
+            })
+        elif "unnest" in sql:
+            self.consultas.append("flush")
+            worker = args[6]
+            for empresa, fecha, req, tok, rel_req, rel_tok in zip(*args[:6]):
+                fila = self.filas[(empresa, fecha)]
+                fila["requests_today"] += req
+                fila["tokens_today"] += tok
+                fila["requests_reserved"] = max(0, fila["requests_reserved"] - rel_req)
+                fila["tokens_reserved"] = max(0, fila["tokens_reserved"] - rel_tok)
+                lease = self.leases.get((empresa, fecha, worker))
+                if lease is not None:
+                    lease["requests"] = max(0, lease["requests"] - rel_req)
+                    lease["tokens"] = max(0, lease["tokens"] - rel_tok)
+                    lease["heartbeat"] = self.ahora
+        else:
+            self.consultas.append("lease")
+            empresa, fecha, req, tok, worker, vivos_req, vivos_tok = args
+            lease = self.leases.setdefault((empresa, fecha, worker), {"requests": 0, "tokens": 0})
+            lease["requests"] += req
+            lease["tokens"] += tok
+            lease["heartbeat"] = self.ahora
+            fila = self.filas[(empresa, fecha)]
+            fila["requests_reserved"] = vivos_req + req
+            fila["tokens_reserved"] = vivos_tok + tok
+
+    def fila(self):
+        return next(iter(self.filas.values()))
+
+
+def limitador(pool, requests=10, tokens=10_000):
+    limiter = RateLimiter(pool=pool)
+    limiter.limits = {"starter": {"requests_per_day": requests, "tokens_per_day": tokens}}
+    return limiter
+
+
+class TestRateLimiter:
+
+    @pytest.mark.asyncio
+    async def test_consumo_local_y_escritura_en_lote(self, monkeypatch):
+        monkeypatch.setattr(rl, "LEASE_FRACTION", 0.5)
+        pool = PoolFalso()
+        limiter = limitador(pool, requests=100, tokens=100_000)
+
+        for _ in range(30):
+            resultado = await limiter.check_and_increment(EMPRESA, tokens_used=100)
+        assert pool.consultas.count("lease") == 1
+        assert limiter.stats["local"] == 29
+        assert resultado["plan"] == "starter"
+        assert resultado["requests_remaining"] == 70
+
+        assert await limiter.flush() == 1
+        assert pool.consultas.count("flush") == 1
+        fila = pool.fila()
+        assert fila["requests_today"] == 30
+        assert fila["tokens_today"] == 3000
+        assert fila["requests_reserved"] == 20
+        await limiter.close()
+
+    @pytest.mark.asyncio
+    async def test_workers_no_superan_el_limite_global(self, monkeypatch):
+        monkeypatch.setattr(rl, "LEASE_FRACTION", 0.3)
+        pool = PoolFalso()
+        workers = [limitador(pool), limitador(pool)]
+
+        permitidas = rechazadas = 0
+        for i in range(30):
+            try:
+                await workers[i % 2].check_and_increment(EMPRESA, tokens_used=10)
+                permitidas += 1
+            except RateLimitExceeded as e:
+                rechazadas += 1
+                assert "10 requests" in e.message
+        assert permitidas == 10
+        assert rechazadas == 20
+
+        for worker in workers:
+            await worker.close()
+        fila = pool.fila()
+        assert fila["requests_today"] == 10
+        assert fila["requests_reserved"] == 0
+
+    @pytest.mark.asyncio
+    async def test_plan_cacheado_entre_reservas(self, monkeypatch):
+        monkeypatch.setattr(rl, "LEASE_FRACTION", 0.1)
+        pool = PoolFalso()
+        limiter = limitador(pool)
+        for _ in range(5):
+            await limiter.check_and_increment(EMPRESA)
+        assert pool.consultas.count("lease") == 5
+        assert pool.consultas.count("plan") == 1
+        await limiter.close()
+
+    @pytest.mark.asyncio
+    async def test_reserva_ociosa_se_devuelve(self, monkeypatch):
+        monkeypatch.setattr(rl, "LEASE_FRACTION", 0.5)
+        pool = PoolFalso()
+        limiter = limitador(pool)
+        await limiter.check_and_increment(EMPRESA, tokens_used=50)
+        assert pool.fila()["requests_reserved"] == 5
+
+        monkeypatch.setattr(rl, "LEASE_TTL_SECONDS", 0)
+        await asyncio.sleep(0.01)
+        await limiter.flush()
+        fila = pool.fila()
+        assert fila["requests_reserved"] == 0 and fila["tokens_reserved"] == 0
+        assert fila["requests_today"] == 1 and fila["tokens_today"] == 50
+        await limiter.close()
+
+    @pytest.mark.asyncio
+    async def test_limite_de_tokens(self, monkeypatch):
+        monkeypatch.setattr(rl, "LEASE_FRACTION", 1.0)
+        pool = PoolFalso()
+        limiter = limitador(pool, requests=100, tokens=1000)
+        await limiter.check_and_increment(EMPRESA, tokens_used=1500)
+        with pytest.raises(RateLimitExceeded) as exc:
+            await limiter.check_and_increment(EMPRESA, tokens_used=10)
+        assert "tokens" in exc.value.message
+        await limiter.close()
+        assert pool.fila()["tokens_today"] == 1500
+
+    @pytest.mark.asyncio
+    async def test_bd_caida_no_bloquea(self):
+        limiter = limitador(PoolFalso(falla=True))
+        resultado = await limiter.check_and_increment(EMPRESA, tokens_used=10)
+        assert resultado["plan"] == "unknown"
+        await limiter.close()
+
+    @pytest.mark.asyncio
+    async def test_reserva_de_worker_caido_se_reclama(self, monkeypatch):
+        monkeypatch.setattr(rl, "LEASE_FRACTION", 0.5)
+        monkeypatch.setattr(rl, "LEASE_EXPIRY_SECONDS", 120)
+        pool = PoolFalso()
+        caido = limitador(pool)
+        await caido.check_and_increment(EMPRESA, tokens_used=50)
+        await caido.flush()
+        caido._flusher.cancel()  # muere sin close(): su reserva queda en la BD
+        assert pool.fila()["requests_reserved"] == 4
+
+        # Mientras su heartbeat está vigente la reserva se respeta
+        pool.ahora = 60
+        vivo = limitador(pool)
+        for _ in range(5):
+            await vivo.check_and_increment(EMPRESA)
+        with pytest.raises(RateLimitExceeded):
+            await vivo.check_and_increment(EMPRESA)
+        assert vivo.stats["expired_leases"] == 0
+
+        # Vencido el heartbeat, el siguiente lease la recupera; el vivo lo renueva al escribir
+        pool.ahora = 150
+        await vivo.flush()
+        pool.ahora = 200
+        resultado = await vivo.check_and_increment(EMPRESA)
+        assert vivo.stats["expired_leases"] == 1
+        assert resultado["requests_remaining"] == 3
+        await vivo.close()
+        fila = pool.fila()
+        assert fila["requests_today"] == 7
+        assert fila["requests_reserved"] == 0
+
+    @pytest.mark.asyncio
+    async def test_worker_activo_renueva_heartbeat(self, monkeypatch):
+        monkeypatch.setattr(rl, "LEASE_FRACTION", 0.5)
+        monkeypatch.setattr(rl, "LEASE_EXPIRY_SECONDS", 120)
+        pool = PoolFalso()
+        uno, otro = limitador(pool), limitador(pool)
+        await uno.check_and_increment(EMPRESA)
+        for t in (100, 200, 300):
+            pool.ahora = t
+            await uno.check_and_increment(EMPRESA)
+            await uno.flush()
+
+        await otro.check_and_increment(EMPRESA)
+        assert otro.stats["expired_leases"] == 0
+        assert pool.fila()["requests_reserved"] == 1 + 5  # lo que le queda a uno + el lease de otro
+        await uno.close()
+        await otro.close()
+
+    @pytest.mark.asyncio
+    async def test_reservas_huerfanas_sin_lease_se_recalculan(self, monkeypatch):
+        """Reservas previas a usage_leases (o de filas ya borradas) no cuentan como vivas"""
+        monkeypatch.setattr(rl, "LEASE_FRACTION", 0.5)
+        pool = PoolFalso()
+        pool.filas[(EMPRESA, rl.datetime.utcnow().date())] = {
+            "requests_today": 2, "tokens_today": 0, "requests_reserved": 8, "tokens_reserved": 0
+        }
+        limiter = limitador(pool)
+        resultado = await limiter.check_and_increment(EMPRESA)
+        assert resultado["requests_remaining"] == 7
+        assert pool.fila()["requests_reserved"] == 5
+        await limiter.close()
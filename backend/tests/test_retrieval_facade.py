@@ -0,0 +1,303 @@
+"""
+Pruebas Unitarias: Fachada de recuperación RAG - Revisar.IA
+Verifica fan-out concurrente, lotes multi-agente, normalización de scores,
+deduplicación, presupuesto de latencia y migración reanudable Chroma -> pgvector
+"""
+
+import asyncio
+import pytest
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.retrieval_facade import (
+    ChromaBackend,
+    RetrievalBackend,
+    RetrievalFacade,
+    chroma_similarity,
+    make_hit,
+    merge_hits,
+)
+
+ART_5A = "Artículo 5-A CFF: los actos jurídicos que carezcan de razón de negocios..."
+
+
+class BackendFalso(RetrievalBackend):
+
+    def __init__(self, name, hits, demora=0.0, embedding_model="text-embedding-3-small"):
+        self.name = name
+        self.hits = hits
+        self.demora = demora
+        self.embedding_model = embedding_model
+        self.embeddings_recibidos = []
+
+    async def search(self, query, query_embedding, agent_id, empresa_id, limit):
+        self.embeddings_recibidos.append(query_embedding)
+        await asyncio.sleep(self.demora)
+        return [make_hit(texto, score, self.name) for texto, score in self.hits]
+
+
+class ColeccionFalsa:
+    """Colección Chroma en memoria (get paginado y query)."""
+
+    def __init__(self, name, chunks, metadata=None):
+        self.name = name
+        self.chunks = chunks
+        self.metadata = metadata or {}
+        self.consultas = []
+
+    def get(self, offset=0, limit=10, include=None):
+        lote = self.chunks[offset:offset + limit]
+        return {
+            "ids": [c["id"] for c in lote],
+            "documents": [c["text"] for c in lote],
+            "metadatas": [c.get("meta", {}) for c in lote],
+            "embeddings": [c.get("embedding") for c in lote],
+        }
+
+    def query(self, **kwargs):
+        self.consultas.append(kwargs)
+        return {"documents": [[ART_5A]], "metadatas": [[{"doc_id": "cff"}]], "distances": [[0.4]]}
+
+
+class TestNormalizacionYFusion:
+
+    def test_distancias_chroma(self):
+        assert chroma_similarity(0.4, "l2") == pytest.approx(0.8)
+        assert chroma_similarity(0.25, "cosine") == pytest.approx(0.75)
+        assert chroma_similarity(3.5, "l2") == 0.0
+
+    def test_deduplica_por_contenido(self):
+        resultados = merge_hits([
+            [make_hit(ART_5A, 0.7, "chroma"), make_hit("LISR 27", 0.6, "chroma")],
+            [make_hit("  artículo 5-A CFF: los actos jurídicos que carezcan de razón de negocios... ", 0.9, "pgvector")],
+        ], limit=5)
+        assert len(resultados) == 2
+        assert resultados[0]["score"] == 0.9
+        assert resultados[0]["backends"] == ["chroma", "pgvector"]
+
+
+class TestRetrievalFacade:
+
+    @pytest.mark.asyncio
+    async def test_fan_out_con_un_solo_embedding(self):
+        llamadas = []
+
+        async def embed(texto):
+            llamadas.append(texto)
+            return [0.1, 0.2]
+
+        chroma = BackendFalso("chroma", [(ART_5A, 0.8)], demora=0.05)
+        kb = BackendFalso("kb_chunks", [("Tesis materialidad", 0.7)], demora=0.05, embedding_model="voyage-law-2")
+        pg = BackendFalso("pgvector", [(ART_5A, 0.85)], demora=0.05)
+        facade = RetrievalFacade([chroma, kb, pg], embed_fn=embed)
+
+        inicio = time.perf_counter()
+        resultado = await facade.retrieve("razón de negocios", agent_id="A3_FISCAL", empresa_id="e1")
+        assert time.perf_counter() - inicio < 0.15
+        assert llamadas == ["razón de negocios"]
+        assert chroma.embeddings_recibidos == [[0.1, 0.2]]
+        assert kb.embeddings_recibidos == [None]
+        assert [r["content"] for r in resultado["results"]] == [ART_5A, "Tesis materialidad"]
+        assert resultado["results"][0]["backend"] == "pgvector"
+
+    @pytest.mark.asyncio
+    async def test_presupuesto_de_latencia(self):
+        async def embed(texto):
+            return [1.0]
+
+        rapido = BackendFalso("chroma", [(ART_5A, 0.8)])
+        lento = BackendFalso("kb_chunks", [("tarde", 0.99)], demora=1.0)
+        facade = RetrievalFacade([rapido, lento], budget_seconds=0.1, embed_fn=embed)
+
+        inicio = time.perf_counter()
+        resultado = await facade.retrieve("q", agent_id="A1_SPONSOR")
+        assert time.perf_counter() - inicio < 0.3
+        assert [r["content"] for r in resultado["results"]] == [ART_5A]
+        assert resultado["backends"]["kb_chunks"]["status"] == "timeout"
+        assert resultado["backends"]["chroma"]["status"] == "ok"
+
+    @pytest.mark.asyncio
+    async def test_backend_con_error_no_rompe(self):
+        class Roto(RetrievalBackend):
+            name = "pgvector"
+
+            async def search(self, *args):
+                raise RuntimeError("sin conexión")
+
+        async def embed(texto):
+            return None
+
+        facade = RetrievalFacade([Roto(), BackendFalso("chroma", [(ART_5A, 0.8)])], embed_fn=embed)
+        resultado = await facade.retrieve("q", agent_id="A3_FISCAL")
+        assert len(resultado["results"]) == 1
+        assert resultado["backends"]["pgvector"]["status"] == "error"
+
+    @pytest.mark.asyncio
+    async def test_chroma_backend_usa_embedding_compartido(self):
+        coleccion = ColeccionFalsa("satma_prod_A3", [])
+        backend = ChromaBackend("chroma", lambda agent_id: coleccion, "text-embedding-3-small")
+        hits = await backend.search("q", [0.5, 0.5], "A3_FISCAL", None, 3)
+        assert coleccion.consultas[0]["query_embeddings"] == [[0.5, 0.5]]
+        assert hits[0]["score"] == pytest.approx(0.8)
+        assert hits[0]["document_id"] == "cff"
+
+    @pytest.mark.asyncio
+    async def test_lote_de_agentes_concurrente(self):
+        llamadas = []
+
+        async def embed(texto):
+            llamadas.append(texto)
+            return [1.0]
+
+        class PorEmpresa(BackendFalso):
+            per_agent = False
+
+        chroma = BackendFalso("chroma", [(ART_5A, 0.8)], demora=0.05)
+        pg = PorEmpresa("pgvector", [("Política de precios de transferencia", 0.9)], demora=0.05)
+        facade = RetrievalFacade([chroma, pg], embed_fn=embed)
+        agentes = ["A1_SPONSOR", "A3_FISCAL", "A5_FINANZAS", "LEGAL"]
+
+        inicio = time.perf_counter()
+        resultados = await facade.retrieve_many("razón de negocios", agentes, empresa_id="e1")
+        assert time.perf_counter() - inicio < 0.15
+        assert llamadas == ["razón de negocios"]
+        assert len(chroma.embeddings_recibidos) == 4
+        assert len(pg.embeddings_recibidos) == 1
+        for agente in agentes:
+            assert [r["content"] for r in resultados[agente]["results"]] == [
+                "Política de precios de transferencia", ART_5A
+            ]
+            assert set(resultados[agente]["backends"]) == {"chroma", "pgvector"}
+
+
+class TestPreloadDeliberacion:
+
+    @pytest.mark.asyncio
+    async def test_preload_consulta_la_fachada(self, monkeypatch):
+        import services.deliberation_orchestrator as orq
+
+        async def embed(texto):
+            return [1.0]
+
+        backend = BackendFalso("chroma", [(ART_5A, 0.8)])
+        facade = RetrievalFacade([backend], embed_fn=embed)
+        rag_service = object()
+        monkeypatch.setitem(orq._retrieval_facades, id(rag_service), facade)
+
+        contextos = await orq.preload_rag_contexts_parallel({"name": "Estudio", "description": "TP"}, rag_service)
+        assert set(contextos) == {"A1_SPONSOR", "A3_FISCAL", "A5_FINANZAS", "LEGAL"}
+        assert contextos["A3_FISCAL"][0]["content"] == ART_5A
+        assert contextos["A3_FISCAL"][0]["metadata"]["source"] == "chroma"
+
+    @pytest.mark.asyncio
+    async def test_contextos_se_reutilizan_durante_la_deliberacion(self, monkeypatch):
+        import services.deliberation_orchestrator as orq
+
+        cargas = []
+
+        async def preload(project, rag_service):
+            cargas.append(project["id"])
+            return {"A3_FISCAL": [{"content": ART_5A}, {"content": "otro"}]}
+
+        class RagNoUsado:
+            def query(self, **kwargs):
+                raise AssertionError("no debería consultar el RAG")
+
+        monkeypatch.setattr(orq, "preload_rag_contexts_parallel", preload)
+        orquestador = orq.DeliberationOrchestrator.__new__(orq.DeliberationOrchestrator)
+        orquestador.rag_service = RagNoUsado()
+        orquestador._rag_contexts = orq.OrderedDict()
+
+        proyecto = {"id": "PROJ-1", "name": "Estudio"}
+        primera = await orquestador._load_rag_contexts(proyecto)
+        reanudacion = await orquestador._load_rag_contexts(dict(proyecto))
+        assert cargas == ["PROJ-1"]
+        assert reanudacion is primera
+        assert orquestador.get_rag_context("A3_FISCAL", "Estudio", n_results=1, project_id="PROJ-1") == [
+            {"content": ART_5A}
+        ]
+
+        monkeypatch.setattr(orq, "RAG_CONTEXT_TTL_SECONDS", 0)
+        await asyncio.sleep(0.01)
+        await orquestador._load_rag_contexts(proyecto)
+        assert cargas == ["PROJ-1", "PROJ-1"]
+
+
+class ConexionFalsa:
+    """Conexión asyncpg en memoria para rag_chunks y rag_migration_progress."""
+
+    def __init__(self, fallar_en_lote=None):
+        self.chunks = {}
+        self.progreso = {}
+        self.lotes = 0
+        self.fallar_en_lote = fallar_en_lote
+
+    async def fetchrow(self, sql, source, collection):
+        return self.progreso.get((source, collection))
+
+    async def fetch(self, sql, ids, agents, contents, hashes, doc_ids, metas, vectors, sources):
+        self.lotes += 1
+        if self.lotes == self.fallar_en_lote:
+            raise ConnectionError("conexión perdida")
+        insertados = []
+        for fila in zip(ids, agents, contents, hashes):
+            if fila[0] in self.chunks or any(c[1] == fila[1] and c[3] == fila[3] for c in self.chunks.values()):
+                continue
+            self.chunks[fila[0]] = fila
+            insertados.append({"id": fila[0]})
+        return insertados
+
+    async def execute(self, sql, source, collection, offset, migrated, duplicates, completed):
+        self.progreso[(source, collection)] = {
+            "next_offset": offset, "migrated": migrated, "duplicates": duplicates, "completed": completed
+        }
+
+    def transaction(self):
+        conexion = self
+
+        class Transaccion:
+            async def __aenter__(self):
+                self.respaldo = (dict(conexion.chunks), dict(conexion.progreso))
+
+            async def __aexit__(self, tipo, *_):
+                if tipo is not None:
+                    conexion.chunks, conexion.progreso = self.respaldo
+
+        return Transaccion()
+
+
+class TestMigracionChromaPgvector:
+
+    def _coleccion(self):
+        vector = [0.01] * 1536
+        chunks = [{"id": f"c{k}", "text": f"chunk {k}", "embedding": vector, "meta": {"doc_id": "d"}} for k in range(5)]
+        chunks.append({"id": "dup", "text": "CHUNK 0", "embedding": vector})
+        chunks.append({"id": "sin-vector", "text": "chunk sin embedding", "embedding": None})
+        return ColeccionFalsa("satma_prod_A3", chunks)
+
+    @pytest.mark.asyncio
+    async def test_migracion_reanudable(self):
+        from scripts.migrate_chroma_to_pgvector import migrate_collection
+
+        async def embed(textos):
+            return [[0.02] * 1536 for _ in textos]
+
+        conexion = ConexionFalsa(fallar_en_lote=2)
+        coleccion = self._coleccion()
+        with pytest.raises(ConnectionError):
+            await migrate_collection(conexion, coleccion, "chroma", "A3", batch_size=2, embed_batch=embed)
+        assert conexion.progreso[("chroma", "satma_prod_A3")]["next_offset"] == 2
+        assert set(conexion.chunks) == {"c0", "c1"}
+
+        resultado = await migrate_collection(conexion, coleccion, "chroma", "A3", batch_size=2, embed_batch=embed)
+        assert resultado["migrated"] == 6
+        assert resultado["duplicates"] == 1
+        assert "sin-vector" in conexion.chunks
+        assert conexion.progreso[("chroma", "satma_prod_A3")]["completed"]
+
+        otra_vez = await migrate_collection(conexion, coleccion, "chroma", "A3", batch_size=2)
+        assert otra_vez["resumed"]
+        assert conexion.lotes == 5
@@ -0,0 +1,247 @@
+"""
+Pruebas Unitarias: Caché semántico de respuestas RAG - Revisar.IA
+Verifica umbral de similitud, ámbito por empresa/agente, invalidación por documento
+y por ingesta, LRU/TTL y métricas
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.semantic_cache import SemanticAnswerCache, document_ids_from_metadatas
+
+MATERIALIDAD = [1.0, 0.0, 0.0]
+MATERIALIDAD_PARAFRASIS = [0.99, 0.05, 0.0]
+RAZON_NEGOCIOS = [0.0, 1.0, 0.0]
+
+
+class TestSemanticAnswerCache:
+
+    def test_pregunta_casi_identica_es_hit(self):
+        cache = SemanticAnswerCache(threshold=0.95)
+        scope = cache.scope("empresa-1", "A3_FISCAL")
+        cache.store(scope, MATERIALIDAD, "respuesta materialidad", {"doc-1"})
+
+        assert cache.lookup(scope, MATERIALIDAD_PARAFRASIS) == "respuesta materialidad"
+        assert cache.lookup(scope, RAZON_NEGOCIOS) is None
+        assert cache.get_stats()["hit_rate_percent"] == 50.0
+
+    def test_ambito_por_empresa_y_agente(self):
+        cache = SemanticAnswerCache()
+        cache.store(cache.scope("empresa-1", "A3_FISCAL"), MATERIALIDAD, "r1")
+        assert cache.lookup(cache.scope("empresa-2", "A3_FISCAL"), MATERIALIDAD) is None
+        assert cache.lookup(cache.scope("empresa-1", "A1_SPONSOR"), MATERIALIDAD) is None
+
+    def test_invalidacion_por_documento_citado(self):
+        cache = SemanticAnswerCache()
+        scope = cache.scope("empresa-1", "A3_FISCAL")
+        cache.store(scope, MATERIALIDAD, "cita 5-A", {"doc-cff"})
+        cache.store(scope, RAZON_NEGOCIOS, "cita LISR", {"doc-lisr"})
+
+        assert cache.invalidate_documents(["doc-cff"]) == 1
+        assert cache.lookup(scope, MATERIALIDAD) is None
+        assert cache.lookup(scope, RAZON_NEGOCIOS) == "cita LISR"
+
+    def test_lru_por_ambito(self):
+        cache = SemanticAnswerCache(max_per_scope=2)
+        scope = cache.scope("empresa-1", "A3_FISCAL")
+        cache.store(scope, [1, 0, 0], "a")
+        cache.store(scope, [0, 1, 0], "b")
+        cache.lookup(scope, [1, 0, 0])
+        cache.store(scope, [0, 0, 1], "c")
+
+        assert cache.lookup(scope, [0, 1, 0]) is None
+        assert cache.lookup(scope, [1, 0, 0]) == "a"
+        assert cache.stats["evictions"] == 1
+
+    def test_ttl(self):
+        cache = SemanticAnswerCache(ttl_seconds=0)
+        scope = cache.scope("empresa-1", "A3_FISCAL")
+        cache.store(scope, MATERIALIDAD, "vieja")
+        assert cache.lookup(scope, MATERIALIDAD) is None
+        assert cache.get_stats()["entries"] == 0
+
+    def test_sin_empresa_no_se_cachea(self):
+        cache = SemanticAnswerCache()
+        scope = cache.scope(None, "A3_FISCAL")
+        assert scope is None
+        cache.store(scope, MATERIALIDAD, "respuesta de otra empresa")
+        assert cache.lookup(scope, MATERIALIDAD) is None
+        assert cache.get_stats()["entries"] == 0
+
+    def test_empresa_del_request(self):
+        from middleware.tenant_context import TenantContext, _current_tenant
+
+        cache = SemanticAnswerCache()
+        token = _current_tenant.set(TenantContext(empresa_id="empresa-9"))
+        try:
+            assert cache.scope(None, "A3_FISCAL") == ("empresa-9", "A3_FISCAL")
+            assert cache.scope("empresa-1", "A3_FISCAL") == ("empresa-1", "A3_FISCAL")
+        finally:
+            _current_tenant.reset(token)
+
+    def test_invalidacion_por_agente_en_todas_las_empresas(self):
+        cache = SemanticAnswerCache()
+        for empresa in ("empresa-1", "empresa-2"):
+            cache.store(cache.scope(empresa, "A3_FISCAL"), MATERIALIDAD, "r", {"doc-cff"})
+        cache.store(cache.scope("empresa-1", "A1_SPONSOR"), MATERIALIDAD, "r1")
+
+        assert cache.invalidate_agent("A3") == 2
+        assert cache.lookup(cache.scope("empresa-2", "A3_FISCAL"), MATERIALIDAD) is None
+        assert cache.lookup(cache.scope("empresa-1", "A1_SPONSOR"), MATERIALIDAD) == "r1"
+
+    def test_ids_de_documento(self):
+        metas = [{"doc_id": "d1"}, {"file_id": "f1"}, None, {"otro": 1}]
+        assert document_ids_from_metadatas(metas) == {"d1", "f1"}
+
+
+class TestRagServiceQuery:
+
+    def _servicio(self, monkeypatch):
+        import services.rag_service as rag_module
+
+        class RepoFalso:
+            def __init__(self):
+                self.consultas = 0
+
+            def query(self, agent_id, query_text, top_k=10):
+                self.consultas += 1
+                return {
+                    "documents": [["Art. 5-A CFF: razón de negocios"]],
+                    "metadatas": [[{"doc_id": "cff-5a"}]],
+                    "distances": [[0.1]],
+                }
+
+        vectores = {
+            "requisitos de materialidad para consultoría": MATERIALIDAD,
+            "¿requisitos de materialidad de una consultoría?": MATERIALIDAD_PARAFRASIS,
+        }
+        cache = SemanticAnswerCache(embed_fn=lambda textos: [vectores[t] for t in textos])
+        monkeypatch.setattr(rag_module, "semantic_answer_cache", cache)
+        servicio = rag_module.RagService.__new__(rag_module.RagService)
+        servicio.rag_repo = RepoFalso()
+        servicio.collections = {}
+        return servicio, cache
+
+    def test_reutiliza_resultados_y_se_invalida(self, monkeypatch):
+        servicio, cache = self._servicio(monkeypatch)
+
+        primera = servicio.query("A3_FISCAL", "requisitos de materialidad para consultoría", empresa_id="e1")
+        segunda = servicio.query("A3_FISCAL", "¿requisitos de materialidad de una consultoría?", empresa_id="e1")
+        assert servicio.rag_repo.consultas == 1
+        assert segunda["cached"]
+        assert segunda["documents"] == primera["documents"]
+        assert segunda["query"] == "¿requisitos de materialidad de una consultoría?"
+
+        cache.invalidate_documents(["cff-5a"])
+        servicio.query("A3_FISCAL", "requisitos de materialidad para consultoría", empresa_id="e1")
+        assert servicio.rag_repo.consultas == 2
+
+    def test_metricas(self, monkeypatch):
+        from routes.metrics import get_usage_stats
+
+        servicio, _ = self._servicio(monkeypatch)
+        antes = dict(get_usage_stats()["semantic_cache"]["by_source"].get("rag_service.query", {}))
+        servicio.query("A3_FISCAL", "requisitos de materialidad para consultoría", empresa_id="e1")
+        servicio.query("A3_FISCAL", "requisitos de materialidad para consultoría", empresa_id="e1")
+        despues = get_usage_stats()["semantic_cache"]["by_source"]["rag_service.query"]
+        assert despues["cache_hits"] - antes.get("cache_hits", 0) == 1
+        assert despues["cache_misses"] - antes.get("cache_misses", 0) == 1
+
+    def test_sin_empresa_consulta_el_repositorio(self, monkeypatch):
+        servicio, cache = self._servicio(monkeypatch)
+        for _ in range(2):
+            respuesta = servicio.query("A3_FISCAL", "requisitos de materialidad para consultoría")
+            assert "cached" not in respuesta
+        assert servicio.rag_repo.consultas == 2
+        assert cache.get_stats()["entries"] == 0
+
+
+class TestInvalidacionPorIngesta:
+    """Cualquier escritura del RagRepository descarta las respuestas del agente"""
+
+    @pytest.fixture
+    def repo(self, monkeypatch):
+        import services.rag_repository as repo_module
+        import services.semantic_cache as cache_module
+
+        class ColeccionFalsa:
+            name = "satma_prod_A3"
+
+            def add(self, **kwargs):
+                pass
+
+            def delete(self, **kwargs):
+                pass
+
+            def get(self, **kwargs):
+                return {"ids": ["f1-0"], "metadatas": [{"file_id": "f1"}]}
+
+            def update(self, **kwargs):
+                pass
+
+        cache = SemanticAnswerCache()
+        monkeypatch.setattr(cache_module, "semantic_answer_cache", cache)
+        monkeypatch.setattr(repo_module, "_embed_batch", lambda textos: [MATERIALIDAD for _ in textos])
+        repo = repo_module.RagRepository.__new__(repo_module.RagRepository)
+        repo._get_collection = lambda agent_id: ColeccionFalsa()
+        return repo, cache
+
+    @pytest.mark.parametrize("ingesta", [
+        lambda repo: repo.upsert_document("A3_FISCAL", "Art. 27 LISR", {"doc_id": "lisr-27"}),
+        lambda repo: repo.replace_file_chunks("A3_FISCAL", "f1", ["Art. 27 LISR"], [{"file_id": "f1"}]),
+        lambda repo: repo.update_file_metadata("A3_FISCAL", "f1", {"file_name": "LISR.pdf"}),
+        lambda repo: repo.delete_file("A3_FISCAL", "f1"),
+    ])
+    def test_ingesta_invalida_respuestas_del_agente(self, repo, ingesta):
+        repo, cache = repo
+        # La respuesta no citó el documento nuevo, pero la KB cambió
+        scope = cache.scope("empresa-1", "A3_FISCAL")
+        cache.store(scope, MATERIALIDAD, "cita 5-A", {"cff-5a"})
+        ingesta(repo)
+        assert cache.lookup(scope, MATERIALIDAD) is None
+
+
+class TestAgentAnalyzeCache:
+    """agent_analyze no cachea errores del proveedor ni respuestas de modo demo"""
+
+    def _servicio(self, monkeypatch, respuestas):
+        import services.agent_service as agent_module
+
+        class ChatFalso:
+            def __init__(self):
+                self.llamadas = 0
+
+            async def send_message(self, mensaje):
+                self.llamadas += 1
+                return respuestas[min(self.llamadas, len(respuestas)) - 1]
+
+        chat = ChatFalso()
+        cache = SemanticAnswerCache(embed_fn=lambda textos: [MATERIALIDAD for _ in textos])
+        monkeypatch.setattr(agent_module, "semantic_answer_cache", cache)
+        monkeypatch.setattr(agent_module, "SEMANTIC_CACHE_ENABLED", True)
+        monkeypatch.setattr(agent_module, "RATE_LIMITER_AVAILABLE", False)
+        servicio = agent_module.AgentService.__new__(agent_module.AgentService)
+        servicio.agents_cache = {}
+        servicio._get_agent_chat = lambda *args, **kwargs: chat
+        return servicio, chat, cache
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("fallida", [
+        '{"error": "OpenAI not configured"}',
+        '{"error": "Request timed out."}',
+        "[Demo Mode] Agente respondiendo a: materialidad...",
+    ])
+    async def test_completion_fallida_no_se_cachea(self, monkeypatch, fallida):
+        servicio, chat, cache = self._servicio(monkeypatch, [fallida, "Análisis Art. 5-A CFF"])
+
+        primera = await servicio.agent_analyze("A3_FISCAL", "ctx", "materialidad", empresa_id="e1")
+        segunda = await servicio.agent_analyze("A3_FISCAL", "ctx", "materialidad", empresa_id="e1")
+        assert primera == fallida
+        assert segunda == "Análisis Art. 5-A CFF"
+        assert chat.llamadas == 2
+
+        assert await servicio.agent_analyze("A3_FISCAL", "ctx", "materialidad", empresa_id="e1") == segunda
+        assert chat.llamadas == 2
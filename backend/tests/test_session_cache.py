@@ -0,0 +1,270 @@
+"""
+Pruebas Unitarias: Caché de validación de sesiones - Revisar.IA
+Verifica reutilización de sesiones validadas, revocación difundida,
+escritura por lotes de last_activity_at y decodificación única del JWT
+"""
+
+import pytest
+import pytest_asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.session_cache import SessionCache, REVOCATION_CHANNEL
+
+
+class ConexionFalsa:
+    """Conexión asyncpg en memoria para auth_sessions/auth_users y pg_notify."""
+
+    def __init__(self):
+        self.consultas = []
+        self.activo = True
+        self.rol = "user"
+        self.estado = "active"
+        self.listeners = {}
+
+    def is_closed(self):
+        return False
+
+    async def add_listener(self, canal, callback):
+        self.listeners.setdefault(canal, []).append(callback)
+
+    async def remove_listener(self, canal, callback):
+        self.listeners[canal].remove(callback)
+
+    def add_termination_listener(self, callback):
+        pass
+
+    def transaction(self):
+        class Transaccion:
+            async def __aenter__(self):
+                pass
+
+            async def __aexit__(self, *_):
+                pass
+
+        return Transaccion()
+
+    async def fetchrow(self, sql, token_hash):
+        self.consultas.append("select")
+        if not self.activo:
+            return None
+        return {
+            "id": "11111111-1111-1111-1111-111111111111", "user_id": "u1", "auth_method": "password",
+            "expires_at": datetime.now(timezone.utc) + timedelta(hours=1), "is_active": True,
+            "ip_address": None, "user_agent": None, "created_at": None,
+            "email": "ana@empresa.mx", "full_name": "Ana", "role": self.rol, "status": self.estado,
+            "user_auth_method": "password", "empresa_id": "e1", "company_name": "Empresa", "email_verified": True,
+        }
+
+    async def execute(self, sql, *args):
+        if "pg_notify" in sql:
+            self.consultas.append("notify")
+            # Entrega a todos los workers que escuchan el canal
+            for callback in self.listeners[REVOCATION_CHANNEL]:
+                callback(self, 0, REVOCATION_CHANNEL, args[1])
+        elif "unnest" in sql:
+            self.consultas.append(("activity", list(args[0])))
+        elif "UPDATE auth_users" in sql:
+            self.consultas.append("update_user")
+            if "role" in sql:
+                self.rol = args[0]
+            if "status" in sql:
+                self.estado = args[-2]
+            return "UPDATE 1"
+        elif "is_active = false" in sql:
+            self.consultas.append("revoke")
+            self.activo = False
+            return "UPDATE 1"
+        else:
+            self.consultas.append("update_activity")
+
+
+class PoolFalso:
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+
+    def acquire(self):
+        pool = self
+
+        class Adquisicion:
+            def __await__(self):
+                async def conexion():
+                    return pool.conexion
+                return conexion().__await__()
+
+            async def __aenter__(self):
+                return pool.conexion
+
+            async def __aexit__(self, *_):
+                pass
+
+        return Adquisicion()
+
+    async def release(self, conexion):
+        pass
+
+
+@pytest_asyncio.fixture
+async def servicio_auth(monkeypatch):
+    import services.unified_auth_service as uas
+
+    cache = SessionCache(flush_seconds=3600)
+    conexion = ConexionFalsa()
+    pool = PoolFalso(conexion)
+    await cache.start(pool)
+
+    async def get_connection():
+        return pool.acquire()
+
+    monkeypatch.setattr(uas, "session_cache", cache)
+    monkeypatch.setattr(uas.DatabasePool, "get_connection", get_connection)
+    yield uas.UnifiedAuthService(), conexion, cache
+    await cache.stop()
+
+
+class TestSessionCache:
+
+    @pytest.mark.asyncio
+    async def test_sesion_validada_se_reutiliza(self, servicio_auth):
+        servicio, conexion, cache = servicio_auth
+        for _ in range(5):
+            session, user = await servicio.validate_session("token-abc")
+            assert user.email == "ana@empresa.mx"
+        assert conexion.consultas.count("select") == 1
+        assert "update_activity" not in conexion.consultas
+
+        assert await cache.flush_activity() == 1
+        assert conexion.consultas[-1] == ("activity", [session.id])
+
+    @pytest.mark.asyncio
+    async def test_logout_se_respeta_de_inmediato(self, servicio_auth):
+        servicio, conexion, cache = servicio_auth
+        otro_worker = SessionCache(flush_seconds=3600)
+        await otro_worker.start(PoolFalso(conexion))
+
+        session, user = await servicio.validate_session("token-abc")
+        token_hash = servicio.hash_token("token-abc")
+        otro_worker.put(token_hash, session, user)
+
+        assert await servicio.revoke_session("token-abc")
+        assert "notify" in conexion.consultas
+        assert otro_worker.get(token_hash) is None
+        assert await servicio.validate_session("token-abc") == (None, None)
+        await otro_worker.stop()
+
+    @pytest.mark.asyncio
+    async def test_revocacion_de_usuario(self, servicio_auth):
+        servicio, conexion, cache = servicio_auth
+        await servicio.validate_session("t1")
+        await servicio.validate_session("t2")
+        assert cache.get_stats()["entries"] == 2
+        cache.handle_revocation("user:u1")
+        assert cache.get_stats()["entries"] == 0
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("cambio", [{"role": "viewer"}, {"status": "suspended"}])
+    async def test_cambio_de_rol_o_estado_invalida_sesiones(self, servicio_auth, monkeypatch, cambio):
+        import routes.unified_auth_routes as rutas
+
+        servicio, conexion, cache = servicio_auth
+        otro_worker = SessionCache(flush_seconds=3600)
+        await otro_worker.start(PoolFalso(conexion))
+        monkeypatch.setattr(rutas, "auth_service", servicio)
+
+        session, user = await servicio.validate_session("token-abc")
+        assert user.role == "user"
+        token_hash = servicio.hash_token("token-abc")
+        otro_worker.put(token_hash, session, user)
+
+        await rutas.update_user("u1", rutas.UpdateUserRequest(**cambio), admin=SimpleNamespace(id="admin"))
+
+        assert "notify" in conexion.consultas
+        assert otro_worker.get(token_hash) is None
+        session, user = await servicio.validate_session("token-abc")
+        assert conexion.consultas.count("select") == 2
+        if "role" in cambio:
+            assert user.role == "viewer"
+        else:
+            assert (session, user) == (None, None)
+        await otro_worker.stop()
+
+    @pytest.mark.asyncio
+    async def test_reset_demo_vacia_el_cache_en_todos_los_workers(self, servicio_auth, monkeypatch):
+        monkeypatch.setenv("SECRET_KEY", "clave-de-prueba")
+        import routes.admin as admin
+
+        servicio, conexion, cache = servicio_auth
+        otro_worker = SessionCache(flush_seconds=3600)
+        await otro_worker.start(PoolFalso(conexion))
+        session, user = await servicio.validate_session("token-abc")
+        otro_worker.put(servicio.hash_token("token-abc"), session, user)
+
+        async def fetchval(sql, *args):
+            return False
+
+        async def close():
+            pass
+
+        async def connect(url, ssl=None):
+            return conexion
+
+        conexion.fetchval = fetchval
+        conexion.close = close
+        monkeypatch.setattr(admin, "DATABASE_URL", "postgresql://falso")
+        monkeypatch.setattr(admin, "session_cache", cache)
+        monkeypatch.setattr(admin.asyncpg, "connect", connect)
+
+        resultado = await admin.reset_demo_data(admin.ResetDemoRequest(secret_key=admin.RESET_SECRET))
+
+        assert resultado["success"]
+        assert "notify" in conexion.consultas
+        assert cache.get_stats()["entries"] == 0
+        assert otro_worker.get_stats()["entries"] == 0
+        await otro_worker.stop()
+
+    def test_sin_listener_no_se_cachea(self):
+        cache = SessionCache()
+        sesion = SimpleNamespace(id="s1", expires_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        cache.put("h", sesion, SimpleNamespace(id="u1"))
+        assert cache.get("h") is None
+
+    def test_sesion_expirada_no_se_sirve(self):
+        cache = SessionCache()
+        cache._listener_conn = SimpleNamespace(is_closed=lambda: False)
+        sesion = SimpleNamespace(id="s1", expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+        cache.put("h", sesion, SimpleNamespace(id="u1"))
+        assert cache.get("h") is None
+
+
+class TestDecodificacionJWT:
+
+    def test_un_solo_decode_por_request(self, monkeypatch):
+        import services.auth_service as auth
+        from jose import JWTError
+
+        llamadas = []
+
+        def decode(token, secret, algorithms):
+            llamadas.append(token)
+            if token == "malo":
+                raise JWTError("firma inválida")
+            return {"user_id": "u1"}
+
+        monkeypatch.setattr(auth.jwt, "decode", decode)
+        monkeypatch.setattr(auth, "get_secret_key", lambda: "secreto")
+        request = SimpleNamespace(state=SimpleNamespace())
+
+        assert auth.decode_request_token("bueno", request) == {"user_id": "u1"}
+        assert auth.verify_token("bueno", request) == {"user_id": "u1"}
+        assert llamadas == ["bueno"]
+
+        otra = SimpleNamespace(state=SimpleNamespace())
+        for _ in range(2):
+            with pytest.raises(JWTError):
+                auth.decode_request_token("malo", otra)
+        assert llamadas == ["bueno", "malo"]
@@ -0,0 +1,261 @@
+"""
+Pruebas Unitarias: Agenda de plazos de Tráfico.IA - Revisar.IA
+Verifica cálculo de plazos, invalidación perezosa, deduplicación de alertas
+y que las alertas resueltas no se reabren tras un reinicio
+"""
+
+import pytest
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.trafico_agenda import MEXICO_TZ, AgendaPlazos, calcular_plazos
+from services.trafico_ia_service import TraficoIAService
+
+
+CONFIG = {"dias_inactividad_alerta": 3, "dias_vencimiento_alerta": 5}
+
+
+class CursorFalso:
+    def __init__(self, documentos):
+        self.documentos = documentos
+
+    async def to_list(self, length=None):
+        return self.documentos
+
+
+class ColeccionFalsa:
+    """Subconjunto de una colección de Motor: find, find_one y update_one con upsert"""
+
+    def __init__(self, documentos=None):
+        self.documentos = list(documentos or [])
+
+    def _coincide(self, documento, filtro):
+        return all(documento.get(campo) == valor for campo, valor in filtro.items())
+
+    def find(self, filtro, proyeccion=None):
+        return CursorFalso([dict(d) for d in self.documentos if self._coincide(d, filtro)])
+
+    async def find_one(self, filtro, proyeccion=None):
+        return next((dict(d) for d in self.documentos if self._coincide(d, filtro)), None)
+
+    async def update_one(self, filtro, cambios, upsert=False):
+        documento = next((d for d in self.documentos if self._coincide(d, filtro)), None)
+        if documento is None:
+            documento = dict(filtro, **cambios.get("$setOnInsert", {}))
+            self.documentos.append(documento)
+        documento.update(cambios.get("$set", {}))
+
+
+class DBFalsa:
+    def __init__(self, proyectos=None):
+        self.trafico_alertas = ColeccionFalsa()
+        self.projects = ColeccionFalsa(proyectos)
+AHORA = datetime(2026, 3, 2, 12, 0, tzinfo=MEXICO_TZ)
+
+
+class TestCalcularPlazos:
+    """Momentos en que el análisis de un proyecto puede cambiar"""
+
+    def test_inactividad(self):
+        proyecto = {"ultima_actividad": AHORA.isoformat()}
+        plazos = calcular_plazos(proyecto, CONFIG, AHORA)
+        assert [p - AHORA for p in plazos] == [
+            timedelta(days=3, seconds=1), timedelta(days=6, seconds=1)
+        ]
+
+    def test_vencimiento(self):
+        vencimiento = AHORA + timedelta(days=30)
+        plazos = calcular_plazos({"fecha_vencimiento": vencimiento.isoformat()}, CONFIG, AHORA)
+        assert [vencimiento - p for p in plazos] == [
+            timedelta(days=6, seconds=-1), timedelta(days=3, seconds=-1), timedelta(days=1, seconds=-1)
+        ]
+
+    def test_solo_plazos_futuros(self):
+        proyecto = {
+            "ultima_actividad": (AHORA - timedelta(days=4)).isoformat(),
+            "fecha_vencimiento": (AHORA - timedelta(days=1)).isoformat(),
+        }
+        plazos = calcular_plazos(proyecto, CONFIG, AHORA)
+        assert len(plazos) == 1 and plazos[0] > AHORA
+
+    @pytest.mark.asyncio
+    async def test_plazo_coincide_con_cambio_de_analisis(self):
+        """Antes del plazo el análisis no alerta; una vez cumplido, sí."""
+        servicio = TraficoIAService()
+        ahora = datetime.now(MEXICO_TZ)
+        for margen, alerta_esperada in ((timedelta(seconds=30), False), (timedelta(seconds=-30), True)):
+            proyecto = {"project_id": "P-1", "ultima_actividad": (ahora - timedelta(days=3) + margen).isoformat()}
+            plazo = calcular_plazos(proyecto, servicio.configuracion, ahora - timedelta(days=1))[0]
+            assert (plazo <= ahora) == alerta_esperada
+            assert bool(await servicio._analizar_proyecto(proyecto)) == alerta_esperada
+
+
+class TestAgendaPlazos:
+    """Heap con invalidación por versión"""
+
+    def test_orden_y_extraccion(self):
+        agenda = AgendaPlazos()
+        agenda.programar("B", [AHORA + timedelta(hours=2)])
+        agenda.programar("A", [AHORA + timedelta(hours=1), AHORA + timedelta(hours=3)])
+        assert agenda.proximo() == AHORA + timedelta(hours=1)
+        assert agenda.extraer_vencidos(AHORA + timedelta(hours=2)) == ["A", "B"]
+        assert len(agenda) == 1
+
+    def test_reprogramar_invalida_plazos_anteriores(self):
+        agenda = AgendaPlazos()
+        agenda.programar("A", [AHORA + timedelta(hours=1)])
+        agenda.programar("A", [AHORA + timedelta(days=2)])
+        assert agenda.extraer_vencidos(AHORA + timedelta(days=1)) == []
+        assert agenda.proximo() == AHORA + timedelta(days=2)
+
+    def test_cancelar(self):
+        agenda = AgendaPlazos()
+        agenda.programar("A", [AHORA + timedelta(hours=1)])
+        agenda.cancelar("A")
+        assert agenda.proximo() is None
+        assert agenda.segundos_hasta_proximo(AHORA, maximo=3600) == 3600
+
+    def test_segundos_hasta_proximo(self):
+        agenda = AgendaPlazos()
+        agenda.programar("A", [AHORA + timedelta(minutes=10)])
+        assert agenda.segundos_hasta_proximo(AHORA, maximo=3600) == 600
+        assert agenda.segundos_hasta_proximo(AHORA + timedelta(hours=1), maximo=3600) == 0
+
+    def test_miles_de_reprogramaciones_no_crecen_el_heap(self):
+        agenda = AgendaPlazos()
+        for ronda in range(20):
+            for k in range(500):
+                agenda.programar(f"P-{k}", [AHORA + timedelta(hours=ronda + 1, seconds=k)])
+        assert len(agenda) == 500
+        assert len(agenda._heap) <= 2 * 500
+
+
+class TestTraficoPorPlazos:
+    """Integración con TraficoIAService (sin DB: proyectos de ejemplo)"""
+
+    @pytest.fixture
+    def servicio(self):
+        servicio = TraficoIAService()
+        servicio.configuracion["emails_habilitados"] = False
+        return servicio
+
+    @pytest.mark.asyncio
+    async def test_monitoreo_repetido_no_duplica_alertas(self, servicio):
+        primero = await servicio.ejecutar_monitoreo()
+        total = len(servicio.alertas)
+        segundo = await servicio.ejecutar_monitoreo()
+        assert primero["alertas_nuevas"] == total > 0
+        assert segundo["alertas_nuevas"] == 0
+        assert len(servicio.alertas) == total
+
+    @pytest.mark.asyncio
+    async def test_nuevo_episodio_genera_alerta(self, servicio):
+        await servicio.ejecutar_monitoreo()
+        proyecto = dict(servicio._proyectos["PROJ-001"])
+        proyecto["candados_pendientes"] = ["candado_legal"]
+        servicio.notificar_cambio_proyecto(proyecto)
+        resultado = await servicio._procesar_pendientes(datetime.now(MEXICO_TZ))
+        assert resultado["proyectos_revisados"] == 1
+        assert resultado["alertas_nuevas"] == 1
+
+    @pytest.mark.asyncio
+    async def test_proyecto_cerrado_sale_de_la_agenda(self, servicio):
+        await servicio.ejecutar_monitoreo()
+        servicio.notificar_proyecto_cerrado("PROJ-001")
+        await servicio._procesar_pendientes(datetime.now(MEXICO_TZ))
+        assert "PROJ-001" not in servicio._proyectos
+        assert all(e[2] != "PROJ-001" for e in servicio.agenda._heap if servicio.agenda._vigente(e))
+
+    @pytest.mark.asyncio
+    async def test_sin_plazos_cumplidos_no_evalua(self, servicio):
+        ahora = datetime.now(MEXICO_TZ)
+        for k in range(2000):
+            servicio.notificar_cambio_proyecto({
+                "project_id": f"P-{k}",
+                "ultima_actividad": ahora.isoformat(),
+                "fecha_vencimiento": (ahora + timedelta(days=60)).isoformat(),
+            })
+        assert (await servicio._procesar_pendientes(ahora))["proyectos_revisados"] == 2000
+
+        resultado = await servicio._procesar_pendientes(ahora + timedelta(hours=1))
+        assert resultado["proyectos_revisados"] == 0
+        assert servicio.agenda.segundos_hasta_proximo(ahora, maximo=86400 * 7) > 86400
+
+
+class TestAlertasPersistidas:
+    """Alertas resueltas en DB y notificación desde las rutas que modifican proyectos"""
+
+    @pytest.fixture
+    def proyecto(self):
+        ahora = datetime.now(MEXICO_TZ)
+        return {"project_id": "P-1", "ultima_actividad": (ahora - timedelta(days=4)).isoformat()}
+
+    def _servicio(self, db):
+        servicio = TraficoIAService(db=db)
+        servicio.configuracion["emails_habilitados"] = False
+        return servicio
+
+    @pytest.mark.asyncio
+    async def test_alerta_resuelta_no_se_reabre_tras_reinicio(self, proyecto):
+        db = DBFalsa()
+        servicio = self._servicio(db)
+        servicio.notificar_cambio_proyecto(proyecto)
+        await servicio._procesar_pendientes(datetime.now(MEXICO_TZ))
+        alerta = next(iter(servicio.alertas.values()))
+        assert servicio.resolver_alerta(alerta.id)
+        await servicio._persistir_alerta(alerta)
+
+        reiniciado = self._servicio(db)
+        await reiniciado._cargar_alertas_persistidas()
+        reiniciado.notificar_cambio_proyecto(proyecto)
+        resultado = await reiniciado._procesar_pendientes(datetime.now(MEXICO_TZ))
+        assert resultado["alertas_nuevas"] == 0
+        assert reiniciado.obtener_alertas() == []
+        assert [d["resuelta"] for d in db.trafico_alertas.documentos] == [True]
+
+    @pytest.mark.asyncio
+    async def test_upsert_de_alerta_regenerada_no_pisa_resolucion(self, proyecto):
+        db = DBFalsa()
+        servicio = self._servicio(db)
+        servicio.notificar_cambio_proyecto(proyecto)
+        await servicio._procesar_pendientes(datetime.now(MEXICO_TZ))
+        alerta = next(iter(servicio.alertas.values()))
+        servicio.resolver_alerta(alerta.id)
+        await servicio._persistir_alerta(alerta)
+
+        # Otro proceso que no cargó las alertas regenera el mismo episodio
+        otro = self._servicio(db)
+        otro.notificar_cambio_proyecto(proyecto)
+        await otro._procesar_pendientes(datetime.now(MEXICO_TZ))
+        documento, = db.trafico_alertas.documentos
+        assert documento["resuelta"] is True
+        assert documento["fecha_resolucion"] == alerta.fecha_resolucion
+
+    @pytest.mark.asyncio
+    async def test_alerta_podada_de_memoria_no_se_regenera(self, proyecto, monkeypatch):
+        import services.trafico_ia_service as modulo
+        monkeypatch.setattr(modulo, "MAX_ALERTAS_RESUELTAS_MEMORIA", 0)
+        servicio = self._servicio(None)
+        servicio.notificar_cambio_proyecto(proyecto)
+        await servicio._procesar_pendientes(datetime.now(MEXICO_TZ))
+        servicio.resolver_alerta(next(iter(servicio.alertas.values())).id)
+        servicio._podar_alertas_resueltas()
+        assert servicio.alertas == {}
+
+        servicio.notificar_cambio_proyecto(proyecto)
+        resultado = await servicio._procesar_pendientes(datetime.now(MEXICO_TZ))
+        assert resultado["alertas_nuevas"] == 0
+
+    @pytest.mark.asyncio
+    async def test_notificar_proyecto_actualizado(self, proyecto):
+        servicio = self._servicio(DBFalsa(proyectos=[proyecto]))
+        await servicio.notificar_proyecto_actualizado("P-1")
+        assert servicio._cambios_pendientes == {}
+
+        servicio.running = True
+        await servicio.notificar_proyecto_actualizado("P-1")
+        await servicio.notificar_proyecto_actualizado("P-BORRADO")
+        assert servicio._cambios_pendientes == {"P-1": proyecto, "P-BORRADO": None}
@@ -0,0 +1,139 @@
+"""
+Pruebas Unitarias: Validación legal por lote - Revisar.IA
+Verifica que validar_operaciones (catálogo compilado en bitsets) produce
+exactamente las mismas evaluaciones que validar_operacion, operación por operación
+"""
+
+import random
+import pytest
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.legal_validation_service import (
+    CatalogoCompilado,
+    LegalValidationService,
+    NivelRiesgo,
+    OperacionAValidar,
+    TipoEvidencia,
+    TipoServicio,
+    mascara_evidencias,
+)
+
+
+def operaciones_aleatorias(n: int, semilla: int = 46):
+    rng = random.Random(semilla)
+    tipos = list(TipoEvidencia)
+    for i in range(n):
+        yield OperacionAValidar(
+            operacion_id=f"OP-{i}",
+            proveedor_rfc=f"RFC{rng.randint(0, 50):03d}0101AAA",
+            monto=round(rng.uniform(1_000, 2_000_000), 2),
+            tipo_servicio=rng.choice(list(TipoServicio)),
+            evidencias_presentadas=rng.sample(tipos, rng.randint(0, len(tipos))),
+            es_parte_relacionada=rng.random() < 0.2,
+            proveedor_en_69b=rng.random() < 0.05,
+            cfdi_validado=rng.random() < 0.8,
+            tiene_opinion_32d=rng.random() < 0.5,
+        )
+
+
+def sin_fecha(evaluacion):
+    datos = asdict(evaluacion)
+    datos.pop("fecha_evaluacion")
+    return datos
+
+
+@pytest.fixture
+def service():
+    return LegalValidationService()
+
+
+class TestParidad:
+
+    def test_lote_aleatorio_identico_a_una_por_una(self, service):
+        operaciones = list(operaciones_aleatorias(2000))
+        lote = service.validar_operaciones(operaciones)
+
+        assert len(lote) == len(operaciones)
+        for op, evaluacion in zip(operaciones, lote):
+            individual = service.validar_operacion(**asdict(op))
+            assert sin_fecha(evaluacion) == sin_fecha(individual)
+        # El lote cubre los tres colores del semáforo
+        assert {e.nivel_riesgo for e in lote} == set(NivelRiesgo)
+
+    @pytest.mark.parametrize("evidencias", [
+        [],
+        list(TipoEvidencia),
+        [TipoEvidencia.CONTRATO, TipoEvidencia.ACTA, TipoEvidencia.REPORTE],
+        [TipoEvidencia.CFDI, TipoEvidencia.CFDI, TipoEvidencia.POLIZA_CONTABLE],
+    ])
+    @pytest.mark.parametrize("en_69b,cfdi_validado,partes", [
+        (False, True, False), (True, True, False), (False, False, True), (True, False, True),
+    ])
+    def test_casos_limite(self, service, evidencias, en_69b, cfdi_validado, partes):
+        op = OperacionAValidar("OP-1", "AAA010101AAA", 1000.0, TipoServicio.MARKETING, evidencias,
+                               es_parte_relacionada=partes, proveedor_en_69b=en_69b,
+                               cfdi_validado=cfdi_validado)
+        [evaluacion] = service.validar_operaciones([op])
+        assert sin_fecha(evaluacion) == sin_fecha(service.validar_operacion(**asdict(op)))
+
+    def test_acepta_dicts_y_evidencias_como_texto(self, service):
+        datos = {
+            "operacion_id": "OP-9", "proveedor_rfc": "XYZ010101AAA", "monto": 5000.0,
+            "tipo_servicio": "consultoria", "evidencias_presentadas": ["contrato", "cfdi", "no_existe"],
+        }
+        [evaluacion] = service.validar_operaciones([datos])
+        assert sin_fecha(evaluacion) == sin_fecha(service.validar_operacion(**datos))
+
+    def test_lote_vacio(self, service):
+        assert service.validar_operaciones([]) == []
+
+
+class TestCatalogoCompilado:
+
+    def test_mascaras_de_alternativas(self):
+        catalogo = CatalogoCompilado(LegalValidationService().todas_las_reglas)
+        materialidad = next(r for r in catalogo.reglas if r.id == "CFF_69B_MATERIALIDAD")
+        orden = materialidad.requisitos[1][0]
+        assert orden == mascara_evidencias([TipoEvidencia.ORDEN_SERVICIO, TipoEvidencia.ACTA])
+        assert materialidad.total_obligatorias == 3
+
+    def test_parte_relacionada_agrega_regla(self):
+        catalogo = CatalogoCompilado(LegalValidationService().todas_las_reglas)
+        con = [r.id for r in catalogo.reglas_aplicables(TipoServicio.LEGAL, True)]
+        sin = [r.id for r in catalogo.reglas_aplicables(TipoServicio.LEGAL, False)]
+        assert "LISR_27_PARTES_REL" in con
+        assert sin == [i for i in con if i != "LISR_27_PARTES_REL"]
+
+    def test_firmas_repetidas_no_comparten_objetos(self, service):
+        op = OperacionAValidar("A", "AAA010101AAA", 1.0, TipoServicio.LEGAL, [TipoEvidencia.CONTRATO])
+        a, b = service.validar_operaciones([op, OperacionAValidar(**{**asdict(op), "operacion_id": "B"})])
+        assert (a.operacion_id, b.operacion_id) == ("A", "B")
+        a.resultados_por_regla[0].evidencias_faltantes.append("otra")
+        a.acciones_correctivas.append("otra")
+        assert sin_fecha(b) == sin_fecha(service.validar_operacion(**{**asdict(op), "operacion_id": "B"}))
+
+    def test_evalua_cada_firma_una_vez(self, service, monkeypatch):
+        llamadas = []
+        original = service.catalogo_compilado.evaluar_firma
+
+        def contar(*args):
+            llamadas.append(args)
+            return original(*args)
+
+        monkeypatch.setattr(service.catalogo_compilado, "evaluar_firma", contar)
+        ops = [OperacionAValidar(f"OP-{i}", "AAA010101AAA", float(i), TipoServicio.TECNOLOGIA,
+                                 [TipoEvidencia.CONTRATO] if i % 2 else []) for i in range(100)]
+        service.validar_operaciones(ops)
+        assert len(llamadas) == 2
+
+    def test_no_toca_el_gc_del_proceso(self, service, monkeypatch):
+        import gc
+        llamadas = []
+        monkeypatch.setattr(gc, "disable", lambda: llamadas.append("disable"))
+        monkeypatch.setattr(gc, "enable", lambda: llamadas.append("enable"))
+        service.validar_operaciones(list(operaciones_aleatorias(10)))
+        assert llamadas == []
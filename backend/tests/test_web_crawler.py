@@ -0,0 +1,151 @@
+"""
+Pruebas Unitarias: Crawler asíncrono de Deep Research - Revisar.IA
+Verifica concurrencia por host, robots.txt, timeouts y caché con ETag
+"""
+
+import asyncio
+import pytest
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.web_crawler import AsyncWebCrawler, CachePaginas, extraer_texto_html
+
+web = pytest.importorskip("aiohttp.web")
+
+TEXTO = "ACME Servicios SA de CV, RFC ASE010101AB1, contacto@acme.mx. " * 5
+
+
+class SitioFalso:
+    """Servidor HTTP local con páginas lentas, robots.txt y ETag."""
+
+    def __init__(self, latencia=0.05):
+        self.latencia = latencia
+        self.visitas = []
+        self.activas = 0
+        self.max_activas = 0
+
+    async def pagina(self, request):
+        self.visitas.append(request.path)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        self.activas += 1
+        self.max_activas = max(self.max_activas, self.activas)
+        await asyncio.sleep(self.latencia if request.path != "/lenta" else 1)
+        self.activas -= 1
+        if request.path == "/no-existe":
+            return web.Response(status=404)
+        html = (f"<html><head><title>ACME {request.path}</title><script>x()</script></head>"
+                f"<body><nav>menu</nav><p>{TEXTO}</p></body></html>")
+        return web.Response(text=html, content_type="text/html", headers={"ETag": '"v1"'})
+
+    async def robots(self, request):
+        self.visitas.append(request.path)
+        return web.Response(text="User-agent: *\nDisallow: /privado\n")
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/robots.txt", self.robots)
+        app.router.add_get("/{tail:.*}", self.pagina)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        sitio = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await sitio.start()
+        self.base = f"http://127.0.0.1:{sitio._server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *_):
+        await self.runner.cleanup()
+
+
+class TestExtraccion:
+
+    def test_quita_scripts_y_navegacion(self):
+        texto, titulo = extraer_texto_html("<html><head><title>T</title></head><body><nav>menu</nav>"
+                                           "<script>x()</script><p>Hola   mundo</p></body></html>")
+        assert titulo == "T"
+        assert texto == "T Hola mundo"
+
+
+class TestAsyncWebCrawler:
+
+    @pytest.mark.asyncio
+    async def test_descargas_concurrentes_con_limite_por_host(self, tmp_path):
+        async with SitioFalso(latencia=0.1) as sitio:
+            crawler = AsyncWebCrawler(cache=CachePaginas(str(tmp_path)), max_por_host=4)
+            urls = [f"{sitio.base}/p{k}" for k in range(8)]
+            inicio = time.perf_counter()
+            paginas = await crawler.obtener_paginas(urls)
+            duracion = time.perf_counter() - inicio
+
+        assert [p["url"] for p in paginas] == urls
+        assert sitio.max_activas == 4
+        assert duracion < 0.6  # 2 tandas de 0.1s, no 8 en serie
+        assert "menu" not in paginas[0]["text"]
+        assert paginas[0]["title"] == "ACME /p0"
+
+    @pytest.mark.asyncio
+    async def test_robots_timeout_y_errores(self, tmp_path):
+        async with SitioFalso(latencia=0) as sitio:
+            crawler = AsyncWebCrawler(cache=CachePaginas(str(tmp_path)), timeout_segundos=0.3)
+            paginas = await crawler.obtener_paginas(
+                [f"{sitio.base}/", f"{sitio.base}/privado", f"{sitio.base}/lenta", f"{sitio.base}/no-existe"]
+            )
+
+        assert paginas[0] is not None
+        assert paginas[1:] == [None, None, None]
+        assert "/privado" not in sitio.visitas
+        assert crawler.stats["bloqueadas_robots"] == 1
+        assert crawler.stats["errores"] == 1
+
+    @pytest.mark.asyncio
+    async def test_robots_y_semaforos_acotados_por_host(self, tmp_path):
+        async with SitioFalso(latencia=0) as sitio:
+            crawler = AsyncWebCrawler(cache=CachePaginas(str(tmp_path)), max_hosts=1, robots_ttl_segundos=0)
+            otro_host = sitio.base.replace("127.0.0.1", "localhost")
+            await crawler.obtener_paginas([f"{sitio.base}/a", f"{otro_host}/b"])
+            assert len(crawler._robots) == 1
+            assert len(crawler._semaforos) == 1
+            assert crawler._en_uso == {}
+
+            # robots.txt expirado se vuelve a descargar
+            await crawler.obtener_paginas([f"{otro_host}/c"])
+            assert sitio.visitas.count("/robots.txt") == 3
+
+    @pytest.mark.asyncio
+    async def test_cache_vigente_y_revalidacion_etag(self, tmp_path):
+        async with SitioFalso(latencia=0) as sitio:
+            url = f"{sitio.base}/contacto"
+            primera = await AsyncWebCrawler(cache=CachePaginas(str(tmp_path))).obtener_paginas([url])
+
+            crawler = AsyncWebCrawler(cache=CachePaginas(str(tmp_path)))
+            assert await crawler.obtener_paginas([url]) == primera
+            assert sitio.visitas.count("/contacto") == 1
+            assert crawler.stats["cache"] == 1
+
+            expirado = AsyncWebCrawler(cache=CachePaginas(str(tmp_path), ttl_segundos=0))
+            assert await expirado.obtener_paginas([url]) == primera
+            assert sitio.visitas.count("/contacto") == 2
+            assert expirado.stats["revalidadas"] == 1
+
+
+class TestDeepResearchSitioWeb:
+
+    @pytest.mark.asyncio
+    async def test_investigar_sitio_web_con_crawler(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("FIRECRAWL_API_KEY", raising=False)
+        from services.deep_research_service import DeepResearchService
+
+        async with SitioFalso(latencia=0.1) as sitio:
+            servicio = DeepResearchService()
+            servicio.available = False
+            servicio.crawler = AsyncWebCrawler(cache=CachePaginas(str(tmp_path)))
+            inicio = time.perf_counter()
+            resultado = await servicio.investigar_sitio_web(sitio.base)
+            duracion = time.perf_counter() - inicio
+
+        assert resultado["success"]
+        assert duracion < 0.6  # 11 páginas candidatas, 4 en paralelo
+        assert resultado["datos"].get("email") == "contacto@acme.mx"
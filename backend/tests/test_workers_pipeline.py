@@ -0,0 +1,237 @@
+"""
+Pruebas Unitarias: Pipelines DAG de Workers - Revisar.IA
+Verifica paralelismo por dependencias, límites por capacidad, cache,
+rutas /webhooks/workers/* sobre el DAG y la sesión HTTP compartida
+"""
+
+import asyncio
+import pytest
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.workers_hub_service import WorkerResult, WorkersHubService
+from services.workers_pipeline import (
+    EjecutorPipelineDAG,
+    PasoPipeline,
+    normalizar_pasos,
+    pipeline_due_diligence_proveedor,
+    validar_dag,
+)
+
+
+class HubFalso:
+    """Hub local: cada tarea tarda `latencia` segundos."""
+
+    def __init__(self, latencia=0.05, fallan=()):
+        self.latencia = latencia
+        self.fallan = set(fallan)
+        self.llamadas = []
+        self.activas = {}
+        self.max_activas = {}
+
+    async def ejecutar_tarea(self, tarea, parametros, agente_id=None, empresa_id=None,
+                             proyecto_id=None, callback_url=None, timeout=None):
+        self.llamadas.append((tarea, parametros))
+        self.activas[tarea] = self.activas.get(tarea, 0) + 1
+        self.max_activas[tarea] = max(self.max_activas.get(tarea, 0), self.activas[tarea])
+        await asyncio.sleep(self.latencia)
+        self.activas[tarea] -= 1
+        if tarea in self.fallan:
+            return WorkerResult(success=False, worker_id="falso", tarea=tarea, resultado={}, error="falla")
+        return WorkerResult(success=True, worker_id="falso", tarea=tarea,
+                            resultado={"tarea": tarea, "eco": parametros})
+
+
+class TestValidacionDAG:
+
+    def test_orden_topologico(self):
+        pasos = pipeline_due_diligence_proveedor("ACME", "AAA010101AAA", documento_url="http://x/c.pdf")
+        orden = validar_dag(pasos)
+        assert orden[-1] == "generar_reporte"
+        assert set(orden[:3]) == {"investigar_proveedor", "verificar_lista_69b", "analizar_documento"}
+
+    def test_ciclo(self):
+        with pytest.raises(ValueError, match="ciclo"):
+            validar_dag([
+                PasoPipeline(id="a", tarea="rfc", depende_de=["b"]),
+                PasoPipeline(id="b", tarea="rfc", depende_de=["a"]),
+            ])
+
+    def test_dependencia_inexistente(self):
+        with pytest.raises(ValueError, match="inexistentes"):
+            validar_dag([PasoPipeline(id="a", tarea="rfc", entradas={"x": "z.campo"})])
+
+
+    def test_lista_sin_dependencias_se_encadena(self):
+        pasos = normalizar_pasos([
+            {"tarea": "scraping", "parametros": {}},
+            {"tarea": "scraping", "parametros": {"url": "b"}},
+            {"tarea": "materialidad", "parametros": {}},
+        ])
+        assert validar_dag([PasoPipeline.from_dict(p) for p in pasos]) == [
+            "1_scraping", "2_scraping", "3_materialidad"
+        ]
+        assert pasos[2]["depende_de"] == ["2_scraping"]
+
+    def test_dependencias_declaradas_se_respetan(self):
+        pasos = [{"id": "a", "tarea": "rfc"}, {"id": "b", "tarea": "rfc"}, {"tarea": "reportes", "depende_de": ["a"]}]
+        assert normalizar_pasos(pasos) is pasos
+
+    def test_due_diligence_sin_rfc_omite_69b(self):
+        ids = [p.id for p in pipeline_due_diligence_proveedor("ACME", None)]
+        assert ids == ["investigar_proveedor", "generar_reporte"]
+
+
+class TestEjecutorPipelineDAG:
+
+    @pytest.mark.asyncio
+    async def test_tarda_la_ruta_critica(self):
+        hub = HubFalso(latencia=0.1)
+        pasos = pipeline_due_diligence_proveedor("ACME", "AAA010101AAA", documento_url="http://x/c.pdf")
+        inicio = time.perf_counter()
+        resultado = await EjecutorPipelineDAG(hub=hub).ejecutar(pasos, empresa_id="E1")
+        duracion = time.perf_counter() - inicio
+
+        assert resultado["success"]
+        assert duracion < 0.3  # 2 niveles de 0.1s, no 4 pasos en serie
+        datos = resultado["pasos"]["generar_reporte"]["resultado"]["eco"]["datos"]
+        assert set(datos) == {"investigar_proveedor", "verificar_lista_69b", "analizar_documento"}
+        assert datos["verificar_lista_69b"]["eco"] == {"rfc": "AAA010101AAA"}
+
+    @pytest.mark.asyncio
+    async def test_cache_por_entrada(self):
+        hub = HubFalso(latencia=0.01)
+        ejecutor = EjecutorPipelineDAG(hub=hub)
+        pasos = pipeline_due_diligence_proveedor("ACME", "AAA010101AAA")
+        await ejecutor.ejecutar(pasos, empresa_id="E1")
+        segundo = await ejecutor.ejecutar(pasos, empresa_id="E1")
+
+        assert segundo["pasos"]["investigar_proveedor"]["desde_cache"]
+        assert not segundo["pasos"]["generar_reporte"]["desde_cache"]  # usar_cache=False
+        assert [t for t, _ in hub.llamadas].count("due_diligence") == 1
+
+        await ejecutor.ejecutar(pasos, empresa_id="E2")
+        assert [t for t, _ in hub.llamadas].count("due_diligence") == 2
+
+    @pytest.mark.asyncio
+    async def test_cache_expira(self):
+        hub = HubFalso(latencia=0)
+        ejecutor = EjecutorPipelineDAG(hub=hub, cache_ttl_segundos=0)
+        pasos = [PasoPipeline(id="rfc", tarea="rfc", parametros={"rfc": "X"})]
+        await ejecutor.ejecutar(pasos)
+        await ejecutor.ejecutar(pasos)
+        assert len(hub.llamadas) == 2
+
+    @pytest.mark.asyncio
+    async def test_limite_por_capacidad_y_llamadas_compartidas(self):
+        hub = HubFalso(latencia=0.02)
+        ejecutor = EjecutorPipelineDAG(hub=hub, limites_concurrencia={"ocr": 2})
+        pasos = [PasoPipeline(id=f"ocr{k}", tarea="ocr", parametros={"pagina": k}) for k in range(6)]
+        pasos += [PasoPipeline(id="dup", tarea="ocr", parametros={"pagina": 0})]
+        resultado = await ejecutor.ejecutar(pasos)
+
+        assert resultado["success"]
+        assert hub.max_activas["ocr"] == 2
+        assert len(hub.llamadas) == 6
+
+    @pytest.mark.asyncio
+    async def test_falla_omite_dependientes(self):
+        hub = HubFalso(latencia=0, fallan={"lista_69b"})
+        pasos = pipeline_due_diligence_proveedor("ACME", "AAA010101AAA")
+        resultado = await EjecutorPipelineDAG(hub=hub).ejecutar(pasos)
+
+        assert not resultado["success"]
+        assert resultado["pasos"]["investigar_proveedor"]["success"]
+        assert resultado["pasos"]["generar_reporte"]["worker_id"] == "omitido"
+        assert "reportes" not in [t for t, _ in hub.llamadas]
+
+
+class TestHubLocalHTTP:
+    """WorkersHubService contra un Hub HTTP local (sesión compartida)"""
+
+    @pytest.mark.asyncio
+    async def test_due_diligence_via_http(self):
+        web = pytest.importorskip("aiohttp.web")
+
+        async def execute(request):
+            payload = await request.json()
+            await asyncio.sleep(0.05)
+            return web.json_response({"success": True, "worker_id": "local", "tarea": payload["tarea"]})
+
+        app = web.Application()
+        app.router.add_post("/execute", execute)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        sitio = web.TCPSite(runner, "127.0.0.1", 0)
+        await sitio.start()
+        puerto = sitio._server.sockets[0].getsockname()[1]
+
+        servicio = WorkersHubService()
+        servicio.hub_url = f"http://127.0.0.1:{puerto}"
+        servicio.available = True
+        try:
+            resultado = await servicio.due_diligence_proveedor(
+                "ACME", "AAA010101AAA", documento_url="http://x/c.pdf", empresa_id="E1"
+            )
+            assert resultado["success"]
+            assert resultado["pasos"]["analizar_documento"]["worker_id"] == "local"
+            assert resultado["duracion_ms"] < 150
+        finally:
+            await servicio.close()
+            await runner.cleanup()
+
+
+class TestRutasWorkers:
+    """/webhooks/workers/pipeline y /due-diligence corren el DAG local"""
+
+    @pytest.fixture
+    def cliente(self, monkeypatch):
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from routes import workers_webhook
+
+        hub = HubFalso(latencia=0.05)
+        servicio = WorkersHubService()
+        servicio.available = True
+        monkeypatch.setattr(servicio, "ejecutar_tarea", hub.ejecutar_tarea)
+        monkeypatch.setattr(workers_webhook, "workers_hub_service", servicio)
+        app = FastAPI()
+        app.include_router(workers_webhook.router)
+        return TestClient(app), hub
+
+    def test_pipeline_paralelo(self, cliente):
+        cliente, hub = cliente
+        respuesta = cliente.post("/webhooks/workers/pipeline", json={"pasos": [
+            {"id": "a", "tarea": "investigacion", "parametros": {"empresa": "ACME"}},
+            {"id": "b", "tarea": "lista_69b", "parametros": {"rfc": "AAA010101AAA"}},
+            {"tarea": "reportes", "entradas": {"datos.a": "a", "datos.b": "b"}, "usar_cache": False},
+        ]}).json()
+        assert respuesta["success"]
+        assert respuesta["orden"] == ["a", "b", "reportes"]
+        assert respuesta["duracion_ms"] < 140
+        assert hub.llamadas[-1][1]["datos"]["b"]["tarea"] == "lista_69b"
+
+    def test_due_diligence(self, cliente):
+        cliente, hub = cliente
+        respuesta = cliente.post("/webhooks/workers/due-diligence", json={
+            "empresa": "ACME", "rfc": "AAA010101AAA"
+        }).json()
+        assert respuesta["success"] and respuesta["error"] is None
+        assert set(respuesta["resultado"]["pasos"]) == {
+            "investigar_proveedor", "verificar_lista_69b", "generar_reporte"
+        }
+
+
+class TestSesionCompartida:
+
+    def test_cambio_de_loop_cierra_la_sesion_anterior(self):
+        servicio = WorkersHubService()
+        primera = asyncio.run(servicio._get_session())
+        segunda = asyncio.run(servicio._get_session())
+        assert primera.closed
+        assert segunda is not primera
+        asyncio.run(servicio.close())
+        assert segunda.closed
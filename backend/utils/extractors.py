@@ -1,40 +1,291 @@
 """
 Extractores de entidades para Defense Files
 Extrae RFCs, artículos legales, montos, fechas, etc. de textos
+
+Los disparadores de todos los patrones se compilan en una sola alternancia
+con grupos con nombre y el texto se recorre una vez: cada posición donde
+dispara alguno se visita en orden y ahí se prueban los patrones completos,
+con un cursor por patrón que reproduce la semántica de re.findall
+(coincidencias sin traslape dentro de cada patrón). Así los traslapes entre
+patrones ("$1,234.56 MXN", "artículo 27") dan exactamente los mismos
+resultados que la búsqueda patrón por patrón.
+
+escanear() devuelve las entidades tipadas con su posición; las funciones
+extraer_* conservan el formato y orden de sus listas. extract_many()
+procesa lotes de documentos y usa un pool de procesos en corpus grandes.
+
+Configuración por variables de entorno:
+- EXTRACTORES_POOL_MIN_BYTES (default 4194304): tamaño total del corpus a
+  partir del cual extract_many reparte el trabajo en procesos
 """
 
+import os
 import re
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Any, Iterable, NamedTuple, Optional, Sequence, Tuple
 from datetime import datetime
 
+POOL_MIN_BYTES = int(os.getenv("EXTRACTORES_POOL_MIN_BYTES", str(4 * 1024 * 1024)))
+
+# Tipo de entidad -> clave en los diccionarios de resultados
+CLAVES = {
+    'rfc': 'rfcs',
+    'articulo': 'articulos',
+    'monto': 'montos',
+    'uuid': 'uuids',
+    'ley': 'leyes',
+    'fecha': 'fechas',
+}
+TIPOS = tuple(CLAVES)
+
+# Entidades que se registran en los eventos de un Defense File
+TIPOS_EVENTO = ('rfc', 'articulo', 'monto', 'uuid', 'ley')
+
+_MESES = 'enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre'
+
+# (tipo, etiqueta, patrón, disparador). Dentro de un tipo el orden de los
+# patrones es el orden de las listas resultantes; en leyes la etiqueta es el
+# nombre canónico.
+_PATRONES: Tuple[Tuple[str, Optional[str], str, str], ...] = (
+    # RFC moral (3 letras) o física (4 letras) + fecha + homoclave
+    ('rfc', None, r'(?i:\b[A-ZÑ&]{3,4}\d{6}[A-Z0-9]{3}\b)', 'rfc'),
+    ('uuid', None, r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b', 'uuid'),
+    ('articulo', None, r'[Aa]rt[íi]culo\s+(\d+(?:-[A-Z])?)', 'articulo'),
+    ('articulo', None, r'[Aa]rt\.?\s*(\d+(?:-[A-Z])?)', 'articulo'),
+    ('articulo', None, r'[Aa]rtículos?\s+(\d+(?:-[A-Z])?(?:\s*(?:,|y)\s*\d+(?:-[A-Z])?)*)', 'articulo'),
+    ('monto', None, r'(?i:\$[\d,]+(?:\.\d{2})?)', 'pesos'),
+    ('monto', None, r'(?i:MXN\s*[\d,]+(?:\.\d{2})?)', 'mxn'),
+    ('monto', None, r'(?i:[\d,]+(?:\.\d{2})?\s*(?:pesos|MXN))', 'cifra'),
+    ('fecha', None, r'\d{4}-\d{2}-\d{2}', 'cifra'),
+    ('fecha', None, r'\d{2}/\d{2}/\d{4}', 'cifra'),
+    ('fecha', None, rf'(?i:\d{{1,2}}\s+de\s+(?:{_MESES})\s+(?:de\s+)?\d{{4}})', 'cifra'),
+    ('ley', 'LISR', r'(?i:\bLISR\b)', 'ley_l'),
+    ('ley', 'LIVA', r'(?i:\bLIVA\b)', 'ley_l'),
+    ('ley', 'CFF', r'(?i:\bCFF\b)', 'ley_c'),
+    ('ley', 'CPEUM', r'(?i:\bCPEUM\b)', 'ley_c'),
+    ('ley', 'LGSM', r'(?i:\bLGSM\b)', 'ley_l'),
+    ('ley', 'Ley del Impuesto Sobre la Renta', r'(?i:ley\s+del\s+impuesto\s+sobre\s+la\s+renta)', 'ley_l'),
+    ('ley', 'Ley del IVA', r'(?i:ley\s+del\s+IVA)', 'ley_l'),
+    ('ley', 'Código Fiscal de la Federación', r'(?i:código\s+fiscal\s+de\s+la\s+federación)', 'ley_c'),
+)
+
+# Disparadores compartidos por los patrones: (primeros caracteres, resto,
+# desplazamientos). Cada disparador coincide al menos en un punto fijo de
+# cualquiera de sus patrones y el patrón empieza `desplazamiento` caracteres
+# antes. Todos arrancan con un carácter de una misma clase, así el escáner
+# salta en C las posiciones que no pueden iniciar nada y solo prueba los
+# patrones completos donde algún disparador coincide.
+_DISPARADORES: Dict[str, Tuple[str, str, Tuple[int, ...]]] = {
+    # Seis dígitos después de una letra: el RFC empieza 4 o 3 caracteres antes
+    'rfc': (r'\d', r'(?<=[^\W\d]\d|&\d)\d{5}', (4, 3)),
+    # Primer guion del UUID
+    'uuid': (r'\-', r'(?<=[0-9a-fA-F]{8}-)[0-9a-fA-F]{4}-', (8,)),
+    'articulo': ('Aa', r'rt[íi.\s\d]', (0,)),
+    'pesos': (r'\$', r'[\d,]', (0,)),
+    'mxn': ('Mm', r'(?i:XN)\s*[\d,]', (0,)),
+    # Una cifra seguida de "pesos"/"MXN" no empieza después de [\d,]: el
+    # patrón habría coincidido desde el carácter anterior
+    'cifra': (r'\d,', r'(?<![\d,][\d,])[\d,.]*\s*[PpMm]|(?<=\d)(?:\d{3}-|\d/|\d?\s+[Dd])', (0,)),
+    'ley_l': ('Ll', r'(?i:ISR|IVA|GSM|ey\s)', (0,)),
+    'ley_c': ('Cc', r'(?i:FF|PEUM|ódigo\s)', (0,)),
+}
+
+
+class Entidad(NamedTuple):
+    """Entidad encontrada en un texto; inicio/fin son posiciones en el texto original."""
+    tipo: str
+    valor: str
+    inicio: int
+    fin: int
+
+
+class _Motor(NamedTuple):
+    patrones: Tuple[Tuple[str, Optional[str], Any], ...]
+    # Por disparador: índices de sus patrones en `patrones` y desplazamientos
+    cubiertos: Tuple[Tuple[Tuple[int, ...], Tuple[int, ...]], ...]
+    # alternancias[k]: disparadores k..n (la 0 es el escáner maestro)
+    alternancias: Tuple[Any, ...]
+    indice_grupo: Dict[str, int]
+
+
+@lru_cache(maxsize=None)
+def _motor(tipos: Tuple[str, ...]) -> _Motor:
+    """Compila la alternancia de los patrones de `tipos` (una vez por combinación)."""
+    desconocidos = set(tipos) - set(CLAVES)
+    if desconocidos or not tipos:
+        raise ValueError(f"Tipos de entidad desconocidos: {sorted(desconocidos) or tipos}")
+    seleccion = [entrada for entrada in _PATRONES if entrada[0] in tipos]
+    grupos: Dict[str, List[int]] = {}
+    for j, (_, _, _, disparador) in enumerate(seleccion):
+        grupos.setdefault(disparador, []).append(j)
+
+    primeros = "".join(_DISPARADORES[g][0] for g in grupos)
+    # Cada alternativa revisa su primer carácter con un lookbehind; el grupo
+    # con nombre va al final para que sea el último en cerrar (lastgroup)
+    alternativas = [
+        f"(?<=[{_DISPARADORES[g][0]}])(?:{_DISPARADORES[g][1]})(?P<{g}>)" for g in grupos
+    ]
+    return _Motor(
+        patrones=tuple((tipo, etiqueta, re.compile(patron)) for tipo, etiqueta, patron, _ in seleccion),
+        cubiertos=tuple((tuple(js), _DISPARADORES[g][2]) for g, js in grupos.items()),
+        alternancias=tuple(
+            re.compile(f"[{primeros}](?:{'|'.join(alternativas[k:])})") for k in range(len(alternativas))
+        ),
+        indice_grupo={g: k for k, g in enumerate(grupos)},
+    )
+
+
+_NO_MONTO = re.compile(r'[^\d.,]')
+
+
+def _valor(tipo: str, etiqueta: Optional[str], match) -> str:
+    if tipo == 'rfc' or tipo == 'uuid':
+        return match.group().upper()
+    if tipo == 'articulo':
+        return f"Art. {match.group(1)}"
+    if tipo == 'monto':
+        limpio = _NO_MONTO.sub('', match.group())
+        return f"${limpio}" if limpio else ""
+    if tipo == 'ley':
+        return etiqueta
+    return match.group()
+
+
+def _escanear(texto: str, tipos: Tuple[str, ...]) -> List[Tuple[int, Entidad]]:
+    """
+    Recorre el texto una vez y devuelve (índice de patrón, entidad).
+
+    El maestro encuentra la siguiente posición donde dispara alguna
+    alternativa; las anteriores a la que coincidió no disparan ahí, así que
+    las demás se obtienen con la alternancia de los disparadores siguientes
+    anclada en esa posición. Cada patrón recibe sus posibles inicios en
+    orden no decreciente y no se prueba dentro de su coincidencia anterior:
+    el mismo avance que re.findall.
+    """
+    patrones, cubiertos, alternancias, indice_grupo = _motor(tipos)
+    total = len(alternancias)
+    siguiente = [0] * len(patrones)
+    encontradas: List[Tuple[int, Entidad]] = []
+    buscar = alternancias[0].search
+    pos = 0
+    while True:
+        m = buscar(texto, pos)
+        if m is None:
+            break
+        posicion = m.start()
+        while True:
+            k = indice_grupo[m.lastgroup]
+            indices, desplazamientos = cubiertos[k]
+            for j in indices:
+                for desplazamiento in desplazamientos:
+                    inicio = posicion - desplazamiento
+                    if inicio < siguiente[j]:
+                        continue
+                    tipo, etiqueta, patron = patrones[j]
+                    coincidencia = patron.match(texto, inicio)
+                    if coincidencia is None:
+                        continue
+                    fin = coincidencia.end()
+                    siguiente[j] = fin
+                    valor = _valor(tipo, etiqueta, coincidencia)
+                    if valor:
+                        encontradas.append((j, Entidad(tipo, valor, inicio, fin)))
+            if k + 1 == total:
+                break
+            m = alternancias[k + 1].match(texto, posicion)
+            if m is None:
+                break
+        pos = posicion + 1
+    return encontradas
+
+
+def escanear(texto: str, tipos: Sequence[str] = TIPOS) -> List[Entidad]:
+    """Entidades tipadas del texto en orden de aparición (una pasada)."""
+    encontradas = _escanear(texto, tuple(tipos))
+    encontradas.sort(key=lambda par: (par[1].inicio, par[0]))
+    return [entidad for _, entidad in encontradas]
+
+
+def extraer_texto(texto: str, tipos: Sequence[str] = TIPOS) -> Dict[str, List[str]]:
+    """
+    Extrae las entidades de `tipos` en una sola pasada.
+
+    Returns:
+        Dict clave -> lista (ver CLAVES), con el mismo formato y orden que
+        las funciones extraer_* individuales
+    """
+    tipos = tuple(tipos)
+    por_patron: Dict[int, List[str]] = {}
+    for j, entidad in _escanear(texto, tipos):
+        por_patron.setdefault(j, []).append(entidad.valor)
+
+    patrones = _motor(tipos).patrones
+    resultado: Dict[str, List[str]] = {CLAVES[tipo]: [] for tipo in TIPOS if tipo in tipos}
+    vistos: Dict[str, set] = {clave: set() for clave in resultado}
+    for j in sorted(por_patron):
+        clave = CLAVES[patrones[j][0]]
+        lista = resultado[clave]
+        if clave == 'montos':
+            # Los montos repetidos se conservan (formato histórico de la lista)
+            lista.extend(por_patron[j])
+            continue
+        for valor in por_patron[j]:
+            if valor not in vistos[clave]:
+                vistos[clave].add(valor)
+                lista.append(valor)
+    return resultado
+
 
 def extraer_entidades(datos: Dict[str, Any]) -> Dict[str, List[str]]:
     """
     Extrae entidades mencionadas de los datos de un evento.
     
     Returns:
-        Dict con listas de: rfcs, articulos, montos, fechas, uuids
+        Dict con listas de: rfcs, articulos, montos, uuids, leyes
     """
-    entidades = {
-        'rfcs': [],
-        'articulos': [],
-        'montos': [],
-        'fechas': [],
-        'uuids': [],
-        'leyes': []
-    }
-    
-    texto = _datos_a_texto(datos)
-    
-    entidades['rfcs'] = extraer_rfcs(texto)
-    entidades['articulos'] = extraer_articulos(texto)
-    entidades['montos'] = extraer_montos(texto)
-    entidades['uuids'] = extraer_uuids(texto)
-    entidades['leyes'] = extraer_leyes(texto)
-    
-    entidades = {k: v for k, v in entidades.items() if v}
-    
-    return entidades
+    entidades = extraer_texto(_datos_a_texto(datos), TIPOS_EVENTO)
+    return {k: v for k, v in entidades.items() if v}
+
+
+def _extraer_lote(textos: List[str], tipos: Tuple[str, ...]) -> List[Dict[str, List[str]]]:
+    return [extraer_texto(texto, tipos) for texto in textos]
+
+
+def extract_many(
+    docs: Iterable[Any],
+    tipos: Sequence[str] = TIPOS,
+    max_workers: Optional[int] = None,
+    tamano_lote: int = 64,
+    min_bytes_pool: Optional[int] = None,
+) -> List[Dict[str, List[str]]]:
+    """
+    Extrae entidades de muchos documentos; un resultado por documento, en
+    el mismo orden que `docs`.
+
+    Args:
+        docs: Textos o datos anidados (se aplanan como en extraer_entidades)
+        tipos: Tipos de entidad a extraer (ver TIPOS)
+        max_workers: Procesos del pool (0 o 1 = procesar en el proceso actual)
+        tamano_lote: Documentos por tarea enviada al pool
+        min_bytes_pool: Tamaño total (en caracteres) desde el que se usa el
+            pool; por debajo el arranque de procesos cuesta más que el
+            escaneo (default EXTRACTORES_POOL_MIN_BYTES)
+    """
+    tipos = tuple(tipos)
+    textos = [doc if isinstance(doc, str) else _datos_a_texto(doc) for doc in docs]
+    workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+    minimo = POOL_MIN_BYTES if min_bytes_pool is None else min_bytes_pool
+    lotes = [textos[i:i + tamano_lote] for i in range(0, len(textos), tamano_lote)]
+
+    if workers <= 1 or len(lotes) <= 1 or sum(len(t) for t in textos) < minimo:
+        return _extraer_lote(textos, tipos)
+
+    resultados: List[Dict[str, List[str]]] = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(lotes))) as pool:
+        for parcial in pool.map(_extraer_lote, lotes, [tipos] * len(lotes)):
+            resultados.extend(parcial)
+    return resultados
 
 
 def _datos_a_texto(datos: Any, nivel: int = 0) -> str:
@@ -65,17 +316,7 @@ def extraer_rfcs(texto: str) -> List[str]:
     - Persona Moral: 3 letras + 6 dígitos + 3 alfanuméricos (12 caracteres)
     - Persona Física: 4 letras + 6 dígitos + 3 alfanuméricos (13 caracteres)
     """
-    patron_rfc = r'\b([A-ZÑ&]{3,4})(\d{6})([A-Z0-9]{3})\b'
-    
-    matches = re.findall(patron_rfc, texto.upper())
-    
-    rfcs = []
-    for match in matches:
-        rfc = ''.join(match)
-        if len(rfc) in [12, 13] and rfc not in rfcs:
-            rfcs.append(rfc)
-    
-    return rfcs
+    return extraer_texto(texto, ('rfc',))['rfcs']
 
 
 def extraer_articulos(texto: str) -> List[str]:
@@ -87,47 +328,14 @@ def extraer_articulos(texto: str) -> List[str]:
     - "Art. 27 LISR"
     - "artículo 5-A CFF"
     """
-    patrones = [
-        r'[Aa]rt[íi]culo\s+(\d+(?:-[A-Z])?)',
-        r'[Aa]rt\.?\s*(\d+(?:-[A-Z])?)',
-        r'[Aa]rtículos?\s+(\d+(?:-[A-Z])?(?:\s*(?:,|y)\s*\d+(?:-[A-Z])?)*)',
-    ]
-    
-    articulos = []
-    for patron in patrones:
-        matches = re.findall(patron, texto)
-        for match in matches:
-            art = f"Art. {match}" if not match.startswith('Art') else match
-            if art not in articulos:
-                articulos.append(art)
-    
-    return articulos
+    return extraer_texto(texto, ('articulo',))['articulos']
 
 
 def extraer_leyes(texto: str) -> List[str]:
     """
     Extrae referencias a leyes fiscales mexicanas.
     """
-    leyes_conocidas = [
-        ('LISR', r'\bLISR\b'),
-        ('LIVA', r'\bLIVA\b'),
-        ('CFF', r'\bCFF\b'),
-        ('CPEUM', r'\bCPEUM\b'),
-        ('LGSM', r'\bLGSM\b'),
-        ('Ley del Impuesto Sobre la Renta', r'[Ll]ey\s+del\s+[Ii]mpuesto\s+[Ss]obre\s+la\s+[Rr]enta'),
-        ('Ley del IVA', r'[Ll]ey\s+del\s+IVA'),
-        ('Código Fiscal de la Federación', r'[Cc]ódigo\s+[Ff]iscal\s+de\s+la\s+[Ff]ederación'),
-    ]
-    
-    leyes_encontradas = []
-    texto_upper = texto.upper()
-    
-    for nombre, patron in leyes_conocidas:
-        if re.search(patron, texto, re.IGNORECASE):
-            if nombre not in leyes_encontradas:
-                leyes_encontradas.append(nombre)
-    
-    return leyes_encontradas
+    return extraer_texto(texto, ('ley',))['leyes']
 
 
 def extraer_montos(texto: str) -> List[str]:
@@ -139,53 +347,22 @@ def extraer_montos(texto: str) -> List[str]:
     - MXN 1234.56
     - 1,234.56 pesos
     """
-    patrones = [
-        r'\$[\d,]+(?:\.\d{2})?',
-        r'MXN\s*[\d,]+(?:\.\d{2})?',
-        r'[\d,]+(?:\.\d{2})?\s*(?:pesos|MXN)',
-    ]
-    
-    montos = []
-    for patron in patrones:
-        matches = re.findall(patron, texto, re.IGNORECASE)
-        for match in matches:
-            monto_limpio = re.sub(r'[^\d.,]', '', match)
-            if monto_limpio and monto_limpio not in montos:
-                montos.append(f"${monto_limpio}")
-    
-    return montos
+    return extraer_texto(texto, ('monto',))['montos']
 
 
 def extraer_uuids(texto: str) -> List[str]:
     """
-    Extrae UUIDs de CFDIs del texto.
+    Extrae UUIDs de CFDIs del texto (en mayúsculas, orden de aparición).
     Formato: 8-4-4-4-12 caracteres hexadecimales
     """
-    patron_uuid = r'\b([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})\b'
-    
-    matches = re.findall(patron_uuid, texto)
-    
-    return list(set(match.upper() for match in matches))
+    return extraer_texto(texto, ('uuid',))['uuids']
 
 
 def extraer_fechas(texto: str) -> List[str]:
     """
     Extrae fechas del texto en formatos comunes.
     """
-    patrones = [
-        r'\d{4}-\d{2}-\d{2}',
-        r'\d{2}/\d{2}/\d{4}',
-        r'\d{1,2}\s+de\s+(?:enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\s+(?:de\s+)?\d{4}',
-    ]
-    
-    fechas = []
-    for patron in patrones:
-        matches = re.findall(patron, texto, re.IGNORECASE)
-        for match in matches:
-            if match not in fechas:
-                fechas.append(match)
-    
-    return fechas
+    return extraer_texto(texto, ('fecha',))['fechas']
 
 
 def validar_rfc(rfc: str) -> Dict[str, Any]: